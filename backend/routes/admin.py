@@ -1,6 +1,6 @@
 """Admin routes for FleeTrack application"""
 
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Request
 from typing import Dict, Any, List
 from datetime import datetime, timezone
 import logging
@@ -10,6 +10,8 @@ import os
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from utils import cache_config, user_cache
+from services import browser_pool, clientes_http, dashboard_stats, envio_email, executor_service, lideranca, tempo_real, whatsapp_massa
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +42,105 @@ async def get_admin_settings(current_user: dict = Depends(get_current_user)):
     return settings
 
 
+@router.get("/executor/estatisticas")
+async def get_executor_stats(current_user: dict = Depends(get_current_user)):
+    """Estado dos pools de processos/threads e métricas por tarefa (por processo)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return executor_service.estatisticas()
+
+
+@router.get("/clientes-http/estatisticas")
+async def get_http_clients_stats(current_user: dict = Depends(get_current_user)):
+    """Pedidos, repetições e erros dos clientes HTTP partilhados (por processo)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return clientes_http.estatisticas()
+
+
+@router.get("/browser-pool/estatisticas")
+async def get_browser_pool_stats(current_user: dict = Depends(get_current_user)):
+    """Browsers Playwright partilhados: contextos ativos, fila e reciclagem (por processo)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return browser_pool.estatisticas()
+
+
+@router.get("/cache-config/estatisticas")
+async def get_cache_config_stats(current_user: dict = Depends(get_current_user)):
+    """Cache dos endpoints de configuração: entradas, hits/misses, 304 e invalidações (por processo)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return cache_config.estatisticas()
+
+
+@router.get("/tempo-real/estatisticas")
+async def get_tempo_real_stats(current_user: dict = Depends(get_current_user)):
+    """Canal em tempo real: backend, ligações abertas e eventos publicados/entregues/descartados (por processo)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return tempo_real.estatisticas()
+
+
+@router.get("/email/estatisticas")
+async def get_email_stats(current_user: dict = Depends(get_current_user)):
+    """Envio de email: sessões SMTP abertas (por processo) e emails por estado"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    por_estado = {
+        r["_id"]: r["total"]
+        async for r in db[envio_email.COLECAO].aggregate([{"$group": {"_id": "$estado", "total": {"$sum": 1}}}])
+    }
+    return {**envio_email.estatisticas(), "emails_por_estado": por_estado}
+
+
+@router.get("/whatsapp/estatisticas")
+async def get_whatsapp_stats(current_user: dict = Depends(get_current_user)):
+    """Envios WhatsApp em massa: ritmo, concorrência, repetições e pausas por limite (por processo)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return whatsapp_massa.estatisticas()
+
+
+@router.get("/email/dead-letter")
+async def get_email_dead_letter(limite: int = 100, current_user: dict = Depends(get_current_user)):
+    """Emails que falharam definitivamente (erro permanente ou tentativas esgotadas)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return await db[envio_email.COLECAO].find(
+        {"estado": envio_email.DEAD_LETTER}, {"_id": 0, "html": 0}
+    ).sort("atualizado_em", -1).to_list(limite)
+
+
+@router.post("/email/dead-letter/reenviar")
+async def reenviar_email_dead_letter(
+    ids: List[str] = Body(default=[], embed=True),
+    current_user: dict = Depends(get_current_user)
+):
+    """Voltar a enviar emails em dead-letter (todos, se `ids` vier vazio)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return await envio_email.reenviar(db, ids or None, criado_por=current_user["id"])
+
+
+@router.get("/agendador/estado")
+async def get_scheduler_status(current_user: dict = Depends(get_current_user)):
+    """Tarefas periódicas: nó dono de cada lease, heartbeat, última e próxima execução"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    return await lideranca.estado(db)
+
+
 @router.put("/settings")
 async def update_admin_settings(
     settings: Dict[str, Any],
@@ -62,10 +163,12 @@ async def update_admin_settings(
 
 
 @router.get("/config/textos-legais")
-async def get_textos_legais(current_user: dict = Depends(get_current_user)):
+async def get_textos_legais(request: Request, current_user: dict = Depends(get_current_user)):
     """Obtém textos legais (termos, privacidade, etc)"""
-    config = await db.configuracoes.find_one({"tipo": "textos_legais"}, {"_id": 0})
-    return config or {}
+    async def carregar():
+        return await db.configuracoes.find_one({"tipo": "textos_legais"}, {"_id": 0}) or {}
+    
+    return await cache_config.responder(request, db, cache_config.CONFIGURACOES, "admin:textos_legais", carregar)
 
 
 @router.put("/config/textos-legais")
@@ -87,6 +190,7 @@ async def update_textos_legais(
         }},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Textos legais atualizados"}
 
@@ -110,6 +214,7 @@ async def update_config_comunicacoes(
         }},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Configurações de comunicações atualizadas"}
 
@@ -133,6 +238,7 @@ async def update_config_integracoes(
         }},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Configurações de integrações atualizadas"}
 
@@ -355,8 +461,11 @@ async def libertar_email(
     # Remover users
     users_result = await db.users.delete_many({"email": email})
     resultados["users_removidos"] = users_result.deleted_count
+    for user_id in user_ids:
+        user_cache.invalidar_utilizador(user_id)
     
     # Remover motoristas
+    await dashboard_stats.registar_em_bloco(db, "motoristas", {"email": email}, -1)
     motoristas_result = await db.motoristas.delete_many({"email": email})
     resultados["motoristas_removidos"] = motoristas_result.deleted_count
     
@@ -408,8 +517,11 @@ async def limpar_todos_eliminados(current_user: dict = Depends(get_current_user)
     # Remover users eliminados
     users_result = await db.users.delete_many({"deleted": True})
     resultados["users_removidos"] = users_result.deleted_count
+    for user_id in deleted_ids:
+        user_cache.invalidar_utilizador(user_id)
     
     # Remover motoristas eliminados
+    await dashboard_stats.registar_em_bloco(db, "motoristas", {"deleted": True}, -1)
     motoristas_result = await db.motoristas.delete_many({"deleted": True})
     resultados["motoristas_removidos"] = motoristas_result.deleted_count
     
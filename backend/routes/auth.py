@@ -15,6 +15,8 @@ from utils.auth import (
     get_current_user
 )
 from utils.database import get_database
+from utils import user_cache
+from services import dashboard_stats
 
 router = APIRouter()
 db = get_database()
@@ -149,6 +151,7 @@ async def register(user_data: UserCreate):
             }
         }
         await db.motoristas.insert_one(motorista_doc)
+        await dashboard_stats.registar_motorista(db, motorista_doc)
         logger.info(f"Created motorista document for new user {user_dict['id']}")
     
     # Se for parceiro, criar documento na collection parceiros IMEDIATAMENTE
@@ -223,6 +226,7 @@ async def update_profile(update_data: Dict, current_user: Dict = Depends(get_cur
         raise HTTPException(status_code=400, detail="No valid fields to update")
     
     await db.users.update_one({"id": current_user["id"]}, {"$set": update_dict})
+    user_cache.invalidar_utilizador(current_user["id"])
     
     return {"message": "Profile updated successfully"}
 
@@ -245,6 +249,7 @@ async def change_password(
     
     hashed_new = hash_password(new_password)
     await db.users.update_one({"id": current_user["id"]}, {"$set": {"password": hashed_new}})
+    user_cache.invalidar_utilizador(current_user["id"])
     
     return {"message": "Password changed successfully"}
 
@@ -346,6 +351,7 @@ async def forgot_password(email_data: Dict):
             "senha_provisoria_criada_em": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(user.get("id"))
     
     # Also update in motoristas if exists
     await db.motoristas.update_one(
@@ -477,6 +483,7 @@ async def admin_change_user_password(
         {"id": user_id},
         {"$set": {"password": hashed_password, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     return {
         "message": f"Senha do utilizador {user.get('name', user.get('email'))} alterada com sucesso",
@@ -3,18 +3,24 @@ Rotas para Sistema de Backup Completo (Admin Only)
 Permite exportar e importar TODOS os dados do sistema
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from typing import Dict, Any, Optional, List
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from typing import Dict, Any, Optional, List, AsyncIterator
 from datetime import datetime, timezone
+from pathlib import Path
 from pydantic import BaseModel
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
+import asyncio
+import gzip
 import logging
 import uuid
 import json
+import zlib
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from services import executor_service
 
 router = APIRouter(prefix="/backup", tags=["Backup"])
 logger = logging.getLogger(__name__)
@@ -373,8 +379,13 @@ async def importar_backup_completo(
                     doc["_importado_em"] = datetime.now(timezone.utc).isoformat()
                     doc["_importado_por"] = current_user["id"]
                 
-                result = await db[colecao].insert_many(docs)
-                count = len(result.inserted_ids)
+                try:
+                    result = await db[colecao].insert_many(docs)
+                    count = len(result.inserted_ids)
+                except BulkWriteError as e:
+                    # Os documentos antes do que falhou ficaram gravados
+                    count = e.details.get("nInserted", 0)
+                    resultados["erros"].append(f"Erro ao importar {colecao}: {str(e)}")
                 resultados["colecoes_importadas"].append({
                     "nome": colecao,
                     "documentos": count
@@ -406,6 +417,329 @@ async def importar_backup_completo(
     return resultados
 
 
+# ==================== BACKUP EM STREAMING (NDJSON GZIP) ====================
+#
+# Formato: sequência de membros gzip concatenados, um por coleção. Cada membro
+# contém NDJSON cuja primeira linha é o cabeçalho {"__colecao__": nome}.
+# Os documentos são escritos directamente a partir dos cursores, sem carregar
+# a coleção inteira em memória.
+
+BACKUP_STREAM_DIR = Path(__file__).parent.parent / "uploads" / "backups"
+BACKUP_STREAM_DIR.mkdir(parents=True, exist_ok=True)
+
+BACKUP_STREAM_BATCH = 1000
+BACKUP_STREAM_CHUNK = 256 * 1024
+
+
+async def _marcar_backup_erro(backup_id: str, erro: str):
+    await db.backups.update_one(
+        {"id": backup_id},
+        {"$set": {"status": "erro", "erro": erro, "atualizado_em": datetime.now(timezone.utc).isoformat()}}
+    )
+
+
+async def _stream_backup_gzip(backup_id: str, colecoes: List[str]) -> AsyncIterator[bytes]:
+    """Gerar o backup como bytes gzip, um membro por coleção, com progresso em db.backups
+    
+    Um erro a meio de uma coleção interrompe o stream (o membro gzip já
+    enviado ficaria truncado) e marca o backup como "erro"; o mesmo quando
+    o cliente desliga antes do fim.
+    """
+    total_docs = 0
+    colecoes_exportadas = []
+    
+    try:
+        for indice, colecao in enumerate(colecoes, start=1):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            buffer = bytearray()
+            buffer += compressor.compress(
+                (json.dumps({"__colecao__": colecao}) + "\n").encode("utf-8")
+            )
+            count = 0
+            
+            async for doc in db[colecao].find({}, {"_id": 0}).batch_size(BACKUP_STREAM_BATCH):
+                linha = json.dumps(convert_objectid(doc), ensure_ascii=False, default=str) + "\n"
+                buffer += compressor.compress(linha.encode("utf-8"))
+                count += 1
+                if len(buffer) >= BACKUP_STREAM_CHUNK:
+                    yield bytes(buffer)
+                    buffer.clear()
+            
+            buffer += compressor.flush()
+            yield bytes(buffer)
+            
+            if count > 0:
+                colecoes_exportadas.append({"nome": colecao, "documentos": count})
+                total_docs += count
+            
+            await db.backups.update_one(
+                {"id": backup_id},
+                {"$set": {
+                    "colecao_atual": colecao,
+                    "colecoes_processadas": indice,
+                    "progresso": round(100 * indice / len(colecoes), 1),
+                    "total_documentos": total_docs,
+                    "atualizado_em": datetime.now(timezone.utc).isoformat()
+                }}
+            )
+    except (GeneratorExit, asyncio.CancelledError):
+        logger.warning(f"Backup streaming {backup_id} interrompido pelo cliente")
+        # Sem await aqui: o gerador está a ser fechado ou a tarefa cancelada
+        asyncio.ensure_future(_marcar_backup_erro(backup_id, "Transferência interrompida pelo cliente"))
+        raise
+    except Exception as e:
+        logger.error(f"Erro no backup streaming {backup_id} ({colecao}): {e}")
+        await _marcar_backup_erro(backup_id, f"Erro ao exportar {colecao}: {e}")
+        raise
+    
+    await db.backups.update_one(
+        {"id": backup_id},
+        {"$set": {
+            "status": "concluido",
+            "progresso": 100,
+            "total_colecoes": len(colecoes_exportadas),
+            "total_documentos": total_docs,
+            "colecoes_exportadas": colecoes_exportadas,
+            "concluido_em": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+    logger.info(f"Backup streaming {backup_id} concluído: {len(colecoes_exportadas)} coleções, {total_docs} documentos")
+
+
+async def _registar_backup_stream(current_user: dict, destino: str) -> str:
+    backup_id = str(uuid.uuid4())
+    await db.backups.insert_one({
+        "id": backup_id,
+        "tipo": "completo_stream",
+        "formato": "ndjson.gz",
+        "destino": destino,
+        "status": "em_progresso",
+        "progresso": 0,
+        "exportado_em": datetime.now(timezone.utc).isoformat(),
+        "exportado_por": current_user["id"],
+        "total_documentos": 0
+    })
+    return backup_id
+
+
+async def _escrever_backup_ficheiro(backup_id: str, caminho: Path):
+    """Escrever o backup em streaming para um ficheiro em uploads/backups"""
+    try:
+        with open(caminho, "wb") as f:
+            async for chunk in _stream_backup_gzip(backup_id, COLECOES_BACKUP):
+                f.write(chunk)
+        await db.backups.update_one(
+            {"id": backup_id},
+            {"$set": {"tamanho_bytes": caminho.stat().st_size}}
+        )
+    except Exception as e:
+        logger.error(f"Erro no backup streaming {backup_id}: {e}")
+        caminho.unlink(missing_ok=True)
+        await _marcar_backup_erro(backup_id, str(e))
+
+
+@router.get("/completo/stream")
+async def exportar_backup_completo_stream(
+    current_user: dict = Depends(get_current_user)
+):
+    """Exportar backup completo em streaming (NDJSON gzip, uma coleção por membro) (Admin only)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Apenas Admin pode exportar backup completo")
+    
+    backup_id = await _registar_backup_stream(current_user, "download")
+    filename = f"backup_tvdefleet_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.ndjson.gz"
+    
+    return StreamingResponse(
+        _stream_backup_gzip(backup_id, COLECOES_BACKUP),
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Backup-Id": backup_id
+        }
+    )
+
+
+@router.post("/completo/ficheiro")
+async def exportar_backup_completo_ficheiro(
+    current_user: dict = Depends(get_current_user)
+):
+    """Iniciar backup completo em streaming para ficheiro no servidor (Admin only)
+    
+    Retorna imediatamente o backup_id; o progresso fica em GET /backup/{backup_id}/estado.
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Apenas Admin pode exportar backup completo")
+    
+    backup_id = await _registar_backup_stream(current_user, "ficheiro")
+    caminho = BACKUP_STREAM_DIR / f"backup_{backup_id}.ndjson.gz"
+    await db.backups.update_one({"id": backup_id}, {"$set": {"ficheiro": str(caminho.name)}})
+    
+    asyncio.create_task(_escrever_backup_ficheiro(backup_id, caminho))
+    
+    return {"backup_id": backup_id, "status": "em_progresso", "ficheiro": caminho.name}
+
+
+@router.get("/{backup_id}/estado")
+async def obter_estado_backup(
+    backup_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Obter o progresso de um backup em streaming"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Apenas Admin")
+    
+    backup = await db.backups.find_one({"id": backup_id}, {"_id": 0})
+    if not backup:
+        raise HTTPException(status_code=404, detail="Backup não encontrado")
+    return backup
+
+
+@router.get("/{backup_id}/download")
+async def download_backup_ficheiro(
+    backup_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Descarregar um backup em ficheiro já concluído"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Apenas Admin")
+    
+    backup = await db.backups.find_one({"id": backup_id}, {"_id": 0})
+    if not backup or not backup.get("ficheiro"):
+        raise HTTPException(status_code=404, detail="Backup não encontrado")
+    if backup.get("status") != "concluido":
+        raise HTTPException(status_code=409, detail=f"Backup ainda não concluído ({backup.get('status')})")
+    
+    caminho = BACKUP_STREAM_DIR / backup["ficheiro"]
+    if not caminho.exists():
+        raise HTTPException(status_code=404, detail="Ficheiro de backup não encontrado")
+    
+    return FileResponse(path=str(caminho), filename=caminho.name, media_type="application/gzip")
+
+
+def _ler_linhas_backup(stream, limite: int) -> List[dict]:
+    """Descomprimir e interpretar até `limite` linhas NDJSON (corre no executor)"""
+    docs = []
+    for linha in stream:
+        if linha.strip():
+            docs.append(json.loads(linha))
+            if len(docs) >= limite:
+                break
+    return docs
+
+
+@router.post("/importar/stream")
+async def importar_backup_stream(
+    file: UploadFile = File(...),
+    substituir_existente: bool = Form(False),
+    colecoes_selecionadas: Optional[str] = Form(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Importar backup NDJSON gzip em streaming, com insert_many em lotes (Admin only)
+    
+    - colecoes_selecionadas: nomes separados por vírgula (vazio = todas)
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Apenas Admin pode importar backup")
+    
+    selecionadas = None
+    if colecoes_selecionadas:
+        selecionadas = {c.strip() for c in colecoes_selecionadas.split(",") if c.strip()}
+    
+    logger.info(f"Iniciando importação streaming de backup por {current_user['id']}")
+    
+    resultados = {
+        "sucesso": True,
+        "colecoes_importadas": [],
+        "colecoes_processadas": 0,
+        "total_documentos_importados": 0,
+        "erros": []
+    }
+    importado_em = datetime.now(timezone.utc).isoformat()
+    
+    colecao = None
+    lote = []
+    contagem = 0
+    
+    async def gravar_lote():
+        nonlocal lote, contagem
+        if lote:
+            pendentes, lote = lote, []
+            try:
+                result = await db[colecao].insert_many(pendentes, ordered=False)
+            except BulkWriteError as e:
+                # Com ordered=False só os documentos com erro ficam de fora
+                contagem += e.details.get("nInserted", 0)
+                raise
+            contagem += len(result.inserted_ids)
+    
+    async def fechar_colecao():
+        nonlocal contagem
+        if colecao is None:
+            return
+        resultados["colecoes_processadas"] += 1
+        try:
+            await gravar_lote()
+        except Exception as e:
+            resultados["erros"].append(f"Erro ao importar {colecao}: {str(e)}")
+        if contagem:
+            resultados["colecoes_importadas"].append({"nome": colecao, "documentos": contagem})
+            resultados["total_documentos_importados"] += contagem
+            logger.info(f"Importado {colecao}: {contagem} documentos")
+        contagem = 0
+    
+    try:
+        with gzip.open(file.file, "rt", encoding="utf-8") as stream:
+            # Descompressão e json.loads fora do event loop, um lote de cada vez
+            while True:
+                docs = await executor_service.executar_io(_ler_linhas_backup, stream, BACKUP_STREAM_BATCH)
+                if not docs:
+                    break
+                for doc in docs:
+                    if "__colecao__" in doc:
+                        await fechar_colecao()
+                        colecao = doc["__colecao__"]
+                        if selecionadas is not None and colecao not in selecionadas:
+                            colecao = None
+                        elif substituir_existente:
+                            await db[colecao].delete_many({})
+                        continue
+                    
+                    if colecao is None:
+                        continue
+                    
+                    doc["_importado_em"] = importado_em
+                    doc["_importado_por"] = current_user["id"]
+                    lote.append(doc)
+                    
+                    if len(lote) >= BACKUP_STREAM_BATCH:
+                        try:
+                            await gravar_lote()
+                        except Exception as e:
+                            resultados["erros"].append(f"Erro ao importar {colecao}: {str(e)}")
+            
+            await fechar_colecao()
+    except (OSError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Ficheiro de backup inválido: {str(e)}")
+    
+    if resultados["erros"]:
+        resultados["sucesso"] = len(resultados["colecoes_importadas"]) > 0
+    
+    await db.backups.insert_one({
+        "id": str(uuid.uuid4()),
+        "tipo": "importacao_stream",
+        "importado_em": importado_em,
+        "importado_por": current_user["id"],
+        "total_colecoes": len(resultados["colecoes_importadas"]),
+        "colecoes_processadas": resultados["colecoes_processadas"],
+        "total_documentos": resultados["total_documentos_importados"],
+        "erros": resultados["erros"]
+    })
+    
+    logger.info(f"Importação streaming concluída: {len(resultados['colecoes_importadas'])} coleções, {resultados['total_documentos_importados']} documentos")
+    
+    return resultados
+
+
 @router.get("/colecoes")
 async def listar_colecoes_disponiveis(
     current_user: dict = Depends(get_current_user)
@@ -11,6 +11,7 @@ import logging
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from services import ledger_semanal
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/bolt", tags=["bolt-integration"])
@@ -128,6 +129,7 @@ async def sync_bolt_earnings(
                         "created_at": datetime.now(timezone.utc).isoformat()
                     }
                     await db.ganhos_bolt.insert_one(ganho_bolt)
+                    await ledger_semanal.invalidar_registos(db, [ganho_bolt], parceiro_id=parceiro_id)
                     
                     await db.logs_sincronizacao_parceiro.update_one(
                         {"id": log_id},
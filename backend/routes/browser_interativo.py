@@ -1,14 +1,15 @@
 """
 Rotas para Browser Interativo - Login Uber com CAPTCHA
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket
 from pydantic import BaseModel
 from typing import Optional
 import logging
 import asyncio
 
 from utils.database import get_database
-from utils.auth import get_current_user
+from utils.auth import get_current_user, get_user_from_token
+from services import browser_live, ledger_semanal
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/browser", tags=["Browser Interativo"])
@@ -131,6 +132,40 @@ async def obter_screenshot(
         return {"sucesso": False, "erro": str(e)}
 
 
+@router.websocket("/live")
+async def live_browser(websocket: WebSocket, token: str = Query(...)):
+    """
+    Live-view do browser por WebSocket (frames JPEG binários + eventos de
+    input em JSON). Substitui o polling de /screenshot; ver services/browser_live.py
+    """
+    # Aceitar antes de fechar: um close antes do accept chega ao browser como
+    # 1006 e o cliente não vê os códigos 4401/4403/4404 que o fazem parar
+    await websocket.accept()
+    try:
+        user = await get_user_from_token(token, db)
+    except HTTPException as e:
+        await websocket.close(code=4401, reason=str(e.detail))
+        return
+    if user["role"] not in ["parceiro", "admin"]:
+        await websocket.close(code=4403, reason="Não autorizado")
+        return
+
+    from services.browser_interativo import browsers_ativos
+
+    parceiro_id = user.get("parceiro_id") or user.get("id")
+    browser = browsers_ativos.get(parceiro_id)
+    if not browser or not browser.page:
+        await websocket.close(code=4404, reason="Browser não iniciado")
+        return
+
+    await browser_live.transmitir(
+        websocket,
+        browser.page,
+        {"clicar": browser.clicar, "escrever": browser.escrever, "tecla": browser.tecla},
+        estado=browser.verificar_login,
+    )
+
+
 @router.post("/clicar")
 async def clicar_browser(
     acao: AcaoMouse,
@@ -489,6 +524,7 @@ async def extrair_rendimentos_browser(
             periodo_inicio = (hoje - timedelta(days=7)).strftime('%Y-%m-%d')
             
             # Guardar cada motorista em ganhos_uber (para o resumo semanal)
+            ganhos_importados = []
             for mot in motoristas_importados:
                 nome_motorista = mot.get("nome", "")
                 
@@ -519,6 +555,9 @@ async def extrair_rendimentos_browser(
                 }
                 
                 await db.ganhos_uber.insert_one(ganho)
+                ganhos_importados.append(ganho)
+            
+            await ledger_semanal.invalidar_registos(db, ganhos_importados, parceiro_id=parceiro_id)
             
             # Guardar resumo em importacoes_uber
             await db.importacoes_uber.insert_one({
@@ -1,7 +1,7 @@
 """
 Rotas para Browser Interativo Prio - Login com SMS 2FA
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket
 from pydantic import BaseModel
 from typing import Optional, Dict
 import logging
@@ -11,7 +11,8 @@ import json
 from datetime import datetime, timedelta
 
 from utils.database import get_database
-from utils.auth import get_current_user
+from utils.auth import get_current_user, get_user_from_token
+from services import browser_live
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/prio", tags=["Browser Interativo Prio"])
@@ -119,6 +120,51 @@ async def obter_screenshot_prio(
         return {"sucesso": False, "erro": str(e)}
 
 
+@router.websocket("/browser/live")
+async def live_browser_prio(websocket: WebSocket, token: str = Query(...)):
+    """
+    Live-view do browser Prio por WebSocket (frames JPEG binários + eventos
+    de input em JSON). Substitui o polling de /browser/screenshot
+    """
+    # Como em /browser-interativo/live: aceitar primeiro para o código de fecho chegar ao cliente
+    await websocket.accept()
+    try:
+        user = await get_user_from_token(token, db)
+    except HTTPException as e:
+        await websocket.close(code=4401, reason=str(e.detail))
+        return
+    if user["role"] not in ["parceiro", "admin"]:
+        await websocket.close(code=4403, reason="Não autorizado")
+        return
+
+    from services.browser_interativo_prio import _browsers_prio
+
+    parceiro_id = user.get("parceiro_id") or user.get("id")
+    browser = _browsers_prio.get(parceiro_id)
+    if not browser or not browser.ativo or not browser.page:
+        await websocket.close(code=4404, reason="Browser não iniciado")
+        return
+
+    sessao = {"guardada": False}
+
+    async def estado():
+        login_status = await browser.verificar_login()
+        # Como em /browser/clicar: guardar a sessão assim que o login fica feito
+        if login_status.get("logado") and not sessao["guardada"]:
+            sessao["guardada"] = True
+            await browser.guardar_sessao()
+            _save_login_state(parceiro_id, True)
+            logger.info(f"Login Prio bem-sucedido para parceiro {parceiro_id}")
+        return {"logado": login_status.get("logado", False), "url": browser.page.url if browser.page else None}
+
+    await browser_live.transmitir(
+        websocket,
+        browser.page,
+        {"clicar": browser.clicar, "escrever": browser.digitar, "tecla": browser.tecla},
+        estado=estado,
+    )
+
+
 @router.post("/browser/clicar")
 async def clicar_browser_prio(
     acao: AcaoMouse,
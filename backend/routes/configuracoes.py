@@ -7,6 +7,7 @@ import logging
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from utils import cache_config
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +56,7 @@ async def save_categorias_plataformas(
             },
             upsert=True
         )
+        await cache_config.invalidar(db, cache_config.CONFIGURACOES)
         
         logger.info(f"{plataforma.capitalize()} categories updated by {current_user['email']}")
         return {"message": f"{plataforma.capitalize()} categories saved successfully"}
@@ -134,6 +136,7 @@ async def update_configuracao_geral(
         },
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": f"Configuration {config_tipo} updated successfully"}
 
@@ -168,6 +171,7 @@ async def _salvar_mapeamento_campos(mapeamentos: Dict[str, Any], current_user: d
         }},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {'success': True, 'message': 'Mapeamento salvo com sucesso'}
 
@@ -256,6 +260,7 @@ async def _salvar_config_sincronizacao(config: Dict[str, Any], current_user: dic
         }},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {'success': True, 'message': 'Configuração salva com sucesso'}
 
@@ -13,6 +13,7 @@ import uuid
 import logging
 
 from utils.database import get_database
+from utils import user_cache
 from utils.auth import get_current_user, hash_password
 from models.user import UserRole
 
@@ -229,6 +230,7 @@ async def atualizar_contabilista(
         {"id": contabilista_id},
         {"$set": update_data}
     )
+    user_cache.invalidar_utilizador(contabilista_id)
     
     return {"success": True, "message": "Contabilista atualizado"}
 
@@ -287,6 +289,7 @@ async def editar_contabilista_completo(
         {"id": contabilista_id},
         {"$set": update_data}
     )
+    user_cache.invalidar_utilizador(contabilista_id)
     
     logger.info(f"Contabilista {contabilista_id} editado por {current_user['email']}")
     
@@ -317,6 +320,7 @@ async def eliminar_contabilista(
             raise HTTPException(status_code=403, detail="Não autorizado")
     
     await db.users.delete_one({"id": contabilista_id})
+    user_cache.invalidar_utilizador(contabilista_id)
     
     logger.info(f"Contabilista {contabilista_id} eliminado por {current_user['email']}")
     
@@ -359,6 +363,7 @@ async def atribuir_parceiros_a_contabilista(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(contabilista_id)
     
     return {
         "success": True,
@@ -394,6 +399,7 @@ async def selecionar_parceiro_ativo_contabilista(
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        user_cache.invalidar_utilizador(contabilista_id)
         return {"message": "Parceiro ativo removido", "parceiro_ativo_id": None}
     
     # Verificar que contabilista tem acesso a este parceiro
@@ -425,6 +431,7 @@ async def selecionar_parceiro_ativo_contabilista(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(contabilista_id)
     
     return {
         "message": f"Parceiro {parceiro.get('nome_empresa') or parceiro.get('name')} selecionado",
@@ -11,6 +11,7 @@ from io import BytesIO
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from utils.paginacao import Paginacao, paginar
 
 logger = logging.getLogger(__name__)
 
@@ -199,14 +200,27 @@ async def criar_contrato(
 
 
 @router.get("")
-async def get_contratos(current_user: dict = Depends(get_current_user)):
-    """Lista contratos"""
+async def get_contratos(
+    status: Optional[str] = None,
+    motorista_id: Optional[str] = None,
+    paginacao: Paginacao = Depends(),
+    current_user: dict = Depends(get_current_user)
+):
+    """Lista contratos (paginada, mais recentes primeiro, com `limit`/`cursor`)"""
     query = {}
     
     if current_user["role"] == UserRole.PARCEIRO:
         query["parceiro_id"] = current_user["id"]
     elif current_user["role"] == UserRole.MOTORISTA:
         query["motorista_id"] = current_user["id"]
+    if status:
+        query["status"] = status
+    if motorista_id and current_user["role"] != UserRole.MOTORISTA:
+        query["motorista_id"] = motorista_id
+    
+    if paginacao.ativa:
+        pagina = await paginar(db.contratos, query, paginacao, ("created_at", -1))
+        return paginacao.resposta(pagina)
     
     contratos = await db.contratos.find(query, {"_id": 0}).to_list(None)
     return contratos
@@ -8,6 +8,7 @@ import logging
 from models.user import UserRole
 from utils.auth import get_current_user
 from utils.database import get_database
+from services.dashboard_stats import obter_stats, reconciliar_dashboard_stats
 
 router = APIRouter()
 db = get_database()
@@ -63,27 +64,22 @@ async def get_dashboard_stats(
             query["parceiro_id"] = parceiro_id
             motorista_query["parceiro_atribuido"] = parceiro_id
     
-    total_vehicles = await db.vehicles.count_documents(query)
-    available_vehicles = await db.vehicles.count_documents({**query, "status": "disponivel"})
-    total_motoristas = await db.motoristas.count_documents(motorista_query)
-    pending_motoristas = await db.motoristas.count_documents({**motorista_query, "approved": False})
-    
-    # Filter revenues and expenses
-    if "parceiro_id" in query:
-        parceiro_filter = query["parceiro_id"]
-        if isinstance(parceiro_filter, dict):
-            vehicles = await db.vehicles.find({"parceiro_id": parceiro_filter}, {"_id": 0, "id": 1}).to_list(10000)
-        else:
-            vehicles = await db.vehicles.find({"parceiro_id": parceiro_filter}, {"_id": 0, "id": 1}).to_list(10000)
-        vehicle_ids = [v["id"] for v in vehicles]
-        revenues = await db.revenues.find({"vehicle_id": {"$in": vehicle_ids}}, {"_id": 0}).to_list(10000)
-        expenses = await db.expenses.find({"vehicle_id": {"$in": vehicle_ids}}, {"_id": 0}).to_list(10000)
+    # Contadores materializados em dashboard_stats (services/dashboard_stats.py)
+    parceiro_filter = query.get("parceiro_id")
+    if parceiro_filter is None:
+        parceiro_ids = None
+    elif isinstance(parceiro_filter, dict):
+        parceiro_ids = parceiro_filter["$in"]
     else:
-        revenues = await db.revenues.find({}, {"_id": 0}).to_list(10000)
-        expenses = await db.expenses.find({}, {"_id": 0}).to_list(10000)
+        parceiro_ids = [parceiro_filter]
+    stats = await obter_stats(db, parceiro_ids)
     
-    total_receitas = sum([r.get("valor", 0) for r in revenues])
-    total_despesas = sum([e.get("valor", 0) for e in expenses])
+    total_vehicles = stats["vehicles"]["total"]
+    available_vehicles = stats["vehicles"]["por_status"].get("disponivel", 0)
+    total_motoristas = stats["motoristas"]["total"]
+    pending_motoristas = stats["motoristas"]["pendentes"]
+    total_receitas = round(stats["receitas"]["total"], 2)
+    total_despesas = round(stats["despesas"]["total"], 2)
     
     return {
         "total_vehicles": total_vehicles,
@@ -306,25 +302,20 @@ async def get_resumo_geral(current_user: Dict = Depends(get_current_user)):
     if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO]:
         raise HTTPException(status_code=403, detail="Apenas Admin/Gestão")
     
+    # Motoristas e veículos a partir dos contadores materializados
+    stats = await obter_stats(db)
+    total_motoristas = stats["motoristas"]["total"]
+    total_veiculos = stats["vehicles"]["total"]
+    motoristas_pendentes = stats["motoristas"]["pendentes"]
+    # Motoristas sem parceiro atribuído (aprovados mas sem parceiro)
+    motoristas_sem_parceiro = stats["motoristas"]["sem_parceiro"]
+    
     # Count all entities
-    total_parceiros = await db.parceiros.count_documents({})
-    total_motoristas = await db.motoristas.count_documents({})
-    total_veiculos = await db.vehicles.count_documents({})
-    total_users = await db.users.count_documents({})
+    total_parceiros = await db.parceiros.estimated_document_count()
+    total_users = await db.users.estimated_document_count()
     
     # Pending approvals
     users_pendentes = await db.users.count_documents({"approved": False})
-    motoristas_pendentes = await db.motoristas.count_documents({"approved": False})
-    
-    # Motoristas sem parceiro atribuído (aprovados mas sem parceiro)
-    motoristas_sem_parceiro = await db.motoristas.count_documents({
-        "approved": True,
-        "$or": [
-            {"parceiro_atribuido": None},
-            {"parceiro_atribuido": ""},
-            {"parceiro_atribuido": {"$exists": False}}
-        ]
-    })
     
     # Active users (logged in last 7 days)
     seven_days_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
@@ -346,3 +337,12 @@ async def get_resumo_geral(current_user: Dict = Depends(get_current_user)):
             "users_ativos_7d": users_ativos
         }
     }
+
+
+@router.post("/dashboard/stats/reconciliar")
+async def reconciliar_stats(current_user: Dict = Depends(get_current_user)):
+    """Recalcular os contadores materializados do dashboard (Admin only)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Apenas Admin")
+    
+    return await reconciliar_dashboard_stats(db)
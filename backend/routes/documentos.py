@@ -11,6 +11,7 @@ import base64
 from models.user import UserRole
 from utils.auth import get_current_user
 from utils.database import get_database
+from utils import user_cache
 
 router = APIRouter()
 db = get_database()
@@ -64,6 +65,7 @@ async def upload_documento_registo(
             {"id": user_id},
             {"$set": {update_field: doc_id}}
         )
+        user_cache.invalidar_utilizador(user_id)
         
         # Se for motorista, também atualizar na collection motoristas
         if role == "motorista":
@@ -324,6 +326,7 @@ async def aprovar_todos_documentos_user(
                 }
             }
         )
+        user_cache.invalidar_utilizador(user_id)
         
         return {"message": "Utilizador e todos os documentos aprovados com sucesso"}
         
@@ -15,6 +15,7 @@ from pathlib import Path
 from utils.database import get_database
 from utils.auth import get_current_user
 from utils.file_upload_handler import FileUploadHandler
+from services import uploads_processamento
 
 router = APIRouter(prefix="/documentos-motorista", tags=["Documentos Motorista"])
 logger = logging.getLogger(__name__)
@@ -83,6 +84,8 @@ async def upload_documento(
     
     doc_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc)
+    path_original = None
+    converter = False
     
     # Use FileUploadHandler for cloud integration
     if parceiro_id:
@@ -102,10 +105,13 @@ async def upload_documento(
         # Fallback to local-only storage
         file_name = f"{current_user['id']}_{tipo}_{doc_id}{file_ext}"
         file_path = str(DOCS_UPLOAD_DIR / file_name)
+        await uploads_processamento.guardar_stream(file, file_path)
         
-        content = await file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        # Imagens: o PDF é gerado na fila de uploads; até lá serve-se o original
+        converter = uploads_processamento.e_imagem(file_name)
+        if converter:
+            path_original = file_path
+            file_path = str(DOCS_UPLOAD_DIR / f"{current_user['id']}_{tipo}_{doc_id}.pdf")
         
         file_url = f"/api/documentos-motorista/ficheiro/{doc_id}"
         cloud_path = None
@@ -139,6 +145,7 @@ async def upload_documento(
         "tipo_nome": TIPOS_DOCUMENTOS[tipo],
         "nome_ficheiro": file.filename,
         "path": file_path,
+        "path_original": path_original,
         "file_url": file_url,
         "cloud_path": cloud_path,
         "cloud_provider": provider,
@@ -155,6 +162,21 @@ async def upload_documento(
     
     await db.documentos_motorista.insert_one(documento)
     
+    if converter:
+        await uploads_processamento.enfileirar(
+            db,
+            doc_id,
+            path_original,
+            pdf=file_path,
+            referencia={
+                "colecao": "documentos_motorista",
+                "filtro": {"id": doc_id, "path": file_path},
+                "campo": "path",
+                "valor_erro": path_original
+            },
+            criado_por=current_user["id"]
+        )
+    
     # Atualizar motorista com referência ao documento
     update_field = f"documents.{tipo}_pdf"
     await db.motoristas.update_one(
@@ -275,13 +297,16 @@ async def obter_ficheiro(
             raise HTTPException(status_code=403, detail="Não autorizado")
     
     file_path = Path(documento["path"])
+    if not file_path.exists() and documento.get("path_original"):
+        # PDF ainda em processamento
+        file_path = Path(documento["path_original"])
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Ficheiro não encontrado")
     
     return FileResponse(
         path=str(file_path),
-        filename=documento["nome_ficheiro"],
+        filename=Path(documento["nome_ficheiro"]).with_suffix(file_path.suffix).name,
         media_type="application/octet-stream"
     )
 
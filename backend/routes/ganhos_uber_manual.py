@@ -15,6 +15,7 @@ import logging
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from services import ledger_semanal
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ganhos-uber", tags=["ganhos-uber-manual"])
@@ -194,6 +195,7 @@ async def atualizar_ganho_uber(
         
         # Retornar ganho atualizado
         ganho_atualizado = await db.ganhos_uber.find_one({"id": ganho_id}, {"_id": 0})
+        await ledger_semanal.invalidar_registos(db, [ganho_atualizado])
         for k, v in ganho_atualizado.items():
             if isinstance(v, datetime):
                 ganho_atualizado[k] = v.isoformat()
@@ -262,6 +264,7 @@ async def criar_ganho_uber(
         }
         
         await db.ganhos_uber.insert_one(ganho)
+        await ledger_semanal.invalidar_registos(db, [ganho])
         
         logger.info(f"Ganho Uber criado manualmente por {user['id']}: {ganho['id']}")
         
@@ -308,6 +311,7 @@ async def eliminar_ganho_uber(
         
         # Eliminar
         await db.ganhos_uber.delete_one({"id": ganho_id})
+        await ledger_semanal.invalidar_registos(db, [ganho])
         
         logger.info(f"Ganho Uber {ganho_id} eliminado por {user['id']}")
         
@@ -363,6 +367,7 @@ async def atualizar_ganhos_lote(
         
         atualizados = 0
         erros = []
+        ids_atualizados = []
         
         for item in atualizacoes:
             try:
@@ -388,10 +393,18 @@ async def atualizar_ganhos_lote(
                 
                 if result.modified_count > 0:
                     atualizados += 1
+                    ids_atualizados.append(ganho_id)
                     
             except Exception as e:
                 erros.append(f"Erro no ID {item.get('id')}: {str(e)}")
         
+        if ids_atualizados:
+            ganhos_atualizados = await db.ganhos_uber.find(
+                {"id": {"$in": ids_atualizados}},
+                {"_id": 0, "motorista_id": 1, "semana": 1, "ano": 1, "data": 1, "periodo_inicio": 1, "periodo_fim": 1}
+            ).to_list(len(ids_atualizados))
+            await ledger_semanal.invalidar_registos(db, ganhos_atualizados)
+        
         logger.info(f"Atualização em lote: {atualizados} registos atualizados, {len(erros)} erros")
         
         return {
@@ -3,7 +3,7 @@ Rotas de Gestão de Planos e Módulos
 API para administração de planos, módulos, promoções e subscrições
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone, timedelta
@@ -13,6 +13,8 @@ import uuid
 from models.user import UserRole
 from utils.auth import get_current_user
 from utils.database import get_database
+from utils import cache_config, user_cache
+from services import dashboard_stats
 from services.planos_modulos_service import PlanosModulosService
 from models.planos_modulos import (
     ModuloCreate, ModuloUpdate, PlanoCreate, PlanoUpdate,
@@ -33,6 +35,7 @@ def get_service():
 
 @router.get("/modulos")
 async def listar_modulos(
+    request: Request,
     tipo_usuario: Optional[str] = Query(None, description="Filtrar por tipo: parceiro, motorista"),
     apenas_ativos: bool = Query(True),
     current_user: Dict = Depends(get_current_user)
@@ -40,7 +43,7 @@ async def listar_modulos(
     """Listar todos os módulos disponíveis"""
     service = get_service()
     modulos = await service.get_all_modulos(tipo_usuario, apenas_ativos)
-    return modulos
+    return cache_config.resposta(request, modulos)
 
 
 @router.get("/modulos-extras")
@@ -88,6 +91,7 @@ async def adicionar_modulo_extra(
         {"id": user_id},
         {"$addToSet": {"modulos_ativos": modulo_codigo}}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     if result.modified_count == 0:
         # Verificar se já tinha o módulo
@@ -134,6 +138,7 @@ async def criar_modulo(
         raise HTTPException(status_code=400, detail="Código de módulo já existe")
     
     modulo = await service.criar_modulo(data, current_user["id"])
+    user_cache.invalidar_entitlements()
     return modulo
 
 
@@ -151,6 +156,7 @@ async def atualizar_modulo(
     modulo = await service.atualizar_modulo(modulo_id, updates, current_user["id"])
     if not modulo:
         raise HTTPException(status_code=404, detail="Módulo não encontrado")
+    user_cache.invalidar_entitlements()
     return modulo
 
 
@@ -171,12 +177,15 @@ async def eliminar_modulo(
         result = await service.db.modulos_sistema.delete_one({"id": modulo_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Módulo não encontrado")
+        await cache_config.invalidar(db, cache_config.MODULOS)
+        user_cache.invalidar_entitlements()
         return {"message": "Módulo eliminado permanentemente"}
     else:
         # Apenas desativar
         success = await service.eliminar_modulo(modulo_id)
         if not success:
             raise HTTPException(status_code=404, detail="Módulo não encontrado")
+        user_cache.invalidar_entitlements()
         return {"message": "Módulo desativado com sucesso"}
 
 
@@ -205,6 +214,7 @@ async def definir_precos_modulo(
 
 @router.get("/planos")
 async def listar_planos(
+    request: Request,
     tipo_usuario: Optional[str] = Query(None, description="Filtrar por tipo: parceiro, motorista"),
     apenas_ativos: bool = Query(True),
     current_user: Dict = Depends(get_current_user)
@@ -212,11 +222,12 @@ async def listar_planos(
     """Listar todos os planos disponíveis"""
     service = get_service()
     planos = await service.get_all_planos(tipo_usuario, apenas_ativos)
-    return planos
+    return cache_config.resposta(request, planos)
 
 
 @router.get("/planos/public")
 async def listar_planos_public(
+    request: Request,
     tipo_usuario: Optional[str] = Query(None)
 ):
     """Listar planos públicos (sem autenticação)"""
@@ -225,7 +236,7 @@ async def listar_planos_public(
     # Remover informações sensíveis
     for plano in planos:
         plano.pop("precos_especiais", None)
-    return planos
+    return cache_config.resposta(request, planos)
 
 
 @router.get("/planos/{plano_id}")
@@ -252,6 +263,7 @@ async def criar_plano(
     
     service = get_service()
     plano = await service.criar_plano(data, current_user["id"])
+    user_cache.invalidar_entitlements()
     return plano
 
 
@@ -269,6 +281,7 @@ async def atualizar_plano(
     plano = await service.atualizar_plano(plano_id, updates, current_user["id"])
     if not plano:
         raise HTTPException(status_code=404, detail="Plano não encontrado")
+    user_cache.invalidar_entitlements()
     return plano
 
 
@@ -289,12 +302,15 @@ async def eliminar_plano(
         result = await service.db.planos_sistema.delete_one({"id": plano_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Plano não encontrado")
+        await cache_config.invalidar(db, cache_config.PLANOS)
+        user_cache.invalidar_entitlements()
         return {"message": "Plano eliminado permanentemente"}
     else:
         # Apenas desativar
         success = await service.eliminar_plano(plano_id)
         if not success:
             raise HTTPException(status_code=404, detail="Plano não encontrado")
+        user_cache.invalidar_entitlements()
         return {"message": "Plano desativado com sucesso"}
 
 
@@ -400,6 +416,7 @@ async def remover_preco_especial(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Preço especial não encontrado")
+    await cache_config.invalidar(db, cache_config.PLANOS)
     
     return {"message": "Preço especial removido com sucesso"}
 
@@ -432,6 +449,7 @@ async def atualizar_preco_especial(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Preço especial não encontrado")
+    await cache_config.invalidar(db, cache_config.PLANOS)
     
     return {"message": "Preço especial atualizado com sucesso"}
 
@@ -512,9 +530,12 @@ async def atualizar_recursos(
 async def listar_subscricoes(
     status: Optional[str] = Query(None),
     tipo_usuario: Optional[str] = Query(None),
+    detalhes: bool = Query(False, description="Incluir módulos, limites e preço de cada utilizador"),
+    limit: int = Query(100, ge=1, le=500),
+    skip: int = Query(0, ge=0),
     current_user: Dict = Depends(get_current_user)
 ):
-    """Listar todas as subscrições (Admin only)"""
+    """Listar as subscrições, mais recentes primeiro, uma página de `limit` de cada vez (Admin only)"""
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Apenas administradores")
     
@@ -524,10 +545,38 @@ async def listar_subscricoes(
     if tipo_usuario:
         filtro["user_tipo"] = tipo_usuario
     
-    subscricoes = await db.subscricoes.find(filtro, {"_id": 0}).sort("created_at", -1).to_list(100)
+    subscricoes = await db.subscricoes.find(filtro, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    
+    if detalhes:
+        resolvidas = await get_service().resolver_subscricoes(subscricoes)
+        for subscricao in subscricoes:
+            subscricao["detalhes"] = resolvidas.get(subscricao.get("id"))
+    
     return subscricoes
 
 
+class ResolverLoteRequest(BaseModel):
+    user_ids: List[str]
+    periodicidade: Optional[str] = None
+    contar_uso: bool = True
+
+
+@router.post("/subscricoes/resolver-lote")
+async def resolver_subscricoes_lote(
+    request: ResolverLoteRequest,
+    current_user: Dict = Depends(get_current_user)
+):
+    """Módulos ativos, limites e preço de vários utilizadores num só pedido (Admin only)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Apenas administradores")
+    if len(request.user_ids) > 2000:
+        raise HTTPException(status_code=400, detail="Máximo de 2000 utilizadores por pedido")
+    
+    service = get_service()
+    resolvidos = await service.resolver_lote(request.user_ids, request.periodicidade, request.contar_uso)
+    return {"total": len(resolvidos), "utilizadores": resolvidos}
+
+
 @router.get("/subscricoes/minha")
 async def obter_minha_subscricao(
     current_user: Dict = Depends(get_current_user)
@@ -591,6 +640,7 @@ async def atribuir_plano(
     service = get_service()
     try:
         subscricao = await service.atribuir_plano(request, current_user["id"])
+        user_cache.invalidar_utilizador(request.user_id)
         return subscricao
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -608,6 +658,7 @@ async def atribuir_modulo(
     service = get_service()
     try:
         modulo = await service.atribuir_modulo(request, current_user["id"])
+        user_cache.invalidar_utilizador(request.user_id)
         return modulo
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -625,6 +676,7 @@ async def remover_modulo(
     
     service = get_service()
     success = await service.remover_modulo_user(user_id, modulo_codigo, current_user["id"])
+    user_cache.invalidar_utilizador(user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Módulo não encontrado")
     return {"message": "Módulo removido com sucesso"}
@@ -642,6 +694,7 @@ async def cancelar_subscricao(
     
     service = get_service()
     success = await service.cancelar_subscricao(user_id, current_user["id"], motivo)
+    user_cache.invalidar_utilizador(user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Subscrição não encontrada")
     return {"message": "Subscrição cancelada com sucesso"}
@@ -1090,6 +1143,7 @@ async def oferecer_plano_gratuito(
     }
     
     await db.subscricoes.insert_one(nova_subscricao)
+    user_cache.invalidar_utilizador(oferta.user_id)
     
     logger.info(f"Plano {plano['nome']} oferecido a {user_nome} por {oferta.dias_gratis} dias por {current_user['id']}")
     
@@ -2045,6 +2099,7 @@ async def eliminar_motorista_inativo(
     
     # Eliminar permanentemente
     await db.motoristas.delete_one({"id": motorista_id})
+    await dashboard_stats.registar_motorista(db, motorista, -1)
     
     # Log para auditoria
     await db.audit_log.insert_one({
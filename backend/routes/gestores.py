@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 import logging
 
 from utils.database import get_database
+from utils import user_cache
 from utils.auth import get_current_user
 
 # Setup logging
@@ -62,6 +63,7 @@ async def atribuir_parceiros_a_gestor(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(gestor_id)
     
     # Remove gestor from parceiros that are no longer assigned
     parceiros_removidos = set(parceiros_anteriores) - set(parceiros_ids)
@@ -247,6 +249,7 @@ async def remover_parceiro_do_gestor(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(gestor_id)
     
     # Update parceiro - remove gestor from gestores_ids list
     parceiro = await db.parceiros.find_one({"id": parceiro_id}, {"_id": 0})
@@ -298,6 +301,7 @@ async def selecionar_parceiro_ativo(
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }}
         )
+        user_cache.invalidar_utilizador(gestor_id)
         return {"message": "Parceiro ativo removido", "parceiro_ativo_id": None}
     
     # Verify gestor has access to this parceiro
@@ -323,6 +327,7 @@ async def selecionar_parceiro_ativo(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(gestor_id)
     
     return {
         "message": f"Parceiro {parceiro.get('nome_empresa') or parceiro.get('name')} selecionado",
@@ -15,6 +15,7 @@ import logging
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from services import ledger_semanal
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/import", tags=["import-ganhos"])
@@ -64,6 +65,7 @@ async def importar_ganhos_uber(
         csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
         
         ganhos_importados = []
+        ganhos_substituidos = []
         motoristas_encontrados = 0
         motoristas_nao_encontrados = 0
         erros = []
@@ -165,6 +167,7 @@ async def importar_ganhos_uber(
                 
                 if existe:
                     # Actualizar em vez de inserir
+                    ganhos_substituidos.append(existe)
                     await db.ganhos_uber.update_one(
                         {'id': existe['id']},
                         {'$set': ganho}
@@ -180,6 +183,8 @@ async def importar_ganhos_uber(
             except Exception as e:
                 erros.append(f"Linha {row_num}: {str(e)}")
         
+        await ledger_semanal.invalidar_registos(db, ganhos_importados + ganhos_substituidos)
+        
         # Guardar também resumo da importação
         if ganhos_importados and semana_calc and ano_calc:
             await db.importacoes_uber.update_one(
@@ -257,6 +262,7 @@ async def importar_ganhos_bolt(
         csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
         
         ganhos_importados = []
+        ganhos_substituidos = []
         motoristas_encontrados = 0
         motoristas_nao_encontrados = 0
         erros = []
@@ -388,6 +394,7 @@ async def importar_ganhos_bolt(
                 
                 if existe:
                     # Actualizar em vez de inserir
+                    ganhos_substituidos.append(existe)
                     await db.ganhos_bolt.update_one(
                         {"id": existe["id"]},
                         {"$set": ganho}
@@ -401,6 +408,8 @@ async def importar_ganhos_bolt(
             except Exception as e:
                 erros.append(f"Linha {row_num}: {str(e)}")
         
+        await ledger_semanal.invalidar_registos(db, ganhos_importados + ganhos_substituidos)
+        
         # Serializar para resposta
         ganhos_serializados = []
         for g in ganhos_importados[:10]:
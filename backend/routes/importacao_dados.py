@@ -8,11 +8,11 @@ from datetime import datetime, timezone, timedelta
 import logging
 import os
 import uuid
-import shutil
 
 from utils.database import get_database
 from utils.auth import get_current_user
 from services.rpa_processor import processar_download, guardar_no_resumo_semanal
+from services import executor_service, uploads_processamento
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/importacao", tags=["importacao"])
@@ -63,8 +63,7 @@ async def upload_e_preview(
         safe_filename = f"{file_id}_{file.filename}"
         filepath = os.path.join(UPLOAD_DIR, safe_filename)
         
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await uploads_processamento.guardar_stream(file, filepath)
         
         # Mapear plataforma para nome do processador
         plataforma_map = {
@@ -116,6 +115,8 @@ async def upload_e_preview(
         
     except HTTPException:
         raise
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Erro no upload-preview: {e}")
         return {"sucesso": False, "erro": str(e)}
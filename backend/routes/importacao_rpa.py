@@ -366,8 +366,10 @@ async def enviar_resumos_importacao(
     if via_whatsapp:
         from routes.whatsapp_cloud import send_whatsapp_cloud_message
     
+    email_service = None
     if via_email:
         from utils.email_service import get_parceiro_email_service
+        email_service = await get_parceiro_email_service(db, parceiro_id)
     
     for resumo in resumos:
         detalhe = {"motorista": resumo["motorista"], "whatsapp": None, "email": None}
@@ -419,14 +421,13 @@ _Mensagem automática TVDEFleet_"""
         if via_email and (resumo.get("email") or (motorista and motorista.get("email"))):
             email_destino = resumo.get("email") or motorista.get("email")
             try:
-                email_service = await get_parceiro_email_service(parceiro_id)
                 if email_service:
                     # Converter mensagem para HTML simples
                     html_mensagem = mensagem.replace("*", "<strong>").replace("\n", "<br>")
-                    result = await email_service.send_email(
+                    result = await email_service.enviar(
                         to_email=email_destino,
                         subject=f"Resumo Semanal - Semana {resumo['semana']}/{resumo['ano']}",
-                        html_content=f"<html><body>{html_mensagem}</body></html>"
+                        body_html=f"<html><body>{html_mensagem}</body></html>"
                     )
                     if result.get("success"):
                         resultados["email_enviados"] += 1
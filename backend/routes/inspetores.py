@@ -13,6 +13,7 @@ import uuid
 import logging
 
 from utils.database import get_database
+from utils import user_cache
 from utils.auth import get_current_user, hash_password
 from models.user import UserRole
 
@@ -232,6 +233,7 @@ async def atualizar_inspetor(
         {"id": inspetor_id},
         {"$set": update_data}
     )
+    user_cache.invalidar_utilizador(inspetor_id)
     
     return {"success": True, "message": "Inspetor atualizado"}
 
@@ -291,6 +293,7 @@ async def editar_inspetor_completo(
         {"id": inspetor_id},
         {"$set": update_data}
     )
+    user_cache.invalidar_utilizador(inspetor_id)
     
     return {"success": True, "message": "Inspetor atualizado com sucesso"}
 
@@ -327,6 +330,7 @@ async def eliminar_inspetor(
             "desativado_por": current_user["id"]
         }}
     )
+    user_cache.invalidar_utilizador(inspetor_id)
     
     return {"success": True, "message": "Inspetor desativado"}
 
@@ -366,5 +370,6 @@ async def associar_parceiro(
             {"id": inspetor_id},
             {"$set": {"parceiros_associados": parceiros_atuais}}
         )
+        user_cache.invalidar_utilizador(inspetor_id)
     
     return {"success": True, "message": "Parceiro associado ao inspetor"}
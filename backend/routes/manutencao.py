@@ -10,6 +10,7 @@ import io
 import re
 
 from models.user import UserRole
+from services import nao_lidas
 from utils.auth import get_current_user
 from utils.database import get_database
 
@@ -343,6 +344,7 @@ async def criar_notificacao_revisao(veiculo: Dict, km_atual: float, km_para_revi
             "veiculo_id": veiculo["id"]
         }
         await db.notificacoes.insert_one(notificacao)
+        await nao_lidas.notificacao_criada(db, notificacao)
 
 
 # ==================== ALERTAS DE REVISÃO ====================
@@ -6,8 +6,10 @@ from datetime import datetime, timezone
 
 from models.mensagem import Mensagem, MensagemCreate, Conversa, ConversaCreate, ConversaStats
 from models.user import UserRole
+from services import nao_lidas, tempo_real
 from utils.auth import get_current_user
 from utils.database import get_database
+from utils.paginacao import Paginacao, paginar
 
 router = APIRouter()
 db = get_database()
@@ -21,28 +23,23 @@ async def get_conversas(current_user: Dict = Depends(get_current_user)):
         {"_id": 0}
     ).sort("ultima_mensagem_em", -1).to_list(length=None)
     
-    # Get participant info and count unread messages
+    # Participant info in one query; unread counters are kept on the conversation
+    await nao_lidas.preencher(db, conversas)
+    outros_ids = {p for c in conversas for p in c["participantes"] if p != current_user["id"]}
+    utilizadores = {}
+    if outros_ids:
+        async for user in db.users.find(
+            {"id": {"$in": list(outros_ids)}},
+            {"_id": 0, "id": 1, "name": 1, "role": 1, "email": 1, "phone": 1}
+        ):
+            utilizadores[user["id"]] = user
+    
     for conversa in conversas:
-        # Get other participants info
-        participantes_info = []
-        for participante_id in conversa["participantes"]:
-            if participante_id != current_user["id"]:
-                user = await db.users.find_one(
-                    {"id": participante_id}, 
-                    {"_id": 0, "id": 1, "name": 1, "role": 1, "email": 1, "phone": 1}
-                )
-                if user:
-                    participantes_info.append(user)
-        
-        conversa["participantes_info"] = participantes_info
-        
-        # Count unread messages
-        unread_count = await db.mensagens.count_documents({
-            "conversa_id": conversa["id"],
-            "remetente_id": {"$ne": current_user["id"]},
-            "lida": False
-        })
-        conversa["mensagens_nao_lidas"] = unread_count
+        conversa["participantes_info"] = [
+            utilizadores[p] for p in conversa["participantes"]
+            if p != current_user["id"] and p in utilizadores
+        ]
+        conversa["mensagens_nao_lidas"] = conversa.pop(nao_lidas.CAMPO).get(current_user["id"], 0)
         
         # Convert datetime strings
         if isinstance(conversa.get("criada_em"), str):
@@ -56,29 +53,12 @@ async def get_conversas(current_user: Dict = Depends(get_current_user)):
 @router.get("/conversas/stats", response_model=ConversaStats)
 async def get_conversas_stats(current_user: Dict = Depends(get_current_user)):
     """Get conversation statistics"""
-    query = {"participantes": current_user["id"]}
-    
-    total = await db.conversas.count_documents(query)
-    
-    # Count conversations with unread messages
-    conversas = await db.conversas.find(query, {"_id": 0, "id": 1}).to_list(None)
-    com_nao_lidas = 0
-    total_nao_lidas = 0
-    
-    for conversa in conversas:
-        unread_count = await db.mensagens.count_documents({
-            "conversa_id": conversa["id"],
-            "remetente_id": {"$ne": current_user["id"]},
-            "lida": False
-        })
-        if unread_count > 0:
-            com_nao_lidas += 1
-            total_nao_lidas += unread_count
+    resumo = await nao_lidas.resumo_conversas(db, current_user["id"])
     
     return ConversaStats(
-        total=total,
-        com_nao_lidas=com_nao_lidas,
-        total_nao_lidas=total_nao_lidas
+        total=resumo["total"],
+        com_nao_lidas=resumo["com_nao_lidas"],
+        total_nao_lidas=resumo["total_nao_lidas"]
     )
 
 
@@ -130,6 +110,7 @@ async def create_conversa(
     conversa_dict["criada_em"] = conversa_dict["criada_em"].isoformat()
     if conversa_dict.get("ultima_mensagem_em"):
         conversa_dict["ultima_mensagem_em"] = conversa_dict["ultima_mensagem_em"].isoformat()
+    conversa_dict[nao_lidas.CAMPO] = {p: 0 for p in conversa_dict["participantes"]}
     
     await db.conversas.insert_one(conversa_dict)
     
@@ -139,10 +120,13 @@ async def create_conversa(
 @router.get("/conversas/{conversa_id}/mensagens", response_model=List[Mensagem])
 async def get_mensagens(
     conversa_id: str,
-    limit: int = 100,
+    paginacao: Paginacao = Depends(),
     current_user: Dict = Depends(get_current_user)
 ):
-    """Get messages from a conversation"""
+    """
+    Get messages from a conversation. With `limit`/`cursor` returns pages
+    from the newest message backwards (utils/paginacao.py)
+    """
     # Check if user is participant
     conversa = await db.conversas.find_one({"id": conversa_id})
     if not conversa:
@@ -152,10 +136,16 @@ async def get_mensagens(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get messages
-    mensagens = await db.mensagens.find(
-        {"conversa_id": conversa_id},
-        {"_id": 0}
-    ).sort("criada_em", 1).limit(limit).to_list(limit)
+    pagina = None
+    if paginacao.ativa:
+        pagina = await paginar(db.mensagens, {"conversa_id": conversa_id}, paginacao, ("criada_em", -1))
+        mensagens = pagina["items"]
+    else:
+        # Conversa completa: cortar às 100 escondia as mensagens mais recentes
+        mensagens = await db.mensagens.find(
+            {"conversa_id": conversa_id},
+            {"_id": 0}
+        ).sort("criada_em", 1).to_list(None)
     
     # Convert datetime strings
     for msg in mensagens:
@@ -165,7 +155,7 @@ async def get_mensagens(
             msg["lida_em"] = datetime.fromisoformat(msg["lida_em"])
     
     # Mark messages as read
-    await db.mensagens.update_many(
+    lidas = await db.mensagens.update_many(
         {
             "conversa_id": conversa_id,
             "remetente_id": {"$ne": current_user["id"]},
@@ -173,7 +163,19 @@ async def get_mensagens(
         },
         {"$set": {"lida": True, "lida_em": datetime.now(timezone.utc).isoformat()}}
     )
+    if await nao_lidas.zerar(db, conversa, current_user["id"]):
+        await nao_lidas.publicar_conversas(db, [current_user["id"]])
+    if lidas.modified_count:
+        outros = [p for p in conversa["participantes"] if p != current_user["id"]]
+        await tempo_real.publicar(db, outros, nao_lidas.MENSAGENS_LIDAS, {
+            "conversa_id": conversa_id,
+            "leitor_id": current_user["id"],
+        })
     
+    if pagina is not None:
+        if not paginacao.campos:
+            pagina["items"] = [Mensagem(**m) for m in mensagens]
+        return paginacao.resposta(pagina)
     return [Mensagem(**m) for m in mensagens]
 
 
@@ -203,9 +205,10 @@ async def send_mensagem(
     mensagem_dict = mensagem.model_dump()
     mensagem_dict["criada_em"] = mensagem_dict["criada_em"].isoformat()
     
-    await db.mensagens.insert_one(mensagem_dict)
+    destinatarios = await nao_lidas.registar_mensagem(db, conversa, mensagem_dict)
+    mensagem_dict.pop("_id", None)
     
-    # Update conversation
+    # Update conversation and push the message/counters to connected clients
     await db.conversas.update_one(
         {"id": mensagem_data.conversa_id},
         {
@@ -215,6 +218,11 @@ async def send_mensagem(
             }
         }
     )
+    await tempo_real.publicar(db, conversa["participantes"], nao_lidas.MENSAGEM_NOVA, {
+        "conversa_id": mensagem_data.conversa_id,
+        "mensagem": mensagem_dict,
+    })
+    await nao_lidas.publicar_conversas(db, destinatarios)
     
     # Create notification for other participants
     from utils.notificacoes import criar_notificacao
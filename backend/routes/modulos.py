@@ -10,6 +10,7 @@ import logging
 from models.user import UserRole
 from utils.auth import get_current_user
 from utils.database import get_database
+from utils import user_cache
 
 router = APIRouter()
 db = get_database()
@@ -78,6 +79,7 @@ async def atribuir_modulos_usuario(
             }
         }
     )
+    user_cache.invalidar_utilizador(user_id)
     
     logger.info(f"Modules assigned to user {user_id}: {data.modulos}")
     return {"message": "Módulos atribuídos com sucesso", "modulos": data.modulos}
@@ -111,6 +113,7 @@ async def add_modulos_usuario(
             }
         }
     )
+    user_cache.invalidar_utilizador(user_id)
     
     return {"message": "Módulos adicionados", "modulos": list(new_modulos)}
 
@@ -156,6 +159,7 @@ async def remove_modulo_usuario(
             }
         }
     )
+    user_cache.invalidar_utilizador(user_id)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Utilizador ou módulo não encontrado")
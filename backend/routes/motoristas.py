@@ -13,7 +13,10 @@ from models.motorista import Motorista, MotoristaCreate, MotoristaCreateSimple
 from models.user import UserRole
 from utils.auth import hash_password, get_current_user
 from utils.database import get_database
+from utils import cache_config, user_cache
 from services.subscricao_service import atualizar_contagem_subscricao
+from services import dashboard_stats, executor_service, ledger_semanal, uploads_processamento, vencimentos
+from services.tarefas_pesadas import processar_foto_perfil
 
 router = APIRouter()
 db = get_database()
@@ -88,6 +91,8 @@ async def create_motorista_for_parceiro(
     motorista_dict["created_at"] = datetime.now(timezone.utc).isoformat()
     
     await db.motoristas.insert_one(motorista_dict)
+    await dashboard_stats.registar_motorista(db, motorista_dict)
+    await vencimentos.sincronizar_motorista(db, motorista_dict["id"])
     
     # Atualizar subscrição automaticamente
     await atualizar_contagem_subscricao(parceiro_id)
@@ -324,6 +329,8 @@ async def register_motorista(
     motorista_dict["created_at"] = datetime.now(timezone.utc).isoformat()
     
     await db.motoristas.insert_one(motorista_dict)
+    await dashboard_stats.registar_motorista(db, motorista_dict)
+    await vencimentos.sincronizar_motorista(db, motorista_dict["id"])
     
     if isinstance(motorista_dict["created_at"], str):
         motorista_dict["created_at"] = datetime.fromisoformat(motorista_dict["created_at"])
@@ -529,6 +536,7 @@ async def approve_motorista(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         await db.planos_sistema.insert_one(plano_base)
+        await cache_config.invalidar(db, cache_config.PLANOS)
         logger.info(f"Created default free plan for motorista: {plano_base['id']}")
     
     # Calculate expiry date (30 days from now)
@@ -554,6 +562,7 @@ async def approve_motorista(
             }}
         )
         logger.info(f"Motorista update result: matched={result.matched_count}, modified={result.modified_count}")
+        await dashboard_stats.atualizar_motorista(db, motorista_exists, {**motorista_exists, "approved": True})
     else:
         # Create motorista profile if it doesn't exist
         user = await db.users.find_one({"id": motorista_id}, {"_id": 0})
@@ -592,6 +601,7 @@ async def approve_motorista(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         await db.motoristas.insert_one(motorista_profile)
+        await dashboard_stats.registar_motorista(db, motorista_profile)
         logger.info(f"Created motorista profile for {motorista_id} with plan {plano_base['id']}")
     
     # Always update user approval status
@@ -599,6 +609,7 @@ async def approve_motorista(
         {"id": motorista_id},
         {"$set": {"approved": True}}
     )
+    user_cache.invalidar_utilizador(motorista_id)
     
     # Verify the update
     updated_motorista = await db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
@@ -712,6 +723,8 @@ async def update_motorista(
         {"id": motorista_id},
         {"$set": update_data}
     )
+    await dashboard_stats.atualizar_motorista(db, motorista, {**motorista, **update_data})
+    await vencimentos.sincronizar_motorista(db, motorista_id)
     
     # Update user table if name or email changed
     user_update = {}
@@ -724,6 +737,7 @@ async def update_motorista(
     
     if user_update:
         await db.users.update_one({"id": motorista_id}, {"$set": user_update})
+        user_cache.invalidar_utilizador(motorista_id)
     
     return {"message": "Motorista updated successfully"}
 
@@ -865,6 +879,7 @@ async def delete_motorista(
         {"id": motorista_id},
         {"$set": {"deleted": True, "deleted_at": datetime.now(timezone.utc).isoformat()}}
     )
+    user_cache.invalidar_utilizador(motorista_id)
     
     # Atualizar subscrição do parceiro
     if parceiro_id:
@@ -898,16 +913,23 @@ async def delete_motorista_permanente(
     
     # Eliminar despesas extras
     await db.despesas_extras.delete_many({"motorista_id": motorista_id})
+    await ledger_semanal.invalidar(db, None, [motorista_id])
     
     # Eliminar da coleção motoristas
     await db.motoristas.delete_one({"id": motorista_id})
+    await dashboard_stats.registar_motorista(db, motorista, -1)
+    await vencimentos.sincronizar_motorista(db, motorista_id)
     
     # Eliminar da coleção users
     await db.users.delete_one({"id": motorista_id})
+    user_cache.invalidar_utilizador(motorista_id)
     
     # Também eliminar por email (caso haja duplicados)
     if email:
+        duplicados = await db.users.find({"email": email, "role": "motorista"}, {"_id": 0, "id": 1}).to_list(None)
         await db.users.delete_many({"email": email, "role": "motorista"})
+        for user in duplicados:
+            user_cache.invalidar_utilizador(user.get("id"))
     
     # Atualizar subscrição do parceiro
     if parceiro_id:
@@ -978,6 +1000,7 @@ async def bloquear_motorista(
         {"id": motorista_id},
         {"$set": {"bloqueado": bloqueado}}
     )
+    user_cache.invalidar_utilizador(motorista_id)
     
     # Registar no histórico de atividade
     entrada_historico = {
@@ -1045,6 +1068,7 @@ async def atribuir_parceiro_motorista(
         {"id": motorista_id},
         {"$set": update_data}
     )
+    await dashboard_stats.atualizar_motorista(db, motorista, {**motorista, **update_data})
     
     # Verificar se o utilizador existe
     user_exists = await db.users.find_one({"id": motorista_id})
@@ -1787,6 +1811,7 @@ async def add_despesa_extra(
     }
     
     await db.despesas_extras.insert_one(despesa)
+    await ledger_semanal.invalidar_registos(db, [despesa])
     
     tipo_texto = "Débito" if tipo == "debito" else "Crédito"
     return {
@@ -1826,6 +1851,7 @@ async def update_despesa_extra(
             {"id": despesa_id},
             {"$set": update_data}
         )
+        await ledger_semanal.invalidar_registos(db, [despesa])
     
     return {"message": "Despesa atualizada com sucesso"}
 
@@ -1840,11 +1866,16 @@ async def delete_despesa_extra(
     if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    result = await db.despesas_extras.delete_one({"id": despesa_id, "motorista_id": motorista_id})
+    despesa = await db.despesas_extras.find_one_and_delete(
+        {"id": despesa_id, "motorista_id": motorista_id},
+        projection={"_id": 0}
+    )
     
-    if result.deleted_count == 0:
+    if not despesa:
         raise HTTPException(status_code=404, detail="Despesa não encontrada")
     
+    await ledger_semanal.invalidar_registos(db, [despesa])
+    
     return {"message": "Despesa eliminada com sucesso"}
 
 
@@ -1859,10 +1890,6 @@ async def upload_documento_motorista(
     current_user: Dict = Depends(get_current_user)
 ):
     """Upload de documento do motorista com conversão para PDF"""
-    import shutil
-    from PIL import Image
-    from io import BytesIO
-    
     user_role = current_user["role"]
     allowed_roles = [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO, UserRole.MOTORISTA, "admin", "gestao", "parceiro", "motorista"]
     if user_role not in allowed_roles:
@@ -1887,53 +1914,19 @@ async def upload_documento_motorista(
     docs_dir = MOTORISTAS_UPLOAD_DIR / motorista_id / "documentos"
     docs_dir.mkdir(parents=True, exist_ok=True)
     
-    # Ler conteúdo do ficheiro
-    file_content = await file.read()
     file_extension = Path(file.filename).suffix.lower()
     
     # Converter para PDF se solicitado e se for imagem
     should_convert = converter_pdf.lower() == "true"
     is_image = file_extension in ['.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif']
     
-    if should_convert and is_image:
-        try:
-            # Abrir imagem
-            image = Image.open(BytesIO(file_content))
-            
-            # Converter para RGB se necessário (para PNG com transparência)
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            elif image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Gerar nome do ficheiro PDF
-            filename = f"{tipo_documento}_{uuid.uuid4()}.pdf"
-            file_path = docs_dir / filename
-            
-            # Guardar como PDF
-            image.save(str(file_path), 'PDF', resolution=100.0)
-            
-            logger.info(f"Imagem convertida para PDF: {file_path}")
-            
-        except Exception as e:
-            logger.error(f"Erro ao converter para PDF: {e}")
-            # Fallback: guardar ficheiro original
-            filename = f"{tipo_documento}_{uuid.uuid4()}{file_extension}"
-            file_path = docs_dir / filename
-            with open(file_path, "wb") as buffer:
-                buffer.write(file_content)
-    else:
-        # Guardar ficheiro como está
-        filename = f"{tipo_documento}_{uuid.uuid4()}{file_extension}"
-        file_path = docs_dir / filename
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
+    # Guardar ficheiro original em disco (aos blocos)
+    upload_id = str(uuid.uuid4())
+    original_path = docs_dir / f"{tipo_documento}_{upload_id}{file_extension}"
+    await uploads_processamento.guardar_stream(file, original_path)
     
-    relative_path = str(file_path.relative_to(ROOT_DIR))
+    # A conversão corre na fila de uploads; até o PDF existir o documento aponta para o original
+    relative_path = str(original_path.relative_to(ROOT_DIR))
     
     # Atualizar motorista com o caminho do documento
     # Usar $set com dot notation para evitar conflitos
@@ -1946,13 +1939,33 @@ async def upload_documento_motorista(
         }}
     )
     
+    processamento = None
+    if should_convert and is_image:
+        pdf_path = docs_dir / f"{tipo_documento}_{upload_id}.pdf"
+        processamento = await uploads_processamento.enfileirar(
+            db,
+            upload_id,
+            str(original_path),
+            pdf=str(pdf_path),
+            referencia={
+                "colecao": "motoristas",
+                "filtro": {"id": motorista_id, f"documentos.{tipo_documento}": relative_path},
+                "campo": f"documentos.{tipo_documento}",
+                "valor_erro": relative_path,
+                "valor_ok": str(pdf_path.relative_to(ROOT_DIR))
+            },
+            remover_origem=True,
+            criado_por=current_user["id"]
+        )
+    
     logger.info(f"Documento {tipo_documento} carregado para motorista {motorista_id}: {relative_path}")
     
     return {
         "message": "Documento carregado com sucesso",
         "tipo_documento": tipo_documento,
         "url": relative_path,
-        "convertido_pdf": should_convert and is_image
+        "convertido_pdf": should_convert and is_image,
+        "processamento": processamento
     }
 
 
@@ -2030,9 +2043,6 @@ async def upload_foto_motorista(
     current_user: Dict = Depends(get_current_user)
 ):
     """Upload da foto de perfil do motorista"""
-    from PIL import Image
-    from io import BytesIO
-    
     # Verificar permissões
     if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
         # Motorista só pode atualizar a própria foto
@@ -2064,45 +2074,17 @@ async def upload_foto_motorista(
     file_content = await file.read()
     
     try:
-        # Abrir imagem com Pillow
-        image = Image.open(BytesIO(file_content))
-        
-        # Converter para RGB se necessário
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            if image.mode in ('RGBA', 'LA'):
-                background.paste(image, mask=image.split()[-1])
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Redimensionar para tamanho máximo (mantendo proporção)
-        max_size = (500, 500)
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Criar imagem quadrada (crop centralizado)
-        width, height = image.size
-        min_dim = min(width, height)
-        left = (width - min_dim) // 2
-        top = (height - min_dim) // 2
-        right = left + min_dim
-        bottom = top + min_dim
-        image = image.crop((left, top, right, bottom))
-        
-        # Redimensionar para tamanho final
-        image = image.resize((300, 300), Image.Resampling.LANCZOS)
-        
         # Gerar nome único para o ficheiro
         filename = f"foto_{uuid.uuid4()}.jpg"
         file_path = fotos_dir / filename
         
-        # Guardar imagem otimizada
-        image.save(str(file_path), 'JPEG', quality=85, optimize=True)
+        # Converter, recortar e redimensionar fora do event loop
+        await executor_service.executar_cpu(processar_foto_perfil, file_content, str(file_path))
         
         logger.info(f"Foto de perfil processada e guardada: {file_path}")
         
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Erro ao processar imagem: {e}")
         raise HTTPException(status_code=400, detail="Erro ao processar a imagem")
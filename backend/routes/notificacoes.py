@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 
 from models.notificacao import Notificacao, NotificacaoCreate, NotificacaoStats, NotificacaoUpdate
 from models.user import UserRole
+from services import nao_lidas
 from utils.auth import get_current_user
 from utils.database import get_database
 
@@ -83,6 +84,8 @@ async def marcar_notificacao_lida(
         {"id": notificacao_id},
         {"$set": {"lida": True, "lida_em": datetime.now(timezone.utc).isoformat()}}
     )
+    if not notif.get("lida"):
+        await nao_lidas.publicar_notificacoes(db, current_user["id"])
     
     return {"message": "Notification marked as read"}
 
@@ -94,6 +97,8 @@ async def marcar_todas_lidas(current_user: Dict = Depends(get_current_user)):
         {"user_id": current_user["id"], "lida": False},
         {"$set": {"lida": True, "lida_em": datetime.now(timezone.utc).isoformat()}}
     )
+    if result.modified_count:
+        await nao_lidas.publicar_notificacoes(db, current_user["id"])
     
     return {"message": f"Marked {result.modified_count} notifications as read"}
 
@@ -112,6 +117,8 @@ async def delete_notificacao(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.notificacoes.delete_one({"id": notificacao_id})
+    if not notif.get("lida"):
+        await nao_lidas.publicar_notificacoes(db, current_user["id"])
     
     return {"message": "Notification deleted"}
 
@@ -171,6 +178,8 @@ async def update_notificacao(
             {"id": notificacao_id},
             {"$set": update_fields}
         )
+        if "lida" in update_fields and update_fields["lida"] != notif.get("lida"):
+            await nao_lidas.publicar_notificacoes(db, current_user["id"])
     
     return {"message": "Notification updated successfully"}
 
@@ -227,5 +236,6 @@ async def create_notificacao(
     notif_dict["criada_em"] = notif_dict["criada_em"].isoformat()
     
     await db.notificacoes.insert_one(notif_dict)
+    await nao_lidas.notificacao_criada(db, notif_dict)
     
     return notif
@@ -7,10 +7,10 @@ from pathlib import Path
 from pydantic import BaseModel
 import uuid
 import logging
-import shutil
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from services import uploads_processamento
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -194,8 +194,7 @@ async def upload_documento_pagamento(
     filename = f"pagamento_{pagamento_id}_{uuid.uuid4()}{file_extension}"
     file_path = PAGAMENTOS_UPLOAD_DIR / filename
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await uploads_processamento.guardar_stream(file, file_path)
     
     relative_path = str(file_path.relative_to(ROOT_DIR))
     
@@ -236,8 +235,7 @@ async def upload_comprovativo_pagamento(
     filename = f"comprovativo_{pagamento_id}_{uuid.uuid4()}{file_extension}"
     file_path = comprovativos_dir / filename
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await uploads_processamento.guardar_stream(file, file_path)
     
     relative_path = str(file_path.relative_to(ROOT_DIR))
     
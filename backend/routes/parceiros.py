@@ -9,10 +9,11 @@ from pydantic import BaseModel, EmailStr
 import uuid
 import logging
 import re
-import shutil
 
 from utils.database import get_database
+from utils import user_cache
 from utils.auth import get_current_user, hash_password
+from services import dashboard_stats, uploads_processamento
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -453,6 +454,7 @@ async def atribuir_gestores_a_parceiro(
                     "updated_at": datetime.now(timezone.utc).isoformat()
                 }}
             )
+            user_cache.invalidar_utilizador(gestor_id)
     
     # Adicionar parceiro à lista de cada gestor
     for gestor_id in gestores_ids:
@@ -468,6 +470,7 @@ async def atribuir_gestores_a_parceiro(
                     "updated_at": datetime.now(timezone.utc).isoformat()
                 }}
             )
+            user_cache.invalidar_utilizador(gestor_id)
     
     # Obter nomes dos gestores para retorno
     gestores_info = []
@@ -702,12 +705,14 @@ async def delete_parceiro(
     email = parceiro.get("email")
     
     # Unassign all vehicles
+    await dashboard_stats.atualizar_em_bloco(db, "vehicles", {"parceiro_id": parceiro_id}, {"parceiro_id": None})
     vehicles_result = await db.vehicles.update_many(
         {"parceiro_id": parceiro_id},
         {"$set": {"parceiro_id": None, "parceiro_nome": None}}
     )
     
     # Unassign all motoristas
+    await dashboard_stats.atualizar_em_bloco(db, "motoristas", {"parceiro_atribuido": parceiro_id}, {"parceiro_atribuido": None})
     motoristas_result = await db.motoristas.update_many(
         {"parceiro_atribuido": parceiro_id},
         {"$set": {"parceiro_atribuido": None}}
@@ -716,10 +721,14 @@ async def delete_parceiro(
     # Delete user account if exists
     if parceiro.get("user_id"):
         await db.users.delete_one({"id": parceiro["user_id"]})
+        user_cache.invalidar_utilizador(parceiro["user_id"])
     
     # Também eliminar user por email (garante limpeza completa)
     if email:
+        duplicados = await db.users.find({"email": email}, {"_id": 0, "id": 1}).to_list(None)
         await db.users.delete_many({"email": email})
+        for user in duplicados:
+            user_cache.invalidar_utilizador(user.get("id"))
     
     # Delete parceiro
     delete_result = await db.parceiros.delete_one({"id": parceiro_id})
@@ -953,8 +962,7 @@ async def upload_certidao_permanente(
     filename = f"certidao_{parceiro_id}_{uuid.uuid4()}{file_extension}"
     file_path = docs_dir / filename
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await uploads_processamento.guardar_stream(file, file_path)
     
     relative_path = str(file_path.relative_to(ROOT_DIR))
     
@@ -1204,10 +1212,16 @@ async def enviar_email_motoristas(
     if not email_service:
         raise HTTPException(status_code=400, detail="Configuração SMTP não encontrada. Configure o email primeiro.")
     
+    motoristas = {
+        m["id"]: m for m in await db.motoristas.find(
+            {"id": {"$in": request.motorista_ids}}, {"_id": 0, "id": 1, "email": 1, "name": 1}
+        ).to_list(None)
+    }
+    
     resultados = []
+    destinatarios = []
     for motorista_id in request.motorista_ids:
-        # Obter dados do motorista
-        motorista = await db.motoristas.find_one({"id": motorista_id}, {"_id": 0, "email": 1, "name": 1})
+        motorista = motoristas.get(motorista_id)
         if not motorista or not motorista.get("email"):
             resultados.append({
                 "motorista_id": motorista_id,
@@ -1215,17 +1229,25 @@ async def enviar_email_motoristas(
                 "error": "Motorista não encontrado ou sem email"
             })
             continue
-        
-        # Enviar email
-        result = email_service.send_email(
-            to_email=motorista["email"],
-            subject=request.assunto,
-            body_html=request.mensagem_html,
-            body_text=request.mensagem_texto
-        )
-        
+        destinatarios.append(motorista)
+    
+    # Enviar todos os emails pela mesma sessão SMTP
+    envios = await email_service.enviar_lote([
+        {
+            "para": motorista["email"],
+            "assunto": request.assunto,
+            "html": request.mensagem_html,
+            "texto": request.mensagem_texto,
+        }
+        for motorista in destinatarios
+    ])
+    
+    from datetime import datetime, timezone
+    logs = []
+    for motorista, result in zip(destinatarios, envios):
+        result.pop("temporario", None)
         resultados.append({
-            "motorista_id": motorista_id,
+            "motorista_id": motorista["id"],
             "motorista_name": motorista.get("name"),
             "email": motorista["email"],
             **result
@@ -1233,16 +1255,17 @@ async def enviar_email_motoristas(
         
         # Log do email
         if result["success"]:
-            from datetime import datetime, timezone
-            await db.email_log.insert_one({
+            logs.append({
                 "parceiro_id": parceiro_id,
-                "motorista_id": motorista_id,
+                "motorista_id": motorista["id"],
                 "to_email": motorista["email"],
                 "subject": request.assunto,
                 "status": "sent",
                 "sent_at": datetime.now(timezone.utc).isoformat(),
                 "sent_by": current_user["id"]
             })
+    if logs:
+        await db.email_log.insert_many(logs)
     
     sucessos = sum(1 for r in resultados if r.get("success"))
     falhas = len(resultados) - sucessos
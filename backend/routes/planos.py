@@ -1,6 +1,6 @@
 """Planos routes for FleeTrack application - Refactored from server.py"""
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel
@@ -9,6 +9,7 @@ import logging
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from utils import cache_config, user_cache
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -69,32 +70,36 @@ class PlanoAssinatura(BaseModel):
 # ==================== PUBLIC ROUTES ====================
 
 @router.get("/planos/public")
-async def get_planos_public():
-    """Get all active plans (public endpoint)"""
-    planos = await db.planos_sistema.find(
-        {"ativo": True},
-        {"_id": 0}
-    ).to_list(100)
+async def get_planos_public(request: Request):
+    """Get all active plans (public endpoint, cached with ETag)"""
+    async def carregar():
+        return await db.planos_sistema.find(
+            {"ativo": True},
+            {"_id": 0}
+        ).to_list(100)
     
-    return planos
+    return await cache_config.responder(request, db, cache_config.PLANOS, "public", carregar)
 
 
 @router.get("/planos")
-async def get_planos(current_user: Dict = Depends(get_current_user)):
-    """Get all plans"""
-    planos = await db.planos_sistema.find({}, {"_id": 0}).to_list(100)
-    return planos
+async def get_planos(request: Request, current_user: Dict = Depends(get_current_user)):
+    """Get all plans (cached with ETag)"""
+    async def carregar():
+        return await db.planos_sistema.find({}, {"_id": 0}).to_list(100)
+    
+    return await cache_config.responder(request, db, cache_config.PLANOS, "todos", carregar)
 
 
 @router.get("/planos-motorista")
-async def get_planos_motorista(current_user: Dict = Depends(get_current_user)):
-    """Get plans available for motoristas"""
-    planos = await db.planos_sistema.find(
-        {"tipo_usuario": "motorista", "ativo": True},
-        {"_id": 0}
-    ).to_list(100)
+async def get_planos_motorista(request: Request, current_user: Dict = Depends(get_current_user)):
+    """Get plans available for motoristas (cached with ETag)"""
+    async def carregar():
+        return await db.planos_sistema.find(
+            {"tipo_usuario": "motorista", "ativo": True},
+            {"_id": 0}
+        ).to_list(100)
     
-    return planos
+    return await cache_config.responder(request, db, cache_config.PLANOS, "motorista", carregar)
 
 
 # ==================== ADMIN ROUTES ====================
@@ -118,6 +123,8 @@ async def create_plano(
     
     await db.planos.insert_one(plano_dict)
     
+    user_cache.invalidar_entitlements()
+    await cache_config.invalidar(db, cache_config.PLANOS)
     return plano_dict
 
 
@@ -147,6 +154,8 @@ async def update_plano(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Plano not found")
     
+    user_cache.invalidar_entitlements()
+    await cache_config.invalidar(db, cache_config.PLANOS)
     return {"message": "Plano updated successfully"}
 
 
@@ -173,6 +182,8 @@ async def delete_plano(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Plano not found")
     
+    user_cache.invalidar_entitlements()
+    await cache_config.invalidar(db, cache_config.PLANOS)
     return {"message": "Plano deleted successfully"}
 
 
@@ -212,6 +223,8 @@ async def admin_create_plano(
     
     await db.planos_sistema.insert_one(plano)
     
+    user_cache.invalidar_entitlements()
+    await cache_config.invalidar(db, cache_config.PLANOS)
     return plano
 
 
@@ -279,6 +292,8 @@ async def admin_update_plano(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Plano not found")
     
+    user_cache.invalidar_entitlements()
+    await cache_config.invalidar(db, cache_config.PLANOS)
     return {"message": "Plano updated successfully"}
 
 
@@ -320,6 +335,7 @@ async def add_promocao(
             {"id": plano_id},
             {"$set": {"promocao": promocao}}
         )
+    await cache_config.invalidar(db, cache_config.PLANOS)
     
     return {"message": "Promocao added successfully", "promocao": promocao}
 
@@ -350,6 +366,7 @@ async def remove_promocao(
             {"id": plano_id},
             {"$set": {"promocao": promocao_desativada}}
         )
+    await cache_config.invalidar(db, cache_config.PLANOS)
     
     return {"message": "Promocao removed successfully"}
 
@@ -434,6 +451,8 @@ async def seed_planos(current_user: Dict = Depends(get_current_user)):
     for plano in default_planos:
         await db.planos_sistema.insert_one(plano)
     
+    user_cache.invalidar_entitlements()
+    await cache_config.invalidar(db, cache_config.PLANOS)
     return {
         "message": f"Seeded {len(default_planos)} planos successfully",
         "planos_criados": len(default_planos)
@@ -637,8 +656,12 @@ async def comprar_plano_motorista(
 # ==================== MODULOS ====================
 
 @router.get("/modulos")
-async def get_modulos(current_user: Dict = Depends(get_current_user)):
-    """Get all available modules"""
+async def get_modulos(request: Request, current_user: Dict = Depends(get_current_user)):
+    """Get all available modules (cached with ETag)"""
+    return await cache_config.responder(request, db, cache_config.MODULOS, "todos", _carregar_modulos)
+
+
+async def _carregar_modulos():
     modulos = await db.modulos.find({}, {"_id": 0}).to_list(100)
     
     if not modulos:
@@ -11,6 +11,7 @@ import logging
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from services import ledger_semanal, uploads_processamento
 
 router = APIRouter(prefix="/ponto", tags=["Relógio de Ponto"])
 logger = logging.getLogger(__name__)
@@ -519,95 +520,27 @@ async def get_ganhos_semana(
         # Tentar buscar user e verificar se é motorista
         motorista = await db.users.find_one({"id": motorista_id}, {"_id": 0})
     
-    # Ganhos Uber
-    ganhos_uber = 0.0
-    uber_records = await db.ganhos_uber.find({
-        "$or": [
-            {"motorista_id": motorista_id},
-            {"email_motorista": current_user.get("email")}
-        ],
-        "$and": [{"$or": [
-            {"semana": semana, "ano": ano},
-            {"data": {"$gte": data_inicio, "$lte": data_fim}}
-        ]}]
-    }, {"_id": 0}).to_list(100)
-    
-    for r in uber_records:
-        ganhos_uber += float(r.get("rendimentos") or r.get("pago_total") or 0)
-    
-    # Ganhos Bolt
-    ganhos_bolt = 0.0
-    bolt_records = await db.ganhos_bolt.find({
-        "$or": [
-            {"motorista_id": motorista_id},
-            {"email_motorista": current_user.get("email")}
-        ],
-        "$and": [{"$or": [
-            {"semana": semana, "ano": ano},
-            {"periodo_semana": semana, "periodo_ano": ano}
-        ]}]
-    }, {"_id": 0}).to_list(100)
-    
-    for r in bolt_records:
-        ganhos_bolt += float(r.get("ganhos_liquidos") or r.get("ganhos") or 0)
-    
     # Buscar veículo atribuído
     veiculo_id = motorista.get("veiculo_atribuido") if motorista else None
     veiculo = None
     if veiculo_id:
         veiculo = await db.vehicles.find_one({"id": veiculo_id}, {"_id": 0})
     
-    # Via Verde
-    via_verde_total = 0.0
-    if veiculo and veiculo.get("matricula"):
-        vv_records = await db.portagens_viaverde.find({
-            "matricula": veiculo.get("matricula"),
-            "$or": [
-                {"semana": semana, "ano": ano},
-                {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}}
-            ]
-        }, {"_id": 0}).to_list(500)
-        
-        for r in vv_records:
-            market_desc = str(r.get("market_description", "")).strip().lower()
-            if not market_desc or market_desc in ["portagens", "parques"]:
-                via_verde_total += float(r.get("valor") or r.get("value") or 0)
-    
-    # Combustível
-    combustivel_total = 0.0
-    comb_records = await db.abastecimentos_combustivel.find({
-        "$or": [
-            {"motorista_id": motorista_id},
-            {"vehicle_id": veiculo_id} if veiculo_id else {"vehicle_id": None}
-        ],
-        "$and": [{"$or": [
-            {"data": {"$gte": data_inicio, "$lte": data_fim}},
-            {"semana": semana, "ano": ano}
-        ]}]
-    }, {"_id": 0}).to_list(100)
-    
-    for r in comb_records:
-        valor = float(r.get("valor_liquido") or r.get("valor") or 0)
-        iva = float(r.get("iva") or 0)
-        combustivel_total += valor + iva
-    
-    # Carregamento elétrico
-    eletrico_total = 0.0
-    elet_records = await db.despesas_combustivel.find({
-        "motorista_id": motorista_id,
-        "$or": [
-            {"semana": semana, "ano": ano},
-            {"data": {"$gte": data_inicio, "$lte": data_fim}}
-        ]
-    }, {"_id": 0}).to_list(100)
-    
-    for r in elet_records:
-        eletrico_total += float(r.get("valor_total") or 0)
+    # Ganhos e despesas da semana (ledger semanal + ajuste manual, como no relatório semanal)
+    valores = {}
+    if motorista and motorista.get("id"):
+        ledger = await ledger_semanal.obter_motorista(db, motorista, semana, ano)
+        ajuste_manual = await db.ajustes_semanais.find_one(
+            {"motorista_id": motorista_id, "semana": semana, "ano": ano}, {"_id": 0}
+        )
+        valores = ledger_semanal.aplicar_ajuste(ledger, ajuste_manual)
     
-    # Valor aluguer
-    valor_aluguer = 0.0
-    if veiculo:
-        valor_aluguer = float(veiculo.get("valor_semanal") or 0)
+    ganhos_uber = valores.get("ganhos_uber", 0.0) + valores.get("uber_portagens", 0.0) + valores.get("uber_gratificacoes", 0.0)
+    ganhos_bolt = valores.get("ganhos_bolt", 0.0) + valores.get("ganhos_campanha_bolt", 0.0)
+    via_verde_total = valores.get("via_verde", 0.0)
+    combustivel_total = valores.get("combustivel", 0.0)
+    eletrico_total = valores.get("eletrico", 0.0)
+    valor_aluguer = valores.get("aluguer", 0.0)
     
     # Horas trabalhadas
     registos_ponto = await db.registos_ponto.find({
@@ -708,7 +641,6 @@ async def get_historico_semanas(
 # ============ RECIBOS SEMANAIS ============
 
 from fastapi import UploadFile, File, Form
-import shutil
 from pathlib import Path
 
 RECIBOS_UPLOAD_DIR = Path(__file__).parent.parent / "uploads" / "recibos_semanais"
@@ -759,8 +691,7 @@ async def upload_recibo_semanal(
     file_name = f"{motorista_id}_{ano}_{semana}_{recibo_id}{file_ext}"
     file_path = RECIBOS_UPLOAD_DIR / file_name
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await uploads_processamento.guardar_stream(file, file_path)
     
     now = datetime.now(timezone.utc)
     
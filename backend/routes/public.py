@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 import uuid
 import logging
 
+from services import nao_lidas
 from utils.database import get_database
 
 router = APIRouter()
@@ -150,7 +151,8 @@ async def public_contacto(contacto_data: Dict[str, Any]):
                     },
                     "criada_em": datetime.now(timezone.utc).isoformat(),
                     "ultima_mensagem_em": datetime.now(timezone.utc).isoformat(),
-                    "status": "ativo"
+                    "status": "ativo",
+                    "nao_lidas": {destinatario_id: 1}
                 }
                 await db.conversas.insert_one(conversa)
                 
@@ -213,6 +215,8 @@ _Este contacto foi recebido através da página pública de veículos._
                     }
                 }
                 await db.notificacoes.insert_one(notificacao)
+                await nao_lidas.publicar_conversas(db, [destinatario_id])
+                await nao_lidas.notificacao_criada(db, notificacao)
             
             logger.info(f"📧 INTERESSE EM VEÍCULO - Mensagem interna enviada para: {destinatarios}")
     
@@ -11,6 +11,9 @@ from io import BytesIO
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from utils.paginacao import Paginacao, paginar
+from services import envio_email, executor_service, fila_tarefas, ledger_semanal
+from services.relatorios_pdf import construir_pdf_motorista, construir_pdf_resumo_semanal
 from services.envio_relatorios import (
     enviar_relatorio_motorista,
     generate_whatsapp_link,
@@ -25,56 +28,6 @@ router = APIRouter(prefix="/relatorios", tags=["relatorios"])
 
 db = get_database()
 
-def calcular_aluguer_semanal(veiculo: dict, semana: int, ano: int) -> float:
-    """
-    Calcula o valor do aluguer semanal baseado no tipo de contrato e época.
-    
-    Args:
-        veiculo: Dicionário com dados do veículo
-        semana: Número da semana (1-53)
-        ano: Ano
-    
-    Returns:
-        Valor do aluguer semanal
-    """
-    if not veiculo:
-        return 0.0
-    
-    tipo_contrato = veiculo.get("tipo_contrato", {})
-    if not tipo_contrato:
-        # Fallback para campos no nível raiz do veículo
-        return float(veiculo.get("valor_aluguer_semanal") or veiculo.get("valor_semanal") or 0)
-    
-    # Verificar se é contrato de aluguer
-    tipo = tipo_contrato.get("tipo", "").lower()
-    if tipo == "comissao":
-        return 0.0  # Contrato de comissão não tem aluguer
-    
-    # Obter o mês correspondente à semana
-    from datetime import datetime, timedelta
-    # Calcular a data do início da semana
-    primeiro_dia_ano = datetime(ano, 1, 1)
-    dias_ate_segunda = (7 - primeiro_dia_ano.weekday()) % 7
-    primeira_segunda = primeiro_dia_ano + timedelta(days=dias_ate_segunda)
-    data_semana = primeira_segunda + timedelta(weeks=semana - 1)
-    mes_semana = data_semana.month
-    
-    # Verificar se tem época alta/baixa configurada
-    meses_epoca_alta = tipo_contrato.get("meses_epoca_alta", [])
-    valor_epoca_alta = float(tipo_contrato.get("valor_epoca_alta") or 0)
-    valor_epoca_baixa = float(tipo_contrato.get("valor_epoca_baixa") or 0)
-    valor_padrao = float(tipo_contrato.get("valor_aluguer") or tipo_contrato.get("valor_semanal") or 0)
-    
-    # Se tem configuração de épocas
-    if meses_epoca_alta and (valor_epoca_alta > 0 or valor_epoca_baixa > 0):
-        if mes_semana in meses_epoca_alta:
-            return valor_epoca_alta if valor_epoca_alta > 0 else valor_padrao
-        else:
-            return valor_epoca_baixa if valor_epoca_baixa > 0 else valor_padrao
-    
-    # Fallback para valor padrão
-    return valor_padrao
-
 # Upload directory
 ROOT_DIR = Path(__file__).parent.parent
 UPLOAD_DIR = ROOT_DIR / "uploads"
@@ -756,45 +709,14 @@ async def get_resumos_motoristas(
     return resumos
 
 
-@router.get("/parceiro/resumo-semanal")
-async def get_resumo_semanal_parceiro(
-    semana: Optional[int] = None,
-    ano: Optional[int] = None,
-    current_user: Dict = Depends(get_current_user)
-):
-    """
-    Vista consolidada do resumo semanal para parceiros.
-    Calcula dados em tempo real a partir das coleções de importação.
-    """
-    if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Default to current week if not specified
-    now = datetime.now()
-    if not semana:
-        semana = now.isocalendar()[1]
-    if not ano:
-        ano = now.year
-    
-    # Calculate date range for the week
-    # Week starts on Monday (ISO week)
-    first_day_of_year = datetime(ano, 1, 1)
-    if first_day_of_year.weekday() <= 3:  # Mon-Thu
-        first_monday = first_day_of_year - timedelta(days=first_day_of_year.weekday())
-    else:
-        first_monday = first_day_of_year + timedelta(days=(7 - first_day_of_year.weekday()))
-    
-    week_start = first_monday + timedelta(weeks=semana - 1)
-    week_end = week_start + timedelta(days=6)
-    
-    data_inicio = week_start.strftime("%Y-%m-%d")
-    data_fim = week_end.strftime("%Y-%m-%d")
-    
-    logger.info(f"📊 Resumo Semanal: Semana {semana}/{ano} ({data_inicio} a {data_fim})")
-    
-    # Get all motoristas for the parceiro (only active ones)
-    parceiro_id_query = current_user["id"] if current_user["role"] == UserRole.PARCEIRO else None
-    
+async def _motoristas_resumo_semana(
+    parceiro_id_query: Optional[str],
+    semana: int,
+    ano: int,
+    data_inicio: str,
+    data_fim: str,
+) -> List[Dict]:
+    """Motoristas do resumo semanal (ecrã e PDF): os do parceiro activos durante a semana"""
     if parceiro_id_query:
         # Query para parceiro específico
         motoristas_query = {
@@ -920,7 +842,47 @@ async def get_resumo_semanal_parceiro(
                 motoristas_filtrados.append(m)
                 logger.info(f"  {nome}: Incluído - inativo mas tem dados para semana {semana}/{ano}")
     
-    motoristas = motoristas_filtrados
+    return motoristas_filtrados
+
+
+@router.get("/parceiro/resumo-semanal")
+async def get_resumo_semanal_parceiro(
+    semana: Optional[int] = None,
+    ano: Optional[int] = None,
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Vista consolidada do resumo semanal para parceiros.
+    Calcula dados em tempo real a partir das coleções de importação.
+    """
+    if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    # Default to current week if not specified
+    now = datetime.now()
+    if not semana:
+        semana = now.isocalendar()[1]
+    if not ano:
+        ano = now.year
+    
+    # Calculate date range for the week
+    # Week starts on Monday (ISO week)
+    first_day_of_year = datetime(ano, 1, 1)
+    if first_day_of_year.weekday() <= 3:  # Mon-Thu
+        first_monday = first_day_of_year - timedelta(days=first_day_of_year.weekday())
+    else:
+        first_monday = first_day_of_year + timedelta(days=(7 - first_day_of_year.weekday()))
+    
+    week_start = first_monday + timedelta(weeks=semana - 1)
+    week_end = week_start + timedelta(days=6)
+    
+    data_inicio = week_start.strftime("%Y-%m-%d")
+    data_fim = week_end.strftime("%Y-%m-%d")
+    
+    logger.info(f"📊 Resumo Semanal: Semana {semana}/{ano} ({data_inicio} a {data_fim})")
+    
+    parceiro_id_query = current_user["id"] if current_user["role"] == UserRole.PARCEIRO else None
+    motoristas = await _motoristas_resumo_semana(parceiro_id_query, semana, ano, data_inicio, data_fim)
     logger.info(f"📊 Encontrados {len(motoristas)} motoristas activos para parceiro {parceiro_id_query}")
     
     # Set para rastrear matrículas já processadas (evitar duplicação Via Verde)
@@ -942,466 +904,72 @@ async def get_resumo_semanal_parceiro(
         "total_liquido": 0
     }
     
+    # Subtotais por fonte de cada motorista (ledger semanal; só recalcula os alterados)
+    ledgers = await ledger_semanal.obter(db, motoristas, semana, ano)
+    
+    # Ajustes manuais da semana numa única consulta
+    ajustes = {
+        a["motorista_id"]: a
+        for a in await db.ajustes_semanais.find(
+            {"motorista_id": {"$in": [m["id"] for m in motoristas]}, "semana": semana, "ano": ano},
+            {"_id": 0}
+        ).to_list(None)
+    }
+    
     for motorista in motoristas:
         motorista_id = motorista["id"]
         motorista_email = motorista.get("email", "")
-        uuid_uber = motorista.get("uuid_motorista_uber", "")
-        id_bolt = motorista.get("identificador_motorista_bolt", "")
         veiculo_id = motorista.get("veiculo_atribuido")
+        ledger = ledgers[motorista_id]
+        veiculo = ledger["veiculo"]
         
         # ============ CONFIGURAÇÃO FINANCEIRA DO MOTORISTA ============
         config_financeira = motorista.get("config_financeira", {})
         acumular_viaverde = config_financeira.get("acumular_viaverde", False)
         viaverde_acumulado = config_financeira.get("viaverde_acumulado", 0)
         
-        # Get vehicle info
-        veiculo = None
-        via_verde_id = None
-        obu = None
-        cartao_combustivel = None
-        cartao_eletrico = None
-        # Múltiplos cartões elétricos
-        cartoes_eletricos = []
-        aluguer_semanal = motorista.get("valor_aluguer_semanal") or 0
-        km_atribuidos = None
-        valor_km_extra = None
-        
-        if veiculo_id:
-            veiculo = await db.vehicles.find_one({"id": veiculo_id}, {"_id": 0})
-            if veiculo:
-                via_verde_id = veiculo.get("via_verde_id")
-                obu = veiculo.get("obu")
-                cartao_combustivel = veiculo.get("cartao_frota_id")
-                cartao_eletrico = veiculo.get("cartao_frota_eletric_id")
-                km_atribuidos = veiculo.get("km_atribuidos")
-                valor_km_extra = veiculo.get("valor_km_extra")
-                if aluguer_semanal == 0:
-                    # Calcular aluguer com base na época alta/baixa
-                    aluguer_semanal = calcular_aluguer_semanal(veiculo, semana, ano)
-                
-                # Recolher todos os cartões elétricos (6 fornecedores)
-                if veiculo.get("cartao_prio_eletric"):
-                    cartoes_eletricos.append({"fornecedor": "Prio Electric", "cartao": veiculo.get("cartao_prio_eletric")})
-                if veiculo.get("cartao_prio_online"):
-                    cartoes_eletricos.append({"fornecedor": "Prio Online", "cartao": veiculo.get("cartao_prio_online")})
-                if veiculo.get("cartao_mio"):
-                    cartoes_eletricos.append({"fornecedor": "Mio", "cartao": veiculo.get("cartao_mio")})
-                if veiculo.get("cartao_galp"):
-                    cartoes_eletricos.append({"fornecedor": "Galp", "cartao": veiculo.get("cartao_galp")})
-                if veiculo.get("cartao_atlante"):
-                    cartoes_eletricos.append({"fornecedor": "Atlante", "cartao": veiculo.get("cartao_atlante")})
-                if veiculo.get("cartao_eletrico_outro"):
-                    cartoes_eletricos.append({"fornecedor": veiculo.get("cartao_eletrico_outro_nome", "Outro"), "cartao": veiculo.get("cartao_eletrico_outro")})
-                # Legacy - cartao_frota_eletric_id (Prio)
-                if cartao_eletrico and not any(c["cartao"] == cartao_eletrico for c in cartoes_eletricos):
-                    cartoes_eletricos.append({"fornecedor": "Prio Electric (legacy)", "cartao": cartao_eletrico})
-        
-        # ============ GANHOS UBER ============
-        # Buscar por UUID ou email
-        ganhos_uber = 0.0
-        uber_query_conditions = [{"motorista_id": motorista_id}]
-        if uuid_uber:
-            uber_query_conditions.append({"uuid_motorista": uuid_uber})
-            uber_query_conditions.append({"uuid_motorista_uber": uuid_uber})
-        if motorista_email:
-            uber_query_conditions.append({"motorista_email": motorista_email})
-        
-        # Adicionar nome do motorista como critério adicional (útil para importações CSV)
-        if motorista.get("name"):
-            motorista_name = motorista.get("name", "").upper()
-            # Dividir nome em partes e tentar match parcial
-            name_parts = motorista_name.split()
-            for part in name_parts:
-                if len(part) > 2:  # Ignorar partes muito curtas
-                    uber_query_conditions.append({"nome_motorista": {"$regex": part, "$options": "i"}})
-        
-        # Query combinando identificação E período
-        uber_query = {
-            "$and": [
-                {"$or": uber_query_conditions},
-                {"$or": [
-                    {"$and": [{"semana": semana}, {"ano": ano}]},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}},
-                    {"periodo_inicio": {"$gte": data_inicio, "$lte": data_fim}}
-                ]}
-            ]
-        }
-        
-        uber_records = await db.ganhos_uber.find(uber_query, {"_id": 0}).to_list(100)
-        uber_portagens = 0.0  # uPort - Portagens que a Uber paga
-        uber_gratificacoes = 0.0  # uGrat - Gratificações/gorjetas que a Uber paga ao motorista
-        for r in uber_records:
-            # Extrair portagens Uber (uPort)
-            uber_portagens += float(r.get("portagens") or r.get("uber_portagens") or 0)
-            # Extrair gratificações Uber (uGrat) - gorjetas, bónus, promoções
-            uber_gratificacoes += float(r.get("gratificacao") or r.get("gratificacoes") or r.get("uber_gratificacoes") or r.get("gorjetas") or r.get("bonus") or 0)
-            
-            # Ganhos Uber = rendimentos líquidos SEM portagens e SEM gratificações
-            # Valor base que entra na comissão (portagens e gratificações tratadas separadamente)
-            valor_base = float(r.get("rendimentos") or r.get("pago_total") or r.get("rendimentos_total") or r.get("total_pago") or r.get("ganhos") or 0)
-            
-            # Se o campo 'rendimentos_sem_extras' existir, usar diretamente
-            if r.get("rendimentos_sem_extras"):
-                ganhos_uber += float(r.get("rendimentos_sem_extras"))
-            else:
-                # Subtrair portagens e gratificações do valor base para obter rendimentos líquidos
-                port = float(r.get("portagens") or r.get("uber_portagens") or 0)
-                grat = float(r.get("gratificacao") or r.get("gratificacoes") or r.get("uber_gratificacoes") or r.get("gorjetas") or r.get("bonus") or 0)
-                ganhos_uber += valor_base - port - grat
-        
-        logger.info(f"  {motorista.get('name')}: Uber query returned {len(uber_records)} records, total €{ganhos_uber:.2f}, uPort €{uber_portagens:.2f}, uGrat €{uber_gratificacoes:.2f}")
-        
-        # ============ GANHOS BOLT ============
-        ganhos_bolt = 0.0
-        ganhos_campanha_bolt = 0.0  # Ganhos de campanha/bónus (não disponível via API)
-        bolt_query_conditions = [{"motorista_id": motorista_id}]
-        if id_bolt:
-            bolt_query_conditions.append({"identificador_motorista_bolt": id_bolt})
-        if motorista_email:
-            bolt_query_conditions.append({"email_motorista": motorista_email})
-        
-        # Query para encontrar registos por semana/ano
-        # Suporta múltiplos formatos: semana/ano, periodo_semana/periodo_ano, periodo_inicio
-        bolt_query = {
-            "$and": [
-                {"$or": bolt_query_conditions},
-                {"$or": [
-                    {"semana": semana, "ano": ano},
-                    {"periodo_semana": semana, "periodo_ano": ano},
-                    {"periodo_inicio": {"$regex": f"^{data_inicio[:7]}"}},
-                    {"periodo_inicio": data_inicio}
-                ]}
-            ]
-        }
-        
-        # Buscar de ganhos_bolt
-        bolt_records = await db.ganhos_bolt.find(bolt_query, {"_id": 0}).to_list(100)
-        for r in bolt_records:
-            # Nova fórmula: ganhos = ganhos_brutos - comissões (inclui gorjetas, bónus, campanhas, portagens)
-            ganhos_brutos = float(r.get("ganhos_brutos_total") or r.get("total_earnings") or 0)
-            comissao = float(r.get("comissoes") or r.get("comissao_bolt") or r.get("commission") or 0)
-            
-            if ganhos_brutos > 0 and comissao > 0:
-                # Usar fórmula: brutos - comissão
-                ganhos_bolt += ganhos_brutos - comissao
-            else:
-                # Fallback para campo ganhos_liquidos se não houver brutos/comissão
-                ganhos_bolt += float(r.get("ganhos_liquidos") or r.get("ganhos") or r.get("earnings") or 0)
-        
-        # Buscar também de viagens_bolt (coleção alternativa)
-        viagens_bolt_query = {
-            "$and": [
-                {"$or": [{"motorista_id": motorista_id}]},
-                {"semana": semana, "ano": ano}
-            ]
-        }
-        if id_bolt:
-            viagens_bolt_query["$and"][0]["$or"].append({"identificador_motorista_bolt": id_bolt})
-        
-        viagens_bolt_records = await db.viagens_bolt.find(viagens_bolt_query, {"_id": 0}).to_list(100)
-        for r in viagens_bolt_records:
-            # Nova fórmula: ganhos = ganhos_brutos - comissão
-            ganhos_brutos = float(r.get("ganhos_brutos_total") or r.get("total_earnings") or 0)
-            comissao = float(r.get("comissoes") or r.get("comissao_bolt") or r.get("commission") or 0)
-            
-            if ganhos_brutos > 0 and comissao > 0:
-                ganhos_bolt += ganhos_brutos - comissao
-            else:
-                ganhos_bolt += float(r.get("ganhos_liquidos") or r.get("total_ganhos") or r.get("valor_liquido") or 0)
-        
-        logger.info(f"  {motorista.get('name')}: Bolt query returned {len(bolt_records)} ganhos + {len(viagens_bolt_records)} viagens, total €{ganhos_bolt:.2f}")
-        
-        # ============ VIA VERDE ============
-        via_verde_total = 0.0
-        matricula_veiculo = None
-        
-        # Via Verde: Buscar apenas pela matrícula do veículo atribuído ao motorista
-        # Evitar duplicação: se a matrícula já foi processada para outro motorista, não contar novamente
-        vv_query = None
-        vv_records = []
-        
-        if veiculo and veiculo.get("matricula"):
-            matricula_veiculo = veiculo.get("matricula", "").upper().strip()
-            # Normalizar matrícula (remover hífens e espaços) para buscar no Via Verde
-            matricula_normalizada = matricula_veiculo.replace("-", "").replace(" ", "")
-            
-            # Verificar se esta matrícula já foi processada
-            if matricula_normalizada in matriculas_processadas_viaverde:
-                logger.info(f"  {motorista.get('name')}: Via Verde matrícula {matricula_veiculo} já processada, ignorando duplicação")
-            else:
-                # Marcar matrícula como processada
-                matriculas_processadas_viaverde.add(matricula_normalizada)
-                
-                # Query com matrícula normalizada (sem hífens)
-                vv_query = {
-                    "$or": [
-                        {"matricula": matricula_veiculo},       # Formato original com hífens
-                        {"matricula": matricula_normalizada}    # Formato normalizado sem hífens
-                    ],
-                    "$and": [
-                        {"$or": [
-                            {"semana": semana, "ano": ano},
-                            {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}},
-                            {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                        ]}
-                    ]
-                }
-        elif motorista_id:
-            # Fallback: buscar por motorista_id se não tiver veículo
-            vv_query = {
-                "motorista_id": motorista_id,
-                "$or": [
-                    {"semana": semana, "ano": ano},
-                    {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]
-            }
-        
-        if vv_query:
-            vv_records = await db.portagens_viaverde.find(vv_query, {"_id": 0}).to_list(1000)
-        
-        # Incluir:
-        # 1. Registos com market_description = "portagens" ou "parques" (novos dados)
-        # 2. Registos com "mensalidade" ou "mobilidade" (taxas mensais)
-        # 3. Registos sem market_description (dados antigos) - assumir que são portagens
-        for r in vv_records:
-            market_desc = str(r.get("market_description", "")).strip().lower()
-            # Se não tem market_description ou é portagens/parques/mensalidade, incluir
-            if not market_desc or market_desc in ["portagens", "parques"] or "mensalidade" in market_desc or "mobilidade" in market_desc:
-                via_verde_total += float(r.get("valor") or r.get("value") or 0)
-        
-        logger.info(f"  {motorista.get('name')}: Via Verde query returned {len(vv_records)} records, total €{via_verde_total:.2f}")
-        
-        # ============ COMBUSTÍVEL FÓSSIL ============
-        combustivel_total = 0.0
-        parceiro_id = current_user["id"] if current_user["role"] == UserRole.PARCEIRO else None
-        
-        comb_query_conditions = [{"motorista_id": motorista_id}]
-        if cartao_combustivel:
-            comb_query_conditions.append({"cartao_via_verde": cartao_combustivel})
-        if veiculo_id:
-            comb_query_conditions.append({"vehicle_id": veiculo_id})
-        if veiculo and veiculo.get("matricula"):
-            comb_query_conditions.append({"matricula": veiculo.get("matricula")})
-            # Para dados Prio RPA, adicionar condição de matrícula normalizada
-            matricula_norm = veiculo.get("matricula", "").upper().replace(" ", "").replace("-", "")
-            if matricula_norm:
-                comb_query_conditions.append({"matricula_normalizada": matricula_norm})
-        
-        # Buscar por data OU por semana/ano
-        comb_query = {
-            "$and": [
-                {"$or": comb_query_conditions},
-                {"$or": [
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}},
-                    {"semana": semana, "ano": ano}
-                ]}
-            ]
-        }
-        
-        comb_records = await db.abastecimentos_combustivel.find(comb_query, {"_id": 0}).to_list(100)
-        for r in comb_records:
-            # CORRIGIDO: Incluir IVA no total de combustível
-            valor_sem_iva = float(r.get("valor_liquido") or r.get("valor") or r.get("total") or 0)
-            iva_valor = float(r.get("iva") or 0)
-            combustivel_total += valor_sem_iva + iva_valor
-        
-        if comb_records:
-            logger.info(f"  {motorista.get('name')}: Combustível (abastecimentos) query returned {len(comb_records)} records, total €{combustivel_total:.2f}")
-        
-        # ============ BUSCAR TAMBÉM DE DESPESAS_COMBUSTIVEL (dados via RPA) ============
-        # Query para despesas_combustivel (dados importados via RPA da Prio - colecção diferente)
-        despesas_comb_query_conditions = [{"motorista_id": motorista_id}]
-        if veiculo_id:
-            # Suportar ambos os nomes de campo: veiculo_id e vehicle_id
-            despesas_comb_query_conditions.append({"veiculo_id": veiculo_id})
-            despesas_comb_query_conditions.append({"vehicle_id": veiculo_id})
-        # Buscar pelo cartão Prio associado ao veículo
-        if cartao_combustivel:
-            despesas_comb_query_conditions.append({"cartao": cartao_combustivel})
-            despesas_comb_query_conditions.append({"cartao_frota_id": cartao_combustivel})
-        if veiculo and veiculo.get("matricula"):
-            despesas_comb_query_conditions.append({"matricula": veiculo.get("matricula")})
-            # Para dados Prio RPA, adicionar condição de matrícula normalizada
-            matricula_norm = veiculo.get("matricula", "").upper().replace(" ", "").replace("-", "")
-            if matricula_norm:
-                despesas_comb_query_conditions.append({"matricula_normalizada": matricula_norm})
-        
-        despesas_comb_query = {
-            "$and": [
-                {"$or": despesas_comb_query_conditions},
-                {"$or": [
-                    {"semana": semana, "ano": ano},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]},
-                # Garantir que é combustível fóssil (litros > 0 ou kwh = 0)
-                {"$or": [
-                    {"litros": {"$gt": 0}},
-                    {"kwh": {"$in": [0, None]}}
-                ]}
-            ]
-        }
-        
-        despesas_comb_records = await db.despesas_combustivel.find(despesas_comb_query, {"_id": 0}).to_list(100)
-        for r in despesas_comb_records:
-            combustivel_total += float(r.get("valor_total") or r.get("valor") or 0)
-        
-        if despesas_comb_records:
-            logger.info(f"  {motorista.get('name')}: Combustível (despesas_combustivel) query returned {len(despesas_comb_records)} records, adicionado €{sum(float(r.get('valor_total') or r.get('valor') or 0) for r in despesas_comb_records):.2f}, total €{combustivel_total:.2f}")
-        
-        # ============ CARREGAMENTO ELÉTRICO ============
-        eletrico_total = 0.0
-        eletrico_discriminacao = []  # Discriminação por fornecedor
-        elet_query_conditions = [{"motorista_id": motorista_id}]
-        
-        # Adicionar todos os cartões elétricos às condições de busca
-        for cartao_info in cartoes_eletricos:
-            cartao_id = cartao_info["cartao"]
-            elet_query_conditions.append({"cartao_frota_id": cartao_id})
-            elet_query_conditions.append({"card_code": cartao_id})
-            elet_query_conditions.append({"cartao": cartao_id})
-        
-        # Legacy - cartao_eletrico único
-        if cartao_eletrico and not cartoes_eletricos:
-            elet_query_conditions.append({"cartao_frota_id": cartao_eletrico})
-            elet_query_conditions.append({"card_code": cartao_eletrico})
-            elet_query_conditions.append({"cartao": cartao_eletrico})
-        
-        if veiculo_id:
-            elet_query_conditions.append({"vehicle_id": veiculo_id})
-            elet_query_conditions.append({"veiculo_id": veiculo_id})
-        if veiculo and veiculo.get("matricula"):
-            elet_query_conditions.append({"matricula": veiculo.get("matricula")})
-            # Para dados Prio RPA, adicionar condição de matrícula normalizada
-            matricula_norm = veiculo.get("matricula", "").upper().replace(" ", "").replace("-", "")
-            if matricula_norm:
-                elet_query_conditions.append({"matricula_normalizada": matricula_norm})
-        
-        elet_query = {
-            "$or": elet_query_conditions,
-            "$and": [
-                {"$or": [
-                    {"semana": semana, "ano": ano},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]}
-            ]
-        }
-        
-        # Buscar de combustivel_eletrico (carregamentos elétricos)
-        elet_records = await db.combustivel_eletrico.find(elet_query, {"_id": 0}).to_list(100)
-        for r in elet_records:
-            valor = float(r.get("valor") or r.get("valor_total") or r.get("TotalValueWithTaxes") or 0)
-            eletrico_total += valor
-            fornecedor = r.get("fornecedor") or r.get("provider") or "Desconhecido"
-            eletrico_discriminacao.append({"fornecedor": fornecedor, "valor": valor, "data": r.get("data")})
-        
-        # Buscar também de despesas_combustivel mas APENAS se tiver kWh > 0 (elétrico)
-        elet_despesas_query = {
-            "$and": [
-                {"$or": elet_query_conditions},
-                {"$or": [
-                    {"semana": semana, "ano": ano},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]},
-                {"kwh": {"$gt": 0}}  # APENAS registos elétricos (kWh > 0)
-            ]
-        }
-        elet_despesas_records = await db.despesas_combustivel.find(elet_despesas_query, {"_id": 0}).to_list(100)
-        for r in elet_despesas_records:
-            valor = float(r.get("valor_total") or r.get("valor") or 0)
-            eletrico_total += valor
-            fornecedor = r.get("fornecedor") or r.get("provider") or "Desconhecido"
-            eletrico_discriminacao.append({"fornecedor": fornecedor, "valor": valor, "data": r.get("data")})
-        
-        # Buscar de rpa_carregamento_eletrico
-        rpa_elet_records = await db.rpa_carregamento_eletrico.find(elet_query, {"_id": 0}).to_list(100)
-        for r in rpa_elet_records:
-            valor = float(r.get("valor_total") or r.get("valor") or 0)
-            eletrico_total += valor
-            fornecedor = r.get("fornecedor") or r.get("provider") or "Prio Electric"
-            eletrico_discriminacao.append({"fornecedor": fornecedor, "valor": valor, "data": r.get("data")})
-        
-        total_elet_records = len(elet_records) + len(elet_despesas_records) + len(rpa_elet_records)
-        logger.info(f"  {motorista.get('name')}: Elétrico query returned {total_elet_records} records (combustivel_eletrico: {len(elet_records)}, despesas_combustivel(kWh): {len(elet_despesas_records)}, rpa: {len(rpa_elet_records)}), total €{eletrico_total:.2f}")
-        
-        # ============ EXTRAS DO MOTORISTA ============
-        # Buscar extras (dívidas, caução parcelada, danos, etc.)
-        extras_total = 0.0
-        extras_query = {
-            "motorista_id": motorista_id,
-            "$or": [
-                {"semana": semana, "ano": ano},
-                {"semana": None},  # Extras sem semana específica
-            ]
-        }
-        extras_records = await db.despesas_extras.find(extras_query, {"_id": 0}).to_list(100)
-        for r in extras_records:
-            # Só somar extras não pagos ou pendentes
-            if r.get("status", "pendente") != "cancelado":
-                valor_extra = float(r.get("valor") or 0)
-                # Se for crédito, subtrair; se for débito, somar
-                if r.get("tipo") == "credito":
-                    extras_total -= valor_extra
-                else:
-                    extras_total += valor_extra
-        
-        logger.info(f"  {motorista.get('name')}: Extras query returned {len(extras_records)} records, total €{extras_total:.2f}")
-        
-        # ============ OBTER DADOS DO CONTRATO ============
-        tipo_contrato_veiculo = None
-        
-        if veiculo:
-            tipo_contrato_veiculo = veiculo.get("tipo_contrato_veiculo", "aluguer")
-        
-        # ============ VERIFICAR AJUSTES MANUAIS ============
-        ajuste_manual = await db.ajustes_semanais.find_one(
-            {"motorista_id": motorista_id, "semana": semana, "ano": ano},
-            {"_id": 0}
-        )
-        
-        has_manual_adjustment = False
-        if ajuste_manual:
-            has_manual_adjustment = True
-            # Substituir valores pelos valores do ajuste manual
-            ganhos_uber = ajuste_manual.get("ganhos_uber", ganhos_uber)
-            uber_portagens = ajuste_manual.get("uber_portagens", uber_portagens)
-            uber_gratificacoes = ajuste_manual.get("uber_gratificacoes", uber_gratificacoes)
-            ganhos_bolt = ajuste_manual.get("ganhos_bolt", ganhos_bolt)
-            ganhos_campanha_bolt = ajuste_manual.get("ganhos_campanha_bolt", ganhos_campanha_bolt)
-            via_verde_total = ajuste_manual.get("via_verde", via_verde_total)
-            combustivel_total = ajuste_manual.get("combustivel", combustivel_total)
-            eletrico_total = ajuste_manual.get("eletrico", eletrico_total)
-            aluguer_semanal = ajuste_manual.get("aluguer", aluguer_semanal)
-            extras_total = ajuste_manual.get("extras", extras_total)
+        # ============ LEDGER + AJUSTES MANUAIS ============
+        ajuste_manual = ajustes.get(motorista_id)
+        has_manual_adjustment = ajuste_manual is not None
+        valores = _valores_resumo_motorista(motorista, ledger, ajuste_manual, matriculas_processadas_viaverde)
+        ganhos_uber = valores["ganhos_uber"]
+        uber_portagens = valores["uber_portagens"]
+        uber_gratificacoes = valores["uber_gratificacoes"]
+        ganhos_bolt = valores["ganhos_bolt"]
+        ganhos_campanha_bolt = valores["ganhos_campanha_bolt"]
+        via_verde_total = valores["via_verde"]
+        combustivel_total = valores["combustivel"]
+        eletrico_total = valores["eletrico"]
+        extras_total = valores["extras"]
+        if has_manual_adjustment:
             logger.info(f"📝 Ajuste manual aplicado para {motorista.get('name')} - S{semana}/{ano}")
         
-        # ============ CALCULAR TOTAIS ============
-        # Total Ganhos = Rendimentos Uber + uPort + uGrat + Ganhos Bolt + Campanha Bolt
-        # (uPort e uGrat são reembolsos/gorjetas que o motorista recebe)
-        total_ganhos = ganhos_uber + uber_portagens + uber_gratificacoes + ganhos_bolt + ganhos_campanha_bolt
-        
-        # Se acumular_viaverde está activo, Via Verde vai para o acumulado (não desconta)
-        via_verde_a_descontar = 0.0 if acumular_viaverde else via_verde_total
-        total_despesas_operacionais = combustivel_total + eletrico_total + via_verde_a_descontar
+        tipo_contrato_veiculo = veiculo.get("tipo_contrato")
+        cartao_combustivel = veiculo.get("cartao_combustivel")
+        cartao_eletrico = veiculo.get("cartao_eletrico")
+        cartoes_eletricos = veiculo.get("cartoes_eletricos", [])
+        eletrico_discriminacao = ledger["fontes"]["eletrico"]["discriminacao"]
+        via_verde_id = veiculo.get("via_verde_id")
+        km_atribuidos = veiculo.get("km_atribuidos")
+        valor_km_extra = veiculo.get("valor_km_extra")
         
-        # RECEITAS DO PARCEIRO:
-        # 1. Aluguer semanal (se contrato de aluguer)
-        # 2. Extras cobrados ao motorista (dívidas, caução, danos)
-        receita_aluguer = aluguer_semanal if tipo_contrato_veiculo == "aluguer" else 0
+        # ============ CALCULAR TOTAIS ============
+        total_ganhos = valores["total_ganhos"]
+        via_verde_a_descontar = valores["via_verde_a_descontar"]
+        total_despesas_operacionais = valores["total_despesas_operacionais"]
+        receita_aluguer = valores["receita_aluguer"]
         receita_extras = extras_total
         
         # Total receitas do parceiro por este motorista
         receitas_parceiro = receita_aluguer + receita_extras
-        
-        # Líquido do motorista = (Rendimentos + Uber Portagens + Bolt) - Despesas - Aluguer - Extras
-        valor_liquido_motorista = total_ganhos - total_despesas_operacionais - receita_aluguer - receita_extras
+        valor_liquido_motorista = valores["valor_liquido_motorista"]
         
         motorista_resumo = {
             "motorista_id": motorista_id,
             "motorista_nome": motorista.get("name"),
             "motorista_email": motorista_email,
             "motorista_telefone": motorista.get("telefone") or motorista.get("phone"),
-            "veiculo_matricula": veiculo.get("matricula") if veiculo else None,
+            "veiculo_matricula": veiculo.get("matricula"),
             "veiculo_id": veiculo_id,
             "tem_relatorio": True if (ganhos_uber > 0 or ganhos_bolt > 0) else False,
             "relatorio_id": None,
@@ -1510,6 +1078,56 @@ async def get_resumo_semanal_parceiro(
     }
 
 
+def _valores_resumo_motorista(
+    motorista: Dict,
+    ledger: Dict[str, Any],
+    ajuste_manual: Optional[Dict[str, Any]],
+    matriculas_viaverde: set,
+) -> Dict[str, Any]:
+    """
+    Valores de um motorista no resumo semanal do parceiro (ecrã e PDF):
+    ledger + ajuste manual, Via Verde contada uma vez por matrícula
+    (`matriculas_viaverde` acumula as já contadas) e totais da linha.
+    """
+    valores = ledger_semanal.aplicar_ajuste(ledger, ajuste_manual)
+    veiculo = ledger["veiculo"]
+    
+    # Evitar duplicação: se a matrícula já foi contada para outro motorista, não contar novamente
+    via_verde = ledger["fontes"]["via_verde"]["total"]
+    matricula_normalizada = veiculo.get("matricula_normalizada")
+    if matricula_normalizada:
+        if matricula_normalizada in matriculas_viaverde:
+            logger.info(f"  {motorista.get('name')}: Via Verde matrícula {veiculo.get('matricula')} já processada, ignorando duplicação")
+            via_verde = 0.0
+        else:
+            matriculas_viaverde.add(matricula_normalizada)
+    if ajuste_manual:
+        via_verde = ajuste_manual.get("via_verde", via_verde)
+    valores["via_verde"] = via_verde
+    
+    # Total Ganhos = Rendimentos Uber + uPort + uGrat + Ganhos Bolt + Campanha Bolt
+    # (uPort e uGrat são reembolsos/gorjetas que o motorista recebe)
+    valores["total_ganhos"] = (
+        valores["ganhos_uber"] + valores["uber_portagens"] + valores["uber_gratificacoes"]
+        + valores["ganhos_bolt"] + valores["ganhos_campanha_bolt"]
+    )
+    
+    # Se acumular_viaverde está activo, Via Verde vai para o acumulado (não desconta)
+    acumular_viaverde = (motorista.get("config_financeira") or {}).get("acumular_viaverde", False)
+    valores["via_verde_a_descontar"] = 0.0 if acumular_viaverde else via_verde
+    valores["total_despesas_operacionais"] = valores["combustivel"] + valores["eletrico"] + valores["via_verde_a_descontar"]
+    
+    # Receita do parceiro: aluguer semanal só em contrato de aluguer
+    valores["receita_aluguer"] = valores["aluguer"] if veiculo.get("tipo_contrato") == "aluguer" else 0
+    
+    # Líquido do motorista = Ganhos - Despesas - Aluguer - Extras
+    valores["valor_liquido_motorista"] = (
+        valores["total_ganhos"] - valores["total_despesas_operacionais"]
+        - valores["receita_aluguer"] - valores["extras"]
+    )
+    return valores
+
+
 # ==================== HISTÓRICO SEMANAL (GRÁFICOS) ====================
 
 @router.get("/parceiro/historico-semanal")
@@ -1532,6 +1150,7 @@ async def get_historico_semanal_parceiro(
         ano_atual = now.year
     
     historico = []
+    parceiro_id_query = current_user["id"] if current_user["role"] == UserRole.PARCEIRO else None
     
     # Calcular semanas anteriores
     for i in range(semanas - 1, -1, -1):
@@ -1543,107 +1162,33 @@ async def get_historico_semanal_parceiro(
             semana += 52
             ano -= 1
         
-        # Buscar resumo desta semana (simplificado para performance)
-        # Calcular datas da semana
-        first_day_of_year = datetime(ano, 1, 1)
-        if first_day_of_year.weekday() <= 3:
-            first_monday = first_day_of_year - timedelta(days=first_day_of_year.weekday())
-        else:
-            first_monday = first_day_of_year + timedelta(days=(7 - first_day_of_year.weekday()))
-        
-        week_start = first_monday + timedelta(weeks=semana - 1)
-        week_end = week_start + timedelta(days=6)
-        
+        week_start, week_end = ledger_semanal.intervalo_semana(semana, ano)
         data_inicio = week_start.strftime("%Y-%m-%d")
         data_fim = week_end.strftime("%Y-%m-%d")
         
-        # Build query for motoristas
-        motoristas_query = {}
-        if current_user["role"] == UserRole.PARCEIRO:
-            motoristas_query["$or"] = [
-                {"parceiro_id": current_user["id"]},
-                {"parceiro_atribuido": current_user["id"]}
-            ]
-        
-        motoristas = await db.motoristas.find(
-            motoristas_query, 
-            {"_id": 0, "id": 1, "veiculo_atribuido": 1}
-        ).to_list(1000)
-        
-        motorista_ids = [m["id"] for m in motoristas]
+        # Mesmos motoristas e valores do resumo semanal (ledger + ajustes manuais)
+        motoristas = await _motoristas_resumo_semana(parceiro_id_query, semana, ano, data_inicio, data_fim)
+        ledgers = await ledger_semanal.obter(db, motoristas, semana, ano)
+        ajustes = {
+            a["motorista_id"]: a
+            for a in await db.ajustes_semanais.find(
+                {"motorista_id": {"$in": [m["id"] for m in motoristas]}, "semana": semana, "ano": ano},
+                {"_id": 0}
+            ).to_list(None)
+        }
         
-        # Calcular totais simplificados
         total_ganhos = 0.0
         total_despesas = 0.0
-        total_comissoes = 0.0
+        matriculas_processadas_viaverde = set()
+        for motorista in motoristas:
+            valores = _valores_resumo_motorista(
+                motorista, ledgers[motorista["id"]], ajustes.get(motorista["id"]), matriculas_processadas_viaverde
+            )
+            total_ganhos += valores["total_ganhos"]
+            total_despesas += valores["total_despesas_operacionais"]
         
-        if motorista_ids:
-            # Uber
-            uber_records = await db.ganhos_uber.find({
-                "motorista_id": {"$in": motorista_ids},
-                "$or": [
-                    {"semana": semana, "ano": ano},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]
-            }, {"_id": 0, "rendimentos": 1, "pago_total": 1}).to_list(1000)
-            total_ganhos += sum(float(r.get("rendimentos") or r.get("pago_total") or 0) for r in uber_records)
-            
-            # Bolt
-            bolt_records = await db.ganhos_bolt.find({
-                "motorista_id": {"$in": motorista_ids},
-                "$or": [
-                    {"periodo_semana": semana, "periodo_ano": ano},
-                    {"semana": semana, "ano": ano}
-                ]
-            }, {"_id": 0, "ganhos_liquidos": 1}).to_list(1000)
-            total_ganhos += sum(float(r.get("ganhos_liquidos") or 0) for r in bolt_records)
-            
-            # Despesas (Via Verde + Combustível + Elétrico)
-            # Obter veículos e matrículas
-            veiculo_ids = [m["veiculo_atribuido"] for m in motoristas if m.get("veiculo_atribuido")]
-            matriculas = []
-            if veiculo_ids:
-                veiculos = await db.vehicles.find({"id": {"$in": veiculo_ids}}, {"_id": 0, "matricula": 1}).to_list(100)
-                matriculas = [v["matricula"] for v in veiculos if v.get("matricula")]
-            
-            # Via Verde
-            if matriculas:
-                vv_records = await db.portagens_viaverde.find({
-                    "$and": [
-                        {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}},
-                        {"$or": [
-                            {"motorista_id": {"$in": motorista_ids}},
-                            {"matricula": {"$in": matriculas}}
-                        ]}
-                    ]
-                }, {"_id": 0, "value": 1}).to_list(5000)
-                total_despesas += sum(float(r.get("value") or 0) for r in vv_records)
-            
-            # Combustível
-            if matriculas:
-                comb_records = await db.abastecimentos_combustivel.find({
-                    "$and": [
-                        {"data": {"$gte": data_inicio, "$lte": data_fim}},
-                        {"$or": [
-                            {"motorista_id": {"$in": motorista_ids}},
-                            {"matricula": {"$in": matriculas}}
-                        ]}
-                    ]
-                }, {"_id": 0, "valor_liquido": 1}).to_list(1000)
-                total_despesas += sum(float(r.get("valor_liquido") or 0) for r in comb_records)
-            
-            # Elétrico
-            elet_records = await db.despesas_combustivel.find({
-                "motorista_id": {"$in": motorista_ids},
-                "$or": [
-                    {"semana": semana, "ano": ano},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]
-            }, {"_id": 0, "valor_total": 1}).to_list(1000)
-            total_despesas += sum(float(r.get("valor_total") or 0) for r in elet_records)
-            
-            # Comissões (simplificado - assume 70% para motoristas)
-            total_comissoes = total_ganhos * 0.7
+        # Comissões (simplificado - assume 70% para motoristas)
+        total_comissoes = total_ganhos * 0.7
         
         total_liquido = total_ganhos - total_despesas - total_comissoes
         
@@ -1666,6 +1211,18 @@ async def get_historico_semanal_parceiro(
 
 # ==================== RELATÓRIO INDIVIDUAL DO MOTORISTA ====================
 
+async def _valores_semana_motorista(motorista: Dict, semana: int, ano: int) -> Dict[str, Any]:
+    """Valores da semana de um motorista (ledger semanal + ajuste manual) para PDF, WhatsApp e email"""
+    ledger = await ledger_semanal.obter_motorista(db, motorista, semana, ano)
+    ajuste_manual = await db.ajustes_semanais.find_one(
+        {"motorista_id": motorista["id"], "semana": semana, "ano": ano},
+        {"_id": 0}
+    )
+    if ajuste_manual:
+        logger.info(f"📝 Ajuste manual aplicado para {motorista.get('name')} - S{semana}/{ano}")
+    return ledger_semanal.aplicar_ajuste(ledger, ajuste_manual)
+
+
 @router.get("/parceiro/resumo-semanal/motorista/{motorista_id}/pdf")
 async def generate_motorista_pdf(
     motorista_id: str,
@@ -1689,16 +1246,6 @@ async def generate_motorista_pdf(
     if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import mm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-    except ImportError:
-        raise HTTPException(status_code=500, detail="ReportLab not installed")
-    
     # Buscar motorista
     motorista = await db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
     if not motorista:
@@ -1713,79 +1260,42 @@ async def generate_motorista_pdf(
             matricula = veiculo.get("matricula", "")
     
     # Calcular datas da semana
-    first_day_of_year = datetime(ano, 1, 1)
-    if first_day_of_year.weekday() <= 3:
-        first_monday = first_day_of_year - timedelta(days=first_day_of_year.weekday())
-    else:
-        first_monday = first_day_of_year + timedelta(days=(7 - first_day_of_year.weekday()))
-    
-    week_start = first_monday + timedelta(weeks=semana - 1)
-    week_end = week_start + timedelta(days=6)
+    week_start, week_end = ledger_semanal.intervalo_semana(semana, ano)
     data_inicio = week_start.strftime("%Y-%m-%d")
     data_fim = week_end.strftime("%Y-%m-%d")
     
-    # Buscar dados do motorista
-    ganhos_uber = 0.0
-    uber_portagens = 0.0
-    uber_gratificacoes = 0.0
-    uber_records = await db.ganhos_uber.find({
-        "motorista_id": motorista_id,
-        "$or": [
-            {"semana": semana, "ano": ano},
-            {"data": {"$gte": data_inicio, "$lte": data_fim}},
-            {"periodo_inicio": {"$gte": data_inicio, "$lte": data_fim}}
-        ]
-    }, {"_id": 0}).to_list(100)
-    for r in uber_records:
-        # Usar 'rendimentos' (campo da nova importação) ou fallback para campos antigos
-        valor_base = float(r.get("rendimentos") or r.get("pago_total") or r.get("rendimentos_total") or 0)
-        port = float(r.get("portagens") or r.get("uber_portagens") or 0)
-        grat = float(r.get("gratificacao") or r.get("gratificacoes") or r.get("uber_gratificacoes") or r.get("gorjetas") or r.get("bonus") or 0)
-        # Ganhos Uber = valor base menos portagens e gratificações
-        ganhos_uber += valor_base - port - grat
-        uber_portagens += port
-        uber_gratificacoes += grat
-    
-    ganhos_bolt = 0.0
-    # Buscar em ganhos_bolt
-    bolt_records = await db.ganhos_bolt.find({
-        "motorista_id": motorista_id,
-        "$or": [{"periodo_semana": semana, "periodo_ano": ano}, {"semana": semana, "ano": ano}]
-    }, {"_id": 0}).to_list(100)
-    for r in bolt_records:
-        ganhos_bolt += float(r.get("ganhos_liquidos") or r.get("ganhos") or 0)
-    
-    # Também buscar em viagens_bolt
-    viagens_bolt_records = await db.viagens_bolt.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0}).to_list(100)
-    for r in viagens_bolt_records:
-        ganhos_bolt += float(r.get("ganhos_liquidos") or r.get("ganhos") or r.get("valor_liquido") or 0)
-    
-    via_verde = 0.0
-    vv_transacoes = []  # Lista para as transações Via Verde
-    
-    # Via Verde - buscar APENAS por vehicle_id ou matrícula do veículo do motorista
-    # NÃO buscar por parceiro_id pois isso traria todas as transações da frota
+    valores_semana = await _valores_semana_motorista(motorista, semana, ano)
+    
+    ganhos_uber = valores_semana["ganhos_uber"]
+    uber_portagens = valores_semana["uber_portagens"]
+    uber_gratificacoes = valores_semana["uber_gratificacoes"]
+    ganhos_bolt = valores_semana["ganhos_bolt"] + valores_semana["ganhos_campanha_bolt"]
+    via_verde = valores_semana["via_verde"]
+    combustivel = valores_semana["combustivel"]
+    eletrico = valores_semana["eletrico"]
+    aluguer = valores_semana["aluguer"]
+    extras = valores_semana["extras"]
+    
+    # Detalhes das transações (só as secções pedidas)
+    vv_transacoes = []
+    comb_transacoes = []
+    elet_records = []
     vehicle_id = motorista.get("veiculo_atribuido")
     parceiro_id = current_user["id"] if current_user["role"] == UserRole.PARCEIRO else motorista.get("parceiro_id")
     
-    vv_query_conditions = []
-    if vehicle_id:
-        vv_query_conditions.append({"vehicle_id": vehicle_id})
-    if matricula:
-        # Normalizar matrícula para busca (remover hífens)
-        matricula_norm = matricula.replace("-", "")
-        vv_query_conditions.append({"matricula": matricula})
-        if matricula_norm != matricula:
-            vv_query_conditions.append({"matricula": matricula_norm})
-    # NOTA: NÃO adicionar parceiro_id às condições - isso traria toda a frota
-    # Buscar apenas por motorista_id se disponível
-    if motorista_id:
-        vv_query_conditions.append({"motorista_id": motorista_id})
-    
-    if vv_query_conditions:
+    if mostrar_via_verde:
+        # Via Verde - APENAS por vehicle_id, matrícula ou motorista_id
+        # NÃO buscar por parceiro_id pois isso traria todas as transações da frota
+        vv_query_conditions = [{"motorista_id": motorista_id}]
+        if vehicle_id:
+            vv_query_conditions.append({"vehicle_id": vehicle_id})
+        if matricula:
+            # Normalizar matrícula para busca (remover hífens)
+            matricula_norm = matricula.replace("-", "")
+            vv_query_conditions.append({"matricula": matricula})
+            if matricula_norm != matricula:
+                vv_query_conditions.append({"matricula": matricula_norm})
+        
         vv_records = await db.portagens_viaverde.find({
             "$and": [
                 {"$or": vv_query_conditions},
@@ -1799,7 +1309,6 @@ async def generate_motorista_pdf(
         
         for r in vv_records:
             valor = float(r.get("valor") or r.get("value") or 0)
-            via_verde += valor
             if valor > 0:
                 vv_transacoes.append({
                     "data": r.get("data") or r.get("entry_date", ""),
@@ -1809,141 +1318,74 @@ async def generate_motorista_pdf(
                     "valor": valor
                 })
     
-    combustivel = 0.0
-    comb_transacoes = []  # Lista para os abastecimentos
-    
-    # Combustível - buscar por parceiro_id (dados Prio são por parceiro/cartão)
-    if parceiro_id:
-        comb_query = {
-            "$and": [
-                {"parceiro_id": parceiro_id},
-                {"$or": [
-                    {"$and": [{"semana": semana}, {"ano": ano}]},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]},
-                {"$or": [
-                    {"litros": {"$gt": 0}},
-                    {"kwh": {"$in": [0, None]}}
-                ]}
-            ]
-        }
-        
-        comb_records = await db.despesas_combustivel.find(comb_query, {"_id": 0}).to_list(100)
-        
-        for r in comb_records:
-            transacoes = r.get("transacoes", [])
-            if transacoes:
-                for t in transacoes:
-                    valor = float(t.get("valor", 0) or 0)
-                    combustivel += valor
+    if mostrar_abastecimentos:
+        # Combustível - dados Prio são por parceiro/cartão
+        if parceiro_id:
+            comb_records = await db.despesas_combustivel.find({
+                "$and": [
+                    {"parceiro_id": parceiro_id},
+                    {"$or": [
+                        {"$and": [{"semana": semana}, {"ano": ano}]},
+                        {"data": {"$gte": data_inicio, "$lte": data_fim}}
+                    ]},
+                    {"$or": [
+                        {"litros": {"$gt": 0}},
+                        {"kwh": {"$in": [0, None]}}
+                    ]}
+                ]
+            }, {"_id": 0}).to_list(100)
+            
+            for r in comb_records:
+                transacoes = r.get("transacoes", [])
+                if transacoes:
+                    for t in transacoes:
+                        valor = float(t.get("valor", 0) or 0)
+                        if valor > 0:
+                            data_trans = t.get("data", "")
+                            comb_transacoes.append({
+                                "data": data_trans.split(" ")[0] if " " in data_trans else data_trans,
+                                "hora": data_trans.split(" ")[1] if " " in data_trans else "",
+                                "posto": t.get("posto", "Prio"),
+                                "litros": t.get("litros", 0),
+                                "valor": valor
+                            })
+                else:
+                    valor = float(r.get("valor_total") or r.get("valor") or 0)
                     if valor > 0:
-                        data_trans = t.get("data", "")
                         comb_transacoes.append({
-                            "data": data_trans.split(" ")[0] if " " in data_trans else data_trans,
-                            "hora": data_trans.split(" ")[1] if " " in data_trans else "",
-                            "posto": t.get("posto", "Prio"),
-                            "litros": t.get("litros", 0),
+                            "data": r.get("data", ""),
+                            "hora": r.get("hora", ""),
+                            "posto": r.get("posto", "Prio"),
+                            "litros": r.get("litros", 0),
                             "valor": valor
                         })
-            else:
-                valor = float(r.get("valor_total") or r.get("valor") or 0)
-                if valor > 0:
-                    combustivel += valor
-                    comb_transacoes.append({
-                        "data": r.get("data", ""),
-                        "hora": r.get("hora", ""),
-                        "posto": r.get("posto", "Prio"),
-                        "litros": r.get("litros", 0),
-                        "valor": valor
-                    })
-    
-    # Também buscar em abastecimentos_combustivel (formato antigo)
-    old_comb_records = await db.abastecimentos_combustivel.find({
-        "$or": [
-            {"motorista_id": motorista_id},
-            {"vehicle_id": vehicle_id} if vehicle_id else {"motorista_id": "none"}
-        ],
-        "data": {"$gte": data_inicio, "$lte": data_fim}
-    }, {"_id": 0}).to_list(100)
-    
-    for r in old_comb_records:
-        valor_sem_iva = float(r.get("valor_liquido") or r.get("valor") or r.get("total") or 0)
-        iva_valor = float(r.get("iva") or 0)
-        total_valor = valor_sem_iva + iva_valor
-        combustivel += total_valor
-        if total_valor > 0:
-            comb_transacoes.append({
-                "data": r.get("data", ""),
-                "hora": r.get("hora", ""),
-                "posto": r.get("posto", "N/A"),
-                "litros": r.get("litros", 0),
-                "valor": total_valor
-            })
-    
-    eletrico = 0.0
-    elet_records = await db.despesas_combustivel.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0}).to_list(100)
-    for r in elet_records:
-        eletrico += float(r.get("valor_total") or r.get("TotalValueWithTaxes") or 0)
-    
-    # Buscar valor do aluguer
-    aluguer = float(motorista.get("valor_aluguer_semanal") or 0)
-    
-    # Se não tiver no motorista, buscar do veículo associado
-    if aluguer == 0 and veiculo:
-        # Usar função que calcula com base na época alta/baixa
-        aluguer = calcular_aluguer_semanal(veiculo, semana, ano)
-        logger.info(f"PDF Motorista {motorista.get('name')}: aluguer calculado do veículo={aluguer}")
-    elif aluguer == 0:
-        # Tentar buscar veículo por outros campos
-        veiculo_id = motorista.get("veiculo_atribuido") or motorista.get("veiculo_id") or motorista.get("vehicle_id")
-        logger.info(f"PDF Motorista {motorista.get('name')}: veiculo_id={veiculo_id}")
-        if veiculo_id:
-            veiculo_aluguer = await db.vehicles.find_one({"id": veiculo_id}, {"_id": 0})
-            if veiculo_aluguer:
-                # Usar função que calcula com base na época alta/baixa
-                aluguer = calcular_aluguer_semanal(veiculo_aluguer, semana, ano)
-                logger.info(f"PDF Motorista {motorista.get('name')}: aluguer calculado={aluguer}")
-            else:
-                logger.warning(f"PDF Motorista {motorista.get('name')}: veículo não encontrado")
-        else:
-            logger.warning(f"PDF Motorista {motorista.get('name')}: sem veiculo_id")
-    
-    extras = 0.0
-    extras_records = await db.despesas_extras.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0}).to_list(100)
-    for r in extras_records:
-        # Só somar extras não pagos ou pendentes
-        if r.get("status", "pendente") != "cancelado":
-            valor_extra = float(r.get("valor") or 0)
-            # Se for crédito, subtrair; se for débito, somar
-            if r.get("tipo") == "credito":
-                extras -= valor_extra
-            else:
-                extras += valor_extra
-    
-    # ============ VERIFICAR AJUSTES MANUAIS PARA PDF ============
-    ajuste_manual = await db.ajustes_semanais.find_one(
-        {"motorista_id": motorista_id, "semana": semana, "ano": ano},
-        {"_id": 0}
-    )
+        
+        # Também abastecimentos_combustivel (formato antigo)
+        old_comb_records = await db.abastecimentos_combustivel.find({
+            "$or": [
+                {"motorista_id": motorista_id},
+                {"vehicle_id": vehicle_id} if vehicle_id else {"motorista_id": "none"}
+            ],
+            "data": {"$gte": data_inicio, "$lte": data_fim}
+        }, {"_id": 0}).to_list(100)
+        
+        for r in old_comb_records:
+            valor_sem_iva = float(r.get("valor_liquido") or r.get("valor") or r.get("total") or 0)
+            total_valor = valor_sem_iva + float(r.get("iva") or 0)
+            if total_valor > 0:
+                comb_transacoes.append({
+                    "data": r.get("data", ""),
+                    "hora": r.get("hora", ""),
+                    "posto": r.get("posto", "N/A"),
+                    "litros": r.get("litros", 0),
+                    "valor": total_valor
+                })
     
-    if ajuste_manual:
-        # Substituir valores pelos valores do ajuste manual
-        ganhos_uber = ajuste_manual.get("ganhos_uber", ganhos_uber)
-        uber_portagens = ajuste_manual.get("uber_portagens", uber_portagens)
-        uber_gratificacoes = ajuste_manual.get("uber_gratificacoes", uber_gratificacoes)
-        ganhos_bolt = ajuste_manual.get("ganhos_bolt", ganhos_bolt)
-        via_verde = ajuste_manual.get("via_verde", via_verde)
-        combustivel = ajuste_manual.get("combustivel", combustivel)
-        eletrico = ajuste_manual.get("eletrico", eletrico)
-        aluguer = ajuste_manual.get("aluguer", aluguer)
-        extras = ajuste_manual.get("extras", extras)
-        logger.info(f"📝 PDF: Ajuste manual aplicado para {motorista.get('name')} - S{semana}/{ano}")
+    if mostrar_carregamentos:
+        elet_records = await db.despesas_combustivel.find({
+            "motorista_id": motorista_id,
+            "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
+        }, {"_id": 0}).to_list(100)
     
     # Total Ganhos = Rendimentos Uber + uPort + uGrat + Ganhos Bolt
     # (uPort e uGrat são reembolsos/gorjetas que o motorista recebe)
@@ -1951,271 +1393,38 @@ async def generate_motorista_pdf(
     total_despesas = via_verde + combustivel + eletrico
     liquido = total_ganhos - total_despesas - aluguer - extras
     
-    # Gerar PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm, topMargin=15*mm, bottomMargin=15*mm)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16, alignment=TA_CENTER)
-    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, textColor=colors.grey)
-    section_style = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=11, textColor=colors.HexColor('#1e3a5f'))
-    
-    elements = []
-    
-    # Cabeçalho
-    elements.append(Paragraph(f"Relatório Semanal", title_style))
-    elements.append(Paragraph(f"{motorista.get('name', 'Motorista')}", subtitle_style))
-    
-    # Mostrar matrícula se configurado
-    if mostrar_matricula and matricula:
-        elements.append(Paragraph(f"Veículo: {matricula}", subtitle_style))
-    
-    elements.append(Paragraph(f"Semana {semana}/{ano} ({week_start.strftime('%d/%m/%Y')} a {week_end.strftime('%d/%m/%Y')})", subtitle_style))
-    elements.append(Spacer(1, 10*mm))
-    
-    # Tabela de resumo
-    data_table = [
-        ["Descrição", "Valor"],
-        ["Ganhos Uber", f"€{ganhos_uber:.2f}"],
-        ["uPort (Portagens Uber)", f"€{uber_portagens:.2f}"],
-        ["uGrat (Gratificações Uber)", f"€{uber_gratificacoes:.2f}"],
-        ["Ganhos Bolt", f"€{ganhos_bolt:.2f}"],
-        ["Total Ganhos", f"€{total_ganhos:.2f}"],
-        ["", ""],
-        ["Via Verde", f"-€{via_verde:.2f}"],
-        ["Combustível", f"-€{combustivel:.2f}"],
-        ["Carregamento Elétrico", f"-€{eletrico:.2f}"],
-        ["Total Despesas", f"-€{total_despesas:.2f}"],
-        ["", ""],
-        ["Aluguer Veículo", f"-€{aluguer:.2f}"],
-        ["Extras/Dívidas", f"-€{extras:.2f}"],
-        ["", ""],
-        ["VALOR LÍQUIDO MOTORISTA", f"€{liquido:.2f}"],
-    ]
-    
-    table = Table(data_table, colWidths=[100*mm, 50*mm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a5f')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-        # Estilo para "Total Ganhos" (linha 5)
-        ('FONTNAME', (0, 5), (-1, 5), 'Helvetica-Bold'),
-        # Estilo para "Total Despesas" (linha 10)
-        ('FONTNAME', (0, 10), (-1, 10), 'Helvetica-Bold'),
-        # Estilo para "VALOR LÍQUIDO MOTORISTA" (última linha - 15)
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#d4edda') if liquido >= 0 else colors.HexColor('#f8d7da')),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    
-    elements.append(table)
-    elements.append(Spacer(1, 10*mm))
-    
-    # ==================== LISTAS DETALHADAS ====================
-    
-    # Lista de Via Verde
-    if mostrar_via_verde and vv_transacoes:
-        elements.append(Spacer(1, 5*mm))
-        elements.append(Paragraph("Detalhes Via Verde", section_style))
-        elements.append(Spacer(1, 3*mm))
-        
-        vv_table_data = [["Data", "Hora", "Local", "Matrícula", "Valor"]]
-        for t in sorted(vv_transacoes, key=lambda x: (x.get("data", ""), x.get("hora", ""))):
-            data_str = t.get("data", "-")
-            # Formatar data de "2026-01-04" para "04/01/26"
-            if data_str and "-" in data_str:
-                try:
-                    date_parts = data_str.split("-")
-                    if len(date_parts) == 3:
-                        data_str = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0][2:]}"
-                except:
-                    pass
-            
-            hora_str = t.get("hora", "-") or "-"
-            local = str(t.get("local", "-"))[:30]
-            matricula_vv = t.get("matricula", "-")
-            valor = t.get("valor", 0)
-            
-            vv_table_data.append([data_str, hora_str, local, matricula_vv, f"€{valor:.2f}"])
-        
-        # Linha de total
-        vv_table_data.append(["", "", "", "TOTAL", f"€{via_verde:.2f}"])
-        
-        vv_table = Table(vv_table_data, colWidths=[22*mm, 18*mm, 70*mm, 25*mm, 25*mm])
-        vv_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6c757d')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Coluna Valor alinhada à direita
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        elements.append(vv_table)
-    
-    # Lista de Abastecimentos
-    if mostrar_abastecimentos and comb_transacoes:
-        elements.append(Spacer(1, 8*mm))
-        elements.append(Paragraph("Detalhes Abastecimentos", section_style))
-        elements.append(Spacer(1, 3*mm))
-        
-        comb_table_data = [["Data", "Hora", "Posto", "Litros", "Valor"]]
-        for t in sorted(comb_transacoes, key=lambda x: x.get("data", "")):
-            data_str = t.get("data", "-")
-            # Formatar data de "2026-01-04" para "04/01/26"
-            if data_str and "-" in data_str:
-                try:
-                    date_parts = data_str.split("-")
-                    if len(date_parts) == 3:
-                        data_str = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0][2:]}"
-                except:
-                    pass
-            
-            hora_str = t.get("hora", "-") or "-"
-            posto = str(t.get("posto", "-"))[:20]
-            litros = float(t.get("litros", 0) or 0)
-            valor = t.get("valor", 0)
-            
-            comb_table_data.append([data_str, hora_str, posto, f"{litros:.1f}L" if litros else "-", f"€{valor:.2f}"])
-        
-        comb_table_data.append(["", "", "", "TOTAL", f"€{combustivel:.2f}"])
-        
-        comb_table = Table(comb_table_data, colWidths=[22*mm, 18*mm, 65*mm, 25*mm, 25*mm])
-        comb_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6c757d')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('ALIGN', (3, 0), (4, -1), 'RIGHT'),  # Litros e Valor alinhados à direita
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        elements.append(comb_table)
-    
-    # Lista de Carregamentos Elétricos
-    if mostrar_carregamentos and elet_records:
-        elements.append(Spacer(1, 8*mm))
-        elements.append(Paragraph("Detalhes Carregamentos Elétricos", section_style))
-        elements.append(Spacer(1, 3*mm))
-        
-        # Colunas: Data, Hora, Posto, Tempo, kWh, Valor
-        elet_table_data = [["Data", "Hora", "Posto", "Tempo", "kWh", "Valor"]]
-        for r in sorted(elet_records, key=lambda x: x.get("data", x.get("StartDate", ""))):
-            # Usar campos data_detalhe e hora_detalhe se existirem
-            data_str = r.get("data_detalhe", "")
-            hora_str = r.get("hora_detalhe", r.get("hora", ""))
-            
-            # Fallback: extrair de data se campos não existirem
-            if not data_str:
-                data_raw = r.get("data", r.get("StartDate", "-"))
-                if data_raw and data_raw != "-":
-                    try:
-                        data_raw_str = str(data_raw)
-                        if "T" in data_raw_str:
-                            data_raw_str = data_raw_str.replace("T", " ")
-                        
-                        parts = data_raw_str.split(" ")
-                        if len(parts) >= 1:
-                            date_part = parts[0]
-                            if "-" in date_part:
-                                date_nums = date_part.split("-")
-                                if len(date_nums) == 3:
-                                    data_str = f"{date_nums[2]}/{date_nums[1]}/{date_nums[0][2:]}"
-                            elif "/" in date_part:
-                                date_nums = date_part.split("/")
-                                if len(date_nums) >= 2:
-                                    data_str = f"{date_nums[0].zfill(2)}/{date_nums[1].zfill(2)}"
-                                    if len(date_nums) == 3:
-                                        data_str += f"/{date_nums[2][-2:]}"
-                            else:
-                                data_str = date_part[:10]
-                        
-                        if len(parts) >= 2 and not hora_str:
-                            hora_str = parts[1][:5]
-                    except:
-                        data_str = str(data_raw)[:10]
-            else:
-                # Formatar data_detalhe de "2026-01-04" para "04/01/26"
-                try:
-                    date_parts = data_str.split("-")
-                    if len(date_parts) == 3:
-                        data_str = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0][2:]}"
-                except:
-                    pass
-            
-            if not data_str:
-                data_str = "-"
-            if not hora_str:
-                hora_str = "-"
-            
-            # Posto/Local/Operador - usar estacao_id que é onde POSTO é guardado
-            posto = r.get("estacao_id", r.get("estacao", r.get("posto", r.get("OperatorName", r.get("local", "-")))))
-            if posto:
-                posto = str(posto)[:18]
-            else:
-                posto = "-"
-            
-            # Tempo/Duração - usar duracao_minutos que é onde DURAÇÃO é guardado
-            duracao = r.get("duracao_minutos", r.get("duracao", r.get("Duration", r.get("tempo", ""))))
-            if duracao:
-                # Converter minutos para formato legível se for número
-                try:
-                    if isinstance(duracao, (int, float)):
-                        mins = int(duracao)
-                        if mins >= 60:
-                            tempo_str = f"{mins // 60}h{mins % 60:02d}m"
-                        else:
-                            tempo_str = f"{mins}m"
-                    else:
-                        tempo_str = str(duracao)[:10]
-                except:
-                    tempo_str = str(duracao)[:10]
-            else:
-                tempo_str = "-"
-            
-            # kWh/Energia - usar energia_kwh que é onde ENERGIA é guardado
-            kwh = float(r.get("energia_kwh", r.get("energia", r.get("TotalEnergy", r.get("kwh", 0)))) or 0)
-            
-            # Valor
-            valor = float(r.get("valor_total") or r.get("TotalValueWithTaxes") or 0)
-            
-            elet_table_data.append([data_str, hora_str, posto, tempo_str, f"{kwh:.2f}", f"€{valor:.2f}"])
-        
-        elet_table_data.append(["", "", "", "", "TOTAL", f"€{eletrico:.2f}"])
-        
-        elet_table = Table(elet_table_data, colWidths=[22*mm, 16*mm, 50*mm, 18*mm, 18*mm, 25*mm])
-        elet_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6c757d')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('ALIGN', (3, 0), (5, -1), 'RIGHT'),  # Tempo, kWh, Valor alinhados à direita
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        elements.append(elet_table)
-    
-    # Rodapé
-    elements.append(Spacer(1, 10*mm))
-    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
-    elements.append(Paragraph(f"Gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} - TVDEFleet", footer_style))
-    
-    doc.build(elements)
-    buffer.seek(0)
+    # Gerar PDF no pool de processos
+    pdf_bytes = await executor_service.executar_cpu(
+        construir_pdf_motorista,
+        motorista=motorista,
+        matricula=matricula,
+        semana=semana,
+        ano=ano,
+        week_start=week_start,
+        week_end=week_end,
+        valores={
+            "ganhos_uber": ganhos_uber,
+            "uber_portagens": uber_portagens,
+            "uber_gratificacoes": uber_gratificacoes,
+            "ganhos_bolt": ganhos_bolt,
+            "via_verde": via_verde,
+            "combustivel": combustivel,
+            "eletrico": eletrico,
+            "aluguer": aluguer,
+            "extras": extras,
+            "total_ganhos": total_ganhos,
+            "total_despesas": total_despesas,
+            "liquido": liquido,
+        },
+        vv_transacoes=vv_transacoes,
+        comb_transacoes=comb_transacoes,
+        elet_records=elet_records,
+        mostrar_matricula=mostrar_matricula,
+        mostrar_via_verde=mostrar_via_verde,
+        mostrar_abastecimentos=mostrar_abastecimentos,
+        mostrar_carregamentos=mostrar_carregamentos,
+    )
+    buffer = BytesIO(pdf_bytes)
     
     nome_ficheiro = motorista.get('name', 'motorista').replace(' ', '_')
     
@@ -2241,78 +1450,18 @@ async def get_motorista_whatsapp_link(
     if not motorista:
         raise HTTPException(status_code=404, detail="Motorista não encontrado")
     
-    # Calcular datas da semana
-    first_day_of_year = datetime(ano, 1, 1)
-    if first_day_of_year.weekday() <= 3:
-        first_monday = first_day_of_year - timedelta(days=first_day_of_year.weekday())
-    else:
-        first_monday = first_day_of_year + timedelta(days=(7 - first_day_of_year.weekday()))
-    
-    week_start = first_monday + timedelta(weeks=semana - 1)
-    week_end = week_start + timedelta(days=6)
-    data_inicio = week_start.strftime("%Y-%m-%d")
-    data_fim = week_end.strftime("%Y-%m-%d")
-    
-    # Buscar dados
-    ganhos_uber = 0.0
-    uber_portagens = 0.0
-    uber_records = await db.ganhos_uber.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0, "rendimentos": 1, "pago_total": 1, "uber_portagens": 1}).to_list(100)
-    ganhos_uber = sum(float(r.get("rendimentos") or r.get("pago_total") or 0) for r in uber_records)
-    uber_portagens = sum(float(r.get("uber_portagens") or 0) for r in uber_records)
-    
-    ganhos_bolt = 0.0
-    bolt_records = await db.ganhos_bolt.find({
-        "motorista_id": motorista_id,
-        "$or": [{"periodo_semana": semana, "periodo_ano": ano}, {"semana": semana, "ano": ano}]
-    }, {"_id": 0, "ganhos_liquidos": 1}).to_list(100)
-    ganhos_bolt = sum(float(r.get("ganhos_liquidos") or 0) for r in bolt_records)
-    
-    # Também buscar em viagens_bolt
-    viagens_bolt_records = await db.viagens_bolt.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0, "ganhos_liquidos": 1, "valor_liquido": 1}).to_list(100)
-    ganhos_bolt += sum(float(r.get("ganhos_liquidos") or r.get("valor_liquido") or 0) for r in viagens_bolt_records)
-    
-    via_verde = 0.0
-    vv_records = await db.portagens_viaverde.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}}]
-    }, {"_id": 0, "value": 1}).to_list(1000)
-    via_verde = sum(float(r.get("value") or 0) for r in vv_records)
-    
-    combustivel = 0.0
-    comb_records = await db.abastecimentos_combustivel.find({
-        "motorista_id": motorista_id, "data": {"$gte": data_inicio, "$lte": data_fim}
-    }, {"_id": 0, "valor_total": 1, "valor": 1, "valor_liquido": 1}).to_list(100)
-    combustivel = sum(float(r.get("valor_total") or r.get("valor") or r.get("valor_liquido") or 0) for r in comb_records)
-    
-    eletrico = 0.0
-    elet_records = await db.despesas_combustivel.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0, "valor_total": 1}).to_list(100)
-    eletrico = sum(float(r.get("valor_total") or 0) for r in elet_records)
-    
-    # Buscar valor do aluguer
-    aluguer = float(motorista.get("valor_aluguer_semanal") or 0)
-    
-    # Se não tiver no motorista, buscar do veículo associado
-    if aluguer == 0:
-        veiculo_id = motorista.get("veiculo_id") or motorista.get("vehicle_id")
-        if veiculo_id:
-            veiculo = await db.vehicles.find_one({"id": veiculo_id}, {"_id": 0})
-            if veiculo:
-                aluguer = calcular_aluguer_semanal(veiculo, semana, ano)
+    valores = await _valores_semana_motorista(motorista, semana, ano)
     
-    # Initialize extras (for consistency with other functions)
-    extras = 0.0
+    # Uber = rendimentos + uPort + uGrat; Bolt inclui campanhas
+    ganhos_uber = valores["ganhos_uber"] + valores["uber_portagens"] + valores["uber_gratificacoes"]
+    ganhos_bolt = valores["ganhos_bolt"] + valores["ganhos_campanha_bolt"]
+    via_verde = valores["via_verde"]
+    combustivel = valores["combustivel"]
+    eletrico = valores["eletrico"]
+    aluguer = valores["aluguer"]
+    extras = valores["extras"]
     
-    # Total Ganhos = Rendimentos Uber + Uber Portagens + Ganhos Bolt
-    total_ganhos = ganhos_uber + uber_portagens + ganhos_bolt
+    total_ganhos = ganhos_uber + ganhos_bolt
     total_despesas = via_verde + combustivel + eletrico
     liquido = total_ganhos - total_despesas - aluguer - extras
     
@@ -2383,69 +1532,18 @@ async def send_motorista_email(
     if not email_destino:
         raise HTTPException(status_code=400, detail="Motorista não tem email configurado")
     
-    # Calcular datas da semana
-    first_day_of_year = datetime(ano, 1, 1)
-    if first_day_of_year.weekday() <= 3:
-        first_monday = first_day_of_year - timedelta(days=first_day_of_year.weekday())
-    else:
-        first_monday = first_day_of_year + timedelta(days=(7 - first_day_of_year.weekday()))
-    
-    week_start = first_monday + timedelta(weeks=semana - 1)
-    week_end = week_start + timedelta(days=6)
-    data_inicio = week_start.strftime("%Y-%m-%d")
-    data_fim = week_end.strftime("%Y-%m-%d")
-    
-    # Buscar dados
-    uber_records = await db.ganhos_uber.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0, "rendimentos": 1, "pago_total": 1, "uber_portagens": 1}).to_list(100)
-    ganhos_uber = sum(float(r.get("rendimentos") or r.get("pago_total") or 0) for r in uber_records)
-    uber_portagens = sum(float(r.get("uber_portagens") or 0) for r in uber_records)
-    
-    bolt_records = await db.ganhos_bolt.find({
-        "motorista_id": motorista_id,
-        "$or": [{"periodo_semana": semana, "periodo_ano": ano}, {"semana": semana, "ano": ano}]
-    }, {"_id": 0, "ganhos_liquidos": 1}).to_list(100)
-    ganhos_bolt = sum(float(r.get("ganhos_liquidos") or 0) for r in bolt_records)
-    
-    # Também buscar em viagens_bolt
-    viagens_bolt_records = await db.viagens_bolt.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0, "ganhos_liquidos": 1, "valor_liquido": 1}).to_list(100)
-    ganhos_bolt += sum(float(r.get("ganhos_liquidos") or r.get("valor_liquido") or 0) for r in viagens_bolt_records)
-    
-    via_verde = sum(float(r.get("value") or 0) for r in await db.portagens_viaverde.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}}]
-    }, {"_id": 0, "value": 1}).to_list(1000))
-    
-    combustivel = sum(float(r.get("valor_total") or r.get("valor") or r.get("valor_liquido") or 0) for r in await db.abastecimentos_combustivel.find({
-        "motorista_id": motorista_id, "data": {"$gte": data_inicio, "$lte": data_fim}
-    }, {"_id": 0, "valor_total": 1, "valor": 1, "valor_liquido": 1}).to_list(100))
-    
-    eletrico = sum(float(r.get("valor_total") or 0) for r in await db.despesas_combustivel.find({
-        "motorista_id": motorista_id,
-        "$or": [{"semana": semana, "ano": ano}, {"data": {"$gte": data_inicio, "$lte": data_fim}}]
-    }, {"_id": 0, "valor_total": 1}).to_list(100))
-    
-    # Buscar valor do aluguer
-    aluguer = float(motorista.get("valor_aluguer_semanal") or 0)
-    
-    # Se não tiver no motorista, buscar do veículo associado
-    if aluguer == 0:
-        veiculo_id = motorista.get("veiculo_id") or motorista.get("vehicle_id")
-        if veiculo_id:
-            veiculo = await db.vehicles.find_one({"id": veiculo_id}, {"_id": 0})
-            if veiculo:
-                aluguer = calcular_aluguer_semanal(veiculo, semana, ano)
+    valores = await _valores_semana_motorista(motorista, semana, ano)
     
-    # Initialize extras (for consistency with other functions)
-    extras = 0.0
+    # Uber = rendimentos + uPort + uGrat; Bolt inclui campanhas
+    ganhos_uber = valores["ganhos_uber"] + valores["uber_portagens"] + valores["uber_gratificacoes"]
+    ganhos_bolt = valores["ganhos_bolt"] + valores["ganhos_campanha_bolt"]
+    via_verde = valores["via_verde"]
+    combustivel = valores["combustivel"]
+    eletrico = valores["eletrico"]
+    aluguer = valores["aluguer"]
+    extras = valores["extras"]
     
-    # Total Ganhos = Rendimentos Uber + Uber Portagens + Ganhos Bolt
-    total_ganhos = ganhos_uber + uber_portagens + ganhos_bolt
+    total_ganhos = ganhos_uber + ganhos_bolt
     total_despesas = via_verde + combustivel + eletrico
     liquido = total_ganhos - total_despesas - aluguer - extras
     
@@ -2518,7 +1616,7 @@ async def send_motorista_email(
             email_service = await get_parceiro_email_service(db, parceiro_id)
             logger.info(f"Email service obtido: {email_service is not None}")
             if email_service:
-                email_result = email_service.send_email(
+                email_result = await email_service.enviar(
                     to_email=email_destino,
                     subject=f"Relatório Semanal - Semana {semana}/{ano}",
                     body_html=html_content
@@ -2530,7 +1628,7 @@ async def send_motorista_email(
         # Fallback para SMTP do sistema se SMTP do parceiro não disponível
         if email_result is None:
             logger.info("Usando fallback SMTP do sistema")
-            email_result = send_email_smtp(
+            email_result = await send_email_smtp(
                 to_email=email_destino,
                 subject=f"Relatório Semanal - Semana {semana}/{ano}",
                 html_content=html_content
@@ -2770,6 +1868,8 @@ async def delete_motorista_weekly_data(
     })
     deleted_counts["extras"] = result.deleted_count
     
+    await ledger_semanal.invalidar(db, [(ano, semana)], parceiro_id=parceiro_id)
+    
 
 
 
@@ -2946,6 +2046,8 @@ async def aplicar_totais_empresa(
                 upsert=True
             )
         
+        await ledger_semanal.invalidar(db, [(ano, semana)], [motorista_id])
+        
         resultados.append({
             "motorista_id": motorista_id,
             "motorista_nome": motorista.get("name"),
@@ -3179,6 +2281,8 @@ async def delete_all_weekly_data(
     })
     deleted_counts["ajustes"] = result.deleted_count
     
+    await ledger_semanal.invalidar(db, [(ano, semana)], motorista_ids)
+    
     total_deleted = sum(deleted_counts.values())
     logger.info(f"🗑️ Todos os dados eliminados para S{semana}/{ano}: {total_deleted} registos")
     
@@ -3189,28 +2293,8 @@ async def delete_all_weekly_data(
     }
 
 
-@router.get("/parceiro/resumo-semanal/pdf")
-async def generate_resumo_semanal_pdf(
-    semana: int,
-    ano: int,
-    current_user: Dict = Depends(get_current_user)
-):
-    """
-    Gerar PDF do resumo semanal do parceiro.
-    """
-    if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import mm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.enums import TA_CENTER, TA_RIGHT
-    except ImportError:
-        raise HTTPException(status_code=500, detail="ReportLab not installed")
-    
+async def _dados_resumo_semanal_pdf(current_user: Dict, semana: int, ano: int) -> Dict[str, Any]:
+    """Argumentos de construir_pdf_resumo_semanal: linhas por motorista, totais e listas da semana"""
     # Calcular datas da semana
     first_day_of_year = datetime(ano, 1, 1)
     if first_day_of_year.weekday() <= 3:
@@ -3224,19 +2308,6 @@ async def generate_resumo_semanal_pdf(
     data_inicio = week_start.strftime("%Y-%m-%d")
     data_fim = week_end.strftime("%Y-%m-%d")
     
-    # Obter motoristas do parceiro
-    motoristas_query = {}
-    if current_user["role"] == UserRole.PARCEIRO:
-        motoristas_query["$or"] = [
-            {"parceiro_id": current_user["id"]},
-            {"parceiro_atribuido": current_user["id"]}
-        ]
-    
-    motoristas = await db.motoristas.find(
-        motoristas_query, 
-        {"_id": 0, "id": 1, "name": 1, "veiculo_atribuido": 1, "valor_aluguer_semanal": 1}
-    ).to_list(1000)
-    
     # Calcular dados por motorista (simplificado)
     motoristas_data = []
     todos_abastecimentos = []  # Lista de todos os abastecimentos da semana
@@ -3248,6 +2319,9 @@ async def generate_resumo_semanal_pdf(
     
     parceiro_id = current_user["id"] if current_user["role"] == UserRole.PARCEIRO else None
     
+    # Mesmos motoristas do resumo no ecrã
+    motoristas = await _motoristas_resumo_semana(parceiro_id, semana, ano, data_inicio, data_fim)
+    
     # ============ BUSCAR DADOS DO PARCEIRO E CONFIGURAÇÃO DO RELATÓRIO ============
     parceiro_dados = None
     config_relatorio = None
@@ -3347,152 +2421,54 @@ async def generate_resumo_semanal_pdf(
                         "valor": valor
                     })
     
+    # ============ VALORES POR MOTORISTA (ledger semanal + ajustes, como no ecrã) ============
+    ledgers = await ledger_semanal.obter(db, motoristas, semana, ano)
+    ajustes = {
+        a["motorista_id"]: a
+        for a in await db.ajustes_semanais.find(
+            {"motorista_id": {"$in": [m["id"] for m in motoristas]}, "semana": semana, "ano": ano},
+            {"_id": 0}
+        ).to_list(None)
+    }
+    
+    # Lista de abastecimentos dos motoristas sem ajuste manual (os totais vêm do ledger)
+    abastecimentos_motorista: Dict[str, List[Dict]] = {}
+    sem_ajuste = [m["id"] for m in motoristas if m["id"] not in ajustes]
+    if sem_ajuste:
+        async for r in db.abastecimentos_combustivel.find(
+            {"motorista_id": {"$in": sem_ajuste}, "data": {"$gte": data_inicio, "$lte": data_fim}},
+            {"_id": 0, "motorista_id": 1, "valor_total": 1, "valor": 1, "valor_liquido": 1, "data": 1, "hora": 1, "posto": 1}
+        ):
+            abastecimentos_motorista.setdefault(r["motorista_id"], []).append(r)
+    
+    matriculas_processadas_viaverde = set()
     for m in motoristas:
-        motorista_id = m["id"]
         motorista_nome = m.get("name", "")
-        veiculo_id = m.get("veiculo_atribuido")
-        
-        # Buscar veículo para obter matrícula e outros dados
-        veiculo = None
-        matricula_veiculo = None
-        if veiculo_id:
-            veiculo = await db.vehicles.find_one({"id": veiculo_id}, {"_id": 0})
-            if veiculo:
-                matricula_veiculo = veiculo.get("matricula", "").upper().strip()
-        
-        # ============ VERIFICAR AJUSTE MANUAL ============
-        # Se existir um ajuste manual para este motorista/semana, usar esses valores
-        ajuste_manual = await db.ajustes_semanais.find_one({
-            "motorista_id": motorista_id,
-            "semana": semana,
-            "ano": ano
-        }, {"_id": 0})
-        
+        ajuste_manual = ajustes.get(m["id"])
         if ajuste_manual:
-            # Usar valores do ajuste manual
-            ganhos_uber = float(ajuste_manual.get("ganhos_uber") or 0)
-            uber_portagens = float(ajuste_manual.get("uber_portagens") or 0)
-            uber_gratificacoes = float(ajuste_manual.get("uber_gratificacoes") or 0)
-            ganhos_bolt = float(ajuste_manual.get("ganhos_bolt") or 0)
-            via_verde = float(ajuste_manual.get("via_verde") or 0)
-            combustivel = float(ajuste_manual.get("combustivel") or 0)
-            eletrico = float(ajuste_manual.get("eletrico") or 0)
-            aluguer = float(ajuste_manual.get("aluguer") or 0)
-            extras = float(ajuste_manual.get("extras") or 0)
-            
             logger.info(f"📝 PDF: Usando ajuste manual para {motorista_nome} - S{semana}/{ano}")
-        else:
-            # ============ BUSCAR DADOS AUTOMATICAMENTE ============
-            # Ganhos Uber
-            uber_records = await db.ganhos_uber.find({
-                "motorista_id": motorista_id,
-                "$or": [
-                    {"semana": semana, "ano": ano},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]
-            }, {"_id": 0, "rendimentos": 1, "pago_total": 1, "portagens": 1, "gratificacao": 1, "uber_portagens": 1, "uber_gratificacoes": 1}).to_list(100)
-            
-            ganhos_uber = 0.0
-            uber_portagens = 0.0
-            uber_gratificacoes = 0.0
-            for r in uber_records:
-                valor_base = float(r.get("rendimentos") or r.get("pago_total") or 0)
-                port = float(r.get("portagens") or r.get("uber_portagens") or 0)
-                grat = float(r.get("gratificacao") or r.get("uber_gratificacoes") or 0)
-                # Ganhos Uber = valor base menos portagens e gratificações
-                ganhos_uber += valor_base - port - grat
-                uber_portagens += port
-                uber_gratificacoes += grat
-            
-            # Ganhos Bolt
-            bolt_records = await db.ganhos_bolt.find({
-                "motorista_id": motorista_id,
-                "$or": [
-                    {"periodo_semana": semana, "periodo_ano": ano},
-                    {"semana": semana, "ano": ano}
-                ]
-            }, {"_id": 0, "ganhos_liquidos": 1}).to_list(100)
-            ganhos_bolt = sum(float(r.get("ganhos_liquidos") or 0) for r in bolt_records)
-            
-            # Via Verde - buscar pela matrícula do veículo do motorista
-            via_verde = 0.0
-            if matricula_veiculo:
-                matricula_normalizada = matricula_veiculo.replace("-", "").replace(" ", "")
-                vv_query = {
-                    "$or": [
-                        {"matricula": matricula_veiculo},
-                        {"matricula": matricula_normalizada}
-                    ],
-                    "$and": [
-                        {"$or": [
-                            {"semana": semana, "ano": ano},
-                            {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}},
-                            {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                        ]}
-                    ]
-                }
-                vv_records = await db.portagens_viaverde.find(vv_query, {"_id": 0}).to_list(100)
-                for r in vv_records:
-                    market_desc = str(r.get("market_description", "")).strip().lower()
-                    if not market_desc or market_desc in ["portagens", "parques"] or "mensalidade" in market_desc or "mobilidade" in market_desc:
-                        via_verde += float(r.get("valor") or r.get("value") or 0)
-            
-            # Combustível - buscar também detalhes para a lista
-            comb_records = await db.abastecimentos_combustivel.find({
-                "motorista_id": motorista_id,
-                "data": {"$gte": data_inicio, "$lte": data_fim}
-            }, {"_id": 0, "valor_total": 1, "valor": 1, "valor_liquido": 1, "data": 1, "hora": 1, "posto": 1}).to_list(100)
-            combustivel = sum(float(r.get("valor_total") or r.get("valor") or r.get("valor_liquido") or 0) for r in comb_records)
-            
-            # Adicionar abastecimentos à lista global
-            for r in comb_records:
-                todos_abastecimentos.append({
-                    "motorista": motorista_nome,
-                    "data": r.get("data", ""),
-                    "hora": r.get("hora", ""),
-                    "posto": r.get("posto", "N/A"),
-                    "valor": float(r.get("valor_total") or r.get("valor") or r.get("valor_liquido") or 0)
-                })
-            
-            # Nota: Combustível (Prio) é buscado fora do loop de motoristas porque é por parceiro
-            
-            # Elétrico
-            elet_records = await db.despesas_combustivel.find({
-                "motorista_id": motorista_id,
-                "$or": [
-                    {"semana": semana, "ano": ano},
-                    {"data": {"$gte": data_inicio, "$lte": data_fim}}
-                ]
-            }, {"_id": 0, "valor_total": 1}).to_list(100)
-            eletrico = sum(float(r.get("valor_total") or 0) for r in elet_records)
-            
-            # Aluguer - buscar do veículo se não estiver definido no motorista
-            aluguer = float(m.get("valor_aluguer_semanal") or 0)
-            if aluguer == 0 and veiculo_id:
-                if veiculo:
-                    aluguer = calcular_aluguer_semanal(veiculo, semana, ano)
-            
-            # Extras
-            extras_records = await db.despesas_extras.find({
-                "motorista_id": motorista_id,
-                "$or": [
-                    {"semana": semana, "ano": ano},
-                    {"semana": None}
-                ]
-            }, {"_id": 0, "valor": 1, "tipo": 1, "status": 1}).to_list(100)
-            extras = 0.0
-            for r in extras_records:
-                # Só somar extras não pagos ou pendentes
-                if r.get("status", "pendente") != "cancelado":
-                    valor_extra = float(r.get("valor") or 0)
-                    # Se for crédito, subtrair; se for débito, somar
-                    if r.get("tipo") == "credito":
-                        extras -= valor_extra
-                    else:
-                        extras += valor_extra
+        valores = _valores_resumo_motorista(m, ledgers[m["id"]], ajuste_manual, matriculas_processadas_viaverde)
+        
+        for r in abastecimentos_motorista.get(m["id"], []):
+            todos_abastecimentos.append({
+                "motorista": motorista_nome,
+                "data": r.get("data", ""),
+                "hora": r.get("hora", ""),
+                "posto": r.get("posto", "N/A"),
+                "valor": float(r.get("valor_total") or r.get("valor") or r.get("valor_liquido") or 0)
+            })
         
-        # Líquido = (Uber + uPort + uGrat + Bolt) - (Via Verde + Comb. + Elétr. + Aluguer + Extras)
-        liquido = ganhos_uber + uber_portagens + uber_gratificacoes + ganhos_bolt - via_verde - combustivel - eletrico - aluguer - extras
+        ganhos_uber = valores["ganhos_uber"]
+        uber_portagens = valores["uber_portagens"]
+        uber_gratificacoes = valores["uber_gratificacoes"]
+        # Campanha Bolt (só por ajuste manual) entra na coluna Bolt
+        ganhos_bolt = valores["ganhos_bolt"] + valores["ganhos_campanha_bolt"]
+        via_verde = valores["via_verde_a_descontar"]
+        combustivel = valores["combustivel"]
+        eletrico = valores["eletrico"]
+        aluguer = valores["receita_aluguer"]
+        extras = valores["extras"]
+        liquido = valores["valor_liquido_motorista"]
         
         # Lucro do Parceiro para este motorista
         # Regra: Se saldo do motorista (liquido) >= 0, lucro = aluguer + extras
@@ -3500,7 +2476,7 @@ async def generate_resumo_semanal_pdf(
         lucro_parc_mot = (aluguer + extras) if liquido >= 0 else (aluguer + extras + liquido)
         
         motoristas_data.append({
-            "nome": m.get("name", ""),
+            "nome": motorista_nome,
             "uber": ganhos_uber,
             "uber_portagens": uber_portagens,
             "uber_gratificacoes": uber_gratificacoes,
@@ -3518,296 +2494,46 @@ async def generate_resumo_semanal_pdf(
         totais["uber_portagens"] = totais.get("uber_portagens", 0) + uber_portagens
         totais["uber_gratificacoes"] = totais.get("uber_gratificacoes", 0) + uber_gratificacoes
         totais["ganhos_bolt"] += ganhos_bolt
-        totais["via_verde"] += via_verde  # Somar via verde por motorista
-        totais["combustivel"] += combustivel  # Somar combustível por motorista
+        totais["via_verde"] += via_verde
+        totais["combustivel"] += combustivel
         totais["eletrico"] += eletrico
         totais["aluguer"] += aluguer
         totais["extras"] += extras
+        totais["liquido"] = totais.get("liquido", 0) + liquido
         totais["lucro_parceiro"] = totais.get("lucro_parceiro", 0) + lucro_parc_mot
+    totais.setdefault("liquido", 0)
     
-    totais["liquido"] = (
-        totais["ganhos_uber"] + totais.get("uber_portagens", 0) + totais.get("uber_gratificacoes", 0) + totais["ganhos_bolt"] - 
-        totais["via_verde"] - totais["combustivel"] - totais["eletrico"] - totais["aluguer"] - totais["extras"]
-    )
-    
-    # Gerar PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm, topMargin=15*mm, bottomMargin=15*mm)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16, alignment=TA_CENTER)
-    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, textColor=colors.grey)
-    info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=9, alignment=TA_CENTER, textColor=colors.HexColor('#333333'))
-    
-    elements = []
-    
-    # Título
-    elements.append(Paragraph(f"Resumo Semanal do Parceiro", title_style))
-    elements.append(Paragraph(f"Semana {semana}/{ano} ({week_start.strftime('%d/%m/%Y')} a {week_end.strftime('%d/%m/%Y')})", subtitle_style))
-    
-    # ============ CABEÇALHO COM DADOS DO PARCEIRO ============
-    header_lines = []
-    
-    # Nome do Parceiro
-    if config_relatorio and config_relatorio.get("incluir_nome_parceiro", True):
-        if parceiro_dados and parceiro_dados.get("name"):
-            header_lines.append(f"<b>Parceiro:</b> {parceiro_dados['name']}")
-    
-    # NIF do Parceiro
-    if config_relatorio and config_relatorio.get("incluir_nif_parceiro", False):
-        if parceiro_dados and parceiro_dados.get("nif"):
-            header_lines.append(f"<b>NIF:</b> {parceiro_dados['nif']}")
-    
-    # Número do Relatório
-    if config_relatorio and config_relatorio.get("incluir_numero_relatorio", False):
-        formato = config_relatorio.get("formato_numero_relatorio", "xxxxx/ano")
-        # Gerar número sequencial simples baseado na semana/ano
-        numero_seq = str(semana).zfill(5)
-        numero_relatorio = formato.replace("xxxxx", numero_seq).replace("ano", str(ano))
-        header_lines.append(f"<b>Nº Relatório:</b> {numero_relatorio}")
-    
-    # Data de emissão
-    if config_relatorio and config_relatorio.get("incluir_data_emissao", True):
-        header_lines.append(f"<b>Data de Emissão:</b> {datetime.now().strftime('%d/%m/%Y')}")
-    
-    if header_lines:
-        elements.append(Spacer(1, 5*mm))
-        elements.append(Paragraph(" | ".join(header_lines), info_style))
-    
-    elements.append(Spacer(1, 10*mm))
-    
-    # Tabela de motoristas
-    table_data = [
-        ["Motorista", "Uber", "uPort", "uGrat", "Bolt", "V.Verde", "Comb.", "Elétr.", "Alug.", "Extras", "Líquido", "L.Parc."]
-    ]
-    
-    for m in sorted(motoristas_data, key=lambda x: x["nome"]):
-        table_data.append([
-            m["nome"][:18],
-            f"€{m['uber']:.2f}",
-            f"€{m.get('uber_portagens', 0):.2f}",
-            f"€{m.get('uber_gratificacoes', 0):.2f}",
-            f"€{m['bolt']:.2f}",
-            f"€{m['via_verde']:.2f}",
-            f"€{m['combustivel']:.2f}",
-            f"€{m['eletrico']:.2f}",
-            f"€{m['aluguer']:.2f}",
-            f"€{m['extras']:.2f}",
-            f"€{m['liquido']:.2f}",
-            f"€{m.get('lucro_parceiro', 0):.2f}"
-        ])
-    
-    # Linha de totais
-    table_data.append([
-        "TOTAIS",
-        f"€{totais['ganhos_uber']:.2f}",
-        f"€{totais.get('uber_portagens', 0):.2f}",
-        f"€{totais.get('uber_gratificacoes', 0):.2f}",
-        f"€{totais['ganhos_bolt']:.2f}",
-        f"€{totais['via_verde']:.2f}",
-        f"€{totais['combustivel']:.2f}",
-        f"€{totais['eletrico']:.2f}",
-        f"€{totais['aluguer']:.2f}",
-        f"€{totais['extras']:.2f}",
-        f"€{totais['liquido']:.2f}",
-        f"€{totais.get('lucro_parceiro', 0):.2f}"
-    ])
-    
-    col_widths = [32*mm, 12*mm, 11*mm, 11*mm, 12*mm, 13*mm, 12*mm, 12*mm, 12*mm, 12*mm, 15*mm, 15*mm]
-    table = Table(table_data, colWidths=col_widths)
-    
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a5f')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e8f4fc')),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 1), (-1, -1), 7),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f9f9f9')]),
-    ]))
-    
-    elements.append(table)
-    elements.append(Spacer(1, 10*mm))
-    
-    # Resumo - usando a nova lógica de lucro do parceiro
-    lucro_parceiro_total = totais.get("lucro_parceiro", 0)
-    
-    summary_data = [
-        ["Receitas do Parceiro", ""],
-        ["  Alugueres", f"€{totais['aluguer']:.2f}"],
-        ["  Extras", f"€{totais['extras']:.2f}"],
-        ["Despesas Operacionais", ""],
-        ["  Via Verde", f"€{totais['via_verde']:.2f}"],
-        ["  Combustível", f"€{totais['combustivel']:.2f}"],
-        ["  Elétrico", f"€{totais['eletrico']:.2f}"],
-        ["", ""],
-        ["LUCRO TOTAL DO PARCEIRO", f"€{lucro_parceiro_total:.2f}"],
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[80*mm, 40*mm])
-    summary_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 3), (0, 3), 'Helvetica-Bold'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9d8fd') if lucro_parceiro_total >= 0 else colors.HexColor('#f8d7da')),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#6b21a8')),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
-    
-    elements.append(summary_table)
-    
-    # ============ LISTA DE ABASTECIMENTOS ============
-    if todos_abastecimentos:
-        elements.append(Spacer(1, 10*mm))
-        
-        section_style = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=12, textColor=colors.HexColor('#1e3a5f'))
-        elements.append(Paragraph("Detalhes dos Abastecimentos", section_style))
-        elements.append(Spacer(1, 3*mm))
-        
-        # Ordenar por data
-        todos_abastecimentos_sorted = sorted(todos_abastecimentos, key=lambda x: (x.get("data", ""), x.get("hora", "")))
-        
-        # Criar tabela de abastecimentos
-        abast_table_data = [
-            ["Motorista", "Data", "Hora", "Posto", "Valor"]
-        ]
-        
-        for ab in todos_abastecimentos_sorted:
-            # Formatar data
-            data_str = ab.get("data", "")
-            if data_str:
-                try:
-                    if "T" in data_str:
-                        data_str = data_str.split("T")[0]
-                    data_obj = datetime.strptime(data_str, "%Y-%m-%d")
-                    data_str = data_obj.strftime("%d/%m/%Y")
-                except:
-                    pass
-            
-            abast_table_data.append([
-                ab.get("motorista", "")[:18],
-                data_str,
-                ab.get("hora", "")[:5] if ab.get("hora") else "",
-                ab.get("posto", "")[:15],
-                f"€{ab.get('valor', 0):.2f}"
-            ])
-        
-        # Linha de total
-        total_abastecimentos = sum(ab.get("valor", 0) for ab in todos_abastecimentos)
-        abast_table_data.append([
-            "TOTAL",
-            "",
-            "",
-            f"{len(todos_abastecimentos)} abastecimentos",
-            f"€{total_abastecimentos:.2f}"
-        ])
-        
-        abast_col_widths = [40*mm, 22*mm, 15*mm, 35*mm, 20*mm]
-        abast_table = Table(abast_table_data, colWidths=abast_col_widths)
-        
-        abast_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f97316')),  # Laranja para combustível
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#fed7aa')),  # Laranja claro para total
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('ALIGN', (1, 1), (2, -1), 'CENTER'),
-            ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#fff7ed')]),
-        ]))
-        
-        elements.append(abast_table)
-    
-    # ============ LISTA DE PORTAGENS VIA VERDE ============
-    if todas_portagens:
-        elements.append(Spacer(1, 10*mm))
-        
-        section_style = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=12, textColor=colors.HexColor('#1e3a5f'))
-        elements.append(Paragraph("Detalhes das Portagens Via Verde", section_style))
-        elements.append(Spacer(1, 3*mm))
-        
-        # Ordenar por data
-        todas_portagens_sorted = sorted(todas_portagens, key=lambda x: (x.get("data", ""), x.get("hora", "")))
-        
-        # Criar tabela de portagens
-        portagens_table_data = [
-            ["Motorista", "Data", "Hora", "Local", "Valor"]
-        ]
-        
-        for pg in todas_portagens_sorted:
-            # Formatar data
-            data_str = pg.get("data", "")
-            if data_str:
-                try:
-                    if "T" in data_str:
-                        data_str = data_str.split("T")[0]
-                    data_obj = datetime.strptime(data_str, "%Y-%m-%d")
-                    data_str = data_obj.strftime("%d/%m/%Y")
-                except:
-                    pass
-            
-            portagens_table_data.append([
-                pg.get("motorista", "")[:18],
-                data_str,
-                pg.get("hora", "")[:5] if pg.get("hora") else "",
-                pg.get("local", "")[:25],
-                f"€{pg.get('valor', 0):.2f}"
-            ])
-        
-        # Linha de total
-        total_portagens_valor = sum(pg.get("valor", 0) for pg in todas_portagens)
-        portagens_table_data.append([
-            "TOTAL",
-            "",
-            "",
-            f"{len(todas_portagens)} portagens",
-            f"€{total_portagens_valor:.2f}"
-        ])
-        
-        portagens_col_widths = [40*mm, 22*mm, 15*mm, 40*mm, 18*mm]
-        portagens_table = Table(portagens_table_data, colWidths=portagens_col_widths)
-        
-        portagens_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#22c55e')),  # Verde para Via Verde
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#bbf7d0')),  # Verde claro para total
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('ALIGN', (1, 1), (2, -1), 'CENTER'),
-            ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f0fdf4')]),
-        ]))
-        
-        elements.append(portagens_table)
+    return {
+        "semana": semana,
+        "ano": ano,
+        "week_start": week_start,
+        "week_end": week_end,
+        "motoristas_data": motoristas_data,
+        "totais": totais,
+        "todos_abastecimentos": todos_abastecimentos,
+        "todas_portagens": todas_portagens,
+        "parceiro_dados": parceiro_dados,
+        "config_relatorio": config_relatorio,
+    }
+
+
+@router.get("/parceiro/resumo-semanal/pdf")
+async def generate_resumo_semanal_pdf(
+    semana: int,
+    ano: int,
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Gerar PDF do resumo semanal do parceiro.
+    """
+    if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
+        raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Rodapé
-    elements.append(Spacer(1, 15*mm))
-    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
-    elements.append(Paragraph(f"Gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} - TVDEFleet", footer_style))
+    dados = await _dados_resumo_semanal_pdf(current_user, semana, ano)
     
-    doc.build(elements)
-    buffer.seek(0)
+    # Gerar PDF no pool de processos
+    pdf_bytes = await executor_service.executar_cpu(construir_pdf_resumo_semanal, **dados)
+    buffer = BytesIO(pdf_bytes)
     
     return StreamingResponse(
         buffer,
@@ -4448,11 +3174,36 @@ async def delete_relatorio(
 
 # ==================== LISTAS DE RELATÓRIOS ====================
 
+def _filtros_relatorios(
+    current_user: Dict,
+    status: Optional[str],
+    semana: Optional[int],
+    ano: Optional[int],
+    motorista_id: Optional[str]
+) -> Dict[str, Any]:
+    """Filtros opcionais das listas de relatórios semanais"""
+    filtros = {}
+    if status:
+        filtros["status"] = status
+    if semana is not None:
+        filtros["semana"] = semana
+    if ano is not None:
+        filtros["ano"] = ano
+    if motorista_id and current_user["role"] != UserRole.MOTORISTA:
+        filtros["motorista_id"] = motorista_id
+    return filtros
+
+
 @router.get("/semanais-todos")
 async def get_all_relatorios_semanais(
+    status: Optional[str] = None,
+    semana: Optional[int] = None,
+    ano: Optional[int] = None,
+    motorista_id: Optional[str] = None,
+    paginacao: Paginacao = Depends(),
     current_user: Dict = Depends(get_current_user)
 ):
-    """Get all weekly reports (filtered by role)"""
+    """Get all weekly reports (filtered by role); paginated with `limit`/`cursor`"""
     query = {}
     
     if current_user["role"] == UserRole.MOTORISTA:
@@ -4460,11 +3211,16 @@ async def get_all_relatorios_semanais(
     elif current_user["role"] == UserRole.PARCEIRO:
         query["parceiro_id"] = current_user["id"]
     # Admin and Gestao can see all
+    query.update(_filtros_relatorios(current_user, status, semana, ano, motorista_id))
+    
+    if paginacao.ativa:
+        pagina = await paginar(db.relatorios_semanais, query, paginacao, ("created_at", -1))
+        return paginacao.resposta(pagina)
     
     relatorios = await db.relatorios_semanais.find(
         query,
         {"_id": 0}
-    ).sort("created_at", -1).to_list(500)
+    ).sort("created_at", -1).to_list(None)
     
     return relatorios
 
@@ -4513,20 +3269,29 @@ async def get_relatorios_para_pagar(
 
 @router.get("/historico")
 async def get_relatorios_historico(
+    semana: Optional[int] = None,
+    ano: Optional[int] = None,
+    motorista_id: Optional[str] = None,
+    paginacao: Paginacao = Depends(),
     current_user: Dict = Depends(get_current_user)
 ):
-    """Get historical reports"""
+    """Get historical reports; paginated with `limit`/`cursor`"""
     query = {"status": "pago"}
     
     if current_user["role"] == UserRole.MOTORISTA:
         query["motorista_id"] = current_user["id"]
     elif current_user["role"] == UserRole.PARCEIRO:
         query["parceiro_id"] = current_user["id"]
+    query.update(_filtros_relatorios(current_user, None, semana, ano, motorista_id))
+    
+    if paginacao.ativa:
+        pagina = await paginar(db.relatorios_semanais, query, paginacao, ("created_at", -1))
+        return paginacao.resposta(pagina)
     
     relatorios = await db.relatorios_semanais.find(
         query,
         {"_id": 0}
-    ).sort("created_at", -1).to_list(500)
+    ).sort("created_at", -1).to_list(None)
     
     return relatorios
 
@@ -4900,6 +3665,22 @@ async def enviar_relatorio_para_motorista(
     """
     Envia relatório semanal para um motorista específico via Email e/ou WhatsApp.
     """
+    return await _enviar_relatorio(motorista_id, semana, ano, enviar_email, enviar_whatsapp, current_user)
+
+
+async def _enviar_relatorio(
+    motorista_id: str,
+    semana: int,
+    ano: int,
+    enviar_email: bool,
+    enviar_whatsapp: bool,
+    current_user: Dict,
+    lote: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Construir e enviar o relatório semanal de um motorista. Com `lote`, o
+    email é acrescentado à lista em vez de enviado (envio em massa).
+    """
     if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
@@ -5034,7 +3815,8 @@ async def enviar_relatorio_para_motorista(
         enviar_email, 
         enviar_whatsapp,
         db=db,
-        parceiro_id=parceiro_id_para_email
+        parceiro_id=parceiro_id_para_email,
+        lote=lote
     )
     
     return result
@@ -5145,15 +3927,42 @@ async def enviar_relatorios_em_massa(
     if current_user["role"] not in [UserRole.ADMIN, UserRole.GESTAO, UserRole.PARCEIRO]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Buscar motoristas
+    tarefa = await fila_tarefas.enfileirar(
+        db,
+        "relatorios.enviar_motoristas",
+        {
+            "semana": semana,
+            "ano": ano,
+            "enviar_email": enviar_email,
+            "enviar_whatsapp": enviar_whatsapp,
+            # Parceiro: só os seus motoristas; admin/gestão: todos
+            "parceiro_id": current_user["id"] if current_user["role"] == UserRole.PARCEIRO else None,
+            "utilizador": {"id": current_user["id"], "role": current_user["role"]},
+        },
+        criado_por=current_user["id"],
+        descricao=f"Envio de relatórios S{semana}/{ano}",
+        # Sem repetição da tarefa: uma falha no fim reenviaria todos os relatórios
+        # (os emails falhados são repetidos um a um em services/envio_email.py)
+        max_tentativas=1,
+    )
+    return {"job_id": tarefa["id"], "estado": tarefa["estado"], "mensagem": "Envio de relatórios iniciado"}
+
+
+@fila_tarefas.registar("relatorios.enviar_motoristas")
+async def tarefa_enviar_relatorios_em_massa(db, tarefa: fila_tarefas.Tarefa) -> Dict[str, Any]:
+    """Handler da fila para POST /relatorios/enviar-relatorios-em-massa"""
+    p = tarefa.payload
+    semana, ano = p["semana"], p["ano"]
+    enviar_email, enviar_whatsapp = p["enviar_email"], p["enviar_whatsapp"]
+    current_user = p["utilizador"]
+    
     motoristas_query = {}
-    if current_user["role"] == UserRole.PARCEIRO:
+    if p.get("parceiro_id"):
         motoristas_query["$or"] = [
-            {"parceiro_id": current_user["id"]},
-            {"parceiro_atribuido": current_user["id"]}
+            {"parceiro_id": p["parceiro_id"]},
+            {"parceiro_atribuido": p["parceiro_id"]}
         ]
-    
-    motoristas = await db.motoristas.find(motoristas_query, {"_id": 0, "id": 1, "name": 1, "email": 1}).to_list(1000)
+    motoristas = await db.motoristas.find(motoristas_query, {"_id": 0, "id": 1, "name": 1, "email": 1}).to_list(None)
     
     results = {
         "total_motoristas": len(motoristas),
@@ -5163,16 +3972,20 @@ async def enviar_relatorios_em_massa(
         "detalhes": []
     }
     
-    for motorista in motoristas:
+    # Os emails são recolhidos e enviados no fim num lote (uma sessão SMTP por servidor)
+    lote: List[Dict[str, Any]] = []
+    detalhe_por_email: Dict[int, Dict[str, Any]] = {}
+    
+    for i, motorista in enumerate(motoristas, start=1):
+        await tarefa.progresso(i - 1, len(motoristas), mensagem=f"A preparar relatório de {motorista.get('name')}")
         try:
-            # Chamar endpoint individual
-            # (simplificado - em produção usar background tasks)
-            result = await enviar_relatorio_para_motorista(
-                motorista["id"], semana, ano, enviar_email, enviar_whatsapp, None, current_user
+            n_lote = len(lote)
+            result = await _enviar_relatorio(
+                motorista["id"], semana, ano, enviar_email, enviar_whatsapp, current_user, lote=lote
             )
             
-            if result.get("email", {}).get("enviado"):
-                results["emails_enviados"] += 1
+            if len(lote) > n_lote:
+                detalhe_por_email[n_lote] = result
             if result.get("whatsapp", {}).get("link"):
                 results["whatsapp_links_gerados"] += 1
             
@@ -5186,6 +3999,27 @@ async def enviar_relatorios_em_massa(
                 "erro": str(e)
             })
     
+    if lote:
+        await tarefa.progresso(len(motoristas), len(motoristas), mensagem=f"A enviar {len(lote)} emails")
+        envio = await envio_email.enfileirar(
+            db, lote, criado_por=current_user["id"],
+            descricao=f"Emails de relatórios S{semana}/{ano}", processar_agora=True,
+        )
+        for n, email_id in enumerate(envio["ids"]):
+            estado = envio["estados"].get(email_id)
+            detalhe = detalhe_por_email[n]["email"]
+            detalhe["enviado"] = estado == envio_email.ENVIADO
+            if estado == envio_email.ENVIADO:
+                detalhe["mensagem"] = "Email enviado com sucesso"
+            elif estado == envio_email.PENDENTE:
+                detalhe["mensagem"] = f"{envio['erros'][email_id]} O envio será repetido."
+            else:
+                detalhe["mensagem"] = envio["erros"].get(email_id, "Email não enviado")
+        results["emails_enviados"] = envio["enviados"]
+        results["emails_pendentes"] = envio["pendentes"]
+        results["emails_falhados"] = envio["dead_letter"]
+        results["envio_email_lote"] = envio["lote_id"]
+    
     return results
 
 
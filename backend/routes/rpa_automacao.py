@@ -3,7 +3,7 @@ API Routes para Sistema RPA Completo
 Gestão de credenciais, execução de automações e agendamento
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel, Field
@@ -13,6 +13,7 @@ import asyncio
 import os
 from cryptography.fernet import Fernet
 
+from services import rpa_motor
 from utils.database import get_database
 from utils.auth import get_current_user
 
@@ -617,10 +618,9 @@ async def eliminar_credenciais(
 @router.post("/executar")
 async def executar_automacao(
     dados: ExecucaoCreate,
-    background_tasks: BackgroundTasks,
     current_user: Dict = Depends(get_current_user)
 ):
-    """Iniciar execução de automação RPA"""
+    """Iniciar execução de automação RPA (fica na fila do motor RPA com prioridade máxima)"""
     
     # Verificar plataforma válida
     plataforma = await get_plataforma_by_id(dados.plataforma)
@@ -691,16 +691,9 @@ async def executar_automacao(
     
     await db.rpa_execucoes.insert_one(execucao)
     
-    # Agendar execução em background
-    background_tasks.add_task(
-        _executar_em_background,
-        execucao_id,
-        dados.plataforma,
-        parceiro_id,
-        credencial,
-        dados.tipo_extracao,
-        dados.data_inicio,
-        dados.data_fim
+    # Pôr na fila do motor RPA
+    await rpa_motor.enfileirar_execucao(
+        db, execucao, prioridade=rpa_motor.PRIORIDADE_MANUAL, criado_por=current_user["id"]
     )
     
     logger.info(f"🤖 Execução RPA agendada: {execucao_id} ({dados.plataforma})")
@@ -712,89 +705,6 @@ async def executar_automacao(
     }
 
 
-async def _executar_em_background(
-    execucao_id: str,
-    plataforma: str,
-    parceiro_id: str,
-    credencial: Dict,
-    tipo_extracao: str,
-    data_inicio: str,
-    data_fim: str
-):
-    """Executar automação em background"""
-    try:
-        # Importar executor
-        from services.rpa_executor import executar_automacao
-        
-        # Atualizar status para "em execução"
-        await db.rpa_execucoes.update_one(
-            {"id": execucao_id},
-            {"$set": {
-                "status": "em_execucao",
-                "iniciado_em": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
-        # Desencriptar credenciais
-        credenciais = {
-            "email": decrypt_value(credencial.get("email_encrypted", "")),
-            "password": decrypt_value(credencial.get("password_encrypted", ""))
-        }
-        
-        # Executar automação
-        resultado = await executar_automacao(
-            plataforma=plataforma,
-            parceiro_id=parceiro_id,
-            execucao_id=execucao_id,
-            credenciais=credenciais,
-            tipo_extracao=tipo_extracao,
-            data_inicio=data_inicio,
-            data_fim=data_fim
-        )
-        
-        # Guardar dados extraídos na collection apropriada
-        dados_extraidos = resultado.get("dados_extraidos", [])
-        if dados_extraidos:
-            for dado in dados_extraidos:
-                dado["parceiro_id"] = parceiro_id
-                dado["execucao_id"] = execucao_id
-                dado["created_at"] = datetime.now(timezone.utc).isoformat()
-            
-            collection_name = f"rpa_dados_{plataforma}"
-            await db[collection_name].insert_many(dados_extraidos)
-        
-        # Determinar status final
-        erros = resultado.get("erros", [])
-        status = "sucesso" if not erros else ("sucesso_parcial" if dados_extraidos else "erro")
-        
-        # Atualizar execução com resultado
-        await db.rpa_execucoes.update_one(
-            {"id": execucao_id},
-            {"$set": {
-                "status": status,
-                "logs": resultado.get("logs", []),
-                "screenshots": resultado.get("screenshots", []),
-                "dados_extraidos": dados_extraidos,
-                "erros": erros,
-                "total_registos": len(dados_extraidos),
-                "terminado_em": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
-        logger.info(f"✅ Execução {execucao_id} concluída: {status} ({len(dados_extraidos)} registos)")
-        
-    except Exception as e:
-        logger.error(f"❌ Erro na execução {execucao_id}: {e}")
-        await db.rpa_execucoes.update_one(
-            {"id": execucao_id},
-            {"$set": {
-                "status": "erro",
-                "erros": [str(e)],
-                "terminado_em": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-
-
 @router.get("/execucoes")
 async def listar_execucoes(
     parceiro_id: Optional[str] = None,
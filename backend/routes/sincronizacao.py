@@ -10,6 +10,8 @@ import asyncio
 from models.user import UserRole
 from utils.auth import get_current_user
 from utils.database import get_database
+from utils import cache_config
+from services import dashboard_stats, ledger_semanal
 
 router = APIRouter()
 db = get_database()
@@ -89,6 +91,7 @@ async def auto_criar_veiculos_viaverde(
         }
         
         await db.vehicles.insert_one(novo_veiculo)
+        await dashboard_stats.registar_vehicle(db, novo_veiculo)
         matricula_to_vehicle[mat] = vehicle_id
         veiculos_criados += 1
         
@@ -642,6 +645,7 @@ async def set_config_sincronizacao_auto(
             {"$set": config},
             upsert=True
         )
+        await cache_config.invalidar(db, cache_config.CONFIGURACOES)
         
         return {"success": True, "message": "Configuração atualizada"}
         
@@ -1434,6 +1438,8 @@ async def sincronizar_uber_csv(
                     logger.warning(f"Erro ao importar motorista {mot.get('nome')}: {e}")
                     continue
             
+            await ledger_semanal.invalidar(db, [(ano_calc, semana_calc)], parceiro_id=pid)
+            
             # Atualizar execução com sucesso
             await db.execucoes_rpa_uber.update_one(
                 {"id": execucao_id},
@@ -1690,6 +1696,7 @@ async def executar_rpa_prio(
                 logger.info(f"📊 Transações convertidas: {len(transacoes)}")
                 total_importados = 0
                 total_valor = 0.0
+                despesas_importadas = []
                 
                 for trans in transacoes:
                     try:
@@ -1797,12 +1804,15 @@ async def executar_rpa_prio(
                             }
                             
                             await db.despesas_combustivel.insert_one(despesa)
+                            despesas_importadas.append(despesa)
                             total_importados += 1
                             total_valor += valor
                     
                     except Exception as e:
                         logger.warning(f"⚠️ Erro ao processar transação Prio: {e}")
                 
+                await ledger_semanal.invalidar_registos(db, despesas_importadas, parceiro_id=pid)
+                
                 # Actualizar execução como concluída
                 await db.execucoes_rpa.update_one(
                     {"id": execucao_id},
@@ -2044,6 +2054,7 @@ async def executar_rpa_viaverde(
                     importados = 0
                     duplicados = 0
                     veiculos_associados = 0
+                    movimentos_importados = []
                     
                     for mov in movimentos:
                         mat = mov.get("matricula", "").upper().strip().replace(" ", "").replace("-", "")
@@ -2066,12 +2077,15 @@ async def executar_rpa_viaverde(
                             mov["execucao_id"] = execucao_id
                             mov["fonte"] = "rpa"
                             await db.portagens_viaverde.insert_one(mov)
+                            movimentos_importados.append(mov)
                             importados += 1
                             if vehicle_id:
                                 veiculos_associados += 1
                         else:
                             duplicados += 1
                     
+                    await ledger_semanal.invalidar_registos(db, movimentos_importados, parceiro_id=pid)
+                    
                     importacao_resultado = {
                         "importados": importados,
                         "duplicados": duplicados,
@@ -2273,6 +2287,7 @@ async def importar_excel_viaverde(
         importados = 0
         duplicados = 0
         veiculos_associados = 0
+        portagens_importadas = []
         
         for mov in movimentos:
             # Associar veículo pela matrícula
@@ -2329,10 +2344,13 @@ async def importar_excel_viaverde(
             }
             
             await db.portagens_viaverde.insert_one(portagem)
+            portagens_importadas.append(portagem)
             importados += 1
             if vehicle_id:
                 veiculos_associados += 1
         
+        await ledger_semanal.invalidar_registos(db, portagens_importadas, parceiro_id=pid)
+        
         # Atualizar execução com resultado
         resultado = {
             "importados": importados,
@@ -3121,6 +3139,7 @@ async def executar_sincronizacao_auto(
                                                     "criado_em": datetime.now(timezone.utc).isoformat()
                                                 }
                                                 await db.motoristas.insert_one(motorista_db)
+                                                await dashboard_stats.registar_motorista(db, motorista_db)
                                                 logger.info(f"📝 Motorista criado automaticamente: {nome_motorista}")
                                             
                                             motorista_id = motorista_db.get("id", str(uuid.uuid4()))
@@ -3588,6 +3607,9 @@ async def executar_sincronizacao_auto(
             erros.append(f"{fonte}: {str(e)}")
             resultados[fonte] = {"sucesso": False, "erro": str(e)}
     
+    # As fontes gravam registos de várias semanas: invalidar o ledger do parceiro
+    await ledger_semanal.invalidar(db, None, parceiro_id=pid)
+    
     # Determinar status final
     sucessos = sum(1 for r in resultados.values() if r.get("sucesso"))
     if sucessos == len(fontes):
@@ -3789,6 +3811,7 @@ async def atualizar_ajuste_bonus_bolt(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    await ledger_semanal.invalidar_registos(db, [ganho])
     
     return {
         "sucesso": True,
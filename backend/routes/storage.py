@@ -10,6 +10,7 @@ import os
 from models.user import UserRole
 from utils.auth import get_current_user
 from utils.database import get_database
+from utils import cache_config, user_cache
 
 router = APIRouter()
 db = get_database()
@@ -130,6 +131,7 @@ async def drive_callback(code: str, state: str):
                 }
             }
         )
+        user_cache.invalidar_utilizador(user_id)
         
         logger.info(f"Drive connected for user {user_id}")
         
@@ -322,6 +324,7 @@ async def configure_google_drive(
         },
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     logger.info(f"Google Drive configured by {current_user['id']}")
     return {"message": "Google Drive configurado com sucesso"}
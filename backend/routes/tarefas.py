@@ -0,0 +1,62 @@
+"""Background job queue routes (estado, progresso, cancelamento e repetição)"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Optional
+
+from models.user import UserRole
+from services import fila_tarefas
+from utils.auth import get_current_user
+from utils.database import get_database
+
+router = APIRouter()
+db = get_database()
+
+
+async def _obter_tarefa_autorizada(tarefa_id: str, current_user: Dict) -> Dict:
+    tarefa = await fila_tarefas.obter(db, tarefa_id)
+    if not tarefa:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    if current_user["role"] != UserRole.ADMIN and tarefa.get("criado_por") != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return tarefa
+
+
+@router.get("/tarefas")
+async def listar_tarefas(
+    estado: Optional[str] = None,
+    limit: int = 50,
+    current_user: Dict = Depends(get_current_user)
+):
+    """Listar tarefas do utilizador (admin vê todas)"""
+    criado_por = None if current_user["role"] == UserRole.ADMIN else current_user["id"]
+    return await fila_tarefas.listar(db, criado_por=criado_por, estado=estado, limite=min(limit, 200))
+
+
+@router.get("/tarefas/{tarefa_id}")
+async def obter_tarefa(tarefa_id: str, current_user: Dict = Depends(get_current_user)):
+    """Estado, progresso e resultado de uma tarefa"""
+    tarefa = await _obter_tarefa_autorizada(tarefa_id, current_user)
+    tarefa.pop("payload", None)
+    return tarefa
+
+
+@router.post("/tarefas/{tarefa_id}/cancelar")
+async def cancelar_tarefa(tarefa_id: str, current_user: Dict = Depends(get_current_user)):
+    """Cancelar uma tarefa pendente ou pedir a paragem de uma em execução"""
+    tarefa = await _obter_tarefa_autorizada(tarefa_id, current_user)
+    if tarefa["estado"] in fila_tarefas.ESTADOS_FINAIS:
+        raise HTTPException(status_code=400, detail=f"Tarefa já terminou ({tarefa['estado']})")
+    tarefa = await fila_tarefas.cancelar(db, tarefa_id)
+    tarefa.pop("payload", None)
+    return tarefa
+
+
+@router.post("/tarefas/{tarefa_id}/repetir")
+async def repetir_tarefa(tarefa_id: str, current_user: Dict = Depends(get_current_user)):
+    """Voltar a pôr na fila uma tarefa falhada ou cancelada"""
+    await _obter_tarefa_autorizada(tarefa_id, current_user)
+    tarefa = await fila_tarefas.repetir(db, tarefa_id)
+    if not tarefa:
+        raise HTTPException(status_code=400, detail="Só tarefas falhadas ou canceladas podem ser repetidas")
+    tarefa.pop("payload", None)
+    return tarefa
@@ -0,0 +1,114 @@
+"""
+Canal em tempo real: mensagens novas, contadores de não lidas e notificações.
+
+Substitui o polling do frontend. O cliente liga-se por WebSocket
+(`/api/tempo-real/ws?token=...`) ou, onde não houver WebSocket, por SSE
+(`/api/tempo-real/eventos?token=...`). O token vai na query porque nem o
+WebSocket do browser nem o EventSource enviam cabeçalhos.
+
+Cada evento é `{"tipo", "dados", "em"}`; ao ligar o cliente recebe logo
+os contadores atuais (`conversas.contadores` e `notificacoes.contadores`).
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from services import nao_lidas, tempo_real
+from utils.auth import get_user_from_token
+from utils.database import get_database
+
+router = APIRouter(prefix="/tempo-real", tags=["tempo-real"])
+db = get_database()
+
+
+async def _estado_inicial(user_id: str) -> List[Dict[str, Any]]:
+    return [
+        {"tipo": nao_lidas.CONVERSAS_CONTADORES, "dados": await nao_lidas.resumo_conversas(db, user_id)},
+        {"tipo": nao_lidas.NOTIFICACOES_CONTADORES, "dados": {"nao_lidas": await nao_lidas.notificacoes_nao_lidas(db, user_id)}},
+    ]
+
+
+def _json(evento: Dict[str, Any]) -> str:
+    return json.dumps(evento, default=str)
+
+
+async def _aguardar_fecho(websocket: WebSocket):
+    """Consumir o que o cliente envia até este fechar a ligação"""
+    while True:
+        mensagem = await websocket.receive()
+        if mensagem["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/ws")
+async def websocket_eventos(websocket: WebSocket, token: str = Query(...)):
+    """Eventos do utilizador autenticado por WebSocket"""
+    # Aceitar antes de fechar: um close antes do accept é uma rejeição HTTP 403
+    # e o browser só vê 1006, sem o 4401 que faz o cliente parar de religar
+    await websocket.accept()
+    try:
+        user = await get_user_from_token(token, db)
+    except HTTPException as e:
+        await websocket.close(code=4401, reason=str(e.detail))
+        return
+
+    # Registar antes do estado inicial para não perder eventos entretanto publicados
+    fila = tempo_real.ligar(user["id"])
+    leitor = asyncio.create_task(_aguardar_fecho(websocket))
+    proximo = None
+    try:
+        for evento in await _estado_inicial(user["id"]):
+            await websocket.send_text(_json(evento))
+
+        while not leitor.done():
+            proximo = asyncio.ensure_future(fila.get())
+            await asyncio.wait({proximo, leitor}, timeout=tempo_real.TEMPO_REAL_PING_SEGUNDOS, return_when=asyncio.FIRST_COMPLETED)
+            if proximo.done():
+                await websocket.send_text(_json(proximo.result()))
+            else:
+                proximo.cancel()
+                if not leitor.done():
+                    await websocket.send_text(_json({"tipo": "ping"}))
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        leitor.cancel()
+        # Não deixar um `fila.get()` pendurado quando o cliente fecha primeiro
+        if proximo is not None and not proximo.done():
+            proximo.cancel()
+        tempo_real.desligar(user["id"], fila)
+
+
+@router.get("/eventos")
+async def stream_eventos(request: Request, token: str = Query(...)):
+    """Eventos do utilizador autenticado por Server-Sent Events"""
+    user = await get_user_from_token(token, db)
+
+    def _sse(evento: Dict[str, Any]) -> str:
+        return f"event: {evento['tipo']}\ndata: {_json(evento)}\n\n"
+
+    async def gerar():
+        fila = tempo_real.ligar(user["id"])
+        try:
+            for evento in await _estado_inicial(user["id"]):
+                yield _sse(evento)
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(fila.get(), timeout=tempo_real.TEMPO_REAL_PING_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    # Comentário SSE: mantém proxies e load balancers com a ligação aberta
+                    yield ": ping\n\n"
+                    continue
+                yield _sse(evento)
+        finally:
+            tempo_real.desligar(user["id"], fila)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -9,11 +9,11 @@ from datetime import datetime, timezone, timedelta
 import uuid
 import logging
 import os
-import shutil
 from pathlib import Path
 
 from utils.database import get_database
 from utils.auth import get_current_user
+from services import uploads_processamento
 
 router = APIRouter(prefix="/tickets", tags=["Tickets/Suporte"])
 logger = logging.getLogger(__name__)
@@ -718,8 +718,7 @@ async def adicionar_foto_ticket(
     file_name = f"{foto_id}{file_ext}"
     file_path = ticket_fotos_dir / file_name
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await uploads_processamento.guardar_stream(file, file_path)
     
     foto = {
         "id": foto_id,
@@ -826,8 +825,7 @@ async def adicionar_anexo(
     file_id = str(uuid.uuid4())
     file_path = TICKETS_UPLOAD_DIR / f"{file_id}{file_ext}"
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await uploads_processamento.guardar_stream(file, file_path)
     
     anexo = {
         "id": file_id,
@@ -12,7 +12,9 @@ import os
 import uuid
 
 from utils.database import get_database
+from utils import user_cache
 from utils.auth import get_current_user
+from services import ledger_semanal
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/uber", tags=["Uber Sync"])
@@ -121,6 +123,7 @@ async def salvar_minhas_credenciais(
             {"id": parceiro_id},
             {"$set": creds_update}
         )
+        user_cache.invalidar_utilizador(parceiro_id)
     
     return {"sucesso": True, "mensagem": "Credenciais guardadas"}
 
@@ -346,6 +349,7 @@ async def sincronizar_uber(
             logger.info(f"Período Uber calculado: {periodo_inicio_completo} a {periodo_fim_completo} (semana_index={data.semana_index})")
             
             # Guardar cada motorista em ganhos_uber
+            ganhos_importados = []
             for mot in motoristas_importados:
                 nome_motorista = mot.get("nome", "")
                 
@@ -375,6 +379,9 @@ async def sincronizar_uber(
                 }
                 
                 await db.ganhos_uber.insert_one(ganho)
+                ganhos_importados.append(ganho)
+            
+            await ledger_semanal.invalidar_registos(db, ganhos_importados, parceiro_id=parceiro_id)
             
             # Guardar resumo
             await db.importacoes_uber.insert_one({
@@ -483,6 +490,7 @@ async def extrair_rendimentos_parceiro(
             logger.info(f"Admin: Período Uber calculado: {periodo_inicio} a {periodo_fim}")
             
             # Guardar cada motorista em ganhos_uber (para o resumo semanal)
+            ganhos_importados = []
             for mot in motoristas_importados:
                 nome_motorista = mot.get("nome", "")
                 
@@ -513,6 +521,9 @@ async def extrair_rendimentos_parceiro(
                 }
                 
                 await db.ganhos_uber.insert_one(ganho)
+                ganhos_importados.append(ganho)
+            
+            await ledger_semanal.invalidar_registos(db, ganhos_importados, parceiro_id=parceiro_id)
             
             # Também guardar resumo em importacoes_uber
             await db.importacoes_uber.insert_one({
@@ -7,11 +7,11 @@ from datetime import datetime, timezone, timedelta
 import logging
 import os
 import uuid
-import shutil
 
 from utils.database import get_database
 from utils.auth import get_current_user
 from services.rpa_processor import processar_download, guardar_no_resumo_semanal
+from services import executor_service, uploads_processamento
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/uploads", tags=["uploads"])
@@ -68,8 +68,7 @@ async def upload_ficheiro(
         filepath = os.path.join(UPLOAD_DIR, safe_filename)
         
         # Guardar ficheiro
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await uploads_processamento.guardar_stream(file, filepath)
         
         # Guardar metadados na DB
         ficheiro_doc = {
@@ -99,6 +98,8 @@ async def upload_ficheiro(
             "ano": ano
         }
         
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Erro ao fazer upload: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -131,6 +132,23 @@ async def listar_ficheiros(
         return {"ficheiros": []}
 
 
+@router.get("/processamento/{upload_id}")
+async def estado_processamento(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Estado da conversão para PDF / miniatura de um upload (fila "uploads")
+    """
+    registo = await uploads_processamento.estado(db, upload_id)
+    if not registo:
+        raise HTTPException(status_code=404, detail="Processamento não encontrado")
+    if current_user.get("role") not in ["admin", "gestao"] and registo.get("criado_por") != current_user.get("id"):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    registo.pop("referencia", None)
+    return registo
+
+
 @router.post("/processar/{file_id}")
 async def processar_ficheiro(
     file_id: str,
@@ -9,6 +9,8 @@ import logging
 from models.user import UserRole
 from utils.auth import get_current_user, get_password_hash
 from utils.database import get_database
+from utils import user_cache
+from services import dashboard_stats
 
 router = APIRouter()
 db = get_database()
@@ -48,6 +50,15 @@ async def get_pending_users(current_user: Dict = Depends(get_current_user)):
     return users
 
 
+@router.get("/users/cache/estatisticas")
+async def get_user_cache_stats(current_user: Dict = Depends(get_current_user)):
+    """Hits/misses da cache do utilizador autenticado (por processo)"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Apenas Admin")
+    
+    return user_cache.estatisticas()
+
+
 @router.get("/users/all")
 async def get_all_users(current_user: Dict = Depends(get_current_user)):
     """Listar todos os utilizadores"""
@@ -188,6 +199,7 @@ async def approve_user(
         {"id": user_id},
         {"$set": update_data}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     # Also approve in motoristas/parceiros if applicable
     if user.get("role") == "motorista":
@@ -221,6 +233,7 @@ async def approve_user(
                 {"$or": [{"id": user_id}, {"email": user.get("email")}]},
                 {"$set": motorista_update}
             )
+            await dashboard_stats.atualizar_motorista(db, motorista_exists, {**motorista_exists, **motorista_update})
         else:
             # Create motorista document if it doesn't exist
             import uuid as uuid_module
@@ -250,6 +263,7 @@ async def approve_user(
                 }
             }
             await db.motoristas.insert_one(motorista_doc)
+            await dashboard_stats.registar_motorista(db, motorista_doc)
             logger.info(f"Created motorista document for user {user_id}")
             
     elif user.get("role") == "parceiro":
@@ -319,6 +333,7 @@ async def set_user_role(
         {"id": user_id},
         {"$set": {"role": role_data.role}}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     logger.info(f"Role changed for user {user_id} from {user.get('role')} to {role_data.role}")
     return {"message": f"Role alterado para {role_data.role}"}
@@ -377,16 +392,17 @@ async def update_user_status(
         {"id": user_id},
         {"$set": {"status": status_data.status}}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Utilizador não encontrado")
     
     # Se for motorista, atualizar também na coleção motoristas
     if target_role == UserRole.MOTORISTA:
-        await db.motoristas.update_one(
-            {"$or": [{"id": user_id}, {"email": target_user.get("email")}]},
-            {"$set": {"status": status_data.status, "ativo": status_data.status == "active"}}
-        )
+        filtro = {"$or": [{"id": user_id}, {"email": target_user.get("email")}]}
+        alteracao = {"status": status_data.status, "ativo": status_data.status == "active"}
+        await dashboard_stats.atualizar_motorista_filtro(db, filtro, alteracao)
+        await db.motoristas.update_one(filtro, {"$set": alteracao})
     
     status_str = "bloqueado" if status_data.status == 'blocked' else "ativado"
     logger.info(f"User {user_id} status changed to {status_data.status} by {current_user['id']} (role: {current_user['role']})")
@@ -425,13 +441,13 @@ async def assign_plano_to_user(
         {"id": user_id},
         {"$set": update_data}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     # Se for motorista, atualizar também na coleção motoristas
     if user.get("role") == "motorista":
-        await db.motoristas.update_one(
-            {"$or": [{"id": user_id}, {"email": user.get("email")}]},
-            {"$set": update_data}
-        )
+        filtro = {"$or": [{"id": user_id}, {"email": user.get("email")}]}
+        await dashboard_stats.atualizar_motorista_filtro(db, filtro, update_data)
+        await db.motoristas.update_one(filtro, {"$set": update_data})
     # Se for parceiro, atualizar também na coleção parceiros
     elif user.get("role") == "parceiro":
         await db.parceiros.update_one(
@@ -458,10 +474,15 @@ async def delete_user(
     
     # Delete user
     await db.users.delete_one({"id": user_id})
+    user_cache.invalidar_utilizador(user_id)
     
     # Delete related data based on role
     if user.get("role") == "motorista":
-        await db.motoristas.delete_one({"$or": [{"id": user_id}, {"email": user.get("email")}]})
+        removido = await db.motoristas.find_one_and_delete(
+            {"$or": [{"id": user_id}, {"email": user.get("email")}]},
+            projection={"_id": 0, "approved": 1, "parceiro_atribuido": 1}
+        )
+        await dashboard_stats.registar_motorista(db, removido, -1)
     elif user.get("role") == "parceiro":
         await db.parceiros.delete_one({"$or": [{"id": user_id}, {"email": user.get("email")}]})
     
@@ -538,6 +559,7 @@ async def sync_motoristas_collection(
             }
             
             await db.motoristas.insert_one(motorista_doc)
+            await dashboard_stats.registar_motorista(db, motorista_doc)
             synced += 1
             logger.info(f"Synced motorista: {user.get('name')} ({email}) - Approved: {is_approved}")
             
@@ -612,6 +634,7 @@ async def reset_user_password(
         {"id": user_id},
         {"$set": {"password": hashed_password}}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Utilizador não encontrado")
@@ -639,6 +662,7 @@ async def validate_user_document(
     validado = request.validado
     
     # Atualizar em motoristas
+    await dashboard_stats.atualizar_motorista_filtro(db, {"id": user_id}, {f"documentos_validados.{campo}": validado})
     motorista_update = await db.motoristas.update_one(
         {"id": user_id},
         {"$set": {f"documentos_validados.{campo}": validado}}
@@ -655,6 +679,7 @@ async def validate_user_document(
         {"id": user_id},
         {"$set": {f"documentos_validados.{campo}": validado}}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     # Atualizar documento específico na collection documentos
     doc_update = await db.documentos.update_one(
@@ -697,13 +722,13 @@ async def revoke_user(
             }
         }
     )
+    user_cache.invalidar_utilizador(user_id)
     
     # Also update in related collections
     if user.get("role") == "motorista":
-        await db.motoristas.update_one(
-            {"$or": [{"id": user_id}, {"email": user.get("email")}]},
-            {"$set": {"status": "revoked", "ativo": False}}
-        )
+        filtro = {"$or": [{"id": user_id}, {"email": user.get("email")}]}
+        await dashboard_stats.atualizar_motorista_filtro(db, filtro, {"status": "revoked", "ativo": False})
+        await db.motoristas.update_one(filtro, {"$set": {"status": "revoked", "ativo": False}})
     elif user.get("role") == "parceiro":
         await db.parceiros.update_one(
             {"$or": [{"id": user_id}, {"email": user.get("email")}]},
@@ -751,6 +776,7 @@ async def update_user_acesso(
         {"id": user_id},
         {"$set": update_data}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     # Se for parceiro, atualizar também na coleção parceiros
     if user.get("role") == "parceiro":
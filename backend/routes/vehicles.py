@@ -7,15 +7,17 @@ from datetime import datetime, timezone, timedelta
 from pathlib import Path
 import uuid
 import logging
-import shutil
 
 from utils.database import get_database
 from utils.auth import get_current_user
 from utils.file_upload_handler import FileUploadHandler
+from utils.file_handlers import process_uploaded_file as _process_uploaded_file
+from utils.paginacao import Paginacao, filtro_pesquisa, paginar
 from models.veiculo import (
     Vehicle, VehicleCreate, VehicleMaintenance, VehicleVistoria, VistoriaCreate
 )
 from services.subscricao_service import atualizar_contagem_subscricao
+from services import dashboard_stats, vencimentos
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -42,63 +44,29 @@ class UserRole:
 
 # ==================== FILE UPLOAD UTILITIES ====================
 
-async def process_uploaded_file(file: UploadFile, destination_dir: Path, file_id: str) -> Dict[str, str]:
-    """Process uploaded file: save it and convert to PDF if it's an image"""
-    from PIL import Image
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    
-    file_extension = Path(file.filename).suffix.lower()
-    original_filename = f"{file_id}_original{file_extension}"
-    
+async def process_uploaded_file(
+    file: UploadFile,
+    destination_dir: Path,
+    file_id: str,
+    referencia: Optional[Dict[str, Any]] = None,
+    criado_por: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Save the upload (PDF conversion of images is queued) with URL paths (leading slash)"""
     # Create directory if not exists
     destination_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save original file
-    file_path = destination_dir / original_filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Use path with leading slash for URL access
-    relative_path = "/" + str(file_path.relative_to(ROOT_DIR))
-    result = {
-        "original_path": relative_path,
-        "pdf_path": None,
-        "saved_path": relative_path
-    }
-    
-    # Check if file is an image - convert to PDF
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.heic', '.heif'}
-    
-    if file_extension in image_extensions:
-        try:
-            pdf_filename = f"{file_id}.pdf"
-            pdf_path = destination_dir / pdf_filename
-            
-            img = Image.open(file_path)
-            if img.mode == 'RGBA':
-                img = img.convert('RGB')
-            
-            img_width, img_height = img.size
-            a4_width, a4_height = A4
-            scale = min(a4_width / img_width, a4_height / img_height) * 0.9
-            
-            new_width = img_width * scale
-            new_height = img_height * scale
-            
-            c = canvas.Canvas(str(pdf_path), pagesize=A4)
-            x = (a4_width - new_width) / 2
-            y = (a4_height - new_height) / 2
-            c.drawImage(str(file_path), x, y, width=new_width, height=new_height)
-            c.save()
-            
-            result["pdf_path"] = "/" + str(pdf_path.relative_to(ROOT_DIR))
-            result["saved_path"] = result["pdf_path"]
-        except Exception as e:
-            logger.error(f"Error converting image to PDF: {e}")
-    elif file_extension == '.pdf':
-        result["pdf_path"] = result["original_path"]
+    if referencia is not None:
+        extensao = Path(file.filename).suffix.lower()
+        referencia = {
+            **referencia,
+            "valor_erro": "/" + str((destination_dir / f"{file_id}_original{extensao}").relative_to(ROOT_DIR)),
+            "valor_ok": "/" + str((destination_dir / f"{file_id}.pdf").relative_to(ROOT_DIR)),
+        }
     
+    result = await _process_uploaded_file(file, destination_dir, file_id, referencia=referencia, criado_por=criado_por)
+    for chave in ("original_path", "pdf_path", "saved_path"):
+        if result.get(chave):
+            result[chave] = "/" + result[chave]
     return result
 
 
@@ -199,6 +167,8 @@ async def create_vehicle(vehicle_data: VehicleCreate, current_user: Dict = Depen
         vehicle_dict["parceiro_id"] = current_user["id"]
     
     await db.vehicles.insert_one(vehicle_dict)
+    await dashboard_stats.registar_vehicle(db, vehicle_dict)
+    await vencimentos.sincronizar_vehicle(db, vehicle_dict["id"])
     
     # Atualizar subscrição automaticamente se for parceiro
     if current_user["role"] == UserRole.PARCEIRO:
@@ -212,9 +182,43 @@ async def create_vehicle(vehicle_data: VehicleCreate, current_user: Dict = Depen
     return Vehicle(**vehicle_dict)
 
 
+def _normalizar_veiculo(v: Dict[str, Any]) -> Dict[str, Any]:
+    """Corrigir datas e km guardados em formatos antigos (para o modelo Vehicle)"""
+    # Handle missing or invalid created_at
+    if "created_at" not in v or v["created_at"] is None:
+        v["created_at"] = datetime.now(timezone.utc)
+    elif isinstance(v["created_at"], str):
+        try:
+            v["created_at"] = datetime.fromisoformat(v["created_at"])
+        except:
+            v["created_at"] = datetime.now(timezone.utc)
+    
+    # Handle missing or invalid updated_at
+    if "updated_at" not in v or v["updated_at"] is None:
+        v["updated_at"] = datetime.now(timezone.utc)
+    elif isinstance(v["updated_at"], str):
+        try:
+            v["updated_at"] = datetime.fromisoformat(v["updated_at"])
+        except:
+            v["updated_at"] = datetime.now(timezone.utc)
+    
+    if "km_atual" in v:
+        if isinstance(v["km_atual"], str):
+            v["km_atual"] = int(v["km_atual"]) if v["km_atual"].strip().isdigit() else 0
+    return v
+
+
 @router.get("", response_model=List[Vehicle])
-async def get_vehicles(current_user: Dict = Depends(get_current_user)):
-    """Get all vehicles (filtered by role)"""
+async def get_vehicles(
+    status: Optional[str] = None,
+    q: Optional[str] = None,
+    paginacao: Paginacao = Depends(),
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    Get all vehicles (filtered by role). With `limit`/`cursor` returns a
+    page ordered by matrícula (see utils/paginacao.py)
+    """
     query = {}
     if current_user["role"] == UserRole.PARCEIRO:
         query["parceiro_id"] = current_user["id"]
@@ -224,30 +228,21 @@ async def get_vehicles(current_user: Dict = Depends(get_current_user)):
             query["parceiro_id"] = {"$in": parceiros_ids}
         else:
             query["parceiro_id"] = None
+    if status:
+        query["status"] = status
+    query.update(filtro_pesquisa(q, ["matricula", "marca", "modelo"]))
+    
+    if paginacao.ativa:
+        pagina = await paginar(
+            db.vehicles, query, paginacao, ("matricula", 1),
+            transformar=None if paginacao.campos else lambda v: Vehicle(**_normalizar_veiculo(v))
+        )
+        return paginacao.resposta(pagina)
     
-    vehicles = await db.vehicles.find(query, {"_id": 0}).to_list(1000)
+    # Sem paginação a lista vai completa: os clientes atuais não pedem páginas
+    vehicles = await db.vehicles.find(query, {"_id": 0}).to_list(None)
     for v in vehicles:
-        # Handle missing or invalid created_at
-        if "created_at" not in v or v["created_at"] is None:
-            v["created_at"] = datetime.now(timezone.utc)
-        elif isinstance(v["created_at"], str):
-            try:
-                v["created_at"] = datetime.fromisoformat(v["created_at"])
-            except:
-                v["created_at"] = datetime.now(timezone.utc)
-        
-        # Handle missing or invalid updated_at
-        if "updated_at" not in v or v["updated_at"] is None:
-            v["updated_at"] = datetime.now(timezone.utc)
-        elif isinstance(v["updated_at"], str):
-            try:
-                v["updated_at"] = datetime.fromisoformat(v["updated_at"])
-            except:
-                v["updated_at"] = datetime.now(timezone.utc)
-        
-        if "km_atual" in v:
-            if isinstance(v["km_atual"], str):
-                v["km_atual"] = int(v["km_atual"]) if v["km_atual"].strip().isdigit() else 0
+        _normalizar_veiculo(v)
     return vehicles
 
 
@@ -382,8 +377,16 @@ async def update_vehicle(vehicle_id: str, updates: Dict[str, Any], current_user:
             "Renovação de Extintor"
         )
     
+    antes = None
+    if "status" in updates or "parceiro_id" in updates:
+        antes = await db.vehicles.find_one({"id": vehicle_id}, {"_id": 0, "parceiro_id": 1, "status": 1})
+    
     updates["updated_at"] = datetime.now(timezone.utc).isoformat()
     await db.vehicles.update_one({"id": vehicle_id}, {"$set": updates})
+    
+    if antes is not None:
+        await dashboard_stats.atualizar_vehicle(db, antes, {**antes, **updates})
+    await vencimentos.sincronizar_vehicle(db, vehicle_id)
     return {"message": "Vehicle updated"}
 
 
@@ -394,10 +397,12 @@ async def delete_vehicle(vehicle_id: str, current_user: Dict = Depends(get_curre
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Buscar veículo para obter parceiro_id antes de excluir
-    vehicle = await db.vehicles.find_one({"id": vehicle_id}, {"parceiro_id": 1})
+    vehicle = await db.vehicles.find_one({"id": vehicle_id}, {"_id": 0, "parceiro_id": 1, "status": 1})
     parceiro_id = vehicle.get("parceiro_id") if vehicle else None
     
     await db.vehicles.delete_one({"id": vehicle_id})
+    await dashboard_stats.registar_vehicle(db, vehicle, -1)
+    await vencimentos.sincronizar_vehicle(db, vehicle_id)
     
     # Atualizar subscrição do parceiro
     if parceiro_id:
@@ -1540,6 +1545,7 @@ async def atribuir_motorista_vehicle(
         if cartao_frota_eletric_id is not None:
             vehicle_update["cartao_frota_eletric_id"] = cartao_frota_eletric_id
         
+        await dashboard_stats.atualizar_vehicle_filtro(db, {"id": vehicle_id}, vehicle_update)
         await db.vehicles.update_one({"id": vehicle_id}, {"$set": vehicle_update})
         
         # Atualizar motorista com os cartões associados
@@ -1592,16 +1598,15 @@ async def atribuir_motorista_vehicle(
                 }
             )
         
-        await db.vehicles.update_one(
-            {"id": vehicle_id},
-            {"$set": {
-                "motorista_atribuido": None,
-                "motorista_atribuido_nome": None,
-                "motorista_atribuido_desde": None,
-                "status": "disponivel",
-                "updated_at": now_iso
-            }}
-        )
+        vehicle_update = {
+            "motorista_atribuido": None,
+            "motorista_atribuido_nome": None,
+            "motorista_atribuido_desde": None,
+            "status": "disponivel",
+            "updated_at": now_iso
+        }
+        await dashboard_stats.atualizar_vehicle_filtro(db, {"id": vehicle_id}, vehicle_update)
+        await db.vehicles.update_one({"id": vehicle_id}, {"$set": vehicle_update})
         
         # Limpar associações do motorista anterior
         if old_motorista_id:
@@ -2409,13 +2414,9 @@ async def update_vehicle_status(
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Status inválido. Use: {', '.join(valid_statuses)}")
     
-    await db.vehicles.update_one(
-        {"id": vehicle_id},
-        {"$set": {
-            "status": status,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
-    )
+    alteracao = {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}
+    await dashboard_stats.atualizar_vehicle_filtro(db, {"id": vehicle_id}, alteracao)
+    await db.vehicles.update_one({"id": vehicle_id}, {"$set": alteracao})
     
     return {"message": "Status atualizado com sucesso", "status": status}
 
@@ -2953,9 +2954,16 @@ async def upload_vistoria_foto(
         vistorias_dir.mkdir(parents=True, exist_ok=True)
         
         file_id = f"vistoria_{vistoria_id}_{uuid.uuid4()}"
-        file_info = await process_uploaded_file(file, vistorias_dir, file_id)
+        # Guardada como o original até o PDF existir
+        extensao = Path(file.filename).suffix.lower()
+        photo_url = "/" + str((vistorias_dir / f"{file_id}_original{extensao}").relative_to(ROOT_DIR))
+        file_info = await process_uploaded_file(
+            file, vistorias_dir, file_id,
+            referencia={"colecao": "vistorias", "filtro": {"id": vistoria_id, "fotos": photo_url}, "campo": "fotos.$"},
+            criado_por=current_user["id"]
+        )
         
-        photo_url = file_info.get("pdf_path") or file_info.get("original_path")
+        photo_url = file_info["saved_path"]
         
         await db.vistorias.update_one(
             {"id": vistoria_id},
@@ -3046,9 +3054,18 @@ async def upload_contrato_veiculo(
         contratos_dir.mkdir(parents=True, exist_ok=True)
         
         file_id = f"contrato_{vehicle_id}_{uuid.uuid4()}"
-        file_info = await process_uploaded_file(file, contratos_dir, file_id)
+        contrato_id = str(uuid.uuid4())
+        file_info = await process_uploaded_file(
+            file, contratos_dir, file_id,
+            referencia={
+                "colecao": "vehicles",
+                "filtro": {"id": vehicle_id, "contratos.id": contrato_id},
+                "campo": "contratos.$.documento_url"
+            },
+            criado_por=current_user["id"]
+        )
         
-        documento_url = file_info.get("pdf_path") or file_info.get("original_path")
+        documento_url = file_info["saved_path"]
         now = datetime.now(timezone.utc)
         
         # Buscar nome do motorista se fornecido
@@ -3060,7 +3077,7 @@ async def upload_contrato_veiculo(
         
         # Criar registo do contrato
         contrato = {
-            "id": str(uuid.uuid4()),
+            "id": contrato_id,
             "tipo": tipo,
             "documento_url": documento_url,
             "motorista_id": motorista_id or vehicle.get("motorista_atribuido"),
@@ -14,6 +14,7 @@ import os
 from utils.database import get_database
 from utils.auth import get_current_user
 from utils.file_upload_handler import FileUploadHandler
+from services import uploads_processamento
 
 router = APIRouter(prefix="/vehicles", tags=["vistorias"])
 db = get_database()
@@ -306,15 +307,47 @@ async def upload_vistoria_foto(
         "url": photo_url,
         "cloud_path": upload_result.get("cloud_path"),
         "provider": upload_result.get("provider"),
+        "miniatura_url": None,
         "uploaded_at": datetime.now(timezone.utc).isoformat()
     }
     
+    # Thumbnail generated by the upload queue; the full photo is served until it exists
+    local_path = upload_result.get("local_path")
+    miniatura_url = None
+    if local_path and uploads_processamento.e_imagem(file.filename):
+        miniatura_filename = f"{os.path.splitext(upload_result['filename'])[0]}_mini.jpg"
+        miniatura_path = os.path.join(os.path.dirname(local_path), miniatura_filename)
+        miniatura_url = upload_result["local_url"].rsplit("/", 1)[0] + f"/{miniatura_filename}"
+        foto_info["miniatura_url"] = photo_url
+    
     await db.vistorias.update_one(
         {"id": vistoria_id},
         {"$push": {"fotos": foto_info}}
     )
     
-    return {"message": "Photo uploaded", "foto_id": foto_info["id"], "url": photo_url, "cloud_synced": bool(upload_result.get("cloud_path"))}
+    if miniatura_url:
+        await uploads_processamento.enfileirar(
+            db,
+            foto_info["id"],
+            local_path,
+            miniatura=miniatura_path,
+            referencia={
+                "colecao": "vistorias",
+                "filtro": {"id": vistoria_id, "fotos.id": foto_info["id"]},
+                "campo": "fotos.$.miniatura_url",
+                "valor_erro": photo_url,
+                "valor_ok": miniatura_url
+            },
+            criado_por=current_user["id"]
+        )
+    
+    return {
+        "message": "Photo uploaded",
+        "foto_id": foto_info["id"],
+        "url": photo_url,
+        "miniatura_url": foto_info["miniatura_url"],
+        "cloud_synced": bool(upload_result.get("cloud_path"))
+    }
 
 
 # ==================== DANOS ====================
@@ -13,9 +13,10 @@ import hashlib
 import json
 import os
 import logging
-import uuid
 
 from utils.auth import get_current_user
+from utils import cache_config
+from services import clientes_http, whatsapp_massa
 
 router = APIRouter(prefix="/whatsapp-cloud", tags=["WhatsApp Cloud API"])
 
@@ -248,14 +249,48 @@ async def send_template_message(
     Returns:
         Resposta da API com message_id em caso de sucesso
     """
-    if not ACCESS_TOKEN or not PHONE_NUMBER_ID:
-        raise HTTPException(
-            status_code=503,
-            detail="WhatsApp Cloud API não configurada. Configure ACCESS_TOKEN e PHONE_NUMBER_ID no .env"
-        )
+    _verificar_configuracao()
     
-    formatted_phone = format_phone_number(recipient_phone)
+    payload = _payload_template(recipient_phone, template_name, template_language, parameters, header_parameters)
+    formatted_phone = payload["to"]
     
+    try:
+        response = await _post_mensagem(payload)
+        
+        if response.status_code == 200:
+            result = response.json()
+            logger.info(f"Mensagem enviada com sucesso para {formatted_phone}")
+            return {
+                "success": True,
+                "message_id": result.get("messages", [{}])[0].get("id"),
+                "recipient": formatted_phone,
+                "timestamp": datetime.now().isoformat()
+            }
+        else:
+            error_data = response.json()
+            logger.error(f"Erro ao enviar mensagem: {error_data}")
+            return {
+                "success": False,
+                "error": error_data,
+                "recipient": formatted_phone
+            }
+                
+    except httpx.ConnectError as e:
+        logger.error(f"Erro de conexão com WhatsApp API: {e}")
+        raise HTTPException(status_code=503, detail="Não foi possível conectar à API do WhatsApp")
+    except Exception as e:
+        logger.error(f"Erro ao enviar mensagem WhatsApp: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _payload_template(
+    recipient_phone: str,
+    template_name: str,
+    template_language: str = "pt_PT",
+    parameters: Optional[List[Dict]] = None,
+    header_parameters: Optional[List[Dict]] = None
+) -> Dict:
+    """Corpo do pedido /messages para uma mensagem template"""
     components = []
     
     # Adicionar parâmetros do header se existirem
@@ -274,7 +309,7 @@ async def send_template_message(
     
     payload = {
         "messaging_product": "whatsapp",
-        "to": formatted_phone,
+        "to": format_phone_number(recipient_phone),
         "type": "template",
         "template": {
             "name": template_name,
@@ -287,41 +322,25 @@ async def send_template_message(
     if components:
         payload["template"]["components"] = components
     
+    return payload
+
+
+async def _post_mensagem(payload: Dict) -> httpx.Response:
+    """POST /messages pelo cliente HTTP partilhado (ligações keep-alive)"""
     headers = {
         "Authorization": f"Bearer {ACCESS_TOKEN}",
         "Content-Type": "application/json"
     }
-    
     url = f"{WHATSAPP_API_URL}/{PHONE_NUMBER_ID}/messages"
-    
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Mensagem enviada com sucesso para {formatted_phone}")
-                return {
-                    "success": True,
-                    "message_id": result.get("messages", [{}])[0].get("id"),
-                    "recipient": formatted_phone,
-                    "timestamp": datetime.now().isoformat()
-                }
-            else:
-                error_data = response.json()
-                logger.error(f"Erro ao enviar mensagem: {error_data}")
-                return {
-                    "success": False,
-                    "error": error_data,
-                    "recipient": formatted_phone
-                }
-                
-    except httpx.ConnectError as e:
-        logger.error(f"Erro de conexão com WhatsApp API: {e}")
-        raise HTTPException(status_code=503, detail="Não foi possível conectar à API do WhatsApp")
-    except Exception as e:
-        logger.error(f"Erro ao enviar mensagem WhatsApp: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await clientes_http.pedido("whatsapp", "POST", url, repetir=False, json=payload, headers=headers)
+
+
+def _verificar_configuracao():
+    if not ACCESS_TOKEN or not PHONE_NUMBER_ID:
+        raise HTTPException(
+            status_code=503,
+            detail="WhatsApp Cloud API não configurada. Configure ACCESS_TOKEN e PHONE_NUMBER_ID no .env"
+        )
 
 
 # ==================== ENDPOINTS ====================
@@ -601,24 +620,23 @@ async def send_massa(
     if current_user["role"] not in ["admin", "gestao", "parceiro"]:
         raise HTTPException(status_code=403, detail="Não autorizado")
     
+    _verificar_configuracao()
+    
     # Obter dados dos motoristas
     motoristas = await db.motoristas.find(
         {"id": {"$in": request.motorista_ids}},
         {"_id": 0, "id": 1, "name": 1, "nome": 1, "phone": 1, "whatsapp": 1}
-    ).to_list(100)
+    ).to_list(None)
     
-    resultados = {
-        "enviados": [],
-        "falhas": [],
-        "sem_telefone": []
-    }
+    mensagens = []
+    sem_telefone = []
     
     for motorista in motoristas:
         telefone = motorista.get("whatsapp") or motorista.get("phone")
         nome = motorista.get("name") or motorista.get("nome", "Motorista")
         
         if not telefone:
-            resultados["sem_telefone"].append({
+            sem_telefone.append({
                 "id": motorista["id"],
                 "nome": nome
             })
@@ -635,54 +653,29 @@ async def send_massa(
         if request.template_name in ["vistoria_agendada", "documento_expirar", "revisao_veiculo"]:
             params_formatados.insert(0, {"type": "text", "text": nome})
         
-        try:
-            result = await send_template_message(
-                recipient_phone=telefone,
-                template_name=request.template_name,
-                template_language=request.language,
-                parameters=params_formatados
-            )
-            
-            if result.get("success"):
-                resultados["enviados"].append({
-                    "id": motorista["id"],
-                    "nome": nome,
-                    "telefone": telefone,
-                    "message_id": result.get("message_id")
-                })
-            else:
-                resultados["falhas"].append({
-                    "id": motorista["id"],
-                    "nome": nome,
-                    "erro": result.get("error")
-                })
-        except Exception as e:
-            resultados["falhas"].append({
-                "id": motorista["id"],
-                "nome": nome,
-                "erro": str(e)
-            })
+        mensagens.append({
+            "motorista_id": motorista["id"],
+            "nome": nome,
+            "telefone": telefone,
+            "payload": _payload_template(telefone, request.template_name, request.language, params_formatados),
+        })
     
-    # Registar envio em massa na BD
-    await db.whatsapp_envios_massa.insert_one({
-        "id": str(uuid.uuid4()),
+    # Enviar em paralelo e registar o envio (com o estado de cada mensagem) na BD
+    envio = await whatsapp_massa.despachar(db, mensagens, _post_mensagem, {
         "template_name": request.template_name,
         "parameters": request.parameters,
         "motorista_ids": request.motorista_ids,
-        "enviados": len(resultados["enviados"]),
-        "falhas": len(resultados["falhas"]),
-        "sem_telefone": len(resultados["sem_telefone"]),
         "enviado_por": current_user["id"],
-        "created_at": datetime.now().isoformat()
-    })
+    }, sem_telefone=sem_telefone)
     
     return {
         "success": True,
+        "envio_id": envio["id"],
         "total_motoristas": len(request.motorista_ids),
-        "enviados": len(resultados["enviados"]),
-        "falhas": len(resultados["falhas"]),
-        "sem_telefone": len(resultados["sem_telefone"]),
-        "detalhes": resultados
+        "enviados": envio["enviados"],
+        "falhas": envio["falhas"],
+        "sem_telefone": envio["sem_telefone"],
+        "detalhes": envio["detalhes"]
     }
 
 
@@ -706,35 +699,38 @@ async def send_vistoria_massa(
     if current_user["role"] not in ["admin", "gestao", "parceiro"]:
         raise HTTPException(status_code=403, detail="Não autorizado")
     
+    _verificar_configuracao()
+    
     # Obter dados dos motoristas com veículos
     motoristas = await db.motoristas.find(
         {"id": {"$in": request.motorista_ids}},
         {"_id": 0, "id": 1, "name": 1, "nome": 1, "phone": 1, "whatsapp": 1, "veiculo_id": 1}
-    ).to_list(100)
+    ).to_list(None)
     
-    resultados = {
-        "enviados": [],
-        "falhas": [],
-        "sem_telefone": []
-    }
+    veiculo_ids = list({m["veiculo_id"] for m in motoristas if m.get("veiculo_id")})
+    veiculos = {
+        v["id"]: v for v in await db.vehicles.find(
+            {"id": {"$in": veiculo_ids}},
+            {"_id": 0, "id": 1, "matricula": 1, "marca": 1, "modelo": 1}
+        ).to_list(None)
+    } if veiculo_ids else {}
+    
+    mensagens = []
+    sem_telefone = []
     
     for motorista in motoristas:
         telefone = motorista.get("whatsapp") or motorista.get("phone")
         nome = motorista.get("name") or motorista.get("nome", "Motorista")
         
         if not telefone:
-            resultados["sem_telefone"].append({"id": motorista["id"], "nome": nome})
+            sem_telefone.append({"id": motorista["id"], "nome": nome})
             continue
         
         # Obter matrícula do veículo
         veiculo_info = "Veículo"
-        if motorista.get("veiculo_id"):
-            veiculo = await db.vehicles.find_one(
-                {"id": motorista["veiculo_id"]},
-                {"_id": 0, "matricula": 1, "marca": 1, "modelo": 1}
-            )
-            if veiculo:
-                veiculo_info = f"{veiculo.get('matricula', '')} ({veiculo.get('marca', '')} {veiculo.get('modelo', '')})"
+        veiculo = veiculos.get(motorista.get("veiculo_id"))
+        if veiculo:
+            veiculo_info = f"{veiculo.get('matricula', '')} ({veiculo.get('marca', '')} {veiculo.get('modelo', '')})"
         
         parameters = [
             {"type": "text", "text": nome},
@@ -744,43 +740,38 @@ async def send_vistoria_massa(
             {"type": "text", "text": veiculo_info}
         ]
         
-        try:
-            result = await send_template_message(
-                recipient_phone=telefone,
-                template_name="vistoria_agendada",
-                parameters=parameters
-            )
-            
-            if result.get("success"):
-                resultados["enviados"].append({
-                    "id": motorista["id"],
-                    "nome": nome,
-                    "telefone": telefone,
-                    "message_id": result.get("message_id")
-                })
-            else:
-                resultados["falhas"].append({
-                    "id": motorista["id"],
-                    "nome": nome,
-                    "erro": result.get("error")
-                })
-        except Exception as e:
-            resultados["falhas"].append({
-                "id": motorista["id"],
-                "nome": nome,
-                "erro": str(e)
-            })
+        mensagens.append({
+            "motorista_id": motorista["id"],
+            "nome": nome,
+            "telefone": telefone,
+            "payload": _payload_template(telefone, "vistoria_agendada", parameters=parameters),
+        })
+    
+    envio = await whatsapp_massa.despachar(db, mensagens, _post_mensagem, {
+        "template_name": "vistoria_agendada",
+        "parameters": [request.data_vistoria, request.hora, request.local],
+        "motorista_ids": request.motorista_ids,
+        "enviado_por": current_user["id"],
+    }, sem_telefone=sem_telefone)
     
     return {
         "success": True,
+        "envio_id": envio["id"],
         "total_motoristas": len(request.motorista_ids),
-        "enviados": len(resultados["enviados"]),
-        "falhas": len(resultados["falhas"]),
-        "sem_telefone": len(resultados["sem_telefone"]),
-        "detalhes": resultados
+        "enviados": envio["enviados"],
+        "falhas": envio["falhas"],
+        "sem_telefone": envio["sem_telefone"],
+        "detalhes": envio["detalhes"]
     }
 
 
+def _filtro_envios(current_user: Dict) -> Dict:
+    """Só o admin vê os envios de todos; os restantes apenas os que fizeram"""
+    if current_user["role"] == "admin":
+        return {}
+    return {"enviado_por": current_user["id"]}
+
+
 @router.get("/historico-envios")
 async def get_historico_envios(
     limite: int = 50,
@@ -791,13 +782,29 @@ async def get_historico_envios(
         raise HTTPException(status_code=403, detail="Não autorizado")
     
     envios = await db.whatsapp_envios_massa.find(
-        {},
-        {"_id": 0}
+        _filtro_envios(current_user),
+        {"_id": 0, "mensagens": 0}
     ).sort("created_at", -1).to_list(limite)
     
     return {"envios": envios, "total": len(envios)}
 
 
+@router.get("/historico-envios/{envio_id}")
+async def get_envio_massa(
+    envio_id: str,
+    current_user: Dict = Depends(get_current_user)
+):
+    """Envio em massa com o estado de cada mensagem (envio e entrega)"""
+    if current_user["role"] not in ["admin", "gestao", "parceiro"]:
+        raise HTTPException(status_code=403, detail="Não autorizado")
+    
+    envio = await db.whatsapp_envios_massa.find_one({**_filtro_envios(current_user), "id": envio_id}, {"_id": 0})
+    if not envio:
+        raise HTTPException(status_code=404, detail="Envio não encontrado")
+    
+    return {**envio, "entregas": whatsapp_massa.resumo_entregas(envio)}
+
+
 # ==================== AGENDAMENTO AUTOMÁTICO ====================
 
 class ConfiguracaoAgendamento(BaseModel):
@@ -846,6 +853,7 @@ async def update_agendamento_config(
         }},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"success": True, "message": "Configuração atualizada"}
 
@@ -966,7 +974,10 @@ async def handle_webhook(request: Request):
                     recipient_id = status.get("recipient_id")
                     
                     logger.info(f"Status update: {message_id} -> {delivery_status} para {recipient_id}")
-                    # TODO: Actualizar estado da mensagem na BD
+                
+                # Actualizar o estado de entrega das mensagens dos envios em massa
+                if value.get("statuses"):
+                    await whatsapp_massa.reconciliar_estados(db, value["statuses"])
         
         return {"status": "ok"}
         
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Body, Response
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Body, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -22,7 +22,6 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 import mimetypes
 import shutil
-import openpyxl
 import csv
 import io
 import tempfile
@@ -99,6 +98,7 @@ from routes.auth import router as auth_router
 from routes.motoristas import router as motoristas_router
 from routes.notificacoes import router as notificacoes_router
 from routes.mensagens import router as mensagens_router
+from routes.tempo_real import router as tempo_real_router
 from routes.ifthenpay import router as ifthenpay_router
 from routes.vehicles import router as vehicles_router
 from routes.csv_config import router as csv_config_router
@@ -170,17 +170,29 @@ from routes.plataformas import router as plataformas_router
 from routes.browser_virtual_admin import router as browser_virtual_admin_router
 from routes.contabilidade import router as contabilidade_router
 from routes.contabilistas import router as contabilistas_router
+from routes.tarefas import router as tarefas_router
 
 # Import utilities from refactored modules
 from utils.file_handlers import (
-    safe_parse_date, convert_image_to_pdf, save_uploaded_file,
+    safe_parse_date, save_uploaded_file,
     process_uploaded_file, merge_images_to_pdf_a4, ROOT_DIR
 )
 from utils.alerts import check_and_create_alerts, auto_add_to_agenda
+from utils import cache_config, user_cache
+from utils.paginacao import Paginacao, paginar
+from services import browser_pool, clientes_http, dashboard_stats, envio_email, executor_service, fila_tarefas, ledger_semanal, lideranca, rpa_motor, rpa_scheduler, tempo_real, uploads_processamento, vencimentos
+import services.relatorios_massa  # noqa: F401 - regista os handlers da fila de tarefas
+from services.tarefas_pesadas import ler_folha_excel
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
+
+@app.exception_handler(executor_service.ExecutorSobrecarregado)
+async def executor_sobrecarregado_handler(request, exc):
+    """Fila do executor cheia: pedir ao cliente para repetir mais tarde"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
 # ==================== MODELS ====================
 
 class UserRole:
@@ -2244,7 +2256,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     try:
         token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+        user = await user_cache.obter_utilizador(db, payload["user_id"])
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -2265,16 +2277,9 @@ async def check_feature_access(user: Dict, feature_name: str) -> bool:
         # No subscription = no access to premium features
         return False
     
-    subscription = await db.subscriptions.find_one({"id": subscription_id, "status": "ativo"}, {"_id": 0})
-    if not subscription:
-        return False
-    
-    # Get plan features
-    plano = await db.planos.find_one({"id": subscription["plano_id"]}, {"_id": 0})
-    if not plano:
-        return False
-    
-    return feature_name in plano.get("features", [])
+    # Get plan features (cached per user/subscription)
+    features = await user_cache.obter_features_plano(db, user)
+    return feature_name in features
 
 # ==================== CSV PROCESSING UTILITIES ====================
 
@@ -2406,6 +2411,7 @@ async def process_uber_csv(file_content: bytes, parceiro_id: str, periodo_inicio
                 total_registos += 1
         
         # Gravar dados agrupados por motorista
+        ganhos_gravados = []
         for motorista_key, dados in motoristas_processados.items():
             motorista = dados["motorista"]
             motorista_id = motorista.get("id") if motorista else None
@@ -2429,6 +2435,7 @@ async def process_uber_csv(file_content: bytes, parceiro_id: str, periodo_inicio
             }
             
             await db.ganhos_uber.insert_one(ganho)
+            ganhos_gravados.append(ganho)
             total_rendimentos_all += dados["rendimentos"]
             total_portagens_all += dados["portagens"]
             
@@ -2443,6 +2450,8 @@ async def process_uber_csv(file_content: bytes, parceiro_id: str, periodo_inicio
                     )
                     logger.info(f"💰 Portagens Uber acumuladas: €{dados['portagens']:.2f} -> Total: €{novo_acumulado:.2f} ({dados['nome']})")
         
+        await ledger_semanal.invalidar_registos(db, ganhos_gravados, parceiro_id=parceiro_id)
+        
         return {
             "success": True,
             "registos_importados": total_registos,
@@ -2616,6 +2625,7 @@ async def process_bolt_csv(file_content: bytes, parceiro_id: str, periodo_inicio
                 total_registos += 1
         
         # Gravar dados agrupados por motorista
+        ganhos_gravados = []
         for motorista_key, dados in motoristas_processados.items():
             motorista = dados["motorista"]
             motorista_id = motorista.get("id") if motorista else None
@@ -2641,11 +2651,14 @@ async def process_bolt_csv(file_content: bytes, parceiro_id: str, periodo_inicio
             }
             
             await db.ganhos_bolt.insert_one(ganho)
+            ganhos_gravados.append(ganho)
             total_ganhos_liquidos += dados["ganhos_liquidos"]
             total_viagens += dados["viagens"]
             
             logger.info(f"💰 Bolt gravado: {dados['nome']} - €{dados['ganhos_liquidos']:.2f} (motorista_id: {motorista_id})")
         
+        await ledger_semanal.invalidar_registos(db, ganhos_gravados, parceiro_id=parceiro_id)
+        
         return {
             "success": True,
             "registos_importados": total_registos,
@@ -2676,12 +2689,10 @@ async def process_prio_excel(file_content: bytes, parceiro_id: str) -> Dict[str,
         excel_filename = f"prio_{parceiro_id}_{timestamp}.xlsx"
         excel_path = excel_dir / excel_filename
         
-        with open(excel_path, 'wb') as f:
-            f.write(file_content)
+        await executor_service.executar_io(excel_path.write_bytes, file_content)
         
-        # Read with openpyxl
-        wb = openpyxl.load_workbook(excel_path)
-        sheet = wb.active
+        # Read with openpyxl in the process pool (keeps the event loop free)
+        sheet = await executor_service.executar_cpu(ler_folha_excel, file_content)
         
         # Skip header rows (first 3 rows are empty/header)
         transactions = []
@@ -2726,6 +2737,8 @@ async def process_prio_excel(file_content: bytes, parceiro_id: str) -> Dict[str,
             "excel_salvo": excel_filename
         }
     
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Error processing Prio Excel: {e}")
         return {"success": False, "error": str(e)}
@@ -2741,12 +2754,10 @@ async def process_viaverde_excel(file_content: bytes, parceiro_id: str, periodo_
         excel_filename = f"viaverde_{parceiro_id}_{timestamp}.xlsx"
         excel_path = excel_dir / excel_filename
         
-        with open(excel_path, 'wb') as f:
-            f.write(file_content)
+        await executor_service.executar_io(excel_path.write_bytes, file_content)
         
-        # Read with openpyxl
-        wb = openpyxl.load_workbook(excel_path)
-        sheet = wb.active
+        # Read with openpyxl in the process pool (keeps the event loop free)
+        sheet = await executor_service.executar_cpu(ler_folha_excel, file_content)
         
         # Get headers from first row
         headers = [cell.value for cell in sheet[1]]
@@ -2816,6 +2827,8 @@ async def process_viaverde_excel(file_content: bytes, parceiro_id: str, periodo_
             "veiculos_nao_encontrados": veiculos_nao_encontrados
         }
     
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Error processing Via Verde Excel: {e}")
         return {"success": False, "error": str(e)}
@@ -2922,12 +2935,10 @@ async def process_combustivel_eletrico_excel(file_content: bytes, parceiro_id: s
         excel_filename = f"eletrico_{parceiro_id}_{timestamp}.xlsx"
         excel_path = excel_dir / excel_filename
         
-        with open(excel_path, 'wb') as f:
-            f.write(file_content)
+        await executor_service.executar_io(excel_path.write_bytes, file_content)
         
-        # Read with openpyxl
-        wb = openpyxl.load_workbook(excel_path)
-        sheet = wb.active
+        # Read with openpyxl in the process pool (keeps the event loop free)
+        sheet = await executor_service.executar_cpu(ler_folha_excel, file_content)
         
         # Detectar automaticamente a linha de cabeçalhos
         header_row = 1
@@ -3048,6 +3059,7 @@ async def process_combustivel_eletrico_excel(file_content: bytes, parceiro_id: s
         # Store in database
         if transacoes:
             await db.combustivel_eletrico.insert_many(transacoes)
+            await ledger_semanal.invalidar_registos(db, transacoes, parceiro_id=parceiro_id)
         
         return {
             "success": True,
@@ -3058,6 +3070,8 @@ async def process_combustivel_eletrico_excel(file_content: bytes, parceiro_id: s
             "ficheiro_salvo": excel_filename
         }
     
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Error processing Electric Fuel Excel: {e}")
         import traceback
@@ -3075,12 +3089,10 @@ async def process_combustivel_fossil_excel(file_content: bytes, parceiro_id: str
         excel_filename = f"fossil_{parceiro_id}_{timestamp}.xlsx"
         excel_path = excel_dir / excel_filename
         
-        with open(excel_path, 'wb') as f:
-            f.write(file_content)
+        await executor_service.executar_io(excel_path.write_bytes, file_content)
         
-        # Read with openpyxl
-        wb = openpyxl.load_workbook(excel_path)
-        sheet = wb.active
+        # Read with openpyxl in the process pool (keeps the event loop free)
+        sheet = await executor_service.executar_cpu(ler_folha_excel, file_content)
         
         # Get headers from first row
         headers = [cell.value for cell in sheet[1]]
@@ -3162,6 +3174,8 @@ async def process_combustivel_fossil_excel(file_content: bytes, parceiro_id: str
             "ficheiro_salvo": excel_filename
         }
     
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Error processing Fossil Fuel Excel: {e}")
         return {"success": False, "error": str(e)}
@@ -3668,22 +3682,39 @@ async def create_expense(expense_data: ExpenseCreate, current_user: Dict = Depen
     expense_dict["created_at"] = datetime.now(timezone.utc).isoformat()
     
     await db.expenses.insert_one(expense_dict)
+    await dashboard_stats.registar_movimento(db, "despesas", expense_dict)
     
     if isinstance(expense_dict["created_at"], str):
         expense_dict["created_at"] = datetime.fromisoformat(expense_dict["created_at"])
     
     return Expense(**expense_dict)
 
+def _normalizar_movimento(doc: Dict) -> Dict:
+    if isinstance(doc.get("created_at"), str):
+        doc["created_at"] = datetime.fromisoformat(doc["created_at"])
+    return doc
+
 @api_router.get("/expenses", response_model=List[Expense])
-async def get_expenses(vehicle_id: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
+async def get_expenses(
+    vehicle_id: Optional[str] = None,
+    paginacao: Paginacao = Depends(),
+    current_user: Dict = Depends(get_current_user)
+):
     query = {}
     if vehicle_id:
         query["vehicle_id"] = vehicle_id
     
-    expenses = await db.expenses.find(query, {"_id": 0}).to_list(1000)
+    # Cursor pages, newest first, when limit/cursor are given (utils/paginacao.py)
+    if paginacao.ativa:
+        pagina = await paginar(
+            db.expenses, query, paginacao, ("created_at", -1),
+            transformar=None if paginacao.campos else lambda doc: Expense(**_normalizar_movimento(doc))
+        )
+        return paginacao.resposta(pagina)
+    
+    expenses = await db.expenses.find(query, {"_id": 0}).to_list(None)
     for e in expenses:
-        if isinstance(e["created_at"], str):
-            e["created_at"] = datetime.fromisoformat(e["created_at"])
+        _normalizar_movimento(e)
     return expenses
 
 @api_router.post("/revenues", response_model=Revenue)
@@ -3700,6 +3731,7 @@ async def create_revenue(revenue_data: RevenueCreate, current_user: Dict = Depen
     revenue_dict["created_at"] = datetime.now(timezone.utc).isoformat()
     
     await db.revenues.insert_one(revenue_dict)
+    await dashboard_stats.registar_movimento(db, "receitas", revenue_dict)
     
     if isinstance(revenue_dict["created_at"], str):
         revenue_dict["created_at"] = datetime.fromisoformat(revenue_dict["created_at"])
@@ -3707,15 +3739,26 @@ async def create_revenue(revenue_data: RevenueCreate, current_user: Dict = Depen
     return Revenue(**revenue_dict)
 
 @api_router.get("/revenues", response_model=List[Revenue])
-async def get_revenues(vehicle_id: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
+async def get_revenues(
+    vehicle_id: Optional[str] = None,
+    paginacao: Paginacao = Depends(),
+    current_user: Dict = Depends(get_current_user)
+):
     query = {}
     if vehicle_id:
         query["vehicle_id"] = vehicle_id
     
-    revenues = await db.revenues.find(query, {"_id": 0}).to_list(1000)
+    # Cursor pages, newest first, when limit/cursor are given (utils/paginacao.py)
+    if paginacao.ativa:
+        pagina = await paginar(
+            db.revenues, query, paginacao, ("created_at", -1),
+            transformar=None if paginacao.campos else lambda doc: Revenue(**_normalizar_movimento(doc))
+        )
+        return paginacao.resposta(pagina)
+    
+    revenues = await db.revenues.find(query, {"_id": 0}).to_list(None)
     for r in revenues:
-        if isinstance(r["created_at"], str):
-            r["created_at"] = datetime.fromisoformat(r["created_at"])
+        _normalizar_movimento(r)
     return revenues
 
 # ==================== PARTNER FINANCIAL ENDPOINTS ====================
@@ -4142,6 +4185,8 @@ async def importar_motoristas_csv(
                 }
                 
                 await db.motoristas.insert_one(motorista_doc)
+                await dashboard_stats.registar_motorista(db, motorista_doc)
+                await vencimentos.sincronizar_motorista(db, motorista_doc["id"])
                 motoristas_criados += 1
                 
             except Exception as e:
@@ -4320,6 +4365,8 @@ async def importar_veiculos_csv(
                 }
                 
                 await db.vehicles.insert_one(veiculo_doc)
+                await dashboard_stats.registar_vehicle(db, veiculo_doc)
+                await vencimentos.sincronizar_vehicle(db, veiculo_doc["id"])
                 veiculos_criados += 1
                 
             except Exception as e:
@@ -4716,21 +4763,25 @@ async def delete_minuta(minuta_id: str, current_user: Dict = Depends(get_current
 # ==================== CONFIGURAÇÕES TEXTOS LEGAIS ====================
 
 @api_router.get("/config/textos-legais")
-async def get_textos_legais():
-    """Public: Get legal texts (terms and privacy policy)"""
-    config = await db.configuracoes.find_one({"id": "config_sistema"}, {"_id": 0})
-    if not config:
-        # Create default config
-        default_config = {
-            "id": "config_sistema",
-            "condicoes_gerais": "Condições Gerais a definir...",
-            "politica_privacidade": "Política de Privacidade a definir...",
-            "updated_at": datetime.now(timezone.utc).isoformat(),
-            "updated_by": "system"
-        }
-        await db.configuracoes.insert_one(default_config)
-        return default_config
-    return config
+async def get_textos_legais(request: Request):
+    """Public: Get legal texts (terms and privacy policy), cached with ETag"""
+    async def carregar():
+        config = await db.configuracoes.find_one({"id": "config_sistema"}, {"_id": 0})
+        if not config:
+            # Create default config
+            default_config = {
+                "id": "config_sistema",
+                "condicoes_gerais": "Condições Gerais a definir...",
+                "politica_privacidade": "Política de Privacidade a definir...",
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "updated_by": "system"
+            }
+            await db.configuracoes.insert_one(default_config)
+            default_config.pop("_id", None)
+            return default_config
+        return config
+    
+    return await cache_config.responder(request, db, cache_config.CONFIGURACOES, "textos_legais", carregar)
 
 @api_router.put("/admin/config/textos-legais")
 async def update_textos_legais(config_data: ConfiguracaoUpdate, current_user: Dict = Depends(get_current_user)):
@@ -4754,6 +4805,7 @@ async def update_textos_legais(config_data: ConfiguracaoUpdate, current_user: Di
         {"$set": update_data},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Textos legais atualizados com sucesso", "data": update_data}
 
@@ -4782,6 +4834,7 @@ async def update_comunicacoes(
         {"$set": update_data},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Configurações de comunicação atualizadas com sucesso", "data": update_data}
 
@@ -4824,6 +4877,7 @@ async def update_integracoes(
         {"$set": update_data},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Credenciais de integração atualizadas com sucesso", "data": update_data}
 
@@ -4870,6 +4924,7 @@ async def atribuir_plano_motorista(
         {"id": motorista_id, "role": "motorista"},
         {"$set": update_doc}
     )
+    user_cache.invalidar_utilizador(motorista_id)
     
     # If not found in users, try motoristas collection
     if result.matched_count == 0:
@@ -4970,6 +5025,7 @@ async def trocar_plano(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(current_user["id"])
     
     # Remover atribuição anterior
     await db.planos_usuarios.delete_many({"user_id": current_user["id"]})
@@ -5643,249 +5699,23 @@ async def gerar_relatorios_em_massa(
     if not data_inicio or not data_fim:
         raise HTTPException(status_code=400, detail="data_inicio e data_fim são obrigatórios")
     
-    try:
-        # Converter datas
-        from datetime import datetime
-        inicio = datetime.strptime(data_inicio, "%Y-%m-%d")
-        fim = datetime.strptime(data_fim, "%Y-%m-%d")
-        
-        # Buscar motoristas
-        if motorista_ids:
-            motoristas = await db.motoristas.find({"id": {"$in": motorista_ids}, "status": "ativo"}, {"_id": 0}).to_list(1000)
-        else:
-            motoristas = await db.motoristas.find({"status": "ativo"}, {"_id": 0}).to_list(1000)
-        
-        relatorios_criados = []
-        erros = []
-        
-        logger.info(f"Gerando relatórios para {len(motoristas)} motoristas de {data_inicio} a {data_fim}")
-        
-        for motorista in motoristas:
-            try:
-                motorista_id = motorista["id"]
-                motorista_email = motorista.get("email", "")
-                
-                # Inicializar totais
-                ganhos_uber = 0.0
-                ganhos_bolt = 0.0
-                via_verde_total = 0.0
-                combustivel_total = 0.0
-                carregamentos_total = 0.0  # Carregamentos elétricos
-                
-                # 1. Agregar ganhos Uber (CORRIGIDO: usar ganhos_uber em vez de viagens_uber)
-                if incluir_uber:
-                    dados_uber = await db.ganhos_uber.find({
-                        "motorista_id": motorista_id,
-                        "periodo_inicio": {"$gte": data_inicio, "$lte": data_fim}
-                    }, {"_id": 0}).to_list(1000)
-                    
-                    for d in dados_uber:
-                        # Usar ganhos_base (sem gorjetas) como ponto de partida
-                        ganho_linha = float(d.get('ganhos_base') or d.get('ganhos_totais') or d.get('rendimentos_total') or 0)
-                        
-                        # Adicionar gorjetas se motorista recebe
-                        if motorista.get('gorjetas_uber_recebe', True):
-                            ganho_linha += float(d.get('gorjetas') or 0)
-                        
-                        # Portagens - conforme configuração
-                        portagens = float(d.get('portagens_total') or 0)
-                        if motorista.get('portagens_uber_config') == 'empresa_paga':
-                            ganho_linha += portagens
-                        elif motorista.get('portagens_uber_config') == 'motorista_paga':
-                            ganho_linha -= portagens
-                        
-                        ganhos_uber += ganho_linha
-                
-                # 2. Agregar ganhos Bolt (CORRIGIDO: usar periodo_inicio)
-                if incluir_bolt:
-                    dados_bolt = await db.viagens_bolt.find({
-                        "motorista_id": motorista_id,
-                        "periodo_inicio": {"$gte": data_inicio, "$lte": data_fim}
-                    }, {"_id": 0}).to_list(1000)
-                    
-                    for d in dados_bolt:
-                        ganhos_bolt += (
-                            float(d.get('valor_liquido') or 0) or
-                            float(d.get('ganhos_liquidos') or 0) or
-                            float(d.get('ganhos_semanais') or 0)
-                        )
-                
-                # 3. Agregar Via Verde (portagens e carregamentos)
-                if incluir_viaverde:
-                    dados_viaverde = await db.portagens_viaverde.find({
-                        "motorista_id": motorista_id,
-                        "periodo_inicio": {"$gte": data_inicio, "$lte": data_fim}
-                    }, {"_id": 0}).to_list(1000)
-                    
-                    carregamentos_total = 0.0
-                    for d in dados_viaverde:
-                        if d.get('tipo_transacao') == 'carregamento_eletrico':
-                            # Carregamentos elétricos
-                            carregamentos_total += float(d.get('valor_total_com_taxas') or 0)
-                        else:
-                            # Portagens tradicionais - usar value
-                            via_verde_total += (
-                                float(d.get('value') or 0) or
-                                float(d.get('valor_total_com_taxas') or 0) or
-                                float(d.get('valor') or 0)
-                            )
-                    
-                    # NOVO: Buscar despesas Via Verde importadas via CSV
-                    # Aplicar atraso de 1 semana (Via Verde semana X aparece no relatório semana X+1)
-                    config = await db.relatorio_config.find_one({"parceiro_id": motorista.get("parceiro_atribuido")}, {"_id": 0})
-                    via_verde_atraso = config.get("via_verde_atraso_semanas", 1) if config else 1
-                    
-                    data_inicio_vv = (inicio - timedelta(weeks=via_verde_atraso)).strftime("%Y-%m-%d")
-                    data_fim_vv = (fim - timedelta(weeks=via_verde_atraso)).strftime("%Y-%m-%d")
-                    data_fim_vv_next = (fim - timedelta(weeks=via_verde_atraso) + timedelta(days=1)).strftime("%Y-%m-%d")
-                    
-                    despesas_via_verde = await db.despesas_fornecedor.find({
-                        "motorista_id": motorista_id,
-                        "tipo_fornecedor": "via_verde",
-                        "tipo_responsavel": "motorista",
-                        "data_entrada": {"$gte": data_inicio_vv, "$lt": data_fim_vv_next}
-                    }, {"_id": 0}).to_list(1000)
-                    
-                    via_verde_importado = sum(float(d.get("valor_liquido", 0)) for d in despesas_via_verde)
-                    via_verde_total += via_verde_importado
-                    
-                    if via_verde_importado > 0:
-                        logger.info(f"Via Verde importado (CSV) para {motorista.get('name')}: €{via_verde_importado:.2f}")
-                    
-                    logger.info(f"Via Verde total para {motorista.get('name')}: Portagens €{via_verde_total:.2f}, Carregamentos €{carregamentos_total:.2f}")
-                
-                # 4. Agregar Combustível
-                if incluir_combustivel:
-                    # Combustível fóssil
-                    pipeline_comb = [
-                        {
-                            "$match": {
-                                "motorista_id": motorista_id,
-                                "data": {"$gte": data_inicio, "$lte": data_fim}
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": None,
-                                "total": {"$sum": {"$toDouble": "$valor_total"}}
-                            }
-                        }
-                    ]
-                    
-                    result_comb = await db.abastecimentos_combustivel.aggregate(pipeline_comb).to_list(None)
-                    if result_comb:
-                        combustivel_total += result_comb[0].get("total", 0.0)
-                    
-                    # Carregamentos elétrico
-                    result_elet = await db.abastecimentos_eletrico.aggregate(pipeline_comb).to_list(None)
-                    if result_elet:
-                        combustivel_total += result_elet[0].get("total", 0.0)
-                
-                # 5. Buscar contrato e veículo para calcular aluguer
-                contrato = await db.contratos.find_one({
-                    "motorista_id": motorista_id,
-                    "ativo": True
-                }, {"_id": 0})
-                
-                valor_aluguer = 0.0
-                caucao_semanal = 0.0
-                
-                if contrato:
-                    tipo_contrato = contrato.get("tipo_contrato", {})
-                    valor_aluguer = float(tipo_contrato.get("valor_aluguer", 0) or 0)
-                    
-                    # Caução parcelada
-                    if tipo_contrato.get("valor_caucao") and tipo_contrato.get("numero_parcelas_caucao"):
-                        valor_caucao = float(tipo_contrato.get("valor_caucao", 0) or 0)
-                        num_parcelas = int(tipo_contrato.get("numero_parcelas_caucao", 1) or 1)
-                        caucao_semanal = valor_caucao / num_parcelas if num_parcelas > 0 else 0
-                
-                # 6. Calcular semana do ano
-                semana = inicio.isocalendar()[1]
-                ano = inicio.year
-                
-                # 7. Verificar se já existe relatório para este período
-                relatorio_existente = await db.relatorios_semanais.find_one({
-                    "motorista_id": motorista_id,
-                    "semana": semana,
-                    "ano": ano
-                }, {"_id": 0})
-                
-                if relatorio_existente:
-                    logger.info(f"Relatório já existe para {motorista.get('name')} - semana {semana}/{ano}")
-                    erros.append({
-                        "motorista": motorista.get("name"),
-                        "erro": f"Relatório já existe para semana {semana}/{ano}"
-                    })
-                    continue
-                
-                # 8. Criar relatório em rascunho
-                from uuid import uuid4
-                relatorio_id = str(uuid4())
-                
-                novo_relatorio = {
-                    "id": relatorio_id,
-                    "motorista_id": motorista_id,
-                    "motorista_nome": motorista.get("name"),
-                    "motorista_email": motorista_email,
-                    "parceiro_id": motorista.get("parceiro_atribuido"),
-                    "veiculo_id": motorista.get("veiculo_atribuido"),
-                    "semana": semana,
-                    "ano": ano,
-                    "data_inicio": data_inicio,
-                    "data_fim": data_fim,
-                    "ganhos_uber": round(ganhos_uber, 2),
-                    "ganhos_bolt": round(ganhos_bolt, 2),
-                    "ganhos_totais": round(ganhos_uber + ganhos_bolt, 2),
-                    "via_verde_total": round(via_verde_total, 2),
-                    "portagens_viaverde": round(via_verde_total, 2),  # Alias para consistência
-                    "carregamentos_eletricos": round(carregamentos_total, 2),  # NOVO: Carregamentos elétricos
-                    "combustivel_total": round(combustivel_total, 2),
-                    "valor_aluguer": round(valor_aluguer, 2),
-                    "caucao_semanal": round(caucao_semanal, 2),
-                    "outros": 0.0,
-                    "divida_anterior": 0.0,
-                    "status": "pendente_aprovacao",  # Importação fica como pendente
-                    "criado_em": datetime.now(timezone.utc).isoformat(),
-                    "criado_por": current_user["id"],
-                    "gerado_automaticamente": True
-                }
-                
-                # Calcular total a pagar (incluir carregamentos elétricos nas despesas)
-                total_despesas = (valor_aluguer + caucao_semanal + via_verde_total + 
-                                carregamentos_total + combustivel_total + novo_relatorio["outros"] + novo_relatorio["divida_anterior"])
-                novo_relatorio["total_a_pagar"] = round(novo_relatorio["ganhos_totais"] - total_despesas, 2)
-                
-                await db.relatorios_semanais.insert_one(novo_relatorio)
-                
-                relatorios_criados.append({
-                    "motorista": motorista.get("name"),
-                    "semana": semana,
-                    "ano": ano,
-                    "ganhos_totais": novo_relatorio["ganhos_totais"],
-                    "total_a_pagar": novo_relatorio["total_a_pagar"]
-                })
-                
-                logger.info(f"✅ Relatório criado para {motorista.get('name')} - Semana {semana}/{ano}")
-                
-            except Exception as e:
-                logger.error(f"Erro ao gerar relatório para motorista {motorista.get('name')}: {str(e)}")
-                erros.append({
-                    "motorista": motorista.get("name"),
-                    "erro": str(e)
-                })
-        
-        return {
-            "sucesso": len(relatorios_criados),
-            "erros": len(erros),
-            "relatorios_criados": relatorios_criados,
-            "erros_detalhes": erros,
-            "mensagem": f"{len(relatorios_criados)} relatórios criados com sucesso"
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao gerar relatórios em massa: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao gerar relatórios: {str(e)}")
+    # Corre na fila de tarefas; o frontend consulta GET /api/tarefas/{id}
+    tarefa = await fila_tarefas.enfileirar(
+        db,
+        "relatorios.gerar_em_massa",
+        {
+            "data_inicio": data_inicio,
+            "data_fim": data_fim,
+            "motorista_ids": motorista_ids,
+            "incluir_uber": incluir_uber,
+            "incluir_bolt": incluir_bolt,
+            "incluir_viaverde": incluir_viaverde,
+            "incluir_combustivel": incluir_combustivel,
+        },
+        criado_por=current_user["id"],
+        descricao=f"Gerar relatórios {data_inicio} a {data_fim}",
+    )
+    return {"job_id": tarefa["id"], "estado": tarefa["estado"], "mensagem": "Geração de relatórios iniciada"}
 
 @api_router.delete("/relatorios/{relatorio_id}")
 async def excluir_relatorio(
@@ -6197,16 +6027,13 @@ async def importar_combustivel_excel(
     - Ligação ao veículo por matrícula
     """
     try:
-        import openpyxl
-        from io import BytesIO
-        
-        # Carregar workbook
-        wb = openpyxl.load_workbook(BytesIO(file_content))
-        sheet = wb.active
+        # Carregar workbook no pool de processos
+        sheet = await executor_service.executar_cpu(ler_folha_excel, file_content)
         
         sucesso = 0
         erros = 0
         erros_detalhes = []
+        documentos_importados = []
         
         # Ler linha 4 como cabeçalho (primeiras 3 linhas são ignoradas)
         header_row = list(sheet.iter_rows(min_row=4, max_row=4, values_only=True))[0]
@@ -6462,6 +6289,7 @@ async def importar_combustivel_excel(
                 
                 # Inserir na coleção
                 await db.abastecimentos_combustivel.insert_one(documento)
+                documentos_importados.append(documento)
                 sucesso += 1
                 
             except Exception as e:
@@ -6469,6 +6297,8 @@ async def importar_combustivel_excel(
                 erros_detalhes.append(f"Linha {row_num}: {str(e)}")
                 logger.error(f"Erro ao processar linha {row_num}: {str(e)}")
         
+        await ledger_semanal.invalidar_registos(db, documentos_importados)
+        
         # Criar relatórios de rascunho automaticamente
         info_rascunhos = None
         if sucesso > 0 and periodo_inicio and periodo_fim:
@@ -6493,6 +6323,8 @@ async def importar_combustivel_excel(
             "rascunhos": info_rascunhos
         }
         
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Erro ao importar Excel combustível: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao processar ficheiro Excel: {str(e)}")
@@ -6515,13 +6347,10 @@ async def importar_carregamentos_excel(
     - Cria relatório detalhado após importação
     """
     try:
-        import openpyxl
-        from io import BytesIO
         from datetime import datetime, timezone
         
-        # Carregar workbook
-        wb = openpyxl.load_workbook(BytesIO(file_content))
-        sheet = wb.active
+        # Carregar workbook no pool de processos
+        sheet = await executor_service.executar_cpu(ler_folha_excel, file_content)
         
         sucesso = 0
         erros = 0
@@ -6749,6 +6578,8 @@ async def importar_carregamentos_excel(
                 logger.error(f"❌ Erro linha {row_num}: {str(e)}")
                 continue
         
+        await ledger_semanal.invalidar_registos(db, registos_importados)
+        
         # Calcular totais
         total_despesas = sum(r['valor_total_com_taxas'] for r in registos_importados)
         total_energia = sum(r['energia_kwh'] for r in registos_importados)
@@ -6809,6 +6640,8 @@ async def importar_carregamentos_excel(
             "despesas_por_motorista": list(despesas_por_motorista.values())
         }
         
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"❌ Erro ao processar Excel de carregamentos: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Erro ao processar Excel: {str(e)}")
@@ -6855,6 +6688,7 @@ async def importar_carregamentos_csv(
         erros = 0
         erros_detalhes = []
         registos_importados = []
+        registos_gravados = []
         total_despesas = 0.0
         total_energia = 0.0
         despesas_por_motorista = {}
@@ -6977,6 +6811,7 @@ async def importar_carregamentos_csv(
                 # Save to collection
                 await db.despesas_combustivel.insert_one(registo)
                 registos_importados.append(registo_id)
+                registos_gravados.append(registo)
                 sucesso += 1
                 total_despesas += valor_total
                 total_energia += energia
@@ -6999,6 +6834,8 @@ async def importar_carregamentos_csv(
                 erros += 1
                 erros_detalhes.append(f"Linha {row_num}: {str(e)}")
         
+        await ledger_semanal.invalidar_registos(db, registos_gravados)
+        
         logger.info(f"📊 IMPORTAÇÃO CARREGAMENTOS CSV - {sucesso} sucesso, {erros} erros, Total: €{total_despesas:.2f}")
         
         return {
@@ -7033,17 +6870,14 @@ async def importar_viaverde_excel(
     - Valida que ambos (OBU + matrícula) estão corretos
     """
     try:
-        import openpyxl
-        from io import BytesIO
-        
-        # Carregar workbook
-        wb = openpyxl.load_workbook(BytesIO(file_content))
-        sheet = wb.active
+        # Carregar workbook no pool de processos
+        sheet = await executor_service.executar_cpu(ler_folha_excel, file_content)
         
         sucesso = 0
         erros = 0
         erros_detalhes = []
         avisos = []  # Avisos de validação (OBU/matrícula diferentes)
+        documentos_importados = []
         
         # Ler linha 1 como cabeçalho
         header_row = list(sheet.iter_rows(min_row=1, max_row=1, values_only=True))[0]
@@ -7238,6 +7072,7 @@ async def importar_viaverde_excel(
                 
                 # Inserir na coleção
                 await db.portagens_viaverde.insert_one(documento)
+                documentos_importados.append(documento)
                 sucesso += 1
                 
                 # Se o motorista tem acumular_viaverde activo, usar o acumulado para pagar esta portagem
@@ -7281,6 +7116,8 @@ async def importar_viaverde_excel(
                 erros_detalhes.append(f"Linha {row_num}: {str(e)}")
                 logger.error(f"Erro ao processar linha {row_num}: {str(e)}")
         
+        await ledger_semanal.invalidar_registos(db, documentos_importados)
+        
         # Preparar resposta com avisos
         response = {
             "message": f"Importação Via Verde: {sucesso} sucesso(s), {erros} erro(s)",
@@ -7311,6 +7148,8 @@ async def importar_viaverde_excel(
         
         return response
         
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Erro ao importar Excel Via Verde: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao processar ficheiro Excel: {str(e)}")
@@ -7715,10 +7554,7 @@ async def importar_plataforma(
         if plataforma == 'viaverde' and (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
             # Detectar tipo de Excel (carregamentos ou portagens)
             # Carregar para verificar colunas - procurar header nas primeiras 10 linhas
-            import openpyxl
-            from io import BytesIO
-            wb = openpyxl.load_workbook(BytesIO(content))
-            sheet = wb.active
+            sheet = await executor_service.executar_cpu(ler_folha_excel, content)
             
             # Procurar header nas primeiras 10 linhas
             header = []
@@ -7805,6 +7641,21 @@ async def importar_plataforma(
         
         colecao = colecao_map[plataforma]
         
+        # Carregar motoristas, veículos e cartões de frota uma única vez
+        from services.importacao_lookup import ImportLookup
+        from pymongo import InsertOne, UpdateOne
+        from pymongo.errors import BulkWriteError
+        
+        lookup = await ImportLookup.carregar(
+            db,
+            parceiro_id=current_user["id"] if current_user["role"] == UserRole.PARCEIRO else None
+        )
+        
+        # Operações de escrita acumuladas (um único bulk_write ordenado no fim)
+        operacoes = []
+        operacoes_linhas = []
+        documentos_gravados = []
+        
         for row_num, row in enumerate(csv_reader, start=2):
             try:
                 # Inicializar variáveis para cada linha
@@ -7845,10 +7696,7 @@ async def importar_plataforma(
                     
                     if uuid_motorista:
                         # Buscar com UUID normalizado (case-insensitive)
-                        motorista = await db.motoristas.find_one(
-                            {"$expr": {"$eq": [{"$toLower": "$uuid_motorista_uber"}, uuid_motorista]}}, 
-                            {"_id": 0}
-                        )
+                        motorista = lookup.motorista_por_uuid_uber(uuid_motorista)
                         if motorista:
                             logger.info(f"✅ Uber - Motorista encontrado por UUID: {motorista.get('name')} (UUID: {uuid_motorista})")
                         else:
@@ -7861,44 +7709,8 @@ async def importar_plataforma(
                         nome_proprio = row.get('Nome próprio do motorista', '').strip()
                         apelido = row.get('Apelido do motorista', '').strip()
                         if nome_proprio and apelido:
-                            # Normalizar espaços
-                            nome_proprio_norm = ' '.join(nome_proprio.split())
-                            apelido_norm = ' '.join(apelido.split())
-                            
-                            # Remover sufixos empresariais comuns do apelido para melhor correspondência
-                            sufixos_remover = ['Lda', 'LDA', 'UNIPESSOAL', 'Unipessoal', 'SA', 'S.A.', 'LTD']
-                            apelido_limpo = apelido_norm
-                            for sufixo in sufixos_remover:
-                                apelido_limpo = re.sub(rf'\b{re.escape(sufixo)}\b', '', apelido_limpo, flags=re.IGNORECASE).strip()
-                            
-                            # Construir queries de busca flexíveis
-                            queries = []
-                            
-                            # 1. Correspondência exata nome + apelido
-                            queries.append({"name": {"$regex": f"^{re.escape(nome_proprio_norm)}\\s+{re.escape(apelido_norm)}$", "$options": "i"}})
-                            
-                            # 2. Correspondência com apelido limpo (sem sufixos empresariais)
-                            if apelido_limpo and apelido_limpo != apelido_norm:
-                                queries.append({"name": {"$regex": f"^{re.escape(nome_proprio_norm)}\\s+{re.escape(apelido_limpo)}$", "$options": "i"}})
-                            
-                            # 3. Nome completo contém ambas as partes
-                            queries.append({"$and": [
-                                {"name": {"$regex": re.escape(nome_proprio_norm), "$options": "i"}},
-                                {"name": {"$regex": re.escape(apelido_norm.split()[0] if apelido_norm else ''), "$options": "i"}}
-                            ]})
-                            
-                            # 4. Buscar apenas pelo nome próprio se apelido for empresarial
-                            palavras_apelido = apelido_norm.upper().split()
-                            if any(sufixo in palavras_apelido for sufixo in ['LDA', 'UNIPESSOAL', 'SA']):
-                                queries.append({"name": {"$regex": f"^{re.escape(nome_proprio_norm)}", "$options": "i"}})
-                            
-                            # 5. Tentar com o campo 'nome' também
-                            queries.append({"nome": {"$regex": f"^{re.escape(nome_proprio_norm)}\\s+{re.escape(apelido_norm)}$", "$options": "i"}})
-                            
-                            motorista = await db.motoristas.find_one(
-                                {"$or": queries},
-                                {"_id": 0}
-                            )
+                            # Nome exato, apelido sem sufixos empresariais, nome contém ambas as partes...
+                            motorista = lookup.motorista_por_nome_uber(nome_proprio, apelido)
                     
                     # Se ainda não encontrou, criar erro informativo
                     if not motorista:
@@ -7941,35 +7753,23 @@ async def importar_plataforma(
                     
                     # 1. Tentar por "Identificador do motorista" (UUID como bc38e1c2-de73-45ed-ac13-1f94b5a5f053)
                     if identificador_motorista_bolt:
-                        motorista = await db.motoristas.find_one(
-                            {"$or": [
-                                {"identificador_motorista_bolt": identificador_motorista_bolt},
-                                {"id": identificador_motorista_bolt}
-                            ]},
-                            {"_id": 0}
-                        )
+                        motorista = lookup.motorista_por_id_bolt(identificador_motorista_bolt)
                         if motorista:
                             logger.info(f"✅ Motorista encontrado por Identificador do motorista (UUID): {motorista.get('name')}")
                     
                     # 2. Tentar por "Identificador individual"
                     if not motorista and identificador_individual:
-                        motorista = await db.motoristas.find_one(
-                            {"identificador_motorista_bolt": identificador_individual}, 
-                            {"_id": 0}
-                        )
+                        motorista = lookup.motoristas_por_bolt.get(identificador_individual)
                         if motorista:
                             logger.info(f"✅ Motorista encontrado por identificador individual: {motorista.get('name')}")
                     
                     if not motorista and motorista_email:
-                        motorista = await db.motoristas.find_one({"email": motorista_email}, {"_id": 0})
+                        motorista = lookup.motorista_por_email(motorista_email)
                         if motorista:
                             logger.info(f"✅ Motorista encontrado por email: {motorista.get('name')}")
                     
                     if not motorista and nome_motorista:
-                        motorista = await db.motoristas.find_one(
-                            {"name": {"$regex": f"^{re.escape(nome_motorista)}$", "$options": "i"}}, 
-                            {"_id": 0}
-                        )
+                        motorista = lookup.motorista_por_nome_exato(nome_motorista)
                         if motorista:
                             logger.info(f"✅ Motorista encontrado por nome: {motorista.get('name')}")
                     
@@ -7996,10 +7796,7 @@ async def importar_plataforma(
                     matricula_limpa = partes[-1] if partes else matricula_gps
                     
                     # Buscar veículo por matrícula
-                    vehicle = await db.vehicles.find_one(
-                        {"matricula": {"$regex": f"^{re.escape(matricula_limpa)}$", "$options": "i"}},
-                        {"_id": 0}
-                    )
+                    vehicle = lookup.vehicle_por_matricula(matricula_limpa)
                     
                     if not vehicle:
                         erros += 1
@@ -8008,10 +7805,7 @@ async def importar_plataforma(
                     
                     # Buscar motorista atribuído ao veículo
                     if vehicle.get('motorista_atribuido'):
-                        motorista = await db.motoristas.find_one(
-                            {"id": vehicle['motorista_atribuido']},
-                            {"_id": 0}
-                        )
+                        motorista = lookup.motorista_por_id(vehicle['motorista_atribuido'])
                         if motorista:
                             motorista_email = motorista.get("email", "")
                             logger.info(f"✅ GPS - Veículo {matricula_limpa}: motorista {motorista.get('name')} encontrado")
@@ -8032,7 +7826,7 @@ async def importar_plataforma(
                             erros_detalhes.append(f"Linha {row_num}: Email do motorista vazio")
                             continue
                         
-                        motorista = await db.motoristas.find_one({"email": motorista_email}, {"_id": 0})
+                        motorista = lookup.motorista_por_email(motorista_email)
                         if not motorista:
                             erros += 1
                             erros_detalhes.append(f"Linha {row_num}: Motorista {motorista_email} não encontrado")
@@ -8269,20 +8063,14 @@ async def importar_plataforma(
                         
                         if card_code:
                             # 1. Buscar cartão de frota pelo número
-                            cartao_frota = await db.cartoes_frota.find_one(
-                                {"numero_cartao": card_code, "tipo": "eletrico"},
-                                {"_id": 0}
-                            )
+                            cartao_frota = lookup.cartao_frota(card_code, "eletrico")
                             
                             if cartao_frota:
                                 logger.info(f"✅ Cartão de frota encontrado: {card_code}")
                                 
                                 # 2. Buscar motorista pelo cartão
                                 if cartao_frota.get('motorista_atribuido'):
-                                    motorista_temp = await db.motoristas.find_one(
-                                        {"id": cartao_frota['motorista_atribuido']},
-                                        {"_id": 0}
-                                    )
+                                    motorista_temp = lookup.motorista_por_id(cartao_frota['motorista_atribuido'])
                                     if motorista_temp:
                                         motorista = motorista_temp
                                         logger.info(f"✅ Motorista encontrado via cartão: {motorista.get('name')}")
@@ -8290,10 +8078,7 @@ async def importar_plataforma(
                                     logger.warning(f"⚠️ Cartão {card_code} não está atribuído a nenhum motorista")
                             else:
                                 # Fallback: Tentar buscar motorista diretamente (novo campo)
-                                motorista_temp = await db.motoristas.find_one(
-                                    {"cartao_eletrico_id": card_code},
-                                    {"_id": 0}
-                                )
+                                motorista_temp = lookup.motorista_por_cartao_eletrico(card_code)
                                 if motorista_temp:
                                     motorista = motorista_temp
                                     logger.info(f"✅ Motorista encontrado diretamente por cartao_eletrico_id: {motorista.get('name')}")
@@ -8317,10 +8102,7 @@ async def importar_plataforma(
                         # 3. Obter veículo do motorista (opcional, para informação)
                         motorista_email = motorista.get("email", "")
                         if motorista.get('veiculo_atribuido'):
-                            vehicle = await db.vehicles.find_one(
-                                {"id": motorista['veiculo_atribuido']},
-                                {"_id": 0}
-                            )
+                            vehicle = lookup.vehicle_por_id(motorista['veiculo_atribuido'])
                             if vehicle:
                                 logger.info(f"✅ Carregamento - Veículo: {vehicle.get('matricula')}")
                         else:
@@ -8519,41 +8301,53 @@ async def importar_plataforma(
                         "km_atual": to_int(row.get('km_atual', '0'))
                     })
                 
-                # Inserir na coleção apropriada (com verificação de duplicados)
-                # Verificar se já existe um registo idêntico para este motorista/semana/ano
-                existing_query = {
-                    "motorista_id": documento.get("motorista_id"),
-                    "semana": documento.get("semana"),
-                    "ano": documento.get("ano")
-                }
-                
-                # Para Bolt e Uber, verificar duplicados e atualizar em vez de criar novo
+                # Acumular escrita na coleção apropriada
+                # Para Bolt e Uber, atualizar o registo existente do motorista/semana/ano em vez de duplicar
                 if colecao in ['viagens_bolt', 'ganhos_uber'] and documento.get("motorista_id") and documento.get("semana"):
-                    existing = await db[colecao].find_one(existing_query)
-                    if existing:
-                        # Atualizar registo existente
-                        await db[colecao].update_one(
-                            {"_id": existing["_id"]},
-                            {"$set": documento}
-                        )
-                        logger.info(f"🔄 Atualizado na coleção '{colecao}': motorista={motorista.get('name') if motorista else 'N/A'}, semana={documento.get('semana')}")
-                        sucesso += 1
-                    else:
-                        # Criar novo registo
-                        result = await db[colecao].insert_one(documento)
-                        logger.info(f"📥 Inserido na coleção '{colecao}': motorista={motorista.get('name') if motorista else 'N/A'}")
-                        sucesso += 1
+                    operacoes.append(UpdateOne(
+                        {
+                            "motorista_id": documento.get("motorista_id"),
+                            "semana": documento.get("semana"),
+                            "ano": documento.get("ano")
+                        },
+                        {"$set": documento},
+                        upsert=True
+                    ))
                 else:
-                    # Para outras coleções, inserir normalmente
-                    result = await db[colecao].insert_one(documento)
-                    logger.info(f"📥 Inserido na coleção '{colecao}': motorista={motorista.get('name') if motorista else 'N/A'}")
-                    sucesso += 1
+                    operacoes.append(InsertOne(documento))
+                operacoes_linhas.append(row_num)
+                documentos_gravados.append(documento)
+                sucesso += 1
                 
             except Exception as e:
                 erros += 1
                 erros_detalhes.append(f"Linha {row_num}: {str(e)}")
                 logger.error(f"❌ Erro ao processar linha {row_num}: {str(e)}")
         
+        # Gravar todas as linhas resolvidas num único bulk_write ordenado
+        if operacoes:
+            try:
+                result = await db[colecao].bulk_write(operacoes, ordered=True)
+                logger.info(
+                    f"📥 Coleção '{colecao}': {result.inserted_count} inseridos, "
+                    f"{result.upserted_count} criados, {result.modified_count} atualizados"
+                )
+            except BulkWriteError as bwe:
+                # Escrita ordenada: a primeira falha interrompe as operações seguintes
+                primeiro_erro = bwe.details.get("writeErrors", [{}])[0]
+                indice = primeiro_erro.get("index", 0)
+                nao_gravadas = len(operacoes) - indice
+                sucesso -= nao_gravadas
+                erros += nao_gravadas
+                erros_detalhes.append(
+                    f"Linha {operacoes_linhas[indice]}: {primeiro_erro.get('errmsg', 'erro de escrita')} "
+                    f"({nao_gravadas} linha(s) não gravada(s))"
+                )
+                logger.error(f"❌ Erro no bulk_write de '{colecao}': {primeiro_erro}")
+            
+            if colecao in ledger_semanal.COLECOES_FONTE:
+                await ledger_semanal.invalidar_registos(db, documentos_gravados)
+        
         # Criar relatórios de rascunho automaticamente se houver sucesso
         info_rascunhos = None
         if sucesso > 0 and periodo_inicio and periodo_fim:
@@ -8604,6 +8398,8 @@ async def importar_plataforma(
         
         return resultado
         
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         print(f"Erro ao importar {plataforma}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao processar ficheiro: {str(e)}")
@@ -9330,9 +9126,13 @@ async def get_contrato(
 @api_router.get("/mensagens/motorista")
 async def get_mensagens_motorista(
     destinatario: str,
+    paginacao: Paginacao = Depends(),
     current_user: Dict = Depends(get_current_user)
 ):
-    """Get messages between motorista and destinatario (suporte or parceiro)"""
+    """
+    Get messages between motorista and destinatario (suporte or parceiro).
+    With limit/cursor returns pages from the newest message backwards
+    """
     if current_user["role"] != "motorista":
         raise HTTPException(status_code=403, detail="Apenas motoristas podem acessar")
     
@@ -9373,7 +9173,10 @@ async def get_mensagens_motorista(
         else:
             raise HTTPException(status_code=400, detail="Destinatário inválido")
         
-        mensagens = await db.mensagens.find(query, {"_id": 0}).sort("created_at", 1).to_list(1000)
+        if paginacao.ativa:
+            return paginacao.resposta(await paginar(db.mensagens, query, paginacao, ("created_at", -1)))
+        
+        mensagens = await db.mensagens.find(query, {"_id": 0}).sort("created_at", 1).to_list(None)
         return mensagens
         
     except Exception as e:
@@ -9783,6 +9586,7 @@ async def create_subscription(
             {"id": subscription_data.user_id},
             {"$set": {"subscription_id": existing["id"]}}
         )
+        user_cache.invalidar_utilizador(subscription_data.user_id)
         
         return UserSubscription(**{**existing, "plano_id": subscription_data.plano_id})
     
@@ -9807,6 +9611,7 @@ async def create_subscription(
         {"id": subscription_data.user_id},
         {"$set": {"subscription_id": subscription_dict["id"]}}
     )
+    user_cache.invalidar_utilizador(subscription_data.user_id)
     
     if isinstance(subscription_dict["created_at"], str):
         subscription_dict["created_at"] = datetime.fromisoformat(subscription_dict["created_at"])
@@ -10346,6 +10151,7 @@ async def forgot_password(email_data: Dict[str, str]):
             "senha_provisoria_criada_em": datetime.now(timezone.utc).isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(user["id"])
     
     # Also update in motoristas if exists
     await db.motoristas.update_one(
@@ -10812,6 +10618,7 @@ async def atribuir_plano_manual(
             "plano_valida_ate": data_expiracao.isoformat()
         }}
     )
+    user_cache.invalidar_utilizador(user_id)
     
     # Update specific collection based on user type
     if plano_type == "motorista":
@@ -10883,6 +10690,7 @@ async def ifthen_pay_callback(data: Dict[str, Any]):
                 {"id": subscription["user_id"]},
                 {"$set": {"subscription_id": subscription["id"]}}
             )
+            user_cache.invalidar_utilizador(subscription["user_id"])
     
     return {"status": "received"}
 
@@ -10986,6 +10794,7 @@ async def save_integracoes_config(
         {"$set": config_data},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Configuração salva com sucesso"}
 
@@ -11024,28 +10833,24 @@ async def save_email_config(
         {"$set": config_data},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Configuration saved successfully"}
 
 
 @api_router.get("/public/contacto")
-async def get_public_contacto():
-    """Get public contact information (no auth required)"""
-    config = await db.configuracoes.find_one({"tipo": "email"}, {"_id": 0})
-    if not config:
-        # Return default config
+async def get_public_contacto(request: Request):
+    """Get public contact information (no auth required), cached with ETag"""
+    async def carregar():
+        config = await db.configuracoes.find_one({"tipo": "email"}, {"_id": 0}) or {}
         return {
-            "email_contacto": "info@tvdefleet.com",
-            "telefone_contacto": "+351 912 345 678",
-            "morada_empresa": "Lisboa, Portugal",
-            "nome_empresa": "TVDEFleet"
+            "email_contacto": config.get("email_contacto", "info@tvdefleet.com"),
+            "telefone_contacto": config.get("telefone_contacto", "+351 912 345 678"),
+            "morada_empresa": config.get("morada_empresa", "Lisboa, Portugal"),
+            "nome_empresa": config.get("nome_empresa", "TVDEFleet")
         }
-    return {
-        "email_contacto": config.get("email_contacto", "info@tvdefleet.com"),
-        "telefone_contacto": config.get("telefone_contacto", "+351 912 345 678"),
-        "morada_empresa": config.get("morada_empresa", "Lisboa, Portugal"),
-        "nome_empresa": config.get("nome_empresa", "TVDEFleet")
-    }
+    
+    return await cache_config.responder(request, db, cache_config.CONFIGURACOES, "contacto", carregar)
 
 
 # ==================== PUBLIC ENDPOINTS (NO AUTH) ====================
@@ -11302,7 +11107,7 @@ async def agendar_sincronizacao(credencial_id: str, horario: str, frequencia_dia
         # Se frequencia_dias > 6, usamos IntervalTrigger em vez de CronTrigger
         if frequencia_dias <= 6:
             scheduler.add_job(
-                executar_sincronizacao_automatica,
+                executar_sincronizacao_agendada,
                 CronTrigger(hour=hora, minute=minuto, day_of_week=f'*/{frequencia_dias}' if frequencia_dias <= 6 else '*'),
                 id=job_id,
                 args=[credencial_id],
@@ -11312,7 +11117,7 @@ async def agendar_sincronizacao(credencial_id: str, horario: str, frequencia_dia
             # Para frequências maiores que 6 dias, usar IntervalTrigger
             from apscheduler.triggers.interval import IntervalTrigger
             scheduler.add_job(
-                executar_sincronizacao_automatica,
+                executar_sincronizacao_agendada,
                 IntervalTrigger(days=frequencia_dias, start_date=datetime.now(timezone.utc).replace(hour=hora, minute=minuto)),
                 id=job_id,
                 args=[credencial_id],
@@ -11324,6 +11129,17 @@ async def agendar_sincronizacao(credencial_id: str, horario: str, frequencia_dia
     except Exception as e:
         logger.error(f"Erro ao agendar sincronização: {e}")
 
+async def executar_sincronizacao_agendada(credencial_id: str):
+    """
+    APScheduler fires the same cron job on every node; only the node that
+    claims the lease runs the sync, and the lease stays reserved for an hour
+    so nodes firing late skip it.
+    """
+    await lideranca.executar_exclusivo(
+        db, f"sync:{credencial_id}", executar_sincronizacao_automatica, credencial_id,
+        reserva_segundos=60 * 60,
+    )
+
 async def executar_sincronizacao_automatica(credencial_id: str):
     """Executa sincronização automática agendada"""
     try:
@@ -11500,6 +11316,8 @@ async def importar_ganhos_uber(
             except Exception as e:
                 erros.append(f"Linha {row_num}: {str(e)}")
         
+        await ledger_semanal.invalidar_registos(db, ganhos_importados)
+        
         # Serialize ganhos for response (remove _id and convert datetime)
         ganhos_serializados = []
         for g in ganhos_importados[:10]:
@@ -12278,7 +12096,11 @@ async def upload_recibo(
         
         # Process file
         file_id = f"recibo_{relatorio_id}_{uuid.uuid4()}"
-        file_info = await process_uploaded_file(file, recibos_dir, file_id)
+        file_info = await process_uploaded_file(
+            file, recibos_dir, file_id,
+            referencia={"colecao": "relatorios_ganhos", "filtro": {"id": relatorio_id}, "campo": "recibo_url"},
+            criado_por=current_user["id"]
+        )
         
         # Update relatorio
         update_data = {
@@ -12459,7 +12281,11 @@ async def marcar_pago(
         
         # Process file
         file_id = f"comprovativo_{relatorio_id}_{uuid.uuid4()}"
-        file_info = await process_uploaded_file(file, comprova_dir, file_id)
+        file_info = await process_uploaded_file(
+            file, comprova_dir, file_id,
+            referencia={"colecao": "relatorios_ganhos", "filtro": {"id": relatorio_id}, "campo": "comprovativo_pagamento_url"},
+            criado_por=current_user["id"]
+        )
         
         # Update relatorio
         update_data = {
@@ -12550,10 +12376,14 @@ async def upload_comprovativo_pagamento(
         
         # Process file
         file_id = f"comprovativo_{relatorio_id}_{uuid.uuid4()}"
-        file_info = await process_uploaded_file(file, comprova_dir, file_id)
+        file_info = await process_uploaded_file(
+            file, comprova_dir, file_id,
+            referencia={"colecao": "relatorios_ganhos", "filtro": {"id": relatorio_id}, "campo": "comprovativo_pagamento_url"},
+            criado_por=current_user["id"]
+        )
         
         # Update relatorio with comprovativo URL and change status to liquidado
-        comprovativo_url = file_info.get("pdf_path") or file_info.get("original_path")
+        comprovativo_url = file_info["saved_path"]
         update_data = {
             "comprovativo_pagamento_url": comprovativo_url,
             "status": "liquidado",  # Automatically set to liquidado when comprovativo is uploaded
@@ -12660,6 +12490,7 @@ app.include_router(auth_router, prefix="/api")
 app.include_router(motoristas_router, prefix="/api")
 app.include_router(notificacoes_router, prefix="/api")
 app.include_router(mensagens_router, prefix="/api")
+app.include_router(tempo_real_router, prefix="/api")
 app.include_router(ifthenpay_router)
 # NEW: Refactored modular routers
 app.include_router(parceiros_router, prefix="/api")
@@ -12728,6 +12559,7 @@ app.include_router(plataformas_router, prefix="/api")
 app.include_router(browser_virtual_admin_router, prefix="/api")
 app.include_router(contabilidade_router, prefix="/api")
 app.include_router(contabilistas_router, prefix="/api")
+app.include_router(tarefas_router, prefix="/api")
 app.include_router(migracao_router, prefix="/api/admin")
 
 # api_router will be included at the very end of the file, after all routes are defined
@@ -12777,35 +12609,29 @@ async def upload_documento(
         user_docs_dir = DOCUMENTOS_DIR / user_id
         user_docs_dir.mkdir(exist_ok=True)
         
-        # Salvar arquivo temporário
         file_extension = Path(file.filename).suffix.lower()
-        temp_file_path = user_docs_dir / f"{tipo_documento}_temp{file_extension}"
-        
-        with open(temp_file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        e_imagem = file_extension in ['.jpg', '.jpeg', '.png', '.webp', '.heic', '.heif']
+        if not e_imagem and file_extension != '.pdf':
+            raise HTTPException(status_code=400, detail="Formato de arquivo não suportado. Use PDF ou imagens.")
         
-        # Converter para PDF se for imagem
+        documento_id = str(uuid.uuid4())
         final_file_path = user_docs_dir / f"{tipo_documento}.pdf"
         
-        if file_extension in ['.jpg', '.jpeg', '.png', '.webp', '.heic', '.heif']:
-            # Converter imagem para PDF
-            await convert_image_to_pdf(temp_file_path, final_file_path)
-            temp_file_path.unlink()  # Remover arquivo temporário
-        elif file_extension == '.pdf':
-            # Renomear para o nome final
-            temp_file_path.rename(final_file_path)
+        if e_imagem:
+            # Guardar o original em disco; a conversão para PDF corre na fila de uploads
+            # e até lá o documento aponta para o original
+            temp_file_path = user_docs_dir / f"{tipo_documento}_{documento_id}{file_extension}"
+            await uploads_processamento.guardar_stream(file, temp_file_path)
         else:
-            temp_file_path.unlink()
-            raise HTTPException(status_code=400, detail="Formato de arquivo não suportado. Use PDF ou imagens.")
+            await uploads_processamento.guardar_stream(file, final_file_path)
         
         # Salvar no banco de dados
         documento = {
-            "id": str(uuid.uuid4()),
+            "id": documento_id,
             "user_id": user_id,
             "role": role,
             "tipo_documento": tipo_documento,
-            "file_path": str(final_file_path),
+            "file_path": str(temp_file_path if e_imagem else final_file_path),
             "filename": file.filename,
             "status": "pendente",
             "observacoes": None,
@@ -12828,14 +12654,36 @@ async def upload_documento(
             # Inserir novo documento
             await db.documentos_validacao.insert_one(documento)
         
+        processamento = None
+        if e_imagem:
+            processamento = await uploads_processamento.enfileirar(
+                db,
+                documento_id,
+                str(temp_file_path),
+                pdf=str(final_file_path),
+                referencia={
+                    "colecao": "documentos_validacao",
+                    # Um novo upload do mesmo tipo muda o id: o PDF deste já não é escrito
+                    "filtro": {"id": documento_id},
+                    "campo": "file_path",
+                    "valor_erro": str(temp_file_path),
+                    "valor_ok": str(final_file_path)
+                },
+                remover_origem=True,
+                criado_por=current_user["id"]
+            )
+        
         logger.info(f"Documento {tipo_documento} carregado para utilizador {user_id}")
         
         return {
             "message": "Documento carregado com sucesso",
             "documento_id": documento["id"],
-            "tipo_documento": tipo_documento
+            "tipo_documento": tipo_documento,
+            "processamento": processamento
         }
         
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Erro ao fazer upload de documento: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -13103,10 +12951,12 @@ async def download_documento(documento_id: str, current_user: Dict = Depends(get
         if not file_path.exists():
             raise HTTPException(status_code=404, detail="Arquivo não encontrado no servidor")
         
+        # Imagens ainda em conversão: serve-se o original
+        media_type, _ = mimetypes.guess_type(str(file_path))
         return FileResponse(
             path=file_path,
-            filename=f"{documento['tipo_documento']}.pdf",
-            media_type="application/pdf"
+            filename=f"{documento['tipo_documento']}{file_path.suffix}",
+            media_type=media_type or "application/pdf"
         )
         
     except HTTPException:
@@ -13211,6 +13061,7 @@ async def aprovar_todos_documentos(
                         {"id": user_id},
                         {"$set": {"plano_id": plano_base["id"]}}
                     )
+                    user_cache.invalidar_utilizador(user_id)
                     
                     logger.info(f"Plano base '{plano_base['nome']}' atribuído ao utilizador {user_id}")
         
@@ -13228,21 +13079,17 @@ async def aprovar_todos_documentos(
 # ==================== ENDPOINT PÚBLICO PARA TEXTOS ====================
 
 @api_router.get("/configuracoes/textos")
-async def get_textos_publicos():
-    """Obter textos de Termos e Privacidade (público)"""
-    try:
-        config = await db.configuracoes_sistema.find_one({}, {"_id": 0})
-        
-        if not config:
-            return {
-                "termos_condicoes": "Termos e Condições não configurados.",
-                "politica_privacidade": "Política de Privacidade não configurada."
-            }
-        
+async def get_textos_publicos(request: Request):
+    """Obter textos de Termos e Privacidade (público, em cache com ETag)"""
+    async def carregar():
+        config = await db.configuracoes_sistema.find_one({}, {"_id": 0}) or {}
         return {
             "termos_condicoes": config.get("termos_condicoes", "Termos e Condições não configurados."),
             "politica_privacidade": config.get("politica_privacidade", "Política de Privacidade não configurada.")
         }
+    
+    try:
+        return await cache_config.responder(request, db, cache_config.CONFIGURACOES, "textos", carregar)
     except Exception as e:
         logger.error(f"Erro ao buscar textos: {e}")
         return {
@@ -13352,6 +13199,7 @@ async def save_email_config(
             {"$set": config},
             upsert=True
         )
+        await cache_config.invalidar(db, cache_config.CONFIGURACOES)
         
         logger.info(f"Email configuration ({provider}) saved by {current_user['email']}")
         return {"message": "Email configuration saved successfully"}
@@ -13415,6 +13263,7 @@ async def update_email_status(
                 }
             }
         )
+        await cache_config.invalidar(db, cache_config.CONFIGURACOES)
         
         logger.info(f"Email service {'enabled' if enabled else 'disabled'} by {current_user['email']}")
         return {"message": f"Email service {'enabled' if enabled else 'disabled'} successfully"}
@@ -13550,12 +13399,15 @@ async def send_notification(
         logger.error(f"Error sending notification: {e}")
 
 @api_router.get("/termos-conteudo")
-async def get_termos_conteudo():
-    """Get Terms & Conditions content"""
-    doc = await db.configuracoes.find_one({"tipo": "termos"}, {"_id": 0})
-    if not doc:
-        return {"conteudo": "", "updated_at": None}
-    return {"conteudo": doc.get("conteudo", ""), "updated_at": doc.get("updated_at")}
+async def get_termos_conteudo(request: Request):
+    """Get Terms & Conditions content (cached with ETag)"""
+    async def carregar():
+        doc = await db.configuracoes.find_one({"tipo": "termos"}, {"_id": 0})
+        if not doc:
+            return {"conteudo": "", "updated_at": None}
+        return {"conteudo": doc.get("conteudo", ""), "updated_at": doc.get("updated_at")}
+    
+    return await cache_config.responder(request, db, cache_config.CONFIGURACOES, "termos", carregar)
 
 @api_router.put("/termos-conteudo")
 async def update_termos_conteudo(data: Dict[str, Any], current_user: Dict = Depends(get_current_user)):
@@ -13575,16 +13427,20 @@ async def update_termos_conteudo(data: Dict[str, Any], current_user: Dict = Depe
         {"$set": update_doc},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Termos atualizados com sucesso"}
 
 @api_router.get("/privacidade-conteudo")
-async def get_privacidade_conteudo():
-    """Get Privacy Policy content"""
-    doc = await db.configuracoes.find_one({"tipo": "privacidade"}, {"_id": 0})
-    if not doc:
-        return {"conteudo": "", "updated_at": None}
-    return {"conteudo": doc.get("conteudo", ""), "updated_at": doc.get("updated_at")}
+async def get_privacidade_conteudo(request: Request):
+    """Get Privacy Policy content (cached with ETag)"""
+    async def carregar():
+        doc = await db.configuracoes.find_one({"tipo": "privacidade"}, {"_id": 0})
+        if not doc:
+            return {"conteudo": "", "updated_at": None}
+        return {"conteudo": doc.get("conteudo", ""), "updated_at": doc.get("updated_at")}
+    
+    return await cache_config.responder(request, db, cache_config.CONFIGURACOES, "privacidade", carregar)
 
 @api_router.put("/privacidade-conteudo")
 async def update_privacidade_conteudo(data: Dict[str, Any], current_user: Dict = Depends(get_current_user)):
@@ -13604,6 +13460,7 @@ async def update_privacidade_conteudo(data: Dict[str, Any], current_user: Dict =
         {"$set": update_doc},
         upsert=True
     )
+    await cache_config.invalidar(db, cache_config.CONFIGURACOES)
     
     return {"message": "Política de Privacidade atualizada com sucesso"}
 
@@ -13733,45 +13590,23 @@ async def enviar_relatorio_email_massa(
     if len(usuario_ids) == 0:
         raise HTTPException(status_code=400, detail="No users selected")
     
-    collection = db.motoristas if tipo_usuario == "motorista" else db.parceiros
-    enviados = 0
-    erros = []
-    
-    for usuario_id in usuario_ids:
-        try:
-            usuario = await collection.find_one({"id": usuario_id}, {"_id": 0})
-            if not usuario:
-                usuario = await db.users.find_one({"id": usuario_id}, {"_id": 0})
-            
-            if not usuario or not usuario.get("email"):
-                erros.append(f"Utilizador {usuario_id}: sem email")
-                continue
-            
-            # Registar envio no histórico
-            historico_record = {
-                "id": str(uuid.uuid4()),
-                "usuario_id": usuario_id,
-                "tipo_usuario": tipo_usuario,
-                "tipo_envio": "email",
-                "destino": usuario.get("email"),
-                "data_inicio_relatorio": data_inicio,
-                "data_fim_relatorio": data_fim,
-                "data_envio": datetime.now(timezone.utc),
-                "status": "enviado",
-                "estado_relatorio": "enviado",
-                "enviado_por": current_user["id"]
-            }
-            await db.historico_relatorios.insert_one(historico_record)
-            enviados += 1
-            
-        except Exception as e:
-            erros.append(f"Utilizador {usuario_id}: {str(e)}")
-    
-    return {
-        "message": f"Relatórios enviados para {enviados} de {len(usuario_ids)} utilizadores",
-        "enviados": enviados,
-        "erros": erros
-    }
+    tarefa = await fila_tarefas.enfileirar(
+        db,
+        "relatorios.envio_massa",
+        {
+            "usuario_ids": usuario_ids,
+            "tipo_usuario": tipo_usuario,
+            "tipo_envio": "email",
+            "data_inicio": data_inicio,
+            "data_fim": data_fim,
+        },
+        criado_por=current_user["id"],
+        descricao=f"Envio email de relatórios para {len(usuario_ids)} utilizadores",
+        # No job-level retry: a late failure would send every report again
+        # (failed emails are retried one by one in services/envio_email.py)
+        max_tentativas=1,
+    )
+    return {"job_id": tarefa["id"], "estado": tarefa["estado"], "message": "Envio de relatórios iniciado"}
 
 @api_router.post("/relatorios/enviar-whatsapp-massa")
 async def enviar_relatorio_whatsapp_massa(
@@ -13793,45 +13628,23 @@ async def enviar_relatorio_whatsapp_massa(
     if len(usuario_ids) == 0:
         raise HTTPException(status_code=400, detail="No users selected")
     
-    collection = db.motoristas if tipo_usuario == "motorista" else db.parceiros
-    enviados = 0
-    erros = []
-    
-    for usuario_id in usuario_ids:
-        try:
-            usuario = await collection.find_one({"id": usuario_id}, {"_id": 0})
-            if not usuario:
-                usuario = await db.users.find_one({"id": usuario_id}, {"_id": 0})
-            
-            if not usuario or not usuario.get("telefone"):
-                erros.append(f"Utilizador {usuario_id}: sem telefone")
-                continue
-            
-            # Registar envio no histórico
-            historico_record = {
-                "id": str(uuid.uuid4()),
-                "usuario_id": usuario_id,
-                "tipo_usuario": tipo_usuario,
-                "tipo_envio": "whatsapp",
-                "destino": usuario.get("telefone"),
-                "data_inicio_relatorio": data_inicio,
-                "data_fim_relatorio": data_fim,
-                "data_envio": datetime.now(timezone.utc),
-                "status": "enviado",
-                "estado_relatorio": "enviado",
-                "enviado_por": current_user["id"]
-            }
-            await db.historico_relatorios.insert_one(historico_record)
-            enviados += 1
-            
-        except Exception as e:
-            erros.append(f"Utilizador {usuario_id}: {str(e)}")
-    
-    return {
-        "message": f"Relatórios enviados para {enviados} de {len(usuario_ids)} utilizadores",
-        "enviados": enviados,
-        "erros": erros
-    }
+    tarefa = await fila_tarefas.enfileirar(
+        db,
+        "relatorios.envio_massa",
+        {
+            "usuario_ids": usuario_ids,
+            "tipo_usuario": tipo_usuario,
+            "tipo_envio": "whatsapp",
+            "data_inicio": data_inicio,
+            "data_fim": data_fim,
+        },
+        criado_por=current_user["id"],
+        descricao=f"Envio whatsapp de relatórios para {len(usuario_ids)} utilizadores",
+        # No job-level retry: a late failure would send every report again
+        # (failed emails are retried one by one in services/envio_email.py)
+        max_tentativas=1,
+    )
+    return {"job_id": tarefa["id"], "estado": tarefa["estado"], "message": "Envio de relatórios iniciado"}
 
 @api_router.get("/relatorios/historico")
 async def get_historico_relatorios(
@@ -14546,6 +14359,7 @@ async def save_drive_config(
             {"$set": config},
             upsert=True
         )
+        await cache_config.invalidar(db, cache_config.CONFIGURACOES)
         
         logger.info(f"Google Drive configuration saved by {current_user['email']}")
         return {"message": "Google Drive configuration saved successfully"}
@@ -14869,62 +14683,93 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Background task for checking alerts
-import asyncio
+# Background periodic jobs
 from typing import AsyncGenerator
 
-async def check_alerts_periodically():
-    """Background task to check alerts every 6 hours"""
-    while True:
-        try:
-            logger.info("Running periodic alert check...")
-            await check_and_create_alerts()
-            logger.info("Alert check completed successfully")
-        except Exception as e:
-            logger.error(f"Error during periodic alert check: {e}")
-        
-        # Wait 6 hours before next check
-        await asyncio.sleep(6 * 60 * 60)
+async def run_alert_check():
+    """Periodic job: alert check on the due-date index (first run builds it if empty)"""
+    await vencimentos.garantir_indice(db)
+    logger.info("Running periodic alert check...")
+    await check_and_create_alerts()
+    logger.info("Alert check completed successfully")
+
+
+async def rebuild_due_dates():
+    """Periodic job: full rebuild of the due-date index to fix drift"""
+    await vencimentos.reconstruir_vencimentos(db)
 
 
-async def check_notifications_periodically():
-    """Background task to check and create notifications every 12 hours"""
+async def reconcile_dashboard_stats():
+    """Periodic job: fix drift in the materialised dashboard counters"""
+    await dashboard_stats.reconciliar_dashboard_stats(db)
+
+
+async def run_notification_check():
+    """Periodic job: check and create notifications"""
     from utils.notificacoes import check_documentos_expirando, check_recibos_pendentes
     
-    while True:
-        try:
-            logger.info("Running periodic notification check...")
-            await check_documentos_expirando(db)
-            await check_recibos_pendentes(db)
-            logger.info("Notification check completed successfully")
-        except Exception as e:
-            logger.error(f"Error during periodic notification check: {e}")
-        
-        # Wait 12 hours before next check
-        await asyncio.sleep(12 * 60 * 60)
+    logger.info("Running periodic notification check...")
+    await check_documentos_expirando(db)
+    await check_recibos_pendentes(db)
+    logger.info("Notification check completed successfully")
+
+
+# Periodic jobs run by exactly one node at a time (see services/lideranca.py)
+lideranca.registar("alertas", run_alert_check, vencimentos.PROCESSAMENTO_INTERVALO_HORAS * 60 * 60)
+lideranca.registar(
+    "vencimentos_reconstrucao",
+    rebuild_due_dates,
+    vencimentos.RECONSTRUCAO_INTERVALO_HORAS * 60 * 60,
+    atraso_inicial=vencimentos.RECONSTRUCAO_INTERVALO_HORAS * 60 * 60,
+)
+lideranca.registar("notificacoes", run_notification_check, 12 * 60 * 60)
+lideranca.registar("dashboard_stats", reconcile_dashboard_stats, dashboard_stats.RECONCILIACAO_INTERVALO_HORAS * 60 * 60)
+lideranca.registar("rpa_agendamentos", rpa_scheduler.verificar_e_executar_agendamentos, rpa_scheduler.INTERVALO_MINUTOS * 60)
 
 @app.on_event("startup")
 async def startup_event():
     """Run startup tasks"""
-    # Run initial alert check
+    # Open shared keep-alive HTTP clients for cloud storage and integrations
+    await clientes_http.iniciar()
+    
+    # Reconcile MongoDB indexes declared in utils/indexes.py
     try:
-        logger.info("Running initial alert check...")
-        await check_and_create_alerts()
-        logger.info("Initial alert check completed")
+        from utils.indexes import reconcile_indexes
+        await reconcile_indexes(db)
     except Exception as e:
-        logger.error(f"Error during initial alert check: {e}")
+        logger.error(f"Error reconciling indexes: {e}")
+    
+    # Start periodic jobs (alerts, notifications, dashboard counters, RPA agendamentos);
+    # each one runs only on the node holding its lease
+    lideranca.iniciar(db)
     
-    # Start background task for periodic checks
-    asyncio.create_task(check_alerts_periodically())
-    logger.info("Background alert checker started")
+    # Realtime channel: with TEMPO_REAL_BACKEND=mongo, relay events published by other workers
+    tempo_real.iniciar(db)
     
-    # Start background task for notifications
-    asyncio.create_task(check_notifications_periodically())
-    logger.info("Background notification checker started")
+    # Start job queue workers (FILA_TAREFAS_WORKERS=0 when running `python -m services.fila_tarefas` separately)
+    if fila_tarefas.FILA_TAREFAS_WORKERS > 0:
+        fila_tarefas.iniciar_workers(db)
+        logger.info(f"Job queue started with {fila_tarefas.FILA_TAREFAS_WORKERS} workers")
     
-    # Start scheduler for automatic sync
-    scheduler.start()
-    logger.info("Scheduler started for automatic platform sync")
+    # RPA runs have their own queue workers (RPA_WORKERS=0 to run them elsewhere)
+    if rpa_motor.RPA_WORKERS > 0:
+        fila_tarefas.iniciar_workers(db, rpa_motor.RPA_WORKERS, fila=rpa_motor.FILA)
+        logger.info(f"RPA queue started with {rpa_motor.RPA_WORKERS} workers")
+    
+    # Upload post-processing (image -> PDF, thumbnails) runs on its own queue
+    if uploads_processamento.UPLOADS_WORKERS > 0:
+        fila_tarefas.iniciar_workers(db, uploads_processamento.UPLOADS_WORKERS, fila=uploads_processamento.FILA)
+        logger.info(f"Upload processing queue started with {uploads_processamento.UPLOADS_WORKERS} workers")
+    
+    # Outgoing email batches (reports, bulk sends) and their retries
+    if envio_email.EMAIL_WORKERS > 0:
+        fila_tarefas.iniciar_workers(db, envio_email.EMAIL_WORKERS, fila=envio_email.FILA)
+        logger.info(f"Email queue started with {envio_email.EMAIL_WORKERS} workers")
+    
+    # Start scheduler for automatic sync (each firing is claimed by a single node)
+    if lideranca.AGENDADOR_ATIVO:
+        scheduler.start()
+        logger.info("Scheduler started for automatic platform sync")
     
     # Carregar jobs agendados do banco
     try:
@@ -14939,14 +14784,7 @@ async def startup_event():
         logger.info(f"Carregados {len(credenciais)} agendamentos de sincronização")
     except Exception as e:
         logger.error(f"Erro ao carregar agendamentos: {e}")
-    
-    # Iniciar scheduler de agendamentos RPA
-    try:
-        from services.rpa_scheduler import verificar_agendamentos_periodicamente
-        asyncio.create_task(verificar_agendamentos_periodicamente(intervalo_minutos=5))
-        logger.info("🤖 Scheduler de agendamentos RPA iniciado (verificação a cada 5 minutos)")
-    except Exception as e:
-        logger.error(f"Erro ao iniciar scheduler RPA: {e}")
+
 
 # ==================================================
 # SINCRONIZAÇÃO - MOVIDO PARA routes/sincronizacao.py
@@ -15487,8 +15325,8 @@ async def import_csv(
         # Obter parser adequado
         parser = get_parser(plataforma, file_content)
         
-        # Fazer parse
-        sucesso, registos, mensagem = parser.parse()
+        # Fazer parse no pool de processos (ficheiros GPS chegam a centenas de milhares de linhas)
+        sucesso, registos, mensagem = await executor_service.executar_cpu(parser.parse)
         
         if not sucesso:
             logger.error(f"❌ Erro no parse: {mensagem}")
@@ -15554,6 +15392,8 @@ async def import_csv(
         
     except HTTPException:
         raise
+    except executor_service.ExecutorSobrecarregado:
+        raise
     except Exception as e:
         logger.error(f"Erro ao importar CSV: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -15751,6 +15591,7 @@ async def sync_bolt_earnings(
                     "created_at": datetime.now(timezone.utc).isoformat()
                 }
                 await db.ganhos_bolt.insert_one(ganho_bolt)
+                await ledger_semanal.invalidar_registos(db, [ganho_bolt], parceiro_id=parceiro_id)
                 
                 # Atualizar log
                 await db.logs_sincronizacao_parceiro.update_one(
@@ -16149,6 +15990,7 @@ async def salvar_mapeamento_campos(
             }},
             upsert=True
         )
+        await cache_config.invalidar(db, cache_config.CONFIGURACOES)
         
         return {'success': True, 'message': 'Mapeamento salvo com sucesso'}
         
@@ -16202,6 +16044,7 @@ async def salvar_config_sincronizacao(
             }},
             upsert=True
         )
+        await cache_config.invalidar(db, cache_config.CONFIGURACOES)
         
         return {'success': True, 'message': 'Configuração salva com sucesso'}
         
@@ -16220,7 +16063,13 @@ app.include_router(api_router)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await lideranca.parar(db)
+    await tempo_real.parar()
+    await envio_email.encerrar()
     client.close()
+    executor_service.encerrar()
+    await clientes_http.encerrar()
+    await browser_pool.encerrar()
 
 # Endpoint temporário para download do backup da base de dados
 @app.get("/api/download-backup")
@@ -67,10 +67,18 @@ class AgendadorTarefas:
         # Verificar se deve enviar alertas de documentos
         if ALERTAS_HABILITADOS:
             if hora_local == ALERTAS_HORA:
-                # Verificar se já executou hoje
+                # Verificar se já executou hoje (neste ou noutro nó: o lease fica reservado)
                 if self.ultima_execucao_alertas is None or \
                    self.ultima_execucao_alertas.date() < agora.date():
-                    await self._enviar_alertas_documentos()
+                    from services import lideranca
+                    from utils.database import get_database
+                    
+                    await lideranca.executar_exclusivo(
+                        get_database(),
+                        "alertas_documentos",
+                        self._enviar_alertas_documentos,
+                        reserva_segundos=20 * 60 * 60,
+                    )
                     self.ultima_execucao_alertas = agora
     
     async def _enviar_alertas_documentos(self):
@@ -2,12 +2,14 @@
 Bolt Fleet API Integration Service
 Official API documentation: https://fleets.bolt.eu/api-docs
 """
-import aiohttp
 import asyncio
+import httpx
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional, List
 import logging
 
+from services import clientes_http
+
 logger = logging.getLogger(__name__)
 
 class BoltAPIClient:
@@ -21,38 +23,22 @@ class BoltAPIClient:
         self.client_secret = client_secret
         self._access_token: Optional[str] = None
         self._token_expires_at: Optional[datetime] = None
-        self._session: Optional[aiohttp.ClientSession] = None
-    
-    async def _get_session(self) -> aiohttp.ClientSession:
-        """Get or create aiohttp session"""
-        if self._session is None or self._session.closed:
-            # Use headers that mimic a real browser/application
-            connector = aiohttp.TCPConnector(ssl=False)
-            self._session = aiohttp.ClientSession(
-                connector=connector,
-                headers={
-                    'User-Agent': 'BoltFleetIntegration/1.0',
-                    'Accept': 'application/json',
-                }
-            )
-        return self._session
+        self._session = clientes_http.sessao("bolt")
+        # Token partilhado entre instâncias com as mesmas credenciais
+        self._token_key = clientes_http.tokens.chave("bolt", client_id, client_secret)
     
     async def close(self):
-        """Close the session"""
-        if self._session and not self._session.closed:
-            await self._session.close()
+        """Kept for callers; the shared HTTP client is closed on application shutdown"""
+        pass
     
     async def _get_access_token(self) -> str:
         """Get access token, refreshing if needed"""
-        # Check if we have a valid token
-        if self._access_token and self._token_expires_at:
-            # Refresh 1 minute before expiration
-            if datetime.now(timezone.utc) < (self._token_expires_at - timedelta(minutes=1)):
-                return self._access_token
-        
-        # Get new token
-        session = await self._get_session()
-        
+        # Refresh 1 minute before expiration
+        self._access_token = await clientes_http.tokens.obter(self._token_key, self._request_access_token)
+        self._token_expires_at = clientes_http.tokens.expiracao(self._token_key)
+        return self._access_token
+    
+    async def _request_access_token(self):
         data = {
             'client_id': self.client_id,
             'client_secret': self.client_secret,
@@ -65,53 +51,43 @@ class BoltAPIClient:
         }
         
         try:
-            async with session.post(self.TOKEN_URL, data=data, headers=headers) as response:
-                response_text = await response.text()
-                
-                if response.status == 401:
-                    logger.error(f"Bolt auth failed (401): {response_text}")
-                    raise Exception("Credenciais inválidas. Verifique o Client ID e Client Secret.")
-                
-                if response.status == 403:
-                    logger.error(f"Bolt auth forbidden (403): {response_text}")
-                    raise Exception("Acesso negado. Verifique se a sua conta Bolt tem acesso à API Fleet Integration.")
-                
-                if response.status == 400:
-                    logger.error(f"Bolt bad request (400): {response_text}")
-                    try:
-                        error_json = await response.json()
-                        error_desc = error_json.get('error_description', error_json.get('error', response_text))
-                        raise Exception(f"Erro na requisição: {error_desc}")
-                    except:
-                        raise Exception(f"Erro na requisição: {response_text}")
-                
-                if response.status != 200:
-                    logger.error(f"Bolt token error: {response.status} - {response_text}")
-                    raise Exception(f"Erro ao obter token Bolt (HTTP {response.status})")
-                
+            response = await self._session.post(self.TOKEN_URL, data=data, headers=headers)
+            response_text = response.text
+            
+            if response.status_code == 401:
+                logger.error(f"Bolt auth failed (401): {response_text}")
+                raise Exception("Credenciais inválidas. Verifique o Client ID e Client Secret.")
+            
+            if response.status_code == 403:
+                logger.error(f"Bolt auth forbidden (403): {response_text}")
+                raise Exception("Acesso negado. Verifique se a sua conta Bolt tem acesso à API Fleet Integration.")
+            
+            if response.status_code == 400:
+                logger.error(f"Bolt bad request (400): {response_text}")
                 try:
-                    token_data = await response.json()
-                except:
-                    token_data = None
-                    # Try to parse the text response
-                    import json
-                    token_data = json.loads(response_text)
-                
-                self._access_token = token_data['access_token']
-                expires_in = token_data.get('expires_in', 600)  # Default 10 minutes
-                self._token_expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
-                
-                logger.info(f"Bolt token obtained, expires in {expires_in}s")
-                return self._access_token
+                    error_json = response.json()
+                    error_desc = error_json.get('error_description', error_json.get('error', response_text))
+                except ValueError:
+                    error_desc = response_text
+                raise Exception(f"Erro na requisição: {error_desc}")
+            
+            if response.status_code != 200:
+                logger.error(f"Bolt token error: {response.status_code} - {response_text}")
+                raise Exception(f"Erro ao obter token Bolt (HTTP {response.status_code})")
+            
+            token_data = response.json()
+            expires_in = token_data.get('expires_in', 600)  # Default 10 minutes
+            
+            logger.info(f"Bolt token obtained, expires in {expires_in}s")
+            return token_data['access_token'], expires_in
                 
-        except aiohttp.ClientError as e:
+        except httpx.HTTPError as e:
             logger.error(f"Bolt token request failed: {e}")
             raise Exception(f"Connection error getting Bolt token: {e}")
     
     async def _make_request(self, method: str, endpoint: str, params: Dict = None, json_data: Dict = None) -> Dict:
         """Make authenticated request to Bolt API"""
         token = await self._get_access_token()
-        session = await self._get_session()
         
         url = f"{self.API_BASE_URL}{endpoint}"
         headers = {
@@ -119,37 +95,26 @@ class BoltAPIClient:
             'Content-Type': 'application/json'
         }
         
+        # Bolt Fleet API endpoints are read-only POSTs: safe to retry on 429/5xx
         try:
-            async with session.request(method, url, headers=headers, params=params, json=json_data) as response:
-                if response.status == 401:
-                    # Token expired, clear and retry once
-                    self._access_token = None
-                    self._token_expires_at = None
-                    token = await self._get_access_token()
-                    headers['Authorization'] = f'Bearer {token}'
-                    async with session.request(method, url, headers=headers, params=params, json=json_data) as retry_response:
-                        if retry_response.status != 200:
-                            error_text = await retry_response.text()
-                            raise Exception(f"Bolt API error after retry: {retry_response.status} - {error_text}")
-                        return await retry_response.json()
-                
-                if response.status == 429:
-                    # Rate limited - wait and retry
-                    logger.warning("Bolt API rate limited, waiting 2 seconds...")
-                    await asyncio.sleep(2)
-                    async with session.request(method, url, headers=headers, params=params, json=json_data) as retry_response:
-                        if retry_response.status != 200:
-                            error_text = await retry_response.text()
-                            raise Exception(f"Bolt API error: {retry_response.status} - {error_text}")
-                        return await retry_response.json()
-                
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"Bolt API error: {response.status} - {error_text}")
-                
-                return await response.json()
+            response = await self._session.request(method, url, headers=headers, params=params, json=json_data, repetir=True)
+            
+            if response.status_code == 401:
+                # Token expired, clear and retry once
+                clientes_http.tokens.invalidar(self._token_key)
+                token = await self._get_access_token()
+                headers['Authorization'] = f'Bearer {token}'
+                retry_response = await self._session.request(method, url, headers=headers, params=params, json=json_data, repetir=True)
+                if retry_response.status_code != 200:
+                    raise Exception(f"Bolt API error after retry: {retry_response.status_code} - {retry_response.text}")
+                return retry_response.json()
+            
+            if response.status_code != 200:
+                raise Exception(f"Bolt API error: {response.status_code} - {response.text}")
+            
+            return response.json()
                 
-        except aiohttp.ClientError as e:
+        except httpx.HTTPError as e:
             logger.error(f"Bolt API request failed: {e}")
             raise Exception(f"Connection error to Bolt API: {e}")
     
@@ -36,19 +36,18 @@ class BrowserInterativo:
         
     async def iniciar(self):
         """Iniciar browser com contexto persistente (sessão de 30 dias)"""
-        from playwright.async_api import async_playwright
+        from services import browser_pool
         
         # Criar directório de sessão
         os.makedirs(self.user_data_dir, exist_ok=True)
         
-        self.playwright = await async_playwright().start()
-        
         # Usar launch_persistent_context para manter sessão entre utilizações
         # Isto guarda cookies, localStorage, sessionStorage, IndexedDB - tudo!
         logger.info(f"Iniciando browser Uber com sessão persistente: {self.user_data_dir}")
         
-        self.context = await self.playwright.chromium.launch_persistent_context(
-            user_data_dir=self.user_data_dir,
+        # Driver Playwright partilhado (o contexto persistente tem o seu próprio Chromium)
+        self.context = await browser_pool.abrir_persistente(
+            self.user_data_dir,
             headless=True,
             viewport={"width": 1280, "height": 800},
             accept_downloads=True,
@@ -326,8 +325,6 @@ class BrowserInterativo:
             # Com launch_persistent_context, o context inclui o browser
             if self.context:
                 await self.context.close()
-            if self.playwright:
-                await self.playwright.stop()
             self.context = None
             self.page = None
             logger.info(f"Browser Uber fechado para parceiro {self.parceiro_id} (sessão persistente mantida)")
@@ -43,20 +43,19 @@ class BrowserInterativoPrio:
         Args:
             verificar_sessao_existente: Se True, verifica se já está logado antes de retornar
         """
-        from playwright.async_api import async_playwright
+        from services import browser_pool
         
         # Criar directórios necessários
         os.makedirs(self.download_path, exist_ok=True)
         os.makedirs(self.user_data_dir, exist_ok=True)
         
-        self.playwright = await async_playwright().start()
-        
         # Usar launch_persistent_context para manter sessão entre utilizações
         # Isto guarda cookies, localStorage, sessionStorage, IndexedDB - tudo!
         logger.info(f"Iniciando browser Prio com sessão persistente: {self.user_data_dir}")
         
-        self.context = await self.playwright.chromium.launch_persistent_context(
-            user_data_dir=self.user_data_dir,
+        # Driver Playwright partilhado (o contexto persistente tem o seu próprio Chromium)
+        self.context = await browser_pool.abrir_persistente(
+            self.user_data_dir,
             headless=True,
             viewport={"width": 1280, "height": 800},
             accept_downloads=True,
@@ -1082,8 +1081,6 @@ class BrowserInterativoPrio:
             
             if self.context:
                 await self.context.close()
-            if self.playwright:
-                await self.playwright.stop()
             
             self.context = None
             self.page = None
@@ -0,0 +1,242 @@
+"""
+Live-view dos browsers interativos (login Uber e Prio) por WebSocket.
+
+O frontend fazia polling de `/screenshot` a cada 2 s e cada ação devolvia
+um `page.screenshot()` da página inteira em base64 dentro de JSON: imagem
+atrasada, ~35% de bytes a mais e um screenshot completo por pedido.
+
+Aqui o Chromium empurra os frames (CDP `Page.startScreencast`) só quando a
+página muda, e `transmitir` envia-os ao cliente pelo mesmo WebSocket onde
+recebe os eventos de rato/teclado:
+
+- frames JPEG em mensagens binárias; as mensagens de texto são JSON
+  (`{"tipo": "viewport", ...}` quando o tamanho muda, `{"tipo": "erro"}`);
+- frames iguais ao anterior não são enviados e, se o cliente não acompanha,
+  só o frame mais recente segue (os intermédios são descartados);
+- qualidade adaptativa: desce quando o envio é lento ou há frames
+  descartados, sobe quando a ligação folga (`LIVE_QUALIDADE_MIN`..`MAX`);
+- eventos do cliente: `{"tipo": "clicar", "x", "y"}`, `{"tipo": "escrever",
+  "texto"}`, `{"tipo": "tecla", "tecla"}`, `{"tipo": "scroll", "dx", "dy"}`,
+  com coordenadas em píxeis da página (o `viewport` dá a escala);
+- o estado do login (`{"tipo": "estado", "logado", "url"}`) é verificado a
+  cada `LIVE_ESTADO_SEGUNDOS` e só enviado quando muda, em vez de vir em
+  cada resposta do polling.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LIVE_QUALIDADE_MIN = int(os.environ.get("LIVE_QUALIDADE_MIN", "30"))
+LIVE_QUALIDADE_MAX = int(os.environ.get("LIVE_QUALIDADE_MAX", "80"))
+LIVE_QUALIDADE_INICIAL = int(os.environ.get("LIVE_QUALIDADE_INICIAL", "60"))
+LIVE_LARGURA_MAX = int(os.environ.get("LIVE_LARGURA_MAX", "1280"))
+LIVE_ESTADO_SEGUNDOS = float(os.environ.get("LIVE_ESTADO_SEGUNDOS", "3"))
+
+# Envio acima disto (segundos) conta como lento; abaixo de _ENVIO_RAPIDO como folga
+_ENVIO_LENTO = 0.15
+_ENVIO_RAPIDO = 0.05
+_PASSO_QUALIDADE = 10
+_INTERVALO_AJUSTE = 2.0
+
+Acao = Callable[..., Awaitable[Any]]
+Estado = Callable[[], Awaitable[Dict[str, Any]]]
+
+_contadores = {"sessoes": 0, "frames_recebidos": 0, "frames_enviados": 0, "frames_iguais": 0,
+               "frames_descartados": 0, "bytes_enviados": 0, "ajustes_qualidade": 0}
+
+
+class LiveView:
+    """Screencast CDP de uma página Playwright, com o último frame pendente"""
+
+    def __init__(self, page, qualidade: int = LIVE_QUALIDADE_INICIAL):
+        self.page = page
+        self.qualidade = max(LIVE_QUALIDADE_MIN, min(LIVE_QUALIDADE_MAX, qualidade))
+        self.cdp = None
+        self.frame: Optional[bytes] = None
+        self.metadata: Dict[str, Any] = {}
+        self._novo = asyncio.Event()
+        self._hash_enviado: Optional[bytes] = None
+        self._ultimo_ajuste = 0.0
+        self._descartados = 0
+        self._rapidos = 0
+
+    async def iniciar(self):
+        self.cdp = await self.page.context.new_cdp_session(self.page)
+        self.cdp.on("Page.screencastFrame", self._ao_receber)
+        await self._arrancar()
+        _contadores["sessoes"] += 1
+
+    async def _arrancar(self):
+        await self.cdp.send("Page.startScreencast", {
+            "format": "jpeg",
+            "quality": self.qualidade,
+            "maxWidth": LIVE_LARGURA_MAX,
+            "maxHeight": LIVE_LARGURA_MAX,
+            "everyNthFrame": 1,
+        })
+
+    async def parar(self):
+        if self.cdp is None:
+            return
+        try:
+            await self.cdp.send("Page.stopScreencast")
+            await self.cdp.detach()
+        except Exception as e:
+            logger.debug(f"Live-view: erro ao parar screencast: {e}")
+        self.cdp = None
+
+    def _ao_receber(self, params: Dict[str, Any]):
+        # Confirmar já: o Chromium só envia o frame seguinte depois do ack
+        asyncio.ensure_future(self._ack(params["sessionId"]))
+        _contadores["frames_recebidos"] += 1
+        if self.frame is not None:
+            self._descartados += 1
+            _contadores["frames_descartados"] += 1
+        self.frame = base64.b64decode(params["data"])
+        self.metadata = params.get("metadata", {})
+        self._novo.set()
+
+    async def _ack(self, session_id: int):
+        try:
+            await self.cdp.send("Page.screencastFrameAck", {"sessionId": session_id})
+        except Exception:
+            pass
+
+    async def proximo_frame(self) -> bytes:
+        """Esperar pelo próximo frame diferente do último enviado"""
+        while True:
+            await self._novo.wait()
+            self._novo.clear()
+            frame, self.frame = self.frame, None
+            if frame is None:
+                continue
+            resumo = hashlib.blake2b(frame, digest_size=16).digest()
+            if resumo == self._hash_enviado:
+                _contadores["frames_iguais"] += 1
+                continue
+            self._hash_enviado = resumo
+            return frame
+
+    async def adaptar(self, duracao_envio: float):
+        """Ajustar a qualidade ao tempo de envio e aos frames descartados"""
+        lento = duracao_envio > _ENVIO_LENTO or self._descartados > 0
+        self._rapidos = 0 if lento else self._rapidos + (duracao_envio < _ENVIO_RAPIDO)
+        self._descartados = 0
+
+        agora = time.monotonic()
+        if agora - self._ultimo_ajuste < _INTERVALO_AJUSTE:
+            return
+        if lento:
+            qualidade = max(LIVE_QUALIDADE_MIN, self.qualidade - _PASSO_QUALIDADE)
+        elif self._rapidos >= 5:
+            qualidade = min(LIVE_QUALIDADE_MAX, self.qualidade + _PASSO_QUALIDADE)
+        else:
+            return
+        if qualidade == self.qualidade:
+            return
+        self.qualidade = qualidade
+        self._ultimo_ajuste = agora
+        self._rapidos = 0
+        _contadores["ajustes_qualidade"] += 1
+        await self.cdp.send("Page.stopScreencast")
+        await self._arrancar()
+
+
+async def aplicar_evento(page, acoes: Dict[str, Acao], evento: Dict[str, Any]):
+    """Executar um evento de input do cliente na página"""
+    tipo = evento.get("tipo")
+    if tipo == "clicar":
+        await acoes["clicar"](int(evento["x"]), int(evento["y"]))
+    elif tipo == "escrever" and evento.get("texto"):
+        await acoes["escrever"](evento["texto"])
+    elif tipo == "tecla" and evento.get("tecla"):
+        await acoes["tecla"](evento["tecla"])
+    elif tipo == "scroll":
+        await page.mouse.wheel(float(evento.get("dx", 0)), float(evento.get("dy", 0)))
+    else:
+        raise ValueError(f"Evento desconhecido: {tipo}")
+
+
+async def _enviar_frames(websocket, live: LiveView):
+    viewport = None
+    while True:
+        frame = await live.proximo_frame()
+        dimensoes = (live.metadata.get("deviceWidth"), live.metadata.get("deviceHeight"))
+        if dimensoes != viewport:
+            viewport = dimensoes
+            await websocket.send_text(json.dumps({
+                "tipo": "viewport", "largura": dimensoes[0], "altura": dimensoes[1],
+            }))
+        inicio = time.monotonic()
+        await websocket.send_bytes(frame)
+        _contadores["frames_enviados"] += 1
+        _contadores["bytes_enviados"] += len(frame)
+        await live.adaptar(time.monotonic() - inicio)
+
+
+async def _receber_eventos(websocket, page, acoes: Dict[str, Acao]):
+    while True:
+        mensagem = await websocket.receive()
+        if mensagem["type"] == "websocket.disconnect":
+            return
+        if not mensagem.get("text"):
+            continue
+        try:
+            await aplicar_evento(page, acoes, json.loads(mensagem["text"]))
+        except Exception as e:
+            logger.warning(f"Live-view: evento inválido: {e}")
+            await websocket.send_text(json.dumps({"tipo": "erro", "erro": str(e)}))
+
+
+async def _vigiar_estado(websocket, estado: Estado):
+    anterior = None
+    while True:
+        try:
+            atual = await estado()
+        except Exception as e:
+            logger.debug(f"Live-view: erro ao verificar estado: {e}")
+            atual = anterior
+        if atual != anterior:
+            anterior = atual
+            await websocket.send_text(json.dumps({"tipo": "estado", **atual}, default=str))
+        await asyncio.sleep(LIVE_ESTADO_SEGUNDOS)
+
+
+async def transmitir(websocket, page, acoes: Dict[str, Acao], estado: Optional[Estado] = None):
+    """
+    Servir o live-view de `page` num WebSocket já aceite até o cliente
+    desligar. `acoes`: clicar(x, y), escrever(texto) e tecla(tecla) do
+    browser interativo (mantêm o tratamento próprio de cada um, p.ex. SMS);
+    `estado`: devolve {"logado", "url", ...} para o frontend.
+    """
+    live = LiveView(page)
+    await live.iniciar()
+    tarefas = {
+        asyncio.create_task(_enviar_frames(websocket, live)),
+        asyncio.create_task(_receber_eventos(websocket, page, acoes)),
+    }
+    if estado is not None:
+        tarefas.add(asyncio.create_task(_vigiar_estado(websocket, estado)))
+    try:
+        feitas, _ = await asyncio.wait(tarefas, return_when=asyncio.FIRST_COMPLETED)
+        for tarefa in feitas:
+            erro = tarefa.exception()
+            if erro and not isinstance(erro, (RuntimeError, ConnectionError)):
+                logger.warning(f"Live-view terminado: {erro}")
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        await live.parar()
+
+
+def estatisticas() -> Dict[str, Any]:
+    return dict(_contadores)
@@ -0,0 +1,323 @@
+"""
+Pool partilhado de browsers Playwright para os executores RPA.
+
+Cada execução (RPAExecutor, UberRPA, Via Verde) arrancava o seu próprio
+driver Playwright e o seu Chromium: 1-3 s e 150+ MB por execução, e a
+sincronização nocturna de 60 parceiros lançava 60 Chromiums em simultâneo.
+Aqui há um driver por processo e no máximo `BROWSER_POOL_MAX_BROWSERS`
+Chromiums, cada um com até `BROWSER_POOL_CONTEXTOS_POR_BROWSER` contextos:
+
+- cada execução recebe um contexto isolado (cookies/storage próprios),
+  carregando o `storage_state` guardado do parceiro se existir;
+- com o pool cheio, `abrir_contexto` fica em fila até libertar um lugar;
+- browsers desligados (crash) são descartados antes de emprestar;
+- cada browser é reciclado depois de `BROWSER_POOL_RECICLAR_APOS`
+  contextos e fechado se ficar inativo `BROWSER_POOL_INATIVO_SEGUNDOS`.
+
+Os browsers interativos com sessão persistente (`launch_persistent_context`,
+um Chromium por user_data_dir) usam `abrir_persistente`, que partilha o
+driver mas não entra no limite: são sessões que o utilizador está a ver.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+os.environ.setdefault('PLAYWRIGHT_BROWSERS_PATH', '/pw-browsers')
+
+BROWSER_POOL_MAX_BROWSERS = int(os.environ.get("BROWSER_POOL_MAX_BROWSERS", "2"))
+BROWSER_POOL_CONTEXTOS_POR_BROWSER = int(os.environ.get("BROWSER_POOL_CONTEXTOS_POR_BROWSER", "3"))
+BROWSER_POOL_RECICLAR_APOS = int(os.environ.get("BROWSER_POOL_RECICLAR_APOS", "50"))
+BROWSER_POOL_INATIVO_SEGUNDOS = int(os.environ.get("BROWSER_POOL_INATIVO_SEGUNDOS", "300"))
+BROWSER_POOL_ESPERA_MAXIMA = int(os.environ.get("BROWSER_POOL_ESPERA_MAXIMA", "1800"))
+
+ARGS_CHROMIUM = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-infobars',
+    '--window-size=1920,1080',
+]
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class _BrowserPooled:
+    """Um Chromium do pool e os contextos que tem emprestados"""
+
+    def __init__(self, browser, headless: bool):
+        self.browser = browser
+        self.headless = headless
+        self.criado_em = _agora()
+        self.ultimo_uso = self.criado_em
+        self.ativos = 0
+        self.servidos = 0
+        self.reciclar = False
+
+    def saudavel(self) -> bool:
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
+    def disponivel(self, headless: bool) -> bool:
+        return (
+            self.headless == headless
+            and not self.reciclar
+            and self.ativos < BROWSER_POOL_CONTEXTOS_POR_BROWSER
+            and self.saudavel()
+        )
+
+
+class SessaoBrowser:
+    """Contexto emprestado pelo pool; `fechar()` devolve o lugar"""
+
+    def __init__(self, pool: "BrowserPool", entrada: _BrowserPooled, context, dono: Optional[str]):
+        self._pool = pool
+        self._entrada = entrada
+        self.browser = entrada.browser
+        self.context = context
+        self.dono = dono
+        self.fechada = False
+
+    async def fechar(self, guardar_sessao_em: Optional[str] = None):
+        """Fechar o contexto (guardando antes o storage_state, se pedido)"""
+        if self.fechada:
+            return
+        self.fechada = True
+        try:
+            if guardar_sessao_em:
+                await self.context.storage_state(path=guardar_sessao_em)
+            await self.context.close()
+        except Exception as e:
+            logger.warning(f"Erro ao fechar contexto do pool ({self.dono}): {e}")
+        finally:
+            await self._pool._devolver(self._entrada)
+
+
+class BrowserPool:
+    """Driver Playwright e Chromiums partilhados pelo processo"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._playwright = None
+        self._browsers: List[_BrowserPooled] = []
+        self._cond: Optional[asyncio.Condition] = None
+        self._limpeza: Optional[asyncio.Task] = None
+        self._persistentes = 0
+        self.em_espera = 0
+        self.lancados = 0
+        self.reciclados = 0
+        self.contextos = 0
+
+    def _preparar(self):
+        # Os objetos Playwright pertencem ao event loop que os criou
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._playwright = None
+            self._browsers = []
+            self._cond = asyncio.Condition()
+            self._limpeza = None
+
+    async def _driver(self):
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        return self._playwright
+
+    async def _fechar_browser(self, entrada: _BrowserPooled, motivo: str):
+        if entrada in self._browsers:
+            self._browsers.remove(entrada)
+        try:
+            await entrada.browser.close()
+        except Exception:
+            pass
+        logger.info(f"🧹 Browser do pool fechado ({motivo}, {entrada.servidos} contextos servidos)")
+
+    async def _descartar_mortos(self):
+        for entrada in list(self._browsers):
+            if not entrada.saudavel():
+                logger.warning("⚠️ Browser do pool desligado, a descartar")
+                self._browsers.remove(entrada)
+
+    def _pode_servir(self, headless: bool) -> bool:
+        if any(b.disponivel(headless) for b in self._browsers):
+            return True
+        if sum(1 for b in self._browsers if b.saudavel()) < BROWSER_POOL_MAX_BROWSERS:
+            return True
+        # Há um browser parado (ex. do outro modo headless) que pode dar lugar
+        return any(b.ativos == 0 for b in self._browsers)
+
+    async def _reservar(self, headless: bool) -> _BrowserPooled:
+        """Escolher ou lançar um browser e reservar um contexto (com a condição adquirida)"""
+        await self._descartar_mortos()
+        candidatos = [b for b in self._browsers if b.disponivel(headless)]
+        if candidatos:
+            entrada = min(candidatos, key=lambda b: b.ativos)
+        else:
+            if len(self._browsers) >= BROWSER_POOL_MAX_BROWSERS:
+                parado = next(b for b in self._browsers if b.ativos == 0)
+                await self._fechar_browser(parado, "lugar para outro browser")
+            try:
+                browser = await (await self._driver()).chromium.launch(headless=headless, args=ARGS_CHROMIUM)
+            except Exception as e:
+                # O driver Playwright pode ter morrido: reiniciar e tentar uma vez mais
+                logger.warning(f"Erro ao lançar browser do pool, a reiniciar o driver: {e}")
+                self._playwright = None
+                browser = await (await self._driver()).chromium.launch(headless=headless, args=ARGS_CHROMIUM)
+            entrada = _BrowserPooled(browser, headless)
+            self._browsers.append(entrada)
+            self.lancados += 1
+            logger.info(f"🌐 Browser do pool lançado ({len(self._browsers)}/{BROWSER_POOL_MAX_BROWSERS})")
+            self._iniciar_limpeza()
+
+        entrada.ativos += 1
+        entrada.servidos += 1
+        entrada.ultimo_uso = _agora()
+        if entrada.servidos >= BROWSER_POOL_RECICLAR_APOS:
+            entrada.reciclar = True
+        return entrada
+
+    async def abrir_contexto(
+        self,
+        headless: bool = True,
+        storage_state: Optional[str] = None,
+        dono: Optional[str] = None,
+        **opcoes_contexto: Any,
+    ) -> SessaoBrowser:
+        """
+        Abrir um contexto isolado num browser do pool, esperando em fila se
+        estiver cheio. `storage_state` é ignorado se o ficheiro não existir.
+        """
+        self._preparar()
+        if storage_state and not os.path.exists(storage_state):
+            storage_state = None
+
+        async with self._cond:
+            self.em_espera += 1
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self._pode_servir(headless)),
+                    timeout=BROWSER_POOL_ESPERA_MAXIMA,
+                )
+            finally:
+                self.em_espera -= 1
+            entrada = await self._reservar(headless)
+
+        try:
+            context = await entrada.browser.new_context(storage_state=storage_state, **opcoes_contexto)
+        except Exception:
+            await self._devolver(entrada)
+            raise
+        self.contextos += 1
+        return SessaoBrowser(self, entrada, context, dono)
+
+    async def _devolver(self, entrada: _BrowserPooled):
+        async with self._cond:
+            entrada.ativos = max(entrada.ativos - 1, 0)
+            entrada.ultimo_uso = _agora()
+            if entrada.ativos == 0 and (entrada.reciclar or not entrada.saudavel()):
+                if entrada.reciclar:
+                    self.reciclados += 1
+                await self._fechar_browser(entrada, "reciclado" if entrada.reciclar else "desligado")
+            self._cond.notify_all()
+
+    def _iniciar_limpeza(self):
+        if self._limpeza is None or self._limpeza.done():
+            self._limpeza = asyncio.create_task(self._limpar_inativos())
+
+    async def _limpar_inativos(self):
+        """Fechar browsers sem contextos há mais de BROWSER_POOL_INATIVO_SEGUNDOS"""
+        while self._browsers:
+            await asyncio.sleep(min(BROWSER_POOL_INATIVO_SEGUNDOS, 60))
+            async with self._cond:
+                agora = _agora()
+                for entrada in list(self._browsers):
+                    if entrada.ativos == 0 and (agora - entrada.ultimo_uso).total_seconds() >= BROWSER_POOL_INATIVO_SEGUNDOS:
+                        await self._fechar_browser(entrada, "inativo")
+                self._cond.notify_all()
+
+    async def abrir_persistente(self, user_data_dir: str, **opcoes: Any):
+        """`launch_persistent_context` com o driver partilhado (fora do limite do pool)"""
+        self._preparar()
+        driver = await self._driver()
+        context = await driver.chromium.launch_persistent_context(user_data_dir=user_data_dir, **opcoes)
+        self._persistentes += 1
+
+        def _fechado(_):
+            self._persistentes -= 1
+
+        context.on("close", _fechado)
+        return context
+
+    async def encerrar(self):
+        """Fechar todos os browsers e o driver (shutdown da aplicação)"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        if self._limpeza is not None:
+            self._limpeza.cancel()
+        for entrada in list(self._browsers):
+            await self._fechar_browser(entrada, "shutdown")
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    def estatisticas(self) -> Dict[str, Any]:
+        agora = _agora()
+        return {
+            "max_browsers": BROWSER_POOL_MAX_BROWSERS,
+            "contextos_por_browser": BROWSER_POOL_CONTEXTOS_POR_BROWSER,
+            "reciclar_apos": BROWSER_POOL_RECICLAR_APOS,
+            "em_espera": self.em_espera,
+            "lancados": self.lancados,
+            "reciclados": self.reciclados,
+            "contextos_abertos": self.contextos,
+            "persistentes_ativos": self._persistentes,
+            "browsers": [
+                {
+                    "headless": b.headless,
+                    "contextos_ativos": b.ativos,
+                    "contextos_servidos": b.servidos,
+                    "idade_segundos": int((agora - b.criado_em).total_seconds()),
+                    "a_reciclar": b.reciclar,
+                    "saudavel": b.saudavel(),
+                }
+                for b in self._browsers
+            ],
+        }
+
+
+pool = BrowserPool()
+
+
+async def abrir_contexto(
+    headless: bool = True,
+    storage_state: Optional[str] = None,
+    dono: Optional[str] = None,
+    **opcoes_contexto: Any,
+) -> SessaoBrowser:
+    """Contexto isolado num browser partilhado (fechar com `sessao.fechar()`)"""
+    return await pool.abrir_contexto(headless=headless, storage_state=storage_state, dono=dono, **opcoes_contexto)
+
+
+async def abrir_persistente(user_data_dir: str, **opcoes: Any):
+    return await pool.abrir_persistente(user_data_dir, **opcoes)
+
+
+async def encerrar():
+    await pool.encerrar()
+
+
+def estatisticas() -> Dict[str, Any]:
+    return pool.estatisticas()
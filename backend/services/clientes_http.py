@@ -0,0 +1,270 @@
+"""
+Clientes HTTP partilhados para armazenamento cloud e integrações externas.
+
+Cada chamada criava o seu `httpx.AsyncClient()` e pagava de novo DNS, TCP e
+TLS; sincronizar 2.000 documentos de um parceiro era dominado pelos
+handshakes. Este registo mantém um cliente por fornecedor, com pool de
+ligações keep-alive, e acrescenta:
+
+- limite de pedidos simultâneos por fornecedor;
+- repetição com backoff exponencial para erros de ligação e respostas
+  429/502/503/504 (respeitando `Retry-After`). Pedidos não idempotentes
+  (POST) só são repetidos se o pedido nem chegou a ser enviado;
+- `sessao(fornecedor)`: substituto de `async with httpx.AsyncClient()`
+  que usa o cliente partilhado;
+- `tokens`: cache de tokens OAuth com expiração, partilhada entre
+  instâncias dos clientes de cada integração.
+
+Os clientes são abertos no arranque (`iniciar`) e fechados no shutdown
+(`encerrar`); fora da API (worker da fila, scripts) são criados a pedido.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_CLIENTES_MAX_CONEXOES = int(os.environ.get("HTTP_CLIENTES_MAX_CONEXOES", "20"))
+HTTP_CLIENTES_TENTATIVAS = int(os.environ.get("HTTP_CLIENTES_TENTATIVAS", "3"))
+HTTP_CLIENTES_BACKOFF = float(os.environ.get("HTTP_CLIENTES_BACKOFF", "0.5"))
+
+STATUS_REPETIVEIS = {429, 502, 503, 504}
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Configuração por fornecedor: timeout, pedidos simultâneos e opções do httpx
+FORNECEDORES: Dict[str, Dict[str, Any]] = {
+    "onedrive": {"timeout": 60.0, "limite": 8},
+    "terabox": {"timeout": 300.0, "limite": 4, "follow_redirects": True},
+    "moloni": {"timeout": 30.0, "limite": 4},
+    "ifthenpay": {"timeout": 30.0, "limite": 4},
+    "bolt": {
+        "timeout": 30.0,
+        "limite": 4,
+        "verify": False,
+        "headers": {"User-Agent": "BoltFleetIntegration/1.0", "Accept": "application/json"},
+    },
+    "uber": {"timeout": 30.0, "limite": 4},
+    # Envios em massa (services/whatsapp_massa.py); HTTP/2 multiplexa os pedidos numa ligação
+    "whatsapp": {
+        "timeout": 30.0,
+        "limite": int(os.environ.get("WHATSAPP_CONCORRENCIA", "20")),
+        "http2": importlib.util.find_spec("h2") is not None,
+    },
+}
+
+
+class _Fornecedor:
+    """Cliente httpx de um fornecedor com limite de concorrência e métricas"""
+
+    def __init__(self, nome: str, config: Dict[str, Any]):
+        self.nome = nome
+        self.config = config
+        self._cliente: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pedidos = 0
+        self.repeticoes = 0
+        self.erros = 0
+        self.em_curso = 0
+
+    def cliente(self) -> httpx.AsyncClient:
+        if self._cliente is None or self._cliente.is_closed:
+            opcoes = {k: v for k, v in self.config.items() if k not in ("timeout", "limite")}
+            self._cliente = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.config.get("timeout", 30.0), connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=HTTP_CLIENTES_MAX_CONEXOES,
+                    max_keepalive_connections=HTTP_CLIENTES_MAX_CONEXOES,
+                ),
+                **opcoes,
+            )
+        return self._cliente
+
+    async def pedido(self, method: str, url: str, repetir: Optional[bool] = None, **kwargs) -> httpx.Response:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.config.get("limite", 4))
+        if repetir is None:
+            repetir = method.upper() in METODOS_IDEMPOTENTES
+
+        tentativa = 0
+        while True:
+            tentativa += 1
+            espera = HTTP_CLIENTES_BACKOFF * 2 ** (tentativa - 1) * (1 + random.random() / 2)
+            async with self._slots:
+                self.pedidos += 1
+                self.em_curso += 1
+                try:
+                    response = await self.cliente().request(method, url, **kwargs)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    # O pedido não chegou a ser enviado: seguro repetir qualquer método
+                    if tentativa >= HTTP_CLIENTES_TENTATIVAS:
+                        self.erros += 1
+                        raise
+                    logger.warning(f"{self.nome}: {type(e).__name__} em {method} {url}, tentativa {tentativa}")
+                    response = None
+                except httpx.TransportError:
+                    if not repetir or tentativa >= HTTP_CLIENTES_TENTATIVAS:
+                        self.erros += 1
+                        raise
+                    response = None
+                finally:
+                    self.em_curso -= 1
+
+            if response is not None:
+                if response.status_code not in STATUS_REPETIVEIS or not repetir or tentativa >= HTTP_CLIENTES_TENTATIVAS:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    espera = min(float(retry_after), 60.0)
+                logger.warning(f"{self.nome}: HTTP {response.status_code} em {method} {url}, a repetir em {espera:.1f}s")
+                await response.aclose()
+
+            self.repeticoes += 1
+            await asyncio.sleep(espera)
+
+    async def encerrar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "aberto": self._cliente is not None and not self._cliente.is_closed,
+            "limite": self.config.get("limite", 4),
+            "em_curso": self.em_curso,
+            "pedidos": self.pedidos,
+            "repeticoes": self.repeticoes,
+            "erros": self.erros,
+        }
+
+
+_fornecedores: Dict[str, _Fornecedor] = {nome: _Fornecedor(nome, config) for nome, config in FORNECEDORES.items()}
+
+
+def cliente(fornecedor: str) -> httpx.AsyncClient:
+    """Cliente httpx partilhado do fornecedor (não fechar: pertence ao registo)"""
+    return _fornecedores[fornecedor].cliente()
+
+
+async def pedido(fornecedor: str, method: str, url: str, repetir: Optional[bool] = None, **kwargs) -> httpx.Response:
+    """Pedido HTTP pelo cliente partilhado, com limite de concorrência e repetições"""
+    return await _fornecedores[fornecedor].pedido(method, url, repetir=repetir, **kwargs)
+
+
+class Sessao:
+    """
+    Interface tipo `httpx.AsyncClient` (get/post/put/delete/request) sobre o
+    cliente partilhado de um fornecedor. Pode ser usada em `async with` no
+    lugar de `httpx.AsyncClient()`; sair do bloco não fecha as ligações.
+    """
+
+    def __init__(self, fornecedor: str):
+        self._fornecedor = _fornecedores[fornecedor]
+
+    async def __aenter__(self) -> "Sessao":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await self._fornecedor.pedido(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+
+def sessao(fornecedor: str) -> Sessao:
+    """Sessão sobre o cliente partilhado do fornecedor"""
+    return Sessao(fornecedor)
+
+
+class CacheTokens:
+    """Tokens OAuth em memória por chave, renovados só quando expiram"""
+
+    def __init__(self):
+        self._tokens: Dict[Tuple, Tuple[str, datetime]] = {}
+        self._locks: Dict[Tuple, asyncio.Lock] = {}
+
+    @staticmethod
+    def chave(fornecedor: str, *partes: Optional[str]) -> Tuple:
+        """Chave sem segredos em claro (client_secret, refresh_token)"""
+        resumo = hashlib.sha256("\x00".join(p or "" for p in partes).encode()).hexdigest()[:32]
+        return (fornecedor, resumo)
+
+    def _valido(self, chave: Tuple) -> Optional[str]:
+        entrada = self._tokens.get(chave)
+        if entrada and datetime.now(timezone.utc) < entrada[1]:
+            return entrada[0]
+        return None
+
+    async def obter(
+        self,
+        chave: Tuple,
+        obter_novo: Callable[[], Awaitable[Tuple[str, int]]],
+        margem: int = 60,
+    ) -> str:
+        """
+        Devolver o token em cache ou pedir um novo. `obter_novo` devolve
+        `(token, expires_in)`; pedidos simultâneos para a mesma chave fazem
+        um único pedido de token. Só tokens obtidos com `expires_in` > 0 ficam
+        em cache: uma renovação falhada volta a ser tentada no pedido seguinte.
+        """
+        token = self._valido(chave)
+        if token:
+            return token
+        lock = self._locks.setdefault(chave, asyncio.Lock())
+        async with lock:
+            token = self._valido(chave)
+            if token:
+                return token
+            token, expires_in = await obter_novo()
+            if not token or not expires_in or int(expires_in) <= 0:
+                self._tokens.pop(chave, None)
+                return token
+            validade = max(int(expires_in) - margem, 0)
+            self._tokens[chave] = (token, datetime.now(timezone.utc) + timedelta(seconds=validade))
+            return token
+
+    def expiracao(self, chave: Tuple) -> Optional[datetime]:
+        entrada = self._tokens.get(chave)
+        return entrada[1] if entrada else None
+
+    def invalidar(self, chave: Tuple):
+        self._tokens.pop(chave, None)
+
+
+tokens = CacheTokens()
+
+
+async def iniciar():
+    """Abrir os clientes de todos os fornecedores (startup da aplicação)"""
+    for fornecedor in _fornecedores.values():
+        fornecedor.cliente()
+    logger.info(f"🌐 Clientes HTTP partilhados abertos: {', '.join(_fornecedores)}")
+
+
+async def encerrar():
+    """Fechar os clientes (shutdown da aplicação)"""
+    for fornecedor in _fornecedores.values():
+        await fornecedor.encerrar()
+
+
+def estatisticas() -> Dict[str, Any]:
+    return {nome: fornecedor.estatisticas() for nome, fornecedor in _fornecedores.items()}
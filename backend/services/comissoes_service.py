@@ -5,14 +5,19 @@ Inclui Sistema de Progressão Automática
 
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any, Tuple
+import os
 import uuid
 import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from models.comissoes import (
     NivelEscalaComissao, NivelClassificacaoMotorista,
     ResultadoCalculoComissao
 )
+from services import nao_lidas
+from utils import cache_config
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +31,10 @@ PESOS_CUIDADO_VEICULO = {
 }
 
 
+# Motoristas processados por lote no recálculo em massa (consultas e escritas por lote)
+RECALCULO_LOTE = int(os.environ.get("COMISSOES_RECALCULO_LOTE", "500"))
+
+
 # Níveis de classificação padrão
 NIVEIS_CLASSIFICACAO_PADRAO = [
     {
@@ -272,6 +281,7 @@ class ComissoesService:
             {"$set": config},
             upsert=True
         )
+        await cache_config.invalidar(self.db, cache_config.CONFIGURACOES)
         
         logger.info("Níveis de classificação de motoristas criados")
         return {"niveis": niveis}
@@ -319,6 +329,7 @@ class ComissoesService:
             }},
             upsert=True
         )
+        await cache_config.invalidar(self.db, cache_config.CONFIGURACOES)
         
         return await self.obter_config_classificacao()
     
@@ -328,17 +339,9 @@ class ComissoesService:
             {"motorista_id": motorista_id}, {"_id": 0}
         )
     
-    async def calcular_classificacao_motorista(self, motorista_id: str) -> Dict:
-        """Calcular automaticamente a classificação de um motorista"""
-        config = await self.obter_config_classificacao()
-        niveis = sorted(config.get("niveis", []), key=lambda x: x.get("nivel", 0), reverse=True)
-        
-        # Obter dados do motorista
-        motorista = await self.db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
-        if not motorista:
-            raise ValueError("Motorista não encontrado")
-        
-        # Calcular meses de serviço
+    @staticmethod
+    def _meses_servico(motorista: Dict) -> int:
+        """Meses completos (30 dias) desde data_inicio ou created_at"""
         data_inicio = motorista.get("data_inicio") or motorista.get("created_at")
         meses_servico = 0
         if data_inicio:
@@ -350,6 +353,20 @@ class ComissoesService:
                 meses_servico = diff.days // 30
             except (ValueError, TypeError):
                 pass
+        return meses_servico
+    
+    async def calcular_classificacao_motorista(self, motorista_id: str) -> Dict:
+        """Calcular automaticamente a classificação de um motorista"""
+        config = await self.obter_config_classificacao()
+        niveis = sorted(config.get("niveis", []), key=lambda x: x.get("nivel", 0), reverse=True)
+        
+        # Obter dados do motorista
+        motorista = await self.db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
+        if not motorista:
+            raise ValueError("Motorista não encontrado")
+        
+        # Calcular meses de serviço
+        meses_servico = self._meses_servico(motorista)
         
         # Obter pontuação de cuidado do veículo (se existir)
         classificacao_atual = await self.obter_classificacao_motorista(motorista_id)
@@ -372,6 +389,45 @@ class ComissoesService:
             "pontuacao_cuidado_veiculo": pontuacao_cuidado
         }
     
+    @staticmethod
+    def _documento_classificacao(
+        motorista_id: str,
+        nivel: Dict,
+        meses_servico: int,
+        pontuacao: int,
+        atribuido_por: str,
+        motivo: Optional[str],
+        nivel_manual: bool,
+        now: datetime
+    ) -> Dict:
+        """Documento de `classificacoes_motoristas` para o nível atribuído"""
+        return {
+            "motorista_id": motorista_id,
+            "nivel_id": nivel["id"],
+            "nivel_numero": nivel["nivel"],
+            "nivel_nome": nivel["nome"],
+            "bonus_percentagem": nivel["bonus_percentagem"],
+            "meses_servico": meses_servico,
+            "pontuacao_cuidado_veiculo": pontuacao,
+            "data_atribuicao": now.isoformat(),
+            "atribuido_por": atribuido_por,
+            "motivo": motivo,
+            "nivel_manual": nivel_manual
+        }
+    
+    @staticmethod
+    def _campos_classificacao_motorista(nivel: Dict, pontuacao: int) -> Dict:
+        """Campos desnormalizados da classificação no documento do motorista"""
+        return {
+            "classificacao": {
+                "nivel": nivel["nivel"],
+                "nome": nivel["nome"],
+                "icone": nivel.get("icone", "⭐"),
+                "bonus_percentagem": nivel["bonus_percentagem"]
+            },
+            "pontuacao_cuidado_veiculo": pontuacao
+        }
+    
     async def atribuir_classificacao_motorista(
         self,
         motorista_id: str,
@@ -401,19 +457,9 @@ class ComissoesService:
             meses_servico = calc["meses_servico"]
             pontuacao = pontuacao_cuidado_veiculo if pontuacao_cuidado_veiculo is not None else calc["pontuacao_cuidado_veiculo"]
         
-        classificacao = {
-            "motorista_id": motorista_id,
-            "nivel_id": nivel["id"],
-            "nivel_numero": nivel["nivel"],
-            "nivel_nome": nivel["nome"],
-            "bonus_percentagem": nivel["bonus_percentagem"],
-            "meses_servico": meses_servico,
-            "pontuacao_cuidado_veiculo": pontuacao,
-            "data_atribuicao": now.isoformat(),
-            "atribuido_por": atribuido_por,
-            "motivo": motivo,
-            "nivel_manual": nivel_manual
-        }
+        classificacao = self._documento_classificacao(
+            motorista_id, nivel, meses_servico, pontuacao, atribuido_por, motivo, nivel_manual, now
+        )
         
         await self.db.classificacoes_motoristas.update_one(
             {"motorista_id": motorista_id},
@@ -424,15 +470,7 @@ class ComissoesService:
         # Atualizar também no documento do motorista
         await self.db.motoristas.update_one(
             {"id": motorista_id},
-            {"$set": {
-                "classificacao": {
-                    "nivel": nivel["nivel"],
-                    "nome": nivel["nome"],
-                    "icone": nivel.get("icone", "⭐"),
-                    "bonus_percentagem": nivel["bonus_percentagem"]
-                },
-                "pontuacao_cuidado_veiculo": pontuacao
-            }}
+            {"$set": self._campos_classificacao_motorista(nivel, pontuacao)}
         )
         
         logger.info(f"Classificação '{nivel['nome']}' atribuída ao motorista {motorista_id}")
@@ -590,13 +628,42 @@ class ComissoesService:
     
     # ==================== SISTEMA DE PROGRESSÃO AUTOMÁTICA ====================
     
-    async def calcular_pontuacao_cuidado_veiculo(self, motorista_id: str) -> Dict:
+    @staticmethod
+    def _seis_meses_atras() -> str:
+        """Início da janela de incidentes/multas (ISO)"""
+        return datetime.now(timezone.utc).replace(month=max(1, datetime.now().month - 6)).isoformat()
+    
+    @staticmethod
+    def _documentos_em_dia(veiculo: Dict, agora: datetime) -> int:
+        """Quantos de seguro, inspeção e extintor estão válidos"""
+        docs_em_dia = 0
+        for validade in (
+            veiculo.get("seguro", {}).get("data_validade"),     # Seguro válido
+            veiculo.get("inspecao", {}).get("validade"),        # Inspeção válida
+            veiculo.get("extintor", {}).get("data_validade"),   # Extintor válido
+        ):
+            if validade:
+                try:
+                    val_date = datetime.fromisoformat(validade.replace('Z', '+00:00'))
+                    if val_date > agora:
+                        docs_em_dia += 1
+                except (ValueError, TypeError, AttributeError):
+                    pass
+        return docs_em_dia
+    
+    @classmethod
+    def _compor_pontuacao_cuidado(
+        cls,
+        vistorias: List[Dict],
+        incidentes: int,
+        multas: int,
+        veiculos: List[Dict],
+        motorista: Optional[Dict]
+    ) -> Dict:
         """
-        Calcular pontuação de cuidado com veículo baseada em múltiplos factores:
-        - Vistorias realizadas (40%)
-        - Incidentes/multas (25%)
-        - Manutenções em dia (20%)
-        - Avaliação manual do parceiro (15%)
+        Pontuação de cuidado a partir dos dados já carregados (usado por um
+        motorista ou pelo recálculo em lote). `vistorias` são as últimas 10,
+        mais recentes primeiro, com `pontuacao` e/ou `problemas`.
         """
         pontuacoes = {
             "vistorias": 50,  # Default se não houver dados
@@ -607,41 +674,25 @@ class ComissoesService:
         detalhes = {}
         
         # 1. VISTORIAS - Calcular média das últimas vistorias
-        vistorias = await self.db.vistorias.find(
-            {"motorista_id": motorista_id}
-        ).sort("data", -1).limit(10).to_list(10)
-        
         if vistorias:
             # Calcular pontuação média das vistorias
             total_pontos = 0
             for vistoria in vistorias:
                 # Se a vistoria tem pontuação explícita
-                if "pontuacao" in vistoria:
+                if vistoria.get("pontuacao") is not None:
                     total_pontos += vistoria["pontuacao"]
                 else:
                     # Calcular baseado em problemas encontrados
-                    problemas = len(vistoria.get("problemas", []))
-                    pontos_vistoria = max(0, 100 - (problemas * 10))
-                    total_pontos += pontos_vistoria
+                    problemas = vistoria.get("problemas", [])
+                    num_problemas = problemas if isinstance(problemas, int) else len(problemas)
+                    total_pontos += max(0, 100 - (num_problemas * 10))
             
             pontuacoes["vistorias"] = total_pontos // len(vistorias)
             detalhes["vistorias"] = f"{len(vistorias)} vistorias analisadas"
         else:
             detalhes["vistorias"] = "Sem vistorias registadas"
         
-        # 2. INCIDENTES - Verificar multas e incidentes nos últimos 6 meses
-        seis_meses_atras = datetime.now(timezone.utc).replace(month=max(1, datetime.now().month - 6))
-        
-        incidentes = await self.db.incidentes.count_documents({
-            "motorista_id": motorista_id,
-            "created_at": {"$gte": seis_meses_atras.isoformat()}
-        })
-        
-        multas = await self.db.multas.count_documents({
-            "motorista_id": motorista_id,
-            "data": {"$gte": seis_meses_atras.isoformat()}
-        })
-        
+        # 2. INCIDENTES - Multas e incidentes nos últimos 6 meses
         total_problemas = incidentes + multas
         if total_problemas == 0:
             pontuacoes["incidentes"] = 100
@@ -654,60 +705,19 @@ class ComissoesService:
         
         detalhes["incidentes"] = f"{incidentes} incidentes, {multas} multas nos últimos 6 meses"
         
-        # 3. MANUTENÇÕES - Verificar se o motorista reporta problemas e cuida do veículo
-        # Verificar veículos atribuídos ao motorista
-        veiculos = await self.db.vehicles.find(
-            {"motorista_id": motorista_id}
-        ).to_list(10)
-        
+        # 3. MANUTENÇÕES - Documentos dos veículos atribuídos ao motorista em dia
         if veiculos:
-            manutencoes_em_dia = 0
+            agora = datetime.now(timezone.utc)
             total_veiculos = len(veiculos)
+            # Pelo menos 2 dos 3 em dia
+            manutencoes_em_dia = sum(1 for v in veiculos if cls._documentos_em_dia(v, agora) >= 2)
             
-            for veiculo in veiculos:
-                # Verificar se documentos estão em dia
-                docs_em_dia = 0
-                
-                # Seguro válido
-                seguro_val = veiculo.get("seguro", {}).get("data_validade")
-                if seguro_val:
-                    try:
-                        val_date = datetime.fromisoformat(seguro_val.replace('Z', '+00:00'))
-                        if val_date > datetime.now(timezone.utc):
-                            docs_em_dia += 1
-                    except (ValueError, TypeError):
-                        pass
-                
-                # Inspeção válida
-                insp_val = veiculo.get("inspecao", {}).get("validade")
-                if insp_val:
-                    try:
-                        val_date = datetime.fromisoformat(insp_val.replace('Z', '+00:00'))
-                        if val_date > datetime.now(timezone.utc):
-                            docs_em_dia += 1
-                    except (ValueError, TypeError):
-                        pass
-                
-                # Extintor válido
-                ext_val = veiculo.get("extintor", {}).get("data_validade")
-                if ext_val:
-                    try:
-                        val_date = datetime.fromisoformat(ext_val.replace('Z', '+00:00'))
-                        if val_date > datetime.now(timezone.utc):
-                            docs_em_dia += 1
-                    except (ValueError, TypeError):
-                        pass
-                
-                if docs_em_dia >= 2:  # Pelo menos 2 dos 3 em dia
-                    manutencoes_em_dia += 1
-            
-            pontuacoes["manutencoes"] = (manutencoes_em_dia / total_veiculos) * 100 if total_veiculos > 0 else 50
+            pontuacoes["manutencoes"] = (manutencoes_em_dia / total_veiculos) * 100
             detalhes["manutencoes"] = f"{manutencoes_em_dia}/{total_veiculos} veículos com documentos em dia"
         else:
             detalhes["manutencoes"] = "Sem veículos atribuídos"
         
         # 4. AVALIAÇÃO DO PARCEIRO - Valor manual guardado
-        motorista = await self.db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
         if motorista:
             avaliacao = motorista.get("avaliacao_parceiro")
             if avaliacao is not None:
@@ -729,40 +739,45 @@ class ComissoesService:
             "pesos": PESOS_CUIDADO_VEICULO
         }
     
-    async def verificar_progressao_motorista(self, motorista_id: str) -> Dict:
+    async def calcular_pontuacao_cuidado_veiculo(self, motorista_id: str) -> Dict:
         """
-        Verificar se um motorista é elegível para subir de nível
-        Retorna informação sobre o nível actual e o potencial próximo nível
+        Calcular pontuação de cuidado com veículo baseada em múltiplos factores:
+        - Vistorias realizadas (40%)
+        - Incidentes/multas (25%)
+        - Manutenções em dia (20%)
+        - Avaliação manual do parceiro (15%)
         """
-        # Obter classificação actual
-        classificacao_atual = await self.obter_classificacao_motorista(motorista_id)
-        
-        # Calcular dados atuais
-        motorista = await self.db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
-        if not motorista:
-            raise ValueError("Motorista não encontrado")
+        vistorias = await self.db.vistorias.find(
+            {"motorista_id": motorista_id},
+            {"_id": 0, "pontuacao": 1, "problemas": 1}
+        ).sort("data", -1).limit(10).to_list(10)
         
-        # Calcular meses de serviço
-        data_inicio = motorista.get("data_inicio") or motorista.get("created_at")
-        meses_servico = 0
-        if data_inicio:
-            try:
-                if isinstance(data_inicio, str):
-                    data_inicio = datetime.fromisoformat(data_inicio.replace('Z', '+00:00'))
-                now = datetime.now(timezone.utc)
-                diff = now - data_inicio
-                meses_servico = diff.days // 30
-            except (ValueError, TypeError):
-                pass
+        seis_meses_atras = self._seis_meses_atras()
+        incidentes = await self.db.incidentes.count_documents({
+            "motorista_id": motorista_id,
+            "created_at": {"$gte": seis_meses_atras}
+        })
+        multas = await self.db.multas.count_documents({
+            "motorista_id": motorista_id,
+            "data": {"$gte": seis_meses_atras}
+        })
         
-        # Calcular pontuação de cuidado actualizada
-        calc_cuidado = await self.calcular_pontuacao_cuidado_veiculo(motorista_id)
-        pontuacao_cuidado = calc_cuidado["pontuacao_final"]
+        veiculos = await self.db.vehicles.find(
+            {"motorista_id": motorista_id}
+        ).to_list(10)
         
-        # Obter configuração de níveis
-        config = await self.obter_config_classificacao()
-        niveis = sorted(config.get("niveis", []), key=lambda x: x.get("nivel", 0))
+        motorista = await self.db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
         
+        return self._compor_pontuacao_cuidado(vistorias, incidentes, multas, veiculos, motorista)
+    
+    @staticmethod
+    def _avaliar_progressao(
+        classificacao_atual: Optional[Dict],
+        niveis: List[Dict],
+        meses_servico: int,
+        pontuacao_cuidado: int
+    ) -> Dict:
+        """Nível actual, próximo nível e elegibilidade (`niveis` ordenados por nível)"""
         nivel_atual = None
         proximo_nivel = None
         
@@ -790,39 +805,96 @@ class ComissoesService:
                 if pontuacao_cuidado < cuidado_req:
                     razoes_falta.append(f"Pontuação de cuidado {pontuacao_cuidado}/{cuidado_req}")
         
+        return {
+            "nivel_atual": nivel_atual,
+            "proximo_nivel": proximo_nivel,
+            "elegivel_promocao": elegivel,
+            "razoes_falta": razoes_falta if not elegivel else []
+        }
+    
+    async def verificar_progressao_motorista(self, motorista_id: str) -> Dict:
+        """
+        Verificar se um motorista é elegível para subir de nível
+        Retorna informação sobre o nível actual e o potencial próximo nível
+        """
+        # Obter classificação actual
+        classificacao_atual = await self.obter_classificacao_motorista(motorista_id)
+        
+        # Calcular dados atuais
+        motorista = await self.db.motoristas.find_one({"id": motorista_id}, {"_id": 0})
+        if not motorista:
+            raise ValueError("Motorista não encontrado")
+        
+        # Calcular meses de serviço
+        meses_servico = self._meses_servico(motorista)
+        
+        # Calcular pontuação de cuidado actualizada
+        calc_cuidado = await self.calcular_pontuacao_cuidado_veiculo(motorista_id)
+        pontuacao_cuidado = calc_cuidado["pontuacao_final"]
+        
+        # Obter configuração de níveis
+        config = await self.obter_config_classificacao()
+        niveis = sorted(config.get("niveis", []), key=lambda x: x.get("nivel", 0))
+        
+        progressao = self._avaliar_progressao(classificacao_atual, niveis, meses_servico, pontuacao_cuidado)
+        
         return {
             "motorista_id": motorista_id,
             "motorista_nome": motorista.get("nome") or motorista.get("name"),
             "meses_servico": meses_servico,
             "pontuacao_cuidado": pontuacao_cuidado,
             "detalhes_cuidado": calc_cuidado,
-            "nivel_atual": nivel_atual,
-            "proximo_nivel": proximo_nivel,
-            "elegivel_promocao": elegivel,
-            "razoes_falta": razoes_falta if not elegivel else []
+            **progressao
         }
     
-    async def criar_notificacao(
-        self,
+    @staticmethod
+    def _documento_notificacao(
         user_id: str,
         titulo: str,
         mensagem: str,
         tipo: str = "info",
         dados: Optional[Dict] = None
-    ):
-        """Criar uma notificação para o utilizador"""
-        now = datetime.now(timezone.utc)
-        notificacao = {
+    ) -> Dict:
+        return {
             "id": str(uuid.uuid4()),
             "user_id": user_id,
             "titulo": titulo,
             "mensagem": mensagem,
             "tipo": tipo,
             "lida": False,
-            "criada_em": now.isoformat(),
+            "criada_em": datetime.now(timezone.utc).isoformat(),
             "dados": dados or {}
         }
+    
+    @classmethod
+    def _notificacao_promocao(cls, user_id: str, nivel_atual: Dict, proximo_nivel: Dict) -> Dict:
+        """Notificação de parabéns enviada ao motorista promovido"""
+        bonus_diferenca = proximo_nivel.get("bonus_percentagem", 0) - nivel_atual.get("bonus_percentagem", 0)
+        return cls._documento_notificacao(
+            user_id=user_id,
+            titulo=f"🎉 Parabéns! Subiu para {proximo_nivel['nome']}!",
+            mensagem=f"O seu excelente desempenho foi reconhecido! Passou de {nivel_atual['nome']} para {proximo_nivel['nome']}. "
+                     f"O seu bónus de comissão aumentou +{bonus_diferenca}%.",
+            tipo="promocao",
+            dados={
+                "nivel_anterior": nivel_atual,
+                "nivel_novo": proximo_nivel,
+                "bonus_aumento": bonus_diferenca
+            }
+        )
+    
+    async def criar_notificacao(
+        self,
+        user_id: str,
+        titulo: str,
+        mensagem: str,
+        tipo: str = "info",
+        dados: Optional[Dict] = None
+    ):
+        """Criar uma notificação para o utilizador"""
+        notificacao = self._documento_notificacao(user_id, titulo, mensagem, tipo, dados)
         await self.db.notificacoes.insert_one(notificacao)
+        await nao_lidas.notificacao_criada(self.db, notificacao)
         return notificacao
     
     async def promover_motorista(self, motorista_id: str, atribuido_por: str = "sistema") -> Tuple[bool, Dict]:
@@ -862,19 +934,9 @@ class ComissoesService:
         # Obter user_id do motorista para notificação
         motorista = await self.db.motoristas.find_one({"id": motorista_id}, {"_id": 0, "user_id": 1})
         if motorista and motorista.get("user_id"):
-            bonus_diferenca = proximo_nivel.get("bonus_percentagem", 0) - nivel_atual.get("bonus_percentagem", 0)
-            await self.criar_notificacao(
-                user_id=motorista["user_id"],
-                titulo=f"🎉 Parabéns! Subiu para {proximo_nivel['nome']}!",
-                mensagem=f"O seu excelente desempenho foi reconhecido! Passou de {nivel_atual['nome']} para {proximo_nivel['nome']}. "
-                         f"O seu bónus de comissão aumentou +{bonus_diferenca}%.",
-                tipo="promocao",
-                dados={
-                    "nivel_anterior": nivel_atual,
-                    "nivel_novo": proximo_nivel,
-                    "bonus_aumento": bonus_diferenca
-                }
-            )
+            notificacao = self._notificacao_promocao(motorista["user_id"], nivel_atual, proximo_nivel)
+            await self.db.notificacoes.insert_one(notificacao)
+            await nao_lidas.notificacao_criada(self.db, notificacao)
         
         logger.info(f"Motorista {motorista_id} promovido de {nivel_atual['nome']} para {proximo_nivel['nome']}")
         
@@ -885,57 +947,179 @@ class ComissoesService:
             "classificacao": classificacao
         }
     
-    async def recalcular_todas_classificacoes(self, atribuido_por: str = "sistema") -> Dict:
+    async def _carregar_dados_lote(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
         """
-        Recalcular classificações de todos os motoristas
-        Usado pelo job automático e pelo botão manual do admin
+        Dados de pontuação de um lote de motoristas em consultas agrupadas:
+        classificações, últimas 10 vistorias, incidentes, multas e veículos
         """
-        resultados = {
-            "total_motoristas": 0,
-            "promovidos": [],
-            "mantidos": [],
-            "erros": [],
-            "iniciado_em": datetime.now(timezone.utc).isoformat()
+        dados = {
+            motorista_id: {"classificacao": None, "vistorias": [], "incidentes": 0, "multas": 0, "veiculos": []}
+            for motorista_id in ids
         }
         
-        # Obter todos os motoristas activos
-        motoristas = await self.db.motoristas.find(
-            {"status": {"$ne": "inativo"}},
-            {"_id": 0, "id": 1, "nome": 1, "name": 1}
-        ).to_list(None)
-        
-        resultados["total_motoristas"] = len(motoristas)
+        async for classificacao in self.db.classificacoes_motoristas.find(
+            {"motorista_id": {"$in": ids}}, {"_id": 0}
+        ):
+            dados[classificacao["motorista_id"]]["classificacao"] = classificacao
+        
+        # Últimas 10 vistorias de cada motorista (só pontuação e nº de problemas)
+        async for grupo in self.db.vistorias.aggregate([
+            {"$match": {"motorista_id": {"$in": ids}}},
+            {"$sort": {"motorista_id": 1, "data": -1}},
+            {"$group": {
+                "_id": "$motorista_id",
+                "vistorias": {"$push": {
+                    "pontuacao": {"$ifNull": ["$pontuacao", None]},
+                    "problemas": {"$cond": [{"$isArray": "$problemas"}, {"$size": "$problemas"}, 0]}
+                }}
+            }},
+            {"$project": {"vistorias": {"$slice": ["$vistorias", 10]}}}
+        ], allowDiskUse=True):
+            dados[grupo["_id"]]["vistorias"] = grupo["vistorias"]
+        
+        seis_meses_atras = self._seis_meses_atras()
+        for colecao, campo_data in (("incidentes", "created_at"), ("multas", "data")):
+            async for grupo in self.db[colecao].aggregate([
+                {"$match": {"motorista_id": {"$in": ids}, campo_data: {"$gte": seis_meses_atras}}},
+                {"$group": {"_id": "$motorista_id", "total": {"$sum": 1}}}
+            ]):
+                dados[grupo["_id"]][colecao] = grupo["total"]
+        
+        async for veiculo in self.db.vehicles.find(
+            {"motorista_id": {"$in": ids}},
+            {"_id": 0, "motorista_id": 1, "seguro": 1, "inspecao": 1, "extintor": 1}
+        ):
+            veiculos = dados[veiculo["motorista_id"]]["veiculos"]
+            if len(veiculos) < 10:
+                veiculos.append(veiculo)
+        
+        return dados
+    
+    async def _recalcular_lote(
+        self,
+        motoristas: List[Dict],
+        niveis: List[Dict],
+        atribuido_por: str,
+        resultados: Dict
+    ):
+        """Pontuar um lote em memória e gravar as promoções em bulk"""
+        dados = await self._carregar_dados_lote([m["id"] for m in motoristas])
+        now = datetime.now(timezone.utc)
         
+        promocoes = []
         for motorista in motoristas:
             motorista_id = motorista["id"]
             nome = motorista.get("nome") or motorista.get("name") or motorista_id
+            entrada = dados[motorista_id]
             
             try:
-                # Verificar elegibilidade para promoção
-                sucesso, detalhes = await self.promover_motorista(motorista_id, atribuido_por)
+                calc_cuidado = self._compor_pontuacao_cuidado(
+                    entrada["vistorias"], entrada["incidentes"], entrada["multas"], entrada["veiculos"], motorista
+                )
+                pontuacao_cuidado = calc_cuidado["pontuacao_final"]
+                meses_servico = self._meses_servico(motorista)
+                progressao = self._avaliar_progressao(entrada["classificacao"], niveis, meses_servico, pontuacao_cuidado)
                 
-                if sucesso:
-                    resultados["promovidos"].append({
-                        "motorista_id": motorista_id,
-                        "nome": nome,
-                        "nivel_anterior": detalhes["nivel_anterior"]["nome"],
-                        "nivel_novo": detalhes["nivel_novo"]["nome"]
-                    })
-                else:
+                nivel_atual = progressao["nivel_atual"]
+                proximo_nivel = progressao["proximo_nivel"]
+                if not progressao["elegivel_promocao"] or not proximo_nivel:
                     resultados["mantidos"].append({
                         "motorista_id": motorista_id,
                         "nome": nome,
-                        "nivel_atual": detalhes.get("nivel_atual", {}).get("nome", "N/A"),
-                        "razao": detalhes.get("mensagem", "Não elegível")
+                        "nivel_atual": (nivel_atual or {}).get("nome", "N/A"),
+                        "razao": "Motorista não elegível para promoção"
                     })
-                    
+                    continue
+                
+                classificacao = self._documento_classificacao(
+                    motorista_id, proximo_nivel, meses_servico, pontuacao_cuidado, atribuido_por,
+                    f"Promoção automática: {nivel_atual['nome']} → {proximo_nivel['nome']}", False, now
+                )
+                promocoes.append((motorista, nome, nivel_atual, proximo_nivel, classificacao))
             except Exception as e:
                 logger.error(f"Erro ao recalcular classificação do motorista {motorista_id}: {str(e)}")
-                resultados["erros"].append({
-                    "motorista_id": motorista_id,
-                    "nome": nome,
-                    "erro": str(e)
-                })
+                resultados["erros"].append({"motorista_id": motorista_id, "nome": nome, "erro": str(e)})
+        
+        if not promocoes:
+            return
+        
+        # Gravar classificações e motoristas; promoções com escrita falhada passam a erro
+        falhados: Dict[str, str] = {}
+        escritas = (
+            (self.db.classificacoes_motoristas, [
+                UpdateOne({"motorista_id": m["id"]}, {"$set": classificacao}, upsert=True)
+                for m, _, _, _, classificacao in promocoes
+            ]),
+            (self.db.motoristas, [
+                UpdateOne({"id": m["id"]}, {"$set": self._campos_classificacao_motorista(proximo, classificacao["pontuacao_cuidado_veiculo"])})
+                for m, _, _, proximo, classificacao in promocoes
+            ]),
+        )
+        for colecao, operacoes in escritas:
+            try:
+                await colecao.bulk_write(operacoes, ordered=False)
+            except BulkWriteError as e:
+                for erro in e.details.get("writeErrors", []):
+                    falhados.setdefault(promocoes[erro["index"]][0]["id"], erro.get("errmsg", "Erro de escrita"))
+        
+        notificacoes = []
+        for motorista, nome, nivel_atual, proximo_nivel, _ in promocoes:
+            motorista_id = motorista["id"]
+            if motorista_id in falhados:
+                logger.error(f"Erro ao gravar promoção do motorista {motorista_id}: {falhados[motorista_id]}")
+                resultados["erros"].append({"motorista_id": motorista_id, "nome": nome, "erro": falhados[motorista_id]})
+                continue
+            resultados["promovidos"].append({
+                "motorista_id": motorista_id,
+                "nome": nome,
+                "nivel_anterior": nivel_atual["nome"],
+                "nivel_novo": proximo_nivel["nome"]
+            })
+            if motorista.get("user_id"):
+                notificacoes.append(self._notificacao_promocao(motorista["user_id"], nivel_atual, proximo_nivel))
+        
+        if notificacoes:
+            await self.db.notificacoes.insert_many(notificacoes, ordered=False)
+            # Um evento por destinatário (com o contador já atualizado)
+            for notificacao in {n["user_id"]: n for n in notificacoes}.values():
+                await nao_lidas.notificacao_criada(self.db, notificacao)
+    
+    async def recalcular_todas_classificacoes(self, atribuido_por: str = "sistema") -> Dict:
+        """
+        Recalcular classificações de todos os motoristas
+        Usado pelo job automático e pelo botão manual do admin
+        
+        Processa os motoristas em lotes de RECALCULO_LOTE: por lote, os dados
+        de pontuação vêm de 5 consultas agrupadas, a pontuação é calculada em
+        memória e as promoções e notificações são gravadas em bulk.
+        """
+        resultados = {
+            "total_motoristas": 0,
+            "promovidos": [],
+            "mantidos": [],
+            "erros": [],
+            "iniciado_em": datetime.now(timezone.utc).isoformat()
+        }
+        
+        config = await self.obter_config_classificacao()
+        niveis = sorted(config.get("niveis", []), key=lambda x: x.get("nivel", 0))
+        
+        # Obter todos os motoristas activos
+        cursor = self.db.motoristas.find(
+            {"status": {"$ne": "inativo"}},
+            {"_id": 0, "id": 1, "nome": 1, "name": 1, "user_id": 1,
+             "data_inicio": 1, "created_at": 1, "avaliacao_parceiro": 1}
+        ).batch_size(RECALCULO_LOTE)
+        
+        lote = []
+        async for motorista in cursor:
+            resultados["total_motoristas"] += 1
+            lote.append(motorista)
+            if len(lote) >= RECALCULO_LOTE:
+                await self._recalcular_lote(lote, niveis, atribuido_por, resultados)
+                lote = []
+        if lote:
+            await self._recalcular_lote(lote, niveis, atribuido_por, resultados)
         
         resultados["finalizado_em"] = datetime.now(timezone.utc).isoformat()
         resultados["resumo"] = {
@@ -0,0 +1,315 @@
+"""
+Estatísticas materializadas do dashboard por parceiro.
+
+Colecção `dashboard_stats`: um documento por parceiro (mais um documento
+global) com contagens de veículos por status, motoristas por aprovação e
+totais de receitas/despesas por dia e semana. Os caminhos de escrita de
+veículos, motoristas, receitas e despesas actualizam os contadores com `$inc`
+(que também incrementa `versao`); `reconciliar_dashboard_stats` recalcula tudo
+a partir das colecções de origem para corrigir desvios, sem escrever por cima
+de documentos que recebam um `$inc` entretanto.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GLOBAL = "__global__"
+
+# Intervalo da reconciliação periódica (horas)
+RECONCILIACAO_INTERVALO_HORAS = 6
+
+# Campos de origem que determinam os contadores (o primeiro é o parceiro)
+_CAMPOS = {
+    "vehicles": ("parceiro_id", "status"),
+    "motoristas": ("parceiro_atribuido", "approved"),
+}
+
+
+def _chave(valor: Any, default: str) -> str:
+    """Chave segura para subcampos (sem '.' nem '$')"""
+    texto = str(valor) if valor not in (None, "") else default
+    return texto.replace(".", "_").replace("$", "_")
+
+
+def _dia_semana(data: Optional[str]) -> tuple:
+    """Devolver (YYYY-MM-DD, YYYY-Www) a partir do campo `data` de receitas/despesas"""
+    dia = str(data or "")[:10]
+    try:
+        ano, semana, _ = datetime.strptime(dia, "%Y-%m-%d").isocalendar()
+        return dia, f"{ano}-W{semana:02d}"
+    except ValueError:
+        return "sem_data", "sem_data"
+
+
+def _documento_vazio(parceiro_id: str) -> Dict[str, Any]:
+    return {
+        "parceiro_id": parceiro_id,
+        "vehicles": {"total": 0, "por_status": {}},
+        "motoristas": {"total": 0, "aprovados": 0, "pendentes": 0, "sem_parceiro": 0},
+        "receitas": {"total": 0.0, "por_dia": {}, "por_semana": {}},
+        "despesas": {"total": 0.0, "por_dia": {}, "por_semana": {}},
+    }
+
+
+async def _inc(db, parceiro_id: Optional[str], incs: Dict[str, Any]):
+    """Aplicar $inc ao documento do parceiro e ao documento global"""
+    if not incs:
+        return
+    atualizacao = {
+        "$inc": {**incs, "versao": 1},
+        "$set": {"atualizado_em": datetime.now(timezone.utc).isoformat()}
+    }
+    alvos = [GLOBAL] + ([parceiro_id] if parceiro_id else [])
+    for alvo in alvos:
+        await db.dashboard_stats.update_one({"parceiro_id": alvo}, atualizacao, upsert=True)
+
+
+# ==================== ESCRITAS INCREMENTAIS ====================
+
+def _incs_vehicle(vehicle: Dict, sinal: int) -> Dict[str, int]:
+    return {
+        "vehicles.total": sinal,
+        f"vehicles.por_status.{_chave(vehicle.get('status'), 'sem_status')}": sinal,
+    }
+
+
+async def registar_vehicle(db, vehicle: Optional[Dict], sinal: int = 1):
+    """Contabilizar (sinal=1) ou descontar (sinal=-1) um veículo"""
+    if not vehicle:
+        return
+    await _inc(db, vehicle.get("parceiro_id"), _incs_vehicle(vehicle, sinal))
+
+
+async def atualizar_vehicle(db, antes: Optional[Dict], depois: Optional[Dict]):
+    """Actualizar contadores quando o status ou o parceiro de um veículo mudam"""
+    if not antes or not depois:
+        return
+    if antes.get("status") == depois.get("status") and antes.get("parceiro_id") == depois.get("parceiro_id"):
+        return
+    await registar_vehicle(db, antes, -1)
+    await registar_vehicle(db, depois, 1)
+
+
+async def atualizar_vehicle_filtro(db, filtro: Dict, alteracao: Dict):
+    """
+    Acertar contadores antes de `vehicles.update_one(filtro, {"$set": alteracao})`.
+    Só lê o veículo quando `alteracao` mexe no status ou no parceiro.
+    """
+    if not set(alteracao) & set(_CAMPOS["vehicles"]):
+        return
+    antes = await db.vehicles.find_one(filtro, {"_id": 0, "status": 1, "parceiro_id": 1})
+    if antes is not None:
+        await atualizar_vehicle(db, antes, {**antes, **alteracao})
+
+
+def _incs_motorista(motorista: Dict, sinal: int) -> Dict[str, int]:
+    incs = {"motoristas.total": sinal}
+    if motorista.get("approved") is True:
+        incs["motoristas.aprovados"] = sinal
+        if not motorista.get("parceiro_atribuido"):
+            incs["motoristas.sem_parceiro"] = sinal
+    elif motorista.get("approved") is False:
+        incs["motoristas.pendentes"] = sinal
+    return incs
+
+
+async def registar_motorista(db, motorista: Optional[Dict], sinal: int = 1):
+    """Contabilizar (sinal=1) ou descontar (sinal=-1) um motorista"""
+    if not motorista:
+        return
+    await _inc(db, motorista.get("parceiro_atribuido"), _incs_motorista(motorista, sinal))
+
+
+async def atualizar_motorista(db, antes: Optional[Dict], depois: Optional[Dict]):
+    """Actualizar contadores quando a aprovação ou o parceiro de um motorista mudam"""
+    if not antes or not depois:
+        return
+    if antes.get("approved") == depois.get("approved") and \
+            antes.get("parceiro_atribuido") == depois.get("parceiro_atribuido"):
+        return
+    await registar_motorista(db, antes, -1)
+    await registar_motorista(db, depois, 1)
+
+
+async def atualizar_motorista_filtro(db, filtro: Dict, alteracao: Dict):
+    """
+    Acertar contadores antes de `motoristas.update_one(filtro, {"$set": alteracao})`.
+    Só lê o motorista quando `alteracao` mexe na aprovação ou no parceiro.
+    """
+    if not set(alteracao) & set(_CAMPOS["motoristas"]):
+        return
+    antes = await db.motoristas.find_one(filtro, {"_id": 0, "approved": 1, "parceiro_atribuido": 1})
+    if antes is not None:
+        await atualizar_motorista(db, antes, {**antes, **alteracao})
+
+
+_INCS = {"vehicles": _incs_vehicle, "motoristas": _incs_motorista}
+
+
+async def _grupos(db, colecao: str, filtro: Dict) -> List[tuple]:
+    """Contagem dos documentos de `filtro` agrupados pelos campos dos contadores"""
+    campos = _CAMPOS[colecao]
+    pipeline = [
+        {"$match": filtro},
+        {"$group": {"_id": {c: f"${c}" for c in campos}, "count": {"$sum": 1}}},
+    ]
+    return [(row["_id"], row["count"]) async for row in db[colecao].aggregate(pipeline)]
+
+
+async def _aplicar_grupo(db, colecao: str, grupo: Dict, n: int):
+    incs = {campo: valor * n for campo, valor in _INCS[colecao](grupo, 1).items()}
+    await _inc(db, grupo.get(_CAMPOS[colecao][0]), incs)
+
+
+async def registar_em_bloco(db, colecao: str, filtro: Dict, sinal: int = 1):
+    """
+    Contabilizar (depois de inserir) ou descontar (antes de apagar) em bloco
+    os `vehicles` ou `motoristas` que correspondem a `filtro`
+    """
+    for grupo, n in await _grupos(db, colecao, filtro):
+        await _aplicar_grupo(db, colecao, grupo, n * sinal)
+
+
+async def atualizar_em_bloco(db, colecao: str, filtro: Dict, alteracao: Dict):
+    """Acertar contadores antes de `update_many(filtro, {"$set": alteracao})`"""
+    campos = _CAMPOS[colecao]
+    if not set(alteracao) & set(campos):
+        return
+    for grupo, n in await _grupos(db, colecao, filtro):
+        depois = {**grupo, **{c: v for c, v in alteracao.items() if c in campos}}
+        if all(grupo.get(c) == depois.get(c) for c in campos):
+            continue
+        await _aplicar_grupo(db, colecao, grupo, -n)
+        await _aplicar_grupo(db, colecao, depois, n)
+
+
+async def registar_movimento(db, tipo: str, movimento: Dict, sinal: int = 1):
+    """Contabilizar uma receita (tipo='receitas') ou despesa (tipo='despesas')"""
+    valor = float(movimento.get("valor") or 0) * sinal
+    if not valor:
+        return
+    vehicle = await db.vehicles.find_one({"id": movimento.get("vehicle_id")}, {"_id": 0, "parceiro_id": 1})
+    dia, semana = _dia_semana(movimento.get("data"))
+    await _inc(db, vehicle.get("parceiro_id") if vehicle else None, {
+        f"{tipo}.total": valor,
+        f"{tipo}.por_dia.{dia}": valor,
+        f"{tipo}.por_semana.{semana}": valor,
+    })
+
+
+# ==================== RECONCILIAÇÃO ====================
+
+async def reconciliar_dashboard_stats(db) -> Dict[str, Any]:
+    """
+    Recalcular todos os documentos de `dashboard_stats` a partir das colecções
+    de origem. As versões são lidas antes de percorrer as colecções: um
+    documento que receba um `$inc` durante o recálculo fica como está (o
+    recálculo pode já não o incluir) e é corrigido na reconciliação seguinte.
+    """
+    versoes = {
+        d["parceiro_id"]: d.get("versao", 0)
+        async for d in db.dashboard_stats.find({}, {"_id": 0, "parceiro_id": 1, "versao": 1})
+    }
+    docs: Dict[str, Dict[str, Any]] = {GLOBAL: _documento_vazio(GLOBAL)}
+
+    def doc(parceiro_id: Optional[str]) -> Optional[Dict]:
+        if not parceiro_id:
+            return None
+        return docs.setdefault(parceiro_id, _documento_vazio(parceiro_id))
+
+    # Veículos por parceiro e status
+    vehicle_parceiro = {}
+    async for v in db.vehicles.find({}, {"_id": 0, "id": 1, "parceiro_id": 1, "status": 1}):
+        vehicle_parceiro[v.get("id")] = v.get("parceiro_id")
+        status = _chave(v.get("status"), "sem_status")
+        for alvo in (docs[GLOBAL], doc(v.get("parceiro_id"))):
+            if alvo is not None:
+                alvo["vehicles"]["total"] += 1
+                alvo["vehicles"]["por_status"][status] = alvo["vehicles"]["por_status"].get(status, 0) + 1
+
+    # Motoristas por parceiro e aprovação
+    pipeline = [{"$group": {
+        "_id": {"parceiro": "$parceiro_atribuido", "approved": "$approved"},
+        "count": {"$sum": 1}
+    }}]
+    async for row in db.motoristas.aggregate(pipeline):
+        parceiro_id = row["_id"].get("parceiro")
+        motorista = {"approved": row["_id"].get("approved"), "parceiro_atribuido": parceiro_id}
+        for campo, sinal in _incs_motorista(motorista, 1).items():
+            secao = campo.split(".")[1]
+            for alvo in (docs[GLOBAL], doc(parceiro_id)):
+                if alvo is not None:
+                    alvo["motoristas"][secao] += sinal * row["count"]
+
+    # Receitas e despesas por veículo e dia
+    for tipo, colecao in (("receitas", db.revenues), ("despesas", db.expenses)):
+        pipeline = [{"$group": {
+            "_id": {"vehicle_id": "$vehicle_id", "dia": {"$substrCP": [{"$toString": {"$ifNull": ["$data", ""]}}, 0, 10]}},
+            "total": {"$sum": {"$convert": {"input": "$valor", "to": "double", "onError": 0.0, "onNull": 0.0}}}
+        }}]
+        async for row in colecao.aggregate(pipeline):
+            dia, semana = _dia_semana(row["_id"].get("dia"))
+            parceiro_id = vehicle_parceiro.get(row["_id"].get("vehicle_id"))
+            for alvo in (docs[GLOBAL], doc(parceiro_id)):
+                if alvo is not None:
+                    secao = alvo[tipo]
+                    secao["total"] += row["total"]
+                    secao["por_dia"][dia] = secao["por_dia"].get(dia, 0.0) + row["total"]
+                    secao["por_semana"][semana] = secao["por_semana"].get(semana, 0.0) + row["total"]
+
+    def guarda(parceiro_id: str) -> Dict[str, Any]:
+        versao = versoes[parceiro_id]
+        return {"parceiro_id": parceiro_id, "versao": versao if versao else {"$in": [0, None]}}
+
+    agora = datetime.now(timezone.utc).isoformat()
+    operacoes = []
+    for parceiro_id, d in docs.items():
+        d["atualizado_em"] = agora
+        d["reconciliado_em"] = agora
+        if parceiro_id in versoes:
+            operacoes.append(UpdateOne(guarda(parceiro_id), {"$set": d}))
+        else:
+            operacoes.append(UpdateOne({"parceiro_id": parceiro_id}, {"$setOnInsert": d}, upsert=True))
+
+    # Parceiros que deixaram de ter dados
+    operacoes += [DeleteOne(guarda(p)) for p in versoes if p not in docs]
+
+    resultado = await db.dashboard_stats.bulk_write(operacoes, ordered=False)
+    ignorados = len(operacoes) - resultado.matched_count - resultado.upserted_count - resultado.deleted_count
+
+    logger.info(f"📊 dashboard_stats reconciliado: {len(docs)} documentos ({ignorados} alterados durante o recálculo)")
+    return {"documentos": len(docs), "ignorados": ignorados, "reconciliado_em": agora}
+
+
+# ==================== LEITURA ====================
+
+async def obter_stats(db, parceiro_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Obter estatísticas agregadas: globais (parceiro_ids=None) ou a soma dos
+    documentos dos parceiros indicados.
+    """
+    if not await db.dashboard_stats.find_one({"parceiro_id": GLOBAL}, {"_id": 1}):
+        await reconciliar_dashboard_stats(db)
+
+    if parceiro_ids is None:
+        return await db.dashboard_stats.find_one({"parceiro_id": GLOBAL}, {"_id": 0}) or _documento_vazio(GLOBAL)
+
+    total = _documento_vazio(",".join(parceiro_ids))
+    async for d in db.dashboard_stats.find({"parceiro_id": {"$in": parceiro_ids}}, {"_id": 0}):
+        total["vehicles"]["total"] += d.get("vehicles", {}).get("total", 0)
+        for status, n in d.get("vehicles", {}).get("por_status", {}).items():
+            total["vehicles"]["por_status"][status] = total["vehicles"]["por_status"].get(status, 0) + n
+        for campo, n in d.get("motoristas", {}).items():
+            total["motoristas"][campo] = total["motoristas"].get(campo, 0) + n
+        for tipo in ("receitas", "despesas"):
+            secao = d.get(tipo, {})
+            total[tipo]["total"] += secao.get("total", 0.0)
+            for periodo in ("por_dia", "por_semana"):
+                for chave, valor in secao.get(periodo, {}).items():
+                    total[tipo][periodo][chave] = total[tipo][periodo].get(chave, 0.0) + valor
+    return total
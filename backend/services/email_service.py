@@ -4,14 +4,13 @@ Handles email notifications and transactional emails
 """
 
 import logging
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from typing import Dict, Any, Optional
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Email, To, Content
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from services import envio_email
+
 logger = logging.getLogger(__name__)
 
 class EmailService:
@@ -146,37 +145,18 @@ class EmailService:
                     "error": "SMTP configuration is incomplete"
                 }
             
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{sender_name} <{sender_email}>"
-            msg['To'] = to_email
-            
-            # Add plain text and HTML parts
-            if plain_content:
-                part1 = MIMEText(plain_content, 'plain')
-                msg.attach(part1)
-            
-            part2 = MIMEText(html_content, 'html')
-            msg.attach(part2)
-            
-            # Send email
-            # Port 465 = SSL/TLS direct (SMTP_SSL)
-            # Port 587 = STARTTLS (SMTP + starttls())
-            import ssl
-            context = ssl.create_default_context()
-            
-            if smtp_port == 465:
-                server = smtplib.SMTP_SSL(smtp_host, smtp_port, context=context)
-            else:
-                server = smtplib.SMTP(smtp_host, smtp_port, timeout=30)
-                server.ehlo()
-                server.starttls(context=context)
-                server.ehlo()
-            
-            server.login(smtp_user, smtp_password)
-            server.sendmail(sender_email, to_email, msg.as_string())
-            server.quit()
+            # Reuse the persistent session of this server (services/envio_email.py)
+            smtp = envio_email.ConfigSMTP(
+                smtp_host, smtp_port, smtp_user, smtp_password, sender_email, sender_name,
+                config.get("limite_por_minuto"),
+            )
+            result = await envio_email.enviar(smtp, to_email, subject, html_content, texto=plain_content)
+            if not result["success"]:
+                logger.error(f"Error sending email via SMTP: {result['error']}")
+                return {
+                    "success": False,
+                    "error": result["error"]
+                }
             
             logger.info(f"Email sent successfully to {to_email} via SMTP")
             return {
@@ -0,0 +1,478 @@
+"""
+Envio de email por SMTP com sessões persistentes, lotes e reenvio.
+
+Cada email abria uma ligação SSL/STARTTLS nova, fazia login e saía, com o
+`smtplib` bloqueante a correr dentro das rotas async: 400 relatórios
+semanais eram 400 handshakes com o event loop parado. Aqui:
+
+- `ConfigSMTP`: servidor e credenciais (do parceiro, `config_email`, ou do
+  sistema, variáveis SMTP_*);
+- uma sessão autenticada por servidor/utilizador, reutilizada entre envios
+  até `SMTP_MAX_POR_SESSAO` mensagens ou `SMTP_INATIVIDADE_SEGUNDOS` sem
+  uso, e usada por um envio de cada vez. O `smtplib` corre nas threads do
+  executor_service, fora do event loop;
+- ritmo máximo por servidor: `SMTP_LIMITE_POR_MINUTO`, ou
+  `limite_por_minuto` na configuração de email do parceiro;
+- `enviar` / `enviar_lote`: envio imediato, o lote numa só sessão;
+- `enfileirar`: guarda as mensagens em `emails_envio` e envia-as na fila
+  "email" (services/fila_tarefas.py). Falhas temporárias (ligação,
+  respostas 4xx) são repetidas com o backoff da fila; falhas permanentes
+  (5xx, autenticação) e as que esgotam `EMAIL_MAX_TENTATIVAS` ficam em
+  `dead_letter`, de onde `reenviar` as devolve à fila.
+"""
+
+import asyncio
+import logging
+import os
+import smtplib
+import ssl
+import time
+import uuid
+from datetime import datetime, timezone
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from services import executor_service, fila_tarefas
+
+logger = logging.getLogger(__name__)
+
+FILA = "email"
+TIPO = "email.enviar_lote"
+COLECAO = "emails_envio"
+
+EMAIL_WORKERS = int(os.environ.get("EMAIL_WORKERS", "1"))
+EMAIL_MAX_TENTATIVAS = int(os.environ.get("EMAIL_MAX_TENTATIVAS", "4"))
+SMTP_TIMEOUT = int(os.environ.get("SMTP_TIMEOUT", "30"))
+SMTP_MAX_POR_SESSAO = int(os.environ.get("SMTP_MAX_POR_SESSAO", "100"))
+SMTP_INATIVIDADE_SEGUNDOS = int(os.environ.get("SMTP_INATIVIDADE_SEGUNDOS", "60"))
+SMTP_LIMITE_POR_MINUTO = int(os.environ.get("SMTP_LIMITE_POR_MINUTO", "60"))
+
+PENDENTE = "pendente"
+ENVIADO = "enviado"
+DEAD_LETTER = "dead_letter"
+
+_contadores = {"enviados": 0, "falhados": 0, "ligacoes": 0, "religacoes": 0}
+
+
+def _agora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ConfigSMTP:
+    """Servidor, credenciais e remetente SMTP"""
+
+    def __init__(
+        self,
+        host: Optional[str],
+        port: Any,
+        utilizador: Optional[str],
+        password: Optional[str],
+        remetente: Optional[str],
+        nome_remetente: Optional[str] = "TVDEFleet",
+        limite_por_minuto: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = int(port or 587)
+        self.utilizador = utilizador
+        self.password = password
+        self.remetente = remetente or utilizador
+        self.nome_remetente = nome_remetente or "TVDEFleet"
+        self.limite_por_minuto = int(limite_por_minuto or SMTP_LIMITE_POR_MINUTO)
+
+    @property
+    def chave(self) -> str:
+        """Uma sessão por servidor e utilizador"""
+        return f"{self.host}:{self.port}:{self.utilizador}"
+
+    def valida(self) -> bool:
+        return all([self.host, self.port, self.utilizador, self.password, self.remetente])
+
+
+def config_sistema() -> Optional[ConfigSMTP]:
+    """SMTP do sistema (variáveis SMTP_*), ou None se incompleto"""
+    config = ConfigSMTP(
+        os.environ.get("SMTP_HOST"),
+        os.environ.get("SMTP_PORT", 587),
+        os.environ.get("SMTP_USER"),
+        os.environ.get("SMTP_PASSWORD"),
+        os.environ.get("SMTP_FROM_EMAIL", os.environ.get("SMTP_USER")),
+        os.environ.get("SMTP_FROM_NAME", "TVDEFleet"),
+    )
+    return config if config.valida() else None
+
+
+async def config_parceiro(db, parceiro_id: str) -> Optional[ConfigSMTP]:
+    """SMTP configurado pelo parceiro, ou None"""
+    from utils.email_service import get_parceiro_email_service
+    servico = await get_parceiro_email_service(db, parceiro_id)
+    return servico.config_smtp() if servico else None
+
+
+# ==================== SESSÕES ====================
+
+class _Sessao:
+    """Ligação SMTP autenticada; os métodos sem `async` correm numa thread"""
+
+    def __init__(self, config: ConfigSMTP):
+        self.config = config
+        self.lock = asyncio.Lock()
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.enviados = 0
+        self.ultimo_uso = 0.0
+        self.proximo_envio = 0.0
+        self.expirada = False
+
+    def _ligar(self):
+        config = self.config
+        contexto = ssl.create_default_context()
+        if config.port == 465:
+            smtp = smtplib.SMTP_SSL(config.host, config.port, context=contexto, timeout=SMTP_TIMEOUT)
+        else:
+            smtp = smtplib.SMTP(config.host, config.port, timeout=SMTP_TIMEOUT)
+            smtp.ehlo()
+            smtp.starttls(context=contexto)
+            smtp.ehlo()
+        try:
+            smtp.login(config.utilizador, config.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.enviados = 0
+        self.expirada = False
+        _contadores["ligacoes"] += 1
+
+    def fechar(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+        self.smtp = None
+
+    def enviar(self, destinatarios: List[str], conteudo: str):
+        if self.smtp is not None and (
+            self.expirada
+            or self.enviados >= SMTP_MAX_POR_SESSAO
+            or time.monotonic() - self.ultimo_uso > SMTP_INATIVIDADE_SEGUNDOS
+        ):
+            self.fechar()
+        if self.smtp is None:
+            self._ligar()
+        try:
+            self.smtp.sendmail(self.config.remetente, destinatarios, conteudo)
+        except smtplib.SMTPServerDisconnected:
+            # O servidor fechou a ligação entretanto: religar uma vez
+            _contadores["religacoes"] += 1
+            self.fechar()
+            self._ligar()
+            self.smtp.sendmail(self.config.remetente, destinatarios, conteudo)
+        self.enviados += 1
+        self.ultimo_uso = time.monotonic()
+
+    async def aguardar_vez(self):
+        """Respeitar o limite de mensagens por minuto deste servidor"""
+        espera = self.proximo_envio - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        self.proximo_envio = time.monotonic() + 60.0 / max(self.config.limite_por_minuto, 1)
+
+
+_sessoes: Dict[str, _Sessao] = {}
+
+
+def _sessao(config: ConfigSMTP) -> _Sessao:
+    sessao = _sessoes.get(config.chave)
+    if sessao is None:
+        sessao = _sessoes[config.chave] = _Sessao(config)
+    elif (sessao.config.password, sessao.config.remetente) != (config.password, config.remetente):
+        # Credenciais alteradas: a próxima mensagem abre uma ligação nova
+        sessao.config = config
+        sessao.expirada = True
+    else:
+        sessao.config.limite_por_minuto = config.limite_por_minuto
+    return sessao
+
+
+# ==================== MENSAGENS E ERROS ====================
+
+def _construir(config: ConfigSMTP, mensagem: Dict[str, Any]) -> Tuple[List[str], str]:
+    """Destinatários e texto MIME de `mensagem` (para, assunto, html, texto, cc, bcc, anexos)"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = mensagem["assunto"]
+    msg['From'] = f"{config.nome_remetente} <{config.remetente}>"
+    msg['To'] = mensagem["para"]
+    cc = mensagem.get("cc") or []
+    if cc:
+        msg['Cc'] = ', '.join(cc)
+
+    if mensagem.get("texto"):
+        msg.attach(MIMEText(mensagem["texto"], 'plain', 'utf-8'))
+    msg.attach(MIMEText(mensagem["html"], 'html', 'utf-8'))
+
+    for anexo in mensagem.get("anexos") or []:
+        parte = MIMEBase('application', 'octet-stream')
+        parte.set_payload(anexo['content'])
+        encoders.encode_base64(parte)
+        parte.add_header('Content-Disposition', f'attachment; filename="{anexo["filename"]}"')
+        msg.attach(parte)
+
+    return [mensagem["para"], *cc, *(mensagem.get("bcc") or [])], msg.as_string()
+
+
+def _erro_de_mensagem(e: Exception) -> bool:
+    """O servidor recusou esta mensagem, mas a ligação continua utilizável"""
+    return isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)) and not isinstance(
+        e, smtplib.SMTPAuthenticationError
+    )
+
+
+def _temporario(e: Exception) -> bool:
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(400 <= codigo < 500 for codigo, _ in e.recipients.values())
+    if isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    return isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+def _descrever(e: Exception) -> str:
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return "Falha na autenticação SMTP. Verifique as credenciais."
+    if isinstance(e, smtplib.SMTPConnectError):
+        return "Não foi possível conectar ao servidor SMTP."
+    if isinstance(e, smtplib.SMTPServerDisconnected):
+        return "Servidor SMTP desconectou. Verifique a porta e configurações SSL/TLS."
+    if isinstance(e, ssl.SSLError):
+        return "Erro SSL. Verifique se a porta está correta (465 para SSL, 587 para TLS)."
+    if isinstance(e, ConnectionRefusedError):
+        return "Conexão recusada. Verifique o host e porta SMTP."
+    if isinstance(e, TimeoutError):
+        return "Timeout na conexão. O servidor SMTP pode estar inacessível."
+    return f"Erro ao enviar email: {e}"
+
+
+# ==================== ENVIO IMEDIATO ====================
+
+async def enviar_lote(config: Optional[ConfigSMTP], mensagens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Enviar `mensagens` pela sessão de `config`, por ordem. Devolve um
+    resultado por mensagem: {"success", "message"} ou {"success": False,
+    "error", "temporario"}.
+    """
+    if config is None or not config.valida():
+        falha = {"success": False, "error": "Configuração SMTP incompleta", "temporario": False}
+        return [dict(falha) for _ in mensagens]
+
+    sessao = _sessao(config)
+    resultados: List[Dict[str, Any]] = []
+    async with sessao.lock:
+        for mensagem in mensagens:
+            try:
+                destinatarios, conteudo = _construir(config, mensagem)
+                await sessao.aguardar_vez()
+                await executor_service.executar_io(sessao.enviar, destinatarios, conteudo)
+            except Exception as e:
+                _contadores["falhados"] += 1
+                falha = {"success": False, "error": _descrever(e), "temporario": _temporario(e)}
+                resultados.append(falha)
+                if _erro_de_mensagem(e):
+                    logger.warning(f"Email para {mensagem.get('para')} recusado: {e}")
+                    continue
+                # Servidor inacessível ou credenciais erradas: o resto do lote falharia igual
+                logger.error(f"Erro SMTP ({config.chave}): {e}")
+                await executor_service.executar_io(sessao.fechar)
+                resultados += [dict(falha) for _ in mensagens[len(resultados):]]
+                break
+            else:
+                _contadores["enviados"] += 1
+                resultados.append({"success": True, "message": "Email enviado com sucesso"})
+    return resultados
+
+
+async def enviar(
+    config: Optional[ConfigSMTP],
+    para: str,
+    assunto: str,
+    html: str,
+    texto: Optional[str] = None,
+    cc: Optional[List[str]] = None,
+    bcc: Optional[List[str]] = None,
+    anexos: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Enviar um email já, pela sessão persistente do servidor"""
+    mensagem = {"para": para, "assunto": assunto, "html": html, "texto": texto, "cc": cc, "bcc": bcc, "anexos": anexos}
+    return (await enviar_lote(config, [mensagem]))[0]
+
+
+# ==================== FILA E DEAD-LETTER ====================
+
+async def enfileirar(
+    db,
+    mensagens: List[Dict[str, Any]],
+    parceiro_id: Optional[str] = None,
+    criado_por: Optional[str] = None,
+    descricao: Optional[str] = None,
+    processar_agora: bool = False,
+) -> Dict[str, Any]:
+    """
+    Guardar `mensagens` (para, assunto, html, texto, cc, bcc, parceiro_id,
+    contexto) num lote e enviá-lo na fila "email". Sem `parceiro_id` (na
+    mensagem ou no lote) usa o SMTP do sistema, tal como quando o parceiro
+    não tem SMTP configurado.
+
+    Com `processar_agora` (chamadas que já correm numa tarefa da fila) o
+    lote é enviado logo e só as falhas temporárias seguem para a fila.
+    """
+    lote_id = str(uuid.uuid4())
+    agora = _agora()
+    docs = [{
+        "id": str(uuid.uuid4()),
+        "lote_id": lote_id,
+        "parceiro_id": m.get("parceiro_id", parceiro_id),
+        "para": m["para"],
+        "assunto": m["assunto"],
+        "html": m["html"],
+        "texto": m.get("texto"),
+        "cc": m.get("cc"),
+        "bcc": m.get("bcc"),
+        "contexto": m.get("contexto"),
+        "estado": PENDENTE,
+        "tentativas": 0,
+        "erro": None,
+        "criado_por": criado_por,
+        "criado_em": agora,
+        "atualizado_em": agora,
+        "enviado_em": None,
+    } for m in mensagens]
+    resumo: Dict[str, Any] = {"lote_id": lote_id, "total": len(docs), "ids": [d["id"] for d in docs]}
+    if not docs:
+        return resumo
+    await db[COLECAO].insert_many(docs)
+
+    if processar_agora:
+        resumo.update(await processar(db, lote_id))
+        if not resumo["pendentes"]:
+            return resumo
+
+    tarefa = await fila_tarefas.enfileirar(
+        db,
+        TIPO,
+        {"lote_id": lote_id},
+        criado_por=criado_por,
+        max_tentativas=EMAIL_MAX_TENTATIVAS,
+        descricao=descricao or f"Envio de {len(docs)} emails",
+    )
+    resumo["tarefa_id"] = tarefa["id"]
+    return resumo
+
+
+async def processar(db, lote_id: str, ultima: bool = False) -> Dict[str, Any]:
+    """
+    Enviar as mensagens pendentes do lote, uma sessão por servidor. Com
+    `ultima`, as falhas temporárias também passam a dead_letter.
+    """
+    docs = await db[COLECAO].find({"lote_id": lote_id, "estado": PENDENTE}, {"_id": 0}).to_list(None)
+
+    por_parceiro: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for doc in docs:
+        por_parceiro.setdefault(doc.get("parceiro_id"), []).append(doc)
+
+    resumo = {"enviados": 0, "pendentes": 0, "dead_letter": 0, "estados": {}, "erros": {}}
+    operacoes = []
+    for parceiro_id, grupo in por_parceiro.items():
+        try:
+            config = (await config_parceiro(db, parceiro_id) if parceiro_id else None) or config_sistema()
+        except Exception as e:
+            # Sem configuração não há envio: o grupo fica pendente para a fila repetir
+            logger.error(f"Erro ao obter SMTP do parceiro {parceiro_id}: {e}")
+            falha = {"success": False, "error": f"Erro ao obter configuração SMTP: {e}", "temporario": True}
+            resultados = [dict(falha) for _ in grupo]
+        else:
+            resultados = await enviar_lote(config, grupo)
+        for doc, resultado in zip(grupo, resultados):
+            agora = _agora()
+            if resultado["success"]:
+                update = {"estado": ENVIADO, "erro": None, "enviado_em": agora, "atualizado_em": agora}
+                resumo["enviados"] += 1
+            elif resultado.get("temporario") and not ultima:
+                update = {"erro": resultado["error"], "atualizado_em": agora}
+                resumo["pendentes"] += 1
+            else:
+                update = {"estado": DEAD_LETTER, "erro": resultado["error"], "atualizado_em": agora}
+                resumo["dead_letter"] += 1
+            resumo["estados"][doc["id"]] = update.get("estado", PENDENTE)
+            if update["erro"]:
+                resumo["erros"][doc["id"]] = update["erro"]
+            operacoes.append(UpdateOne({"id": doc["id"]}, {"$set": update, "$inc": {"tentativas": 1}}))
+
+    if operacoes:
+        await db[COLECAO].bulk_write(operacoes, ordered=False)
+    return resumo
+
+
+@fila_tarefas.registar(TIPO, fila=FILA)
+async def tarefa_enviar_lote(db, tarefa: fila_tarefas.Tarefa) -> Dict[str, Any]:
+    """Enviar um lote; falhas temporárias voltam à fila com backoff"""
+    from services.relatorios_massa import atualizar_historico_emails
+
+    ultima = tarefa.tentativa >= tarefa.max_tentativas
+    resumo = await processar(db, tarefa.payload["lote_id"], ultima=ultima)
+    # Histórico do envio em massa de relatórios (gravado como "pendente")
+    await atualizar_historico_emails(db, resumo["estados"])
+    if resumo["pendentes"]:
+        raise RuntimeError(f"{resumo['pendentes']} emails com falha temporária")
+    resumo.pop("estados")
+    resumo.pop("erros")
+    return resumo
+
+
+async def reenviar(db, ids: Optional[List[str]] = None, criado_por: Optional[str] = None) -> Dict[str, Any]:
+    """Devolver à fila mensagens em dead_letter (todas, ou só `ids`)"""
+    query: Dict[str, Any] = {"estado": DEAD_LETTER}
+    if ids:
+        query["id"] = {"$in": ids}
+    lotes = await db[COLECAO].distinct("lote_id", query)
+    resultado = await db[COLECAO].update_many(
+        query, {"$set": {"estado": PENDENTE, "tentativas": 0, "atualizado_em": _agora()}}
+    )
+    tarefas = []
+    for lote_id in lotes:
+        tarefa = await fila_tarefas.enfileirar(
+            db, TIPO, {"lote_id": lote_id}, criado_por=criado_por,
+            max_tentativas=EMAIL_MAX_TENTATIVAS, descricao="Reenvio de emails",
+        )
+        tarefas.append(tarefa["id"])
+    return {"reenviados": resultado.modified_count, "tarefas": tarefas}
+
+
+async def encerrar():
+    """Fechar as sessões SMTP abertas (shutdown)"""
+    for sessao in list(_sessoes.values()):
+        async with sessao.lock:
+            await executor_service.executar_io(sessao.fechar)
+    _sessoes.clear()
+
+
+def estatisticas() -> Dict[str, Any]:
+    return {
+        "sessoes": [
+            {
+                "servidor": chave,
+                "ligada": sessao.smtp is not None,
+                "enviados_na_ligacao": sessao.enviados,
+                "limite_por_minuto": sessao.config.limite_por_minuto,
+                "ocupada": sessao.lock.locked(),
+            }
+            for chave, sessao in _sessoes.items()
+        ],
+        "max_por_sessao": SMTP_MAX_POR_SESSAO,
+        **_contadores,
+    }
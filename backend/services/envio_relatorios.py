@@ -2,82 +2,37 @@
 Serviço de envio de relatórios para motoristas.
 Suporta envio por WhatsApp (link direto) e Email (SMTP do parceiro ou sistema).
 """
-import os
 import logging
-import smtplib
-import ssl
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 from typing import Optional, Dict, List
 from datetime import datetime
 
-logger = logging.getLogger(__name__)
+from services import envio_email
 
-# SMTP Configuration from environment (fallback when partner SMTP not available)
-SMTP_HOST = os.environ.get("SMTP_HOST")
-SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
-SMTP_USER = os.environ.get("SMTP_USER")
-SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
-SMTP_FROM_EMAIL = os.environ.get("SMTP_FROM_EMAIL", os.environ.get("SMTP_USER"))
-SMTP_FROM_NAME = os.environ.get("SMTP_FROM_NAME", "TVDEFleet")
+logger = logging.getLogger(__name__)
 
-def send_email_smtp(
+async def send_email_smtp(
     to_email: str,
     subject: str,
     html_content: str,
     plain_content: Optional[str] = None
 ) -> Dict:
     """
-    Envia email via SMTP configurado no sistema.
+    Envia email via SMTP configurado no sistema (sessão persistente de
+    services/envio_email.py, sem bloquear o event loop).
     Retorna {"success": True/False, "message": "..."}
     """
-    if not all([SMTP_HOST, SMTP_USER, SMTP_PASSWORD]):
+    config = envio_email.config_sistema()
+    if config is None:
         return {
             "success": False,
             "message": "Email não enviado - Configuração SMTP incompleta. Configure SMTP_HOST, SMTP_USER e SMTP_PASSWORD no .env"
         }
     
-    try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-        msg['To'] = to_email
-        
-        # Add plain text and HTML parts
-        if plain_content:
-            msg.attach(MIMEText(plain_content, 'plain', 'utf-8'))
-        msg.attach(MIMEText(html_content, 'html', 'utf-8'))
-        
-        # Connect and send
-        context = ssl.create_default_context()
-        
-        if SMTP_PORT == 465:
-            # SSL connection
-            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=context)
-        else:
-            # TLS connection (STARTTLS)
-            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
-            server.ehlo()
-            server.starttls(context=context)
-            server.ehlo()
-        
-        server.login(SMTP_USER, SMTP_PASSWORD)
-        server.sendmail(SMTP_FROM_EMAIL, to_email, msg.as_string())
-        server.quit()
-        
-        logger.info(f"✓ Email enviado com sucesso para {to_email} via SMTP")
-        return {"success": True, "message": "Email enviado com sucesso"}
-        
-    except smtplib.SMTPAuthenticationError:
-        logger.error("SMTP Authentication failed")
-        return {"success": False, "message": "Falha na autenticação SMTP. Verifique as credenciais."}
-    except smtplib.SMTPConnectError as e:
-        logger.error(f"SMTP Connection failed: {e}")
-        return {"success": False, "message": "Não foi possível conectar ao servidor SMTP."}
-    except Exception as e:
-        logger.error(f"Erro ao enviar email via SMTP: {str(e)}")
-        return {"success": False, "message": str(e)}
+    result = await envio_email.enviar(config, to_email, subject, html_content, texto=plain_content)
+    if not result["success"]:
+        return {"success": False, "message": result["error"]}
+    logger.info(f"✓ Email enviado com sucesso para {to_email} via SMTP")
+    return result
 
 
 def generate_whatsapp_link(
@@ -303,11 +258,14 @@ async def enviar_relatorio_motorista(
     enviar_email: bool = True,
     enviar_whatsapp: bool = True,
     db = None,
-    parceiro_id: str = None
+    parceiro_id: str = None,
+    lote: Optional[List[Dict]] = None
 ) -> Dict:
     """
     Envia relatório semanal para o motorista.
-    Usa SMTP do parceiro se disponível, caso contrário tenta SendGrid.
+    Usa SMTP do parceiro se disponível, caso contrário o SMTP do sistema.
+    Com `lote`, o email não é enviado: a mensagem é acrescentada à lista
+    para seguir num envio em lote (services/envio_email.enfileirar).
     Retorna resultado do envio.
     """
     results = {
@@ -327,13 +285,24 @@ async def enviar_relatorio_motorista(
         
         email_result = None
         
+        if lote is not None:
+            # O lote escolhe o SMTP (parceiro ou sistema) no envio
+            lote.append({
+                "para": email,
+                "assunto": subject,
+                "html": html_content,
+                "parceiro_id": parceiro_id,
+                "contexto": {"motorista_id": motorista_data.get("motorista_id"), "semana": semana, "ano": ano},
+            })
+            email_result = {"success": True, "message": "Email em fila de envio"}
+        
         # Tentar usar SMTP do parceiro primeiro
-        if db is not None and parceiro_id:
+        elif db is not None and parceiro_id:
             try:
                 from utils.email_service import get_parceiro_email_service
                 email_service = await get_parceiro_email_service(db, parceiro_id)
                 if email_service:
-                    email_result = email_service.send_email(
+                    email_result = await email_service.enviar(
                         to_email=email,
                         subject=subject,
                         body_html=html_content
@@ -344,7 +313,7 @@ async def enviar_relatorio_motorista(
         
         # Fallback para SMTP do sistema se SMTP do parceiro não disponível
         if email_result is None:
-            email_result = send_email_smtp(email, subject, html_content)
+            email_result = await send_email_smtp(email, subject, html_content)
         
         results["email"] = {
             "enviado": email_result.get("success", False),
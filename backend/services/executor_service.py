@@ -0,0 +1,185 @@
+"""
+Executores partilhados para trabalho síncrono pesado.
+
+Os handlers são `async def` e correm todos no mesmo event loop: um
+`openpyxl.load_workbook` de um Excel grande ou um `doc.build` do reportlab
+bloqueiam a aplicação para todos os utilizadores enquanto correm.
+
+Este serviço expõe dois pools:
+
+- `executar_cpu`: ProcessPoolExecutor para parsing de ficheiros, PDFs e
+  imagens. A função e os argumentos têm de ser picklable (funções de
+  módulo, não closures nem objetos com ligações à BD);
+- `executar_io`: ThreadPoolExecutor para I/O bloqueante (escrita de
+  ficheiros, bibliotecas síncronas).
+
+Cada pool aceita no máximo `workers` tarefas em execução e
+`EXECUTOR_FILA_MAX` à espera; acima disso levanta `ExecutorSobrecarregado`
+em vez de acumular pedidos sem limite. As métricas por tarefa (contagens,
+tempo de espera e de execução) ficam disponíveis em `estatisticas()`.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_PROCESSOS = int(os.environ.get("EXECUTOR_PROCESSOS", str(max(2, min(4, os.cpu_count() or 2)))))
+EXECUTOR_THREADS = int(os.environ.get("EXECUTOR_THREADS", "8"))
+EXECUTOR_FILA_MAX = int(os.environ.get("EXECUTOR_FILA_MAX", "32"))
+
+
+class ExecutorSobrecarregado(Exception):
+    """Fila do executor cheia: o pedido deve ser repetido mais tarde"""
+
+
+def _contexto_processos():
+    # Evitar fork: o processo principal tem threads (motor, scheduler) e
+    # um fork a meio de um lock deixa o filho bloqueado
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+
+class _Pool:
+    """Executor com fila limitada e métricas por tarefa"""
+
+    def __init__(self, nome: str, workers: int, criar: Callable[[int], Executor]):
+        self.nome = nome
+        self.workers = workers
+        self._criar = criar
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.em_espera = 0
+        self.em_execucao = 0
+        self.rejeitadas = 0
+        self.tarefas: Dict[str, Dict[str, Any]] = {}
+
+    def _obter_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._criar(self.workers)
+            logger.info(f"⚙️ Executor '{self.nome}' iniciado com {self.workers} workers")
+        return self._executor
+
+    def _metricas(self, tarefa: str) -> Dict[str, Any]:
+        if tarefa not in self.tarefas:
+            self.tarefas[tarefa] = {
+                "executadas": 0,
+                "falhadas": 0,
+                "rejeitadas": 0,
+                "tempo_espera_total": 0.0,
+                "tempo_execucao_total": 0.0,
+                "tempo_execucao_max": 0.0,
+            }
+        return self.tarefas[tarefa]
+
+    async def executar(self, func: Callable, *args, **kwargs) -> Any:
+        tarefa = getattr(func, "__qualname__", None) or repr(func)
+        metricas = self._metricas(tarefa)
+
+        if self.em_espera >= EXECUTOR_FILA_MAX:
+            self.rejeitadas += 1
+            metricas["rejeitadas"] += 1
+            raise ExecutorSobrecarregado(
+                f"Executor '{self.nome}' ocupado ({self.em_espera} tarefas em espera)"
+            )
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        inicio = time.monotonic()
+        self.em_espera += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.em_espera -= 1
+        metricas["tempo_espera_total"] += time.monotonic() - inicio
+
+        self.em_execucao += 1
+        inicio = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            resultado = await loop.run_in_executor(
+                self._obter_executor(), functools.partial(func, *args, **kwargs)
+            )
+            metricas["executadas"] += 1
+            return resultado
+        except BrokenProcessPool:
+            # Um worker morreu (p.ex. OOM): recriar o pool na próxima tarefa
+            metricas["falhadas"] += 1
+            logger.error(f"Executor '{self.nome}' partido ao executar {tarefa}; a recriar")
+            self._executor = None
+            raise
+        except Exception:
+            metricas["falhadas"] += 1
+            raise
+        finally:
+            duracao = time.monotonic() - inicio
+            metricas["tempo_execucao_total"] += duracao
+            metricas["tempo_execucao_max"] = max(metricas["tempo_execucao_max"], duracao)
+            self.em_execucao -= 1
+            self._slots.release()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        tarefas = {}
+        for tarefa, m in self.tarefas.items():
+            concluidas = m["executadas"] + m["falhadas"]
+            tarefas[tarefa] = {
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in m.items()},
+                "tempo_execucao_medio": round(m["tempo_execucao_total"] / concluidas, 3) if concluidas else 0.0,
+            }
+        return {
+            "workers": self.workers,
+            "em_execucao": self.em_execucao,
+            "em_espera": self.em_espera,
+            "fila_max": EXECUTOR_FILA_MAX,
+            "rejeitadas": self.rejeitadas,
+            "tarefas": tarefas,
+        }
+
+    def encerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_processos = _Pool(
+    "processos",
+    EXECUTOR_PROCESSOS,
+    lambda workers: ProcessPoolExecutor(max_workers=workers, mp_context=_contexto_processos()),
+)
+_threads = _Pool(
+    "threads",
+    EXECUTOR_THREADS,
+    lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="executor-io"),
+)
+
+
+async def executar_cpu(func: Callable, *args, **kwargs) -> Any:
+    """Executar trabalho CPU-bound (parsing, PDF, imagens) no pool de processos"""
+    return await _processos.executar(func, *args, **kwargs)
+
+
+async def executar_io(func: Callable, *args, **kwargs) -> Any:
+    """Executar I/O bloqueante no pool de threads"""
+    return await _threads.executar(func, *args, **kwargs)
+
+
+def estatisticas() -> Dict[str, Any]:
+    """Estado e métricas por tarefa dos dois pools"""
+    return {
+        "processos": _processos.estatisticas(),
+        "threads": _threads.estatisticas(),
+    }
+
+
+def encerrar():
+    """Encerrar os pools (shutdown da aplicação)"""
+    _processos.encerrar()
+    _threads.encerrar()
@@ -0,0 +1,397 @@
+"""
+Fila de tarefas em background guardada no MongoDB (colecção `fila_tarefas`).
+
+Operações longas (geração e envio de relatórios em massa) deixam de correr
+dentro do pedido HTTP: o endpoint chama `enfileirar` e devolve logo o id da
+tarefa, e o frontend consulta `GET /api/tarefas/{id}` até ao fim.
+
+Cada tarefa tem um `tipo` associado a um handler registado com
+`@registar("tipo")`. O handler recebe `(db, tarefa)` e pode reportar
+progresso com `await tarefa.progresso(atual, total)`, o que também
+interrompe a execução se o cancelamento tiver sido pedido.
+
+Os workers reclamam tarefas com `find_one_and_update` atómico, por isso
+podem correr em vários workers uvicorn ou num processo separado:
+
+    python -m services.fila_tarefas          # só workers, sem API
+
+Uma tarefa que falha volta à fila com backoff exponencial até
+`max_tentativas`; tarefas cujo worker morreu (sem heartbeat há mais de
+`FILA_TAREFAS_TIMEOUT` segundos) são recuperadas.
+
+Cada tipo pertence a uma fila (`registar(tipo, fila=...)`, por omissão
+"geral") com os seus próprios workers, para que tarefas longas (RPA) não
+ocupem os workers dos relatórios. As tarefas são reclamadas por
+`prioridade` (maior primeiro) e podem ter `grupos` com limite de execuções
+simultâneas em todos os nós (`definir_limite("rpa:uber", 1)`, ou
+`definir_limite("rpa:*", 2)` para cada grupo com esse prefixo).
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+COLECAO = "fila_tarefas"
+
+FILA_TAREFAS_WORKERS = int(os.environ.get("FILA_TAREFAS_WORKERS", "2"))
+FILA_TAREFAS_POLL_SEGUNDOS = float(os.environ.get("FILA_TAREFAS_POLL_SEGUNDOS", "2"))
+FILA_TAREFAS_TIMEOUT = int(os.environ.get("FILA_TAREFAS_TIMEOUT", "600"))
+FILA_TAREFAS_MAX_TENTATIVAS = int(os.environ.get("FILA_TAREFAS_MAX_TENTATIVAS", "3"))
+
+PENDENTE = "pendente"
+EM_EXECUCAO = "em_execucao"
+CONCLUIDA = "concluida"
+FALHADA = "falhada"
+CANCELADA = "cancelada"
+
+ESTADOS_FINAIS = (CONCLUIDA, FALHADA, CANCELADA)
+
+FILA_GERAL = "geral"
+
+# Módulos que registam handlers (importados pelo worker standalone)
+MODULOS_HANDLERS = [
+    "services.relatorios_massa",
+    "routes.relatorios",
+    "services.rpa_motor",
+    "services.uploads_processamento",
+    "services.envio_email",
+]
+
+Handler = Callable[[Any, "Tarefa"], Awaitable[Optional[Dict[str, Any]]]]
+_handlers: Dict[str, Handler] = {}
+_filas: Dict[str, str] = {}
+_limites: Dict[str, int] = {}
+
+
+class TarefaCancelada(Exception):
+    """Levantada em `Tarefa.progresso` quando o cancelamento foi pedido"""
+
+
+def registar(tipo: str, fila: str = FILA_GERAL):
+    """Registar o handler de um tipo de tarefa (servido pelos workers de `fila`)"""
+    def decorator(func: Handler) -> Handler:
+        _handlers[tipo] = func
+        _filas[tipo] = fila
+        return func
+    return decorator
+
+
+def definir_limite(grupo: str, limite: int):
+    """Máximo de tarefas do `grupo` em execução ao mesmo tempo (todos os nós)"""
+    _limites[grupo] = limite
+
+
+def _limite(grupo: str) -> Optional[int]:
+    if grupo in _limites:
+        return _limites[grupo]
+    for padrao, limite in _limites.items():
+        if padrao.endswith("*") and grupo.startswith(padrao[:-1]):
+            return limite
+    return None
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Tarefa:
+    """Contexto de execução passado ao handler"""
+
+    def __init__(self, db, doc: Dict[str, Any]):
+        self._db = db
+        self.id = doc["id"]
+        self.tipo = doc["tipo"]
+        self.payload = doc.get("payload") or {}
+        self.criado_por = doc.get("criado_por")
+        self.tentativa = doc.get("tentativas", 1)
+        self.max_tentativas = doc.get("max_tentativas", 1)
+
+    async def progresso(self, atual: float, total: Optional[float] = None, mensagem: Optional[str] = None):
+        """Atualizar progresso (0-100, ou atual/total) e renovar o heartbeat"""
+        percentagem = (atual / total * 100) if total else atual
+        update = {
+            "progresso": round(min(max(percentagem, 0), 100), 1),
+            "heartbeat": _agora(),
+        }
+        if mensagem is not None:
+            update["mensagem"] = mensagem
+        doc = await self._db[COLECAO].find_one_and_update(
+            {"id": self.id},
+            {"$set": update},
+            projection={"_id": 0, "cancelamento_pedido": 1},
+        )
+        if doc and doc.get("cancelamento_pedido"):
+            raise TarefaCancelada()
+
+
+async def enfileirar(
+    db,
+    tipo: str,
+    payload: Dict[str, Any],
+    criado_por: Optional[str] = None,
+    max_tentativas: int = FILA_TAREFAS_MAX_TENTATIVAS,
+    descricao: Optional[str] = None,
+    prioridade: int = 0,
+    grupos: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Criar uma tarefa pendente e devolver o documento (sem _id)"""
+    if tipo not in _handlers:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+
+    agora = _agora()
+    doc = {
+        "id": str(uuid.uuid4()),
+        "tipo": tipo,
+        "descricao": descricao,
+        "payload": payload,
+        "prioridade": prioridade,
+        "grupos": grupos or [],
+        "estado": PENDENTE,
+        "progresso": 0.0,
+        "mensagem": None,
+        "resultado": None,
+        "erro": None,
+        "tentativas": 0,
+        "max_tentativas": max_tentativas,
+        "cancelamento_pedido": False,
+        "criado_por": criado_por,
+        "criado_em": agora,
+        "disponivel_em": agora,
+        "iniciado_em": None,
+        "terminado_em": None,
+        "heartbeat": None,
+        "worker": None,
+    }
+    await db[COLECAO].insert_one(doc)
+    doc.pop("_id", None)
+    logger.info(f"📥 Tarefa {tipo} enfileirada: {doc['id']}")
+    return doc
+
+
+async def obter(db, tarefa_id: str) -> Optional[Dict[str, Any]]:
+    return await db[COLECAO].find_one({"id": tarefa_id}, {"_id": 0})
+
+
+async def listar(db, criado_por: Optional[str] = None, estado: Optional[str] = None, limite: int = 50) -> List[Dict[str, Any]]:
+    query: Dict[str, Any] = {}
+    if criado_por:
+        query["criado_por"] = criado_por
+    if estado:
+        query["estado"] = estado
+    return await db[COLECAO].find(query, {"_id": 0, "payload": 0}).sort("criado_em", -1).to_list(limite)
+
+
+async def cancelar(db, tarefa_id: str) -> Optional[Dict[str, Any]]:
+    """Cancelar já se estiver pendente; se estiver a correr, pedir ao handler que pare"""
+    doc = await db[COLECAO].find_one_and_update(
+        {"id": tarefa_id, "estado": PENDENTE},
+        {"$set": {"estado": CANCELADA, "cancelamento_pedido": True, "terminado_em": _agora()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc:
+        return doc
+    return await db[COLECAO].find_one_and_update(
+        {"id": tarefa_id, "estado": EM_EXECUCAO},
+        {"$set": {"cancelamento_pedido": True}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    ) or await obter(db, tarefa_id)
+
+
+async def repetir(db, tarefa_id: str) -> Optional[Dict[str, Any]]:
+    """Voltar a pôr na fila uma tarefa falhada ou cancelada"""
+    return await db[COLECAO].find_one_and_update(
+        {"id": tarefa_id, "estado": {"$in": [FALHADA, CANCELADA]}},
+        {"$set": {
+            "estado": PENDENTE,
+            "progresso": 0.0,
+            "erro": None,
+            "tentativas": 0,
+            "cancelamento_pedido": False,
+            "disponivel_em": _agora(),
+            "terminado_em": None,
+        }},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _em_execucao_por_grupo(db) -> Dict[str, int]:
+    if not _limites:
+        return {}
+    contagens = await db[COLECAO].aggregate([
+        {"$match": {"estado": EM_EXECUCAO, "grupos.0": {"$exists": True}}},
+        {"$unwind": "$grupos"},
+        {"$group": {"_id": "$grupos", "total": {"$sum": 1}}},
+    ]).to_list(None)
+    return {c["_id"]: c["total"] for c in contagens}
+
+
+async def _reclamar(db, worker_id: str, fila: str = FILA_GERAL) -> Optional[Dict[str, Any]]:
+    tipos = [tipo for tipo, f in _filas.items() if f == fila]
+    em_execucao = await _em_execucao_por_grupo(db)
+    saturados = [g for g, total in em_execucao.items() if _limite(g) is not None and total >= _limite(g)]
+
+    agora = _agora()
+    query: Dict[str, Any] = {"estado": PENDENTE, "disponivel_em": {"$lte": agora}, "tipo": {"$in": tipos}}
+    if saturados:
+        query["grupos"] = {"$nin": saturados}
+    doc = await db[COLECAO].find_one_and_update(
+        query,
+        {
+            "$set": {"estado": EM_EXECUCAO, "worker": worker_id, "iniciado_em": agora, "heartbeat": agora},
+            "$inc": {"tentativas": 1},
+        },
+        sort=[("prioridade", -1), ("disponivel_em", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+    # Outro worker pode ter reclamado do mesmo grupo em simultâneo: ficam as
+    # `limite` tarefas iniciadas primeiro e as restantes voltam à fila
+    for grupo in (doc or {}).get("grupos", []):
+        limite = _limite(grupo)
+        if limite is None:
+            continue
+        primeiras = await db[COLECAO].find(
+            {"estado": EM_EXECUCAO, "grupos": grupo}, {"_id": 0, "id": 1}
+        ).sort([("iniciado_em", 1), ("id", 1)]).limit(limite).to_list(limite)
+        if doc["id"] not in {t["id"] for t in primeiras}:
+            await db[COLECAO].update_one(
+                {"id": doc["id"], "worker": worker_id},
+                {"$set": {"estado": PENDENTE, "worker": None, "iniciado_em": None}, "$inc": {"tentativas": -1}},
+            )
+            return None
+    return doc
+
+
+def _reclamada(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Filtro que só apanha a tarefa enquanto for deste worker e desta tentativa"""
+    return {"id": doc["id"], "estado": EM_EXECUCAO, "worker": doc["worker"], "tentativas": doc["tentativas"]}
+
+
+async def _terminar(db, doc: Dict[str, Any], update: Dict[str, Any]) -> bool:
+    """
+    Fechar a tarefa reclamada em `doc`. Se entretanto foi dada como órfã e
+    reclamada por outro worker (ou falhada), não lhe mexe e devolve False.
+    """
+    update["terminado_em"] = _agora()
+    resultado = await db[COLECAO].update_one(_reclamada(doc), {"$set": update})
+    if not resultado.matched_count:
+        logger.warning(f"Tarefa {doc['id']} já não pertence ao worker {doc['worker']}; resultado ignorado")
+    return bool(resultado.matched_count)
+
+
+async def _manter_heartbeat(db, doc: Dict[str, Any]):
+    """Heartbeat enquanto o handler corre, mesmo sem reportar progresso"""
+    while True:
+        await asyncio.sleep(FILA_TAREFAS_TIMEOUT / 4)
+        try:
+            await db[COLECAO].update_one(_reclamada(doc), {"$set": {"heartbeat": _agora()}})
+        except Exception as e:
+            logger.warning(f"Erro no heartbeat da tarefa {doc['id']}: {e}")
+
+
+async def _executar(db, doc: Dict[str, Any]):
+    tarefa = Tarefa(db, doc)
+    heartbeat = asyncio.create_task(_manter_heartbeat(db, doc))
+    try:
+        resultado = await _handlers[doc["tipo"]](db, tarefa)
+    except TarefaCancelada:
+        logger.info(f"🛑 Tarefa {doc['tipo']} {doc['id']} cancelada")
+        await _terminar(db, doc, {"estado": CANCELADA})
+    except Exception as e:
+        logger.error(f"❌ Tarefa {doc['tipo']} {doc['id']} falhou (tentativa {doc['tentativas']}): {e}")
+        if doc["tentativas"] < doc.get("max_tentativas", 1):
+            espera = 30 * 2 ** (doc["tentativas"] - 1)
+            await db[COLECAO].update_one(_reclamada(doc), {"$set": {
+                "estado": PENDENTE,
+                "erro": str(e),
+                "worker": None,
+                "disponivel_em": _agora() + timedelta(seconds=espera),
+            }})
+        else:
+            await _terminar(db, doc, {"estado": FALHADA, "erro": str(e)})
+    else:
+        if await _terminar(db, doc, {"estado": CONCLUIDA, "progresso": 100.0, "resultado": resultado, "erro": None}):
+            logger.info(f"✅ Tarefa {doc['tipo']} {doc['id']} concluída")
+    finally:
+        heartbeat.cancel()
+
+
+async def recuperar_orfas(db) -> int:
+    """Devolver à fila tarefas em execução cujo worker deixou de dar sinal"""
+    limite = _agora() - timedelta(seconds=FILA_TAREFAS_TIMEOUT)
+    orfas = {"estado": EM_EXECUCAO, "heartbeat": {"$lt": limite}}
+    falhadas = await db[COLECAO].update_many(
+        {**orfas, "$expr": {"$gte": ["$tentativas", "$max_tentativas"]}},
+        {"$set": {"estado": FALHADA, "erro": "Worker deixou de responder", "terminado_em": _agora()}},
+    )
+    repostas = await db[COLECAO].update_many(
+        orfas,
+        {"$set": {"estado": PENDENTE, "disponivel_em": _agora(), "worker": None}},
+    )
+    total = falhadas.modified_count + repostas.modified_count
+    if total:
+        logger.warning(f"♻️ {total} tarefas órfãs recuperadas")
+    return total
+
+
+async def _worker(db, worker_id: str, fila: str = FILA_GERAL):
+    logger.info(f"👷 Worker de tarefas {worker_id} iniciado (fila {fila})")
+    ciclos = 0
+    while True:
+        try:
+            if ciclos % 30 == 0:
+                await recuperar_orfas(db)
+            ciclos += 1
+
+            doc = await _reclamar(db, worker_id, fila)
+            if doc is None:
+                await asyncio.sleep(FILA_TAREFAS_POLL_SEGUNDOS * (1 + random.random() / 2))
+                continue
+            await _executar(db, doc)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro no worker de tarefas {worker_id}: {e}")
+            await asyncio.sleep(FILA_TAREFAS_POLL_SEGUNDOS)
+
+
+def iniciar_workers(db, quantidade: int = FILA_TAREFAS_WORKERS, fila: str = FILA_GERAL) -> List[asyncio.Task]:
+    """Arrancar `quantidade` workers da `fila` no event loop atual (0 desativa)"""
+    prefixo = f"{socket.gethostname()}:{os.getpid()}:{fila}"
+    return [asyncio.create_task(_worker(db, f"{prefixo}:{i}", fila)) for i in range(quantidade)]
+
+
+async def _main():
+    from utils.database import get_database
+
+    for modulo in MODULOS_HANDLERS:
+        importlib.import_module(modulo)
+
+    from services import envio_email, rpa_motor, uploads_processamento
+
+    db = get_database()
+    workers = iniciar_workers(db, max(FILA_TAREFAS_WORKERS, 1))
+    workers += iniciar_workers(db, max(rpa_motor.RPA_WORKERS, 1), fila=rpa_motor.FILA)
+    workers += iniciar_workers(db, max(uploads_processamento.UPLOADS_WORKERS, 1), fila=uploads_processamento.FILA)
+    workers += iniciar_workers(db, max(envio_email.EMAIL_WORKERS, 1), fila=envio_email.FILA)
+    logger.info(f"Fila de tarefas a correr com {len(workers)} workers ({', '.join(sorted(_handlers))})")
+    await asyncio.gather(*workers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_main())
@@ -1,10 +1,11 @@
 # IFThenPay Service for Portuguese Payment Methods
 import hashlib
-import httpx
 from typing import Dict, Optional
 from datetime import datetime
 import os
 
+from services import clientes_http
+
 class IFThenPayService:
     """Service for IFThenPay payment gateway integration."""
     
@@ -90,7 +91,7 @@ class IFThenPayService:
         """
         # This would call IFThenPay's status check API
         # Implementation depends on actual IFThenPay API documentation
-        async with httpx.AsyncClient() as client:
+        async with clientes_http.sessao("ifthenpay") as client:
             try:
                 response = await client.get(
                     f"{self.base_url}/status",
@@ -0,0 +1,182 @@
+"""
+Mapas de pesquisa em memória para importações de plataformas (CSV).
+
+Carrega uma única vez os motoristas, veículos e cartões de frota do parceiro
+e resolve cada linha do ficheiro em memória, em vez de fazer vários
+`find_one` por linha.
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Campos de motorista usados na resolução de linhas e nos documentos importados
+MOTORISTA_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "name": 1,
+    "nome": 1,
+    "email": 1,
+    "uuid_motorista_uber": 1,
+    "identificador_motorista_bolt": 1,
+    "cartao_eletrico_id": 1,
+    "veiculo_atribuido": 1,
+    "parceiro_atribuido": 1,
+    "parceiro_id": 1,
+    "config_financeira": 1,
+}
+
+SUFIXOS_EMPRESARIAIS = ['Lda', 'LDA', 'UNIPESSOAL', 'Unipessoal', 'SA', 'S.A.', 'LTD']
+
+
+def normalizar_nome(nome: Optional[str]) -> str:
+    """Minúsculas e espaços normalizados (equivalente a `\\s+` nas regex antigas)"""
+    return ' '.join(str(nome or '').split()).lower()
+
+
+class ImportLookup:
+    """Índices em memória de motoristas, veículos e cartões de frota"""
+
+    def __init__(self, motoristas: List[Dict], vehicles: List[Dict], cartoes: List[Dict]):
+        self.motoristas = motoristas
+        self.motoristas_por_id: Dict[str, Dict] = {}
+        self.motoristas_por_uuid_uber: Dict[str, Dict] = {}
+        self.motoristas_por_bolt: Dict[str, Dict] = {}
+        self.motoristas_por_email: Dict[str, Dict] = {}
+        self.motoristas_por_nome: Dict[str, Dict] = {}
+        self.motoristas_por_cartao_eletrico: Dict[str, Dict] = {}
+        # (nome normalizado, motorista) para pesquisas por prefixo/substring
+        self._nomes: List = []
+
+        # Primeiro documento ganha, tal como o find_one sobre a ordem natural
+        for m in motoristas:
+            if m.get("id"):
+                self.motoristas_por_id.setdefault(m["id"], m)
+            if m.get("uuid_motorista_uber"):
+                self.motoristas_por_uuid_uber.setdefault(str(m["uuid_motorista_uber"]).lower(), m)
+            if m.get("identificador_motorista_bolt"):
+                self.motoristas_por_bolt.setdefault(m["identificador_motorista_bolt"], m)
+            if m.get("email"):
+                self.motoristas_por_email.setdefault(m["email"], m)
+            if m.get("cartao_eletrico_id"):
+                self.motoristas_por_cartao_eletrico.setdefault(m["cartao_eletrico_id"], m)
+            nome = normalizar_nome(m.get("name"))
+            if nome:
+                self.motoristas_por_nome.setdefault(nome, m)
+            self._nomes.append((nome, normalizar_nome(m.get("nome")), m))
+
+        self.vehicles_por_id: Dict[str, Dict] = {}
+        self.vehicles_por_matricula: Dict[str, Dict] = {}
+        for v in vehicles:
+            if v.get("id"):
+                self.vehicles_por_id.setdefault(v["id"], v)
+            if v.get("matricula"):
+                self.vehicles_por_matricula.setdefault(str(v["matricula"]).strip().upper(), v)
+
+        self.cartoes: Dict[tuple, Dict] = {}
+        for c in cartoes:
+            if c.get("numero_cartao"):
+                self.cartoes.setdefault((c["numero_cartao"], c.get("tipo")), c)
+
+    @classmethod
+    async def carregar(cls, db, parceiro_id: Optional[str] = None) -> "ImportLookup":
+        """Carregar os dados do parceiro (ou de toda a frota se parceiro_id for None)"""
+        if parceiro_id:
+            filtro_motoristas = {"$or": [{"parceiro_atribuido": parceiro_id}, {"parceiro_id": parceiro_id}]}
+            filtro_parceiro = {"parceiro_id": parceiro_id}
+        else:
+            filtro_motoristas = {}
+            filtro_parceiro = {}
+
+        motoristas = await db.motoristas.find(filtro_motoristas, MOTORISTA_PROJECTION).to_list(None)
+        vehicles = await db.vehicles.find(filtro_parceiro, {"_id": 0}).to_list(None)
+        cartoes = await db.cartoes_frota.find(filtro_parceiro, {"_id": 0}).to_list(None)
+
+        logger.info(
+            f"📇 Lookup de importação: {len(motoristas)} motoristas, "
+            f"{len(vehicles)} veículos, {len(cartoes)} cartões"
+        )
+        return cls(motoristas, vehicles, cartoes)
+
+    # ==================== MOTORISTAS ====================
+
+    def motorista_por_id(self, motorista_id: Optional[str]) -> Optional[Dict]:
+        return self.motoristas_por_id.get(motorista_id) if motorista_id else None
+
+    def motorista_por_email(self, email: Optional[str]) -> Optional[Dict]:
+        return self.motoristas_por_email.get(email) if email else None
+
+    def motorista_por_uuid_uber(self, uuid_motorista: Optional[str]) -> Optional[Dict]:
+        return self.motoristas_por_uuid_uber.get(uuid_motorista.lower()) if uuid_motorista else None
+
+    def motorista_por_id_bolt(self, identificador: Optional[str]) -> Optional[Dict]:
+        if not identificador:
+            return None
+        return self.motoristas_por_bolt.get(identificador) or self.motoristas_por_id.get(identificador)
+
+    def motorista_por_nome_exato(self, nome: Optional[str]) -> Optional[Dict]:
+        """Nome completo igual, sem distinguir maiúsculas"""
+        return self.motoristas_por_nome.get(normalizar_nome(nome)) if nome else None
+
+    def motorista_por_cartao_eletrico(self, card_code: Optional[str]) -> Optional[Dict]:
+        return self.motoristas_por_cartao_eletrico.get(card_code) if card_code else None
+
+    def motorista_por_nome_uber(self, nome_proprio: str, apelido: str) -> Optional[Dict]:
+        """
+        Resolver motorista pelo nome próprio + apelido do CSV Uber.
+
+        Critérios por ordem: nome completo exato, nome com apelido sem sufixos
+        empresariais, nome contém ambas as partes, prefixo do nome próprio
+        (apelidos empresariais) e nome completo exato no campo `nome`.
+        """
+        nome_proprio_norm = normalizar_nome(nome_proprio)
+        apelido_norm = normalizar_nome(apelido)
+        if not nome_proprio_norm or not apelido_norm:
+            return None
+
+        apelido_limpo = ' '.join(apelido.split())
+        for sufixo in SUFIXOS_EMPRESARIAIS:
+            apelido_limpo = re.sub(rf'\b{re.escape(sufixo)}\b', '', apelido_limpo, flags=re.IGNORECASE).strip()
+        apelido_limpo = normalizar_nome(apelido_limpo)
+
+        completo = f"{nome_proprio_norm} {apelido_norm}"
+        motorista = self.motoristas_por_nome.get(completo)
+        if motorista:
+            return motorista
+
+        if apelido_limpo and apelido_limpo != apelido_norm:
+            motorista = self.motoristas_por_nome.get(f"{nome_proprio_norm} {apelido_limpo}")
+            if motorista:
+                return motorista
+
+        primeira_parte_apelido = apelido_norm.split()[0]
+        apelido_empresarial = any(s in apelido_norm.upper().split() for s in ['LDA', 'UNIPESSOAL', 'SA'])
+
+        for nome, _, m in self._nomes:
+            if nome_proprio_norm in nome and primeira_parte_apelido in nome:
+                return m
+
+        if apelido_empresarial:
+            for nome, _, m in self._nomes:
+                if nome.startswith(nome_proprio_norm):
+                    return m
+
+        for _, nome_alt, m in self._nomes:
+            if nome_alt == completo:
+                return m
+
+        return None
+
+    # ==================== VEÍCULOS E CARTÕES ====================
+
+    def vehicle_por_id(self, vehicle_id: Optional[str]) -> Optional[Dict]:
+        return self.vehicles_por_id.get(vehicle_id) if vehicle_id else None
+
+    def vehicle_por_matricula(self, matricula: Optional[str]) -> Optional[Dict]:
+        return self.vehicles_por_matricula.get(matricula.strip().upper()) if matricula else None
+
+    def cartao_frota(self, numero_cartao: Optional[str], tipo: str) -> Optional[Dict]:
+        return self.cartoes.get((numero_cartao, tipo)) if numero_cartao else None
@@ -0,0 +1,643 @@
+"""
+Ledger semanal por motorista (colecção `ledger_semanal`).
+
+O resumo semanal do parceiro, o PDF e as mensagens WhatsApp/email de cada
+motorista e o ecrã de ganhos do motorista recalculavam a semana a partir das
+colecções de importação (ganhos_uber, ganhos_bolt, viagens_bolt,
+portagens_viaverde, abastecimentos_combustivel, despesas_combustivel,
+combustivel_eletrico, rpa_carregamento_eletrico, despesas_extras) com
+consultas `$or` sobre semana/ano, data e periodo_inicio — cinco a nove
+consultas por motorista em cada leitura.
+
+Aqui cada (motorista_id, ano, semana) tem um documento com os subtotais por
+fonte (Uber, Bolt, Via Verde, combustível, elétrico, aluguer, extras):
+
+- `obter` lê os ledgers de uma lista de motoristas numa consulta e só
+  recalcula os que faltam, estão marcados como alterados, têm mais de
+  `LEDGER_SEMANAL_MAX_IDADE` segundos ou cuja configuração do motorista ou
+  do veículo (veículo atribuído, matrícula, cartões, aluguer) mudou;
+- as importações e edições chamam `invalidar_registos` / `invalidar` com os
+  registos ou semanas tocados, e só esses ledgers são recalculados na
+  leitura seguinte;
+- os ajustes manuais (`ajustes_semanais`) e a configuração financeira do
+  motorista continuam a ser aplicados por quem lê (`aplicar_ajuste`).
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone, date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COLECAO = "ledger_semanal"
+
+LEDGER_SEMANAL_MAX_IDADE = int(os.environ.get("LEDGER_SEMANAL_MAX_IDADE", "21600"))
+
+# Colecções lidas pelo ledger (escritas nelas devem invalidá-lo)
+COLECOES_FONTE = (
+    "ganhos_uber", "ganhos_bolt", "viagens_bolt", "portagens_viaverde",
+    "abastecimentos_combustivel", "despesas_combustivel", "combustivel_eletrico",
+    "rpa_carregamento_eletrico", "despesas_extras",
+)
+
+# Campos do motorista e do veículo que entram no cálculo do ledger
+CAMPOS_MOTORISTA = (
+    "name", "email", "veiculo_atribuido", "uuid_motorista_uber",
+    "identificador_motorista_bolt", "valor_aluguer_semanal",
+)
+CAMPOS_VEICULO = (
+    "matricula", "via_verde_id", "obu", "cartao_frota_id", "cartao_frota_eletric_id",
+    "cartao_prio_eletric", "cartao_prio_online", "cartao_mio", "cartao_galp",
+    "cartao_atlante", "cartao_eletrico_outro", "cartao_eletrico_outro_nome",
+    "km_atribuidos", "valor_km_extra", "tipo_contrato", "tipo_contrato_veiculo",
+    "valor_aluguer_semanal", "valor_semanal",
+)
+
+
+def intervalo_semana(semana: int, ano: int) -> Tuple[datetime, datetime]:
+    """Segunda e domingo da semana ISO `semana` de `ano`"""
+    first_day_of_year = datetime(ano, 1, 1)
+    if first_day_of_year.weekday() <= 3:  # Mon-Thu
+        first_monday = first_day_of_year - timedelta(days=first_day_of_year.weekday())
+    else:
+        first_monday = first_day_of_year + timedelta(days=(7 - first_day_of_year.weekday()))
+    week_start = first_monday + timedelta(weeks=semana - 1)
+    return week_start, week_start + timedelta(days=6)
+
+
+def calcular_aluguer_semanal(veiculo: dict, semana: int, ano: int) -> float:
+    """
+    Calcula o valor do aluguer semanal baseado no tipo de contrato e época.
+
+    Args:
+        veiculo: Dicionário com dados do veículo
+        semana: Número da semana (1-53)
+        ano: Ano
+
+    Returns:
+        Valor do aluguer semanal
+    """
+    if not veiculo:
+        return 0.0
+
+    tipo_contrato = veiculo.get("tipo_contrato", {})
+    if not tipo_contrato:
+        # Fallback para campos no nível raiz do veículo
+        return float(veiculo.get("valor_aluguer_semanal") or veiculo.get("valor_semanal") or 0)
+
+    # Verificar se é contrato de aluguer
+    tipo = tipo_contrato.get("tipo", "").lower()
+    if tipo == "comissao":
+        return 0.0  # Contrato de comissão não tem aluguer
+
+    # Calcular a data do início da semana
+    primeiro_dia_ano = datetime(ano, 1, 1)
+    dias_ate_segunda = (7 - primeiro_dia_ano.weekday()) % 7
+    primeira_segunda = primeiro_dia_ano + timedelta(days=dias_ate_segunda)
+    data_semana = primeira_segunda + timedelta(weeks=semana - 1)
+    mes_semana = data_semana.month
+
+    # Verificar se tem época alta/baixa configurada
+    meses_epoca_alta = tipo_contrato.get("meses_epoca_alta", [])
+    valor_epoca_alta = float(tipo_contrato.get("valor_epoca_alta") or 0)
+    valor_epoca_baixa = float(tipo_contrato.get("valor_epoca_baixa") or 0)
+    valor_padrao = float(tipo_contrato.get("valor_aluguer") or tipo_contrato.get("valor_semanal") or 0)
+
+    # Se tem configuração de épocas
+    if meses_epoca_alta and (valor_epoca_alta > 0 or valor_epoca_baixa > 0):
+        if mes_semana in meses_epoca_alta:
+            return valor_epoca_alta if valor_epoca_alta > 0 else valor_padrao
+        else:
+            return valor_epoca_baixa if valor_epoca_baixa > 0 else valor_padrao
+
+    # Fallback para valor padrão
+    return valor_padrao
+
+
+def _impressao(motorista: Dict, veiculo: Optional[Dict]) -> str:
+    """Resumo da configuração usada no cálculo; se mudar, o ledger é recalculado"""
+    dados = {
+        "motorista": {c: motorista.get(c) for c in CAMPOS_MOTORISTA},
+        "veiculo": {c: veiculo.get(c) for c in CAMPOS_VEICULO} if veiculo else None,
+    }
+    return hashlib.sha1(json.dumps(dados, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _matricula_normalizada(matricula: Optional[str]) -> str:
+    return (matricula or "").upper().strip().replace("-", "").replace(" ", "")
+
+
+def _cartoes_eletricos(veiculo: Dict) -> List[Dict[str, str]]:
+    """Cartões elétricos do veículo (6 fornecedores + legacy cartao_frota_eletric_id)"""
+    cartoes = []
+    for campo, fornecedor in (
+        ("cartao_prio_eletric", "Prio Electric"),
+        ("cartao_prio_online", "Prio Online"),
+        ("cartao_mio", "Mio"),
+        ("cartao_galp", "Galp"),
+        ("cartao_atlante", "Atlante"),
+    ):
+        if veiculo.get(campo):
+            cartoes.append({"fornecedor": fornecedor, "cartao": veiculo.get(campo)})
+    if veiculo.get("cartao_eletrico_outro"):
+        cartoes.append({"fornecedor": veiculo.get("cartao_eletrico_outro_nome", "Outro"), "cartao": veiculo.get("cartao_eletrico_outro")})
+    # Legacy - cartao_frota_eletric_id (Prio)
+    cartao_eletrico = veiculo.get("cartao_frota_eletric_id")
+    if cartao_eletrico and not any(c["cartao"] == cartao_eletrico for c in cartoes):
+        cartoes.append({"fornecedor": "Prio Electric (legacy)", "cartao": cartao_eletrico})
+    return cartoes
+
+
+async def calcular(db, motorista: Dict, semana: int, ano: int, veiculo: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    Subtotais por fonte de um motorista numa semana, a partir das colecções
+    de importação. `veiculo` evita reler o veículo atribuído.
+    """
+    motorista_id = motorista["id"]
+    motorista_email = motorista.get("email", "")
+    uuid_uber = motorista.get("uuid_motorista_uber", "")
+    id_bolt = motorista.get("identificador_motorista_bolt", "")
+    veiculo_id = motorista.get("veiculo_atribuido")
+    nome = motorista.get("name")
+
+    week_start, week_end = intervalo_semana(semana, ano)
+    data_inicio = week_start.strftime("%Y-%m-%d")
+    data_fim = week_end.strftime("%Y-%m-%d")
+
+    if veiculo is None and veiculo_id:
+        veiculo = await db.vehicles.find_one({"id": veiculo_id}, {"_id": 0})
+
+    cartao_combustivel = None
+    cartao_eletrico = None
+    cartoes_eletricos = []
+    matricula = None
+    aluguer_semanal = motorista.get("valor_aluguer_semanal") or 0
+    if veiculo:
+        matricula = veiculo.get("matricula")
+        cartao_combustivel = veiculo.get("cartao_frota_id")
+        cartao_eletrico = veiculo.get("cartao_frota_eletric_id")
+        cartoes_eletricos = _cartoes_eletricos(veiculo)
+        if aluguer_semanal == 0:
+            # Calcular aluguer com base na época alta/baixa
+            aluguer_semanal = calcular_aluguer_semanal(veiculo, semana, ano)
+    matricula_norm = _matricula_normalizada(matricula)
+
+    # ============ GANHOS UBER ============
+    # Buscar por UUID, email ou nome (útil para importações CSV)
+    ganhos_uber = 0.0
+    uber_portagens = 0.0  # uPort - Portagens que a Uber paga
+    uber_gratificacoes = 0.0  # uGrat - Gratificações/gorjetas que a Uber paga ao motorista
+    uber_query_conditions = [{"motorista_id": motorista_id}]
+    if uuid_uber:
+        uber_query_conditions.append({"uuid_motorista": uuid_uber})
+        uber_query_conditions.append({"uuid_motorista_uber": uuid_uber})
+    if motorista_email:
+        uber_query_conditions.append({"motorista_email": motorista_email})
+    if nome:
+        for part in nome.upper().split():
+            if len(part) > 2:  # Ignorar partes muito curtas
+                uber_query_conditions.append({"nome_motorista": {"$regex": part, "$options": "i"}})
+
+    uber_records = await db.ganhos_uber.find({
+        "$and": [
+            {"$or": uber_query_conditions},
+            {"$or": [
+                {"$and": [{"semana": semana}, {"ano": ano}]},
+                {"data": {"$gte": data_inicio, "$lte": data_fim}},
+                {"periodo_inicio": {"$gte": data_inicio, "$lte": data_fim}}
+            ]}
+        ]
+    }, {"_id": 0}).to_list(100)
+    for r in uber_records:
+        port = float(r.get("portagens") or r.get("uber_portagens") or 0)
+        grat = float(r.get("gratificacao") or r.get("gratificacoes") or r.get("uber_gratificacoes") or r.get("gorjetas") or r.get("bonus") or 0)
+        uber_portagens += port
+        uber_gratificacoes += grat
+        # Ganhos Uber = rendimentos líquidos SEM portagens e SEM gratificações
+        if r.get("rendimentos_sem_extras"):
+            ganhos_uber += float(r.get("rendimentos_sem_extras"))
+        else:
+            valor_base = float(r.get("rendimentos") or r.get("pago_total") or r.get("rendimentos_total") or r.get("total_pago") or r.get("ganhos") or 0)
+            ganhos_uber += valor_base - port - grat
+
+    # ============ GANHOS BOLT ============
+    ganhos_bolt = 0.0
+    bolt_query_conditions = [{"motorista_id": motorista_id}]
+    if id_bolt:
+        bolt_query_conditions.append({"identificador_motorista_bolt": id_bolt})
+    if motorista_email:
+        bolt_query_conditions.append({"email_motorista": motorista_email})
+
+    # Suporta múltiplos formatos: semana/ano, periodo_semana/periodo_ano, periodo_inicio
+    bolt_records = await db.ganhos_bolt.find({
+        "$and": [
+            {"$or": bolt_query_conditions},
+            {"$or": [
+                {"semana": semana, "ano": ano},
+                {"periodo_semana": semana, "periodo_ano": ano},
+                {"periodo_inicio": {"$regex": f"^{data_inicio[:7]}"}},
+                {"periodo_inicio": data_inicio}
+            ]}
+        ]
+    }, {"_id": 0}).to_list(100)
+    for r in bolt_records:
+        # Ganhos = ganhos_brutos - comissões (inclui gorjetas, bónus, campanhas, portagens)
+        ganhos_brutos = float(r.get("ganhos_brutos_total") or r.get("total_earnings") or 0)
+        comissao = float(r.get("comissoes") or r.get("comissao_bolt") or r.get("commission") or 0)
+        if ganhos_brutos > 0 and comissao > 0:
+            ganhos_bolt += ganhos_brutos - comissao
+        else:
+            ganhos_bolt += float(r.get("ganhos_liquidos") or r.get("ganhos") or r.get("earnings") or 0)
+
+    # Colecção alternativa viagens_bolt
+    viagens_bolt_or = [{"motorista_id": motorista_id}]
+    if id_bolt:
+        viagens_bolt_or.append({"identificador_motorista_bolt": id_bolt})
+    viagens_bolt_records = await db.viagens_bolt.find({
+        "$and": [{"$or": viagens_bolt_or}, {"semana": semana, "ano": ano}]
+    }, {"_id": 0}).to_list(100)
+    for r in viagens_bolt_records:
+        ganhos_brutos = float(r.get("ganhos_brutos_total") or r.get("total_earnings") or 0)
+        comissao = float(r.get("comissoes") or r.get("comissao_bolt") or r.get("commission") or 0)
+        if ganhos_brutos > 0 and comissao > 0:
+            ganhos_bolt += ganhos_brutos - comissao
+        else:
+            ganhos_bolt += float(r.get("ganhos_liquidos") or r.get("total_ganhos") or r.get("valor_liquido") or 0)
+
+    # ============ VIA VERDE ============
+    # Pela matrícula do veículo atribuído; sem veículo, pelo motorista_id.
+    # A deduplicação entre motoristas com a mesma matrícula é feita por quem lê.
+    via_verde_total = 0.0
+    periodo_vv = [
+        {"semana": semana, "ano": ano},
+        {"entry_date": {"$gte": data_inicio, "$lte": data_fim + "T23:59:59"}},
+        {"data": {"$gte": data_inicio, "$lte": data_fim}}
+    ]
+    if matricula:
+        matricula_veiculo = matricula.upper().strip()
+        vv_query = {
+            "$or": [{"matricula": matricula_veiculo}, {"matricula": matricula_norm}],
+            "$and": [{"$or": periodo_vv}]
+        }
+    else:
+        vv_query = {"motorista_id": motorista_id, "$or": periodo_vv}
+    vv_records = await db.portagens_viaverde.find(vv_query, {"_id": 0}).to_list(1000)
+    for r in vv_records:
+        # Portagens/parques, mensalidades e registos antigos sem market_description
+        market_desc = str(r.get("market_description", "")).strip().lower()
+        if not market_desc or market_desc in ["portagens", "parques"] or "mensalidade" in market_desc or "mobilidade" in market_desc:
+            via_verde_total += float(r.get("valor") or r.get("value") or 0)
+
+    # ============ COMBUSTÍVEL FÓSSIL ============
+    combustivel_total = 0.0
+    comb_query_conditions = [{"motorista_id": motorista_id}]
+    if cartao_combustivel:
+        comb_query_conditions.append({"cartao_via_verde": cartao_combustivel})
+    if veiculo_id:
+        comb_query_conditions.append({"vehicle_id": veiculo_id})
+    if matricula:
+        comb_query_conditions.append({"matricula": matricula})
+        if matricula_norm:
+            comb_query_conditions.append({"matricula_normalizada": matricula_norm})
+
+    comb_records = await db.abastecimentos_combustivel.find({
+        "$and": [
+            {"$or": comb_query_conditions},
+            {"$or": [
+                {"data": {"$gte": data_inicio, "$lte": data_fim}},
+                {"semana": semana, "ano": ano}
+            ]}
+        ]
+    }, {"_id": 0}).to_list(100)
+    for r in comb_records:
+        # Com IVA
+        valor_sem_iva = float(r.get("valor_liquido") or r.get("valor") or r.get("total") or 0)
+        combustivel_total += valor_sem_iva + float(r.get("iva") or 0)
+
+    # despesas_combustivel (dados Prio via RPA) - apenas fóssil
+    despesas_comb_query_conditions = [{"motorista_id": motorista_id}]
+    if veiculo_id:
+        despesas_comb_query_conditions.append({"veiculo_id": veiculo_id})
+        despesas_comb_query_conditions.append({"vehicle_id": veiculo_id})
+    if cartao_combustivel:
+        despesas_comb_query_conditions.append({"cartao": cartao_combustivel})
+        despesas_comb_query_conditions.append({"cartao_frota_id": cartao_combustivel})
+    if matricula:
+        despesas_comb_query_conditions.append({"matricula": matricula})
+        if matricula_norm:
+            despesas_comb_query_conditions.append({"matricula_normalizada": matricula_norm})
+
+    despesas_comb_records = await db.despesas_combustivel.find({
+        "$and": [
+            {"$or": despesas_comb_query_conditions},
+            {"$or": [
+                {"semana": semana, "ano": ano},
+                {"data": {"$gte": data_inicio, "$lte": data_fim}}
+            ]},
+            {"$or": [
+                {"litros": {"$gt": 0}},
+                {"kwh": {"$in": [0, None]}}
+            ]}
+        ]
+    }, {"_id": 0}).to_list(100)
+    for r in despesas_comb_records:
+        combustivel_total += float(r.get("valor_total") or r.get("valor") or 0)
+
+    # ============ CARREGAMENTO ELÉTRICO ============
+    eletrico_total = 0.0
+    eletrico_discriminacao = []  # Discriminação por fornecedor
+    elet_query_conditions = [{"motorista_id": motorista_id}]
+    cartoes_busca = [c["cartao"] for c in cartoes_eletricos] or ([cartao_eletrico] if cartao_eletrico else [])
+    for cartao_id in cartoes_busca:
+        elet_query_conditions.append({"cartao_frota_id": cartao_id})
+        elet_query_conditions.append({"card_code": cartao_id})
+        elet_query_conditions.append({"cartao": cartao_id})
+    if veiculo_id:
+        elet_query_conditions.append({"vehicle_id": veiculo_id})
+        elet_query_conditions.append({"veiculo_id": veiculo_id})
+    if matricula:
+        elet_query_conditions.append({"matricula": matricula})
+        if matricula_norm:
+            elet_query_conditions.append({"matricula_normalizada": matricula_norm})
+
+    periodo_elet = {"$or": [
+        {"semana": semana, "ano": ano},
+        {"data": {"$gte": data_inicio, "$lte": data_fim}}
+    ]}
+    elet_query = {"$or": elet_query_conditions, "$and": [periodo_elet]}
+
+    elet_records = await db.combustivel_eletrico.find(elet_query, {"_id": 0}).to_list(100)
+    for r in elet_records:
+        valor = float(r.get("valor") or r.get("valor_total") or r.get("TotalValueWithTaxes") or 0)
+        eletrico_total += valor
+        eletrico_discriminacao.append({"fornecedor": r.get("fornecedor") or r.get("provider") or "Desconhecido", "valor": valor, "data": r.get("data")})
+
+    # despesas_combustivel APENAS com kWh > 0 (elétrico)
+    elet_despesas_records = await db.despesas_combustivel.find({
+        "$and": [{"$or": elet_query_conditions}, periodo_elet, {"kwh": {"$gt": 0}}]
+    }, {"_id": 0}).to_list(100)
+    for r in elet_despesas_records:
+        valor = float(r.get("valor_total") or r.get("valor") or 0)
+        eletrico_total += valor
+        eletrico_discriminacao.append({"fornecedor": r.get("fornecedor") or r.get("provider") or "Desconhecido", "valor": valor, "data": r.get("data")})
+
+    rpa_elet_records = await db.rpa_carregamento_eletrico.find(elet_query, {"_id": 0}).to_list(100)
+    for r in rpa_elet_records:
+        valor = float(r.get("valor_total") or r.get("valor") or 0)
+        eletrico_total += valor
+        eletrico_discriminacao.append({"fornecedor": r.get("fornecedor") or r.get("provider") or "Prio Electric", "valor": valor, "data": r.get("data")})
+
+    # ============ EXTRAS DO MOTORISTA ============
+    # Dívidas, caução parcelada, danos... (créditos subtraem)
+    extras_total = 0.0
+    extras_records = await db.despesas_extras.find({
+        "motorista_id": motorista_id,
+        "$or": [
+            {"semana": semana, "ano": ano},
+            {"semana": None},  # Extras sem semana específica
+        ]
+    }, {"_id": 0}).to_list(100)
+    for r in extras_records:
+        if r.get("status", "pendente") != "cancelado":
+            valor_extra = float(r.get("valor") or 0)
+            extras_total += -valor_extra if r.get("tipo") == "credito" else valor_extra
+
+    logger.debug(
+        f"Ledger {nome} S{semana}/{ano}: uber €{ganhos_uber:.2f} ({len(uber_records)}), "
+        f"bolt €{ganhos_bolt:.2f} ({len(bolt_records)}+{len(viagens_bolt_records)}), "
+        f"via verde €{via_verde_total:.2f} ({len(vv_records)}), combustível €{combustivel_total:.2f}, "
+        f"elétrico €{eletrico_total:.2f}, extras €{extras_total:.2f}"
+    )
+
+    return {
+        "motorista_id": motorista_id,
+        "ano": ano,
+        "semana": semana,
+        "data_inicio": data_inicio,
+        "data_fim": data_fim,
+        "parceiro_id": motorista.get("parceiro_atribuido") or motorista.get("parceiro_id"),
+        "veiculo": {
+            "id": veiculo_id,
+            "matricula": matricula,
+            "matricula_normalizada": matricula_norm or None,
+            "tipo_contrato": veiculo.get("tipo_contrato_veiculo", "aluguer") if veiculo else None,
+            "via_verde_id": veiculo.get("via_verde_id") if veiculo else None,
+            "cartao_combustivel": cartao_combustivel,
+            "cartao_eletrico": cartao_eletrico,
+            "cartoes_eletricos": cartoes_eletricos,
+            "km_atribuidos": veiculo.get("km_atribuidos") if veiculo else None,
+            "valor_km_extra": veiculo.get("valor_km_extra") if veiculo else None,
+        },
+        "fontes": {
+            "uber": {
+                "ganhos": round(ganhos_uber, 2),
+                "portagens": round(uber_portagens, 2),
+                "gratificacoes": round(uber_gratificacoes, 2),
+                "registos": len(uber_records),
+            },
+            "bolt": {
+                "ganhos": round(ganhos_bolt, 2),
+                "campanha": 0.0,  # Campanhas/bónus não vêm da API (só por ajuste manual)
+                "registos": len(bolt_records) + len(viagens_bolt_records),
+            },
+            "via_verde": {"total": round(via_verde_total, 2), "registos": len(vv_records)},
+            "combustivel": {"total": round(combustivel_total, 2), "registos": len(comb_records) + len(despesas_comb_records)},
+            "eletrico": {
+                "total": round(eletrico_total, 2),
+                "registos": len(elet_records) + len(elet_despesas_records) + len(rpa_elet_records),
+                "discriminacao": eletrico_discriminacao,
+            },
+            "aluguer": {"valor": round(float(aluguer_semanal or 0), 2)},
+            "extras": {"total": round(extras_total, 2), "registos": len(extras_records)},
+        },
+        "impressao": _impressao(motorista, veiculo),
+        "sujo": False,
+        "calculado_em": datetime.now(timezone.utc),
+    }
+
+
+def _utc(valor: Optional[datetime]) -> Optional[datetime]:
+    if valor is not None and valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+def _valido(ledger: Optional[Dict], impressao: str, agora: datetime) -> bool:
+    if not ledger or ledger.get("sujo") or ledger.get("impressao") != impressao:
+        return False
+    calculado_em = _utc(ledger.get("calculado_em"))
+    return calculado_em is not None and (agora - calculado_em).total_seconds() < LEDGER_SEMANAL_MAX_IDADE
+
+
+async def obter(db, motoristas: List[Dict], semana: int, ano: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Ledgers da semana para os motoristas dados (documentos completos do
+    motorista ou com os CAMPOS_MOTORISTA), recalculando só os desactualizados.
+    Devolve {motorista_id: ledger}.
+    """
+    if not motoristas:
+        return {}
+    ids = [m["id"] for m in motoristas]
+
+    existentes = {
+        ledger["motorista_id"]: ledger
+        async for ledger in db[COLECAO].find(
+            {"motorista_id": {"$in": ids}, "ano": ano, "semana": semana}, {"_id": 0}
+        )
+    }
+    veiculo_ids = list({m["veiculo_atribuido"] for m in motoristas if m.get("veiculo_atribuido")})
+    veiculos = {}
+    if veiculo_ids:
+        veiculos = {
+            v["id"]: v
+            async for v in db.vehicles.find({"id": {"$in": veiculo_ids}}, {"_id": 0})
+        }
+
+    agora = datetime.now(timezone.utc)
+    ledgers = {}
+    escritas = []
+    for motorista in motoristas:
+        veiculo = veiculos.get(motorista.get("veiculo_atribuido"))
+        ledger = existentes.get(motorista["id"])
+        if not _valido(ledger, _impressao(motorista, veiculo), agora):
+            ledger = await calcular(db, motorista, semana, ano, veiculo=veiculo)
+            escritas.append(UpdateOne(
+                {"motorista_id": motorista["id"], "ano": ano, "semana": semana},
+                {"$set": ledger},
+                upsert=True,
+            ))
+        ledgers[motorista["id"]] = ledger
+
+    if escritas:
+        await db[COLECAO].bulk_write(escritas, ordered=False)
+        for ledger in ledgers.values():
+            ledger.pop("_id", None)
+        logger.info(f"📒 Ledger S{semana}/{ano}: {len(escritas)} de {len(motoristas)} motoristas recalculados")
+    return ledgers
+
+
+async def obter_motorista(db, motorista: Dict, semana: int, ano: int) -> Dict[str, Any]:
+    """Ledger de um motorista numa semana"""
+    return (await obter(db, [motorista], semana, ano))[motorista["id"]]
+
+
+def aplicar_ajuste(ledger: Dict[str, Any], ajuste: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Valores da semana (subtotais do ledger) com os ajustes manuais de
+    `ajustes_semanais` por cima, nos nomes usados pelos relatórios.
+    """
+    fontes = ledger["fontes"]
+    valores = {
+        "ganhos_uber": fontes["uber"]["ganhos"],
+        "uber_portagens": fontes["uber"]["portagens"],
+        "uber_gratificacoes": fontes["uber"]["gratificacoes"],
+        "ganhos_bolt": fontes["bolt"]["ganhos"],
+        "ganhos_campanha_bolt": fontes["bolt"]["campanha"],
+        "via_verde": fontes["via_verde"]["total"],
+        "combustivel": fontes["combustivel"]["total"],
+        "eletrico": fontes["eletrico"]["total"],
+        "aluguer": fontes["aluguer"]["valor"],
+        "extras": fontes["extras"]["total"],
+    }
+    if ajuste:
+        for campo in valores:
+            if campo in ajuste:
+                valores[campo] = ajuste[campo]
+    return valores
+
+
+# ==================== INVALIDAÇÃO ====================
+
+def _semana_de_data(valor: Any) -> Optional[Tuple[int, int]]:
+    if isinstance(valor, datetime):
+        dia = valor.date()
+    elif isinstance(valor, date):
+        dia = valor
+    elif isinstance(valor, str) and len(valor) >= 10:
+        try:
+            dia = date.fromisoformat(valor[:10])
+        except ValueError:
+            return None
+    else:
+        return None
+    iso = dia.isocalendar()
+    return (iso[0], iso[1])
+
+
+def semanas_de(registos: Iterable[Dict[str, Any]]) -> Set[Tuple[int, int]]:
+    """(ano, semana) tocados por registos de importação (semana/ano ou datas)"""
+    semanas = set()
+    for r in registos:
+        for campo_semana, campo_ano in (("semana", "ano"), ("periodo_semana", "periodo_ano")):
+            try:
+                if r.get(campo_semana) and r.get(campo_ano):
+                    semanas.add((int(r[campo_ano]), int(r[campo_semana])))
+            except (TypeError, ValueError):
+                pass
+        for campo in ("data", "periodo_inicio", "periodo_fim", "entry_date"):
+            semana = _semana_de_data(r.get(campo))
+            if semana:
+                semanas.add(semana)
+    return semanas
+
+
+async def invalidar(
+    db,
+    semanas: Optional[Iterable[Tuple[int, int]]],
+    motorista_ids: Optional[Iterable[str]] = None,
+    parceiro_id: Optional[str] = None,
+) -> int:
+    """
+    Marcar como alterados os ledgers das semanas (ano, semana) dadas, de
+    todos os motoristas ou só dos indicados / do parceiro. `semanas=None`
+    invalida todas as semanas desses motoristas.
+    """
+    filtro: Dict[str, Any] = {}
+    if semanas is not None:
+        semanas = list(set(semanas))
+        if not semanas:
+            return 0
+        filtro["$or"] = [{"ano": ano, "semana": semana} for ano, semana in semanas]
+    if motorista_ids is not None:
+        filtro["motorista_id"] = {"$in": list(set(motorista_ids))}
+    if parceiro_id:
+        filtro["parceiro_id"] = parceiro_id
+    if not filtro:
+        return 0
+    try:
+        resultado = await db[COLECAO].update_many(filtro, {"$set": {"sujo": True}})
+        return resultado.modified_count
+    except Exception as e:
+        # Sem invalidação o ledger é recalculado ao fim de LEDGER_SEMANAL_MAX_IDADE
+        logger.error(f"Erro ao invalidar ledger semanal: {e}")
+        return 0
+
+
+async def invalidar_registos(db, registos: Iterable[Dict[str, Any]], parceiro_id: Optional[str] = None) -> int:
+    """
+    Invalidar os ledgers tocados por registos importados ou editados. Se
+    todos os registos tiverem motorista_id, só esses motoristas; caso
+    contrário (registos associados por matrícula, cartão ou nome) todos os
+    motoristas dessas semanas. Registos sem semana nem data (ex. extras
+    sem semana) invalidam todas as semanas dos seus motoristas.
+    """
+    registos = [r for r in registos if r]
+    if not registos:
+        return 0
+    motorista_ids = [r.get("motorista_id") for r in registos]
+    if not all(motorista_ids):
+        motorista_ids = None
+
+    total = 0
+    com_semana = [r for r in registos if semanas_de([r])]
+    if com_semana:
+        total += await invalidar(db, semanas_de(com_semana), motorista_ids, parceiro_id)
+    sem_semana = [r.get("motorista_id") for r in registos if not semanas_de([r]) and r.get("motorista_id")]
+    if sem_semana:
+        total += await invalidar(db, None, sem_semana)
+    return total
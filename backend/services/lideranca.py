@@ -0,0 +1,272 @@
+"""
+Leases no MongoDB (colecção `agendador_leases`) para tarefas periódicas.
+
+Com vários workers uvicorn ou várias instâncias da API, cada processo
+arrancava os mesmos loops (alertas, notificações, agendamentos RPA,
+sincronizações APScheduler) e cada tarefa corria N vezes. Aqui cada tarefa
+tem um lease com dono e expiração:
+
+- `adquirir` / `libertar`: primitiva de lock com `find_one_and_update`
+  atómico; um lease expirado pode ser tomado por outro nó;
+- `registar` + `iniciar`: runtime em que só o dono do lease de cada tarefa
+  a executa. O dono renova o lease (heartbeat) enquanto está vivo; se o
+  processo morrer, outro nó assume ao fim de `AGENDADOR_LEASE_SEGUNDOS`.
+  A próxima execução fica guardada no lease, por isso o novo dono continua
+  o calendário em vez de repetir a tarefa;
+- `executar_exclusivo`: para execuções disparadas em todos os nós ao mesmo
+  tempo (jobs cron do APScheduler) — só o primeiro a reclamar corre.
+
+`estado()` devolve os leases e os nós donos para o endpoint de admin.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+COLECAO = "agendador_leases"
+
+AGENDADOR_ATIVO = os.environ.get("AGENDADOR_ATIVO", "true").lower() == "true"
+AGENDADOR_LEASE_SEGUNDOS = int(os.environ.get("AGENDADOR_LEASE_SEGUNDOS", "60"))
+AGENDADOR_HEARTBEAT_SEGUNDOS = int(os.environ.get("AGENDADOR_HEARTBEAT_SEGUNDOS", "15"))
+
+# Identificador deste processo enquanto dono de leases
+NO_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _utc(valor: Optional[datetime]) -> Optional[datetime]:
+    if valor is not None and valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+async def adquirir(
+    db,
+    nome: str,
+    duracao_segundos: int = AGENDADOR_LEASE_SEGUNDOS,
+    dono: str = NO_ID,
+    renovar: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Adquirir ou renovar o lease `nome` por `duracao_segundos`. Devolve o
+    documento do lease se este nó ficou dono, ou None se outro nó o tem.
+    Com `renovar=False` só adquire um lease livre, mesmo sendo já o dono.
+    """
+    agora = _agora()
+    livre = {"expira_em": {"$lte": agora}}
+    try:
+        anterior = await db[COLECAO].find_one_and_update(
+            {"nome": nome, "$or": [{"dono": dono}, livre] if renovar else [livre]},
+            {
+                "$set": {"dono": dono, "expira_em": agora + timedelta(seconds=duracao_segundos), "heartbeat": agora},
+                "$setOnInsert": {"nome": nome, "trocas": 0},
+            },
+            upsert=True,
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        # Outro nó criou ou detém o lease entre a leitura e a escrita
+        return None
+
+    if anterior is None or anterior.get("dono") != dono:
+        # Mudança de dono (primeira aquisição ou failover)
+        if anterior and anterior.get("dono"):
+            logger.warning(f"🔀 Lease {nome} assumido por {dono} (anterior: {anterior['dono']})")
+        await db[COLECAO].update_one(
+            {"nome": nome, "dono": dono},
+            {"$set": {"adquirido_em": agora}, "$inc": {"trocas": 1}},
+        )
+    return await db[COLECAO].find_one({"nome": nome}, {"_id": 0})
+
+
+async def libertar(db, nome: str, dono: str = NO_ID, expira_em: Optional[datetime] = None) -> bool:
+    """
+    Largar o lease (se este nó for o dono). Com `expira_em` o lease fica
+    reservado até essa data em vez de ficar logo livre.
+    """
+    resultado = await db[COLECAO].update_one(
+        {"nome": nome, "dono": dono},
+        {"$set": {"expira_em": expira_em or _agora()}},
+    )
+    return resultado.modified_count > 0
+
+
+async def _manter_lease(db, nome: str, perdido: asyncio.Event):
+    """Renovar o lease enquanto a tarefa corre"""
+    while True:
+        await asyncio.sleep(AGENDADOR_HEARTBEAT_SEGUNDOS)
+        try:
+            if not await adquirir(db, nome):
+                logger.error(f"⚠️ Lease {nome} perdido durante a execução")
+                perdido.set()
+                return
+        except Exception as e:
+            logger.error(f"Erro ao renovar lease {nome}: {e}")
+
+
+async def _correr_com_heartbeat(db, nome: str, func: Callable[..., Awaitable[Any]], *args) -> Dict[str, Any]:
+    """Executar `func` a renovar o lease; devolve o registo da execução"""
+    perdido = asyncio.Event()
+    heartbeat = asyncio.create_task(_manter_lease(db, nome, perdido))
+    inicio = _agora()
+    erro = None
+    try:
+        await func(*args)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        erro = str(e)
+        logger.error(f"❌ Tarefa periódica {nome} falhou: {e}")
+    finally:
+        heartbeat.cancel()
+    fim = _agora()
+    return {
+        "inicio": inicio,
+        "fim": fim,
+        "duracao_segundos": round((fim - inicio).total_seconds(), 3),
+        "erro": erro,
+        "no": NO_ID,
+        "lease_perdido": perdido.is_set(),
+    }
+
+
+async def executar_exclusivo(
+    db,
+    nome: str,
+    func: Callable[..., Awaitable[Any]],
+    *args,
+    reserva_segundos: int = 600,
+) -> bool:
+    """
+    Executar `func(*args)` só se este nó conseguir o lease `nome`. Depois
+    de terminar, o lease fica reservado até `inicio + reserva_segundos`,
+    para que nós que disparam o mesmo job com atraso não o repitam.
+    Devolve False se outro nó já o executou ou está a executar.
+    """
+    if not await adquirir(db, nome, renovar=False):
+        logger.info(f"⏭️ {nome} já tratado por outro nó")
+        return False
+    execucao = await _correr_com_heartbeat(db, nome, func, *args)
+    reservado_ate = max(execucao["inicio"] + timedelta(seconds=reserva_segundos), _agora())
+    await db[COLECAO].update_one(
+        {"nome": nome, "dono": NO_ID},
+        {"$set": {"ultima_execucao": execucao, "expira_em": reservado_ate}},
+    )
+    return True
+
+
+class TarefaPeriodica:
+    """Tarefa registada no runtime: `func()` a cada `intervalo_segundos`"""
+
+    def __init__(self, nome: str, func: Callable[[], Awaitable[Any]], intervalo_segundos: float, atraso_inicial: float = 0):
+        self.nome = nome
+        self.func = func
+        self.intervalo_segundos = intervalo_segundos
+        self.atraso_inicial = atraso_inicial
+        self.task: Optional[asyncio.Task] = None
+        self.lider = False
+
+
+_tarefas: Dict[str, TarefaPeriodica] = {}
+
+
+def registar(nome: str, func: Callable[[], Awaitable[Any]], intervalo_segundos: float, atraso_inicial: float = 0):
+    """
+    Registar uma tarefa periódica. `atraso_inicial` só conta quando o lease
+    ainda não existe (primeira execução de sempre).
+    """
+    _tarefas[nome] = TarefaPeriodica(nome, func, intervalo_segundos, atraso_inicial)
+
+
+async def _ciclo(db, tarefa: TarefaPeriodica):
+    nome = f"periodica:{tarefa.nome}"
+    while True:
+        espera = AGENDADOR_HEARTBEAT_SEGUNDOS
+        try:
+            lease = await adquirir(db, nome)
+            tarefa.lider = lease is not None
+            if lease:
+                agora = _agora()
+                proxima = _utc(lease.get("proxima_execucao"))
+                if proxima is None:
+                    proxima = agora + timedelta(seconds=tarefa.atraso_inicial)
+                    await db[COLECAO].update_one({"nome": nome, "dono": NO_ID}, {"$set": {"proxima_execucao": proxima}})
+
+                if agora >= proxima:
+                    execucao = await _correr_com_heartbeat(db, nome, tarefa.func)
+                    proxima = execucao["inicio"] + timedelta(seconds=tarefa.intervalo_segundos)
+                    await db[COLECAO].update_one(
+                        {"nome": nome, "dono": NO_ID},
+                        {"$set": {
+                            "proxima_execucao": proxima,
+                            "ultima_execucao": execucao,
+                            "expira_em": _agora() + timedelta(seconds=AGENDADOR_LEASE_SEGUNDOS),
+                        }},
+                    )
+
+                espera = min(AGENDADOR_HEARTBEAT_SEGUNDOS, max((proxima - _agora()).total_seconds(), 0))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro no agendador ({tarefa.nome}): {e}")
+        await asyncio.sleep(espera)
+
+
+def iniciar(db) -> List[asyncio.Task]:
+    """Arrancar o ciclo de cada tarefa registada (AGENDADOR_ATIVO=false desativa neste nó)"""
+    if not AGENDADOR_ATIVO:
+        logger.info("⏸️ Agendador desativado neste nó (AGENDADOR_ATIVO=false)")
+        return []
+    for tarefa in _tarefas.values():
+        if tarefa.task is None or tarefa.task.done():
+            tarefa.task = asyncio.create_task(_ciclo(db, tarefa))
+    logger.info(f"⏱️ Agendador {NO_ID} com {len(_tarefas)} tarefas: {', '.join(_tarefas)}")
+    return [t.task for t in _tarefas.values()]
+
+
+async def parar(db):
+    """Parar os ciclos e largar os leases para outro nó assumir já (shutdown)"""
+    for tarefa in _tarefas.values():
+        if tarefa.task is not None:
+            tarefa.task.cancel()
+            tarefa.task = None
+        tarefa.lider = False
+    try:
+        await db[COLECAO].update_many({"dono": NO_ID}, {"$set": {"expira_em": _agora()}})
+    except Exception as e:
+        logger.error(f"Erro ao libertar leases: {e}")
+
+
+async def estado(db) -> Dict[str, Any]:
+    """Leases, donos e execuções de todas as tarefas (todos os nós)"""
+    agora = _agora()
+    leases = await db[COLECAO].find({}, {"_id": 0}).sort("nome", 1).to_list(500)
+    for lease in leases:
+        expira_em = _utc(lease.get("expira_em"))
+        lease["ativo"] = bool(lease.get("dono")) and expira_em is not None and expira_em > agora
+    nos = sorted({lease["dono"] for lease in leases if lease["ativo"]})
+    return {
+        "no_atual": NO_ID,
+        "agendador_ativo": AGENDADOR_ATIVO,
+        "lease_segundos": AGENDADOR_LEASE_SEGUNDOS,
+        "heartbeat_segundos": AGENDADOR_HEARTBEAT_SEGUNDOS,
+        "tarefas_locais": {
+            nome: {"intervalo_segundos": t.intervalo_segundos, "lider": t.lider}
+            for nome, t in _tarefas.items()
+        },
+        "nos_ativos": nos,
+        "leases": leases,
+    }
@@ -4,11 +4,12 @@ Handles automatic invoice generation when earnings reports are created
 """
 
 import logging
-import httpx
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from services import clientes_http
+
 logger = logging.getLogger(__name__)
 
 class MoloniService:
@@ -17,7 +18,7 @@ class MoloniService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.moloni_api_url = "https://api.moloni.pt/v1"
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+        self.http_client = clientes_http.sessao("moloni")
     
     async def get_driver_moloni_config(self, motorista_id: str) -> Optional[Dict[str, Any]]:
         """Get Moloni configuration for a driver"""
@@ -413,5 +414,5 @@ class MoloniService:
             return None
     
     async def close(self):
-        """Close HTTP client"""
-        await self.http_client.aclose()
+        """Kept for callers; the shared HTTP client is closed on application shutdown"""
+        pass
@@ -0,0 +1,137 @@
+"""
+Contadores de não lidas (conversas e notificações) e respetivos eventos.
+
+Cada conversa guarda `nao_lidas: {user_id: n}`: `registar_mensagem` soma 1
+aos outros participantes a cada mensagem e `zerar` repõe 0 quando o
+utilizador abre a conversa. As listagens leem o campo em vez de contar as
+mensagens de cada conversa. Conversas anteriores ao campo são preenchidas
+uma vez por `preencher`, com uma única agregação.
+
+Depois de cada alteração os contadores novos seguem para o canal em tempo
+real (services/tempo_real.py).
+"""
+
+from typing import Any, Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+from services import tempo_real
+
+CAMPO = "nao_lidas"
+
+# Tipos de evento
+MENSAGEM_NOVA = "mensagem.nova"
+MENSAGENS_LIDAS = "mensagens.lidas"
+CONVERSAS_CONTADORES = "conversas.contadores"
+NOTIFICACAO_NOVA = "notificacao.nova"
+NOTIFICACOES_CONTADORES = "notificacoes.contadores"
+
+
+async def preencher(db, conversas: List[Dict[str, Any]]):
+    """Calcular e guardar `nao_lidas` das conversas que ainda não o têm"""
+    em_falta = [c for c in conversas if not isinstance(c.get(CAMPO), dict)]
+    if not em_falta:
+        return
+
+    por_remetente: Dict[str, Dict[str, int]] = {c["id"]: {} for c in em_falta}
+    pipeline = [
+        {"$match": {"conversa_id": {"$in": list(por_remetente)}, "lida": False}},
+        {"$group": {"_id": {"conversa_id": "$conversa_id", "remetente_id": "$remetente_id"}, "n": {"$sum": 1}}},
+    ]
+    async for linha in db.mensagens.aggregate(pipeline):
+        por_remetente[linha["_id"]["conversa_id"]][linha["_id"].get("remetente_id")] = linha["n"]
+
+    operacoes = []
+    for conversa in em_falta:
+        contagens = por_remetente[conversa["id"]]
+        conversa[CAMPO] = {
+            p: sum(n for remetente, n in contagens.items() if remetente != p)
+            for p in conversa.get("participantes", [])
+        }
+        operacoes.append(UpdateOne(
+            {"id": conversa["id"], CAMPO: {"$exists": False}},
+            {"$set": {CAMPO: conversa[CAMPO]}},
+        ))
+    await db.conversas.bulk_write(operacoes, ordered=False)
+
+
+async def registar_mensagem(db, conversa: Dict[str, Any], mensagem: Dict[str, Any]) -> List[str]:
+    """
+    Inserir `mensagem` e somar 1 às não lidas dos outros participantes;
+    devolve-os. O `preencher` corre antes da inserção: depois dela, a
+    mensagem nova já entrava na contagem e o `$inc` somava-a outra vez.
+    """
+    await preencher(db, [conversa])
+    await db.mensagens.insert_one(mensagem)
+    return await incrementar(db, conversa, mensagem["remetente_id"])
+
+
+async def incrementar(db, conversa: Dict[str, Any], remetente_id: str) -> List[str]:
+    """Somar 1 às não lidas dos outros participantes; devolve-os"""
+    await preencher(db, [conversa])
+    destinatarios = [p for p in conversa.get("participantes", []) if p != remetente_id]
+    if destinatarios:
+        await db.conversas.update_one(
+            {"id": conversa["id"]},
+            {"$inc": {f"{CAMPO}.{p}": 1 for p in destinatarios}},
+        )
+    return destinatarios
+
+
+async def zerar(db, conversa: Dict[str, Any], user_id: str) -> bool:
+    """Repor a 0 as não lidas de `user_id`; True se havia alguma"""
+    await preencher(db, [conversa])
+    if not conversa[CAMPO].get(user_id):
+        return False
+    resultado = await db.conversas.update_one(
+        {"id": conversa["id"]},
+        {"$set": {f"{CAMPO}.{user_id}": 0}},
+    )
+    return resultado.modified_count > 0
+
+
+async def resumo_conversas(db, user_id: str) -> Dict[str, Any]:
+    """Total de conversas, conversas com não lidas e não lidas por conversa"""
+    conversas = await db.conversas.find(
+        {"participantes": user_id},
+        {"_id": 0, "id": 1, "participantes": 1, CAMPO: 1},
+    ).to_list(None)
+    await preencher(db, conversas)
+    por_conversa = {c["id"]: c[CAMPO].get(user_id, 0) for c in conversas if c[CAMPO].get(user_id, 0) > 0}
+    return {
+        "total": len(conversas),
+        "com_nao_lidas": len(por_conversa),
+        "total_nao_lidas": sum(por_conversa.values()),
+        "por_conversa": por_conversa,
+    }
+
+
+async def notificacoes_nao_lidas(db, user_id: str) -> int:
+    return await db.notificacoes.count_documents({"user_id": user_id, "lida": False})
+
+
+async def publicar_conversas(db, user_ids: Iterable[str]):
+    """Enviar os contadores de conversas aos utilizadores ligados"""
+    for user_id in dict.fromkeys(user_ids):
+        if tempo_real.pode_receber(user_id):
+            await tempo_real.publicar(db, [user_id], CONVERSAS_CONTADORES, await resumo_conversas(db, user_id))
+
+
+async def publicar_notificacoes(db, user_id: str):
+    """Enviar o número de notificações não lidas ao utilizador"""
+    if tempo_real.pode_receber(user_id):
+        await tempo_real.publicar(db, [user_id], NOTIFICACOES_CONTADORES, {
+            "nao_lidas": await notificacoes_nao_lidas(db, user_id),
+        })
+
+
+async def notificacao_criada(db, notificacao: Dict[str, Any]):
+    """Enviar uma notificação nova (e o contador) ao destinatário"""
+    user_id = notificacao.get("user_id")
+    if not user_id or not tempo_real.pode_receber(user_id):
+        return
+    dados = {k: v for k, v in notificacao.items() if k != "_id"}
+    await tempo_real.publicar(db, [user_id], NOTIFICACAO_NOVA, {
+        "notificacao": dados,
+        "nao_lidas": await notificacoes_nao_lidas(db, user_id),
+    })
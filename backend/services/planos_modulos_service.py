@@ -10,6 +10,7 @@ import uuid
 import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from utils import cache_config, user_cache
 from models.planos_modulos import (
     ModuloSistema, ModuloCreate, ModuloUpdate,
     PlanoSistema, PlanoCreate, PlanoUpdate,
@@ -23,6 +24,290 @@ from models.planos_modulos import (
 logger = logging.getLogger(__name__)
 
 
+# ==================== CÁLCULOS EM MEMÓRIA ====================
+# Sem acesso à BD: usados pelos métodos de um utilizador e pelo
+# `resolver_lote`/`resolver_subscricoes`, que carregam os documentos de N
+# utilizadores de uma vez.
+
+def _calcular_preco(
+    plano: Dict,
+    periodicidade: str,
+    user_id: Optional[str] = None,
+    num_veiculos: int = 0,
+    num_motoristas: int = 0,
+    codigo_promocional: Optional[str] = None
+) -> Dict:
+    """Preço final de `plano` (base + veículos + motoristas, desconto ou promoção)"""
+    plano_id = plano.get("id")
+    tipo_usuario = plano.get("tipo_usuario", "parceiro")
+    
+    # Para motoristas, usar preços simples
+    if tipo_usuario == "motorista":
+        precos = plano.get("precos", {})
+        preco_base = precos.get(periodicidade, 0) or 0
+        return {
+            "plano_id": plano_id,
+            "plano_nome": plano.get("nome"),
+            "periodicidade": periodicidade,
+            "tipo_usuario": tipo_usuario,
+            "num_veiculos": 0,
+            "num_motoristas": 0,
+            "preco_base": round(preco_base, 2),
+            "preco_veiculos": 0,
+            "preco_motoristas": 0,
+            "preco_total": round(preco_base, 2),
+            "desconto_aplicado": None,
+            "preco_final": round(preco_base, 2)
+        }
+    
+    # Para parceiros, usar precos_plano (base + por veículo + por motorista)
+    precos_plano = plano.get("precos_plano", {})
+    
+    # Mapear periodicidade para campo
+    periodo_map = {
+        "semanal": "semanal",
+        "mensal": "mensal", 
+        "anual": "anual"
+    }
+    periodo = periodo_map.get(periodicidade, "mensal")
+    
+    preco_base = precos_plano.get(f"base_{periodo}", 0) or 0
+    preco_por_veiculo = precos_plano.get(f"por_veiculo_{periodo}", 0) or 0
+    preco_por_motorista = precos_plano.get(f"por_motorista_{periodo}", 0) or 0
+    
+    # Calcular totais
+    preco_veiculos = preco_por_veiculo * num_veiculos
+    preco_motoristas = preco_por_motorista * num_motoristas
+    preco_total = preco_base + preco_veiculos + preco_motoristas
+    
+    preco_final = preco_total
+    desconto_aplicado = None
+    promocao_aplicada = None
+    
+    # Verificar preço especial para parceiro
+    if user_id:
+        precos_especiais = plano.get("precos_especiais", [])
+        for pe in precos_especiais:
+            if pe.get("parceiro_id") == user_id:
+                if pe.get("desconto_percentagem"):
+                    desconto = pe["desconto_percentagem"] / 100
+                    preco_final = preco_total * (1 - desconto)
+                    desconto_aplicado = {
+                        "tipo": "desconto_especial", 
+                        "percentagem": pe["desconto_percentagem"],
+                        "motivo": pe.get("motivo")
+                    }
+                break
+    
+    # Verificar código promocional
+    if codigo_promocional and not desconto_aplicado:
+        promocoes = plano.get("promocoes", [])
+        for promo in promocoes:
+            if promo.get("codigo_promocional") == codigo_promocional and promo.get("ativa"):
+                # Verificar validade
+                now = datetime.now(timezone.utc)
+                data_fim = promo.get("data_fim")
+                if data_fim:
+                    if isinstance(data_fim, str):
+                        data_fim = datetime.fromisoformat(data_fim.replace('Z', '+00:00'))
+                    if now > data_fim:
+                        continue
+                
+                # Verificar limite de utilizações
+                if promo.get("max_utilizacoes"):
+                    if promo.get("utilizacoes_atuais", 0) >= promo["max_utilizacoes"]:
+                        continue
+                
+                desconto = promo.get("desconto_percentagem", 0) / 100
+                preco_final = preco_total * (1 - desconto)
+                promocao_aplicada = promo
+                desconto_aplicado = {
+                    "tipo": "promocao",
+                    "percentagem": promo.get("desconto_percentagem"),
+                    "nome": promo.get("nome")
+                }
+                break
+    
+    return {
+        "plano_id": plano_id,
+        "plano_nome": plano.get("nome"),
+        "periodicidade": periodicidade,
+        "tipo_usuario": tipo_usuario,
+        "num_veiculos": num_veiculos,
+        "num_motoristas": num_motoristas,
+        "preco_base": round(preco_base, 2),
+        "preco_por_veiculo": round(preco_por_veiculo, 2),
+        "preco_por_motorista": round(preco_por_motorista, 2),
+        "preco_veiculos": round(preco_veiculos, 2),
+        "preco_motoristas": round(preco_motoristas, 2),
+        "preco_total": round(preco_total, 2),
+        "desconto_aplicado": desconto_aplicado,
+        "promocao_aplicada": promocao_aplicada,
+        "preco_final": round(preco_final, 2)
+    }
+
+
+def _aplicar_preco_especial(
+    plano: Dict,
+    parceiro_id: str,
+    num_veiculos: int = 0,
+    num_motoristas: int = 0,
+    periodicidade: str = "mensal"
+) -> Dict:
+    """Preço de `plano` para o parceiro, com o primeiro preço especial válido"""
+    plano_id = plano.get("id")
+    preco_calculado = _calcular_preco(plano, periodicidade, parceiro_id, num_veiculos, num_motoristas)
+    
+    preco_original = preco_calculado.get("preco_final", 0)
+    preco_final = preco_original
+    preco_especial_aplicado = None
+    
+    # Verificar se há preço especial para este parceiro
+    now = datetime.now(timezone.utc)
+    precos_especiais = plano.get("precos_especiais", [])
+    
+    for pe in precos_especiais:
+        if pe.get("parceiro_id") != parceiro_id:
+            continue
+        
+        # Verificar se está ativo
+        if not pe.get("ativo", True):
+            continue
+        
+        # Verificar validade
+        validade_inicio = pe.get("validade_inicio")
+        validade_fim = pe.get("validade_fim")
+        
+        if validade_inicio:
+            data_inicio = datetime.fromisoformat(validade_inicio.replace('Z', '+00:00')) if isinstance(validade_inicio, str) else validade_inicio
+            if now < data_inicio:
+                continue
+        
+        if validade_fim:
+            data_fim = datetime.fromisoformat(validade_fim.replace('Z', '+00:00')) if isinstance(validade_fim, str) else validade_fim
+            if now > data_fim:
+                continue
+        
+        # Encontrou preço especial válido - aplicar lógica
+        tipo_desconto = pe.get("tipo_desconto", "percentagem")
+        
+        # Ignorar preços especiais antigos sem tipo definido e sem valor útil
+        if tipo_desconto == "percentagem":
+            percentagem = pe.get("valor_desconto") or pe.get("desconto_percentagem") or 0
+            # Se é tipo percentagem e o valor é 0 ou None, ignorar este preço especial
+            if not percentagem or percentagem == 0:
+                continue
+            # Desconto percentual sobre o preço calculado
+            preco_final = preco_original * (1 - percentagem / 100)
+            preco_especial_aplicado = {
+                "tipo": "percentagem",
+                "valor": percentagem,
+                "descricao": f"{percentagem}% de desconto sobre €{preco_original:.2f}"
+            }
+        
+        elif tipo_desconto == "valor_fixo":
+            # Preço fixo total - ignora número de veículos/motoristas
+            preco_fixo = pe.get("preco_fixo") or pe.get("preco_fixo_mensal") or 0
+            preco_final = preco_fixo
+            preco_especial_aplicado = {
+                "tipo": "valor_fixo",
+                "valor": preco_fixo,
+                "descricao": f"Preço fixo mensal: €{preco_fixo:.2f}"
+            }
+        
+        elif tipo_desconto == "valor_fixo_veiculo":
+            # Preço fixo por veículo
+            preco_por_veiculo = pe.get("preco_fixo") or 0
+            preco_final = preco_por_veiculo * num_veiculos
+            preco_especial_aplicado = {
+                "tipo": "valor_fixo_veiculo",
+                "valor": preco_por_veiculo,
+                "num_veiculos": num_veiculos,
+                "descricao": f"€{preco_por_veiculo:.2f}/veículo × {num_veiculos} = €{preco_final:.2f}"
+            }
+        
+        elif tipo_desconto == "valor_fixo_motorista":
+            # Preço fixo por motorista
+            preco_por_motorista = pe.get("preco_fixo") or 0
+            preco_final = preco_por_motorista * num_motoristas
+            preco_especial_aplicado = {
+                "tipo": "valor_fixo_motorista",
+                "valor": preco_por_motorista,
+                "num_motoristas": num_motoristas,
+                "descricao": f"€{preco_por_motorista:.2f}/motorista × {num_motoristas} = €{preco_final:.2f}"
+            }
+        
+        elif tipo_desconto == "valor_fixo_motorista_veiculo":
+            # Preço fixo por combinação motorista/veículo
+            # Usa o menor valor entre motoristas e veículos como base
+            preco_unitario = pe.get("preco_fixo") or 0
+            num_combinacoes = min(num_veiculos, num_motoristas) if num_veiculos > 0 and num_motoristas > 0 else max(num_veiculos, num_motoristas)
+            preco_final = preco_unitario * num_combinacoes
+            preco_especial_aplicado = {
+                "tipo": "valor_fixo_motorista_veiculo",
+                "valor": preco_unitario,
+                "num_veiculos": num_veiculos,
+                "num_motoristas": num_motoristas,
+                "num_combinacoes": num_combinacoes,
+                "descricao": f"€{preco_unitario:.2f}/combinação × {num_combinacoes} = €{preco_final:.2f}"
+            }
+        
+        break  # Aplicar apenas o primeiro preço especial encontrado
+    
+    return {
+        "parceiro_id": parceiro_id,
+        "plano_id": plano_id,
+        "plano_nome": plano.get("nome"),
+        "periodicidade": periodicidade,
+        "num_veiculos": num_veiculos,
+        "num_motoristas": num_motoristas,
+        "preco_base_plano": preco_calculado.get("preco_base", 0),
+        "preco_veiculos_plano": preco_calculado.get("preco_veiculos", 0),
+        "preco_motoristas_plano": preco_calculado.get("preco_motoristas", 0),
+        "preco_original": round(preco_original, 2),
+        "preco_especial_aplicado": preco_especial_aplicado,
+        "preco_final": round(preco_final, 2),
+        "economia": round(preco_original - preco_final, 2) if preco_original > preco_final else 0
+    }
+
+
+def _modulos_ativos(subscricao: Optional[Dict], plano: Optional[Dict]) -> List[str]:
+    """Módulos do plano + módulos individuais ativos/trial da subscrição"""
+    modulos = []
+    if subscricao:
+        if plano:
+            modulos.extend(plano.get("modulos_incluidos", []))
+        for mod in subscricao.get("modulos_individuais", []):
+            if mod.get("status") in ["ativo", "trial"]:
+                modulos.append(mod.get("modulo_codigo"))
+    return list(set(modulos))
+
+
+def _avaliar_limites(plano: Dict, num_veiculos: int, num_motoristas: int) -> Dict:
+    """Comparar o uso atual com os limites do plano"""
+    limites = plano.get("limites") or {}
+    
+    resultado = {
+        "dentro_limites": True,
+        "limites": limites,
+        "uso_atual": {
+            "veiculos": num_veiculos,
+            "motoristas": num_motoristas
+        },
+        "alertas": []
+    }
+    
+    if limites.get("max_veiculos") and num_veiculos >= limites["max_veiculos"]:
+        resultado["dentro_limites"] = False
+        resultado["alertas"].append(f"Limite de veículos atingido ({num_veiculos}/{limites['max_veiculos']})")
+    
+    if limites.get("max_motoristas") and num_motoristas >= limites["max_motoristas"]:
+        resultado["dentro_limites"] = False
+        resultado["alertas"].append(f"Limite de motoristas atingido ({num_motoristas}/{limites['max_motoristas']})")
+    
+    return resultado
+
+
 class PlanosModulosService:
     """Serviço para gestão de planos e módulos"""
     
@@ -32,14 +317,19 @@ class PlanosModulosService:
     # ==================== MÓDULOS ====================
     
     async def get_all_modulos(self, tipo_usuario: Optional[str] = None, apenas_ativos: bool = True) -> List[Dict]:
-        """Obter todos os módulos"""
+        """Obter todos os módulos (cache de configuração, grupo "modulos")"""
         filtro = {}
         if tipo_usuario:
             filtro["tipo_usuario"] = {"$in": [tipo_usuario, "ambos"]}
         if apenas_ativos:
             filtro["ativo"] = True
         
-        modulos = await self.db.modulos_sistema.find(filtro, {"_id": 0}).sort("ordem", 1).to_list(100)
+        async def carregar():
+            return await self.db.modulos_sistema.find(filtro, {"_id": 0}).sort("ordem", 1).to_list(100)
+        
+        modulos, _ = await cache_config.obter(
+            self.db, cache_config.MODULOS, f"sistema:{tipo_usuario}:{apenas_ativos}", carregar
+        )
         return modulos
     
     async def get_modulo(self, modulo_id: str) -> Optional[Dict]:
@@ -77,6 +367,7 @@ class PlanosModulosService:
         }
         
         await self.db.modulos_sistema.insert_one(modulo)
+        await cache_config.invalidar(self.db, cache_config.MODULOS)
         modulo.pop("_id", None)  # Remove MongoDB ObjectId before returning
         logger.info(f"Módulo criado: {modulo['nome']} por {criado_por}")
         return modulo
@@ -100,6 +391,7 @@ class PlanosModulosService:
             {"$set": update_data},
             return_document=True
         )
+        await cache_config.invalidar(self.db, cache_config.MODULOS)
         
         if result:
             result.pop("_id", None)
@@ -111,6 +403,7 @@ class PlanosModulosService:
             {"$or": [{"id": modulo_id}, {"codigo": modulo_id}]},
             {"$set": {"ativo": False, "deleted_at": datetime.now(timezone.utc).isoformat()}}
         )
+        await cache_config.invalidar(self.db, cache_config.MODULOS)
         return result.modified_count > 0
     
     async def seed_modulos_predefinidos(self) -> int:
@@ -145,19 +438,26 @@ class PlanosModulosService:
                 await self.db.modulos_sistema.insert_one(modulo)
                 count += 1
         
+        if count:
+            await cache_config.invalidar(self.db, cache_config.MODULOS)
         return count
     
     # ==================== PLANOS ====================
     
     async def get_all_planos(self, tipo_usuario: Optional[str] = None, apenas_ativos: bool = True) -> List[Dict]:
-        """Obter todos os planos"""
+        """Obter todos os planos (cache de configuração, grupo "planos")"""
         filtro = {}
         if tipo_usuario:
             filtro["tipo_usuario"] = {"$in": [tipo_usuario, "ambos"]}
         if apenas_ativos:
             filtro["ativo"] = True
         
-        planos = await self.db.planos_sistema.find(filtro, {"_id": 0}).sort("ordem", 1).to_list(100)
+        async def carregar():
+            return await self.db.planos_sistema.find(filtro, {"_id": 0}).sort("ordem", 1).to_list(100)
+        
+        planos, _ = await cache_config.obter(
+            self.db, cache_config.PLANOS, f"sistema:{tipo_usuario}:{apenas_ativos}", carregar
+        )
         return planos
     
     async def get_plano(self, plano_id: str) -> Optional[Dict]:
@@ -198,6 +498,7 @@ class PlanosModulosService:
         }
         
         await self.db.planos_sistema.insert_one(plano)
+        await cache_config.invalidar(self.db, cache_config.PLANOS)
         plano.pop("_id", None)  # Remove MongoDB ObjectId before returning
         logger.info(f"Plano criado: {plano['nome']} por {criado_por}")
         return plano
@@ -215,6 +516,7 @@ class PlanosModulosService:
             {"$set": updates},
             return_document=True
         )
+        await cache_config.invalidar(self.db, cache_config.PLANOS)
         
         if result:
             result.pop("_id", None)
@@ -226,6 +528,7 @@ class PlanosModulosService:
             {"id": plano_id},
             {"$set": {"ativo": False, "deleted_at": datetime.now(timezone.utc).isoformat()}}
         )
+        await cache_config.invalidar(self.db, cache_config.PLANOS)
         return result.modified_count > 0
     
     async def seed_planos_predefinidos(self) -> int:
@@ -262,6 +565,8 @@ class PlanosModulosService:
                 await self.db.planos_sistema.insert_one(plano)
                 count += 1
         
+        if count:
+            await cache_config.invalidar(self.db, cache_config.PLANOS)
         return count
     
     # ==================== PROMOÇÕES ====================
@@ -289,6 +594,7 @@ class PlanosModulosService:
             {"id": plano_id},
             {"$push": {"promocoes": promocao}}
         )
+        await cache_config.invalidar(self.db, cache_config.PLANOS)
         
         return promocao
     
@@ -339,6 +645,7 @@ class PlanosModulosService:
             {"id": plano_id},
             {"$push": {"precos_especiais": preco_especial}}
         )
+        await cache_config.invalidar(self.db, cache_config.PLANOS)
         
         logger.info(f"Preço especial criado para parceiro {parceiro_nome} no plano {plano_id} - tipo: {preco_especial['tipo_desconto']}")
         
@@ -383,125 +690,7 @@ class PlanosModulosService:
         if not plano:
             return {"erro": "Plano não encontrado"}
         
-        # Calcular preço base do plano
-        preco_calculado = await self.calcular_preco_plano(
-            plano_id, periodicidade, parceiro_id, num_veiculos, num_motoristas
-        )
-        
-        if "erro" in preco_calculado:
-            return preco_calculado
-        
-        preco_original = preco_calculado.get("preco_final", 0)
-        preco_final = preco_original
-        preco_especial_aplicado = None
-        
-        # Verificar se há preço especial para este parceiro
-        now = datetime.now(timezone.utc)
-        precos_especiais = plano.get("precos_especiais", [])
-        
-        for pe in precos_especiais:
-            if pe.get("parceiro_id") != parceiro_id:
-                continue
-            
-            # Verificar se está ativo
-            if not pe.get("ativo", True):
-                continue
-            
-            # Verificar validade
-            validade_inicio = pe.get("validade_inicio")
-            validade_fim = pe.get("validade_fim")
-            
-            if validade_inicio:
-                data_inicio = datetime.fromisoformat(validade_inicio.replace('Z', '+00:00')) if isinstance(validade_inicio, str) else validade_inicio
-                if now < data_inicio:
-                    continue
-            
-            if validade_fim:
-                data_fim = datetime.fromisoformat(validade_fim.replace('Z', '+00:00')) if isinstance(validade_fim, str) else validade_fim
-                if now > data_fim:
-                    continue
-            
-            # Encontrou preço especial válido - aplicar lógica
-            tipo_desconto = pe.get("tipo_desconto", "percentagem")
-            
-            # Ignorar preços especiais antigos sem tipo definido e sem valor útil
-            if tipo_desconto == "percentagem":
-                percentagem = pe.get("valor_desconto") or pe.get("desconto_percentagem") or 0
-                # Se é tipo percentagem e o valor é 0 ou None, ignorar este preço especial
-                if not percentagem or percentagem == 0:
-                    continue
-                # Desconto percentual sobre o preço calculado
-                preco_final = preco_original * (1 - percentagem / 100)
-                preco_especial_aplicado = {
-                    "tipo": "percentagem",
-                    "valor": percentagem,
-                    "descricao": f"{percentagem}% de desconto sobre €{preco_original:.2f}"
-                }
-            
-            elif tipo_desconto == "valor_fixo":
-                # Preço fixo total - ignora número de veículos/motoristas
-                preco_fixo = pe.get("preco_fixo") or pe.get("preco_fixo_mensal") or 0
-                preco_final = preco_fixo
-                preco_especial_aplicado = {
-                    "tipo": "valor_fixo",
-                    "valor": preco_fixo,
-                    "descricao": f"Preço fixo mensal: €{preco_fixo:.2f}"
-                }
-            
-            elif tipo_desconto == "valor_fixo_veiculo":
-                # Preço fixo por veículo
-                preco_por_veiculo = pe.get("preco_fixo") or 0
-                preco_final = preco_por_veiculo * num_veiculos
-                preco_especial_aplicado = {
-                    "tipo": "valor_fixo_veiculo",
-                    "valor": preco_por_veiculo,
-                    "num_veiculos": num_veiculos,
-                    "descricao": f"€{preco_por_veiculo:.2f}/veículo × {num_veiculos} = €{preco_final:.2f}"
-                }
-            
-            elif tipo_desconto == "valor_fixo_motorista":
-                # Preço fixo por motorista
-                preco_por_motorista = pe.get("preco_fixo") or 0
-                preco_final = preco_por_motorista * num_motoristas
-                preco_especial_aplicado = {
-                    "tipo": "valor_fixo_motorista",
-                    "valor": preco_por_motorista,
-                    "num_motoristas": num_motoristas,
-                    "descricao": f"€{preco_por_motorista:.2f}/motorista × {num_motoristas} = €{preco_final:.2f}"
-                }
-            
-            elif tipo_desconto == "valor_fixo_motorista_veiculo":
-                # Preço fixo por combinação motorista/veículo
-                # Usa o menor valor entre motoristas e veículos como base
-                preco_unitario = pe.get("preco_fixo") or 0
-                num_combinacoes = min(num_veiculos, num_motoristas) if num_veiculos > 0 and num_motoristas > 0 else max(num_veiculos, num_motoristas)
-                preco_final = preco_unitario * num_combinacoes
-                preco_especial_aplicado = {
-                    "tipo": "valor_fixo_motorista_veiculo",
-                    "valor": preco_unitario,
-                    "num_veiculos": num_veiculos,
-                    "num_motoristas": num_motoristas,
-                    "num_combinacoes": num_combinacoes,
-                    "descricao": f"€{preco_unitario:.2f}/combinação × {num_combinacoes} = €{preco_final:.2f}"
-                }
-            
-            break  # Aplicar apenas o primeiro preço especial encontrado
-        
-        return {
-            "parceiro_id": parceiro_id,
-            "plano_id": plano_id,
-            "plano_nome": plano.get("nome"),
-            "periodicidade": periodicidade,
-            "num_veiculos": num_veiculos,
-            "num_motoristas": num_motoristas,
-            "preco_base_plano": preco_calculado.get("preco_base", 0),
-            "preco_veiculos_plano": preco_calculado.get("preco_veiculos", 0),
-            "preco_motoristas_plano": preco_calculado.get("preco_motoristas", 0),
-            "preco_original": round(preco_original, 2),
-            "preco_especial_aplicado": preco_especial_aplicado,
-            "preco_final": round(preco_final, 2),
-            "economia": round(preco_original - preco_final, 2) if preco_original > preco_final else 0
-        }
+        return _aplicar_preco_especial(plano, parceiro_id, num_veiculos, num_motoristas, periodicidade)
     
     # ==================== CÁLCULO DE PREÇOS ====================
     
@@ -519,112 +708,9 @@ class PlanosModulosService:
         if not plano:
             return {"erro": "Plano não encontrado"}
         
-        tipo_usuario = plano.get("tipo_usuario", "parceiro")
-        
-        # Para motoristas, usar preços simples
-        if tipo_usuario == "motorista":
-            precos = plano.get("precos", {})
-            preco_base = precos.get(periodicidade, 0) or 0
-            return {
-                "plano_id": plano_id,
-                "plano_nome": plano.get("nome"),
-                "periodicidade": periodicidade,
-                "tipo_usuario": tipo_usuario,
-                "num_veiculos": 0,
-                "num_motoristas": 0,
-                "preco_base": round(preco_base, 2),
-                "preco_veiculos": 0,
-                "preco_motoristas": 0,
-                "preco_total": round(preco_base, 2),
-                "desconto_aplicado": None,
-                "preco_final": round(preco_base, 2)
-            }
-        
-        # Para parceiros, usar precos_plano (base + por veículo + por motorista)
-        precos_plano = plano.get("precos_plano", {})
-        
-        # Mapear periodicidade para campo
-        periodo_map = {
-            "semanal": "semanal",
-            "mensal": "mensal", 
-            "anual": "anual"
-        }
-        periodo = periodo_map.get(periodicidade, "mensal")
-        
-        preco_base = precos_plano.get(f"base_{periodo}", 0) or 0
-        preco_por_veiculo = precos_plano.get(f"por_veiculo_{periodo}", 0) or 0
-        preco_por_motorista = precos_plano.get(f"por_motorista_{periodo}", 0) or 0
-        
-        # Calcular totais
-        preco_veiculos = preco_por_veiculo * num_veiculos
-        preco_motoristas = preco_por_motorista * num_motoristas
-        preco_total = preco_base + preco_veiculos + preco_motoristas
-        
-        preco_final = preco_total
-        desconto_aplicado = None
-        promocao_aplicada = None
-        
-        # Verificar preço especial para parceiro
-        if user_id:
-            precos_especiais = plano.get("precos_especiais", [])
-            for pe in precos_especiais:
-                if pe.get("parceiro_id") == user_id:
-                    if pe.get("desconto_percentagem"):
-                        desconto = pe["desconto_percentagem"] / 100
-                        preco_final = preco_total * (1 - desconto)
-                        desconto_aplicado = {
-                            "tipo": "desconto_especial", 
-                            "percentagem": pe["desconto_percentagem"],
-                            "motivo": pe.get("motivo")
-                        }
-                    break
-        
-        # Verificar código promocional
-        if codigo_promocional and not desconto_aplicado:
-            promocoes = plano.get("promocoes", [])
-            for promo in promocoes:
-                if promo.get("codigo_promocional") == codigo_promocional and promo.get("ativa"):
-                    # Verificar validade
-                    now = datetime.now(timezone.utc)
-                    data_fim = promo.get("data_fim")
-                    if data_fim:
-                        if isinstance(data_fim, str):
-                            data_fim = datetime.fromisoformat(data_fim.replace('Z', '+00:00'))
-                        if now > data_fim:
-                            continue
-                    
-                    # Verificar limite de utilizações
-                    if promo.get("max_utilizacoes"):
-                        if promo.get("utilizacoes_atuais", 0) >= promo["max_utilizacoes"]:
-                            continue
-                    
-                    desconto = promo.get("desconto_percentagem", 0) / 100
-                    preco_final = preco_total * (1 - desconto)
-                    promocao_aplicada = promo
-                    desconto_aplicado = {
-                        "tipo": "promocao",
-                        "percentagem": promo.get("desconto_percentagem"),
-                        "nome": promo.get("nome")
-                    }
-                    break
-        
-        return {
-            "plano_id": plano_id,
-            "plano_nome": plano.get("nome"),
-            "periodicidade": periodicidade,
-            "tipo_usuario": tipo_usuario,
-            "num_veiculos": num_veiculos,
-            "num_motoristas": num_motoristas,
-            "preco_base": round(preco_base, 2),
-            "preco_por_veiculo": round(preco_por_veiculo, 2),
-            "preco_por_motorista": round(preco_por_motorista, 2),
-            "preco_veiculos": round(preco_veiculos, 2),
-            "preco_motoristas": round(preco_motoristas, 2),
-            "preco_total": round(preco_total, 2),
-            "desconto_aplicado": desconto_aplicado,
-            "promocao_aplicada": promocao_aplicada,
-            "preco_final": round(preco_final, 2)
-        }
+        return _calcular_preco(
+            plano, periodicidade, user_id, num_veiculos, num_motoristas, codigo_promocional
+        )
     
     async def calcular_prorata(
         self,
@@ -652,14 +738,14 @@ class PlanosModulosService:
         novo_motoristas = novo_num_motoristas if novo_num_motoristas is not None else num_motoristas_atual
         
         # Calcular preço atual
-        preco_atual = await self.calcular_preco_plano(
-            subscricao["plano_id"], periodicidade, user_id,
+        preco_atual = _calcular_preco(
+            plano, periodicidade, user_id,
             num_veiculos_atual, num_motoristas_atual
         )
         
         # Calcular novo preço
-        preco_novo = await self.calcular_preco_plano(
-            subscricao["plano_id"], periodicidade, user_id,
+        preco_novo = _calcular_preco(
+            plano, periodicidade, user_id,
             novo_veiculos, novo_motoristas
         )
         
@@ -720,24 +806,18 @@ class PlanosModulosService:
     
     async def get_modulos_ativos_user(self, user_id: str) -> List[str]:
         """Obter lista de códigos de módulos ativos para um utilizador"""
-        modulos = []
+        em_cache = user_cache.obter_modulos_cache(user_id)
+        if em_cache is not None:
+            return em_cache
         
-        # Buscar subscrição
         subscricao = await self.get_subscricao_user(user_id)
+        plano = None
+        if subscricao and subscricao.get("plano_id"):
+            plano = await self.get_plano(subscricao["plano_id"])
         
-        if subscricao:
-            # Módulos do plano
-            if subscricao.get("plano_id"):
-                plano = await self.get_plano(subscricao["plano_id"])
-                if plano:
-                    modulos.extend(plano.get("modulos_incluidos", []))
-            
-            # Módulos individuais
-            for mod in subscricao.get("modulos_individuais", []):
-                if mod.get("status") in ["ativo", "trial"]:
-                    modulos.append(mod.get("modulo_codigo"))
-        
-        return list(set(modulos))
+        modulos = _modulos_ativos(subscricao, plano)
+        user_cache.guardar_modulos_cache(user_id, modulos)
+        return modulos
     
     async def atribuir_plano(self, request: AtribuirPlanoRequest, atribuido_por: str) -> Dict:
         """Atribuir plano a um utilizador"""
@@ -862,6 +942,7 @@ class PlanosModulosService:
         }
         
         await self.db.users.update_one({"id": request.user_id}, {"$set": update_user})
+        user_cache.invalidar_utilizador(request.user_id)
         await self.db.parceiros.update_one({"id": request.user_id}, {"$set": update_user})
         await self.db.motoristas.update_one({"id": request.user_id}, {"$set": update_user})
         
@@ -993,6 +1074,7 @@ class PlanosModulosService:
         
         # Atualizar utilizador
         await self.db.users.update_one({"id": user_id}, {"$set": {"subscricao_status": "cancelado"}})
+        user_cache.invalidar_utilizador(user_id)
         await self.db.parceiros.update_one({"id": user_id}, {"$set": {"subscricao_status": "cancelado"}})
         
         return result.modified_count > 0
@@ -1094,28 +1176,130 @@ class PlanosModulosService:
         if not plano:
             return {"dentro_limites": True, "limites": None}
         
-        limites = plano.get("limites", {})
-        
         # Contar veículos e motoristas
         num_veiculos = await self.db.veiculos.count_documents({"parceiro_id": user_id})
         num_motoristas = await self.db.motoristas.count_documents({"parceiro_atribuido": user_id})
         
-        resultado = {
-            "dentro_limites": True,
-            "limites": limites,
-            "uso_atual": {
-                "veiculos": num_veiculos,
-                "motoristas": num_motoristas
-            },
-            "alertas": []
+        return _avaliar_limites(plano, num_veiculos, num_motoristas)
+    
+    # ==================== RESOLUÇÃO EM LOTE ====================
+    
+    async def catalogo_planos(self) -> Dict[str, Dict]:
+        """Todos os planos por id (snapshot na cache de configuração, grupo "planos")"""
+        async def carregar():
+            planos = await self.db.planos_sistema.find({}, {"_id": 0}).to_list(None)
+            return {p["id"]: p for p in planos if p.get("id")}
+        
+        catalogo, _ = await cache_config.obter(self.db, cache_config.PLANOS, "catalogo", carregar)
+        return catalogo
+    
+    async def _contar_por(self, colecao, campo: str, ids: List[str]) -> Dict[str, int]:
+        contagens = {}
+        async for doc in colecao.aggregate([
+            {"$match": {campo: {"$in": ids}}},
+            {"$group": {"_id": f"${campo}", "total": {"$sum": 1}}}
+        ]):
+            contagens[doc["_id"]] = doc["total"]
+        return contagens
+    
+    @staticmethod
+    def _entrada_resolvida(
+        user_id: str,
+        subscricao: Optional[Dict],
+        catalogo: Dict[str, Dict],
+        num_veiculos: Optional[int],
+        num_motoristas: Optional[int],
+        periodicidade: Optional[str] = None
+    ) -> Dict:
+        """Plano, módulos, limites e preço de uma subscrição (contagens None = sem limites)"""
+        plano = catalogo.get(subscricao.get("plano_id")) if subscricao and subscricao.get("plano_id") else None
+        entrada = {
+            "user_id": user_id,
+            "subscricao_id": subscricao.get("id") if subscricao else None,
+            "status": subscricao.get("status") if subscricao else None,
+            "plano_id": plano.get("id") if plano else None,
+            "plano_nome": plano.get("nome") if plano else None,
+            "modulos_ativos": _modulos_ativos(subscricao, plano),
+            "limites": {"dentro_limites": True, "limites": None},
+            "preco": None
         }
+        if plano:
+            if num_veiculos is not None:
+                entrada["limites"] = _avaliar_limites(plano, num_veiculos, num_motoristas or 0)
+            entrada["preco"] = _aplicar_preco_especial(
+                plano,
+                user_id,
+                subscricao.get("num_veiculos") or 0,
+                subscricao.get("num_motoristas") or 0,
+                periodicidade or subscricao.get("periodicidade") or "mensal"
+            )
+        return entrada
+    
+    async def _uso(self, ids: List[str], contar_uso: bool) -> Tuple[Dict[str, int], Dict[str, int]]:
+        if not contar_uso:
+            return {}, {}
+        veiculos = await self._contar_por(self.db.veiculos, "parceiro_id", ids)
+        motoristas = await self._contar_por(self.db.motoristas, "parceiro_atribuido", ids)
+        return veiculos, motoristas
+    
+    async def resolver_lote(
+        self,
+        user_ids: List[str],
+        periodicidade: Optional[str] = None,
+        contar_uso: bool = True
+    ) -> Dict[str, Dict]:
+        """
+        Subscrição, plano, módulos ativos, limites e preço de vários
+        utilizadores de uma vez: uma query às subscrições, duas agregações
+        de contagem e o catálogo de planos em cache, em vez de 4-6 queries
+        por utilizador. `periodicidade` sobrepõe-se à da subscrição.
+        """
+        ids = list(dict.fromkeys(u for u in user_ids if u))
+        if not ids:
+            return {}
         
-        if limites.get("max_veiculos") and num_veiculos >= limites["max_veiculos"]:
-            resultado["dentro_limites"] = False
-            resultado["alertas"].append(f"Limite de veículos atingido ({num_veiculos}/{limites['max_veiculos']})")
-        
-        if limites.get("max_motoristas") and num_motoristas >= limites["max_motoristas"]:
-            resultado["dentro_limites"] = False
-            resultado["alertas"].append(f"Limite de motoristas atingido ({num_motoristas}/{limites['max_motoristas']})")
+        subscricoes: Dict[str, Dict] = {}
+        async for subscricao in self.db.subscricoes.find(
+            {"user_id": {"$in": ids}, "status": {"$in": ["ativo", "trial"]}},
+            {"_id": 0}
+        ):
+            subscricoes.setdefault(subscricao["user_id"], subscricao)
+        
+        catalogo = await self.catalogo_planos()
+        veiculos, motoristas = await self._uso(ids, contar_uso)
+        
+        resultado = {}
+        for user_id in ids:
+            entrada = self._entrada_resolvida(
+                user_id, subscricoes.get(user_id), catalogo,
+                veiculos.get(user_id, 0) if contar_uso else None,
+                motoristas.get(user_id, 0) if contar_uso else None,
+                periodicidade
+            )
+            user_cache.guardar_modulos_cache(user_id, entrada["modulos_ativos"])
+            resultado[user_id] = entrada
         
         return resultado
+    
+    async def resolver_subscricoes(self, subscricoes: List[Dict], contar_uso: bool = True) -> Dict[str, Dict]:
+        """
+        Como `resolver_lote`, mas para subscrições já lidas (qualquer status),
+        por id de subscrição: cada linha mostra o plano e módulos dessa
+        subscrição e não os da subscrição ativa do utilizador.
+        """
+        subscricoes = [s for s in subscricoes if s.get("id")]
+        if not subscricoes:
+            return {}
+        
+        ids = list(dict.fromkeys(s["user_id"] for s in subscricoes if s.get("user_id")))
+        catalogo = await self.catalogo_planos()
+        veiculos, motoristas = await self._uso(ids, contar_uso)
+        
+        return {
+            s["id"]: self._entrada_resolvida(
+                s.get("user_id"), s, catalogo,
+                veiculos.get(s.get("user_id"), 0) if contar_uso else None,
+                motoristas.get(s.get("user_id"), 0) if contar_uso else None
+            )
+            for s in subscricoes
+        }
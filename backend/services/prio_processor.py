@@ -10,6 +10,8 @@ from typing import Dict, List, Optional
 from io import StringIO
 import uuid
 
+from services import ledger_semanal
+
 logger = logging.getLogger(__name__)
 
 
@@ -194,6 +196,7 @@ class PrioProcessor:
             logger.info(f"📊 Mapeamento de colunas: {col_map}")
             
             registos_processados = 0
+            registos_gravados = []
             registos_inseridos = 0
             registos_atualizados = 0
             registos_fora_periodo = 0
@@ -334,6 +337,7 @@ class PrioProcessor:
                             {"$set": registo}
                         )
                         registos_atualizados += 1
+                        registos_gravados.append(existente)
                     else:
                         # Inserir novo
                         registo["id"] = str(uuid.uuid4())
@@ -341,11 +345,14 @@ class PrioProcessor:
                         registos_inseridos += 1
                     
                     registos_processados += 1
+                    registos_gravados.append(registo)
                     
                 except Exception as e:
                     logger.warning(f"⚠️ Erro na linha {row_idx}: {e}")
                     continue
             
+            await ledger_semanal.invalidar_registos(self.db, registos_gravados, parceiro_id=parceiro_id)
+            
             logger.info(f"✅ Combustível processado: {registos_processados} registos ({registos_inseridos} novos, {registos_atualizados} atualizados, {registos_fora_periodo} fora do período)")
             
             return {
@@ -432,6 +439,7 @@ class PrioProcessor:
                     rows_data.append({k.upper().strip(): v for k, v in row.items()})
             
             registos_processados = 0
+            registos_gravados = []
             registos_inseridos = 0
             registos_atualizados = 0
             
@@ -546,6 +554,7 @@ class PrioProcessor:
                             {"$set": registo}
                         )
                         registos_atualizados += 1
+                        registos_gravados.append(existente)
                     else:
                         # Inserir novo
                         registo["id"] = str(uuid.uuid4())
@@ -553,11 +562,14 @@ class PrioProcessor:
                         registos_inseridos += 1
                     
                     registos_processados += 1
+                    registos_gravados.append(registo)
                     
                 except Exception as e:
                     logger.warning(f"⚠️ Erro na linha: {e}")
                     continue
             
+            await ledger_semanal.invalidar_registos(self.db, registos_gravados, parceiro_id=parceiro_id)
+            
             logger.info(f"✅ Elétrico processado: {registos_processados} registos ({registos_inseridos} novos, {registos_atualizados} atualizados)")
             
             return {
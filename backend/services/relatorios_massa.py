@@ -0,0 +1,474 @@
+"""
+Geração em massa de relatórios semanais.
+
+Em vez de ~8 queries sequenciais por motorista, os totais de todos os
+motoristas são calculados com agregações `$group` por `motorista_id` sobre o
+período, juntos em memória e gravados com um único `bulk_write`.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import InsertOne, UpdateOne
+
+from services import envio_email, fila_tarefas
+from services.envio_relatorios import generate_relatorio_motorista_html
+
+logger = logging.getLogger(__name__)
+
+# Estado no histórico de cada email do envio em massa
+ESTADO_EMAIL = {
+    envio_email.ENVIADO: "enviado",
+    envio_email.PENDENTE: "pendente",
+    envio_email.DEAD_LETTER: "falhado",
+}
+
+
+def _num(campo: str) -> Dict:
+    """Converter um campo para double (null/inválido = 0)"""
+    return {"$convert": {"input": f"${campo}", "to": "double", "onError": 0.0, "onNull": 0.0}}
+
+
+def _primeiro_nao_zero(*campos: str) -> Dict:
+    """Equivalente a `float(a or 0) or float(b or 0) or ...` numa agregação"""
+    expr: Any = 0.0
+    for campo in reversed(campos):
+        expr = {"$cond": [{"$ne": [_num(campo), 0.0]}, _num(campo), expr]}
+    return expr
+
+
+async def _somar_por_motorista(collection, match: Dict, somas: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Executar um `$group` por motorista_id e devolver {motorista_id: {campo: total}}"""
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$motorista_id", **{k: {"$sum": v} for k, v in somas.items()}}},
+    ]
+    resultado = {}
+    async for row in collection.aggregate(pipeline):
+        resultado[row.pop("_id")] = row
+    return resultado
+
+
+async def gerar_relatorios_em_massa(
+    db,
+    motoristas: List[Dict],
+    data_inicio: str,
+    data_fim: str,
+    criado_por: str,
+    incluir_uber: bool = True,
+    incluir_bolt: bool = True,
+    incluir_viaverde: bool = True,
+    incluir_combustivel: bool = True,
+) -> Dict[str, Any]:
+    """
+    Gerar relatórios semanais (pendente_aprovacao) para uma lista de motoristas.
+
+    Mantém as regras por motorista do cálculo anterior: `gorjetas_uber_recebe`,
+    `portagens_uber_config` e o atraso Via Verde (`via_verde_atraso_semanas`)
+    configurado por parceiro em `relatorio_config`.
+    """
+    inicio = datetime.strptime(data_inicio, "%Y-%m-%d")
+    fim = datetime.strptime(data_fim, "%Y-%m-%d")
+    semana = inicio.isocalendar()[1]
+    ano = inicio.year
+
+    relatorios_criados = []
+    erros = []
+
+    if not motoristas:
+        return _resultado(relatorios_criados, erros)
+
+    motorista_ids = [m["id"] for m in motoristas]
+    periodo = {"$gte": data_inicio, "$lte": data_fim}
+
+    # 1. Ganhos Uber (gorjetas e portagens somadas à parte para aplicar regras por motorista)
+    uber = {}
+    if incluir_uber:
+        uber = await _somar_por_motorista(
+            db.ganhos_uber,
+            {"motorista_id": {"$in": motorista_ids}, "periodo_inicio": periodo},
+            {
+                "base": _primeiro_nao_zero("ganhos_base", "ganhos_totais", "rendimentos_total"),
+                "gorjetas": _num("gorjetas"),
+                "portagens": _num("portagens_total"),
+            }
+        )
+
+    # 2. Ganhos Bolt
+    bolt = {}
+    if incluir_bolt:
+        bolt = await _somar_por_motorista(
+            db.viagens_bolt,
+            {"motorista_id": {"$in": motorista_ids}, "periodo_inicio": periodo},
+            {"total": _primeiro_nao_zero("valor_liquido", "ganhos_liquidos", "ganhos_semanais")}
+        )
+
+    # 3. Via Verde (portagens e carregamentos) + despesas importadas com atraso por parceiro
+    viaverde = {}
+    viaverde_importado = {}
+    if incluir_viaverde:
+        carregamento = {"$eq": ["$tipo_transacao", "carregamento_eletrico"]}
+        viaverde = await _somar_por_motorista(
+            db.portagens_viaverde,
+            {"motorista_id": {"$in": motorista_ids}, "periodo_inicio": periodo},
+            {
+                "carregamentos": {"$cond": [carregamento, _num("valor_total_com_taxas"), 0.0]},
+                "portagens": {"$cond": [carregamento, 0.0, _primeiro_nao_zero("value", "valor_total_com_taxas", "valor")]},
+            }
+        )
+
+        parceiro_ids = list({m.get("parceiro_atribuido") for m in motoristas if m.get("parceiro_atribuido")})
+        configs = await db.relatorio_config.find(
+            {"parceiro_id": {"$in": parceiro_ids}},
+            {"_id": 0, "parceiro_id": 1, "via_verde_atraso_semanas": 1}
+        ).to_list(None)
+        atraso_parceiro = {c["parceiro_id"]: c.get("via_verde_atraso_semanas", 1) for c in configs}
+
+        # Uma agregação por valor de atraso distinto (normalmente apenas 1)
+        motoristas_por_atraso: Dict[int, List[str]] = {}
+        for m in motoristas:
+            atraso = atraso_parceiro.get(m.get("parceiro_atribuido"), 1)
+            motoristas_por_atraso.setdefault(atraso, []).append(m["id"])
+
+        for atraso, ids in motoristas_por_atraso.items():
+            data_inicio_vv = (inicio - timedelta(weeks=atraso)).strftime("%Y-%m-%d")
+            data_fim_vv_next = (fim - timedelta(weeks=atraso) + timedelta(days=1)).strftime("%Y-%m-%d")
+            viaverde_importado.update(await _somar_por_motorista(
+                db.despesas_fornecedor,
+                {
+                    "motorista_id": {"$in": ids},
+                    "tipo_fornecedor": "via_verde",
+                    "tipo_responsavel": "motorista",
+                    "data_entrada": {"$gte": data_inicio_vv, "$lt": data_fim_vv_next}
+                },
+                {"total": _num("valor_liquido")}
+            ))
+
+    # 4. Combustível fóssil e elétrico
+    combustivel = {}
+    eletrico = {}
+    if incluir_combustivel:
+        match_comb = {"motorista_id": {"$in": motorista_ids}, "data": periodo}
+        combustivel = await _somar_por_motorista(
+            db.abastecimentos_combustivel, match_comb, {"total": _num("valor_total")}
+        )
+        eletrico = await _somar_por_motorista(
+            db.abastecimentos_eletrico, match_comb, {"total": _num("valor_total")}
+        )
+
+    # 5. Contratos ativos (primeiro contrato encontrado por motorista)
+    contratos = {}
+    async for contrato in db.contratos.find(
+        {"motorista_id": {"$in": motorista_ids}, "ativo": True},
+        {"_id": 0, "motorista_id": 1, "tipo_contrato": 1}
+    ):
+        contratos.setdefault(contrato["motorista_id"], contrato)
+
+    # 6. Relatórios já existentes para a semana
+    existentes = set()
+    async for rel in db.relatorios_semanais.find(
+        {"motorista_id": {"$in": motorista_ids}, "semana": semana, "ano": ano},
+        {"_id": 0, "motorista_id": 1}
+    ):
+        existentes.add(rel["motorista_id"])
+
+    # 7. Calcular relatórios em memória
+    operacoes = []
+    agora = datetime.now(timezone.utc).isoformat()
+
+    for motorista in motoristas:
+        motorista_id = motorista["id"]
+        try:
+            if motorista_id in existentes:
+                erros.append({
+                    "motorista": motorista.get("name"),
+                    "erro": f"Relatório já existe para semana {semana}/{ano}"
+                })
+                continue
+
+            ganhos_uber = 0.0
+            u = uber.get(motorista_id)
+            if u:
+                ganhos_uber = u["base"]
+                if motorista.get("gorjetas_uber_recebe", True):
+                    ganhos_uber += u["gorjetas"]
+                if motorista.get("portagens_uber_config") == "empresa_paga":
+                    ganhos_uber += u["portagens"]
+                elif motorista.get("portagens_uber_config") == "motorista_paga":
+                    ganhos_uber -= u["portagens"]
+
+            ganhos_bolt = bolt.get(motorista_id, {}).get("total", 0.0)
+
+            vv = viaverde.get(motorista_id, {})
+            carregamentos_total = vv.get("carregamentos", 0.0)
+            via_verde_total = vv.get("portagens", 0.0) + viaverde_importado.get(motorista_id, {}).get("total", 0.0)
+
+            combustivel_total = (
+                combustivel.get(motorista_id, {}).get("total", 0.0) +
+                eletrico.get(motorista_id, {}).get("total", 0.0)
+            )
+
+            valor_aluguer = 0.0
+            caucao_semanal = 0.0
+            contrato = contratos.get(motorista_id)
+            if contrato:
+                tipo_contrato = contrato.get("tipo_contrato", {})
+                valor_aluguer = float(tipo_contrato.get("valor_aluguer", 0) or 0)
+                if tipo_contrato.get("valor_caucao") and tipo_contrato.get("numero_parcelas_caucao"):
+                    valor_caucao = float(tipo_contrato.get("valor_caucao", 0) or 0)
+                    num_parcelas = int(tipo_contrato.get("numero_parcelas_caucao", 1) or 1)
+                    caucao_semanal = valor_caucao / num_parcelas if num_parcelas > 0 else 0
+
+            novo_relatorio = {
+                "id": str(uuid.uuid4()),
+                "motorista_id": motorista_id,
+                "motorista_nome": motorista.get("name"),
+                "motorista_email": motorista.get("email", ""),
+                "parceiro_id": motorista.get("parceiro_atribuido"),
+                "veiculo_id": motorista.get("veiculo_atribuido"),
+                "semana": semana,
+                "ano": ano,
+                "data_inicio": data_inicio,
+                "data_fim": data_fim,
+                "ganhos_uber": round(ganhos_uber, 2),
+                "ganhos_bolt": round(ganhos_bolt, 2),
+                "ganhos_totais": round(ganhos_uber + ganhos_bolt, 2),
+                "via_verde_total": round(via_verde_total, 2),
+                "portagens_viaverde": round(via_verde_total, 2),
+                "carregamentos_eletricos": round(carregamentos_total, 2),
+                "combustivel_total": round(combustivel_total, 2),
+                "valor_aluguer": round(valor_aluguer, 2),
+                "caucao_semanal": round(caucao_semanal, 2),
+                "outros": 0.0,
+                "divida_anterior": 0.0,
+                "status": "pendente_aprovacao",
+                "criado_em": agora,
+                "criado_por": criado_por,
+                "gerado_automaticamente": True
+            }
+
+            total_despesas = (valor_aluguer + caucao_semanal + via_verde_total +
+                              carregamentos_total + combustivel_total +
+                              novo_relatorio["outros"] + novo_relatorio["divida_anterior"])
+            novo_relatorio["total_a_pagar"] = round(novo_relatorio["ganhos_totais"] - total_despesas, 2)
+
+            operacoes.append(InsertOne(novo_relatorio))
+            relatorios_criados.append({
+                "motorista": motorista.get("name"),
+                "semana": semana,
+                "ano": ano,
+                "ganhos_totais": novo_relatorio["ganhos_totais"],
+                "total_a_pagar": novo_relatorio["total_a_pagar"]
+            })
+        except Exception as e:
+            logger.error(f"Erro ao gerar relatório para motorista {motorista.get('name')}: {str(e)}")
+            erros.append({"motorista": motorista.get("name"), "erro": str(e)})
+
+    # 8. Gravar todos os relatórios de uma vez
+    if operacoes:
+        await db.relatorios_semanais.bulk_write(operacoes, ordered=False)
+
+    logger.info(f"✅ {len(relatorios_criados)} relatórios criados (semana {semana}/{ano}), {len(erros)} erros")
+    return _resultado(relatorios_criados, erros)
+
+
+def _resultado(relatorios_criados: List[Dict], erros: List[Dict]) -> Dict[str, Any]:
+    return {
+        "sucesso": len(relatorios_criados),
+        "erros": len(erros),
+        "relatorios_criados": relatorios_criados,
+        "erros_detalhes": erros,
+        "mensagem": f"{len(relatorios_criados)} relatórios criados com sucesso"
+    }
+
+
+# ==================== TAREFAS EM BACKGROUND ====================
+
+@fila_tarefas.registar("relatorios.gerar_em_massa")
+async def tarefa_gerar_relatorios_em_massa(db, tarefa: fila_tarefas.Tarefa) -> Dict[str, Any]:
+    """Handler da fila para POST /relatorios/gerar-em-massa"""
+    p = tarefa.payload
+
+    query: Dict[str, Any] = {"status": "ativo"}
+    if p.get("motorista_ids"):
+        query["id"] = {"$in": p["motorista_ids"]}
+    motoristas = await db.motoristas.find(query, {"_id": 0}).to_list(None)
+
+    logger.info(f"Gerando relatórios para {len(motoristas)} motoristas de {p['data_inicio']} a {p['data_fim']}")
+    await tarefa.progresso(10, mensagem=f"A calcular relatórios de {len(motoristas)} motoristas")
+
+    resultado = await gerar_relatorios_em_massa(
+        db,
+        motoristas,
+        p["data_inicio"],
+        p["data_fim"],
+        criado_por=tarefa.criado_por,
+        incluir_uber=p.get("incluir_uber", True),
+        incluir_bolt=p.get("incluir_bolt", True),
+        incluir_viaverde=p.get("incluir_viaverde", True),
+        incluir_combustivel=p.get("incluir_combustivel", True),
+    )
+    await tarefa.progresso(100, mensagem=resultado["mensagem"])
+    return resultado
+
+
+def _email_relatorio(usuario: Dict[str, Any], relatorio: Optional[Dict[str, Any]], data_inicio: str, data_fim: str) -> Dict[str, str]:
+    """Assunto e HTML do email: o relatório semanal do período, se existir, ou um aviso"""
+    if relatorio:
+        despesas = (relatorio.get("combustivel_total", 0) + relatorio.get("carregamentos_eletricos", 0) +
+                    relatorio.get("via_verde_total", 0))
+        motorista_data = {
+            "motorista_nome": usuario.get("name"),
+            "ganhos_uber": relatorio.get("ganhos_uber", 0),
+            "ganhos_bolt": relatorio.get("ganhos_bolt", 0),
+            "total_ganhos": relatorio.get("ganhos_totais", 0),
+            "combustivel": relatorio.get("combustivel_total", 0),
+            "carregamento_eletrico": relatorio.get("carregamentos_eletricos", 0),
+            "via_verde": relatorio.get("via_verde_total", 0),
+            "total_despesas_operacionais": despesas,
+            "aluguer_veiculo": relatorio.get("valor_aluguer", 0),
+            "valor_liquido_motorista": relatorio.get("total_a_pagar", 0),
+        }
+        semana, ano = relatorio.get("semana"), relatorio.get("ano")
+        return {
+            "assunto": f"Relatório Semanal - Semana {semana}/{ano}",
+            "html": generate_relatorio_motorista_html(motorista_data, semana, ano),
+        }
+    return {
+        "assunto": f"Relatório {data_inicio} a {data_fim}",
+        "html": (
+            f"<html><body><p>Olá {usuario.get('name', '')},</p>"
+            f"<p>O seu relatório de {data_inicio} a {data_fim} está disponível na plataforma TVDEFleet.</p>"
+            "</body></html>"
+        ),
+    }
+
+
+async def atualizar_historico_emails(db, estados: Dict[str, str]):
+    """
+    Passar ao histórico o estado final dos emails do envio em massa
+    (`estados`: email_id -> estado em emails_envio). Chamado quando a fila
+    de email acaba de enviar ou desiste de um email que ficou pendente.
+    """
+    operacoes = [
+        UpdateOne({"email_id": email_id}, {"$set": {"status": ESTADO_EMAIL[estado], "estado_relatorio": ESTADO_EMAIL[estado]}})
+        for email_id, estado in estados.items()
+        if estado != envio_email.PENDENTE
+    ]
+    if operacoes:
+        await db.historico_relatorios.bulk_write(operacoes, ordered=False)
+
+
+async def _enviar_emails(db, tarefa: fila_tarefas.Tarefa, destinos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Enviar o relatório do período a cada utilizador de `destinos` num só
+    lote (services/envio_email.py). Devolve o resumo do lote.
+    """
+    p = tarefa.payload
+    criador = await db.users.find_one({"id": tarefa.criado_por}, {"_id": 0, "role": 1}) if tarefa.criado_por else None
+    parceiro_criador = tarefa.criado_por if criador and criador.get("role") == "parceiro" else None
+
+    relatorios = {}
+    if p["tipo_usuario"] == "motorista":
+        async for rel in db.relatorios_semanais.find(
+            {"motorista_id": {"$in": [u["id"] for u in destinos]}, "data_inicio": p["data_inicio"]},
+            {"_id": 0},
+        ):
+            relatorios[rel["motorista_id"]] = rel
+
+    lote = []
+    for usuario in destinos:
+        # SMTP: do parceiro que envia, senão do parceiro do motorista, senão o do sistema
+        parceiro_id = parceiro_criador
+        if not parceiro_id and p["tipo_usuario"] == "motorista":
+            parceiro_id = usuario.get("parceiro_id") or usuario.get("parceiro_atribuido")
+        lote.append({
+            "para": usuario["email"],
+            "parceiro_id": parceiro_id,
+            "contexto": {"usuario_id": usuario["id"], "data_inicio": p["data_inicio"], "data_fim": p["data_fim"]},
+            **_email_relatorio(usuario, relatorios.get(usuario["id"]), p["data_inicio"], p["data_fim"]),
+        })
+
+    await tarefa.progresso(len(p["usuario_ids"]), len(p["usuario_ids"]), mensagem=f"A enviar {len(lote)} emails")
+    return await envio_email.enfileirar(
+        db, lote, criado_por=tarefa.criado_por,
+        descricao=f"Emails de relatórios {p['data_inicio']} a {p['data_fim']}", processar_agora=True,
+    )
+
+
+@fila_tarefas.registar("relatorios.envio_massa")
+async def tarefa_registar_envios_em_massa(db, tarefa: fila_tarefas.Tarefa) -> Dict[str, Any]:
+    """
+    Handler da fila para /relatorios/enviar-email-massa e
+    /relatorios/enviar-whatsapp-massa (payload `tipo_envio`: email|whatsapp).
+    """
+    p = tarefa.payload
+    usuario_ids = p["usuario_ids"]
+    tipo_usuario = p["tipo_usuario"]
+    tipo_envio = p["tipo_envio"]
+    campo_destino = "email" if tipo_envio == "email" else "telefone"
+
+    collection = db.motoristas if tipo_usuario == "motorista" else db.parceiros
+    encontrados = {u["id"]: u for u in await collection.find({"id": {"$in": usuario_ids}}, {"_id": 0}).to_list(None)}
+    em_falta = [uid for uid in usuario_ids if uid not in encontrados]
+    if em_falta:
+        for u in await db.users.find({"id": {"$in": em_falta}}, {"_id": 0}).to_list(None):
+            encontrados[u["id"]] = u
+
+    enviados = 0
+    erros = []
+    historico = []
+    destinos = []
+    for i, usuario_id in enumerate(usuario_ids, start=1):
+        usuario = encontrados.get(usuario_id)
+        if not usuario or not usuario.get(campo_destino):
+            erros.append(f"Utilizador {usuario_id}: sem {campo_destino}")
+            continue
+        destinos.append(usuario)
+
+        # Registar envio no histórico
+        historico.append({
+            "id": str(uuid.uuid4()),
+            "usuario_id": usuario_id,
+            "tipo_usuario": tipo_usuario,
+            "tipo_envio": tipo_envio,
+            "destino": usuario.get(campo_destino),
+            "data_inicio_relatorio": p["data_inicio"],
+            "data_fim_relatorio": p["data_fim"],
+            "data_envio": datetime.now(timezone.utc),
+            "status": "enviado",
+            "estado_relatorio": "enviado",
+            "enviado_por": tarefa.criado_por
+        })
+        enviados += 1
+
+        if i % 50 == 0:
+            await tarefa.progresso(i, len(usuario_ids))
+
+    if tipo_envio == "email" and destinos:
+        envio = await _enviar_emails(db, tarefa, destinos)
+        for h, email_id in zip(historico, envio["ids"]):
+            estado = envio["estados"][email_id]
+            h["status"] = h["estado_relatorio"] = ESTADO_EMAIL[estado]
+            h["email_id"] = email_id
+            if estado != envio_email.ENVIADO:
+                erros.append(f"Utilizador {h['usuario_id']}: {envio['erros'].get(email_id, 'email não enviado')}")
+        enviados = envio["enviados"]
+
+    if historico:
+        await db.historico_relatorios.bulk_write([InsertOne(h) for h in historico], ordered=False)
+        # A fila de email pode ter tratado os pendentes antes de o histórico existir
+        pendentes = [h["email_id"] for h in historico if h.get("status") == ESTADO_EMAIL[envio_email.PENDENTE]]
+        if pendentes:
+            await atualizar_historico_emails(db, {
+                d["id"]: d["estado"]
+                async for d in db[envio_email.COLECAO].find({"id": {"$in": pendentes}}, {"_id": 0, "id": 1, "estado": 1})
+            })
+
+    return {
+        "message": f"Relatórios enviados para {enviados} de {len(usuario_ids)} utilizadores",
+        "enviados": enviados,
+        "erros": erros
+    }
@@ -0,0 +1,609 @@
+"""
+Construção dos PDFs dos relatórios semanais (reportlab).
+
+As rotas de `routes/relatorios.py` recolhem os dados na base de dados e
+chamam estas funções através de `executor_service.executar_cpu`, para que o
+`doc.build` não bloqueie o event loop. Recebem apenas dados simples
+(dicts, listas, números, datetimes) e devolvem os bytes do PDF.
+"""
+
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+def construir_pdf_motorista(
+    motorista: Dict[str, Any],
+    matricula: str,
+    semana: int,
+    ano: int,
+    week_start: datetime,
+    week_end: datetime,
+    valores: Dict[str, float],
+    vv_transacoes: List[Dict[str, Any]],
+    comb_transacoes: List[Dict[str, Any]],
+    elet_records: List[Dict[str, Any]],
+    mostrar_matricula: bool = True,
+    mostrar_via_verde: bool = False,
+    mostrar_abastecimentos: bool = False,
+    mostrar_carregamentos: bool = False,
+) -> bytes:
+    """PDF do relatório semanal individual de um motorista"""
+    ganhos_uber = valores["ganhos_uber"]
+    uber_portagens = valores["uber_portagens"]
+    uber_gratificacoes = valores["uber_gratificacoes"]
+    ganhos_bolt = valores["ganhos_bolt"]
+    via_verde = valores["via_verde"]
+    combustivel = valores["combustivel"]
+    eletrico = valores["eletrico"]
+    aluguer = valores["aluguer"]
+    extras = valores["extras"]
+    total_ganhos = valores["total_ganhos"]
+    total_despesas = valores["total_despesas"]
+    liquido = valores["liquido"]
+    
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm, topMargin=15*mm, bottomMargin=15*mm)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16, alignment=TA_CENTER)
+    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, textColor=colors.grey)
+    section_style = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=11, textColor=colors.HexColor('#1e3a5f'))
+    
+    elements = []
+    
+    # Cabeçalho
+    elements.append(Paragraph(f"Relatório Semanal", title_style))
+    elements.append(Paragraph(f"{motorista.get('name', 'Motorista')}", subtitle_style))
+    
+    # Mostrar matrícula se configurado
+    if mostrar_matricula and matricula:
+        elements.append(Paragraph(f"Veículo: {matricula}", subtitle_style))
+    
+    elements.append(Paragraph(f"Semana {semana}/{ano} ({week_start.strftime('%d/%m/%Y')} a {week_end.strftime('%d/%m/%Y')})", subtitle_style))
+    elements.append(Spacer(1, 10*mm))
+    
+    # Tabela de resumo
+    data_table = [
+        ["Descrição", "Valor"],
+        ["Ganhos Uber", f"€{ganhos_uber:.2f}"],
+        ["uPort (Portagens Uber)", f"€{uber_portagens:.2f}"],
+        ["uGrat (Gratificações Uber)", f"€{uber_gratificacoes:.2f}"],
+        ["Ganhos Bolt", f"€{ganhos_bolt:.2f}"],
+        ["Total Ganhos", f"€{total_ganhos:.2f}"],
+        ["", ""],
+        ["Via Verde", f"-€{via_verde:.2f}"],
+        ["Combustível", f"-€{combustivel:.2f}"],
+        ["Carregamento Elétrico", f"-€{eletrico:.2f}"],
+        ["Total Despesas", f"-€{total_despesas:.2f}"],
+        ["", ""],
+        ["Aluguer Veículo", f"-€{aluguer:.2f}"],
+        ["Extras/Dívidas", f"-€{extras:.2f}"],
+        ["", ""],
+        ["VALOR LÍQUIDO MOTORISTA", f"€{liquido:.2f}"],
+    ]
+    
+    table = Table(data_table, colWidths=[100*mm, 50*mm])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a5f')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+        # Estilo para "Total Ganhos" (linha 5)
+        ('FONTNAME', (0, 5), (-1, 5), 'Helvetica-Bold'),
+        # Estilo para "Total Despesas" (linha 10)
+        ('FONTNAME', (0, 10), (-1, 10), 'Helvetica-Bold'),
+        # Estilo para "VALOR LÍQUIDO MOTORISTA" (última linha - 15)
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#d4edda') if liquido >= 0 else colors.HexColor('#f8d7da')),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    
+    elements.append(table)
+    elements.append(Spacer(1, 10*mm))
+    
+    # ==================== LISTAS DETALHADAS ====================
+    
+    # Lista de Via Verde
+    if mostrar_via_verde and vv_transacoes:
+        elements.append(Spacer(1, 5*mm))
+        elements.append(Paragraph("Detalhes Via Verde", section_style))
+        elements.append(Spacer(1, 3*mm))
+        
+        vv_table_data = [["Data", "Hora", "Local", "Matrícula", "Valor"]]
+        for t in sorted(vv_transacoes, key=lambda x: (x.get("data", ""), x.get("hora", ""))):
+            data_str = t.get("data", "-")
+            # Formatar data de "2026-01-04" para "04/01/26"
+            if data_str and "-" in data_str:
+                try:
+                    date_parts = data_str.split("-")
+                    if len(date_parts) == 3:
+                        data_str = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0][2:]}"
+                except:
+                    pass
+            
+            hora_str = t.get("hora", "-") or "-"
+            local = str(t.get("local", "-"))[:30]
+            matricula_vv = t.get("matricula", "-")
+            valor = t.get("valor", 0)
+            
+            vv_table_data.append([data_str, hora_str, local, matricula_vv, f"€{valor:.2f}"])
+        
+        # Linha de total
+        vv_table_data.append(["", "", "", "TOTAL", f"€{via_verde:.2f}"])
+        
+        vv_table = Table(vv_table_data, colWidths=[22*mm, 18*mm, 70*mm, 25*mm, 25*mm])
+        vv_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6c757d')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),  # Coluna Valor alinhada à direita
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]))
+        elements.append(vv_table)
+    
+    # Lista de Abastecimentos
+    if mostrar_abastecimentos and comb_transacoes:
+        elements.append(Spacer(1, 8*mm))
+        elements.append(Paragraph("Detalhes Abastecimentos", section_style))
+        elements.append(Spacer(1, 3*mm))
+        
+        comb_table_data = [["Data", "Hora", "Posto", "Litros", "Valor"]]
+        for t in sorted(comb_transacoes, key=lambda x: x.get("data", "")):
+            data_str = t.get("data", "-")
+            # Formatar data de "2026-01-04" para "04/01/26"
+            if data_str and "-" in data_str:
+                try:
+                    date_parts = data_str.split("-")
+                    if len(date_parts) == 3:
+                        data_str = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0][2:]}"
+                except:
+                    pass
+            
+            hora_str = t.get("hora", "-") or "-"
+            posto = str(t.get("posto", "-"))[:20]
+            litros = float(t.get("litros", 0) or 0)
+            valor = t.get("valor", 0)
+            
+            comb_table_data.append([data_str, hora_str, posto, f"{litros:.1f}L" if litros else "-", f"€{valor:.2f}"])
+        
+        comb_table_data.append(["", "", "", "TOTAL", f"€{combustivel:.2f}"])
+        
+        comb_table = Table(comb_table_data, colWidths=[22*mm, 18*mm, 65*mm, 25*mm, 25*mm])
+        comb_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6c757d')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (3, 0), (4, -1), 'RIGHT'),  # Litros e Valor alinhados à direita
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]))
+        elements.append(comb_table)
+    
+    # Lista de Carregamentos Elétricos
+    if mostrar_carregamentos and elet_records:
+        elements.append(Spacer(1, 8*mm))
+        elements.append(Paragraph("Detalhes Carregamentos Elétricos", section_style))
+        elements.append(Spacer(1, 3*mm))
+        
+        # Colunas: Data, Hora, Posto, Tempo, kWh, Valor
+        elet_table_data = [["Data", "Hora", "Posto", "Tempo", "kWh", "Valor"]]
+        for r in sorted(elet_records, key=lambda x: x.get("data", x.get("StartDate", ""))):
+            # Usar campos data_detalhe e hora_detalhe se existirem
+            data_str = r.get("data_detalhe", "")
+            hora_str = r.get("hora_detalhe", r.get("hora", ""))
+            
+            # Fallback: extrair de data se campos não existirem
+            if not data_str:
+                data_raw = r.get("data", r.get("StartDate", "-"))
+                if data_raw and data_raw != "-":
+                    try:
+                        data_raw_str = str(data_raw)
+                        if "T" in data_raw_str:
+                            data_raw_str = data_raw_str.replace("T", " ")
+                        
+                        parts = data_raw_str.split(" ")
+                        if len(parts) >= 1:
+                            date_part = parts[0]
+                            if "-" in date_part:
+                                date_nums = date_part.split("-")
+                                if len(date_nums) == 3:
+                                    data_str = f"{date_nums[2]}/{date_nums[1]}/{date_nums[0][2:]}"
+                            elif "/" in date_part:
+                                date_nums = date_part.split("/")
+                                if len(date_nums) >= 2:
+                                    data_str = f"{date_nums[0].zfill(2)}/{date_nums[1].zfill(2)}"
+                                    if len(date_nums) == 3:
+                                        data_str += f"/{date_nums[2][-2:]}"
+                            else:
+                                data_str = date_part[:10]
+                        
+                        if len(parts) >= 2 and not hora_str:
+                            hora_str = parts[1][:5]
+                    except:
+                        data_str = str(data_raw)[:10]
+            else:
+                # Formatar data_detalhe de "2026-01-04" para "04/01/26"
+                try:
+                    date_parts = data_str.split("-")
+                    if len(date_parts) == 3:
+                        data_str = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0][2:]}"
+                except:
+                    pass
+            
+            if not data_str:
+                data_str = "-"
+            if not hora_str:
+                hora_str = "-"
+            
+            # Posto/Local/Operador - usar estacao_id que é onde POSTO é guardado
+            posto = r.get("estacao_id", r.get("estacao", r.get("posto", r.get("OperatorName", r.get("local", "-")))))
+            if posto:
+                posto = str(posto)[:18]
+            else:
+                posto = "-"
+            
+            # Tempo/Duração - usar duracao_minutos que é onde DURAÇÃO é guardado
+            duracao = r.get("duracao_minutos", r.get("duracao", r.get("Duration", r.get("tempo", ""))))
+            if duracao:
+                # Converter minutos para formato legível se for número
+                try:
+                    if isinstance(duracao, (int, float)):
+                        mins = int(duracao)
+                        if mins >= 60:
+                            tempo_str = f"{mins // 60}h{mins % 60:02d}m"
+                        else:
+                            tempo_str = f"{mins}m"
+                    else:
+                        tempo_str = str(duracao)[:10]
+                except:
+                    tempo_str = str(duracao)[:10]
+            else:
+                tempo_str = "-"
+            
+            # kWh/Energia - usar energia_kwh que é onde ENERGIA é guardado
+            kwh = float(r.get("energia_kwh", r.get("energia", r.get("TotalEnergy", r.get("kwh", 0)))) or 0)
+            
+            # Valor
+            valor = float(r.get("valor_total") or r.get("TotalValueWithTaxes") or 0)
+            
+            elet_table_data.append([data_str, hora_str, posto, tempo_str, f"{kwh:.2f}", f"€{valor:.2f}"])
+        
+        elet_table_data.append(["", "", "", "", "TOTAL", f"€{eletrico:.2f}"])
+        
+        elet_table = Table(elet_table_data, colWidths=[22*mm, 16*mm, 50*mm, 18*mm, 18*mm, 25*mm])
+        elet_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#6c757d')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (3, 0), (5, -1), 'RIGHT'),  # Tempo, kWh, Valor alinhados à direita
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]))
+        elements.append(elet_table)
+    
+    # Rodapé
+    elements.append(Spacer(1, 10*mm))
+    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
+    elements.append(Paragraph(f"Gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} - TVDEFleet", footer_style))
+    
+    doc.build(elements)
+    
+    return buffer.getvalue()
+
+
+def construir_pdf_resumo_semanal(
+    semana: int,
+    ano: int,
+    week_start: datetime,
+    week_end: datetime,
+    motoristas_data: List[Dict[str, Any]],
+    totais: Dict[str, float],
+    todos_abastecimentos: List[Dict[str, Any]],
+    todas_portagens: List[Dict[str, Any]],
+    parceiro_dados: Optional[Dict[str, Any]] = None,
+    config_relatorio: Optional[Dict[str, Any]] = None,
+) -> bytes:
+    """PDF do resumo semanal do parceiro (todos os motoristas)"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=15*mm, leftMargin=15*mm, topMargin=15*mm, bottomMargin=15*mm)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16, alignment=TA_CENTER)
+    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, textColor=colors.grey)
+    info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=9, alignment=TA_CENTER, textColor=colors.HexColor('#333333'))
+    
+    elements = []
+    
+    # Título
+    elements.append(Paragraph(f"Resumo Semanal do Parceiro", title_style))
+    elements.append(Paragraph(f"Semana {semana}/{ano} ({week_start.strftime('%d/%m/%Y')} a {week_end.strftime('%d/%m/%Y')})", subtitle_style))
+    
+    # ============ CABEÇALHO COM DADOS DO PARCEIRO ============
+    header_lines = []
+    
+    # Nome do Parceiro
+    if config_relatorio and config_relatorio.get("incluir_nome_parceiro", True):
+        if parceiro_dados and parceiro_dados.get("name"):
+            header_lines.append(f"<b>Parceiro:</b> {parceiro_dados['name']}")
+    
+    # NIF do Parceiro
+    if config_relatorio and config_relatorio.get("incluir_nif_parceiro", False):
+        if parceiro_dados and parceiro_dados.get("nif"):
+            header_lines.append(f"<b>NIF:</b> {parceiro_dados['nif']}")
+    
+    # Número do Relatório
+    if config_relatorio and config_relatorio.get("incluir_numero_relatorio", False):
+        formato = config_relatorio.get("formato_numero_relatorio", "xxxxx/ano")
+        # Gerar número sequencial simples baseado na semana/ano
+        numero_seq = str(semana).zfill(5)
+        numero_relatorio = formato.replace("xxxxx", numero_seq).replace("ano", str(ano))
+        header_lines.append(f"<b>Nº Relatório:</b> {numero_relatorio}")
+    
+    # Data de emissão
+    if config_relatorio and config_relatorio.get("incluir_data_emissao", True):
+        header_lines.append(f"<b>Data de Emissão:</b> {datetime.now().strftime('%d/%m/%Y')}")
+    
+    if header_lines:
+        elements.append(Spacer(1, 5*mm))
+        elements.append(Paragraph(" | ".join(header_lines), info_style))
+    
+    elements.append(Spacer(1, 10*mm))
+    
+    # Tabela de motoristas
+    table_data = [
+        ["Motorista", "Uber", "uPort", "uGrat", "Bolt", "V.Verde", "Comb.", "Elétr.", "Alug.", "Extras", "Líquido", "L.Parc."]
+    ]
+    
+    for m in sorted(motoristas_data, key=lambda x: x["nome"]):
+        table_data.append([
+            m["nome"][:18],
+            f"€{m['uber']:.2f}",
+            f"€{m.get('uber_portagens', 0):.2f}",
+            f"€{m.get('uber_gratificacoes', 0):.2f}",
+            f"€{m['bolt']:.2f}",
+            f"€{m['via_verde']:.2f}",
+            f"€{m['combustivel']:.2f}",
+            f"€{m['eletrico']:.2f}",
+            f"€{m['aluguer']:.2f}",
+            f"€{m['extras']:.2f}",
+            f"€{m['liquido']:.2f}",
+            f"€{m.get('lucro_parceiro', 0):.2f}"
+        ])
+    
+    # Linha de totais
+    table_data.append([
+        "TOTAIS",
+        f"€{totais['ganhos_uber']:.2f}",
+        f"€{totais.get('uber_portagens', 0):.2f}",
+        f"€{totais.get('uber_gratificacoes', 0):.2f}",
+        f"€{totais['ganhos_bolt']:.2f}",
+        f"€{totais['via_verde']:.2f}",
+        f"€{totais['combustivel']:.2f}",
+        f"€{totais['eletrico']:.2f}",
+        f"€{totais['aluguer']:.2f}",
+        f"€{totais['extras']:.2f}",
+        f"€{totais['liquido']:.2f}",
+        f"€{totais.get('lucro_parceiro', 0):.2f}"
+    ])
+    
+    col_widths = [32*mm, 12*mm, 11*mm, 11*mm, 12*mm, 13*mm, 12*mm, 12*mm, 12*mm, 12*mm, 15*mm, 15*mm]
+    table = Table(table_data, colWidths=col_widths)
+    
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a5f')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e8f4fc')),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 1), (-1, -1), 7),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f9f9f9')]),
+    ]))
+    
+    elements.append(table)
+    elements.append(Spacer(1, 10*mm))
+    
+    # Resumo - usando a nova lógica de lucro do parceiro
+    lucro_parceiro_total = totais.get("lucro_parceiro", 0)
+    
+    summary_data = [
+        ["Receitas do Parceiro", ""],
+        ["  Alugueres", f"€{totais['aluguer']:.2f}"],
+        ["  Extras", f"€{totais['extras']:.2f}"],
+        ["Despesas Operacionais", ""],
+        ["  Via Verde", f"€{totais['via_verde']:.2f}"],
+        ["  Combustível", f"€{totais['combustivel']:.2f}"],
+        ["  Elétrico", f"€{totais['eletrico']:.2f}"],
+        ["", ""],
+        ["LUCRO TOTAL DO PARCEIRO", f"€{lucro_parceiro_total:.2f}"],
+    ]
+    
+    summary_table = Table(summary_data, colWidths=[80*mm, 40*mm])
+    summary_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 3), (0, 3), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9d8fd') if lucro_parceiro_total >= 0 else colors.HexColor('#f8d7da')),
+        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#6b21a8')),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    
+    elements.append(summary_table)
+    
+    # ============ LISTA DE ABASTECIMENTOS ============
+    if todos_abastecimentos:
+        elements.append(Spacer(1, 10*mm))
+        
+        section_style = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=12, textColor=colors.HexColor('#1e3a5f'))
+        elements.append(Paragraph("Detalhes dos Abastecimentos", section_style))
+        elements.append(Spacer(1, 3*mm))
+        
+        # Ordenar por data
+        todos_abastecimentos_sorted = sorted(todos_abastecimentos, key=lambda x: (x.get("data", ""), x.get("hora", "")))
+        
+        # Criar tabela de abastecimentos
+        abast_table_data = [
+            ["Motorista", "Data", "Hora", "Posto", "Valor"]
+        ]
+        
+        for ab in todos_abastecimentos_sorted:
+            # Formatar data
+            data_str = ab.get("data", "")
+            if data_str:
+                try:
+                    if "T" in data_str:
+                        data_str = data_str.split("T")[0]
+                    data_obj = datetime.strptime(data_str, "%Y-%m-%d")
+                    data_str = data_obj.strftime("%d/%m/%Y")
+                except:
+                    pass
+            
+            abast_table_data.append([
+                ab.get("motorista", "")[:18],
+                data_str,
+                ab.get("hora", "")[:5] if ab.get("hora") else "",
+                ab.get("posto", "")[:15],
+                f"€{ab.get('valor', 0):.2f}"
+            ])
+        
+        # Linha de total
+        total_abastecimentos = sum(ab.get("valor", 0) for ab in todos_abastecimentos)
+        abast_table_data.append([
+            "TOTAL",
+            "",
+            "",
+            f"{len(todos_abastecimentos)} abastecimentos",
+            f"€{total_abastecimentos:.2f}"
+        ])
+        
+        abast_col_widths = [40*mm, 22*mm, 15*mm, 35*mm, 20*mm]
+        abast_table = Table(abast_table_data, colWidths=abast_col_widths)
+        
+        abast_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f97316')),  # Laranja para combustível
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#fed7aa')),  # Laranja claro para total
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('ALIGN', (1, 1), (2, -1), 'CENTER'),
+            ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#fff7ed')]),
+        ]))
+        
+        elements.append(abast_table)
+    
+    # ============ LISTA DE PORTAGENS VIA VERDE ============
+    if todas_portagens:
+        elements.append(Spacer(1, 10*mm))
+        
+        section_style = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=12, textColor=colors.HexColor('#1e3a5f'))
+        elements.append(Paragraph("Detalhes das Portagens Via Verde", section_style))
+        elements.append(Spacer(1, 3*mm))
+        
+        # Ordenar por data
+        todas_portagens_sorted = sorted(todas_portagens, key=lambda x: (x.get("data", ""), x.get("hora", "")))
+        
+        # Criar tabela de portagens
+        portagens_table_data = [
+            ["Motorista", "Data", "Hora", "Local", "Valor"]
+        ]
+        
+        for pg in todas_portagens_sorted:
+            # Formatar data
+            data_str = pg.get("data", "")
+            if data_str:
+                try:
+                    if "T" in data_str:
+                        data_str = data_str.split("T")[0]
+                    data_obj = datetime.strptime(data_str, "%Y-%m-%d")
+                    data_str = data_obj.strftime("%d/%m/%Y")
+                except:
+                    pass
+            
+            portagens_table_data.append([
+                pg.get("motorista", "")[:18],
+                data_str,
+                pg.get("hora", "")[:5] if pg.get("hora") else "",
+                pg.get("local", "")[:25],
+                f"€{pg.get('valor', 0):.2f}"
+            ])
+        
+        # Linha de total
+        total_portagens_valor = sum(pg.get("valor", 0) for pg in todas_portagens)
+        portagens_table_data.append([
+            "TOTAL",
+            "",
+            "",
+            f"{len(todas_portagens)} portagens",
+            f"€{total_portagens_valor:.2f}"
+        ])
+        
+        portagens_col_widths = [40*mm, 22*mm, 15*mm, 40*mm, 18*mm]
+        portagens_table = Table(portagens_table_data, colWidths=portagens_col_widths)
+        
+        portagens_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#22c55e')),  # Verde para Via Verde
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#bbf7d0')),  # Verde claro para total
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('ALIGN', (1, 1), (2, -1), 'CENTER'),
+            ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f0fdf4')]),
+        ]))
+        
+        elements.append(portagens_table)
+    
+    # Rodapé
+    elements.append(Spacer(1, 15*mm))
+    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey)
+    elements.append(Paragraph(f"Gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} - TVDEFleet", footer_style))
+    
+    doc.build(elements)
+    
+    return buffer.getvalue()
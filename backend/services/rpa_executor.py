@@ -17,6 +17,12 @@ logger = logging.getLogger(__name__)
 # Configurar Playwright
 os.environ['PLAYWRIGHT_BROWSERS_PATH'] = '/pw-browsers'
 
+# Esperas por eventos em vez de pausas fixas. Não se espera por networkidle:
+# os dashboards Uber/Bolt fazem polling e nunca lá chegam
+ESPERA_ELEMENTO_MS = int(os.environ.get("RPA_ESPERA_ELEMENTO_MS", "10000"))
+ESPERA_OPCIONAL_MS = int(os.environ.get("RPA_ESPERA_OPCIONAL_MS", "1500"))
+ESPERA_PAGINA_MS = int(os.environ.get("RPA_ESPERA_PAGINA_MS", "5000"))
+
 
 class RPAExecutor:
     """Executor de designs RPA gravados"""
@@ -27,6 +33,7 @@ class RPAExecutor:
         self.playwright = None
         self.browser = None
         self.context = None
+        self.sessao_browser = None
         self.page = None
         self.session_path = f"/tmp/rpa_sessao_{parceiro_id}_{plataforma_id}.json"
         self.downloads_path = Path("/tmp/rpa_downloads")
@@ -45,16 +52,10 @@ class RPAExecutor:
         logger.info(f"[RPA {self.parceiro_id}] {msg}")
         
     async def iniciar(self, usar_sessao: bool = True) -> bool:
-        """Iniciar browser"""
-        from playwright.async_api import async_playwright
+        """Iniciar contexto num browser do pool partilhado"""
+        from services import browser_pool
         
         self._log("A iniciar browser...")
-        self.playwright = await async_playwright().start()
-        
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-setuid-sandbox', '--disable-blink-features=AutomationControlled']
-        )
         
         # Carregar sessão se existir
         storage_state = None
@@ -62,13 +63,18 @@ class RPAExecutor:
             storage_state = self.session_path
             self._log(f"Sessão carregada: {self.session_path}")
         
-        self.context = await self.browser.new_context(
+        # Espera em fila se o pool estiver cheio
+        self.sessao_browser = await browser_pool.abrir_contexto(
+            headless=True,
+            dono=f"rpa:{self.parceiro_id}:{self.plataforma_id}",
             viewport={"width": 1920, "height": 1080},
             accept_downloads=True,
             storage_state=storage_state,
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0.0.0 Safari/537.36",
             locale='pt-PT'
         )
+        self.browser = self.sessao_browser.browser
+        self.context = self.sessao_browser.context
         
         # Anti-detecção
         await self.context.add_init_script("""
@@ -95,6 +101,20 @@ class RPAExecutor:
         self.screenshots.append(filepath)
         self._log(f"Screenshot: {filepath}")
         return filepath
+    
+    async def _aguardar_pagina(self, passo: Dict[str, Any], timeout: int = ESPERA_PAGINA_MS):
+        """
+        Depois de uma ação: esperar pelo `aguardar_seletor` do passo, se
+        houver, ou pelo DOM da página (imediato se a ação não navegou).
+        O passo seguinte espera pelo seu próprio elemento.
+        """
+        try:
+            if passo.get("aguardar_seletor"):
+                await self.page.wait_for_selector(passo["aguardar_seletor"], timeout=timeout)
+            else:
+                await self.page.wait_for_load_state("domcontentloaded", timeout=timeout)
+        except Exception:
+            pass
         
     async def executar_passo(self, passo: Dict[str, Any], credenciais: Dict[str, str], variaveis: Dict[str, Any]) -> bool:
         """Executar um passo individual"""
@@ -108,13 +128,14 @@ class RPAExecutor:
                 for var_nome, var_valor in variaveis.items():
                     url = url.replace(f"{{{{{var_nome}}}}}", str(var_valor))
                 await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                await asyncio.sleep(2)
+                if passo.get("aguardar_seletor"):
+                    await self._aguardar_pagina(passo)
                 
             elif tipo == "click":
                 elemento = await self._encontrar_elemento(passo)
                 if elemento:
                     await elemento.click()
-                    await asyncio.sleep(1)
+                    await self._aguardar_pagina(passo)
                 else:
                     self._log(f"⚠️ Elemento não encontrado: {passo.get('seletor')}")
                     return False
@@ -127,7 +148,6 @@ class RPAExecutor:
                     for var_nome, var_valor in variaveis.items():
                         valor = valor.replace(f"{{{{{var_nome}}}}}", str(var_valor))
                     await elemento.fill(valor)
-                    await asyncio.sleep(0.5)
                 else:
                     return False
                     
@@ -140,7 +160,6 @@ class RPAExecutor:
                         self._log(f"⚠️ Credencial não encontrada: {campo}")
                         return False
                     await elemento.fill(valor)
-                    await asyncio.sleep(0.5)
                 else:
                     return False
                     
@@ -149,7 +168,7 @@ class RPAExecutor:
                 if elemento:
                     valor = passo.get("valor", "")
                     await elemento.select_option(valor)
-                    await asyncio.sleep(1)
+                    await self._aguardar_pagina(passo)
                 else:
                     return False
                     
@@ -165,7 +184,7 @@ class RPAExecutor:
             elif tipo == "press":
                 tecla = passo.get("tecla", "Enter")
                 await self.page.keyboard.press(tecla)
-                await asyncio.sleep(0.5)
+                await self._aguardar_pagina(passo)
                 
             elif tipo == "scroll":
                 direcao = passo.get("direcao", "down")
@@ -174,13 +193,12 @@ class RPAExecutor:
                     await self.page.evaluate(f"window.scrollBy(0, {pixels})")
                 elif direcao == "up":
                     await self.page.evaluate(f"window.scrollBy(0, -{pixels})")
-                await asyncio.sleep(0.5)
+                await self._aguardar_pagina(passo)
                 
             elif tipo == "hover":
-                elemento = await self._encontrar_elemento(passo)
+                elemento = await self._encontrar_elemento(passo, opcional=True)
                 if elemento:
                     await elemento.hover()
-                    await asyncio.sleep(0.5)
                     
             elif tipo == "screenshot":
                 nome = passo.get("valor", f"passo_{passo.get('ordem')}")
@@ -200,8 +218,11 @@ class RPAExecutor:
             self._log(f"❌ Erro no passo {passo.get('ordem')}: {str(e)}")
             return False
             
-    async def _encontrar_elemento(self, passo: Dict[str, Any]):
-        """Encontrar elemento na página"""
+    async def _encontrar_elemento(self, passo: Dict[str, Any], opcional: bool = False):
+        """
+        Encontrar elemento na página, esperando que apareça (até `timeout` do
+        passo); elementos opcionais só esperam `ESPERA_OPCIONAL_MS`
+        """
         seletor = passo.get("seletor", "")
         seletor_tipo = passo.get("seletor_tipo", "css")
         
@@ -221,9 +242,9 @@ class RPAExecutor:
             else:
                 elemento = self.page.locator(seletor).first
                 
-            if await elemento.count() > 0:
-                return elemento
-            return None
+            espera = ESPERA_OPCIONAL_MS if opcional else ESPERA_ELEMENTO_MS
+            await elemento.wait_for(state="attached", timeout=passo.get("timeout", espera))
+            return elemento
             
         except Exception as e:
             self._log(f"Erro ao encontrar elemento: {e}")
@@ -335,11 +356,10 @@ class RPAExecutor:
         return resultado
         
     async def fechar(self):
-        """Fechar browser"""
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        """Fechar o contexto e devolver o lugar ao pool de browsers"""
+        if self.sessao_browser:
+            await self.sessao_browser.fechar()
+            self.sessao_browser = None
         self._log("Browser fechado")
 
 
@@ -0,0 +1,197 @@
+"""
+Motor de execuções RPA sobre a fila de tarefas (`services/fila_tarefas.py`).
+
+As execuções (`rpa_execucoes`) criadas pelo scheduler de agendamentos, pelo
+endpoint manual e pela sincronização eram lançadas com
+`asyncio.create_task` sem limite: uma noite com 60 parceiros arrancava 60
+automações ao mesmo tempo e um restart perdia as que estavam a meio.
+
+Agora cada execução é uma tarefa `rpa.executar` na fila "rpa":
+
+- workers próprios (`RPA_WORKERS` por processo), separados dos relatórios;
+- limite global (`RPA_MAX_EXECUCOES`) e por plataforma
+  (`RPA_LIMITE_PLATAFORMA`, ou `RPA_LIMITES_PLATAFORMA="uber=1,bolt=2"`),
+  contados em todos os nós;
+- prioridade: manuais > sincronização > agendadas;
+- falhas repetidas com backoff exponencial até `RPA_MAX_TENTATIVAS`;
+- o estado fica no MongoDB, por isso execuções interrompidas por um
+  restart voltam à fila.
+"""
+
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from services import fila_tarefas
+
+logger = logging.getLogger(__name__)
+
+FILA = "rpa"
+TIPO = "rpa.executar"
+
+RPA_WORKERS = int(os.environ.get("RPA_WORKERS", "2"))
+RPA_MAX_EXECUCOES = int(os.environ.get("RPA_MAX_EXECUCOES", "4"))
+RPA_LIMITE_PLATAFORMA = int(os.environ.get("RPA_LIMITE_PLATAFORMA", "2"))
+RPA_MAX_TENTATIVAS = int(os.environ.get("RPA_MAX_TENTATIVAS", "3"))
+
+PRIORIDADE_MANUAL = 10
+PRIORIDADE_SINCRONIZACAO = 5
+PRIORIDADE_AGENDADA = 0
+
+
+def _limites_plataforma() -> Dict[str, int]:
+    """Ler RPA_LIMITES_PLATAFORMA ("uber=1,bolt=2")"""
+    limites = {}
+    for parte in os.environ.get("RPA_LIMITES_PLATAFORMA", "").split(","):
+        if "=" in parte:
+            plataforma, limite = parte.split("=", 1)
+            if limite.strip().isdigit():
+                limites[plataforma.strip()] = int(limite)
+    return limites
+
+
+fila_tarefas.definir_limite("rpa", RPA_MAX_EXECUCOES)
+fila_tarefas.definir_limite("rpa:*", RPA_LIMITE_PLATAFORMA)
+for _plataforma, _limite in _limites_plataforma().items():
+    fila_tarefas.definir_limite(f"rpa:{_plataforma}", _limite)
+
+
+async def enfileirar_execucao(
+    db,
+    execucao: Dict[str, Any],
+    prioridade: int = PRIORIDADE_AGENDADA,
+    criado_por: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Pôr na fila uma execução já gravada em `rpa_execucoes`"""
+    tarefa = await fila_tarefas.enfileirar(
+        db,
+        TIPO,
+        {"execucao_id": execucao["id"]},
+        criado_por=criado_por,
+        max_tentativas=RPA_MAX_TENTATIVAS,
+        descricao=f"RPA {execucao['plataforma']} ({execucao['parceiro_id']})",
+        prioridade=prioridade,
+        grupos=["rpa", f"rpa:{execucao['plataforma']}"],
+    )
+    await db.rpa_execucoes.update_one(
+        {"id": execucao["id"]},
+        {"$set": {"tarefa_id": tarefa["id"], "prioridade": prioridade}},
+    )
+    return tarefa
+
+
+async def _terminar_com_erro(db, execucao_id: str, erro: str):
+    await db.rpa_execucoes.update_one(
+        {"id": execucao_id},
+        {"$set": {
+            "status": "erro",
+            "erros": [erro],
+            "terminado_em": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+
+
+@fila_tarefas.registar(TIPO, fila=FILA)
+async def executar(db, tarefa: fila_tarefas.Tarefa) -> Dict[str, Any]:
+    """Executar uma automação RPA e guardar o resultado na execução"""
+    execucao_id = tarefa.payload["execucao_id"]
+    execucao = await db.rpa_execucoes.find_one({"id": execucao_id}, {"_id": 0, "dados_extraidos": 0, "logs": 0})
+    if not execucao:
+        return {"status": "ignorada", "motivo": "Execução não encontrada"}
+
+    plataforma = execucao["plataforma"]
+    parceiro_id = execucao["parceiro_id"]
+
+    credencial = await db.rpa_credenciais.find_one({
+        "parceiro_id": parceiro_id,
+        "plataforma": plataforma,
+        "ativo": True
+    })
+    if not credencial:
+        # Sem credenciais repetir não adianta
+        await _terminar_com_erro(db, execucao_id, "Credenciais não encontradas")
+        return {"status": "erro", "motivo": "Credenciais não encontradas"}
+
+    try:
+        from services.rpa_executor import executar_automacao
+    except ImportError:
+        logger.warning(f"⚠️ Executor RPA não disponível para {plataforma}")
+        await _terminar_com_erro(db, execucao_id, f"Executor RPA não disponível para {plataforma}")
+        return {"status": "erro", "motivo": "Executor não disponível"}
+
+    await db.rpa_execucoes.update_one(
+        {"id": execucao_id},
+        {
+            "$set": {
+                "status": "em_execucao",
+                "tentativa": tarefa.tentativa,
+                "iniciado_em": datetime.now(timezone.utc).isoformat()
+            },
+            "$push": {"logs": f"Status: em execução (tentativa {tarefa.tentativa}/{tarefa.max_tentativas})"}
+        }
+    )
+
+    try:
+        from routes.rpa_automacao import decrypt_value
+
+        credenciais = {
+            "email": decrypt_value(credencial.get("email_encrypted", "")),
+            "password": decrypt_value(credencial.get("password_encrypted", ""))
+        }
+        resultado = await executar_automacao(
+            plataforma=plataforma,
+            parceiro_id=parceiro_id,
+            execucao_id=execucao_id,
+            credenciais=credenciais,
+            tipo_extracao=execucao.get("tipo_extracao", "todos"),
+            data_inicio=execucao.get("data_inicio"),
+            data_fim=execucao.get("data_fim")
+        )
+    except Exception as e:
+        ultima = tarefa.tentativa >= tarefa.max_tentativas
+        logger.error(f"❌ Execução RPA {execucao_id} falhou (tentativa {tarefa.tentativa}): {e}")
+        await db.rpa_execucoes.update_one(
+            {"id": execucao_id},
+            {
+                "$set": {
+                    "status": "erro" if ultima else "a_repetir",
+                    "erros": [str(e)],
+                    **({"terminado_em": datetime.now(timezone.utc).isoformat()} if ultima else {})
+                },
+                "$push": {"logs": f"Erro na tentativa {tarefa.tentativa}: {e}"}
+            }
+        )
+        # A fila repete com backoff exponencial
+        raise
+
+    # Guardar dados extraídos na collection apropriada
+    dados_extraidos = resultado.get("dados_extraidos", [])
+    if dados_extraidos:
+        for dado in dados_extraidos:
+            dado["parceiro_id"] = parceiro_id
+            dado["execucao_id"] = execucao_id
+            dado["created_at"] = datetime.now(timezone.utc).isoformat()
+
+        await db[f"rpa_dados_{plataforma}"].insert_many(dados_extraidos)
+        for dado in dados_extraidos:
+            dado.pop("_id", None)
+
+    erros = resultado.get("erros", [])
+    status = "sucesso" if not erros else ("sucesso_parcial" if dados_extraidos else "erro")
+
+    await db.rpa_execucoes.update_one(
+        {"id": execucao_id},
+        {"$set": {
+            "status": status,
+            "logs": resultado.get("logs", []),
+            "screenshots": resultado.get("screenshots", []),
+            "dados_extraidos": dados_extraidos,
+            "erros": erros,
+            "total_registos": len(dados_extraidos),
+            "terminado_em": datetime.now(timezone.utc).isoformat()
+        }}
+    )
+
+    logger.info(f"✅ Execução RPA {execucao_id} concluída: {status} ({len(dados_extraidos)} registos)")
+    return {"status": status, "total_registos": len(dados_extraidos)}
@@ -12,6 +12,8 @@ import pandas as pd
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, Optional, List
 
+from services import ledger_semanal
+
 logger = logging.getLogger(__name__)
 
 # Diretório para downloads
@@ -596,6 +598,7 @@ async def guardar_no_resumo_semanal(
         
         if resultado["colecao"]:
             resultado["sucesso"] = True
+            await ledger_semanal.invalidar_registos(db, [registro])
             logger.info(f"Dados RPA guardados em {resultado['colecao']}: parceiro={parceiro_id}, semana={semana}/{ano}")
         else:
             resultado["erro"] = f"Plataforma '{plataforma}' não suportada"
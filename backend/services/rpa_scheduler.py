@@ -14,6 +14,8 @@ from utils.database import get_database
 logger = logging.getLogger(__name__)
 db = get_database()
 
+INTERVALO_MINUTOS = 5
+
 
 async def verificar_e_executar_agendamentos():
     """
@@ -24,25 +26,27 @@ async def verificar_e_executar_agendamentos():
         now = datetime.now(timezone.utc)
         logger.debug(f"🔍 Verificando agendamentos RPA às {now.isoformat()}")
         
-        # Buscar agendamentos ativos com próxima execução no passado
-        agendamentos = await db.rpa_agendamentos.find({
+        # Buscar agendamentos ativos com próxima execução no passado (os mais atrasados primeiro);
+        # só são postos na fila, o motor RPA limita quantos correm em simultâneo
+        cursor = db.rpa_agendamentos.find({
             "ativo": True,
             "proxima_execucao": {"$lte": now.isoformat()}
-        }).to_list(100)
-        
-        if not agendamentos:
-            logger.debug("📅 Nenhum agendamento pendente")
-            return
-        
-        logger.info(f"📅 Encontrados {len(agendamentos)} agendamentos para executar")
+        }).sort("proxima_execucao", 1)
         
-        for agendamento in agendamentos:
+        total = 0
+        async for agendamento in cursor:
+            total += 1
             try:
                 await _executar_agendamento(agendamento)
             except Exception as e:
                 logger.error(f"❌ Erro ao executar agendamento {agendamento['id']}: {e}")
                 # Continuar com os próximos agendamentos
                 continue
+        
+        if total:
+            logger.info(f"📅 {total} agendamentos enviados para a fila RPA")
+        else:
+            logger.debug("📅 Nenhum agendamento pendente")
                 
     except Exception as e:
         logger.error(f"❌ Erro ao verificar agendamentos: {e}")
@@ -99,16 +103,9 @@ async def _executar_agendamento(agendamento: Dict):
     
     await db.rpa_execucoes.insert_one(execucao)
     
-    # Executar em background
-    asyncio.create_task(_executar_automacao_async(
-        execucao_id,
-        plataforma,
-        parceiro_id,
-        credencial,
-        tipo_extracao,
-        data_inicio,
-        data_fim
-    ))
+    # Pôr na fila do motor RPA (limites de concorrência, prioridade e repetições)
+    from services.rpa_motor import enfileirar_execucao, PRIORIDADE_AGENDADA
+    await enfileirar_execucao(db, execucao, prioridade=agendamento.get("prioridade", PRIORIDADE_AGENDADA))
     
     # Atualizar agendamento
     await _atualizar_proxima_execucao(agendamento)
@@ -155,133 +152,14 @@ async def _atualizar_proxima_execucao(agendamento: Dict):
     logger.info(f"📅 Próxima execução de {agendamento['plataforma']}: {proxima.isoformat()}")
 
 
-async def _executar_automacao_async(
-    execucao_id: str,
-    plataforma: str,
-    parceiro_id: str,
-    credencial: Dict,
-    tipo_extracao: str,
-    data_inicio: str,
-    data_fim: str
-):
-    """Executar automação em background"""
-    try:
-        # Atualizar status para "em execução"
-        await db.rpa_execucoes.update_one(
-            {"id": execucao_id},
-            {
-                "$set": {
-                    "status": "em_execucao",
-                    "iniciado_em": datetime.now(timezone.utc).isoformat()
-                },
-                "$push": {"logs": "Status: em execução"}
-            }
-        )
-        
-        # Tentar importar e executar o executor
-        try:
-            from services.rpa_executor import executar_automacao
-            
-            # Desencriptar credenciais
-            from cryptography.fernet import Fernet
-            import os
-            
-            ENCRYPTION_KEY = os.environ.get("RPA_ENCRYPTION_KEY", os.environ.get("ENCRYPTION_KEY", ""))
-            if ENCRYPTION_KEY:
-                cipher = Fernet(ENCRYPTION_KEY.encode() if isinstance(ENCRYPTION_KEY, str) else ENCRYPTION_KEY)
-                email = cipher.decrypt(credencial.get("email_encrypted", b"").encode() if isinstance(credencial.get("email_encrypted", ""), str) else credencial.get("email_encrypted", b"")).decode()
-                password = cipher.decrypt(credencial.get("password_encrypted", b"").encode() if isinstance(credencial.get("password_encrypted", ""), str) else credencial.get("password_encrypted", b"")).decode()
-            else:
-                email = credencial.get("email", "")
-                password = ""
-            
-            credenciais = {
-                "email": email,
-                "password": password
-            }
-            
-            # Executar automação
-            resultado = await executar_automacao(
-                plataforma=plataforma,
-                parceiro_id=parceiro_id,
-                execucao_id=execucao_id,
-                credenciais=credenciais,
-                tipo_extracao=tipo_extracao,
-                data_inicio=data_inicio,
-                data_fim=data_fim
-            )
-            
-            # Guardar dados extraídos
-            dados_extraidos = resultado.get("dados_extraidos", [])
-            if dados_extraidos:
-                for dado in dados_extraidos:
-                    dado["parceiro_id"] = parceiro_id
-                    dado["execucao_id"] = execucao_id
-                    dado["created_at"] = datetime.now(timezone.utc).isoformat()
-                
-                collection_name = f"rpa_dados_{plataforma}"
-                await db[collection_name].insert_many(dados_extraidos)
-            
-            # Determinar status final
-            erros = resultado.get("erros", [])
-            status = "sucesso" if not erros else ("sucesso_parcial" if dados_extraidos else "erro")
-            
-            # Atualizar execução
-            await db.rpa_execucoes.update_one(
-                {"id": execucao_id},
-                {"$set": {
-                    "status": status,
-                    "logs": resultado.get("logs", []),
-                    "screenshots": resultado.get("screenshots", []),
-                    "dados_extraidos": dados_extraidos,
-                    "erros": erros,
-                    "total_registos": len(dados_extraidos),
-                    "terminado_em": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-            
-            logger.info(f"✅ Execução agendada {execucao_id} concluída: {status}")
-            
-        except ImportError:
-            # Executor não disponível - simular execução
-            logger.warning(f"⚠️ services.rpa_executor não disponível - simulando execução")
-            await asyncio.sleep(2)  # Simular tempo de execução
-            
-            await db.rpa_execucoes.update_one(
-                {"id": execucao_id},
-                {"$set": {
-                    "status": "sucesso",
-                    "logs": ["Execução simulada (executor não disponível)"],
-                    "dados_extraidos": [],
-                    "total_registos": 0,
-                    "terminado_em": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-            
-    except Exception as e:
-        logger.error(f"❌ Erro na execução agendada {execucao_id}: {e}")
-        await db.rpa_execucoes.update_one(
-            {"id": execucao_id},
-            {"$set": {
-                "status": "erro",
-                "erros": [str(e)],
-                "terminado_em": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-
-
-async def verificar_agendamentos_periodicamente(intervalo_minutos: int = 5):
+async def verificar_agendamentos_periodicamente(intervalo_minutos: int = INTERVALO_MINUTOS):
     """
-    Loop infinito que verifica agendamentos periodicamente
-    Chamar esta função no startup da aplicação
+    Loop que verifica agendamentos periodicamente, só no nó que detém o
+    lease `rpa_agendamentos` (a API regista esta tarefa em services/lideranca.py;
+    usar esta função apenas em processos standalone)
     """
+    from services import lideranca
+
     logger.info(f"🔄 Iniciando verificação periódica de agendamentos RPA (cada {intervalo_minutos} minutos)")
-    
-    while True:
-        try:
-            await verificar_e_executar_agendamentos()
-        except Exception as e:
-            logger.error(f"❌ Erro no loop de verificação de agendamentos: {e}")
-        
-        # Aguardar intervalo
-        await asyncio.sleep(intervalo_minutos * 60)
+    lideranca.registar("rpa_agendamentos", verificar_e_executar_agendamentos, intervalo_minutos * 60)
+    await asyncio.gather(*lideranca.iniciar(db))
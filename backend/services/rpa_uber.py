@@ -27,6 +27,7 @@ class UberRPA:
         self.pin_code = pin_code  # PIN/código de acesso adicional
         self.browser = None
         self.context = None
+        self.sessao_browser = None
         self.page = None
         self.downloads_path = Path("/tmp/uber_downloads")
         self.downloads_path.mkdir(exist_ok=True)
@@ -34,27 +35,8 @@ class UberRPA:
         self.session_path.mkdir(exist_ok=True)
         
     async def iniciar_browser(self, headless: bool = True, usar_sessao: bool = True):
-        """Iniciar browser Playwright com suporte a sessão persistente e anti-detecção"""
-        from playwright.async_api import async_playwright
-        import json
-        import os
-        
-        # Definir caminho do Playwright
-        os.environ['PLAYWRIGHT_BROWSERS_PATH'] = '/pw-browsers'
-        
-        self.playwright = await async_playwright().start()
-        
-        # Usar configurações mais reais para evitar detecção de bot
-        self.browser = await self.playwright.chromium.launch(
-            headless=headless,
-            args=[
-                '--no-sandbox', 
-                '--disable-setuid-sandbox',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-infobars',
-                '--window-size=1920,1080'
-            ]
-        )
+        """Iniciar contexto num browser do pool partilhado, com sessão guardada e anti-detecção"""
+        from services import browser_pool
         
         # Tentar carregar sessão guardada
         cookies_file = self.session_path / f"cookies_{self.email.replace('@','_').replace('.','_')}.json"
@@ -70,14 +52,19 @@ class UberRPA:
         # User agent real de Chrome no Windows
         user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         
-        self.context = await self.browser.new_context(
+        # Browser partilhado (args anti-detecção no pool); espera em fila se estiver cheio
+        self.sessao_browser = await browser_pool.abrir_contexto(
+            headless=headless,
+            storage_state=storage_state,
+            dono=f"uber:{self.email}",
             viewport={"width": 1920, "height": 1080},
             accept_downloads=True,
-            storage_state=storage_state if storage_state and Path(storage_state).exists() else None,
             user_agent=user_agent,
             locale='pt-PT',
             timezone_id='Europe/Lisbon'
         )
+        self.browser = self.sessao_browser.browser
+        self.context = self.sessao_browser.context
         
         # Remover sinais de automação
         await self.context.add_init_script("""
@@ -102,12 +89,11 @@ class UberRPA:
         
     async def fechar_browser(self, guardar: bool = True):
         """Fechar browser, opcionalmente guardando a sessão"""
-        if guardar and hasattr(self, 'context'):
+        if guardar and self.context:
             await self.guardar_sessao()
-        if self.browser:
-            await self.browser.close()
-        if hasattr(self, 'playwright'):
-            await self.playwright.stop()
+        if self.sessao_browser:
+            await self.sessao_browser.fechar()
+            self.sessao_browser = None
         logger.info("🔒 Browser Uber fechado")
     
     async def _inserir_codigo_sms(self):
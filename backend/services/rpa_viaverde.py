@@ -10,6 +10,8 @@ from typing import Optional, Dict, Any, List
 from pathlib import Path
 import uuid
 
+from services import ledger_semanal
+
 logger = logging.getLogger(__name__)
 
 
@@ -188,6 +190,7 @@ async def importar_movimentos_viaverde(
         "erros": 0,
         "por_semana": {}
     }
+    importados = []
     
     for mov in movimentos:
         try:
@@ -225,6 +228,7 @@ async def importar_movimentos_viaverde(
             # Inserir
             await db.portagens_viaverde.insert_one(mov)
             resultado["importados"] += 1
+            importados.append(mov)
             
             # Contar por semana
             semana_key = f"{mov.get('semana', '?')}/{mov.get('ano', '?')}"
@@ -237,6 +241,8 @@ async def importar_movimentos_viaverde(
             logger.error(f"Erro ao importar movimento: {e}")
             resultado["erros"] += 1
     
+    await ledger_semanal.invalidar_registos(db, importados, parceiro_id=parceiro_id)
+    
     logger.info(f"✅ Importação Via Verde: {resultado['importados']} novos, {resultado['duplicados']} duplicados, {resultado['erros']} erros")
     return resultado
 
@@ -263,33 +269,32 @@ class ViaVerdeRPA:
         self.email = email
         self.password = password
         self.browser = None
+        self.sessao_browser = None
         self.page = None
         self.downloads_path = Path("/tmp/viaverde_downloads")
         self.downloads_path.mkdir(exist_ok=True)
     
     async def iniciar_browser(self, headless: bool = True):
-        """Iniciar o browser Playwright"""
-        from playwright.async_api import async_playwright
+        """Iniciar contexto num browser do pool partilhado"""
+        from services import browser_pool
         
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
+        self.sessao_browser = await browser_pool.abrir_contexto(
             headless=headless,
-            args=['--disable-blink-features=AutomationControlled']
-        )
-        self.context = await self.browser.new_context(
+            dono=f"viaverde:{self.email}",
             viewport={'width': 1920, 'height': 1080},
             user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             accept_downloads=True
         )
+        self.browser = self.sessao_browser.browser
+        self.context = self.sessao_browser.context
         self.page = await self.context.new_page()
         logger.info("🌐 Browser iniciado")
     
     async def fechar_browser(self):
-        """Fechar o browser"""
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        """Fechar o contexto e devolver o lugar ao pool de browsers"""
+        if self.sessao_browser:
+            await self.sessao_browser.fechar()
+            self.sessao_browser = None
         logger.info("🌐 Browser fechado")
     
     async def fazer_login(self) -> bool:
@@ -27,33 +27,32 @@ class ViaVerdeRPA:
         self.email = email
         self.password = password
         self.browser = None
+        self.sessao_browser = None
         self.page = None
         self.downloads_path = Path("/tmp/viaverde_downloads")
         self.downloads_path.mkdir(exist_ok=True)
     
     async def iniciar_browser(self, headless: bool = True):
-        """Iniciar browser Playwright"""
-        from playwright.async_api import async_playwright
+        """Iniciar contexto num browser do pool partilhado"""
+        from services import browser_pool
         
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
+        self.sessao_browser = await browser_pool.abrir_contexto(
             headless=headless,
-            args=['--no-sandbox', '--disable-setuid-sandbox']
-        )
-        self.context = await self.browser.new_context(
+            dono=f"viaverde:{self.email}",
             viewport={'width': 1920, 'height': 1080},
             accept_downloads=True
         )
+        self.browser = self.sessao_browser.browser
+        self.context = self.sessao_browser.context
         self.page = await self.context.new_page()
         logger.info("✅ Browser iniciado")
     
     async def fechar_browser(self):
         """Fechar browser"""
         try:
-            if self.browser:
-                await self.browser.close()
-            if hasattr(self, 'playwright') and self.playwright:
-                await self.playwright.stop()
+            if self.sessao_browser:
+                await self.sessao_browser.fechar()
+                self.sessao_browser = None
         except:
             pass
     
@@ -1,13 +1,22 @@
 """
 Serviço de Sincronização Automática de Dados
 Recolhe dados de Uber, Bolt, Via Verde, Abastecimentos e gera resumos semanais
+
+As fontes de uma sincronização correm em paralelo, com limite de fontes
+simultâneas por método (API, RPA, CSV) e timeout por fonte; cada resultado
+é gravado em `sincronizacao_execucoes` quando a fonte termina (as fontes
+RPA esperam que a execução posta na fila do motor RPA termine). O resumo
+semanal arranca quando terminam as fontes de que depende, pelo que a
+sincronização demora o que demora a fonte mais lenta e não a soma de todas.
 """
 
 from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Optional, Any
+import asyncio
+import os
+import time
 import uuid
 import logging
-import asyncio
 
 from utils.database import get_database
 from utils.notificacoes import criar_notificacao
@@ -53,6 +62,32 @@ FONTES_DADOS = {
 }
 
 
+# Fontes a correr em simultâneo por método (partilhado por todas as sincronizações do processo)
+SINCRONIZACAO_LIMITES = {
+    "api": int(os.environ.get("SINCRONIZACAO_LIMITE_API", "4")),
+    "rpa": int(os.environ.get("SINCRONIZACAO_LIMITE_RPA", "2")),
+    "csv": int(os.environ.get("SINCRONIZACAO_LIMITE_CSV", "8")),
+}
+
+# Timeout por fonte, em segundos, por método (`timeout` na config da fonte sobrepõe-se)
+SINCRONIZACAO_TIMEOUTS = {
+    "api": float(os.environ.get("SINCRONIZACAO_TIMEOUT_API", "300")),
+    "rpa": float(os.environ.get("SINCRONIZACAO_TIMEOUT_RPA", "120")),
+    "csv": float(os.environ.get("SINCRONIZACAO_TIMEOUT_CSV", "60")),
+}
+
+# Intervalo, em segundos, entre consultas ao estado de uma execução RPA posta na fila
+SINCRONIZACAO_POLL_RPA = float(os.environ.get("SINCRONIZACAO_POLL_RPA", "5"))
+
+_limites: Dict[str, asyncio.Semaphore] = {}
+
+
+def _limite_metodo(metodo: str) -> asyncio.Semaphore:
+    if metodo not in _limites:
+        _limites[metodo] = asyncio.Semaphore(SINCRONIZACAO_LIMITES.get(metodo, 4))
+    return _limites[metodo]
+
+
 class SincronizacaoService:
     """Serviço de gestão de sincronização automática"""
     
@@ -252,34 +287,29 @@ class SincronizacaoService:
         
         logger.info(f"🔄 Iniciando sincronização {execucao_id} para parceiro {parceiro_id}")
         
-        # Executar sincronização de cada fonte
-        resultados = {}
-        erros = []
-        total_fontes = len(fontes)
+        # Fontes em paralelo (limitadas por método); cada resultado é gravado ao terminar
+        progresso = {"concluidas": 0, "total": len(fontes)}
+        tarefas = {
+            fonte: asyncio.create_task(self._correr_fonte(
+                execucao_id, parceiro_id, fonte, config.get("fontes", {}).get(fonte, {}), semana, ano, progresso
+            ))
+            for fonte in fontes
+        }
         
-        for i, fonte in enumerate(fontes):
-            try:
-                fonte_config = config.get("fontes", {}).get(fonte, {})
-                metodo = fonte_config.get("metodo", "csv")
-                
-                resultado = await self._executar_fonte(
-                    parceiro_id, fonte, metodo, semana, ano
-                )
-                resultados[fonte] = resultado
-                
-                # Atualizar progresso
-                progresso = int((i + 1) / total_fontes * 100)
-                await self.db.sincronizacao_execucoes.update_one(
-                    {"id": execucao_id},
-                    {"$set": {"progresso": progresso, "resultados": resultados}}
-                )
-                
-            except Exception as e:
-                logger.error(f"❌ Erro ao sincronizar {fonte}: {e}")
-                erros.append(f"{fonte}: {str(e)}")
-                resultados[fonte] = {"sucesso": False, "erro": str(e)}
+        # O resumo semanal só espera pelas fontes de que precisa
+        tarefa_resumo = None
+        if config.get("resumo_semanal", {}).get("gerar_automaticamente"):
+            # Sem fontes de ganhos/despesas o resumo espera por todas (como antes)
+            necessarias = self._fontes_resumo(config, fontes) or fontes
+            tarefa_resumo = asyncio.create_task(self._resumo_quando_pronto(
+                execucao_id, parceiro_id, semana, ano, config, [tarefas[f] for f in necessarias]
+            ))
+        
+        resultados = dict(zip(tarefas, await asyncio.gather(*tarefas.values())))
+        erros = [f"{fonte}: {r['erro']}" for fonte, r in resultados.items() if not r.get("sucesso") and r.get("erro")]
         
         # Determinar status final
+        total_fontes = len(fontes)
         sucessos = sum(1 for r in resultados.values() if r.get("sucesso"))
         if sucessos == total_fontes:
             status = "sucesso"
@@ -300,9 +330,8 @@ class SincronizacaoService:
             }}
         )
         
-        # Gerar resumo semanal se configurado
-        if config.get("resumo_semanal", {}).get("gerar_automaticamente") and status in ["sucesso", "sucesso_parcial"]:
-            await self._gerar_resumo_semanal(parceiro_id, semana, ano, config)
+        if tarefa_resumo:
+            await tarefa_resumo
         
         # Enviar notificações
         await self._enviar_notificacoes(parceiro_id, execucao_id, status, resultados, config)
@@ -317,6 +346,71 @@ class SincronizacaoService:
             "erros": erros
         }
     
+    async def _correr_fonte(
+        self,
+        execucao_id: str,
+        parceiro_id: str,
+        fonte: str,
+        fonte_config: Dict,
+        semana: int,
+        ano: int,
+        progresso: Dict[str, int]
+    ) -> Dict:
+        """Executar uma fonte com o limite do seu método e timeout; gravar o resultado"""
+        metodo = fonte_config.get("metodo", "csv")
+        timeout = float(fonte_config.get("timeout") or SINCRONIZACAO_TIMEOUTS.get(metodo, 300))
+        inicio = time.monotonic()
+        
+        async with _limite_metodo(metodo):
+            try:
+                resultado = await asyncio.wait_for(
+                    self._executar_fonte(parceiro_id, fonte, metodo, semana, ano), timeout
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"❌ Timeout ao sincronizar {fonte} ({timeout:g}s)")
+                resultado = {"sucesso": False, "metodo": metodo, "erro": f"Timeout após {timeout:g}s"}
+            except Exception as e:
+                logger.error(f"❌ Erro ao sincronizar {fonte}: {e}")
+                resultado = {"sucesso": False, "metodo": metodo, "erro": str(e)}
+        
+        resultado["duracao_segundos"] = round(time.monotonic() - inicio, 2)
+        progresso["concluidas"] += 1
+        await self.db.sincronizacao_execucoes.update_one(
+            {"id": execucao_id},
+            {"$set": {
+                f"resultados.{fonte}": resultado,
+                "progresso": int(progresso["concluidas"] / progresso["total"] * 100)
+            }}
+        )
+        return resultado
+    
+    @staticmethod
+    def _fontes_resumo(config: Dict, fontes: List[str]) -> List[str]:
+        """Fontes de que o resumo semanal depende (ganhos e despesas, ou as configuradas)"""
+        necessarias = config.get("resumo_semanal", {}).get("fontes")
+        if necessarias is None:
+            necessarias = [f for f in fontes if FONTES_DADOS.get(f, {}).get("tipo") in ("ganhos", "despesas")]
+        return [f for f in fontes if f in necessarias]
+    
+    async def _resumo_quando_pronto(
+        self,
+        execucao_id: str,
+        parceiro_id: str,
+        semana: int,
+        ano: int,
+        config: Dict,
+        dependencias: List[asyncio.Task]
+    ):
+        """Gerar o resumo semanal assim que as fontes de que depende terminarem"""
+        resultados = await asyncio.gather(*dependencias)
+        if not any(r.get("sucesso") for r in resultados):
+            return
+        await self._gerar_resumo_semanal(parceiro_id, semana, ano, config)
+        await self.db.sincronizacao_execucoes.update_one(
+            {"id": execucao_id},
+            {"$set": {"resumo_semanal_gerado_em": datetime.now(timezone.utc).isoformat()}}
+        )
+    
     async def _executar_fonte(
         self, 
         parceiro_id: str, 
@@ -351,7 +445,8 @@ class SincronizacaoService:
                 return {"sucesso": False, "erro": "Credenciais não configuradas", "metodo": "rpa"}
             
             # Criar execução RPA
-            from routes.rpa_automacao import _executar_em_background, calcular_periodo_semana
+            from routes.rpa_automacao import calcular_periodo_semana
+            from services.rpa_motor import enfileirar_execucao, PRIORIDADE_SINCRONIZACAO
             
             data_inicio, data_fim = calcular_periodo_semana(semana, ano)
             execucao_id = str(uuid.uuid4())
@@ -383,28 +478,57 @@ class SincronizacaoService:
             
             await self.db.rpa_execucoes.insert_one(execucao)
             
-            # Agendar execução em background
-            asyncio.create_task(_executar_em_background(
-                execucao_id,
-                fonte,
-                parceiro_id,
-                credencial,
-                "todos",
-                data_inicio,
-                data_fim
-            ))
+            # Pôr na fila do motor RPA e esperar que termine: o limite e o
+            # timeout do método aplicam-se à extração e não só ao enfileirar
+            tarefa = await enfileirar_execucao(self.db, execucao, prioridade=PRIORIDADE_SINCRONIZACAO)
+            try:
+                final = await self._aguardar_execucao_rpa(execucao_id, tarefa["id"])
+            except asyncio.CancelledError:
+                # Timeout da fonte: não deixar a extração a correr sem ninguém à espera
+                from services import fila_tarefas
+                cancelada = await fila_tarefas.cancelar(self.db, tarefa["id"])
+                if cancelada and cancelada.get("estado") == fila_tarefas.CANCELADA:
+                    await self.db.rpa_execucoes.update_one(
+                        {"id": execucao_id, "status": "pendente"},
+                        {"$set": {"status": "cancelado", "terminado_em": datetime.now(timezone.utc).isoformat()}}
+                    )
+                raise
             
-            return {
-                "sucesso": True,
+            status = final.get("status")
+            resultado = {
+                "sucesso": status in ("sucesso", "sucesso_parcial"),
                 "metodo": "rpa",
                 "execucao_id": execucao_id,
-                "mensagem": "Execução RPA iniciada"
+                "status": status,
+                "total_registos": final.get("total_registos", 0),
+                "mensagem": f"Execução RPA terminada: {status}"
             }
+            if not resultado["sucesso"]:
+                resultado["erro"] = "; ".join(final.get("erros") or []) or f"Execução RPA terminada: {status}"
+            return resultado
             
         except Exception as e:
             logger.error(f"Erro ao executar RPA para {fonte}: {e}")
             return {"sucesso": False, "erro": str(e), "metodo": "rpa"}
     
+    async def _aguardar_execucao_rpa(self, execucao_id: str, tarefa_id: str) -> Dict:
+        """Esperar que a tarefa do motor RPA chegue a um estado final e devolver a execução"""
+        from services import fila_tarefas
+        
+        while True:
+            tarefa = await fila_tarefas.obter(self.db, tarefa_id)
+            if tarefa is None or tarefa["estado"] in fila_tarefas.ESTADOS_FINAIS:
+                break
+            await asyncio.sleep(SINCRONIZACAO_POLL_RPA)
+        
+        execucao = await self.db.rpa_execucoes.find_one(
+            {"id": execucao_id}, {"_id": 0, "status": 1, "erros": 1, "total_registos": 1}
+        ) or {}
+        if execucao.get("status") not in ("sucesso", "sucesso_parcial", "erro", "cancelado"):
+            # Tarefa falhada/cancelada na fila sem o handler ter fechado a execução
+            execucao = {**execucao, "status": "erro", "erros": [(tarefa or {}).get("erro") or "Execução RPA não terminou"]}
+        return execucao
+    
     async def _executar_via_api(self, parceiro_id: str, fonte: str, semana: int, ano: int) -> Dict:
         """Executar sincronização via API oficial (Bolt)"""
         if fonte != "bolt":
@@ -0,0 +1,158 @@
+"""
+Funções síncronas pesadas executadas no pool de processos do executor_service.
+
+Estas funções correm noutro processo: recebem e devolvem apenas dados
+picklable (bytes, tuplos, strings) e não tocam na base de dados.
+"""
+
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+
+class CelulaExcel:
+    """Célula mínima com `.value`, compatível com `sheet[n]` do openpyxl"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class FolhaExcel:
+    """
+    Valores da folha ativa de um workbook, já lidos.
+
+    Reproduz o subconjunto da API de `Worksheet` usado nas importações
+    (`iter_rows(..., values_only=True)`, `sheet[n]`, `max_row`, `max_column`)
+    para que o parse do Excel possa correr fora do event loop sem alterar
+    a lógica de cada importação.
+    """
+
+    def __init__(self, linhas: List[Tuple]):
+        self.linhas = linhas
+        self.max_row = len(linhas)
+        self.max_column = max((len(linha) for linha in linhas), default=0)
+
+    def _linha(self, numero: int) -> Tuple:
+        if 1 <= numero <= self.max_row:
+            return self.linhas[numero - 1]
+        # Tal como o openpyxl, linhas fora da folha vêm vazias
+        return (None,) * self.max_column
+
+    def iter_rows(self, min_row: int = 1, max_row: Optional[int] = None, values_only: bool = True) -> Iterator[Tuple]:
+        if not values_only:
+            raise ValueError("FolhaExcel só guarda valores (values_only=True)")
+        ultima = self.max_row if max_row is None else max_row
+        for numero in range(min_row, ultima + 1):
+            yield self._linha(numero)
+
+    def __getitem__(self, numero: int) -> Tuple[CelulaExcel, ...]:
+        return tuple(CelulaExcel(valor) for valor in self._linha(numero))
+
+
+def ler_folha_excel(file_content: bytes, data_only: bool = False) -> FolhaExcel:
+    """Carregar um .xlsx e devolver os valores da folha ativa"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(BytesIO(file_content), data_only=data_only)
+    try:
+        return FolhaExcel(list(workbook.active.iter_rows(values_only=True)))
+    finally:
+        workbook.close()
+
+
+def processar_foto_perfil(file_content: bytes, file_path: str, tamanho: int = 300) -> None:
+    """Converter para RGB, recortar ao centro e guardar a foto como JPEG quadrado"""
+    from PIL import Image
+
+    image = Image.open(BytesIO(file_content))
+
+    # Converter para RGB se necessário
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        if image.mode in ('RGBA', 'LA'):
+            background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Redimensionar para tamanho máximo (mantendo proporção)
+    image.thumbnail((500, 500), Image.Resampling.LANCZOS)
+
+    # Criar imagem quadrada (crop centralizado)
+    width, height = image.size
+    min_dim = min(width, height)
+    left = (width - min_dim) // 2
+    top = (height - min_dim) // 2
+    image = image.crop((left, top, left + min_dim, top + min_dim))
+
+    # Redimensionar para tamanho final e guardar otimizada
+    image = image.resize((tamanho, tamanho), Image.Resampling.LANCZOS)
+    image.save(str(Path(file_path)), 'JPEG', quality=85, optimize=True)
+
+
+def processar_imagem_upload(
+    origem: str,
+    pdf: Optional[str] = None,
+    miniatura: Optional[str] = None,
+    max_lado: int = 2400,
+    miniatura_lado: int = 320,
+) -> dict:
+    """
+    Gerar os derivados de uma imagem carregada: PDF A4 (imagem reduzida a
+    `max_lado` e centrada a 90% da página) e/ou miniatura JPEG.
+    """
+    from PIL import Image, ImageOps
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    image = Image.open(origem)
+    # Fotos de telemóvel trazem a rotação no EXIF
+    image = ImageOps.exif_transpose(image)
+    largura_original, altura_original = image.size
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        if image.mode in ('RGBA', 'LA'):
+            background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    if max(image.size) > max_lado:
+        image.thumbnail((max_lado, max_lado), Image.Resampling.LANCZOS)
+
+    if pdf:
+        img_width, img_height = image.size
+        a4_width, a4_height = A4
+        scale = min(a4_width / img_width, a4_height / img_height) * 0.9
+        new_width = img_width * scale
+        new_height = img_height * scale
+
+        c = canvas.Canvas(pdf, pagesize=A4)
+        c.drawImage(
+            ImageReader(image),
+            (a4_width - new_width) / 2,
+            (a4_height - new_height) / 2,
+            width=new_width,
+            height=new_height,
+        )
+        c.save()
+
+    if miniatura:
+        thumb = image.copy()
+        thumb.thumbnail((miniatura_lado, miniatura_lado), Image.Resampling.LANCZOS)
+        thumb.save(miniatura, 'JPEG', quality=80, optimize=True)
+
+    return {
+        "largura": largura_original,
+        "altura": altura_original,
+        "largura_pdf": image.size[0] if pdf else None,
+        "altura_pdf": image.size[1] if pdf else None,
+    }
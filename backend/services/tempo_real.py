@@ -0,0 +1,197 @@
+"""
+Canal de eventos em tempo real (mensagens, contadores e notificações).
+
+O frontend fazia polling das mensagens da conversa aberta a cada 5 s e das
+estatísticas de notificações a cada 60 s; com centenas de motoristas
+ligados eram os pedidos mais frequentes da API. Agora os clientes abrem um
+WebSocket ou um stream SSE (routes/tempo_real.py) e recebem os eventos
+por push:
+
+- `ligar` / `desligar`: uma fila por ligação, limitada a
+  `TEMPO_REAL_FILA_MAX` eventos; se o cliente não consome, os mais antigos
+  são descartados (o cliente volta a pedir os contadores ao religar);
+- `publicar(db, user_ids, tipo, dados)` entrega o evento às ligações
+  deste processo;
+- com `TEMPO_REAL_BACKEND=mongo` (vários workers/instâncias) o evento é
+  também gravado em `eventos_tempo_real` (TTL) e cada processo entrega às
+  suas ligações os eventos dos outros, lidos por change stream ou, se o
+  MongoDB não for replica set, por polling a cada
+  `TEMPO_REAL_POLL_SEGUNDOS`.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, Iterable, Optional, Set
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+COLECAO = "eventos_tempo_real"
+
+TEMPO_REAL_BACKEND = os.environ.get("TEMPO_REAL_BACKEND", "local").lower()
+TEMPO_REAL_FILA_MAX = int(os.environ.get("TEMPO_REAL_FILA_MAX", "100"))
+TEMPO_REAL_PING_SEGUNDOS = int(os.environ.get("TEMPO_REAL_PING_SEGUNDOS", "25"))
+TEMPO_REAL_POLL_SEGUNDOS = float(os.environ.get("TEMPO_REAL_POLL_SEGUNDOS", "1"))
+
+# Margem do polling: ObjectIds de processos diferentes não são estritamente
+# crescentes, por isso cada leitura relê os últimos segundos e ignora os já vistos
+_JANELA_POLL_SEGUNDOS = 5
+
+# Identificador deste processo (para ignorar os próprios eventos)
+NO_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_ligacoes: Dict[str, Set[asyncio.Queue]] = {}
+_tarefa: Optional[asyncio.Task] = None
+_modo: Optional[str] = None
+
+_contadores = {"publicados": 0, "entregues": 0, "descartados": 0, "remotos": 0}
+
+
+def ligar(user_id: str) -> asyncio.Queue:
+    """Registar uma ligação de `user_id`; devolve a fila de eventos"""
+    fila: asyncio.Queue = asyncio.Queue(maxsize=TEMPO_REAL_FILA_MAX)
+    _ligacoes.setdefault(user_id, set()).add(fila)
+    return fila
+
+
+def desligar(user_id: str, fila: asyncio.Queue):
+    filas = _ligacoes.get(user_id)
+    if filas is None:
+        return
+    filas.discard(fila)
+    if not filas:
+        _ligacoes.pop(user_id, None)
+
+
+def pode_receber(user_id: str) -> bool:
+    """Há (ou pode haver, noutro processo) uma ligação de `user_id`"""
+    return TEMPO_REAL_BACKEND == "mongo" or bool(_ligacoes.get(user_id))
+
+
+def _entregar(user_ids: Iterable[str], evento: Dict[str, Any]):
+    for user_id in user_ids:
+        for fila in _ligacoes.get(user_id, ()):
+            if fila.full():
+                try:
+                    fila.get_nowait()
+                    _contadores["descartados"] += 1
+                except asyncio.QueueEmpty:
+                    pass
+            fila.put_nowait(evento)
+            _contadores["entregues"] += 1
+
+
+async def publicar(db, user_ids: Iterable[str], tipo: str, dados: Dict[str, Any]):
+    """
+    Enviar o evento `tipo` às ligações de `user_ids` (neste processo e,
+    com backend mongo, nos outros). `dados` tem de ser serializável em JSON.
+    """
+    destinatarios = [u for u in dict.fromkeys(user_ids) if u]
+    if not destinatarios:
+        return
+    evento = {"tipo": tipo, "dados": dados, "em": datetime.now(timezone.utc).isoformat()}
+    _contadores["publicados"] += 1
+    _entregar(destinatarios, evento)
+
+    if TEMPO_REAL_BACKEND != "mongo" or db is None:
+        return
+    try:
+        await db[COLECAO].insert_one({
+            "origem": NO_ID,
+            "user_ids": destinatarios,
+            "evento": evento,
+            "criado_em": datetime.now(timezone.utc),
+        })
+    except Exception as e:
+        logger.warning(f"Erro ao publicar evento em tempo real ({tipo}): {e}")
+
+
+def _receber(doc: Dict[str, Any]):
+    if doc.get("origem") == NO_ID:
+        return
+    _contadores["remotos"] += 1
+    _entregar(doc.get("user_ids", []), doc.get("evento", {}))
+
+
+async def _ouvir_change_stream(db):
+    pipeline = [{"$match": {"operationType": "insert", "fullDocument.origem": {"$ne": NO_ID}}}]
+    async with db[COLECAO].watch(pipeline) as stream:
+        async for alteracao in stream:
+            _receber(alteracao["fullDocument"])
+
+
+async def _ouvir_polling(db):
+    inicio = datetime.now(timezone.utc)
+    vistos: Dict[Any, float] = {}
+    while True:
+        desde = max(inicio, datetime.now(timezone.utc) - timedelta(seconds=_JANELA_POLL_SEGUNDOS))
+        async for doc in db[COLECAO].find(
+            {"_id": {"$gte": ObjectId.from_datetime(desde)}, "origem": {"$ne": NO_ID}}
+        ).sort("_id", 1):
+            if doc["_id"] not in vistos:
+                vistos[doc["_id"]] = time.monotonic()
+                _receber(doc)
+        limite = time.monotonic() - 2 * _JANELA_POLL_SEGUNDOS
+        vistos = {k: v for k, v in vistos.items() if v > limite}
+        await asyncio.sleep(TEMPO_REAL_POLL_SEGUNDOS)
+
+
+async def _ouvir(db):
+    global _modo
+    _modo = "change_stream"
+    while True:
+        try:
+            if _modo == "change_stream":
+                await _ouvir_change_stream(db)
+            else:
+                await _ouvir_polling(db)
+        except asyncio.CancelledError:
+            raise
+        except (OperationFailure, NotImplementedError) as e:
+            if _modo == "change_stream":
+                # Change streams só existem em replica sets / clusters
+                logger.info(f"Tempo real: change streams indisponíveis ({e}); a usar polling")
+                _modo = "polling"
+                continue
+            logger.warning(f"Tempo real: erro a ler eventos: {e}")
+        except Exception as e:
+            logger.warning(f"Tempo real: erro a ler eventos: {e}")
+        await asyncio.sleep(2)
+
+
+def iniciar(db):
+    """Arrancar a leitura dos eventos dos outros processos (só backend mongo)"""
+    global _tarefa
+    if TEMPO_REAL_BACKEND != "mongo" or (_tarefa and not _tarefa.done()):
+        return
+    _tarefa = asyncio.create_task(_ouvir(db))
+    logger.info(f"⚡ Tempo real: backend mongo ativo (nó {NO_ID})")
+
+
+async def parar():
+    global _tarefa
+    if _tarefa:
+        _tarefa.cancel()
+        try:
+            await _tarefa
+        except (asyncio.CancelledError, Exception):
+            pass
+        _tarefa = None
+
+
+def estatisticas() -> Dict[str, Any]:
+    return {
+        "backend": TEMPO_REAL_BACKEND,
+        "modo": _modo if TEMPO_REAL_BACKEND == "mongo" else "local",
+        "no_id": NO_ID,
+        "utilizadores_ligados": len(_ligacoes),
+        "ligacoes": sum(len(f) for f in _ligacoes.values()),
+        **_contadores,
+    }
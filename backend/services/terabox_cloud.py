@@ -11,6 +11,8 @@ import json
 from typing import Dict, Optional, List
 from pathlib import Path
 
+from services import clientes_http
+
 logger = logging.getLogger(__name__)
 
 # URLs da API do Terabox
@@ -63,7 +65,7 @@ class TeraboxCloudService:
     async def test_connection(self) -> Dict:
         """Testa a conexão com o Terabox"""
         try:
-            async with httpx.AsyncClient(follow_redirects=True) as client:
+            async with clientes_http.sessao("terabox") as client:
                 # Método 1: Tentar endpoint de quota (mais simples)
                 url = f"{TERABOX_WEB_API}/api/quota"
                 params = {"checkfree": 1, "checkexpire": 1}
@@ -111,7 +113,7 @@ class TeraboxCloudService:
     async def get_quota(self) -> Dict:
         """Obter informação de quota/espaço"""
         try:
-            async with httpx.AsyncClient(follow_redirects=True) as client:
+            async with clientes_http.sessao("terabox") as client:
                 url = f"{TERABOX_WEB_API}/api/quota"
                 params = {"checkfree": 1, "checkexpire": 1}
                 
@@ -136,7 +138,7 @@ class TeraboxCloudService:
     async def list_files(self, path: str = "/") -> Dict:
         """Listar ficheiros numa pasta"""
         try:
-            async with httpx.AsyncClient(follow_redirects=True) as client:
+            async with clientes_http.sessao("terabox") as client:
                 url = f"{TERABOX_WEB_API}/api/list"
                 params = {
                     "dir": path,
@@ -177,7 +179,7 @@ class TeraboxCloudService:
     async def create_folder(self, path: str) -> Dict:
         """Criar pasta no Terabox"""
         try:
-            async with httpx.AsyncClient(follow_redirects=True) as client:
+            async with clientes_http.sessao("terabox") as client:
                 url = f"{TERABOX_WEB_API}/api/create"
                 params = {"a": "commit"}
                 
@@ -243,7 +245,7 @@ class TeraboxCloudService:
             
             logger.info(f"Terabox upload: {file_name}, size={file_size}, md5={file_md5}")
             
-            async with httpx.AsyncClient(follow_redirects=True, timeout=300.0) as client:
+            async with clientes_http.sessao("terabox") as client:
                 # Passo 1: Pre-create (registar intenção de upload)
                 precreate_url = f"{TERABOX_WEB_API}/api/precreate"
                 
@@ -9,11 +9,12 @@ Documentação: API Get Driver Payments
 """
 
 import logging
-import httpx
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
 import base64
 
+from services import clientes_http
+
 logger = logging.getLogger(__name__)
 
 # Configurações da API Uber
@@ -33,11 +34,13 @@ class UberAPI:
     async def _get_access_token(self) -> str:
         """Obter token de acesso OAuth 2.0 usando Client Credentials"""
         
-        # Verificar se token ainda é válido
-        if self.access_token and self.token_expires_at:
-            if datetime.now(timezone.utc) < self.token_expires_at:
-                return self.access_token
-        
+        # Token partilhado entre instâncias com as mesmas credenciais
+        chave = clientes_http.tokens.chave("uber", self.client_id, self.client_secret)
+        self.access_token = await clientes_http.tokens.obter(chave, self._pedir_access_token)
+        self.token_expires_at = clientes_http.tokens.expiracao(chave)
+        return self.access_token
+    
+    async def _pedir_access_token(self):
         logger.info("🔐 A obter novo access token da Uber...")
         
         # Preparar credenciais para Basic Auth
@@ -54,7 +57,7 @@ class UberAPI:
             "scope": "supplier.partner.payments"
         }
         
-        async with httpx.AsyncClient() as client:
+        async with clientes_http.sessao("uber") as client:
             response = await client.post(
                 UBER_AUTH_URL,
                 headers=headers,
@@ -67,12 +70,10 @@ class UberAPI:
                 raise Exception(f"Falha na autenticação Uber: {response.status_code}")
             
             token_data = response.json()
-            self.access_token = token_data.get("access_token")
             expires_in = token_data.get("expires_in", 3600)
-            self.token_expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in - 60)
             
             logger.info(f"✅ Token obtido com sucesso (expira em {expires_in}s)")
-            return self.access_token
+            return token_data.get("access_token"), expires_in
     
     async def get_organizations(self, supplier_id: str) -> List[Dict[str, Any]]:
         """
@@ -93,7 +94,7 @@ class UberAPI:
         
         url = f"{UBER_API_BASE}/v1/vehicle-suppliers/{supplier_id}/organizations"
         
-        async with httpx.AsyncClient() as client:
+        async with clientes_http.sessao("uber") as client:
             response = await client.get(url, headers=headers, timeout=30.0)
             
             if response.status_code != 200:
@@ -159,7 +160,7 @@ class UberAPI:
         all_payments = []
         page_token = None
         
-        async with httpx.AsyncClient() as client:
+        async with clientes_http.sessao("uber") as client:
             while True:
                 if page_token:
                     params["page_token"] = page_token
@@ -0,0 +1,248 @@
+"""
+Processamento em segundo plano dos ficheiros carregados (fila "uploads").
+
+Os uploads de documentos (recibos, comprovativos, documentos de motorista,
+vistorias, contratos) liam o ficheiro inteiro para memória e convertiam a
+imagem em PDF com PIL/reportlab dentro do pedido: uma foto de 12 MP de
+telemóvel segurava o event loop durante segundos e a resposta só saía no
+fim da conversão.
+
+Agora:
+
+- `guardar_stream` copia o corpo do upload (já em ficheiro temporário do
+  Starlette) para o destino aos blocos de `UPLOAD_CHUNK_BYTES`, numa
+  thread, sem o carregar todo em memória nem bloquear o event loop;
+- `enfileirar` regista o estado em `uploads_processamento` e põe uma tarefa
+  `upload.processar` na fila, e a API responde logo; enquanto o PDF não
+  existe o documento aponta para o original, que é o que se descarrega;
+- os workers da fila geram o PDF A4 (imagem reduzida a `UPLOAD_MAX_LADO`)
+  e/ou a miniatura no pool de processos do executor_service, em ficheiros
+  temporários que só passam para o destino se o documento ainda for deste
+  upload (um upload mais recente do mesmo documento não é substituído);
+- no fim, a `referencia` do documento passa para o PDF/miniatura
+  (`valor_ok`); se a última tentativa falhar fica no original.
+"""
+
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from services import executor_service, fila_tarefas, tarefas_pesadas
+
+logger = logging.getLogger(__name__)
+
+FILA = "uploads"
+TIPO = "upload.processar"
+COLECAO = "uploads_processamento"
+
+UPLOADS_WORKERS = int(os.environ.get("UPLOADS_WORKERS", "2"))
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_MAX_LADO = int(os.environ.get("UPLOAD_MAX_LADO", "2400"))
+UPLOAD_MINIATURA_LADO = int(os.environ.get("UPLOAD_MINIATURA_LADO", "320"))
+UPLOAD_MAX_TENTATIVAS = int(os.environ.get("UPLOAD_MAX_TENTATIVAS", "3"))
+
+EXTENSOES_IMAGEM = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.heic', '.heif'}
+
+PENDENTE = "pendente"
+A_PROCESSAR = "a_processar"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+SUBSTITUIDO = "substituido"
+
+
+def _agora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def e_imagem(nome_ficheiro: Optional[str]) -> bool:
+    return Path(nome_ficheiro or "").suffix.lower() in EXTENSOES_IMAGEM
+
+
+def _copiar(origem, destino: str, bloco: int) -> int:
+    tamanho = 0
+    with open(destino, "wb") as buffer:
+        while True:
+            dados = origem.read(bloco)
+            if not dados:
+                break
+            tamanho += len(dados)
+            buffer.write(dados)
+    return tamanho
+
+
+async def guardar_stream(file, destino) -> int:
+    """
+    Escrever o UploadFile em `destino` aos blocos, numa thread do
+    executor_service; devolve o tamanho em bytes
+    """
+    await file.seek(0)
+    return await executor_service.executar_io(_copiar, file.file, str(destino), UPLOAD_CHUNK_BYTES)
+
+
+async def enfileirar(
+    db,
+    upload_id: str,
+    origem: str,
+    pdf: Optional[str] = None,
+    miniatura: Optional[str] = None,
+    referencia: Optional[Dict[str, Any]] = None,
+    remover_origem: bool = False,
+    criado_por: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Registar e pôr na fila a geração dos derivados de `origem` (caminhos
+    absolutos). `referencia` = {colecao, filtro, campo, valor_erro[,
+    valor_ok]}: o documento (`filtro`) tem de existir para os derivados
+    serem escritos; `campo` passa a `valor_ok` quando terminar e a
+    `valor_erro` se o processamento falhar de vez.
+    """
+    agora = _agora()
+    await db[COLECAO].update_one(
+        {"id": upload_id},
+        {
+            "$set": {
+                "id": upload_id,
+                "estado": PENDENTE,
+                "origem": origem,
+                "pdf": pdf,
+                "miniatura": miniatura,
+                "referencia": referencia,
+                "erro": None,
+                "atualizado_em": agora,
+            },
+            "$setOnInsert": {"criado_em": agora, "criado_por": criado_por},
+        },
+        upsert=True,
+    )
+    tarefa = await fila_tarefas.enfileirar(
+        db,
+        TIPO,
+        {"upload_id": upload_id, "remover_origem": remover_origem},
+        criado_por=criado_por,
+        max_tentativas=UPLOAD_MAX_TENTATIVAS,
+        descricao=f"Processar upload {Path(origem).name}",
+    )
+    await db[COLECAO].update_one({"id": upload_id}, {"$set": {"tarefa_id": tarefa["id"]}})
+    return {"id": upload_id, "estado": PENDENTE, "tarefa_id": tarefa["id"]}
+
+
+async def estado(db, upload_id: str) -> Optional[Dict[str, Any]]:
+    return await db[COLECAO].find_one({"id": upload_id}, {"_id": 0})
+
+
+async def _aplicar_fallback(db, referencia: Optional[Dict[str, Any]]):
+    if not referencia or referencia.get("valor_erro") is None:
+        return
+    await db[referencia["colecao"]].update_one(
+        referencia["filtro"],
+        {"$set": {referencia["campo"]: referencia["valor_erro"]}},
+    )
+
+
+async def _aplicar_concluido(db, referencia: Optional[Dict[str, Any]]):
+    if not referencia or referencia.get("valor_ok") is None:
+        return
+    filtro = dict(referencia["filtro"])
+    if "$" not in referencia["campo"] and referencia.get("valor_erro") is not None:
+        # Só se o campo ainda apontar para o original deste upload
+        filtro[referencia["campo"]] = referencia["valor_erro"]
+    await db[referencia["colecao"]].update_one(filtro, {"$set": {referencia["campo"]: referencia["valor_ok"]}})
+
+
+async def _documento_atual(db, referencia: Optional[Dict[str, Any]]) -> bool:
+    """O documento da `referencia` ainda é deste upload"""
+    if not referencia:
+        return True
+    return await db[referencia["colecao"]].find_one(referencia["filtro"], {"_id": 1}) is not None
+
+
+def _remover(*caminhos):
+    for caminho in caminhos:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+@fila_tarefas.registar(TIPO, fila=FILA)
+async def processar(db, tarefa: fila_tarefas.Tarefa) -> Dict[str, Any]:
+    """Gerar PDF/miniatura de um upload e guardar o estado"""
+    upload_id = tarefa.payload["upload_id"]
+    registo = await estado(db, upload_id)
+    if not registo:
+        return {"status": "ignorada", "motivo": "Upload não encontrado"}
+
+    if not os.path.exists(registo["origem"]):
+        # Ficheiro apagado entretanto: repetir não adianta
+        await db[COLECAO].update_one(
+            {"id": upload_id},
+            {"$set": {"estado": ERRO, "erro": "Ficheiro original não encontrado", "atualizado_em": _agora()}},
+        )
+        return {"status": ERRO, "motivo": "Ficheiro original não encontrado"}
+
+    referencia = registo.get("referencia")
+    remover_origem = tarefa.payload.get("remover_origem")
+
+    async def substituido() -> Dict[str, Any]:
+        if remover_origem:
+            _remover(registo["origem"])
+        await db[COLECAO].update_one(
+            {"id": upload_id},
+            {"$set": {"estado": SUBSTITUIDO, "erro": None, "atualizado_em": _agora()}},
+        )
+        logger.info(f"Upload {upload_id} substituído por outro mais recente: derivados não gerados")
+        return {"status": SUBSTITUIDO}
+
+    if not await _documento_atual(db, referencia):
+        return await substituido()
+
+    await db[COLECAO].update_one(
+        {"id": upload_id},
+        {"$set": {"estado": A_PROCESSAR, "tentativa": tarefa.tentativa, "atualizado_em": _agora()}},
+    )
+
+    # Os derivados são gerados ao lado do destino e só depois movidos, para
+    # não escrever por cima dos de um upload que entretanto o substituiu
+    destinos = {campo: registo.get(campo) for campo in ("pdf", "miniatura") if registo.get(campo)}
+    temporarios = {campo: f"{caminho}.{upload_id}.tmp" for campo, caminho in destinos.items()}
+
+    try:
+        info = await executor_service.executar_cpu(
+            tarefas_pesadas.processar_imagem_upload,
+            registo["origem"],
+            temporarios.get("pdf"),
+            temporarios.get("miniatura"),
+            UPLOAD_MAX_LADO,
+            UPLOAD_MINIATURA_LADO,
+        )
+    except Exception as e:
+        _remover(*temporarios.values())
+        ultima = tarefa.tentativa >= tarefa.max_tentativas
+        logger.error(f"❌ Processamento do upload {upload_id} falhou (tentativa {tarefa.tentativa}): {e}")
+        await db[COLECAO].update_one(
+            {"id": upload_id},
+            {"$set": {"estado": ERRO if ultima else PENDENTE, "erro": str(e), "atualizado_em": _agora()}},
+        )
+        if ultima:
+            await _aplicar_fallback(db, referencia)
+        # A fila repete com backoff exponencial
+        raise
+
+    if not await _documento_atual(db, referencia):
+        _remover(*temporarios.values())
+        return await substituido()
+
+    for campo, temporario in temporarios.items():
+        os.replace(temporario, destinos[campo])
+    await _aplicar_concluido(db, referencia)
+
+    if remover_origem:
+        _remover(registo["origem"])
+
+    await db[COLECAO].update_one(
+        {"id": upload_id},
+        {"$set": {"estado": CONCLUIDO, "info": info, "erro": None, "concluido_em": _agora(), "atualizado_em": _agora()}},
+    )
+    return {"status": CONCLUIDO, **info}
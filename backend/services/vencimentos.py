@@ -0,0 +1,353 @@
+"""
+Índice de datas de vencimento de veículos e motoristas.
+
+Colecção `vencimentos`: uma entrada por (entidade, campo de data) — seguro,
+inspeção, extintor, matrícula, IUC, licença TVDE, carta de condução e CC —
+com a data já normalizada e os dados necessários para o texto dos alertas.
+
+Os caminhos de escrita de veículos e motoristas chamam
+`sincronizar_vehicle` / `sincronizar_motorista`; `reconstruir_vencimentos`
+refaz o índice a partir das colecções de origem (arranque com índice vazio
+e uma vez por dia) para apanhar escritas feitas por outros caminhos.
+
+Em vez de carregar todos os veículos e motoristas, `processar_alertas` e
+`processar_notificacoes` consultam só as entradas dentro da janela de aviso
+e criam alertas/notificações em lote.
+"""
+
+import logging
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+VEICULO = "veiculo"
+MOTORISTA = "motorista"
+
+# Janela de aviso dos alertas (dias antes do vencimento)
+DIAS_ANTECEDENCIA_ALERTAS = 30
+# Janela de aviso das notificações de documentos a expirar
+DIAS_ANTECEDENCIA_NOTIFICACOES = 7
+
+# Intervalos do agendador (horas)
+PROCESSAMENTO_INTERVALO_HORAS = 1
+RECONSTRUCAO_INTERVALO_HORAS = 24
+
+# (campo, tipo de alerta, nome do documento nas notificações)
+CAMPOS_VEICULO: List[Tuple[str, Optional[str], Optional[str]]] = [
+    ("validade_matricula", "validade_matricula", None),
+    ("insurance.data_validade", "seguro", None),
+    ("inspection.proxima_inspecao", "inspecao", None),
+    ("extintor.data_validade", "extintor", None),
+    ("seguro_validade", None, "Seguro"),
+    ("inspecao_validade", None, "Inspeção"),
+    ("iuc_validade", None, "IUC"),
+]
+CAMPOS_MOTORISTA: List[Tuple[str, Optional[str], Optional[str]]] = [
+    ("licenca_tvde_validade", "licenca_tvde", "Licença TVDE"),
+    ("carta_conducao_validade", "carta_conducao", "Carta de Condução"),
+    ("cc_validade", None, "Cartão de Cidadão"),
+]
+
+PROJECAO_VEICULO = {"_id": 0, "id": 1, "parceiro_id": 1, "matricula": 1, "marca": 1, "modelo": 1,
+                    **{campo: 1 for campo, _, _ in CAMPOS_VEICULO}}
+PROJECAO_MOTORISTA = {"_id": 0, "id": 1, "name": 1, **{campo: 1 for campo, _, _ in CAMPOS_MOTORISTA}}
+
+# Texto dos alertas por tipo: (título, descrição, prioridade(dias))
+_VEICULO_TXT = "{marca} {modelo} ({matricula})"
+MODELOS_ALERTA = {
+    "validade_matricula": (
+        "Matrícula expira em breve - {matricula}",
+        "A matrícula do veículo " + _VEICULO_TXT + " expira em {dias} dias.",
+        lambda dias: "alta" if dias <= 7 else "media",
+    ),
+    "seguro": (
+        "Seguro expira em breve - {matricula}",
+        "O seguro do veículo " + _VEICULO_TXT + " expira em {dias} dias.",
+        lambda dias: "alta",
+    ),
+    "inspecao": (
+        "Inspeção em breve - {matricula}",
+        "A próxima inspeção do veículo " + _VEICULO_TXT + " está marcada para {dias} dias.",
+        lambda dias: "media",
+    ),
+    "extintor": (
+        "Extintor expira em breve - {matricula}",
+        "O extintor do veículo " + _VEICULO_TXT + " expira em {dias} dias.",
+        lambda dias: "alta",
+    ),
+    "licenca_tvde": (
+        "Licença TVDE expira em breve - {nome}",
+        "A licença TVDE do motorista {nome} expira em {dias} dias.",
+        lambda dias: "alta",
+    ),
+    "carta_conducao": (
+        "Carta de condução expira em breve - {nome}",
+        "A carta de condução do motorista {nome} expira em {dias} dias.",
+        lambda dias: "alta",
+    ),
+}
+
+_FORMATOS_DATA = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+
+
+def _parse_data(valor: Any) -> Optional[datetime]:
+    """Data de vencimento à meia-noite UTC (aceita os formatos usados nos formulários)"""
+    if isinstance(valor, datetime):
+        return datetime.combine(valor.date(), time.min, tzinfo=timezone.utc)
+    if isinstance(valor, date):
+        return datetime.combine(valor, time.min, tzinfo=timezone.utc)
+    if not isinstance(valor, str) or not valor.strip():
+        return None
+    texto = valor.strip()[:10]
+    for formato in _FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def _utc(data: datetime) -> datetime:
+    # O motor devolve datetimes sem tzinfo (UTC)
+    return data if data.tzinfo else data.replace(tzinfo=timezone.utc)
+
+
+def _obter(doc: Dict[str, Any], campo: str) -> Any:
+    valor: Any = doc
+    for parte in campo.split("."):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+
+def _entradas(entidade_tipo: str, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Entradas do índice para um veículo ou motorista"""
+    campos = CAMPOS_VEICULO if entidade_tipo == VEICULO else CAMPOS_MOTORISTA
+    agora = datetime.now(timezone.utc)
+    entradas = []
+    for campo, alerta, documento in campos:
+        valor = _obter(doc, campo)
+        data = _parse_data(valor)
+        if not data:
+            continue
+        entrada = {
+            "entidade_tipo": entidade_tipo,
+            "entidade_id": doc["id"],
+            "campo": campo,
+            "valor": valor if isinstance(valor, str) else data.strftime("%Y-%m-%d"),
+            "data_vencimento": data,
+            "alerta": alerta,
+            "documento": documento,
+            "atualizado_em": agora,
+        }
+        if entidade_tipo == VEICULO:
+            entrada.update({
+                "parceiro_id": doc.get("parceiro_id"),
+                "matricula": doc.get("matricula"),
+                "marca": doc.get("marca"),
+                "modelo": doc.get("modelo"),
+            })
+        else:
+            entrada["nome"] = doc.get("name")
+        entradas.append(entrada)
+    return entradas
+
+
+def _operacoes(entidade_tipo: str, entidade_id: str, entradas: List[Dict[str, Any]]) -> List:
+    chave = {"entidade_tipo": entidade_tipo, "entidade_id": entidade_id}
+    ops = [ReplaceOne({**chave, "campo": e["campo"]}, e, upsert=True) for e in entradas]
+    ops.append(DeleteMany({**chave, "campo": {"$nin": [e["campo"] for e in entradas]}}))
+    return ops
+
+
+# ==================== ESCRITAS ====================
+
+async def _sincronizar(db, entidade_tipo: str, entidade_id: str):
+    colecao, projecao = (db.vehicles, PROJECAO_VEICULO) if entidade_tipo == VEICULO else (db.motoristas, PROJECAO_MOTORISTA)
+    try:
+        doc = await colecao.find_one({"id": entidade_id}, projecao)
+        entradas = _entradas(entidade_tipo, doc) if doc else []
+        await db.vencimentos.bulk_write(_operacoes(entidade_tipo, entidade_id, entradas), ordered=False)
+    except Exception as e:
+        # O índice é corrigido na reconstrução diária; não falhar a escrita principal
+        logger.error(f"Erro ao sincronizar vencimentos de {entidade_tipo} {entidade_id}: {e}")
+
+
+async def sincronizar_vehicle(db, vehicle_id: str):
+    """Actualizar as entradas de um veículo depois de criado, editado ou apagado"""
+    await _sincronizar(db, VEICULO, vehicle_id)
+
+
+async def sincronizar_motorista(db, motorista_id: str):
+    """Actualizar as entradas de um motorista depois de criado, editado ou apagado"""
+    await _sincronizar(db, MOTORISTA, motorista_id)
+
+
+async def reconstruir_vencimentos(db, lote: int = 1000) -> int:
+    """Refazer o índice a partir de vehicles e motoristas (só os campos de data)"""
+    inicio = datetime.now(timezone.utc)
+    total = 0
+    for entidade_tipo, colecao, campos, projecao in (
+        (VEICULO, db.vehicles, CAMPOS_VEICULO, PROJECAO_VEICULO),
+        (MOTORISTA, db.motoristas, CAMPOS_MOTORISTA, PROJECAO_MOTORISTA),
+    ):
+        filtro = {"$or": [{campo: {"$nin": [None, ""]}} for campo, _, _ in campos]}
+        ops = []
+        async for doc in colecao.find(filtro, projecao):
+            for entrada in _entradas(entidade_tipo, doc):
+                ops.append(ReplaceOne(
+                    {"entidade_tipo": entidade_tipo, "entidade_id": doc["id"], "campo": entrada["campo"]},
+                    entrada,
+                    upsert=True,
+                ))
+            if len(ops) >= lote:
+                await db.vencimentos.bulk_write(ops, ordered=False)
+                total += len(ops)
+                ops = []
+        if ops:
+            await db.vencimentos.bulk_write(ops, ordered=False)
+            total += len(ops)
+
+    # Entradas que não foram reescritas pertencem a entidades/campos que já não existem
+    removidas = await db.vencimentos.delete_many({"atualizado_em": {"$lt": inicio}})
+    logger.info(f"📅 Índice de vencimentos reconstruído: {total} entradas, {removidas.deleted_count} removidas")
+    return total
+
+
+# ==================== AGENDADOR ====================
+
+async def processar_alertas(db, hoje: Optional[date] = None) -> int:
+    """Criar alertas ativos para entradas que vencem nos próximos 30 dias"""
+    hoje = hoje or date.today()
+    inicio = datetime.combine(hoje, time.min, tzinfo=timezone.utc)
+    fim = inicio + timedelta(days=DIAS_ANTECEDENCIA_ALERTAS)
+
+    entradas = await db.vencimentos.find(
+        {"alerta": {"$ne": None}, "data_vencimento": {"$gte": inicio, "$lte": fim}},
+        {"_id": 0},
+    ).to_list(None)
+
+    agora = datetime.now(timezone.utc).isoformat()
+    ops = []
+    for e in entradas:
+        titulo, descricao, prioridade = MODELOS_ALERTA[e["alerta"]]
+        dias = (e["data_vencimento"].date() - hoje).days
+        campos_texto = {
+            "matricula": e.get("matricula"),
+            "marca": e.get("marca"),
+            "modelo": e.get("modelo"),
+            "nome": e.get("nome"),
+            "dias": dias,
+        }
+        filtro = {"tipo": e["alerta"], "entidade_id": e["entidade_id"], "status": "ativo"}
+        ops.append(UpdateOne(filtro, {"$setOnInsert": {
+            "id": str(uuid.uuid4()),
+            "entidade_tipo": e["entidade_tipo"],
+            "titulo": titulo.format(**campos_texto),
+            "descricao": descricao.format(**campos_texto),
+            "data_vencimento": e["valor"],
+            "prioridade": prioridade(dias),
+            "dias_antecedencia": DIAS_ANTECEDENCIA_ALERTAS,
+            "criado_em": agora,
+        }}, upsert=True))
+
+    if not ops:
+        return 0
+    resultado = await db.alertas.bulk_write(ops, ordered=False)
+    criados = resultado.upserted_count
+    logger.info(f"📅 Vencimentos: {len(entradas)} na janela de alerta, {criados} alertas criados")
+    return criados
+
+
+async def processar_notificacoes(db) -> int:
+    """Notificar documentos que expiram nos próximos 7 dias (no máximo uma vez por dia)"""
+    from utils.notificacoes import criar_notificacao
+
+    hoje = datetime.now(timezone.utc)
+    entradas = await db.vencimentos.find(
+        {
+            "documento": {"$ne": None},
+            "data_vencimento": {"$gte": hoje, "$lte": hoje + timedelta(days=DIAS_ANTECEDENCIA_NOTIFICACOES)},
+        },
+        {"_id": 0},
+    ).to_list(None)
+
+    def destinatario(e: Dict[str, Any]) -> Optional[str]:
+        return e["entidade_id"] if e["entidade_tipo"] == MOTORISTA else e.get("parceiro_id")
+
+    entradas = [e for e in entradas if destinatario(e)]
+    if not entradas:
+        return 0
+
+    # Notificações já criadas nas últimas 24h, numa única consulta
+    recentes = await db.notificacoes.find(
+        {
+            "user_id": {"$in": list({destinatario(e) for e in entradas})},
+            "tipo": {"$in": ["documento_expirando", "documento_veiculo_expirando"]},
+            "criada_em": {"$gte": (hoje - timedelta(days=1)).isoformat()},
+        },
+        {"_id": 0, "user_id": 1, "tipo": 1, "metadata.documento": 1, "metadata.veiculo_id": 1},
+    ).to_list(None)
+    existentes = {
+        (n["user_id"], n["tipo"], (n.get("metadata") or {}).get("documento"), (n.get("metadata") or {}).get("veiculo_id"))
+        for n in recentes
+    }
+
+    criadas = 0
+    for e in entradas:
+        user_id = destinatario(e)
+        doc_name = e["documento"]
+        validade_str = e["valor"]
+        dias_restantes = (_utc(e["data_vencimento"]) - hoje).days
+
+        if e["entidade_tipo"] == MOTORISTA:
+            chave = (user_id, "documento_expirando", doc_name, None)
+            if chave in existentes:
+                continue
+            await criar_notificacao(
+                db,
+                user_id=user_id,
+                tipo="documento_expirando",
+                titulo=f"⚠️ {doc_name} a expirar",
+                mensagem=f"O seu {doc_name} expira em {dias_restantes} dias ({validade_str}). Por favor, renove o documento.",
+                prioridade="alta" if dias_restantes <= 3 else "normal",
+                link="/perfil",
+                metadata={"documento": doc_name, "validade": validade_str, "dias_restantes": dias_restantes},
+                enviar_email=True
+            )
+        else:
+            chave = (user_id, "documento_veiculo_expirando", doc_name, e["entidade_id"])
+            if chave in existentes:
+                continue
+            await criar_notificacao(
+                db,
+                user_id=user_id,
+                tipo="documento_veiculo_expirando",
+                titulo=f"⚠️ {doc_name} do veículo {e.get('matricula') or 'N/A'}",
+                mensagem=f"O {doc_name} do veículo {e.get('matricula')} expira em {dias_restantes} dias.",
+                prioridade="alta" if dias_restantes <= 3 else "normal",
+                link=f"/veiculos/{e['entidade_id']}",
+                metadata={
+                    "veiculo_id": e["entidade_id"],
+                    "matricula": e.get("matricula"),
+                    "documento": doc_name,
+                    "validade": validade_str
+                },
+                enviar_email=True
+            )
+        existentes.add(chave)
+        criadas += 1
+
+    logger.info(f"📅 Vencimentos: {len(entradas)} documentos a expirar, {criadas} notificações criadas")
+    return criadas
+
+
+async def garantir_indice(db):
+    """Construir o índice se estiver vazio (primeiro arranque após a migração)"""
+    if await db.vencimentos.estimated_document_count() == 0:
+        await reconstruir_vencimentos(db)
@@ -0,0 +1,340 @@
+"""
+Envio em massa de mensagens WhatsApp Cloud (templates) com concorrência.
+
+Os envios em massa eram sequenciais, com um `httpx.AsyncClient` novo por
+mensagem: um relatório semanal para 300 motoristas demorava minutos. Aqui:
+
+- os pedidos seguem pelo cliente partilhado "whatsapp" de
+  services/clientes_http.py (keep-alive, HTTP/2 se o pacote `h2` estiver
+  instalado), com até `WHATSAPP_CONCORRENCIA` pedidos em simultâneo;
+- um token bucket limita o ritmo a `WHATSAPP_MENSAGENS_POR_SEGUNDO`
+  (80/s é o throughput por número de telefone da Cloud API);
+- respostas 429/5xx e os erros de limite da Meta são repetidos até
+  `WHATSAPP_TENTATIVAS`, esperando o `Retry-After`. Um 429 pausa o bucket
+  para todas as mensagens, não só para a que o recebeu;
+- cada envio fica em `whatsapp_envios_massa`, com o estado de cada
+  mensagem atualizado durante o envio e, depois, pelo webhook
+  (`reconciliar_estados`: sent, delivered, read, failed). O `message_id`
+  é gravado logo que a Meta aceita a mensagem; um estado que chegue antes
+  disso fica em `whatsapp_estados_pendentes` e é aplicado no fim do envio.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from pymongo import ReturnDocument, UpdateOne
+
+from services import clientes_http
+
+logger = logging.getLogger(__name__)
+
+COLECAO = "whatsapp_envios_massa"
+COLECAO_PENDENTES = "whatsapp_estados_pendentes"
+
+WHATSAPP_MENSAGENS_POR_SEGUNDO = float(os.environ.get("WHATSAPP_MENSAGENS_POR_SEGUNDO", "80"))
+WHATSAPP_TENTATIVAS = int(os.environ.get("WHATSAPP_TENTATIVAS", "4"))
+WHATSAPP_BACKOFF = float(os.environ.get("WHATSAPP_BACKOFF", "1"))
+
+# Falhas gravadas de cada vez (os envios com sucesso são gravados logo)
+_LOTE_GRAVACAO = 50
+
+# Códigos de erro da Meta para limites de envio (a repetir mais tarde)
+CODIGOS_LIMITE = {4, 80007, 130429, 131056}
+
+PENDENTE = "pendente"
+ENVIADO = "enviado"
+FALHADO = "falhado"
+
+# Ordem dos estados de entrega do webhook (chegam fora de ordem e repetidos)
+ORDEM_ENTREGA = {"sent": 1, "delivered": 2, "read": 3, "failed": 4}
+
+Enviar = Callable[[Dict[str, Any]], Awaitable[httpx.Response]]
+
+
+def _agora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _Balde:
+    """Token bucket: `taxa` mensagens por segundo, rajadas até `capacidade`"""
+
+    def __init__(self, taxa: float, capacidade: Optional[float] = None):
+        self.taxa = max(taxa, 0.1)
+        self.capacidade = capacidade or self.taxa
+        self.tokens = self.capacidade
+        self.atualizado = time.monotonic()
+        self.pausa_ate = 0.0
+        self._lock = asyncio.Lock()
+
+    async def obter(self):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                if agora < self.pausa_ate:
+                    await asyncio.sleep(self.pausa_ate - agora)
+                    continue
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+                self.atualizado = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.taxa)
+
+    def pausar(self, segundos: float):
+        """Suspender todos os envios (a Meta pediu para abrandar)"""
+        self.pausa_ate = max(self.pausa_ate, time.monotonic() + segundos)
+        self.tokens = 0
+
+
+_balde = _Balde(WHATSAPP_MENSAGENS_POR_SEGUNDO)
+_slots: Optional[asyncio.Semaphore] = None
+
+_contadores = {"enviadas": 0, "falhadas": 0, "repeticoes": 0, "pausas": 0, "estados_webhook": 0,
+               "estados_pendentes": 0}
+
+
+def _semaforo() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(clientes_http.FORNECEDORES["whatsapp"]["limite"])
+    return _slots
+
+
+def _espera(response: Optional[httpx.Response], tentativa: int) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+    return WHATSAPP_BACKOFF * 2 ** (tentativa - 1) * (1 + random.random() / 2)
+
+
+def _erro(response: httpx.Response) -> Dict[str, Any]:
+    try:
+        return response.json().get("error") or {"message": response.text}
+    except ValueError:
+        return {"message": response.text, "status": response.status_code}
+
+
+async def enviar_mensagem(enviar: Enviar, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Enviar um payload respeitando o ritmo e repetindo limites/erros do
+    servidor. Devolve {"success", "message_id", "tentativas"} ou
+    {"success": False, "error", "tentativas"}.
+    """
+    for tentativa in range(1, WHATSAPP_TENTATIVAS + 1):
+        await _balde.obter()
+        async with _semaforo():
+            try:
+                response = await enviar(payload)
+            except httpx.TransportError as e:
+                # POST: só o clientes_http sabe se o pedido chegou a sair; não repetir aqui
+                return {"success": False, "error": {"message": f"Erro de ligação: {e}"}, "tentativas": tentativa}
+
+        if response.status_code == 200:
+            dados = response.json()
+            return {
+                "success": True,
+                "message_id": dados.get("messages", [{}])[0].get("id"),
+                "tentativas": tentativa,
+            }
+
+        erro = _erro(response)
+        limite = response.status_code == 429 or erro.get("code") in CODIGOS_LIMITE
+        if not (limite or response.status_code >= 500) or tentativa == WHATSAPP_TENTATIVAS:
+            return {"success": False, "error": erro, "tentativas": tentativa}
+
+        espera = _espera(response, tentativa)
+        if limite:
+            _balde.pausar(espera)
+            _contadores["pausas"] += 1
+        _contadores["repeticoes"] += 1
+        logger.warning(f"WhatsApp: HTTP {response.status_code} ({erro.get('code')}), a repetir em {espera:.1f}s")
+        await asyncio.sleep(espera)
+
+
+async def despachar(
+    db,
+    mensagens: List[Dict[str, Any]],
+    enviar: Enviar,
+    descricao: Dict[str, Any],
+    sem_telefone: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Enviar `mensagens` ({motorista_id, nome, telefone, payload}) em
+    paralelo e registar o envio em `whatsapp_envios_massa` (`descricao`:
+    template_name, parameters, motorista_ids, enviado_por...).
+
+    Devolve o documento do envio (sem as mensagens) e `detalhes` com as
+    listas enviados / falhas / sem_telefone.
+    """
+    envio_id = str(uuid.uuid4())
+    for mensagem in mensagens:
+        mensagem["id"] = str(uuid.uuid4())
+    sem_telefone = sem_telefone or []
+
+    await db[COLECAO].insert_one({
+        "id": envio_id,
+        **descricao,
+        "estado": "em_curso",
+        "total": len(mensagens),
+        "enviados": 0,
+        "falhas": 0,
+        "sem_telefone": len(sem_telefone),
+        "mensagens": [{
+            "id": m["id"],
+            "motorista_id": m.get("motorista_id"),
+            "nome": m.get("nome"),
+            "telefone": m.get("telefone"),
+            "estado": PENDENTE,
+            "message_id": None,
+            "erro": None,
+            "tentativas": 0,
+            "estado_entrega": None,
+            "ordem_entrega": 0,
+        } for m in mensagens],
+        "created_at": _agora(),
+        "terminado_em": None,
+    })
+
+    detalhes = {"enviados": [], "falhas": [], "sem_telefone": sem_telefone}
+    pendentes_gravacao: List[UpdateOne] = []
+
+    async def gravar():
+        if pendentes_gravacao:
+            operacoes = pendentes_gravacao[:]
+            pendentes_gravacao.clear()
+            await db[COLECAO].bulk_write(operacoes, ordered=False)
+
+    async def uma(mensagem: Dict[str, Any]):
+        try:
+            resultado = await enviar_mensagem(enviar, mensagem["payload"])
+        except Exception as e:
+            resultado = {"success": False, "error": {"message": str(e)}, "tentativas": 1}
+
+        base = {"id": mensagem.get("motorista_id"), "nome": mensagem.get("nome")}
+        if resultado["success"]:
+            _contadores["enviadas"] += 1
+            detalhes["enviados"].append({**base, "telefone": mensagem.get("telefone"), "message_id": resultado["message_id"]})
+            alteracao = {"estado": ENVIADO, "message_id": resultado["message_id"]}
+            contador = "enviados"
+        else:
+            _contadores["falhadas"] += 1
+            detalhes["falhas"].append({**base, "erro": resultado["error"]})
+            alteracao = {"estado": FALHADO, "erro": resultado["error"]}
+            contador = "falhas"
+
+        alteracao.update(tentativas=resultado["tentativas"], atualizado_em=_agora())
+        filtro = {"id": envio_id, "mensagens.id": mensagem["id"]}
+        alteracao = {"$set": {f"mensagens.$.{k}": v for k, v in alteracao.items()}, "$inc": {contador: 1}}
+        if resultado["success"]:
+            # Gravar já: os estados do webhook procuram a mensagem pelo message_id
+            await db[COLECAO].update_one(filtro, alteracao)
+            return
+        pendentes_gravacao.append(UpdateOne(filtro, alteracao))
+        if len(pendentes_gravacao) >= _LOTE_GRAVACAO:
+            await gravar()
+
+    await asyncio.gather(*(uma(m) for m in mensagens))
+    await gravar()
+    await _aplicar_pendentes(db, [e["message_id"] for e in detalhes["enviados"] if e["message_id"]])
+
+    envio = await db[COLECAO].find_one_and_update(
+        {"id": envio_id},
+        {"$set": {"estado": "concluido", "terminado_em": _agora()}},
+        projection={"_id": 0, "mensagens": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    logger.info(f"📤 WhatsApp em massa {envio_id}: {envio['enviados']} enviadas, {envio['falhas']} falhas")
+    return {**envio, "detalhes": detalhes}
+
+
+def _operacoes_estado(statuses: List[Dict[str, Any]]) -> Dict[str, List[UpdateOne]]:
+    """UpdateOne por estado de entrega, agrupados por message_id"""
+    operacoes: Dict[str, List[UpdateOne]] = {}
+    for status in statuses:
+        message_id = status.get("id")
+        ordem = ORDEM_ENTREGA.get(status.get("status"))
+        if not message_id or not ordem:
+            continue
+        alteracao = {
+            "mensagens.$.estado_entrega": status["status"],
+            "mensagens.$.ordem_entrega": ordem,
+            "mensagens.$.entrega_em": _agora(),
+        }
+        if status.get("errors"):
+            alteracao["mensagens.$.erro"] = status["errors"][0]
+        # Só avança o estado: um "delivered" atrasado não apaga um "read"
+        operacoes.setdefault(message_id, []).append(UpdateOne(
+            {"mensagens": {"$elemMatch": {"message_id": message_id, "ordem_entrega": {"$lt": ordem}}}},
+            {"$set": alteracao},
+        ))
+    return operacoes
+
+
+async def _aplicar(db, operacoes: List[UpdateOne]) -> int:
+    if not operacoes:
+        return 0
+    resultado = await db[COLECAO].bulk_write(operacoes, ordered=False)
+    _contadores["estados_webhook"] += resultado.modified_count
+    return resultado.modified_count
+
+
+async def reconciliar_estados(db, statuses: List[Dict[str, Any]]) -> int:
+    """
+    Aplicar os estados de entrega do webhook às mensagens dos envios em
+    massa. Com um envio a decorrer, os estados de message_ids ainda não
+    gravados ficam pendentes até ao fim desse envio.
+    """
+    operacoes = _operacoes_estado(statuses)
+    alteradas = await _aplicar(db, [op for ops in operacoes.values() for op in ops])
+    if not operacoes or not await db[COLECAO].find_one({"estado": "em_curso"}, {"_id": 1}):
+        return alteradas
+
+    conhecidos = set(await db[COLECAO].distinct("mensagens.message_id", {"mensagens.message_id": {"$in": list(operacoes)}}))
+    desconhecidos = [s for s in statuses if s.get("id") in operacoes and s["id"] not in conhecidos]
+    if desconhecidos:
+        agora = datetime.now(timezone.utc)
+        await db[COLECAO_PENDENTES].insert_many([
+            {"message_id": s["id"], "status": s, "recebido_em": agora} for s in desconhecidos
+        ])
+        _contadores["estados_pendentes"] += len(desconhecidos)
+        # O envio pode ter gravado o message_id entretanto (e já aplicado os pendentes)
+        alteradas += await _aplicar(db, [op for s in desconhecidos for op in operacoes[s["id"]]])
+    return alteradas
+
+
+async def _aplicar_pendentes(db, message_ids: List[str]):
+    """Aplicar os estados que chegaram antes de os message_ids estarem gravados"""
+    if not message_ids:
+        return
+    filtro = {"message_id": {"$in": message_ids}}
+    pendentes = await db[COLECAO_PENDENTES].find(filtro, {"_id": 0, "status": 1}).to_list(None)
+    if pendentes:
+        operacoes = _operacoes_estado([p["status"] for p in pendentes])
+        await _aplicar(db, [op for ops in operacoes.values() for op in ops])
+        await db[COLECAO_PENDENTES].delete_many(filtro)
+
+
+def resumo_entregas(envio: Dict[str, Any]) -> Dict[str, int]:
+    """Número de mensagens do envio em cada estado de entrega"""
+    resumo = {estado: 0 for estado in ORDEM_ENTREGA}
+    for mensagem in envio.get("mensagens", []):
+        if mensagem.get("estado_entrega") in resumo:
+            resumo[mensagem["estado_entrega"]] += 1
+    return resumo
+
+
+def estatisticas() -> Dict[str, Any]:
+    return {
+        "mensagens_por_segundo": _balde.taxa,
+        "concorrencia": clientes_http.FORNECEDORES["whatsapp"]["limite"],
+        "pausado": max(_balde.pausa_ate - time.monotonic(), 0.0),
+        **_contadores,
+    }
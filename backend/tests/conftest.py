@@ -0,0 +1,43 @@
+"""
+Fixtures partilhadas dos testes que usam o MongoDB directamente (sem HTTP).
+
+`correr(teste)` corre a coroutine `teste(db)` numa base temporária do
+MongoDB de MONGO_URL, apagada no fim; sem MongoDB acessível o teste é
+ignorado.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _cliente():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    try:
+        MongoClient(url, serverSelectionTimeoutMS=1500).admin.command("ping")
+        return AsyncIOMotorClient(url)
+    except PyMongoError:
+        pytest.skip("MongoDB não acessível")
+
+
+@pytest.fixture
+def correr():
+    def _correr(teste):
+        async def principal():
+            cliente = _cliente()
+            nome = f"test_{uuid.uuid4().hex[:12]}"
+            try:
+                await teste(cliente[nome])
+            finally:
+                await cliente.drop_database(nome)
+        asyncio.run(principal())
+    return _correr
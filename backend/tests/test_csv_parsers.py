@@ -0,0 +1,39 @@
+"""
+Parsers de CSV (utils/csv_parsers.py): o modo colunar (pandas) tem de dar
+os mesmos registos que o modo por linhas (csv.DictReader).
+"""
+
+import pytest
+
+from utils import csv_parsers
+
+pytestmark = pytest.mark.skipif(not csv_parsers.PANDAS_DISPONIVEL, reason="pandas não instalado")
+
+# Linha curta, linha com a última célula vazia e linha completa
+BOLT_IRREGULAR = (
+    "Date,Time,Trip ID,Driver,Earnings,Distance\n"
+    "2025-12-01,14:30,BOLT1,João Silva\n"
+    "2025-12-01,15:10,BOLT2,Ana Teste,\"8,40 €\",\n"
+    "2025-12-02,09:05,BOLT3,Rui Teste,12.50,15.2\n"
+).encode("utf-8")
+
+
+def _registos(modo: str) -> list:
+    sucesso, registos, _ = csv_parsers.get_parser("bolt", BOLT_IRREGULAR, modo=modo).parse()
+    assert sucesso
+    return registos
+
+
+def test_colunar_igual_a_linhas_com_linhas_irregulares():
+    parser = csv_parsers.BoltCSVParser(BOLT_IRREGULAR)
+    # O ficheiro é tratado pelo pandas, sem recorrer ao modo linhas
+    assert parser._registos_colunares(parser._decode(), ",", parser.CAMPOS, {}) is not None
+
+    colunar = _registos(csv_parsers.MODO_COLUNAR)
+    linhas = _registos(csv_parsers.MODO_LINHAS)
+    assert colunar == linhas
+
+    curta, vazia, _ = colunar
+    assert curta["dados_completos"]["Earnings"] is None
+    assert curta["dados_completos"]["Distance"] is None
+    assert vazia["dados_completos"]["Distance"] == ""
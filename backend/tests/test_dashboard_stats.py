@@ -0,0 +1,94 @@
+"""
+Contadores de `dashboard_stats` (services/dashboard_stats.py).
+
+Depois de cada escrita que muda o status/parceiro de um veículo ou o
+parceiro de um motorista, os contadores incrementais têm de coincidir com
+o que `reconciliar_dashboard_stats` recalcula de raiz.
+
+Usa o MongoDB de MONGO_URL (fixture `correr` do conftest).
+"""
+
+from services import dashboard_stats
+
+ADMIN = {"id": "admin-dashboard", "role": "admin"}
+
+
+async def _contadores(db) -> dict:
+    """Veículos e motoristas por parceiro, sem entradas a zero"""
+    contadores = {}
+    async for doc in db.dashboard_stats.find({}, {"_id": 0}):
+        vehicles = doc.get("vehicles", {})
+        motoristas = doc.get("motoristas", {})
+        por_status = {k: v for k, v in vehicles.get("por_status", {}).items() if v}
+        motoristas = {k: motoristas.get(k, 0) for k in ("total", "aprovados", "pendentes", "sem_parceiro")}
+        if vehicles.get("total", 0) or por_status or any(motoristas.values()):
+            contadores[doc["parceiro_id"]] = (vehicles.get("total", 0), por_status, motoristas)
+    return contadores
+
+
+async def _confirmar_reconciliado(db):
+    incrementais = await _contadores(db)
+    await dashboard_stats.reconciliar_dashboard_stats(db)
+    assert incrementais == await _contadores(db)
+
+
+async def _frota(db):
+    await db.users.insert_many([
+        {"id": "p1", "role": "parceiro", "email": "p1@teste.pt"},
+        {"id": "p2", "role": "parceiro", "email": "p2@teste.pt"},
+    ])
+    vehicle = {"id": "v1", "matricula": "AA-00-BB", "parceiro_id": "p1", "status": "disponivel"}
+    motorista = {"id": "m1", "name": "Ana Teste", "email": "ana@teste.pt", "parceiro_atribuido": "p1", "approved": True}
+    await db.vehicles.insert_one(dict(vehicle))
+    await db.motoristas.insert_one(dict(motorista))
+    await dashboard_stats.reconciliar_dashboard_stats(db)
+
+
+def test_atribuir_e_remover_motorista_do_veiculo(correr):
+    async def teste(db):
+        from routes import vehicles
+
+        vehicles.db = db
+        await _frota(db)
+
+        await vehicles.atribuir_motorista_vehicle("v1", {"motorista_id": "m1"}, current_user=ADMIN)
+        await _confirmar_reconciliado(db)
+        assert (await _contadores(db))["p1"][1] == {"atribuido": 1}
+
+        await vehicles.atribuir_motorista_vehicle("v1", {"motorista_id": None}, current_user=ADMIN)
+        await _confirmar_reconciliado(db)
+        assert (await _contadores(db))["p1"][1] == {"disponivel": 1}
+
+    correr(teste)
+
+
+def test_alterar_status_do_veiculo(correr):
+    async def teste(db):
+        from routes import vehicles
+
+        vehicles.db = db
+        await _frota(db)
+
+        await vehicles.update_vehicle_status("v1", {"status": "manutencao"}, current_user=ADMIN)
+        await _confirmar_reconciliado(db)
+        assert (await _contadores(db))["p1"][1] == {"manutencao": 1}
+
+    correr(teste)
+
+
+def test_atribuir_parceiro_ao_motorista(correr):
+    async def teste(db):
+        from routes import motoristas
+
+        motoristas.db = db
+        await _frota(db)
+
+        await motoristas.atribuir_parceiro_motorista(
+            "m1", {"parceiro_id": "p2", "criar_utilizador": False}, current_user=ADMIN
+        )
+        await _confirmar_reconciliado(db)
+        contadores = await _contadores(db)
+        assert contadores["p2"][2]["total"] == 1
+        assert "p1" not in contadores or contadores["p1"][2]["total"] == 0
+
+    correr(teste)
@@ -0,0 +1,86 @@
+"""
+Fila de email (services/envio_email.py): erros de configuração SMTP como
+falhas temporárias e histórico do envio em massa atualizado pela fila.
+
+O SMTP é substituído por `enviar_lote` falso; usa o MongoDB de MONGO_URL
+(fixture `correr` do conftest).
+"""
+
+from services import envio_email, fila_tarefas, relatorios_massa
+
+
+def _mensagem(para: str, parceiro_id: str = "p1") -> dict:
+    return {"para": para, "assunto": "Relatório", "html": "<p>ok</p>", "parceiro_id": parceiro_id}
+
+
+async def _tarefa_do_lote(db, lote_id: str) -> fila_tarefas.Tarefa:
+    doc = await db[fila_tarefas.COLECAO].find_one({"payload.lote_id": lote_id}, {"_id": 0})
+    return fila_tarefas.Tarefa(db, {**doc, "tentativas": 1})
+
+
+def test_erro_na_config_do_parceiro_fica_pendente_na_fila(correr, monkeypatch):
+    async def config_com_erro(db, parceiro_id):
+        raise RuntimeError("config_email corrompida")
+
+    monkeypatch.setattr(envio_email, "config_parceiro", config_com_erro)
+
+    async def teste(db):
+        resumo = await envio_email.enfileirar(db, [_mensagem("a@teste.pt"), _mensagem("b@teste.pt")], processar_agora=True)
+
+        assert resumo["pendentes"] == 2 and resumo["enviados"] == 0
+        assert resumo["tarefa_id"]
+        docs = await db[envio_email.COLECAO].find({"lote_id": resumo["lote_id"]}, {"_id": 0}).to_list(None)
+        assert {d["estado"] for d in docs} == {envio_email.PENDENTE}
+        assert all("configuração SMTP" in d["erro"] for d in docs)
+
+    correr(teste)
+
+
+def test_fila_atualiza_historico_do_envio_em_massa(correr, monkeypatch):
+    respostas = {
+        "a@teste.pt": [{"success": False, "error": "451", "temporario": True}, {"success": True}],
+        "b@teste.pt": [{"success": False, "error": "421", "temporario": True}, {"success": False, "error": "550", "temporario": False}],
+    }
+
+    async def enviar_lote(config, mensagens):
+        return [respostas[m["para"]].pop(0) for m in mensagens]
+
+    async def sem_config(db, parceiro_id):
+        return None
+
+    monkeypatch.setattr(envio_email, "enviar_lote", enviar_lote)
+    monkeypatch.setattr(envio_email, "config_parceiro", sem_config)
+
+    async def teste(db):
+        resumo = await envio_email.enfileirar(db, [_mensagem("a@teste.pt"), _mensagem("b@teste.pt")], processar_agora=True)
+        a, b = resumo["ids"]
+        await db.historico_relatorios.insert_many([
+            {"id": "h-a", "email_id": a, "status": "pendente", "estado_relatorio": "pendente"},
+            {"id": "h-b", "email_id": b, "status": "pendente", "estado_relatorio": "pendente"},
+        ])
+
+        await envio_email.tarefa_enviar_lote(db, await _tarefa_do_lote(db, resumo["lote_id"]))
+
+        historico = {h["id"]: h["status"] async for h in db.historico_relatorios.find({}, {"_id": 0})}
+        assert historico == {"h-a": "enviado", "h-b": "falhado"}
+
+    correr(teste)
+
+
+def test_atualizar_historico_so_com_estados_finais(correr):
+    async def teste(db):
+        await db[envio_email.COLECAO].insert_many([
+            {"id": "e1", "estado": envio_email.ENVIADO},
+            {"id": "e2", "estado": envio_email.PENDENTE},
+        ])
+        await db.historico_relatorios.insert_many([
+            {"id": "h1", "email_id": "e1", "status": "pendente"},
+            {"id": "h2", "email_id": "e2", "status": "pendente"},
+        ])
+
+        await relatorios_massa.atualizar_historico_emails(db, {"e1": envio_email.ENVIADO, "e2": envio_email.PENDENTE})
+
+        historico = {h["id"]: h["status"] async for h in db.historico_relatorios.find({}, {"_id": 0})}
+        assert historico == {"h1": "enviado", "h2": "pendente"}
+
+    correr(teste)
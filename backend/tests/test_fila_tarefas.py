@@ -0,0 +1,170 @@
+"""
+Fila de tarefas (services/fila_tarefas.py): reclamar, heartbeat e órfãs,
+repetição com backoff, limites por grupo e `_terminar` só pelo worker que
+ainda tem a tarefa.
+
+Usa o MongoDB de MONGO_URL (fixture `correr` do conftest).
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from services import fila_tarefas
+
+FILA = "teste"
+OK = "teste.ok"
+FALHA = "teste.falha"
+
+
+@fila_tarefas.registar(OK, fila=FILA)
+async def _ok(db, tarefa):
+    return {"payload": tarefa.payload}
+
+
+@fila_tarefas.registar(FALHA, fila=FILA)
+async def _falha(db, tarefa):
+    raise RuntimeError("falhou")
+
+
+@pytest.fixture
+def limite_grupo():
+    fila_tarefas.definir_limite("teste:grupo", 1)
+    yield "teste:grupo"
+    fila_tarefas._limites.pop("teste:grupo", None)
+
+
+async def _envelhecer_heartbeat(db, tarefa_id: str):
+    antigo = fila_tarefas._agora() - timedelta(seconds=fila_tarefas.FILA_TAREFAS_TIMEOUT + 60)
+    await db[fila_tarefas.COLECAO].update_one({"id": tarefa_id}, {"$set": {"heartbeat": antigo}})
+
+
+def test_reclamar_por_prioridade(correr):
+    async def teste(db):
+        baixa = await fila_tarefas.enfileirar(db, OK, {"n": 1})
+        alta = await fila_tarefas.enfileirar(db, OK, {"n": 2}, prioridade=10)
+
+        primeira = await fila_tarefas._reclamar(db, "w1", FILA)
+        assert primeira["id"] == alta["id"]
+        assert primeira["estado"] == fila_tarefas.EM_EXECUCAO
+        assert primeira["worker"] == "w1" and primeira["tentativas"] == 1
+
+        assert (await fila_tarefas._reclamar(db, "w2", FILA))["id"] == baixa["id"]
+        assert await fila_tarefas._reclamar(db, "w3", FILA) is None
+        # Tarefas de outra fila não são servidas por estes workers
+        assert await fila_tarefas._reclamar(db, "w4", fila_tarefas.FILA_GERAL) is None
+
+    correr(teste)
+
+
+def test_executar_conclui_com_resultado(correr):
+    async def teste(db):
+        tarefa = await fila_tarefas.enfileirar(db, OK, {"n": 1})
+        await fila_tarefas._executar(db, await fila_tarefas._reclamar(db, "w1", FILA))
+
+        doc = await fila_tarefas.obter(db, tarefa["id"])
+        assert doc["estado"] == fila_tarefas.CONCLUIDA
+        assert doc["resultado"] == {"payload": {"n": 1}}
+        assert doc["terminado_em"] is not None
+
+    correr(teste)
+
+
+def test_repetir_com_backoff_ate_max_tentativas(correr):
+    async def teste(db):
+        tarefa = await fila_tarefas.enfileirar(db, FALHA, {}, max_tentativas=2)
+
+        antes = fila_tarefas._agora()
+        await fila_tarefas._executar(db, await fila_tarefas._reclamar(db, "w1", FILA))
+        doc = await fila_tarefas.obter(db, tarefa["id"])
+        assert doc["estado"] == fila_tarefas.PENDENTE
+        assert doc["erro"] == "falhou"
+        espera = (doc["disponivel_em"].replace(tzinfo=antes.tzinfo) - antes).total_seconds()
+        assert 29 <= espera <= 35
+        # Ainda em backoff: não é reclamada
+        assert await fila_tarefas._reclamar(db, "w1", FILA) is None
+
+        await db[fila_tarefas.COLECAO].update_one({"id": tarefa["id"]}, {"$set": {"disponivel_em": antes}})
+        await fila_tarefas._executar(db, await fila_tarefas._reclamar(db, "w1", FILA))
+        doc = await fila_tarefas.obter(db, tarefa["id"])
+        assert doc["estado"] == fila_tarefas.FALHADA
+        assert doc["tentativas"] == 2
+
+    correr(teste)
+
+
+def test_orfas_voltam_a_fila_ou_falham(correr):
+    async def teste(db):
+        repetir = await fila_tarefas.enfileirar(db, OK, {}, max_tentativas=2)
+        ultima = await fila_tarefas.enfileirar(db, OK, {}, max_tentativas=1)
+        for _ in range(2):
+            await fila_tarefas._reclamar(db, "w1", FILA)
+
+        # Com heartbeat recente nada é recuperado
+        assert await fila_tarefas.recuperar_orfas(db) == 0
+
+        await _envelhecer_heartbeat(db, repetir["id"])
+        await _envelhecer_heartbeat(db, ultima["id"])
+        assert await fila_tarefas.recuperar_orfas(db) == 2
+
+        assert (await fila_tarefas.obter(db, repetir["id"]))["estado"] == fila_tarefas.PENDENTE
+        doc = await fila_tarefas.obter(db, ultima["id"])
+        assert doc["estado"] == fila_tarefas.FALHADA
+        assert doc["erro"] == "Worker deixou de responder"
+
+    correr(teste)
+
+
+def test_limite_por_grupo(correr, limite_grupo):
+    async def teste(db):
+        primeira = await fila_tarefas.enfileirar(db, OK, {}, grupos=[limite_grupo])
+        segunda = await fila_tarefas.enfileirar(db, OK, {}, grupos=[limite_grupo])
+        livre = await fila_tarefas.enfileirar(db, OK, {})
+
+        assert (await fila_tarefas._reclamar(db, "w1", FILA))["id"] == primeira["id"]
+        # O grupo está cheio: passa à frente a tarefa sem grupo
+        assert (await fila_tarefas._reclamar(db, "w2", FILA))["id"] == livre["id"]
+        assert await fila_tarefas._reclamar(db, "w3", FILA) is None
+
+        await fila_tarefas._executar(db, await fila_tarefas.obter(db, primeira["id"]))
+        assert (await fila_tarefas._reclamar(db, "w3", FILA))["id"] == segunda["id"]
+
+    correr(teste)
+
+
+def test_terminar_so_pelo_worker_que_tem_a_tarefa(correr):
+    async def teste(db):
+        tarefa = await fila_tarefas.enfileirar(db, OK, {}, max_tentativas=3)
+        lento = await fila_tarefas._reclamar(db, "w1", FILA)
+
+        # w1 deixa de dar sinal, a tarefa volta à fila e w2 reclama-a
+        await _envelhecer_heartbeat(db, tarefa["id"])
+        await fila_tarefas.recuperar_orfas(db)
+        atual = await fila_tarefas._reclamar(db, "w2", FILA)
+        assert atual["worker"] == "w2" and atual["tentativas"] == 2
+
+        # w1 acaba depois: não fecha a tarefa que já é de w2
+        assert await fila_tarefas._terminar(db, lento, {"estado": fila_tarefas.CONCLUIDA}) is False
+        doc = await fila_tarefas.obter(db, tarefa["id"])
+        assert doc["estado"] == fila_tarefas.EM_EXECUCAO and doc["worker"] == "w2"
+
+        assert await fila_tarefas._terminar(db, atual, {"estado": fila_tarefas.CONCLUIDA}) is True
+        assert (await fila_tarefas.obter(db, tarefa["id"]))["estado"] == fila_tarefas.CONCLUIDA
+
+    correr(teste)
+
+
+def test_cancelar_pendente_e_pedir_paragem_em_execucao(correr):
+    async def teste(db):
+        pendente = await fila_tarefas.enfileirar(db, OK, {})
+        assert (await fila_tarefas.cancelar(db, pendente["id"]))["estado"] == fila_tarefas.CANCELADA
+
+        a_correr = await fila_tarefas.enfileirar(db, OK, {})
+        doc = await fila_tarefas._reclamar(db, "w1", FILA)
+        assert (await fila_tarefas.cancelar(db, a_correr["id"]))["cancelamento_pedido"] is True
+
+        tarefa = fila_tarefas.Tarefa(db, doc)
+        with pytest.raises(fila_tarefas.TarefaCancelada):
+            await tarefa.progresso(50)
+
+    correr(teste)
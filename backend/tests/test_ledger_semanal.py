@@ -0,0 +1,128 @@
+"""
+Ledger semanal (services/ledger_semanal.py) e quem o lê.
+
+O resumo semanal no ecrã, o PDF do resumo e o histórico semanal do
+parceiro têm de dar os mesmos totais que o ledger, também depois de uma
+escrita que o invalida.
+
+Usa o MongoDB de MONGO_URL (fixture `correr` do conftest).
+"""
+
+import uuid
+
+from services import ledger_semanal
+
+SEMANA, ANO = 10, 2025
+PARCEIRO = {"id": "parceiro-ledger", "role": "parceiro"}
+
+
+async def _frota(db) -> list:
+    """Dois motoristas do parceiro, com ganhos Uber/Bolt, combustível e aluguer"""
+    await db.vehicles.insert_many([
+        {"id": "v1", "matricula": "AA-00-BB", "tipo_contrato_veiculo": "aluguer", "valor_aluguer_semanal": 200},
+        {"id": "v2", "matricula": "CC-11-DD", "tipo_contrato_veiculo": "comissao"},
+    ])
+    motoristas = [
+        {"id": "m1", "name": "Ana Teste", "email": "ana@teste.pt", "parceiro_atribuido": PARCEIRO["id"],
+         "ativo": True, "veiculo_atribuido": "v1"},
+        {"id": "m2", "name": "Rui Teste", "email": "rui@teste.pt", "parceiro_atribuido": PARCEIRO["id"],
+         "ativo": True, "veiculo_atribuido": "v2"},
+    ]
+    await db.motoristas.insert_many([dict(m) for m in motoristas])
+    await db.ganhos_uber.insert_many([
+        {"id": str(uuid.uuid4()), "motorista_id": "m1", "semana": SEMANA, "ano": ANO, "rendimentos": 500, "portagens": 10},
+        {"id": str(uuid.uuid4()), "motorista_id": "m2", "semana": SEMANA, "ano": ANO, "rendimentos": 320},
+    ])
+    await db.ganhos_bolt.insert_one(
+        {"id": str(uuid.uuid4()), "motorista_id": "m1", "periodo_semana": SEMANA, "periodo_ano": ANO, "ganhos_liquidos": 300}
+    )
+    await db.despesas_extras.insert_one(
+        {"id": str(uuid.uuid4()), "motorista_id": "m2", "semana": SEMANA, "ano": ANO, "valor": 25, "tipo": "debito"}
+    )
+    return motoristas
+
+
+def _totais_ledger(ledgers: dict) -> dict:
+    totais = {"uber": 0.0, "bolt": 0.0, "aluguer": 0.0, "extras": 0.0}
+    for ledger in ledgers.values():
+        fontes = ledger["fontes"]
+        totais["uber"] += fontes["uber"]["ganhos"] + fontes["uber"]["portagens"] + fontes["uber"]["gratificacoes"]
+        totais["bolt"] += fontes["bolt"]["ganhos"]
+        totais["extras"] += fontes["extras"]["total"]
+    return totais
+
+
+async def _comparar(db, motoristas):
+    from routes import relatorios
+
+    relatorios.db = db
+    ledgers = await ledger_semanal.obter(db, motoristas, SEMANA, ANO)
+    ecra = await relatorios.get_resumo_semanal_parceiro(semana=SEMANA, ano=ANO, current_user=PARCEIRO)
+    pdf = await relatorios._dados_resumo_semanal_pdf(PARCEIRO, SEMANA, ANO)
+    historico = await relatorios.get_historico_semanal_parceiro(
+        semanas=1, semana_atual=SEMANA, ano_atual=ANO, current_user=PARCEIRO
+    )
+
+    ledger = _totais_ledger(ledgers)
+    t_ecra, t_pdf = ecra["totais"], pdf["totais"]
+    uber_ecra = t_ecra["total_ganhos_uber"] + t_ecra["total_uber_portagens"] + t_ecra["total_uber_gratificacoes"]
+    uber_pdf = t_pdf["ganhos_uber"] + t_pdf["uber_portagens"] + t_pdf["uber_gratificacoes"]
+
+    assert round(uber_ecra, 2) == round(uber_pdf, 2) == round(ledger["uber"], 2)
+    assert round(t_ecra["total_ganhos_bolt"], 2) == round(t_pdf["ganhos_bolt"], 2) == round(ledger["bolt"], 2)
+    assert round(t_ecra["total_extras"], 2) == round(t_pdf["extras"], 2) == round(ledger["extras"], 2)
+    assert round(t_ecra["total_aluguer"], 2) == round(t_pdf["aluguer"], 2)
+    assert round(t_ecra["total_liquido_motoristas"], 2) == round(t_pdf["liquido"], 2)
+    assert historico["historico"][0]["ganhos"] == round(t_ecra["total_ganhos"], 2)
+    return ledger, t_ecra
+
+
+def test_ledger_so_recalcula_depois_de_invalidado(correr):
+    async def teste(db):
+        motoristas = await _frota(db)
+
+        primeiro = await ledger_semanal.obter(db, motoristas, SEMANA, ANO)
+        assert primeiro["m1"]["fontes"]["uber"]["ganhos"] == 490
+        assert primeiro["m1"]["fontes"]["aluguer"]["valor"] == 200
+
+        # Sem escritas: devolve o guardado
+        await db.ganhos_uber.insert_one({"motorista_id": "m1", "semana": SEMANA, "ano": ANO, "rendimentos": 50})
+        segundo = await ledger_semanal.obter(db, motoristas, SEMANA, ANO)
+        assert segundo["m1"]["fontes"]["uber"]["ganhos"] == 490
+
+        assert await ledger_semanal.invalidar_registos(db, [{"motorista_id": "m1", "semana": SEMANA, "ano": ANO}]) == 1
+        terceiro = await ledger_semanal.obter(db, motoristas, SEMANA, ANO)
+        assert terceiro["m1"]["fontes"]["uber"]["ganhos"] == 540
+        assert terceiro["m2"]["calculado_em"] == segundo["m2"]["calculado_em"]
+
+    correr(teste)
+
+
+def test_ajuste_manual_sobrepoe_ledger():
+    ledger = {"fontes": {
+        "uber": {"ganhos": 100, "portagens": 5, "gratificacoes": 2},
+        "bolt": {"ganhos": 50, "campanha": 0},
+        "via_verde": {"total": 12}, "combustivel": {"total": 30}, "eletrico": {"total": 0},
+        "aluguer": {"valor": 200}, "extras": {"total": 0},
+    }}
+    valores = ledger_semanal.aplicar_ajuste(ledger, {"ganhos_bolt": 80, "extras": 15})
+    assert valores["ganhos_bolt"] == 80
+    assert valores["extras"] == 15
+    assert valores["ganhos_uber"] == 100
+
+
+def test_ecra_pdf_e_ledger_com_os_mesmos_totais(correr):
+    async def teste(db):
+        motoristas = await _frota(db)
+        antes, _ = await _comparar(db, motoristas)
+
+        # Escrita que invalida o ledger (nova importação Uber de m2)
+        registo = {"id": str(uuid.uuid4()), "motorista_id": "m2", "semana": SEMANA, "ano": ANO, "rendimentos": 80}
+        await db.ganhos_uber.insert_one(dict(registo))
+        await ledger_semanal.invalidar_registos(db, [registo])
+
+        depois, ecra = await _comparar(db, motoristas)
+        assert round(depois["uber"] - antes["uber"], 2) == 80
+        assert ecra["total_aluguer"] == 200  # só o contrato de aluguer
+
+    correr(teste)
@@ -0,0 +1,64 @@
+"""
+Contadores de não lidas das conversas (services/nao_lidas.py).
+
+Conversas criadas antes do campo `nao_lidas` são preenchidas na primeira
+mensagem nova; a mensagem que provoca o preenchimento não pode ser contada
+duas vezes (uma pela agregação e outra pelo `$inc`).
+
+Usa o MongoDB de MONGO_URL (fixture `correr` do conftest).
+"""
+
+import uuid
+
+from services import nao_lidas
+
+
+def _mensagem(conversa_id: str, remetente_id: str, lida: bool = False) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "conversa_id": conversa_id,
+        "remetente_id": remetente_id,
+        "conteudo": "olá",
+        "lida": lida,
+    }
+
+
+async def _conversa_sem_campo(db) -> dict:
+    """Conversa antiga (sem `nao_lidas`) com uma mensagem por ler de A para B"""
+    conversa = {"id": str(uuid.uuid4()), "participantes": ["a", "b"]}
+    await db.conversas.insert_one(dict(conversa))
+    await db.mensagens.insert_one(_mensagem(conversa["id"], "a"))
+    await db.mensagens.insert_one(_mensagem(conversa["id"], "b", lida=True))
+    return conversa
+
+
+def test_primeira_mensagem_numa_conversa_antiga_conta_uma_vez(correr):
+    async def teste(db):
+        conversa = await _conversa_sem_campo(db)
+
+        destinatarios = await nao_lidas.registar_mensagem(db, conversa, _mensagem(conversa["id"], "a"))
+
+        assert destinatarios == ["b"]
+        guardada = await db.conversas.find_one({"id": conversa["id"]})
+        assert guardada[nao_lidas.CAMPO] == {"a": 0, "b": 2}
+        assert (await nao_lidas.resumo_conversas(db, "b"))["total_nao_lidas"] == 2
+
+    correr(teste)
+
+
+def test_mensagens_seguintes_somam_um(correr):
+    async def teste(db):
+        conversa = await _conversa_sem_campo(db)
+
+        await nao_lidas.registar_mensagem(db, conversa, _mensagem(conversa["id"], "a"))
+        await nao_lidas.registar_mensagem(db, conversa, _mensagem(conversa["id"], "b"))
+        await nao_lidas.registar_mensagem(db, conversa, _mensagem(conversa["id"], "a"))
+
+        guardada = await db.conversas.find_one({"id": conversa["id"]})
+        assert guardada[nao_lidas.CAMPO] == {"a": 1, "b": 3}
+        nao_lidas_b = await db.mensagens.count_documents(
+            {"conversa_id": conversa["id"], "remetente_id": "a", "lida": False}
+        )
+        assert guardada[nao_lidas.CAMPO]["b"] == nao_lidas_b
+
+    correr(teste)
@@ -0,0 +1,88 @@
+"""
+Conversão de uploads em segundo plano (services/uploads_processamento.py):
+o documento aponta para o original até o PDF existir e um upload
+substituído entretanto não escreve por cima do PDF do mais recente.
+
+A conversão corre no processo do teste (sem pool); usa o MongoDB de
+MONGO_URL (fixture `correr` do conftest).
+"""
+
+from services import executor_service, fila_tarefas, uploads_processamento
+
+
+def _imagem(caminho):
+    from PIL import Image
+
+    Image.new("RGB", (40, 30), (200, 10, 10)).save(caminho, "PNG")
+    return str(caminho)
+
+
+async def _tarefa(db, upload_id: str) -> fila_tarefas.Tarefa:
+    doc = await db[fila_tarefas.COLECAO].find_one({"payload.upload_id": upload_id}, {"_id": 0})
+    return fila_tarefas.Tarefa(db, {**doc, "tentativas": 1})
+
+
+def _sem_pool(monkeypatch):
+    async def executar_cpu(func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(executor_service, "executar_cpu", executar_cpu)
+
+
+async def _enfileirar(db, upload_id, origem, pdf):
+    await db.documentos_validacao.insert_one({"id": upload_id, "file_path": origem})
+    await uploads_processamento.enfileirar(
+        db,
+        upload_id,
+        origem,
+        pdf=pdf,
+        referencia={
+            "colecao": "documentos_validacao",
+            "filtro": {"id": upload_id},
+            "campo": "file_path",
+            "valor_erro": origem,
+            "valor_ok": pdf,
+        },
+        remover_origem=True,
+    )
+
+
+def test_documento_passa_para_o_pdf_no_fim(correr, monkeypatch, tmp_path):
+    _sem_pool(monkeypatch)
+    origem = _imagem(tmp_path / "carta_u1.png")
+    pdf = str(tmp_path / "carta.pdf")
+
+    async def teste(db):
+        await _enfileirar(db, "u1", origem, pdf)
+        # Enquanto a conversão está pendente o documento aponta para o original
+        assert (await db.documentos_validacao.find_one({"id": "u1"}))["file_path"] == origem
+
+        resultado = await uploads_processamento.processar(db, await _tarefa(db, "u1"))
+
+        assert resultado["status"] == uploads_processamento.CONCLUIDO
+        assert (await db.documentos_validacao.find_one({"id": "u1"}))["file_path"] == pdf
+        assert open(pdf, "rb").read(4) == b"%PDF"
+        assert not (tmp_path / "carta_u1.png").exists()
+
+    correr(teste)
+
+
+def test_upload_substituido_nao_escreve_pdf(correr, monkeypatch, tmp_path):
+    _sem_pool(monkeypatch)
+    origem = _imagem(tmp_path / "carta_u1.png")
+    pdf = tmp_path / "carta.pdf"
+
+    async def teste(db):
+        await _enfileirar(db, "u1", origem, str(pdf))
+        # Um PDF carregado depois substitui o documento antes de a fila chegar à imagem
+        pdf.write_bytes(b"novo")
+        await db.documentos_validacao.update_one({"id": "u1"}, {"$set": {"id": "u2", "file_path": str(pdf)}})
+
+        resultado = await uploads_processamento.processar(db, await _tarefa(db, "u1"))
+
+        assert resultado["status"] == uploads_processamento.SUBSTITUIDO
+        assert pdf.read_bytes() == b"novo"
+        assert (await db.documentos_validacao.find_one({"id": "u2"}))["file_path"] == str(pdf)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["carta.pdf"]
+
+    correr(teste)
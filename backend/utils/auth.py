@@ -8,6 +8,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Dict, Any
 import os
 
+from .user_cache import obter_utilizador, obter_features_plano
+
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
@@ -43,19 +45,15 @@ def create_access_token(user_id: str, email: str, role: str) -> str:
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db = None  # Will be injected
-) -> Dict[str, Any]:
-    """Get current user from JWT token"""
+async def get_user_from_token(token: str, db = None) -> Dict[str, Any]:
+    """Get user from a raw JWT (WebSocket/SSE clients send it as a query param)"""
     if db is None:
         from .database import get_database
         db = get_database()
     
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+        user = await obter_utilizador(db, payload["user_id"])
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -65,6 +63,14 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db = None  # Will be injected
+) -> Dict[str, Any]:
+    """Get current user from JWT token"""
+    return await get_user_from_token(credentials.credentials, db)
+
+
 async def check_feature_access(user: Dict, feature_name: str, db = None) -> bool:
     """Check if user has access to a specific feature based on their subscription"""
     if db is None:
@@ -83,13 +89,6 @@ async def check_feature_access(user: Dict, feature_name: str, db = None) -> bool
         # No subscription = no access to premium features
         return False
     
-    subscription = await db.subscriptions.find_one({"id": subscription_id, "status": "ativo"}, {"_id": 0})
-    if not subscription:
-        return False
-    
-    # Get plan features
-    plano = await db.planos.find_one({"id": subscription["plano_id"]}, {"_id": 0})
-    if not plano:
-        return False
-    
-    return feature_name in plano.get("features", [])
+    # Get plan features (cached per user/subscription)
+    features = await obter_features_plano(db, user)
+    return feature_name in features
@@ -0,0 +1,170 @@
+"""
+Cache de respostas dos endpoints de configuração (por processo).
+
+Planos, módulos, textos legais e contactos mudam poucas vezes por mês,
+mas as páginas públicas e a app móvel pedem-nos em cada arranque e cada
+pedido ia ao MongoDB. Aqui cada resposta fica em memória com:
+
+- TTL por chave (`CACHE_CONFIG_TTL` por omissão);
+- grupo (`planos`, `modulos`, `configuracoes`): as rotas de escrita chamam
+  `invalidar(db, grupo)`, que limpa o grupo neste processo e incrementa a
+  versão do grupo em `cache_versoes`;
+- os outros processos comparam essas versões no máximo a cada
+  `CACHE_CONFIG_SYNC_SEGUNDOS` (0 desativa) e limpam os grupos alterados;
+- ETag: `responder` devolve 304 quando o `If-None-Match` do cliente
+  coincide, sem reenviar o corpo.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONFIG_TTL = int(os.environ.get("CACHE_CONFIG_TTL", "300"))
+CACHE_CONFIG_SYNC_SEGUNDOS = float(os.environ.get("CACHE_CONFIG_SYNC_SEGUNDOS", "5"))
+CACHE_CONFIG_MAXSIZE = int(os.environ.get("CACHE_CONFIG_MAXSIZE", "500"))
+
+COLECAO_VERSOES = "cache_versoes"
+
+PLANOS = "planos"
+MODULOS = "modulos"
+CONFIGURACOES = "configuracoes"
+
+# (grupo, chave) -> (valor já serializável, etag, expira_em)
+_entradas: Dict[Tuple[str, str], Tuple[Any, str, float]] = {}
+_versoes: Dict[str, int] = {}
+# Incrementa a cada limpeza local: um carregamento que começou antes não é guardado
+_geracoes: Dict[str, int] = {}
+_ultima_sincronizacao = 0.0
+
+_contadores = {"hits": 0, "misses": 0, "nao_modificado": 0, "invalidacoes": 0, "invalidacoes_remotas": 0}
+
+
+def _limpar_grupo(grupo: str):
+    _geracoes[grupo] = _geracoes.get(grupo, 0) + 1
+    for chave in [c for c in _entradas if c[0] == grupo]:
+        _entradas.pop(chave, None)
+
+
+def _etag(valor: Any) -> str:
+    corpo = json.dumps(valor, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(corpo.encode()).hexdigest() + '"'
+
+
+async def _sincronizar(db):
+    """Limpar os grupos invalidados por outros processos (versões em cache_versoes)"""
+    global _ultima_sincronizacao
+    if CACHE_CONFIG_SYNC_SEGUNDOS <= 0 or db is None:
+        return
+    agora = time.monotonic()
+    if agora - _ultima_sincronizacao < CACHE_CONFIG_SYNC_SEGUNDOS:
+        return
+    _ultima_sincronizacao = agora
+    try:
+        async for doc in db[COLECAO_VERSOES].find({}, {"_id": 0, "grupo": 1, "versao": 1}):
+            grupo, versao = doc.get("grupo"), doc.get("versao", 0)
+            if _versoes.get(grupo) != versao:
+                if grupo in _versoes or any(c[0] == grupo for c in _entradas):
+                    _contadores["invalidacoes_remotas"] += 1
+                _limpar_grupo(grupo)
+                _versoes[grupo] = versao
+    except Exception as e:
+        logger.warning(f"Erro ao sincronizar versões da cache de configuração: {e}")
+
+
+async def obter(
+    db,
+    grupo: str,
+    chave: str,
+    carregar: Callable[[], Awaitable[Any]],
+    ttl: Optional[int] = None,
+) -> Tuple[Any, str]:
+    """Valor (serializável) e ETag de `chave`, lido da cache ou de `carregar()`"""
+    await _sincronizar(db)
+    entrada = _entradas.get((grupo, chave))
+    if entrada and entrada[2] > time.monotonic():
+        _contadores["hits"] += 1
+        return copy.deepcopy(entrada[0]), entrada[1]
+
+    _contadores["misses"] += 1
+    geracao = _geracoes.get(grupo, 0)
+    valor = jsonable_encoder(await carregar())
+    etag = _etag(valor)
+    if _geracoes.get(grupo, 0) != geracao:
+        return copy.deepcopy(valor), etag
+    if len(_entradas) >= CACHE_CONFIG_MAXSIZE:
+        # Descartar a entrada que expira primeiro
+        _entradas.pop(min(_entradas, key=lambda c: _entradas[c][2]), None)
+    _entradas[(grupo, chave)] = (valor, etag, time.monotonic() + (ttl or CACHE_CONFIG_TTL))
+    return copy.deepcopy(valor), etag
+
+
+async def responder(
+    request: Request,
+    db,
+    grupo: str,
+    chave: str,
+    carregar: Callable[[], Awaitable[Any]],
+    ttl: Optional[int] = None,
+) -> Response:
+    """Resposta JSON com ETag, ou 304 se o cliente já tem esta versão"""
+    valor, etag = await obter(db, grupo, chave, carregar, ttl)
+    return resposta(request, valor, etag)
+
+
+def resposta(request: Request, valor: Any, etag: Optional[str] = None) -> Response:
+    """Como `responder`, para um valor já obtido (ETag calculado se faltar)"""
+    if etag is None:
+        valor = jsonable_encoder(valor)
+        etag = _etag(valor)
+    # no-cache: o cliente guarda a resposta mas revalida sempre com If-None-Match
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    pedidas = request.headers.get("if-none-match", "")
+    if etag in [e.strip().removeprefix("W/") for e in pedidas.split(",")] or pedidas.strip() == "*":
+        _contadores["nao_modificado"] += 1
+        return Response(status_code=304, headers=cabecalhos)
+    return JSONResponse(content=valor, headers=cabecalhos)
+
+
+async def invalidar(db, *grupos: str):
+    """Limpar `grupos` neste processo e avisar os outros (versão em cache_versoes)"""
+    _contadores["invalidacoes"] += 1
+    for grupo in grupos:
+        _limpar_grupo(grupo)
+        if db is None:
+            continue
+        try:
+            doc = await db[COLECAO_VERSOES].find_one_and_update(
+                {"grupo": grupo},
+                {"$inc": {"versao": 1}},
+                upsert=True,
+                projection={"_id": 0, "versao": 1},
+                return_document=True,
+            )
+            if doc:
+                _versoes[grupo] = doc.get("versao", 0)
+        except Exception as e:
+            logger.warning(f"Erro ao publicar invalidação da cache ({grupo}): {e}")
+
+
+def estatisticas() -> Dict[str, Any]:
+    grupos: Dict[str, int] = {}
+    for grupo, _ in _entradas:
+        grupos[grupo] = grupos.get(grupo, 0) + 1
+    return {
+        "ttl_segundos": CACHE_CONFIG_TTL,
+        "sync_segundos": CACHE_CONFIG_SYNC_SEGUNDOS,
+        "entradas": len(_entradas),
+        "por_grupo": grupos,
+        "versoes": dict(_versoes),
+        **_contadores,
+    }
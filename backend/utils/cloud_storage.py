@@ -25,11 +25,14 @@ from dropbox.files import WriteMode
 # Microsoft (OneDrive)
 import msal
 
+from services import clientes_http, executor_service
 from utils.database import get_database
 
 logger = logging.getLogger(__name__)
 db = get_database()
 
+GRAPH_API_URL = "https://graph.microsoft.com/v1.0"
+
 
 class CloudStorageProvider(ABC):
     """Abstract base class for cloud storage providers"""
@@ -299,25 +302,35 @@ class OneDriveProvider(CloudStorageProvider):
         self._refresh_token = credentials.get('refresh_token')
     
     async def _get_token(self) -> str:
-        """Get or refresh access token"""
-        # Try to refresh if we have refresh token
-        if self._refresh_token:
-            app = msal.ConfidentialClientApplication(
-                os.environ.get('MICROSOFT_CLIENT_ID'),
-                client_credential=os.environ.get('MICROSOFT_CLIENT_SECRET'),
-                authority="https://login.microsoftonline.com/common"
-            )
-            
-            result = app.acquire_token_by_refresh_token(
-                self._refresh_token,
-                scopes=["Files.ReadWrite.All"]
-            )
-            
-            if 'access_token' in result:
-                self._access_token = result['access_token']
-                self._refresh_token = result.get('refresh_token', self._refresh_token)
+        """Get or refresh access token (cached per refresh token until it expires)"""
+        if not self._refresh_token:
+            return self._access_token
+        
+        chave = clientes_http.tokens.chave("onedrive", self.credentials.get('refresh_token'))
+        return await clientes_http.tokens.obter(chave, self._refresh_access_token)
+    
+    async def _refresh_access_token(self):
+        app = msal.ConfidentialClientApplication(
+            os.environ.get('MICROSOFT_CLIENT_ID'),
+            client_credential=os.environ.get('MICROSOFT_CLIENT_SECRET'),
+            authority="https://login.microsoftonline.com/common"
+        )
+        
+        # msal is synchronous: run it off the event loop
+        result = await executor_service.executar_io(
+            app.acquire_token_by_refresh_token,
+            self._refresh_token,
+            scopes=["Files.ReadWrite.All"]
+        )
         
-        return self._access_token
+        if 'access_token' not in result:
+            # Use the stored token for this call only: a failed refresh is not cached
+            logger.warning(f"OneDrive token refresh failed: {result.get('error_description') or result.get('error')}")
+            return self._access_token, 0
+        
+        self._access_token = result['access_token']
+        self._refresh_token = result.get('refresh_token', self._refresh_token)
+        return self._access_token, result.get('expires_in', 3600)
     
     async def _request(self, method: str, endpoint: str, **kwargs) -> Dict:
         """Make authenticated request to Graph API"""
@@ -327,14 +340,13 @@ class OneDriveProvider(CloudStorageProvider):
             'Content-Type': 'application/json'
         }
         
-        async with httpx.AsyncClient() as client:
-            url = f"https://graph.microsoft.com/v1.0{endpoint}"
-            response = await client.request(method, url, headers=headers, **kwargs)
-            response.raise_for_status()
-            
-            if response.content:
-                return response.json()
-            return {}
+        url = f"{GRAPH_API_URL}{endpoint}"
+        response = await clientes_http.pedido('onedrive', method, url, headers=headers, **kwargs)
+        response.raise_for_status()
+        
+        if response.content:
+            return response.json()
+        return {}
     
     async def _ensure_folder_exists(self, folder_path: str) -> str:
         """Create folder structure if it doesn't exist, return folder ID"""
@@ -372,14 +384,15 @@ class OneDriveProvider(CloudStorageProvider):
         # For files < 4MB, use simple upload
         if len(file_content) < 4 * 1024 * 1024:
             token = await self._get_token()
-            async with httpx.AsyncClient() as client:
-                response = await client.put(
-                    f"https://graph.microsoft.com/v1.0/me/drive/root:/{file_path}:/content",
-                    headers={'Authorization': f'Bearer {token}'},
-                    content=file_content
-                )
-                response.raise_for_status()
-                result = response.json()
+            response = await clientes_http.pedido(
+                'onedrive',
+                'PUT',
+                f"{GRAPH_API_URL}/me/drive/root:/{file_path}:/content",
+                headers={'Authorization': f'Bearer {token}'},
+                content=file_content
+            )
+            response.raise_for_status()
+            result = response.json()
         else:
             # TODO: Implement resumable upload for larger files
             raise Exception("Files larger than 4MB require resumable upload (not implemented)")
@@ -401,14 +414,15 @@ class OneDriveProvider(CloudStorageProvider):
     
     async def download_file(self, file_id: str) -> bytes:
         token = await self._get_token()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://graph.microsoft.com/v1.0/me/drive/items/{file_id}/content",
-                headers={'Authorization': f'Bearer {token}'},
-                follow_redirects=True
-            )
-            response.raise_for_status()
-            return response.content
+        response = await clientes_http.pedido(
+            'onedrive',
+            'GET',
+            f"{GRAPH_API_URL}/me/drive/items/{file_id}/content",
+            headers={'Authorization': f'Bearer {token}'},
+            follow_redirects=True
+        )
+        response.raise_for_status()
+        return response.content
     
     async def delete_file(self, file_id: str) -> bool:
         await self._request('DELETE', f"/me/drive/items/{file_id}")
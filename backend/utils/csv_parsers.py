@@ -7,6 +7,7 @@ import logging
 from datetime import datetime, timezone
 from typing import List, Dict, Tuple
 import re
+import warnings
 
 logger = logging.getLogger(__name__)
 
@@ -48,25 +49,73 @@ def extract_dates_from_filename(filename: str) -> Tuple[str, str, str]:
         logger.warning(f"⚠️ Erro ao extrair datas do filename: {e}")
         return '', '', ''
 
+try:
+    import pandas as pd
+    PANDAS_DISPONIVEL = True
+except ImportError:
+    pd = None
+    PANDAS_DISPONIVEL = False
+
+# Modos de parse: 'colunar' resolve os headers uma vez por ficheiro e converte
+# colunas inteiras de uma vez (pandas); 'linhas' usa csv.DictReader linha a linha
+MODO_COLUNAR = 'colunar'
+MODO_LINHAS = 'linhas'
+
+# Bytes usados para detectar o encoding (em vez de descodificar o ficheiro inteiro)
+ENCODING_PREFIXO_BYTES = 64 * 1024
+
+# Tipos de campo das especificações CAMPOS
+TEXTO = 'texto'
+DINHEIRO = 'dinheiro'
+NUMERO = 'numero'
+APARADO = 'aparado'
+NOME_COMPLETO = 'nome_completo'
+
+_MOEDA_RE = re.compile(r'[€$£\s]')
+_SEM_DEFAULT = object()
+
+
 class CSVParserBase:
-    """Classe base para parsers de CSV"""
+    """Classe base para parsers de CSV
+
+    Os campos de cada plataforma são declarados como tuplos
+    (destino, tipo, aliases[, default]). O valor de um campo é o primeiro
+    alias com conteúdo, tal como `row.get(a) or row.get(b) or ...`.
+    """
     
-    def __init__(self, file_content: bytes):
+    def __init__(self, file_content: bytes, modo: str = MODO_COLUNAR):
         self.file_content = file_content
         self.encoding = 'utf-8'
+        self.modo = modo
         
     def detect_encoding(self):
-        """Detectar encoding do ficheiro"""
+        """Detectar encoding do ficheiro a partir de um prefixo"""
         encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'windows-1252']
+        prefixo = self.file_content[:ENCODING_PREFIXO_BYTES]
+        truncado = len(prefixo) < len(self.file_content)
         for enc in encodings:
             try:
-                self.file_content.decode(enc)
-                self.encoding = enc
-                logger.info(f"Encoding detectado: {enc}")
-                return enc
-            except:
-                continue
+                prefixo.decode(enc)
+            except UnicodeDecodeError as e:
+                # Um carácter multi-byte cortado no fim do prefixo não invalida o encoding
+                cortado = truncado and e.reason == 'unexpected end of data' and e.start >= len(prefixo) - 3
+                if not cortado:
+                    continue
+            self.encoding = enc
+            logger.info(f"Encoding detectado: {enc}")
+            return enc
         return 'utf-8'
+    
+    def _decode(self) -> str:
+        """Descodificar o ficheiro com o encoding detectado"""
+        self.detect_encoding()
+        try:
+            return self.file_content.decode(self.encoding)
+        except UnicodeDecodeError:
+            # O prefixo era UTF-8 válido mas o resto do ficheiro não
+            self.encoding = 'latin-1'
+            logger.info("Encoding corrigido para latin-1 após descodificação completa")
+            return self.file_content.decode(self.encoding)
         
     def parse(self) -> Tuple[bool, List[Dict], str]:
         """
@@ -76,11 +125,187 @@ class CSVParserBase:
             Tupla (sucesso, dados, mensagem)
         """
         raise NotImplementedError("Método parse deve ser implementado nas subclasses")
+    
+    def _extrair_registos(self, decoded: str, delimiter: str, campos: List[tuple], fixos: Dict) -> List[Dict]:
+        """Extrair registos no modo configurado, recorrendo ao modo linhas se necessário"""
+        if self.modo == MODO_COLUNAR and PANDAS_DISPONIVEL:
+            try:
+                registos = self._registos_colunares(decoded, delimiter, campos, fixos)
+                if registos is not None:
+                    return registos
+            except Exception as e:
+                logger.warning(f"Parse colunar falhou, a usar parse por linhas: {e}")
+        return self._registos_linhas(decoded, delimiter, campos, fixos)
+    
+    def _registos_linhas(self, decoded: str, delimiter: str, campos: List[tuple], fixos: Dict) -> List[Dict]:
+        """Parse linha a linha com csv.DictReader"""
+        csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
+        
+        records = []
+        for row in csv_reader:
+            try:
+                record = {campo[0]: self._valor_linha(row, *campo[1:]) for campo in campos}
+                record.update(fixos)
+                record['dados_completos'] = row
+                records.append(record)
+            except Exception as e:
+                logger.warning(f"Erro ao processar linha: {e}")
+                continue
+        return records
+    
+    def _valor_linha(self, row: Dict, tipo: str, aliases: tuple, default=_SEM_DEFAULT):
+        """Valor de um campo numa linha do DictReader"""
+        if tipo == APARADO:
+            return (row.get(aliases[0]) or '').strip()
+        if tipo == NOME_COMPLETO:
+            return ' '.join((row.get(a) or '').strip() for a in aliases).strip()
+        
+        for alias in aliases:
+            valor = row.get(alias)
+            if valor:
+                break
+        else:
+            valor = row.get(aliases[-1]) if default is _SEM_DEFAULT else default
+        
+        if tipo == DINHEIRO:
+            return self._parse_money(valor or '0')
+        if tipo == NUMERO:
+            return self._parse_number(valor or '0')
+        return valor
+    
+    def _registos_colunares(self, decoded: str, delimiter: str, campos: List[tuple], fixos: Dict):
+        """
+        Parse colunar com pandas: os aliases são resolvidos uma vez por ficheiro
+        e as colunas de dinheiro/números são convertidas em bloco.
+        
+        Returns:
+            Lista de registos, ou None se o ficheiro tiver headers ou linhas
+            que o DictReader trataria de forma diferente
+        """
+        linhas = csv.reader(io.StringIO(decoded), delimiter=delimiter)
+        header = next(linhas, [])
+        if not header:
+            return []
+        # O pandas dá '' tanto a células vazias como a campos em falta; o
+        # número de campos de cada linha distingue os dois casos
+        tamanhos = [len(linha) for linha in linhas if linha]
+        
+        with warnings.catch_warnings(record=True) as avisos:
+            warnings.simplefilter('always')
+            df = pd.read_csv(
+                io.StringIO(decoded),
+                sep=delimiter,
+                dtype=object,
+                keep_default_na=False,
+                index_col=False,
+            )
+        # Linhas com campos a mais são truncadas pelo pandas (o DictReader guarda-as)
+        if avisos or list(df.columns) != header or len(tamanhos) != len(df):
+            return None
+        # Linhas com campos em falta: o DictReader devolve None (restval)
+        for linha, tamanho in enumerate(tamanhos):
+            if tamanho < len(header):
+                df.iloc[linha, tamanho:] = None
+        
+        colunas = {campo[0]: self._valor_coluna(df, *campo[1:]).tolist() for campo in campos}
+        dados_completos = [dict(zip(header, valores)) for valores in zip(*(df[c].tolist() for c in header))]
+        
+        nomes = [*colunas, *fixos, 'dados_completos']
+        constantes = tuple(fixos.values())
+        return [
+            dict(zip(nomes, (*valores, *constantes, row)))
+            for valores, row in zip(zip(*colunas.values()), dados_completos)
+        ]
+    
+    def _valor_coluna(self, df, tipo: str, aliases: tuple, default=_SEM_DEFAULT):
+        """Série com o valor de um campo para todas as linhas"""
+        def coluna(alias, vazio=None):
+            if alias in df.columns:
+                return df[alias]
+            return pd.Series([vazio] * len(df), index=df.index, dtype=object)
+        
+        if tipo == APARADO:
+            return coluna(aliases[0], '').fillna('').str.strip()
+        if tipo == NOME_COMPLETO:
+            partes = [coluna(a, '').fillna('').str.strip() for a in aliases]
+            nome = partes[0]
+            for parte in partes[1:]:
+                nome = nome + ' ' + parte
+            return nome.str.strip()
+        
+        if default is _SEM_DEFAULT:
+            resultado = coluna(aliases[-1])
+        else:
+            resultado = pd.Series([default] * len(df), index=df.index, dtype=object)
+        for alias in reversed([a for a in aliases if a in df.columns]):
+            serie = df[alias]
+            resultado = serie.where(serie.notna() & (serie != ''), resultado)
+        
+        if tipo in (DINHEIRO, NUMERO):
+            return self._para_float(resultado.fillna(''), moeda=tipo == DINHEIRO)
+        return resultado
+    
+    @staticmethod
+    def _para_float(serie, moeda: bool):
+        """
+        Converter uma série de strings para float (inválidos ficam 0.0).
+        
+        A maioria dos valores já é numérica; só os restantes passam pela
+        limpeza de símbolos de moeda e vírgulas decimais.
+        """
+        valores = pd.to_numeric(serie, errors='coerce')
+        pendentes = valores.isna() & (serie != '')
+        if pendentes.any():
+            texto = serie[pendentes].astype(str)
+            if moeda:
+                texto = texto.str.replace(_MOEDA_RE.pattern, '', regex=True)
+            else:
+                texto = texto.str.strip()
+            valores[pendentes] = pd.to_numeric(texto.str.replace(',', '.', regex=False), errors='coerce')
+        return valores.fillna(0.0).astype(float)
+    
+    def _parse_money(self, value) -> float:
+        """Converter string de dinheiro para float"""
+        if value is None or value == '':
+            return 0.0
+        if isinstance(value, (int, float)):
+            return float(value)
+        # Remover símbolos de moeda e espaços
+        clean = _MOEDA_RE.sub('', str(value))
+        # Substituir vírgula por ponto
+        clean = clean.replace(',', '.')
+        try:
+            return float(clean)
+        except:
+            return 0.0
+    
+    def _parse_number(self, value: str) -> float:
+        """Converter string numérica para float"""
+        if not value:
+            return 0.0
+        clean = str(value).replace(',', '.')
+        try:
+            return float(clean)
+        except:
+            return 0.0
 
 
 class BoltCSVParser(CSVParserBase):
     """Parser para ficheiros CSV da Bolt"""
     
+    # Mapear campos (adaptar conforme estrutura real do CSV Bolt)
+    CAMPOS = [
+        ('data', TEXTO, ('Date', 'data', 'Data')),
+        ('hora', TEXTO, ('Time', 'hora', 'Hora')),
+        ('viagem_id', TEXTO, ('Trip ID', 'ID', 'trip_id')),
+        ('motorista', TEXTO, ('Driver', 'Motorista', 'driver')),
+        ('ganhos', DINHEIRO, ('Earnings', 'Ganhos', 'earnings')),
+        ('distancia', NUMERO, ('Distance', 'Distância', 'distance')),
+        ('duracao', NUMERO, ('Duration', 'Duração', 'duration')),
+        ('origem', TEXTO, ('Origin', 'Origem')),
+        ('destino', TEXTO, ('Destination', 'Destino')),
+    ]
+    
     def parse(self) -> Tuple[bool, List[Dict], str]:
         """
         Parse de ficheiro CSV da Bolt
@@ -90,37 +315,14 @@ class BoltCSVParser(CSVParserBase):
         2025-12-01,14:30,BOLT123456,João Silva,12.50,15.2,25
         """
         try:
-            self.detect_encoding()
-            decoded = self.file_content.decode(self.encoding)
+            decoded = self._decode()
             
             # Detectar delimitador
             delimiter = ','
             if ';' in decoded[:500]:
                 delimiter = ';'
             
-            csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-            
-            records = []
-            for row in csv_reader:
-                try:
-                    # Mapear campos (adaptar conforme estrutura real do CSV Bolt)
-                    record = {
-                        'data': row.get('Date') or row.get('data') or row.get('Data'),
-                        'hora': row.get('Time') or row.get('hora') or row.get('Hora'),
-                        'viagem_id': row.get('Trip ID') or row.get('ID') or row.get('trip_id'),
-                        'motorista': row.get('Driver') or row.get('Motorista') or row.get('driver'),
-                        'ganhos': self._parse_money(row.get('Earnings') or row.get('Ganhos') or row.get('earnings') or '0'),
-                        'distancia': self._parse_number(row.get('Distance') or row.get('Distância') or row.get('distance') or '0'),
-                        'duracao': self._parse_number(row.get('Duration') or row.get('Duração') or row.get('duration') or '0'),
-                        'origem': row.get('Origin') or row.get('Origem'),
-                        'destino': row.get('Destination') or row.get('Destino'),
-                        'plataforma': 'bolt',
-                        'dados_completos': row
-                    }
-                    records.append(record)
-                except Exception as e:
-                    logger.warning(f"Erro ao processar linha: {e}")
-                    continue
+            records = self._extrair_registos(decoded, delimiter, self.CAMPOS, {'plataforma': 'bolt'})
             
             if len(records) == 0:
                 return False, [], "Nenhum registo válido encontrado no ficheiro"
@@ -131,39 +333,59 @@ class BoltCSVParser(CSVParserBase):
         except Exception as e:
             logger.error(f"Erro ao fazer parse do CSV Bolt: {e}")
             return False, [], f"Erro: {str(e)}"
-    
-    def _parse_money(self, value: str) -> float:
-        """Converter string de dinheiro para float"""
-        if not value:
-            return 0.0
-        # Remover símbolos de moeda e espaços
-        clean = re.sub(r'[€$£\s]', '', str(value))
-        # Substituir vírgula por ponto
-        clean = clean.replace(',', '.')
-        try:
-            return float(clean)
-        except:
-            return 0.0
-    
-    def _parse_number(self, value: str) -> float:
-        """Converter string numérica para float"""
-        if not value:
-            return 0.0
-        clean = str(value).replace(',', '.')
-        try:
-            return float(clean)
-        except:
-            return 0.0
 
 
 class UberCSVParser(CSVParserBase):
     """Parser para ficheiros CSV da Uber (viagens e pagamentos)"""
     
+    CAMPOS_PAGAMENTOS = [
+        ('uuid_motorista', TEXTO, ('UUID do motorista',)),
+        ('nome_motorista', NOME_COMPLETO, ('Nome próprio do motorista', 'Apelido do motorista')),
+        ('nome_proprio', APARADO, ('Nome próprio do motorista',)),
+        ('apelido', APARADO, ('Apelido do motorista',)),
+        
+        # Valores principais
+        ('pago_total', DINHEIRO, ('Pago a si',)),
+        ('rendimentos_total', DINHEIRO, ('Pago a si : Os seus rendimentos',)),
+        
+        # Detalhes de rendimentos
+        ('tarifa', DINHEIRO, ('Pago a si : Os seus rendimentos : Tarifa',)),
+        ('impostos', DINHEIRO, ('Pago a si : Os seus rendimentos : Impostos',)),
+        ('taxa_servico', DINHEIRO, ('Pago a si:Os seus rendimentos:Taxa de serviço',)),
+        ('gratificacao', DINHEIRO, ('Pago a si:Os seus rendimentos:Gratificação',)),
+        
+        # Detalhes da tarifa
+        ('tarifa_base', DINHEIRO, ('Pago a si:Os seus rendimentos:Tarifa:Tarifa',)),
+        ('ajuste_tarifa', DINHEIRO, ('Pago a si:Os seus rendimentos:Tarifa:Ajuste',)),
+        ('cancelamento', DINHEIRO, ('Pago a si:Os seus rendimentos:Tarifa:Cancelamento',)),
+        ('ajuste_taxa_servico', DINHEIRO, ('Pago a si:Os seus rendimentos:Tarifa:Ajuste da taxa de serviço',)),
+        ('uberx_priority', DINHEIRO, ('Pago a si:Os seus rendimentos:Tarifa:UberX Priority',)),
+        ('imposto_tarifa', DINHEIRO, ('Pago a si:Os seus rendimentos:Tarifa:Imposto sobre a tarifa',)),
+        ('tempo_espera_recolha', DINHEIRO, ('Pago a si:Os seus rendimentos:Tarifa:Tempo de espera na recolha',)),
+        
+        # Saldo da viagem
+        ('dinheiro_recebido', DINHEIRO, ('Pago a si : Saldo da viagem : Pagamentos : Dinheiro recebido',)),
+        ('reembolso_portagem', DINHEIRO, ('Pago a si:Saldo da viagem:Reembolsos:Portagem',)),
+        ('imposto_saldo', DINHEIRO, ('Pago a si:Saldo da viagem:Impostos:Imposto sobre a tarifa',)),
+        ('transferido_banco', DINHEIRO, ('Pago a si:Saldo da viagem:Pagamentos:Transferido para uma conta bancária',)),
+    ]
+    
+    CAMPOS_VIAGENS = [
+        ('data', TEXTO, ('Date', 'data', 'Data')),
+        ('hora', TEXTO, ('Time', 'hora')),
+        ('viagem_id', TEXTO, ('Trip UUID', 'UUID', 'ID')),
+        ('motorista', TEXTO, ('Driver', 'Motorista')),
+        ('ganhos', DINHEIRO, ('Fare', 'Ganhos', 'earnings')),
+        ('distancia', NUMERO, ('Distance', 'Distância')),
+        ('duracao', NUMERO, ('Duration', 'Duração')),
+        ('cidade', TEXTO, ('City', 'Cidade')),
+        ('tipo_servico', TEXTO, ('Product', 'Serviço')),
+    ]
+    
     def parse(self) -> Tuple[bool, List[Dict], str]:
         """Parse de ficheiro CSV da Uber - detecta automaticamente o tipo"""
         try:
-            self.detect_encoding()
-            decoded = self.file_content.decode(self.encoding)
+            decoded = self._decode()
             
             # Remover BOM se existir
             if decoded.startswith('\ufeff'):
@@ -174,7 +396,7 @@ class UberCSVParser(CSVParserBase):
                 delimiter = ';'
             
             # Detectar tipo de ficheiro baseado nos headers (normalizar para lowercase e remover BOM)
-            first_line = decoded.split('\n')[0].lower().replace('\ufeff', '')
+            first_line = decoded.split('\n', 1)[0].lower().replace('\ufeff', '')
             
             if 'uuid do motorista' in first_line or 'pago a si' in first_line:
                 logger.info("📄 Ficheiro detectado como: Uber Payments (Pagamentos de Motoristas)")
@@ -190,56 +412,8 @@ class UberCSVParser(CSVParserBase):
     def _parse_payments(self, decoded: str, delimiter: str) -> Tuple[bool, List[Dict], str]:
         """Parse de ficheiro de pagamentos da Uber"""
         try:
-            csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-            
-            records = []
-            for row in csv_reader:
-                try:
-                    # Nome completo do motorista
-                    nome_proprio = row.get('Nome próprio do motorista', '').strip()
-                    apelido = row.get('Apelido do motorista', '').strip()
-                    nome_completo = f"{nome_proprio} {apelido}".strip()
-                    
-                    record = {
-                        'uuid_motorista': row.get('UUID do motorista'),
-                        'nome_motorista': nome_completo,
-                        'nome_proprio': nome_proprio,
-                        'apelido': apelido,
-                        
-                        # Valores principais
-                        'pago_total': self._parse_money(row.get('Pago a si', '0')),
-                        'rendimentos_total': self._parse_money(row.get('Pago a si : Os seus rendimentos', '0')),
-                        
-                        # Detalhes de rendimentos
-                        'tarifa': self._parse_money(row.get('Pago a si : Os seus rendimentos : Tarifa', '0')),
-                        'impostos': self._parse_money(row.get('Pago a si : Os seus rendimentos : Impostos', '0')),
-                        'taxa_servico': self._parse_money(row.get('Pago a si:Os seus rendimentos:Taxa de serviço', '0')),
-                        'gratificacao': self._parse_money(row.get('Pago a si:Os seus rendimentos:Gratificação', '0')),
-                        
-                        # Detalhes da tarifa
-                        'tarifa_base': self._parse_money(row.get('Pago a si:Os seus rendimentos:Tarifa:Tarifa', '0')),
-                        'ajuste_tarifa': self._parse_money(row.get('Pago a si:Os seus rendimentos:Tarifa:Ajuste', '0')),
-                        'cancelamento': self._parse_money(row.get('Pago a si:Os seus rendimentos:Tarifa:Cancelamento', '0')),
-                        'ajuste_taxa_servico': self._parse_money(row.get('Pago a si:Os seus rendimentos:Tarifa:Ajuste da taxa de serviço', '0')),
-                        'uberx_priority': self._parse_money(row.get('Pago a si:Os seus rendimentos:Tarifa:UberX Priority', '0')),
-                        'imposto_tarifa': self._parse_money(row.get('Pago a si:Os seus rendimentos:Tarifa:Imposto sobre a tarifa', '0')),
-                        'tempo_espera_recolha': self._parse_money(row.get('Pago a si:Os seus rendimentos:Tarifa:Tempo de espera na recolha', '0')),
-                        
-                        # Saldo da viagem
-                        'dinheiro_recebido': self._parse_money(row.get('Pago a si : Saldo da viagem : Pagamentos : Dinheiro recebido', '0')),
-                        'reembolso_portagem': self._parse_money(row.get('Pago a si:Saldo da viagem:Reembolsos:Portagem', '0')),
-                        'imposto_saldo': self._parse_money(row.get('Pago a si:Saldo da viagem:Impostos:Imposto sobre a tarifa', '0')),
-                        'transferido_banco': self._parse_money(row.get('Pago a si:Saldo da viagem:Pagamentos:Transferido para uma conta bancária', '0')),
-                        
-                        'plataforma': 'uber',
-                        'tipo_ficheiro': 'pagamentos',
-                        'dados_completos': row
-                    }
-                    records.append(record)
-                    
-                except Exception as e:
-                    logger.warning(f"Erro ao processar linha de pagamento Uber: {e}")
-                    continue
+            fixos = {'plataforma': 'uber', 'tipo_ficheiro': 'pagamentos'}
+            records = self._extrair_registos(decoded, delimiter, self.CAMPOS_PAGAMENTOS, fixos)
             
             if len(records) == 0:
                 return False, [], "Nenhum registo válido encontrado no ficheiro"
@@ -254,29 +428,8 @@ class UberCSVParser(CSVParserBase):
     def _parse_trips(self, decoded: str, delimiter: str) -> Tuple[bool, List[Dict], str]:
         """Parse de ficheiro de viagens da Uber"""
         try:
-            csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-            
-            records = []
-            for row in csv_reader:
-                try:
-                    record = {
-                        'data': row.get('Date') or row.get('data') or row.get('Data'),
-                        'hora': row.get('Time') or row.get('hora'),
-                        'viagem_id': row.get('Trip UUID') or row.get('UUID') or row.get('ID'),
-                        'motorista': row.get('Driver') or row.get('Motorista'),
-                        'ganhos': self._parse_money(row.get('Fare') or row.get('Ganhos') or row.get('earnings') or '0'),
-                        'distancia': self._parse_number(row.get('Distance') or row.get('Distância') or '0'),
-                        'duracao': self._parse_number(row.get('Duration') or row.get('Duração') or '0'),
-                        'cidade': row.get('City') or row.get('Cidade'),
-                        'tipo_servico': row.get('Product') or row.get('Serviço'),
-                        'plataforma': 'uber',
-                        'tipo_ficheiro': 'viagens',
-                        'dados_completos': row
-                    }
-                    records.append(record)
-                except Exception as e:
-                    logger.warning(f"Erro ao processar linha de viagem Uber: {e}")
-                    continue
+            fixos = {'plataforma': 'uber', 'tipo_ficheiro': 'viagens'}
+            records = self._extrair_registos(decoded, delimiter, self.CAMPOS_VIAGENS, fixos)
             
             if len(records) == 0:
                 return False, [], "Nenhum registo válido encontrado no ficheiro"
@@ -287,30 +440,20 @@ class UberCSVParser(CSVParserBase):
         except Exception as e:
             logger.error(f"Erro ao processar viagens Uber: {e}")
             return False, [], f"Erro ao processar viagens: {str(e)}"
-    
-    def _parse_money(self, value: str) -> float:
-        if not value or value == '':
-            return 0.0
-        clean = re.sub(r'[€$£\s]', '', str(value))
-        clean = clean.replace(',', '.')
-        try:
-            return float(clean)
-        except:
-            return 0.0
-    
-    def _parse_number(self, value: str) -> float:
-        if not value or value == '':
-            return 0.0
-        clean = str(value).replace(',', '.')
-        try:
-            return float(clean)
-        except:
-            return 0.0
 
 
 class ViaVerdeCSVParser(CSVParserBase):
     """Parser para ficheiros CSV/XLSX Via Verde (portagens)"""
     
+    CAMPOS_CSV = [
+        ('data', TEXTO, ('Data', 'Date', 'data')),
+        ('hora', TEXTO, ('Hora', 'Time', 'hora')),
+        ('local', TEXTO, ('Local', 'Portagem', 'Location')),
+        ('matricula', TEXTO, ('Matrícula', 'Matricula', 'Vehicle', 'License Plate')),
+        ('valor', DINHEIRO, ('Valor', 'Montante', 'Amount', 'Value')),
+        ('tipo', TEXTO, ('Tipo',), 'portagem'),
+    ]
+    
     def parse(self) -> Tuple[bool, List[Dict], str]:
         """Parse de ficheiro CSV ou XLSX Via Verde"""
         try:
@@ -402,32 +545,13 @@ class ViaVerdeCSVParser(CSVParserBase):
     def _parse_csv(self) -> Tuple[bool, List[Dict], str]:
         """Parse de ficheiro CSV Via Verde"""
         try:
-            self.detect_encoding()
-            decoded = self.file_content.decode(self.encoding)
+            decoded = self._decode()
             
             delimiter = ';'  # Via Verde geralmente usa ponto e vírgula
             if ',' in decoded[:500] and ';' not in decoded[:500]:
                 delimiter = ','
             
-            csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-            
-            records = []
-            for row in csv_reader:
-                try:
-                    record = {
-                        'data': row.get('Data') or row.get('Date') or row.get('data'),
-                        'hora': row.get('Hora') or row.get('Time') or row.get('hora'),
-                        'local': row.get('Local') or row.get('Portagem') or row.get('Location'),
-                        'matricula': row.get('Matrícula') or row.get('Matricula') or row.get('Vehicle') or row.get('License Plate'),
-                        'valor': self._parse_money(row.get('Valor') or row.get('Montante') or row.get('Amount') or row.get('Value') or '0'),
-                        'tipo': row.get('Tipo') or 'portagem',
-                        'plataforma': 'via_verde',
-                        'dados_completos': row
-                    }
-                    records.append(record)
-                except Exception as e:
-                    logger.warning(f"Erro ao processar linha Via Verde CSV: {e}")
-                    continue
+            records = self._extrair_registos(decoded, delimiter, self.CAMPOS_CSV, {'plataforma': 'via_verde'})
             
             if len(records) == 0:
                 return False, [], "Nenhum registo válido encontrado no ficheiro"
@@ -455,59 +579,32 @@ class ViaVerdeCSVParser(CSVParserBase):
             return str(value)
         except:
             return None
-    
-    def _parse_money(self, value) -> float:
-        """Converter valor para float"""
-        if value is None or value == '':
-            return 0.0
-        
-        # Se já for número
-        if isinstance(value, (int, float)):
-            return float(value)
-        
-        # Se for string
-        try:
-            clean = re.sub(r'[€$£\s]', '', str(value))
-            clean = clean.replace(',', '.')
-            return float(clean)
-        except:
-            return 0.0
 
 
 class GPSCSVParser(CSVParserBase):
     """Parser para ficheiros CSV de GPS (rastreamento)"""
     
+    CAMPOS = [
+        ('data', TEXTO, ('Data', 'Date', 'data')),
+        ('hora', TEXTO, ('Hora', 'Time', 'hora')),
+        ('matricula', TEXTO, ('Matrícula', 'Vehicle', 'Veículo')),
+        ('distancia', NUMERO, ('Distância', 'Distance', 'km')),
+        ('latitude', TEXTO, ('Latitude', 'Lat')),
+        ('longitude', TEXTO, ('Longitude', 'Lon', 'Long')),
+        ('velocidade', NUMERO, ('Velocidade', 'Speed')),
+        ('localizacao', TEXTO, ('Local', 'Location')),
+    ]
+    
     def parse(self) -> Tuple[bool, List[Dict], str]:
         """Parse de ficheiro CSV GPS"""
         try:
-            self.detect_encoding()
-            decoded = self.file_content.decode(self.encoding)
+            decoded = self._decode()
             
             delimiter = ','
             if ';' in decoded[:500]:
                 delimiter = ';'
             
-            csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-            
-            records = []
-            for row in csv_reader:
-                try:
-                    record = {
-                        'data': row.get('Data') or row.get('Date') or row.get('data'),
-                        'hora': row.get('Hora') or row.get('Time') or row.get('hora'),
-                        'matricula': row.get('Matrícula') or row.get('Vehicle') or row.get('Veículo'),
-                        'distancia': self._parse_number(row.get('Distância') or row.get('Distance') or row.get('km') or '0'),
-                        'latitude': row.get('Latitude') or row.get('Lat'),
-                        'longitude': row.get('Longitude') or row.get('Lon') or row.get('Long'),
-                        'velocidade': self._parse_number(row.get('Velocidade') or row.get('Speed') or '0'),
-                        'localizacao': row.get('Local') or row.get('Location'),
-                        'plataforma': 'gps',
-                        'dados_completos': row
-                    }
-                    records.append(record)
-                except Exception as e:
-                    logger.warning(f"Erro ao processar linha GPS: {e}")
-                    continue
+            records = self._extrair_registos(decoded, delimiter, self.CAMPOS, {'plataforma': 'gps'})
             
             if len(records) == 0:
                 return False, [], "Nenhum registo válido encontrado no ficheiro"
@@ -518,51 +615,32 @@ class GPSCSVParser(CSVParserBase):
         except Exception as e:
             logger.error(f"Erro ao fazer parse do CSV GPS: {e}")
             return False, [], f"Erro: {str(e)}"
-    
-    def _parse_number(self, value: str) -> float:
-        if not value:
-            return 0.0
-        clean = str(value).replace(',', '.')
-        try:
-            return float(clean)
-        except:
-            return 0.0
 
 
 class CombustivelCSVParser(CSVParserBase):
     """Parser para ficheiros CSV de Combustível"""
     
+    CAMPOS = [
+        ('data', TEXTO, ('Data', 'Date', 'data')),
+        ('hora', TEXTO, ('Hora', 'Time')),
+        ('matricula', TEXTO, ('Matrícula', 'Vehicle', 'Veículo')),
+        ('valor', DINHEIRO, ('Valor', 'Amount', 'Total')),
+        ('litros', NUMERO, ('Litros', 'Liters', 'Quantity')),
+        ('preco_litro', DINHEIRO, ('Preço/Litro', 'Price/Liter')),
+        ('posto', TEXTO, ('Posto', 'Station', 'Local')),
+        ('tipo_combustivel', TEXTO, ('Tipo', 'Fuel Type', 'Combustível')),
+    ]
+    
     def parse(self) -> Tuple[bool, List[Dict], str]:
         """Parse de ficheiro CSV Combustível"""
         try:
-            self.detect_encoding()
-            decoded = self.file_content.decode(self.encoding)
+            decoded = self._decode()
             
             delimiter = ','
             if ';' in decoded[:500]:
                 delimiter = ';'
             
-            csv_reader = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-            
-            records = []
-            for row in csv_reader:
-                try:
-                    record = {
-                        'data': row.get('Data') or row.get('Date') or row.get('data'),
-                        'hora': row.get('Hora') or row.get('Time'),
-                        'matricula': row.get('Matrícula') or row.get('Vehicle') or row.get('Veículo'),
-                        'valor': self._parse_money(row.get('Valor') or row.get('Amount') or row.get('Total') or '0'),
-                        'litros': self._parse_number(row.get('Litros') or row.get('Liters') or row.get('Quantity') or '0'),
-                        'preco_litro': self._parse_money(row.get('Preço/Litro') or row.get('Price/Liter') or '0'),
-                        'posto': row.get('Posto') or row.get('Station') or row.get('Local'),
-                        'tipo_combustivel': row.get('Tipo') or row.get('Fuel Type') or row.get('Combustível'),
-                        'plataforma': 'combustivel',
-                        'dados_completos': row
-                    }
-                    records.append(record)
-                except Exception as e:
-                    logger.warning(f"Erro ao processar linha Combustível: {e}")
-                    continue
+            records = self._extrair_registos(decoded, delimiter, self.CAMPOS, {'plataforma': 'combustivel'})
             
             if len(records) == 0:
                 return False, [], "Nenhum registo válido encontrado no ficheiro"
@@ -573,34 +651,17 @@ class CombustivelCSVParser(CSVParserBase):
         except Exception as e:
             logger.error(f"Erro ao fazer parse do CSV Combustível: {e}")
             return False, [], f"Erro: {str(e)}"
-    
-    def _parse_money(self, value: str) -> float:
-        if not value:
-            return 0.0
-        clean = re.sub(r'[€$£\s]', '', str(value))
-        clean = clean.replace(',', '.')
-        try:
-            return float(clean)
-        except:
-            return 0.0
-    
-    def _parse_number(self, value: str) -> float:
-        if not value:
-            return 0.0
-        clean = str(value).replace(',', '.')
-        try:
-            return float(clean)
-        except:
-            return 0.0
 
 
-def get_parser(plataforma: str, file_content: bytes):
+def get_parser(plataforma: str, file_content: bytes, modo: str = MODO_COLUNAR):
     """
     Obter parser adequado para a plataforma
     
     Args:
         plataforma: Nome da plataforma (bolt, uber, via_verde, gps, combustivel)
         file_content: Conteúdo do ficheiro em bytes
+        modo: 'colunar' (pandas, por defeito) ou 'linhas' (csv.DictReader);
+            ambos devolvem os mesmos registos
         
     Returns:
         Instância do parser correspondente
@@ -617,4 +678,4 @@ def get_parser(plataforma: str, file_content: bytes):
     if not parser_class:
         raise ValueError(f"Plataforma '{plataforma}' não suportada")
     
-    return parser_class(file_content)
+    return parser_class(file_content, modo=modo)
@@ -27,6 +27,7 @@ class EmailService:
         - smtp_from_email: From email address
         - smtp_from_name: From display name
         - smtp_use_tls: Whether to use TLS
+        - limite_por_minuto: Max messages per minute to this server (optional)
         """
         self.host = smtp_config.get('smtp_host')
         self.port = int(smtp_config.get('smtp_port', 587))
@@ -35,12 +36,54 @@ class EmailService:
         self.from_email = smtp_config.get('smtp_from_email')
         self.from_name = smtp_config.get('smtp_from_name', 'TVDEFleet')
         self.use_tls = smtp_config.get('smtp_use_tls', True)
+        self.limite_por_minuto = smtp_config.get('limite_por_minuto')
     
     def validate_config(self) -> bool:
         """Validate SMTP configuration"""
         required = [self.host, self.port, self.username, self.password, self.from_email]
         return all(required)
     
+    def config_smtp(self):
+        """Configuration for the pooled sender (services/envio_email.py)"""
+        from services.envio_email import ConfigSMTP
+        return ConfigSMTP(
+            self.host, self.port, self.username, self.password,
+            self.from_email, self.from_name, self.limite_por_minuto,
+        )
+    
+    async def enviar(
+        self,
+        to_email: str,
+        subject: str,
+        body_html: str,
+        body_text: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+        attachments: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Send an email without blocking the event loop, reusing the
+        authenticated SMTP session of this server. Same arguments and
+        result as send_email.
+        """
+        from services import envio_email
+        resultado = await envio_email.enviar(
+            self.config_smtp(), to_email, subject, body_html,
+            texto=body_text, cc=cc, bcc=bcc, anexos=attachments,
+        )
+        if resultado["success"]:
+            logger.info(f"✓ Email sent successfully to {to_email}")
+        return resultado
+    
+    async def enviar_lote(self, mensagens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Send several emails over one SMTP session. Each message is a dict
+        with para, assunto, html and optionally texto, cc, bcc, anexos.
+        Returns one result per message, in order.
+        """
+        from services import envio_email
+        return await envio_email.enviar_lote(self.config_smtp(), mensagens)
+    
     def send_email(
         self,
         to_email: str,
@@ -188,7 +231,8 @@ async def get_parceiro_email_service(db, parceiro_id: str) -> Optional[EmailServ
         "smtp_password": smtp_config.get("smtp_password"),
         "smtp_from_email": smtp_config.get("email_remetente") or smtp_config.get("smtp_usuario"),
         "smtp_from_name": smtp_config.get("nome_remetente", "TVDEFleet"),
-        "smtp_use_tls": smtp_config.get("usar_tls", True)
+        "smtp_use_tls": smtp_config.get("usar_tls", True),
+        "limite_por_minuto": smtp_config.get("limite_por_minuto"),
     }
     
     return EmailService(email_config)
@@ -227,7 +271,7 @@ async def send_email_to_motorista(
         return {"success": False, "error": "SMTP não configurado para este parceiro"}
     
     # Send email
-    result = email_service.send_email(
+    result = await email_service.enviar(
         to_email=motorista["email"],
         subject=subject,
         body_html=body_html,
@@ -289,7 +333,7 @@ async def enviar_email_com_anexo(
         }]
     
     # Send email
-    result = email_service.send_email(
+    result = await email_service.enviar(
         to_email=destinatario,
         subject=assunto,
         body_html=f"<html><body>{corpo}</body></html>",
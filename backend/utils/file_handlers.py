@@ -1,9 +1,8 @@
 """File handling utilities for FleeTrack application"""
 
-import shutil
 import logging
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 from PIL import Image
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -62,24 +61,38 @@ async def convert_image_to_pdf(image_path: Path, output_path: Path) -> Path:
 
 
 async def save_uploaded_file(file: UploadFile, destination_dir: Path, filename: str) -> Path:
-    """Save uploaded file to destination directory"""
+    """Save uploaded file to destination directory, streaming it in chunks"""
+    from services.uploads_processamento import guardar_stream
+
     try:
         file_path = destination_dir / filename
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
+        await guardar_stream(file, file_path)
         return file_path
     except Exception as e:
         logger.error(f"Error saving file: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
 
-async def process_uploaded_file(file: UploadFile, destination_dir: Path, file_id: str) -> Dict[str, str]:
+async def process_uploaded_file(
+    file: UploadFile,
+    destination_dir: Path,
+    file_id: str,
+    referencia: Optional[Dict] = None,
+    criado_por: Optional[str] = None,
+) -> Dict[str, Optional[str]]:
     """
-    Process uploaded file: save it and convert to PDF if it's an image
-    Returns dict with 'original_path' and 'pdf_path' (if converted)
+    Process uploaded file: save it and, if it's an image, queue its
+    conversion to PDF (services/uploads_processamento).
+
+    Returns 'original_path', 'pdf_path' (final path, may still be pending),
+    'saved_path' (the path to store: the original until the PDF exists) and
+    'processamento' (queue status, None when nothing to convert).
+    `referencia` ({colecao, filtro, campo}) is the document field holding
+    saved_path; the queue moves it to the PDF once it has been written.
     """
+    from services import uploads_processamento
+    from utils.database import get_database
+
     file_extension = Path(file.filename).suffix.lower()
     original_filename = f"{file_id}_original{file_extension}"
     
@@ -88,23 +101,34 @@ async def process_uploaded_file(file: UploadFile, destination_dir: Path, file_id
     
     result = {
         "original_path": str(original_path.relative_to(ROOT_DIR)),
-        "pdf_path": None
+        "pdf_path": None,
+        "processamento": None,
     }
     
-    # Check if file is an image
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.heic', '.heif'}
-    
-    if file_extension in image_extensions:
-        # Convert image to PDF
-        pdf_filename = f"{file_id}.pdf"
-        pdf_path = destination_dir / pdf_filename
-        
-        await convert_image_to_pdf(original_path, pdf_path)
+    if file_extension in uploads_processamento.EXTENSOES_IMAGEM:
+        # Convert image to PDF in the background
+        pdf_path = destination_dir / f"{file_id}.pdf"
         result["pdf_path"] = str(pdf_path.relative_to(ROOT_DIR))
+        if referencia is not None:
+            referencia = {
+                **referencia,
+                "valor_erro": referencia.get("valor_erro", result["original_path"]),
+                "valor_ok": referencia.get("valor_ok", result["pdf_path"]),
+            }
+        result["processamento"] = await uploads_processamento.enfileirar(
+            get_database(),
+            file_id,
+            str(original_path),
+            pdf=str(pdf_path),
+            referencia=referencia,
+            criado_por=criado_por,
+        )
     elif file_extension == '.pdf':
         # If already PDF, just reference it
         result["pdf_path"] = result["original_path"]
     
+    # Until the conversion finishes only the original exists
+    result["saved_path"] = result["original_path"]
     return result
 
 
@@ -108,14 +108,26 @@ class FileUploadHandler:
         local_folder.mkdir(parents=True, exist_ok=True)
         local_path = local_folder / filename
         
-        # Read file content
-        content = await file.read()
+        from services.uploads_processamento import guardar_stream
+        
+        # Local copies are streamed to disk in chunks; only cloud uploads need the content in memory
+        content = None
+        size = None
+        if modo in ["local", "both"]:
+            size = await guardar_stream(file, local_path)
+        if modo in ["cloud", "both"]:
+            if modo == "both":
+                async with aiofiles.open(local_path, 'rb') as f:
+                    content = await f.read()
+            else:
+                content = await file.read()
+            size = len(content)
         
         result = {
             "filename": filename,
             "original_filename": file.filename,
             "content_type": file.content_type,
-            "size": len(content),
+            "size": size,
             "local_path": None,
             "local_url": None,
             "cloud_path": None,
@@ -127,9 +139,6 @@ class FileUploadHandler:
         
         # Save locally if mode is 'local' or 'both'
         if modo in ["local", "both"]:
-            async with aiofiles.open(local_path, 'wb') as f:
-                await f.write(content)
-            
             relative_path = str(local_path.relative_to(UPLOAD_BASE))
             result["local_path"] = str(local_path)
             result["local_url"] = f"/api/uploads/{relative_path}"
@@ -177,7 +186,7 @@ class FileUploadHandler:
             "filename": filename,
             "original_filename": file.filename,
             "content_type": file.content_type,
-            "size": len(content),
+            "size": size,
             "local_path": result.get("local_path"),
             "cloud_path": result.get("cloud_path"),
             "cloud_url": result.get("cloud_url"),
@@ -0,0 +1,380 @@
+"""
+Registo central de índices MongoDB
+
+Declara os índices (compostos, únicos e parciais) de cada colecção e
+reconcilia-os com a base de dados. A reconciliação corre no arranque do
+servidor (``startup_event``) e pode ser executada manualmente:
+
+    python -m utils.indexes              # cria os índices em falta
+    python -m utils.indexes --dry-run    # apenas relatório
+    python -m utils.indexes --drop-extra # remove índices não declarados
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+def _idx(keys: List, name: str, **options) -> Dict[str, Any]:
+    """Declarar um índice: lista de (campo, direcção), nome e opções do MongoDB"""
+    return {"keys": [(k, d) for k, d in keys], "name": name, "options": options}
+
+
+# Filtro parcial para campos opcionais em string (evita indexar nulls/vazios)
+def _string_field(campo: str) -> Dict[str, Any]:
+    return {"partialFilterExpression": {campo: {"$type": "string"}}}
+
+
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    # ==================== UTILIZADORES ====================
+    "users": [
+        _idx([("id", 1)], "id_unique", unique=True),
+        _idx([("email", 1)], "email"),
+        _idx([("role", 1)], "role"),
+    ],
+    "subscriptions": [
+        _idx([("id", 1)], "id"),
+        _idx([("user_id", 1), ("status", 1)], "user_status"),
+    ],
+    "subscricoes": [
+        _idx([("id", 1)], "id"),
+        _idx([("user_id", 1), ("status", 1)], "user_status"),
+        _idx([("created_at", -1)], "created_at"),
+    ],
+    "planos": [
+        _idx([("id", 1)], "id"),
+    ],
+
+    # ==================== MOTORISTAS E VEÍCULOS ====================
+    "motoristas": [
+        _idx([("id", 1)], "id_unique", unique=True),
+        _idx([("email", 1)], "email"),
+        _idx([("parceiro_atribuido", 1), ("status_motorista", 1)], "parceiro_status"),
+        _idx([("parceiro_id", 1)], "parceiro_id"),
+        _idx([("name", 1)], "name"),
+        _idx([("uuid_motorista_uber", 1)], "uuid_uber", **_string_field("uuid_motorista_uber")),
+        _idx([("identificador_motorista_bolt", 1)], "id_bolt", **_string_field("identificador_motorista_bolt")),
+    ],
+    "vehicles": [
+        _idx([("id", 1)], "id_unique", unique=True),
+        _idx([("parceiro_id", 1), ("status", 1)], "parceiro_status"),
+        _idx([("matricula", 1)], "matricula"),
+        _idx([("motorista_atribuido", 1)], "motorista_atribuido"),
+        _idx([("cartao_frota_id", 1)], "cartao_frota", **_string_field("cartao_frota_id")),
+        _idx([("cartao_frota_fossil_id", 1)], "cartao_frota_fossil", **_string_field("cartao_frota_fossil_id")),
+        _idx([("obu", 1)], "obu", **_string_field("obu")),
+        _idx([("motorista_id", 1)], "motorista_id", **_string_field("motorista_id")),
+        _idx([("parceiro_id", 1), ("matricula", 1), ("id", 1)], "parceiro_matricula_pagina"),
+    ],
+    "cartoes_frota": [
+        _idx([("numero_cartao", 1), ("tipo", 1)], "numero_tipo"),
+        _idx([("parceiro_id", 1)], "parceiro_id"),
+    ],
+    "contratos": [
+        _idx([("id", 1)], "id"),
+        _idx([("motorista_id", 1), ("status", 1)], "motorista_status"),
+        _idx([("parceiro_id", 1)], "parceiro_id"),
+        _idx([("parceiro_id", 1), ("created_at", -1), ("id", -1)], "parceiro_pagina"),
+        _idx([("motorista_id", 1), ("created_at", -1), ("id", -1)], "motorista_pagina"),
+    ],
+
+    # ==================== IMPORTAÇÕES (GANHOS E DESPESAS) ====================
+    "ganhos_uber": [
+        _idx([("id", 1)], "id"),
+        _idx([("motorista_id", 1), ("periodo_inicio", 1)], "motorista_periodo"),
+        _idx([("motorista_id", 1), ("ano", 1), ("semana", 1)], "motorista_semana"),
+        _idx([("parceiro_id", 1), ("ano", 1), ("semana", 1)], "parceiro_semana"),
+        _idx([("uuid_motorista_uber", 1)], "uuid_uber", **_string_field("uuid_motorista_uber")),
+    ],
+    "ganhos_bolt": [
+        _idx([("id", 1)], "id"),
+        _idx([("motorista_id", 1), ("periodo_inicio", 1)], "motorista_periodo"),
+        _idx([("motorista_id", 1), ("ano", 1), ("semana", 1)], "motorista_semana"),
+        _idx([("parceiro_id", 1), ("ano", 1), ("semana", 1)], "parceiro_semana"),
+    ],
+    "viagens_bolt": [
+        _idx([("motorista_id", 1), ("periodo_inicio", 1)], "motorista_periodo"),
+        _idx([("motorista_id", 1), ("ano", 1), ("semana", 1)], "motorista_semana"),
+        _idx([("parceiro_id", 1), ("ano", 1), ("semana", 1)], "parceiro_semana"),
+    ],
+    "portagens_viaverde": [
+        _idx([("motorista_id", 1), ("data", 1)], "motorista_data"),
+        _idx([("motorista_id", 1), ("periodo_inicio", 1)], "motorista_periodo"),
+        _idx([("vehicle_id", 1), ("data", 1)], "vehicle_data"),
+        _idx([("parceiro_id", 1), ("ano", 1), ("semana", 1)], "parceiro_semana"),
+    ],
+    "abastecimentos_combustivel": [
+        _idx([("motorista_id", 1), ("data", 1)], "motorista_data"),
+        _idx([("vehicle_id", 1), ("data", 1)], "vehicle_data"),
+    ],
+    "despesas_combustivel": [
+        _idx([("motorista_id", 1), ("data", 1)], "motorista_data"),
+        _idx([("vehicle_id", 1), ("data", 1)], "vehicle_data"),
+        _idx([("parceiro_id", 1), ("ano", 1), ("semana", 1)], "parceiro_semana"),
+    ],
+    "combustivel_eletrico": [
+        _idx([("motorista_id", 1), ("data", 1)], "motorista_data"),
+        _idx([("vehicle_id", 1), ("data", 1)], "vehicle_data"),
+    ],
+    "despesas_extras": [
+        _idx([("motorista_id", 1), ("ano", 1), ("semana", 1)], "motorista_semana"),
+    ],
+    "despesas_fornecedor": [
+        _idx([("parceiro_id", 1), ("data_entrada", -1)], "parceiro_data"),
+        _idx([("motorista_id", 1)], "motorista_id"),
+        _idx([("veiculo_id", 1)], "veiculo_id"),
+    ],
+    "ajustes_semanais": [
+        _idx([("motorista_id", 1), ("ano", 1), ("semana", 1)], "motorista_semana"),
+    ],
+
+    # ==================== RELATÓRIOS ====================
+    "relatorios_semanais": [
+        _idx([("id", 1)], "id"),
+        _idx([("motorista_id", 1), ("ano", -1), ("semana", -1)], "motorista_semana"),
+        _idx([("parceiro_id", 1), ("ano", -1), ("semana", -1)], "parceiro_semana"),
+        _idx([("parceiro_id", 1), ("created_at", -1), ("id", -1)], "parceiro_pagina"),
+        _idx([("motorista_id", 1), ("created_at", -1), ("id", -1)], "motorista_pagina"),
+        _idx([("status", 1), ("parceiro_id", 1), ("created_at", -1), ("id", -1)], "status_parceiro_pagina"),
+        _idx([("created_at", -1), ("id", -1)], "pagina"),
+    ],
+    "status_relatorios": [
+        _idx([("motorista_id", 1), ("ano", 1), ("semana", 1)], "motorista_semana"),
+    ],
+    "dashboard_stats": [
+        _idx([("parceiro_id", 1)], "parceiro_unique", unique=True),
+    ],
+    "revenues": [
+        _idx([("vehicle_id", 1), ("data", 1)], "vehicle_data"),
+        _idx([("vehicle_id", 1), ("created_at", -1), ("id", -1)], "vehicle_pagina"),
+        _idx([("created_at", -1), ("id", -1)], "pagina"),
+    ],
+    "expenses": [
+        _idx([("vehicle_id", 1), ("data", 1)], "vehicle_data"),
+        _idx([("vehicle_id", 1), ("created_at", -1), ("id", -1)], "vehicle_pagina"),
+        _idx([("created_at", -1), ("id", -1)], "pagina"),
+    ],
+
+    # ==================== CLASSIFICAÇÃO DE MOTORISTAS ====================
+    "classificacoes_motoristas": [
+        _idx([("motorista_id", 1)], "motorista_id"),
+    ],
+    "vistorias": [
+        _idx([("motorista_id", 1), ("data", -1)], "motorista_data"),
+    ],
+    "incidentes": [
+        _idx([("motorista_id", 1), ("created_at", 1)], "motorista_created_at"),
+    ],
+    "multas": [
+        _idx([("motorista_id", 1), ("data", 1)], "motorista_data"),
+    ],
+
+    # ==================== LEDGER SEMANAL ====================
+    "ledger_semanal": [
+        _idx([("motorista_id", 1), ("ano", 1), ("semana", 1)], "motorista_semana_unique", unique=True),
+        _idx([("ano", 1), ("semana", 1), ("parceiro_id", 1)], "semana_parceiro"),
+    ],
+
+    # ==================== COMUNICAÇÃO E ALERTAS ====================
+    "notificacoes": [
+        _idx([("user_id", 1), ("lida", 1), ("criada_em", -1)], "user_lida_data"),
+    ],
+    "mensagens": [
+        _idx([("conversa_id", 1), ("criada_em", 1)], "conversa_data"),
+        _idx([("conversa_id", 1), ("criada_em", -1), ("id", -1)], "conversa_pagina"),
+    ],
+    "conversas": [
+        _idx([("participantes", 1), ("ultima_mensagem_em", -1)], "participantes_data"),
+    ],
+    "alertas": [
+        _idx([("entidade_id", 1), ("tipo", 1), ("status", 1)], "entidade_tipo_status"),
+        _idx([("status", 1), ("criado_em", -1)], "status_data"),
+    ],
+    "vencimentos": [
+        _idx([("entidade_tipo", 1), ("entidade_id", 1), ("campo", 1)], "entidade_campo_unique", unique=True),
+        _idx([("alerta", 1), ("data_vencimento", 1)], "alerta_data"),
+        _idx([("documento", 1), ("data_vencimento", 1)], "documento_data"),
+        _idx([("atualizado_em", 1)], "atualizado_em"),
+    ],
+
+    # ==================== FILA DE TAREFAS ====================
+    "fila_tarefas": [
+        _idx([("id", 1)], "id_unique", unique=True),
+        _idx([("estado", 1), ("disponivel_em", 1)], "estado_disponivel"),
+        _idx([("criado_por", 1), ("criado_em", -1)], "criado_por_data"),
+        _idx([("estado", 1), ("heartbeat", 1)], "estado_heartbeat"),
+        _idx([("estado", 1), ("tipo", 1), ("prioridade", -1), ("disponivel_em", 1)], "estado_tipo_prioridade"),
+        _idx([("estado", 1), ("grupos", 1)], "estado_grupos"),
+    ],
+
+    # ==================== PROCESSAMENTO DE UPLOADS ====================
+    "uploads_processamento": [
+        _idx([("id", 1)], "id_unique", unique=True),
+        _idx([("estado", 1), ("atualizado_em", -1)], "estado_data"),
+    ],
+
+    # ==================== AGENDADOR (LEASES) ====================
+    "agendador_leases": [
+        _idx([("nome", 1)], "nome_unique", unique=True),
+        _idx([("dono", 1)], "dono"),
+    ],
+
+    # ==================== CACHE DE CONFIGURAÇÃO (VERSÕES) ====================
+    "cache_versoes": [
+        _idx([("grupo", 1)], "grupo_unique", unique=True),
+    ],
+
+    # ==================== TEMPO REAL ====================
+    # Eventos entre processos (TEMPO_REAL_BACKEND=mongo); só interessam durante segundos
+    "eventos_tempo_real": [
+        _idx([("criado_em", 1)], "criado_em_ttl", expireAfterSeconds=3600),
+    ],
+    # ==================== WHATSAPP EM MASSA ====================
+    "whatsapp_envios_massa": [
+        _idx([("id", 1)], "id_unique", unique=True),
+        _idx([("created_at", -1)], "created_at"),
+        _idx([("enviado_por", 1), ("created_at", -1)], "enviado_por_created_at"),
+        # Webhook: estado de entrega por message_id
+        _idx([("mensagens.message_id", 1)], "mensagens_message_id"),
+    ],
+    # Estados do webhook que chegaram antes do message_id estar gravado
+    "whatsapp_estados_pendentes": [
+        _idx([("message_id", 1)], "message_id"),
+        _idx([("recebido_em", 1)], "recebido_em_ttl", expireAfterSeconds=86400),
+    ],
+    # ==================== ENVIO DE EMAIL ====================
+    "emails_envio": [
+        _idx([("id", 1)], "id_unique", unique=True),
+        _idx([("lote_id", 1), ("estado", 1)], "lote_estado"),
+        _idx([("estado", 1), ("atualizado_em", -1)], "estado_atualizado"),
+    ],
+}
+
+
+def _key_spec(keys) -> List:
+    return [(k, int(d) if isinstance(d, (int, float)) else d) for k, d in keys]
+
+
+async def _index_usage(collection) -> Dict[str, int]:
+    """Número de utilizações de cada índice desde o arranque do mongod ($indexStats)"""
+    usage = {}
+    try:
+        async for stat in collection.aggregate([{"$indexStats": {}}]):
+            usage[stat["name"]] = int(stat.get("accesses", {}).get("ops", 0))
+    except OperationFailure as e:
+        logger.debug(f"$indexStats indisponível para {collection.name}: {e}")
+    return usage
+
+
+async def reconcile_indexes(
+    db,
+    apply: bool = True,
+    drop_extra: bool = False,
+    collections: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Reconciliar os índices declarados em INDEX_REGISTRY com a base de dados.
+
+    Retorna um relatório com os índices (``colecao.nome``) em falta, criados,
+    extra (existentes mas não declarados), não utilizados e falhados.
+    """
+    report = {
+        "missing": [],
+        "created": [],
+        "extra": [],
+        "dropped": [],
+        "unused": [],
+        "failed": [],
+    }
+
+    for nome_colecao, specs in INDEX_REGISTRY.items():
+        if collections and nome_colecao not in collections:
+            continue
+
+        collection = db[nome_colecao]
+        existentes = {}
+        async for info in collection.list_indexes():
+            existentes[info["name"]] = info
+
+        chaves_existentes = {
+            tuple(_key_spec(info["key"].items())): name
+            for name, info in existentes.items()
+        }
+
+        declarados = set()
+        em_falta = []
+        for spec in specs:
+            chave = tuple(_key_spec(spec["keys"]))
+            nome_existente = spec["name"] if spec["name"] in existentes else chaves_existentes.get(chave)
+            if nome_existente:
+                declarados.add(nome_existente)
+                continue
+            em_falta.append(spec)
+            report["missing"].append(f"{nome_colecao}.{spec['name']}")
+
+        if apply:
+            for spec in em_falta:
+                try:
+                    await collection.create_indexes([
+                        IndexModel(spec["keys"], name=spec["name"], **spec["options"])
+                    ])
+                    declarados.add(spec["name"])
+                    report["created"].append(f"{nome_colecao}.{spec['name']}")
+                except OperationFailure as e:
+                    # Ex.: duplicados existentes impedem um índice único
+                    logger.warning(f"Não foi possível criar índice {nome_colecao}.{spec['name']}: {e}")
+                    report["failed"].append({"index": f"{nome_colecao}.{spec['name']}", "error": str(e)})
+
+        for name in existentes:
+            if name == "_id_" or name in declarados:
+                continue
+            report["extra"].append(f"{nome_colecao}.{name}")
+            if apply and drop_extra:
+                try:
+                    await collection.drop_index(name)
+                    report["dropped"].append(f"{nome_colecao}.{name}")
+                except OperationFailure as e:
+                    report["failed"].append({"index": f"{nome_colecao}.{name}", "error": str(e)})
+
+        usage = await _index_usage(collection)
+        for name, ops in usage.items():
+            if name != "_id_" and ops == 0 and name in existentes:
+                report["unused"].append(f"{nome_colecao}.{name}")
+
+    logger.info(
+        f"🗂️ Índices: {len(report['created'])} criados, {len(report['missing'])} em falta, "
+        f"{len(report['extra'])} extra, {len(report['unused'])} não utilizados, "
+        f"{len(report['failed'])} falhados"
+    )
+    return report
+
+
+async def _main(argv: Optional[List[str]] = None):
+    import argparse
+    import json
+    from utils.database import get_database, close_database
+
+    parser = argparse.ArgumentParser(description="Reconciliar índices MongoDB")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas relatório, sem criar índices")
+    parser.add_argument("--drop-extra", action="store_true", help="Remover índices não declarados")
+    parser.add_argument("--collection", action="append", help="Limitar a uma colecção (repetível)")
+    args = parser.parse_args(argv)
+
+    report = await reconcile_indexes(
+        get_database(),
+        apply=not args.dry_run,
+        drop_extra=args.drop_extra,
+        collections=args.collection
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    await close_database()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
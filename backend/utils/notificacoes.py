@@ -60,6 +60,10 @@ async def criar_notificacao(
     await db.notificacoes.insert_one(notificacao)
     logger.info(f"✓ Notification created: {tipo} for user {user_id}")
     
+    # Push to the user's realtime connections (replaces the stats polling)
+    from services import nao_lidas
+    await nao_lidas.notificacao_criada(db, notificacao)
+    
     # Queue email if requested
     if enviar_email:
         await enviar_email_notificacao(db, user_id, titulo, mensagem, link)
@@ -98,128 +102,12 @@ async def enviar_email_notificacao(db, user_id: str, titulo: str, mensagem: str,
 
 async def check_documentos_expirando(db):
     """Check for expiring documents and create notifications"""
-    logger.info("Checking expiring documents...")
-    
-    hoje = datetime.now(timezone.utc)
-    limite_alerta = hoje + timedelta(days=7)  # Alert 7 days before expiration
-    
-    def parse_date(date_str):
-        """Parse date string supporting multiple formats"""
-        if not date_str:
-            return None
-        
-        formats = [
-            "%Y-%m-%d",      # 2025-12-31
-            "%d/%m/%Y",      # 31/12/2025
-            "%d-%m-%Y",      # 31-12-2025
-            "%Y/%m/%d",      # 2025/12/31
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt).replace(tzinfo=timezone.utc)
-            except ValueError:
-                continue
-        
-        logger.error(f"Error parsing date {date_str}: no valid format found")
-        return None
-    
-    # Check motoristas documents
-    motoristas = await db.motoristas.find({}, {"_id": 0}).to_list(None)
+    from services import vencimentos
     
-    for motorista in motoristas:
-        user_id = motorista["id"]
-        
-        # Check each document type
-        docs_to_check = [
-            ("cc_validade", "Cartão de Cidadão"),
-            ("carta_conducao_validade", "Carta de Condução"),
-            ("licenca_tvde_validade", "Licença TVDE")
-        ]
-        
-        for field, doc_name in docs_to_check:
-            validade_str = motorista.get(field)
-            if not validade_str:
-                continue
-            
-            validade = parse_date(validade_str)
-            if not validade:
-                continue
-            
-            if hoje <= validade <= limite_alerta:
-                # Check if notification already exists
-                existing = await db.notificacoes.find_one({
-                    "user_id": user_id,
-                    "tipo": "documento_expirando",
-                    "metadata.documento": doc_name,
-                    "criada_em": {"$gte": (hoje - timedelta(days=1)).isoformat()}
-                })
-                
-                if not existing:
-                    dias_restantes = (validade - hoje).days
-                    await criar_notificacao(
-                        db,
-                        user_id=user_id,
-                        tipo="documento_expirando",
-                        titulo=f"⚠️ {doc_name} a expirar",
-                        mensagem=f"O seu {doc_name} expira em {dias_restantes} dias ({validade_str}). Por favor, renove o documento.",
-                        prioridade="alta" if dias_restantes <= 3 else "normal",
-                        link="/perfil",
-                        metadata={"documento": doc_name, "validade": validade_str, "dias_restantes": dias_restantes},
-                        enviar_email=True
-                    )
-                    logger.info(f"✓ Created expiring doc notification for {motorista['name']}: {doc_name}")
-    
-    # Check vehicle documents
-    vehicles = await db.vehicles.find({}, {"_id": 0}).to_list(None)
+    logger.info("Checking expiring documents...")
     
-    for vehicle in vehicles:
-        parceiro_id = vehicle.get("parceiro_id")
-        if not parceiro_id:
-            continue
-        
-        docs_to_check = [
-            ("seguro_validade", "Seguro"),
-            ("inspecao_validade", "Inspeção"),
-            ("iuc_validade", "IUC")
-        ]
-        
-        for field, doc_name in docs_to_check:
-            validade_str = vehicle.get(field)
-            if not validade_str:
-                continue
-            
-            validade = parse_date(validade_str)
-            if not validade:
-                continue
-            
-            if hoje <= validade <= limite_alerta:
-                existing = await db.notificacoes.find_one({
-                    "user_id": parceiro_id,
-                    "tipo": "documento_veiculo_expirando",
-                    "metadata.veiculo_id": vehicle["id"],
-                    "metadata.documento": doc_name,
-                    "criada_em": {"$gte": (hoje - timedelta(days=1)).isoformat()}
-                })
-                
-                if not existing:
-                    dias_restantes = (validade - hoje).days
-                    await criar_notificacao(
-                        db,
-                        user_id=parceiro_id,
-                        tipo="documento_veiculo_expirando",
-                        titulo=f"⚠️ {doc_name} do veículo {vehicle.get('matricula', 'N/A')}",
-                        mensagem=f"O {doc_name} do veículo {vehicle.get('matricula')} expira em {dias_restantes} dias.",
-                        prioridade="alta" if dias_restantes <= 3 else "normal",
-                        link=f"/veiculos/{vehicle['id']}",
-                        metadata={
-                            "veiculo_id": vehicle["id"],
-                            "matricula": vehicle.get("matricula"),
-                            "documento": doc_name,
-                            "validade": validade_str
-                        },
-                        enviar_email=True
-                    )
+    # Only due-date index entries expiring in the next 7 days are read
+    await vencimentos.processar_notificacoes(db)
     
     logger.info("✓ Finished checking expiring documents")
 
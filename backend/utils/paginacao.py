@@ -0,0 +1,208 @@
+"""
+Paginação por cursor (keyset) para os endpoints de listagem.
+
+As listagens devolviam tudo de uma vez com limites arbitrários
+(`to_list(1000)`, `to_list(500)`): parceiros grandes recebiam listas
+cortadas sem aviso e payloads de megabytes para mostrar 20 linhas.
+
+Um endpoint recebe `paginacao: Paginacao = Depends()`, que acrescenta os
+query params:
+
+- `limit`: tamanho da página (até `PAGINACAO_MAX_LIMITE`);
+- `cursor`: valor opaco devolvido em `proximo_cursor` pela página anterior;
+- `campos`: projeção ("id,matricula,marca"), sem campos excluídos pelo
+  endpoint;
+- `com_total`: incluir `total` (contagem limitada a
+  `PAGINACAO_MAX_CONTAGEM`; acima disso `total_exato` é False).
+
+Sem `limit` nem `cursor` o endpoint mantém a resposta antiga (lista),
+por compatibilidade com os clientes atuais. Com paginação a resposta é
+`{"items", "proximo_cursor", "tem_mais", "limite", "total", "total_exato"}`.
+
+A página seguinte continua a partir do último (valor de ordenação, id),
+por isso não usa `skip` e cada página custa o mesmo com um índice em
+(filtro..., campo de ordenação, id).
+"""
+
+import base64
+import datetime
+import os
+import re
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import json_util
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+PAGINACAO_LIMITE_PADRAO = int(os.environ.get("PAGINACAO_LIMITE_PADRAO", "50"))
+PAGINACAO_MAX_LIMITE = int(os.environ.get("PAGINACAO_MAX_LIMITE", "200"))
+PAGINACAO_MAX_CONTAGEM = int(os.environ.get("PAGINACAO_MAX_CONTAGEM", "10000"))
+
+_CAMPO_VALIDO = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+# Ordem BSON dos tipos usados como chave de ordenação. As queries por
+# intervalo ($lt/$gt) só comparam valores do mesmo tipo, por isso os
+# documentos com outro tipo no campo são apanhados à parte por $type.
+_TIPOS = ["null", "number", "string", "bool", "date"]
+
+
+def _tipo(valor: Any) -> int:
+    if valor is None:
+        return 0
+    if isinstance(valor, bool):
+        return 3
+    if isinstance(valor, (int, float, Decimal)):
+        return 1
+    if isinstance(valor, str):
+        return 2
+    if isinstance(valor, datetime.datetime):
+        return 4
+    raise ValueError(f"Tipo não suportado como chave de ordenação: {type(valor).__name__}")
+
+
+def _condicao_tipos(campo: str, tipos: List[int]) -> List[Dict[str, Any]]:
+    condicoes = []
+    if 0 in tipos:
+        condicoes.append({campo: None})
+    condicoes += [{campo: {"$type": _TIPOS[t]}} for t in tipos if t != 0]
+    return condicoes
+
+
+def codificar_cursor(valor: Any, doc_id: Any) -> str:
+    texto = json_util.dumps([valor, doc_id])
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def descodificar_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        valor, doc_id = json_util.loads(texto)
+        _tipo(valor)
+        return valor, doc_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def filtro_seguinte(campo: str, direcao: int, valor: Any, doc_id: Any) -> Dict[str, Any]:
+    """Documentos depois de (valor, doc_id) na ordem [(campo, direcao), ("id", direcao)]"""
+    op = "$gt" if direcao > 0 else "$lt"
+    condicoes = [{campo: valor, "id": {op: doc_id}}]
+    if valor is not None:
+        condicoes.append({campo: {op: valor}})
+    tipo = _tipo(valor)
+    seguintes = range(tipo + 1, len(_TIPOS)) if direcao > 0 else range(0, tipo)
+    condicoes += _condicao_tipos(campo, list(seguintes))
+    return {"$or": condicoes}
+
+
+def filtro_pesquisa(texto: Optional[str], campos: List[str]) -> Dict[str, Any]:
+    """Pesquisa parcial (sem distinguir maiúsculas) em `campos`; {} se vazio"""
+    if not texto or not texto.strip():
+        return {}
+    padrao = {"$regex": re.escape(texto.strip()), "$options": "i"}
+    return {"$or": [{campo: padrao} for campo in campos]}
+
+
+class Paginacao:
+    """Parâmetros de paginação (usar como `Depends()`)"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=PAGINACAO_MAX_LIMITE, description="Tamanho da página"),
+        cursor: Optional[str] = Query(None, description="proximo_cursor da página anterior"),
+        campos: Optional[str] = Query(None, description="Campos a devolver, separados por vírgula"),
+        com_total: bool = Query(False, description="Incluir contagem total"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.campos = [c.strip() for c in campos.split(",") if c.strip()] if campos else []
+        self.com_total = com_total
+        for campo in self.campos:
+            if not _CAMPO_VALIDO.match(campo):
+                raise HTTPException(status_code=400, detail=f"Campo inválido: {campo}")
+
+    @property
+    def ativa(self) -> bool:
+        """O cliente pediu uma página (caso contrário, resposta antiga)"""
+        return self.limit is not None or self.cursor is not None
+
+    def projecao(self, base: Optional[Dict[str, Any]], campo_ordem: str) -> Dict[str, Any]:
+        """Projeção pedida em `campos`, sem os campos que `base` exclui"""
+        base = dict(base or {"_id": 0})
+        if not self.campos:
+            return base
+        excluidos = {c for c, v in base.items() if not v and c != "_id"}
+        projecao = {"_id": 0, "id": 1, campo_ordem: 1}
+        for campo in self.campos:
+            if campo not in excluidos and campo.split(".")[0] not in excluidos:
+                projecao[campo] = 1
+        return projecao
+
+    @staticmethod
+    def resposta(pagina: Dict[str, Any]) -> JSONResponse:
+        """Devolver a página tal como está (fora do response_model da lista)"""
+        return JSONResponse(content=jsonable_encoder(pagina))
+
+
+def _valor(doc: Dict[str, Any], campo: str) -> Any:
+    for parte in campo.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(parte)
+    return doc
+
+
+async def paginar(
+    colecao,
+    filtro: Dict[str, Any],
+    paginacao: Paginacao,
+    ordem: Tuple[str, int],
+    projecao: Optional[Dict[str, Any]] = None,
+    transformar: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Ler uma página de `colecao` ordenada por `ordem` = (campo, direção),
+    com `id` como desempate. `transformar` é aplicado a cada documento
+    depois de calculado o cursor.
+    """
+    campo, direcao = ordem
+    limite = paginacao.limit or PAGINACAO_LIMITE_PADRAO
+
+    query = dict(filtro)
+    if paginacao.cursor:
+        valor, doc_id = descodificar_cursor(paginacao.cursor)
+        seguinte = filtro_seguinte(campo, direcao, valor, doc_id)
+        query = {"$and": [filtro, seguinte]} if filtro else seguinte
+
+    docs = await colecao.find(query, paginacao.projecao(projecao, campo)).sort(
+        [(campo, direcao), ("id", direcao)]
+    ).limit(limite + 1).to_list(limite + 1)
+
+    tem_mais = len(docs) > limite
+    docs = docs[:limite]
+    proximo_cursor = None
+    if tem_mais and docs:
+        ultimo = docs[-1]
+        proximo_cursor = codificar_cursor(_valor(ultimo, campo), ultimo.get("id"))
+
+    pagina = {
+        "items": [transformar(d) for d in docs] if transformar else docs,
+        "proximo_cursor": proximo_cursor,
+        "tem_mais": tem_mais,
+        "limite": limite,
+        "total": None,
+        "total_exato": None,
+    }
+
+    if paginacao.com_total:
+        if filtro:
+            total = await colecao.count_documents(filtro, limit=PAGINACAO_MAX_CONTAGEM)
+            pagina["total_exato"] = total < PAGINACAO_MAX_CONTAGEM
+        else:
+            total = await colecao.estimated_document_count()
+            pagina["total_exato"] = False
+        pagina["total"] = total
+
+    return pagina
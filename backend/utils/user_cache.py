@@ -0,0 +1,145 @@
+"""
+Cache em memória (por processo) do utilizador autenticado.
+
+O SPA faz 10–20 pedidos por ecrã e cada um relia o mesmo documento de
+`users` em `get_current_user`, mais `subscriptions`/`planos` em
+`check_feature_access`. Esta cache TTL/LRU guarda, por user id:
+
+- o documento do utilizador;
+- as features do plano resolvidas a partir da subscrição;
+- os módulos ativos (subscrição + plano + módulos individuais).
+
+As rotas de escrita de utilizadores, subscrições e planos invalidam as
+entradas afetadas. Como a cache é por processo, escritas feitas noutros
+workers ou noutras rotas só são vistas quando a entrada expira
+(`USER_CACHE_TTL`, 60s por omissão).
+"""
+
+import copy
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "60"))
+USER_CACHE_MAXSIZE = int(os.environ.get("USER_CACHE_MAXSIZE", "5000"))
+
+_utilizadores: TTLCache = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL)
+_features: TTLCache = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL)
+_modulos: TTLCache = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL)
+
+_contadores = {
+    "utilizadores": {"hits": 0, "misses": 0},
+    "features": {"hits": 0, "misses": 0},
+    "modulos": {"hits": 0, "misses": 0},
+    "invalidacoes": 0,
+}
+
+# Sentinela para guardar "não encontrado" sem repetir a query
+_AUSENTE = object()
+
+
+def _ler(cache: TTLCache, nome: str, chave: Any) -> Any:
+    valor = cache.get(chave, _AUSENTE)
+    if valor is _AUSENTE:
+        _contadores[nome]["misses"] += 1
+    else:
+        _contadores[nome]["hits"] += 1
+    return valor
+
+
+async def obter_utilizador(db, user_id: str) -> Optional[Dict[str, Any]]:
+    """Documento do utilizador (sem _id), lido da cache ou de `db.users`"""
+    user = _ler(_utilizadores, "utilizadores", user_id)
+    if user is _AUSENTE:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        if user is None:
+            # Não guardar ausências: um registo acabado de criar deve ser visto logo
+            return None
+        _utilizadores[user_id] = user
+    # Cópia: as rotas alteram o dict de current_user em alguns casos
+    return copy.deepcopy(user)
+
+
+async def obter_features_plano(db, user: Dict[str, Any]) -> List[str]:
+    """Features do plano associado à subscrição ativa do utilizador"""
+    subscription_id = user.get("subscription_id")
+    if not subscription_id:
+        return []
+
+    chave = (user.get("id"), subscription_id)
+    features = _ler(_features, "features", chave)
+    if features is _AUSENTE:
+        features = []
+        subscription = await db.subscriptions.find_one(
+            {"id": subscription_id, "status": "ativo"}, {"_id": 0, "plano_id": 1}
+        )
+        if subscription:
+            plano = await db.planos.find_one(
+                {"id": subscription.get("plano_id")}, {"_id": 0, "features": 1}
+            )
+            if plano:
+                features = list(plano.get("features", []))
+        _features[chave] = features
+    return list(features)
+
+
+def obter_modulos_cache(user_id: str) -> Optional[List[str]]:
+    """Módulos ativos em cache (None se for preciso recalcular)"""
+    modulos = _ler(_modulos, "modulos", user_id)
+    return None if modulos is _AUSENTE else list(modulos)
+
+
+def guardar_modulos_cache(user_id: str, modulos: List[str]):
+    _modulos[user_id] = list(modulos)
+
+
+# ==================== INVALIDAÇÃO ====================
+
+def invalidar_utilizador(user_id: Optional[str]):
+    """Remover todas as entradas de um utilizador (dados, features e módulos)"""
+    if not user_id:
+        return
+    _contadores["invalidacoes"] += 1
+    _utilizadores.pop(user_id, None)
+    _modulos.pop(user_id, None)
+    for chave in [k for k in list(_features.keys()) if k[0] == user_id]:
+        _features.pop(chave, None)
+
+
+def invalidar_entitlements():
+    """Limpar features e módulos de todos os utilizadores (alterações a planos/módulos)"""
+    _contadores["invalidacoes"] += 1
+    _features.clear()
+    _modulos.clear()
+
+
+def invalidar_todos():
+    """Limpar toda a cache"""
+    _contadores["invalidacoes"] += 1
+    _utilizadores.clear()
+    _features.clear()
+    _modulos.clear()
+
+
+def estatisticas() -> Dict[str, Any]:
+    """Contadores de hits/misses e tamanho atual de cada cache"""
+    resultado: Dict[str, Any] = {
+        "ttl_segundos": USER_CACHE_TTL,
+        "maxsize": USER_CACHE_MAXSIZE,
+        "invalidacoes": _contadores["invalidacoes"],
+    }
+    for nome, cache in (("utilizadores", _utilizadores), ("features", _features), ("modulos", _modulos)):
+        hits = _contadores[nome]["hits"]
+        misses = _contadores[nome]["misses"]
+        total = hits + misses
+        resultado[nome] = {
+            "entradas": len(cache),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+    return resultado
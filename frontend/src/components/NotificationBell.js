@@ -3,19 +3,32 @@ import { Bell } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { API } from '@/App';
+import { useTempoReal } from '@/hooks/useTempoReal';
 
 const NotificationBell = ({ user }) => {
   const [stats, setStats] = useState({ total: 0, nao_lidas: 0 });
   const navigate = useNavigate();
 
+  // Counters are pushed by the realtime channel; polling only while it is down
+  const ligado = useTempoReal((evento) => {
+    if (evento.tipo === 'notificacao.nova' || evento.tipo === 'notificacoes.contadores') {
+      setStats((prev) => ({
+        ...prev,
+        total: evento.tipo === 'notificacao.nova' ? prev.total + 1 : prev.total,
+        nao_lidas: evento.dados.nao_lidas
+      }));
+    }
+  }, !!user);
+
   useEffect(() => {
     if (user) {
       fetchStats();
+      if (ligado) return undefined;
       // Poll every 60 seconds
       const interval = setInterval(fetchStats, 60000);
       return () => clearInterval(interval);
     }
-  }, [user]);
+  }, [user, ligado]);
 
   const fetchStats = async () => {
     try {
@@ -15,3 +15,6 @@ export {
   initialInfoForm,
   initialNovaManutencao
 } from './useFichaVeiculoState';
+
+// Hook para o canal de eventos em tempo real (mensagens e notificações)
+export { useTempoReal } from './useTempoReal';
@@ -0,0 +1,96 @@
+import { useCallback, useEffect, useRef, useState } from 'react';
+import { API } from '@/App';
+
+// Live-view do browser interativo (backend: services/browser_live.py)
+// `caminho`: '/browser/live' (Uber) ou '/prio/browser/live' (Prio).
+// Frames JPEG chegam em mensagens binárias; as de texto são JSON:
+// viewport (tamanho da página), estado (logado/url) e erro.
+// Devolve `ligado`: enquanto for false, a página mantém o polling de /screenshot.
+export const useBrowserLive = (caminho, ativo, onEstado) => {
+  const [ligado, setLigado] = useState(false);
+  const [frame, setFrame] = useState(null);
+  const [viewport, setViewport] = useState({ largura: 1280, altura: 800 });
+  const wsRef = useRef(null);
+  const onEstadoRef = useRef(onEstado);
+
+  useEffect(() => {
+    onEstadoRef.current = onEstado;
+  }, [onEstado]);
+
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!ativo || !token || typeof WebSocket === 'undefined') return undefined;
+
+    let timeout = null;
+    let tentativas = 0;
+    let fechado = false;
+
+    const ligar = () => {
+      const url = `${API.replace(/^http/, 'ws')}${caminho}?token=${encodeURIComponent(token)}`;
+      const ws = new WebSocket(url);
+      ws.binaryType = 'blob';
+      wsRef.current = ws;
+
+      ws.onopen = () => {
+        tentativas = 0;
+        setLigado(true);
+      };
+
+      ws.onmessage = (mensagem) => {
+        if (typeof mensagem.data !== 'string') {
+          const novo = URL.createObjectURL(mensagem.data);
+          setFrame((anterior) => {
+            if (anterior) URL.revokeObjectURL(anterior);
+            return novo;
+          });
+          return;
+        }
+        try {
+          const evento = JSON.parse(mensagem.data);
+          if (evento.tipo === 'viewport') {
+            setViewport({ largura: evento.largura, altura: evento.altura });
+          } else if (evento.tipo === 'estado') {
+            onEstadoRef.current?.(evento);
+          } else if (evento.tipo === 'erro') {
+            console.error('Live-view:', evento.erro);
+          }
+        } catch (error) {
+          console.error('Mensagem do live-view inválida:', error);
+        }
+      };
+
+      ws.onclose = (evento) => {
+        wsRef.current = null;
+        setLigado(false);
+        // 4401/4403: sem acesso; 4404: browser não iniciado
+        if (fechado || [4401, 4403, 4404].includes(evento.code)) return;
+        tentativas += 1;
+        timeout = setTimeout(ligar, Math.min(30000, 1000 * 2 ** tentativas));
+      };
+    };
+
+    ligar();
+
+    return () => {
+      fechado = true;
+      clearTimeout(timeout);
+      if (wsRef.current) wsRef.current.close();
+      setFrame((anterior) => {
+        if (anterior) URL.revokeObjectURL(anterior);
+        return null;
+      });
+    };
+  }, [caminho, ativo]);
+
+  // Eventos de input: clicar {x, y}, escrever {texto}, tecla {tecla}, scroll {dx, dy}
+  const enviar = useCallback((evento) => {
+    const ws = wsRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN) return false;
+    ws.send(JSON.stringify(evento));
+    return true;
+  }, []);
+
+  return { ligado, frame, viewport, enviar };
+};
+
+export default useBrowserLive;
@@ -0,0 +1,66 @@
+import { useEffect, useRef, useState } from 'react';
+import { API } from '@/App';
+
+// Canal em tempo real (backend: routes/tempo_real.py)
+// Eventos: mensagem.nova, mensagens.lidas, conversas.contadores,
+// notificacao.nova, notificacoes.contadores
+// Devolve `ligado`: enquanto for false, os componentes mantêm o polling.
+export const useTempoReal = (onEvento, ativo = true) => {
+  const [ligado, setLigado] = useState(false);
+  const onEventoRef = useRef(onEvento);
+
+  useEffect(() => {
+    onEventoRef.current = onEvento;
+  }, [onEvento]);
+
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!ativo || !token || typeof WebSocket === 'undefined') return undefined;
+
+    let ws = null;
+    let timeout = null;
+    let tentativas = 0;
+    let fechado = false;
+
+    const ligar = () => {
+      const url = `${API.replace(/^http/, 'ws')}/tempo-real/ws?token=${encodeURIComponent(token)}`;
+      ws = new WebSocket(url);
+
+      ws.onopen = () => {
+        tentativas = 0;
+        setLigado(true);
+      };
+
+      ws.onmessage = (mensagem) => {
+        try {
+          const evento = JSON.parse(mensagem.data);
+          if (evento.tipo !== 'ping') {
+            onEventoRef.current?.(evento);
+          }
+        } catch (error) {
+          console.error('Evento em tempo real inválido:', error);
+        }
+      };
+
+      ws.onclose = (evento) => {
+        setLigado(false);
+        // 4401: token inválido ou expirado, não vale a pena religar
+        if (fechado || evento.code === 4401) return;
+        tentativas += 1;
+        timeout = setTimeout(ligar, Math.min(30000, 1000 * 2 ** tentativas));
+      };
+    };
+
+    ligar();
+
+    return () => {
+      fechado = true;
+      clearTimeout(timeout);
+      if (ws) ws.close();
+    };
+  }, [ativo]);
+
+  return ligado;
+};
+
+export default useTempoReal;
@@ -77,9 +77,14 @@ import {
   FileText,
   CreditCard,
   Folder,
-  DollarSign
+  DollarSign,
+  ChevronLeft,
+  ChevronRight
 } from 'lucide-react';
 
+// Linhas por página da tabela de subscrições (plano, módulos e preço resolvidos no backend)
+const SUBSCRICOES_POR_PAGINA = 50;
+
 const AdminGestaoPlanos = ({ user, onLogout }) => {
   const navigate = useNavigate();
   const [activeTab, setActiveTab] = useState('planos');
@@ -89,6 +94,9 @@ const AdminGestaoPlanos = ({ user, onLogout }) => {
   const [planos, setPlanos] = useState([]);
   const [modulos, setModulos] = useState([]);
   const [subscricoes, setSubscricoes] = useState([]);
+  const [subscricoesPagina, setSubscricoesPagina] = useState([]);
+  const [paginaSubscricoes, setPaginaSubscricoes] = useState(0);
+  const [loadingSubscricoes, setLoadingSubscricoes] = useState(false);
   const [estatisticas, setEstatisticas] = useState(null);
   const [categorias, setCategorias] = useState([]);
   
@@ -361,6 +369,34 @@ const AdminGestaoPlanos = ({ user, onLogout }) => {
     fetchDados();
   }, [fetchDados]);
 
+  const fetchSubscricoesPagina = useCallback(async (pagina) => {
+    try {
+      setLoadingSubscricoes(true);
+      const token = localStorage.getItem('token');
+      const params = new URLSearchParams({
+        detalhes: 'true',
+        skip: String(pagina * SUBSCRICOES_POR_PAGINA),
+        limit: String(SUBSCRICOES_POR_PAGINA)
+      });
+      const response = await axios.get(`${API}/gestao-planos/subscricoes?${params.toString()}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setSubscricoesPagina(response.data || []);
+    } catch (error) {
+      console.error('Erro ao carregar subscrições:', error);
+      toast.error('Erro ao carregar subscrições');
+    } finally {
+      setLoadingSubscricoes(false);
+    }
+  }, []);
+
+  // Só carrega a tabela quando o separador está aberto; recarrega depois de cada fetchDados
+  useEffect(() => {
+    if (activeTab === 'subscricoes') {
+      fetchSubscricoesPagina(paginaSubscricoes);
+    }
+  }, [activeTab, paginaSubscricoes, subscricoes, fetchSubscricoesPagina]);
+
   const handleSavePlano = async () => {
     if (!planoForm.nome) {
       toast.error('Nome é obrigatório');
@@ -1574,60 +1610,96 @@ const AdminGestaoPlanos = ({ user, onLogout }) => {
                 <CardDescription>Lista de todas as subscrições de planos e módulos</CardDescription>
               </CardHeader>
               <CardContent>
-                {subscricoes.length === 0 ? (
+                {loadingSubscricoes && subscricoesPagina.length === 0 ? (
+                  <div className="flex justify-center py-8">
+                    <Loader2 className="w-6 h-6 animate-spin text-slate-400" />
+                  </div>
+                ) : subscricoesPagina.length === 0 && paginaSubscricoes === 0 ? (
                   <div className="text-center py-8 text-slate-500">
                     <Users className="w-12 h-12 mx-auto mb-3 opacity-20" />
                     <p>Nenhuma subscrição encontrada</p>
                   </div>
                 ) : (
-                  <Table>
-                    <TableHeader>
-                      <TableRow>
-                        <TableHead>Utilizador</TableHead>
-                        <TableHead>Plano/Módulos</TableHead>
-                        <TableHead>Periodicidade</TableHead>
-                        <TableHead>Valor</TableHead>
-                        <TableHead>Status</TableHead>
-                        <TableHead>Próx. Cobrança</TableHead>
-                      </TableRow>
-                    </TableHeader>
-                    <TableBody>
-                      {subscricoes.map((sub) => (
-                        <TableRow key={sub.id}>
-                          <TableCell>
-                            <div>
-                              <p className="font-medium">{sub.user_nome || sub.user_id}</p>
-                              <p className="text-xs text-slate-500">{sub.user_tipo}</p>
-                            </div>
-                          </TableCell>
-                          <TableCell>
-                            {sub.plano_nome || 'Módulos individuais'}
-                            {sub.modulos_individuais?.length > 0 && (
-                              <span className="text-xs text-slate-500 ml-1">
-                                +{sub.modulos_individuais.length} módulos
-                              </span>
-                            )}
-                          </TableCell>
-                          <TableCell>
-                            <Badge variant="outline">{sub.periodicidade}</Badge>
-                          </TableCell>
-                          <TableCell className="font-semibold">€{sub.preco_final}</TableCell>
-                          <TableCell>
-                            <Badge className={
-                              sub.status === 'ativo' ? 'bg-green-100 text-green-700' :
-                              sub.status === 'trial' ? 'bg-amber-100 text-amber-700' :
-                              'bg-slate-100 text-slate-700'
-                            }>
-                              {sub.status}
-                            </Badge>
-                          </TableCell>
-                          <TableCell className="text-sm text-slate-600">
-                            {sub.proxima_cobranca ? new Date(sub.proxima_cobranca).toLocaleDateString('pt-PT') : '-'}
-                          </TableCell>
+                  <>
+                    <Table>
+                      <TableHeader>
+                        <TableRow>
+                          <TableHead>Utilizador</TableHead>
+                          <TableHead>Plano/Módulos</TableHead>
+                          <TableHead>Periodicidade</TableHead>
+                          <TableHead>Valor</TableHead>
+                          <TableHead>Preço atual</TableHead>
+                          <TableHead>Status</TableHead>
+                          <TableHead>Próx. Cobrança</TableHead>
                         </TableRow>
-                      ))}
-                    </TableBody>
-                  </Table>
+                      </TableHeader>
+                      <TableBody>
+                        {subscricoesPagina.map((sub) => (
+                          <TableRow key={sub.id}>
+                            <TableCell>
+                              <div>
+                                <p className="font-medium">{sub.user_nome || sub.user_id}</p>
+                                <p className="text-xs text-slate-500">{sub.user_tipo}</p>
+                              </div>
+                            </TableCell>
+                            <TableCell>
+                              {sub.detalhes?.plano_nome || sub.plano_nome || 'Módulos individuais'}
+                              {sub.detalhes?.modulos_ativos?.length > 0 ? (
+                                <span className="text-xs text-slate-500 ml-1">
+                                  {sub.detalhes.modulos_ativos.length} módulos ativos
+                                </span>
+                              ) : sub.modulos_individuais?.length > 0 && (
+                                <span className="text-xs text-slate-500 ml-1">
+                                  +{sub.modulos_individuais.length} módulos
+                                </span>
+                              )}
+                              {sub.detalhes?.limites?.dentro_limites === false && (
+                                <Badge className="ml-2 bg-red-100 text-red-700">Limite excedido</Badge>
+                              )}
+                            </TableCell>
+                            <TableCell>
+                              <Badge variant="outline">{sub.periodicidade}</Badge>
+                            </TableCell>
+                            <TableCell className="font-semibold">€{sub.preco_final}</TableCell>
+                            <TableCell className="text-sm text-slate-600">
+                              {sub.detalhes?.preco ? `€${sub.detalhes.preco.preco_final}` : '-'}
+                            </TableCell>
+                            <TableCell>
+                              <Badge className={
+                                sub.status === 'ativo' ? 'bg-green-100 text-green-700' :
+                                sub.status === 'trial' ? 'bg-amber-100 text-amber-700' :
+                                'bg-slate-100 text-slate-700'
+                              }>
+                                {sub.status}
+                              </Badge>
+                            </TableCell>
+                            <TableCell className="text-sm text-slate-600">
+                              {sub.proxima_cobranca ? new Date(sub.proxima_cobranca).toLocaleDateString('pt-PT') : '-'}
+                            </TableCell>
+                          </TableRow>
+                        ))}
+                      </TableBody>
+                    </Table>
+                    <div className="flex items-center justify-end gap-2 pt-4">
+                      <Button
+                        variant="outline"
+                        size="sm"
+                        disabled={paginaSubscricoes === 0 || loadingSubscricoes}
+                        onClick={() => setPaginaSubscricoes((p) => p - 1)}
+                      >
+                        <ChevronLeft className="w-4 h-4" />
+                      </Button>
+                      <span className="text-sm text-slate-600">Página {paginaSubscricoes + 1}</span>
+                      <Button
+                        variant="outline"
+                        size="sm"
+                        disabled={subscricoesPagina.length < SUBSCRICOES_POR_PAGINA || loadingSubscricoes}
+                        onClick={() => setPaginaSubscricoes((p) => p + 1)}
+                      >
+                        <ChevronRight className="w-4 h-4" />
+                      </Button>
+                    </div>
+                  </>
                 )}
               </CardContent>
             </Card>
@@ -2,6 +2,7 @@ import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { API } from '@/App';
 import Layout from '@/components/Layout';
+import { useBrowserLive } from '@/hooks/useBrowserLive';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -32,6 +33,14 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
   const imgRef = useRef(null);
   const intervalRef = useRef(null);
 
+  // Live-view por WebSocket; o backend guarda a sessão quando o login fica feito
+  const live = useBrowserLive('/prio/browser/live', browserAtivo, (estado) => {
+    setLogado(estado.logado || false);
+    if (estado.logado) {
+      toast.success('Login Prio concluído! Sessão guardada.');
+    }
+  });
+
   useEffect(() => {
     carregarStatus();
     return () => {
@@ -39,6 +48,16 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
     };
   }, []);
 
+  // Polling de screenshots só enquanto o live-view não estiver ligado
+  useEffect(() => {
+    if (!browserAtivo || live.ligado) return undefined;
+    intervalRef.current = setInterval(atualizarScreenshot, 2000);
+    return () => {
+      clearInterval(intervalRef.current);
+      intervalRef.current = null;
+    };
+  }, [browserAtivo, live.ligado]);
+
   const carregarStatus = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -72,9 +91,6 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
         setBrowserAtivo(true);
         setScreenshot(res.data.screenshot);
         toast.success('Browser Prio iniciado!');
-        
-        // Iniciar atualização automática
-        intervalRef.current = setInterval(atualizarScreenshot, 2000);
       } else {
         toast.error(res.data.erro || 'Erro ao iniciar browser');
       }
@@ -126,16 +142,18 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
   const handleImageClick = async (e) => {
     if (!imgRef.current || !browserAtivo) return;
     
-    // Mostrar indicador de loading
-    setAtualizando(true);
-    
     const rect = imgRef.current.getBoundingClientRect();
-    const scaleX = 1280 / rect.width;
-    const scaleY = 800 / rect.height;
+    const scaleX = live.viewport.largura / rect.width;
+    const scaleY = live.viewport.altura / rect.height;
     
     const x = Math.round((e.clientX - rect.left) * scaleX);
     const y = Math.round((e.clientY - rect.top) * scaleY);
     
+    if (live.enviar({ tipo: 'clicar', x, y })) return;
+    
+    // Mostrar indicador de loading
+    setAtualizando(true);
+    
     console.log(`Clique na posição: x=${x}, y=${y}`);
     
     try {
@@ -168,6 +186,11 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
   const enviarTexto = async () => {
     if (!textoInput || !browserAtivo) return;
     
+    if (live.enviar({ tipo: 'escrever', texto: textoInput })) {
+      setTextoInput('');
+      return;
+    }
+    
     try {
       const token = localStorage.getItem('token');
       
@@ -189,6 +212,8 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
   const enviarTecla = async (tecla) => {
     if (!browserAtivo) return;
     
+    if (live.enviar({ tipo: 'tecla', tecla })) return;
+    
     try {
       const token = localStorage.getItem('token');
       
@@ -533,7 +558,7 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
             )}
 
             {/* Screenshot */}
-            {browserAtivo && screenshot && (
+            {browserAtivo && (live.frame || screenshot) && (
               <div className="space-y-3">
                 <div className="bg-slate-100 p-2 rounded-lg relative">
                   <p className="text-xs text-slate-500 mb-2 flex items-center gap-1">
@@ -543,7 +568,7 @@ const ConfiguracaoPrioParceiro = ({ user, onLogout }) => {
                   <div className="relative">
                     <img
                       ref={imgRef}
-                      src={`data:image/jpeg;base64,${screenshot}`}
+                      src={live.frame || `data:image/jpeg;base64,${screenshot}`}
                       alt="Browser Prio"
                       className={`w-full rounded border cursor-crosshair ${atualizando ? 'opacity-50' : ''}`}
                       onClick={handleImageClick}
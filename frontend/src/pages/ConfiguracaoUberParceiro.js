@@ -2,6 +2,7 @@ import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { API } from '@/App';
 import Layout from '@/components/Layout';
+import { useBrowserLive } from '@/hooks/useBrowserLive';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -34,6 +35,16 @@ const ConfiguracaoUberParceiro = ({ user, onLogout }) => {
   
   const imgRef = useRef(null);
   const intervalRef = useRef(null);
+  const loginDetectadoRef = useRef(false);
+
+  // Live-view por WebSocket; o estado (logado) chega só quando muda
+  const live = useBrowserLive('/browser/live', browserAtivo, (estado) => {
+    if (estado.logado && !loginDetectadoRef.current) {
+      loginDetectadoRef.current = true;
+      toast.success('Login detectado! Sessão guardada por 30 dias.');
+      carregarDados();
+    }
+  });
 
   useEffect(() => {
     carregarDados();
@@ -42,6 +53,16 @@ const ConfiguracaoUberParceiro = ({ user, onLogout }) => {
     };
   }, []);
 
+  // Polling de screenshots só enquanto o live-view não estiver ligado
+  useEffect(() => {
+    if (!browserAtivo || live.ligado) return undefined;
+    intervalRef.current = setInterval(atualizarScreenshot, 2000);
+    return () => {
+      clearInterval(intervalRef.current);
+      intervalRef.current = null;
+    };
+  }, [browserAtivo, live.ligado]);
+
   const carregarDados = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -125,12 +146,10 @@ const ConfiguracaoUberParceiro = ({ user, onLogout }) => {
       });
       
       if (response.data.sucesso) {
+        loginDetectadoRef.current = false;
         setBrowserAtivo(true);
         setScreenshot(response.data.screenshot);
         toast.success('Browser iniciado! Complete o login.');
-        
-        // Atualizar screenshots a cada 2 segundos
-        intervalRef.current = setInterval(atualizarScreenshot, 2000);
       } else {
         toast.error(response.data.erro || 'Erro ao iniciar browser');
       }
@@ -170,12 +189,14 @@ const ConfiguracaoUberParceiro = ({ user, onLogout }) => {
     if (!browserAtivo || !imgRef.current) return;
     
     const rect = imgRef.current.getBoundingClientRect();
-    const scaleX = 1280 / rect.width;
-    const scaleY = 800 / rect.height;
+    const scaleX = live.viewport.largura / rect.width;
+    const scaleY = live.viewport.altura / rect.height;
     
     const x = Math.round((event.clientX - rect.left) * scaleX);
     const y = Math.round((event.clientY - rect.top) * scaleY);
     
+    if (live.enviar({ tipo: 'clicar', x, y })) return;
+    
     setAtualizando(true);
     try {
       const token = localStorage.getItem('token');
@@ -200,6 +221,11 @@ const ConfiguracaoUberParceiro = ({ user, onLogout }) => {
   const enviarTexto = async () => {
     if (!textoInput) return;
     
+    if (live.enviar({ tipo: 'escrever', texto: textoInput })) {
+      setTextoInput('');
+      return;
+    }
+    
     setAtualizando(true);
     try {
       const token = localStorage.getItem('token');
@@ -219,6 +245,8 @@ const ConfiguracaoUberParceiro = ({ user, onLogout }) => {
   };
   
   const enviarTecla = async (tecla) => {
+    if (live.enviar({ tipo: 'tecla', tecla })) return;
+    
     setAtualizando(true);
     try {
       const token = localStorage.getItem('token');
@@ -569,10 +597,10 @@ const ConfiguracaoUberParceiro = ({ user, onLogout }) => {
                         </div>
                       </div>
                     </div>
-                  ) : screenshot ? (
+                  ) : live.frame || screenshot ? (
                     <img
                       ref={imgRef}
-                      src={`data:image/jpeg;base64,${screenshot}`}
+                      src={live.frame || `data:image/jpeg;base64,${screenshot}`}
                       alt="Uber Fleet"
                       className="w-full cursor-crosshair"
                       onClick={handleImageClick}
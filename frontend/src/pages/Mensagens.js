@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { API } from '@/App';
+import { useTempoReal } from '@/hooks/useTempoReal';
 import Layout from '@/components/Layout';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
@@ -44,20 +45,44 @@ const Mensagens = ({ user, onLogout }) => {
   const [participanteSelecionado, setParticipanteSelecionado] = useState('');
   const messagesEndRef = useRef(null);
 
+  const conversaSelecionadaRef = useRef(null);
+
+  useEffect(() => {
+    conversaSelecionadaRef.current = conversaSelecionada;
+  }, [conversaSelecionada]);
+
+  // New messages and unread counters are pushed by the realtime channel
+  const ligado = useTempoReal((evento) => {
+    const aberta = conversaSelecionadaRef.current;
+    if (evento.tipo === 'mensagem.nova') {
+      if (aberta && evento.dados.conversa_id === aberta.id) {
+        fetchMensagens(aberta.id, true);
+      }
+      fetchConversas();
+    } else if (evento.tipo === 'conversas.contadores') {
+      const porConversa = evento.dados.por_conversa || {};
+      setConversas((prev) => prev.map((c) => ({ ...c, mensagens_nao_lidas: porConversa[c.id] || 0 })));
+    }
+  });
+
   useEffect(() => {
     fetchConversas();
     fetchUsuarios();
+  }, []);
+
+  useEffect(() => {
+    if (ligado) return undefined;
     
-    // Poll for new messages every 5 seconds
+    // Poll for new messages every 5 seconds while the realtime channel is down
     const interval = setInterval(() => {
-      if (conversaSelecionada) {
-        fetchMensagens(conversaSelecionada.id, true);
+      if (conversaSelecionadaRef.current) {
+        fetchMensagens(conversaSelecionadaRef.current.id, true);
       }
       fetchConversas();
     }, 5000);
     
     return () => clearInterval(interval);
-  }, []);
+  }, [ligado]);
 
   useEffect(() => {
     scrollToBottom();
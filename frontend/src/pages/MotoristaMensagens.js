@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { API } from '@/App';
+import { useTempoReal } from '@/hooks/useTempoReal';
 import Layout from '@/components/Layout';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
@@ -18,18 +19,26 @@ const MotoristaMensagens = ({ user, onLogout }) => {
   const [loading, setLoading] = useState(false);
   const messagesEndRef = useRef(null);
 
+  // New messages are pushed by the realtime channel
+  const ligado = useTempoReal((evento) => {
+    if (evento.tipo === 'mensagem.nova' && destinatario) {
+      fetchMensagens();
+    }
+  });
+
   useEffect(() => {
     if (destinatario) {
       fetchMensagens();
+      if (ligado) return undefined;
       
-      // Poll for new messages every 5 seconds
+      // Poll for new messages every 5 seconds while the realtime channel is down
       const interval = setInterval(() => {
         fetchMensagens();
       }, 5000);
       
       return () => clearInterval(interval);
     }
-  }, [destinatario]);
+  }, [destinatario, ligado]);
 
   useEffect(() => {
     scrollToBottom();
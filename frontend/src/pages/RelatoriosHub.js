@@ -16,6 +16,7 @@ import {
   FileSpreadsheet, Loader2, Trash2, CheckSquare, RefreshCw, AlertCircle
 } from 'lucide-react';
 import { toast } from 'sonner';
+import { aguardarTarefa } from '../utils/tarefas';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -309,8 +310,14 @@ const RelatoriosHub = ({ user, onLogout }) => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
-      setResultadoGeracaoMassa(response.data);
-      toast.success(response.data.mensagem || 'Relatórios gerados com sucesso!');
+      const tarefa = await aguardarTarefa(`${API_URL}/api`, response.data.job_id);
+      if (tarefa.estado !== 'concluida') {
+        toast.error(tarefa.erro || 'Geração de relatórios não concluída');
+        return;
+      }
+
+      setResultadoGeracaoMassa(tarefa.resultado);
+      toast.success(tarefa.resultado?.mensagem || 'Relatórios gerados com sucesso!');
       
       // Recarregar relatórios
       await fetchData();
@@ -10,6 +10,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { Checkbox } from '@/components/ui/checkbox';
 import { Badge } from '@/components/ui/badge';
 import { toast } from 'sonner';
+import { aguardarTarefa } from '@/utils/tarefas';
 import { FileText, Mail, Send, CheckSquare, Clock, Search } from 'lucide-react';
 
 // Componente para gerenciar estado do relatório
@@ -183,7 +184,13 @@ const RelatoriosSemanaisNovo = ({ user, onLogout }) => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
       
-      toast.success(`Relatórios enviados por email para ${usuariosSelecionados.length} utilizador(es)!`);
+      const tarefa = await aguardarTarefa(API, response.data.job_id);
+      if (tarefa.estado !== 'concluida') {
+        toast.error(tarefa.erro || 'Erro ao enviar emails');
+        return;
+      }
+      
+      toast.success(`Relatórios enviados por email para ${tarefa.resultado?.enviados ?? usuariosSelecionados.length} utilizador(es)!`);
       fetchHistorico();
       setUsuariosSelecionados([]);
     } catch (error) {
@@ -220,7 +227,13 @@ const RelatoriosSemanaisNovo = ({ user, onLogout }) => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
       
-      toast.success(`Relatórios enviados por WhatsApp para ${usuariosSelecionados.length} utilizador(es)!`);
+      const tarefa = await aguardarTarefa(API, response.data.job_id);
+      if (tarefa.estado !== 'concluida') {
+        toast.error(tarefa.erro || 'Erro ao enviar WhatsApp');
+        return;
+      }
+      
+      toast.success(`Relatórios enviados por WhatsApp para ${tarefa.resultado?.enviados ?? usuariosSelecionados.length} utilizador(es)!`);
       fetchHistorico();
       setUsuariosSelecionados([]);
     } catch (error) {
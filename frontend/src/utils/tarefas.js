@@ -0,0 +1,28 @@
+/**
+ * Utilitários para tarefas em background (fila de tarefas do backend)
+ * Os endpoints de operações longas devolvem { job_id } e a tarefa
+ * é consultada em GET /api/tarefas/{id} até terminar.
+ */
+import axios from 'axios';
+
+const ESTADOS_FINAIS = ['concluida', 'falhada', 'cancelada'];
+
+/**
+ * Consultar uma tarefa até chegar a um estado final
+ * @param {string} apiBase - URL base da API (terminado em /api)
+ * @param {string} jobId - Id devolvido pelo endpoint
+ * @param {object} opcoes - { onProgresso(tarefa), intervaloMs }
+ * @returns {Promise<object>} - Documento final da tarefa
+ */
+export const aguardarTarefa = async (apiBase, jobId, { onProgresso, intervaloMs = 2000 } = {}) => {
+  const token = localStorage.getItem('token');
+  // eslint-disable-next-line no-constant-condition
+  while (true) {
+    const { data: tarefa } = await axios.get(`${apiBase}/tarefas/${jobId}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    if (onProgresso) onProgresso(tarefa);
+    if (ESTADOS_FINAIS.includes(tarefa.estado)) return tarefa;
+    await new Promise((resolve) => setTimeout(resolve, intervaloMs));
+  }
+};